@@ -0,0 +1,494 @@
+"""
+Account Snapshots
+=================
+Per-subaccount Tradovate cashBalance + open positions, kept current from the
+user-sync WebSocket and delivered to each user's own Socket.IO room.
+
+BEFORE: fetch_tradovate_pnl_sync() polled getCashBalanceSnapshot + position/list
+for every linked subaccount over REST, stretching its interval with a scaling
+table (max(3s, 0.6s x subaccounts) - 30s stale at 50 subaccounts), and
+emit_realtime_updates() broadcast the whole platform's P&L to every connected
+client every 5s.
+
+AFTER:
+- One SnapshotListener per linked account token rides the shared connection
+  (ws_connection_manager.py). cashBalance and position props events, plus the
+  initial sync arrays, are applied the moment they arrive.
+- REST is only a staleness fallback: a subaccount without a live socket
+  (older than REST_INTERVAL) or with a socket that went quiet (older than
+  WS_STALE_AFTER) is refreshed oldest-first, within a REST_PER_MINUTE budget,
+  and not at all during a 429 cooldown.
+- Every change marks its owner dirty; drain_dirty() tells the emitter which
+  users need a push and which subaccounts changed, so each user receives only
+  their own accounts (room "user_<id>") and admins receive deltas.
+
+The web server supplies the account loader and the REST fetch (it owns token
+refresh and contract lookups), so this module never touches the database.
+
+Usage:
+    from account_snapshots import get_account_snapshots, RateLimited
+    snapshots = get_account_snapshots()
+    snapshots.set_sources(load_accounts=..., rest_fetch=..., contract_name=...)
+    snapshots.reload()
+    pnl_data, positions = snapshots.snapshot(user_id=5)
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    from ws_connection_manager import get_connection_manager, Listener
+    WS_MANAGER_AVAILABLE = True
+except ImportError:
+    WS_MANAGER_AVAILABLE = False
+    Listener = object
+
+logger = logging.getLogger('account_snapshots')
+
+REST_INTERVAL = 5.0            # Refresh age for subaccounts without a live socket
+WS_STALE_AFTER = 120.0         # A live socket silent this long gets one REST check
+REST_PER_MINUTE = 50           # Subaccount refreshes per minute (2 calls each, Tradovate allows ~120/min)
+REST_BURST = 5                 # Refreshes allowed back-to-back after an idle period
+RELOAD_INTERVAL = 60.0         # Seconds between re-reads of linked accounts (new links, rotated tokens)
+RATE_LIMIT_COOLDOWN = 60       # Seconds without REST after a Tradovate 429
+
+# Tradovate cashBalance field -> legacy pnl_data field
+_BALANCE_FIELDS = {
+    'totalCashValue': 'total_cash_value',
+    'netLiq': 'net_liq',
+    'openPnL': 'open_pnl',
+    'realizedPnL': 'realized_pnl',
+    'totalPnL': 'total_pnl',
+    'weekRealizedPnL': 'week_realized_pnl',
+    'initialMargin': 'initial_margin',
+    'maintenanceMargin': 'maintenance_margin',
+}
+
+
+class RateLimited(Exception):
+    """Raised by rest_fetch when Tradovate answers 429."""
+
+
+def _avg_price(position):
+    """netPrice is the broker's average entry; bought/sold values only as a fallback."""
+    if position.get('netPrice'):
+        return position['netPrice']
+    net_pos = position.get('netPos', 0)
+    if net_pos > 0 and position.get('bought'):
+        return position.get('boughtValue', 0) / position['bought']
+    if net_pos < 0 and position.get('sold'):
+        return position.get('soldValue', 0) / position['sold']
+    return 0
+
+
+class SnapshotListener(Listener):
+    """Feeds cashBalance / position entities for one token into the service."""
+
+    def __init__(self, service: 'AccountSnapshotService', listener_key: str):
+        self._service = service
+        self._listener_key = listener_key
+
+    @property
+    def listener_id(self) -> str:
+        return f'account-snapshots-{self._listener_key}'
+
+    async def on_message(self, items: list, raw_message: str):
+        for data in items:
+            try:
+                self._service.apply_message(data)
+            except Exception as e:
+                logger.error(f"[Snapshots] Error processing message item: {e}")
+
+
+class AccountSnapshotService:
+    """Live balances/positions per Tradovate subaccount, with dirty tracking per user."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # subaccount_id -> {account_id, user_id, account_name, is_demo, access_token}
+        self._meta: Dict[int, dict] = {}
+        self._balances: Dict[int, dict] = {}           # subaccount_id -> legacy pnl_data entry
+        self._positions: Dict[int, Dict[int, dict]] = {}  # subaccount_id -> contract_id -> position
+        self._updated_at: Dict[int, float] = {}        # subaccount_id -> last update (any source)
+        self._contract_names: Dict[int, str] = {}
+        self._unnamed: Dict[int, int] = {}             # contract_id -> subaccount_id to resolve through
+        self._dirty_users: set = set()
+        self._dirty_accounts: set = set()
+        self._listeners: Dict[str, SnapshotListener] = {}
+        self._rate_limited_until = 0.0
+        self._rest_allowance = float(REST_BURST)
+        self._rest_checked = time.time()
+        self._last_reload = 0.0
+
+        self._load_accounts: Optional[Callable] = None
+        self._rest_fetch: Optional[Callable] = None
+        self._contract_name: Optional[Callable] = None
+        self.stats = {
+            'ws_balance_events': 0,
+            'ws_position_events': 0,
+            'rest_refreshes': 0,
+            'rest_errors': 0,
+            'rate_limited': 0,
+        }
+
+    # ── Wiring ──────────────────────────────────────────────────────────────
+
+    def set_sources(self, load_accounts: Callable = None, rest_fetch: Callable = None,
+                    contract_name: Callable = None):
+        """
+        load_accounts() -> [{subaccount_id, account_id, user_id, account_name, is_demo, access_token}]
+        rest_fetch(meta) -> (cash balance dict | None, [position dicts] | None); raises RateLimited
+        contract_name(meta, contract_id) -> str  (called off the WebSocket loop)
+        """
+        if load_accounts:
+            self._load_accounts = load_accounts
+        if rest_fetch:
+            self._rest_fetch = rest_fetch
+        if contract_name:
+            self._contract_name = contract_name
+
+    def reload(self):
+        """Re-read linked accounts, drop unlinked subaccounts and register listeners for new tokens."""
+        if not self._load_accounts:
+            return
+        self._last_reload = time.time()
+        rows = self._load_accounts() or []
+        meta = {}
+        for row in rows:
+            try:
+                meta[int(row['subaccount_id'])] = dict(row)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        with self._lock:
+            for sub_id in set(self._meta) - set(meta):
+                self._forget(sub_id)
+            for sub_id, info in meta.items():
+                old = self._meta.get(sub_id)
+                if old and (old.get('user_id') != info.get('user_id')
+                            or old.get('account_name') != info.get('account_name')):
+                    self._relabel(sub_id, info)
+            self._meta = meta
+        self._attach_listeners(meta)
+
+    def maybe_reload(self):
+        if time.time() - self._last_reload >= RELOAD_INTERVAL:
+            self.reload()
+
+    def request_reload(self):
+        """Re-read linked accounts on the next cycle (e.g. after a token refresh)."""
+        self._last_reload = 0.0
+
+    def _forget(self, sub_id):
+        old = self._meta.get(sub_id) or {}
+        self._balances.pop(sub_id, None)
+        self._positions.pop(sub_id, None)
+        self._updated_at.pop(sub_id, None)
+        if old.get('user_id') is not None:
+            self._dirty_users.add(old['user_id'])
+            self._dirty_accounts.add(sub_id)
+
+    def _relabel(self, sub_id, info):
+        old_user = self._meta[sub_id].get('user_id')
+        labels = {k: info.get(k) for k in ('account_name', 'is_demo', 'user_id')}
+        if sub_id in self._balances:
+            self._balances[sub_id].update(labels)
+        for pos in self._positions.get(sub_id, {}).values():
+            pos.update(labels)
+        for uid in (old_user, info.get('user_id')):
+            if uid is not None:
+                self._dirty_users.add(uid)
+        self._dirty_accounts.add(sub_id)
+
+    def _attach_listeners(self, meta):
+        """One listener per (linked account, token); a rotated token gets a fresh listener."""
+        if not WS_MANAGER_AVAILABLE:
+            return
+        groups = {}
+        for sub_id, info in meta.items():
+            token = info.get('access_token')
+            if not token:
+                continue
+            key = f"{info['account_id']}-{token[-8:]}"
+            group = groups.setdefault(key, {'token': token, 'is_demo': info.get('is_demo', True),
+                                            'account_id': info['account_id'], 'subaccount_ids': []})
+            group['subaccount_ids'].append(sub_id)
+
+        manager = get_connection_manager()
+        for key in set(self._listeners) - set(groups):
+            manager.unregister_listener(self._listeners.pop(key).listener_id)
+        for key, group in groups.items():
+            if key in self._listeners:
+                continue
+            listener = SnapshotListener(self, key)
+            self._listeners[key] = listener
+            manager.register_listener(
+                token=group['token'],
+                is_demo=group['is_demo'],
+                subaccount_ids=group['subaccount_ids'],
+                listener=listener,
+                db_account_ids=[group['account_id']],
+            )
+
+    def has_live_socket(self, subaccount_id) -> bool:
+        if not WS_MANAGER_AVAILABLE or not self._listeners:
+            return False
+        return get_connection_manager().is_connected_for_account(int(subaccount_id))
+
+    # ── WebSocket events ────────────────────────────────────────────────────
+
+    def apply_message(self, data: dict):
+        """Apply one parsed user-sync item (props event or initial sync response)."""
+        d = data.get('d')
+        if not isinstance(d, dict):
+            return
+        if data.get('e') == 'props':
+            entity = d.get('entity') or d
+            if not isinstance(entity, dict):
+                return
+            if d.get('entityType') == 'cashBalance':
+                self.stats['ws_balance_events'] += 1
+                self.apply_cash_balance(entity)
+            elif d.get('entityType') == 'position':
+                self.stats['ws_position_events'] += 1
+                self.apply_position(entity, deleted=d.get('eventType') == 'Deleted')
+            return
+        for cb in d.get('cashBalances') or []:
+            if isinstance(cb, dict):
+                self.apply_cash_balance(cb)
+        for pos in d.get('positions') or []:
+            if isinstance(pos, dict):
+                self.apply_position(pos)
+
+    def apply_cash_balance(self, cb: dict, now: float = None):
+        """Merge a cashBalance entity/snapshot; fields absent from it keep their last value."""
+        try:
+            sub_id = int(cb.get('accountId'))
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            info = self._meta.get(sub_id)
+            if not info:
+                return
+            entry = self._balances.get(sub_id)
+            before = dict(entry) if entry else None
+            if entry is None:
+                entry = self._balances[sub_id] = {
+                    'account_id': sub_id,
+                    'account_name': info.get('account_name'),
+                    'is_demo': info.get('is_demo', True),
+                    'user_id': info.get('user_id'),
+                    **{field: 0 for field in _BALANCE_FIELDS.values()},
+                }
+            for src, dst in _BALANCE_FIELDS.items():
+                if cb.get(src) is not None:
+                    entry[dst] = cb[src]
+            if cb.get('totalPnL') is None and ('openPnL' in cb or 'realizedPnL' in cb):
+                entry['total_pnl'] = (entry.get('open_pnl') or 0) + (entry.get('realized_pnl') or 0)
+            if entry != before:
+                self._touch(sub_id, info, now)
+            else:
+                self._updated_at[sub_id] = now or time.time()
+
+    def apply_position(self, pos: dict, deleted: bool = False, now: float = None):
+        """Upsert a position entity; flat or deleted positions are removed."""
+        try:
+            sub_id = int(pos.get('accountId'))
+            contract_id = int(pos.get('contractId'))
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            info = self._meta.get(sub_id)
+            if not info:
+                return
+            book = self._positions.setdefault(sub_id, {})
+            if deleted or not pos.get('netPos'):
+                changed = book.pop(contract_id, None) is not None
+            else:
+                entry = self._position_entry(sub_id, info, contract_id, pos)
+                changed = book.get(contract_id) != entry
+                book[contract_id] = entry
+            if changed:
+                self._touch(sub_id, info, now)
+            else:
+                self._updated_at[sub_id] = now or time.time()
+
+    def _position_entry(self, sub_id, info, contract_id, pos):
+        symbol = self._contract_names.get(contract_id)
+        if symbol is None:
+            self._unnamed[contract_id] = sub_id
+        return {
+            'account_id': sub_id,
+            'account_name': info.get('account_name'),
+            'is_demo': info.get('is_demo', True),
+            'user_id': info.get('user_id'),
+            'contract_id': contract_id,
+            'symbol': symbol or str(contract_id),
+            'net_quantity': pos.get('netPos', 0),
+            'bought': pos.get('bought', 0),
+            'bought_value': pos.get('boughtValue', 0),
+            'sold': pos.get('sold', 0),
+            'sold_value': pos.get('soldValue', 0),
+            'avg_price': _avg_price(pos),
+            'timestamp': pos.get('timestamp'),
+        }
+
+    def _touch(self, sub_id, info, now):
+        self._updated_at[sub_id] = now or time.time()
+        if info.get('user_id') is not None:
+            self._dirty_users.add(info['user_id'])
+        self._dirty_accounts.add(sub_id)
+
+    # ── REST fallback ───────────────────────────────────────────────────────
+
+    def refresh_stale(self, now: float = None) -> int:
+        """REST-refresh the stalest subaccounts the WebSocket is not keeping current. Returns how many."""
+        now = now or time.time()
+        self._resolve_contract_names()
+        self._rest_allowance = min(REST_BURST, self._rest_allowance
+                                   + (now - self._rest_checked) * REST_PER_MINUTE / 60.0)
+        self._rest_checked = now
+        if not self._rest_fetch or now < self._rate_limited_until or self._rest_allowance < 1:
+            return 0
+        with self._lock:
+            due = []
+            for sub_id in self._meta:
+                age = now - self._updated_at.get(sub_id, 0)
+                if age > (WS_STALE_AFTER if self.has_live_socket(sub_id) else REST_INTERVAL):
+                    due.append((self._updated_at.get(sub_id, 0), sub_id))
+        due.sort()
+        fetched = 0
+        for _, sub_id in due[:int(self._rest_allowance)]:
+            info = self._meta.get(sub_id)
+            if not info:
+                continue
+            self._rest_allowance -= 1
+            try:
+                balance, positions = self._rest_fetch(info)
+            except RateLimited:
+                self._rate_limited_until = now + RATE_LIMIT_COOLDOWN
+                self.stats['rate_limited'] += 1
+                logger.warning(f"Rate limited by Tradovate (429)! Snapshot REST paused for {RATE_LIMIT_COOLDOWN}s")
+                break
+            except Exception as e:
+                self.stats['rest_errors'] += 1
+                logger.warning(f"Snapshot REST refresh failed for {sub_id}: {e}")
+                continue
+            fetched += 1
+            self.stats['rest_refreshes'] += 1
+            if balance is not None:
+                self.apply_cash_balance(dict(balance, accountId=sub_id), now)
+            if positions is not None:
+                self.replace_positions(sub_id, positions, now)
+        return fetched
+
+    def replace_positions(self, sub_id: int, positions: List[dict], now: float = None):
+        """Replace a subaccount's whole position book (REST position/list result)."""
+        with self._lock:
+            info = self._meta.get(sub_id)
+            if not info:
+                return
+            book = {}
+            for pos in positions:
+                try:
+                    contract_id = int(pos.get('contractId'))
+                except (TypeError, ValueError):
+                    continue
+                if pos.get('netPos') and int(pos.get('accountId') or sub_id) == sub_id:
+                    book[contract_id] = self._position_entry(sub_id, info, contract_id, pos)
+            changed = self._positions.get(sub_id) != book
+            self._positions[sub_id] = book
+            if changed:
+                self._touch(sub_id, info, now)
+            else:
+                self._updated_at[sub_id] = now or time.time()
+
+    def _resolve_contract_names(self):
+        """Name contracts first seen over WS (the listener never blocks on REST)."""
+        if not self._unnamed or not self._contract_name:
+            return
+        with self._lock:
+            pending, self._unnamed = self._unnamed, {}
+        for contract_id, sub_id in pending.items():
+            info = self._meta.get(sub_id)
+            if not info:
+                continue
+            try:
+                name = self._contract_name(info, contract_id)
+            except Exception as e:
+                logger.debug(f"Contract name lookup failed for {contract_id}: {e}")
+                continue
+            if not name or name == str(contract_id):
+                continue
+            with self._lock:
+                self._contract_names[contract_id] = name
+                for book_sub, book in self._positions.items():
+                    pos = book.get(contract_id)
+                    if pos and pos['symbol'] != name:
+                        pos['symbol'] = name
+                        self._touch(book_sub, self._meta.get(book_sub, {}), None)
+
+    def remember_contract_name(self, contract_id, name):
+        if contract_id is not None and name:
+            self._contract_names[int(contract_id)] = name
+
+    # ── Reads ───────────────────────────────────────────────────────────────
+
+    def snapshot(self, user_id=None, subaccount_ids=None):
+        """(pnl_data, positions) in the legacy fetch_tradovate_pnl_sync() format, optionally filtered."""
+        with self._lock:
+            subs = self._meta.keys() if subaccount_ids is None else subaccount_ids
+            pnl_data, positions = {}, []
+            for sub_id in subs:
+                info = self._meta.get(sub_id)
+                if not info or (user_id is not None and info.get('user_id') != user_id):
+                    continue
+                if sub_id in self._balances:
+                    pnl_data[sub_id] = dict(self._balances[sub_id])
+                positions.extend(dict(p) for p in self._positions.get(sub_id, {}).values())
+        return pnl_data, positions
+
+    def drain_dirty(self):
+        """(users with changed accounts, changed subaccount ids) since the last call."""
+        with self._lock:
+            users, self._dirty_users = self._dirty_users, set()
+            accounts, self._dirty_accounts = self._dirty_accounts, set()
+        return users, accounts
+
+    def owner_of(self, account_id) -> Optional[int]:
+        """User owning a linked (database) account id, for positions keyed by it."""
+        with self._lock:
+            for info in self._meta.values():
+                if str(info.get('account_id')) == str(account_id):
+                    return info.get('user_id')
+        return None
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            ages = [now - self._updated_at[s] for s in self._meta if s in self._updated_at]
+            return dict(
+                self.stats,
+                subaccounts=len(self._meta),
+                listeners=len(self._listeners),
+                never_updated=len(self._meta) - len(ages),
+                stale=sum(1 for a in ages if a > WS_STALE_AFTER),
+                max_age_seconds=round(max(ages), 1) if ages else None,
+                rate_limited_for=max(0, round(self._rate_limited_until - now)),
+            )
+
+
+_service: Optional[AccountSnapshotService] = None
+_service_lock = threading.Lock()
+
+
+def get_account_snapshots() -> AccountSnapshotService:
+    """Get the singleton AccountSnapshotService instance."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AccountSnapshotService()
+    return _service
@@ -5,7 +5,7 @@ Complete schema with all required tables and relationships.
 
 from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import json
 
@@ -339,6 +339,15 @@ class TVBacktestImport(Base):
     end_date = Column(String(50), nullable=True)
     raw_filename = Column(String(500), nullable=True)
 
+    # Background import job state
+    status = Column(String(20), default='complete')  # processing, complete, failed
+    progress = Column(Integer, default=100)  # 0-100
+    error_message = Column(Text, nullable=True)
+
+    # Precomputed series (JSON) served by the chart-data / daily-pnl endpoints
+    chart_series = deferred(Column(Text, nullable=True))
+    daily_pnl_series = deferred(Column(Text, nullable=True))
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
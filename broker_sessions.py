@@ -0,0 +1,494 @@
+"""
+Broker Sessions - Long-lived ProjectX / Webull sessions, contract cache and push streams
+=======================================================================================
+BEFORE: projectx_connect, the subaccount refresh, the manual-trade route, the
+recorder's ProjectX execution path and the max-loss monitor each opened
+`async with ProjectXIntegration(...)` (or WebullIntegration) on a fresh event
+loop: a new aiohttp session and a full login per call, a Contract/search before
+every order, and the max-loss monitor re-polled REST every 5s per account. The
+ProjectX break-even / trailing actions searched open orders over REST on every
+trigger and only noticed a closed position when no SL was left to cancel.
+
+AFTER:
+- One background event loop owns every broker HTTP session (aiohttp sessions
+  are bound to the loop that created them). Sync code uses run(); coroutines on
+  other loops use call(); long-running tasks use submit().
+- projectx() / webull() are async context managers that lease a cached,
+  logged-in client keyed by (broker, firm, environment, username, secret).
+  Tokens are revalidated by the integration itself; a session idle for
+  SESSION_IDLE or whose token cannot be revalidated logs in again. Leaving the
+  `async with` does not close the session.
+- projectx_contract() resolves a symbol to a ProjectX contract once per
+  (firm, environment, symbol) for CONTRACT_TTL.
+- watch_projectx() starts one SignalR user-hub stream per account
+  (ProjectXWebSocket). The stream keeps the account's open orders and positions
+  (seeded over REST) and fans pushes out to listeners, so the max-loss check
+  reacts to pushes and break-even / trailing rules are dropped as soon as their
+  position goes flat; REST stays as the fallback when signalrcore is missing or
+  the hub is down. Break-even / trailing cancel/replace still reads
+  Order/searchOpen, which also sees the stops placed moments ago.
+- tradovate_order_socket() keeps one authorized Tradovate order socket per
+  account (TradovateOrderSocket, with heartbeats) and hands out leases usable
+  from any loop. It never connects on the caller's path: a missing socket is
+  opened in the background and the caller uses REST until it is ready.
+
+Usage:
+    from broker_sessions import get_broker_sessions
+    sessions = get_broker_sessions()
+
+    async def accounts():
+        async with sessions.projectx(username, password=pw, api_key=key,
+                                     demo=True, prop_firm='topstep') as (projectx, login_result):
+            if not login_result.get('success'):
+                return []
+            return await projectx.get_accounts()
+
+    result = sessions.run(accounts())                 # from Flask / sync code
+    result = await sessions.call(accounts())          # from a coroutine on another loop
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('broker_sessions')
+
+SESSION_IDLE = 6 * 3600         # Sessions unused this long log in again on next lease
+CONTRACT_TTL = 6 * 3600         # Symbol -> contract resolution reuse (contracts roll quarterly)
+WEBULL_TOKEN_MARGIN = 300       # Re-login when the Webull token expires within this many seconds
+STREAM_RETRY = 60               # Seconds before a stream that failed to connect is retried
+                                # (also a Tradovate order socket)
+RUN_TIMEOUT = 60.0
+
+# ProjectX OrderStatus values of a resting order (0/None, 1 Open, 6 Pending)
+_OPEN_ORDER_STATUSES = (None, 0, 1, 6)
+
+
+def _secret_hash(*secrets) -> str:
+    return hashlib.sha1('\x00'.join(s or '' for s in secrets).encode('utf-8')).hexdigest()[:16]
+
+
+def match_projectx_contract(contracts: List[dict], symbol: str, symbol_root: str) -> Optional[dict]:
+    """
+    First contract matching the full symbol (MNQH6 in CON.F.US.MNQH6.H26), else
+    the root symbol (MNQ) - the matching both ProjectX execution paths use.
+    """
+    symbol_upper = (symbol or '').strip().upper()
+    for contract in contracts:
+        c_name = (contract.get('name') or contract.get('symbol') or '').upper()
+        c_id_str = str(contract.get('id') or '').upper()
+        if symbol_upper and (symbol_upper in c_name or symbol_upper in c_id_str):
+            return contract
+        if symbol_root and (symbol_root in c_name or symbol_root in c_id_str):
+            return contract
+    return None
+
+
+class _Session:
+    __slots__ = ('client', 'opened', 'login_result', 'lock', 'last_used')
+
+    def __init__(self, client):
+        self.client = client
+        self.opened = False
+        self.login_result: Optional[dict] = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.time()
+
+
+class ProjectXAccountStream:
+    """
+    Open orders and positions of one ProjectX account, kept current by user-hub
+    pushes. Listeners are called as fn(account_id, kind, data) with kind in
+    'position' | 'order' | 'account' | 'trade', on the SignalR thread - keep
+    them short and hand real work to a loop or pool.
+    """
+
+    def __init__(self, account_id: int, websocket):
+        self.account_id = account_id
+        self.websocket = websocket
+        self._lock = threading.Lock()
+        self._orders: Dict[Any, dict] = {}          # order id -> open order
+        self._positions: Dict[str, dict] = {}       # contract id -> open position
+        self._listeners: List[Callable] = []
+        self.started_at = time.time()
+        self.last_push: Optional[float] = None
+        self.pushes = 0
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.websocket and self.websocket.is_connected)
+
+    def seed(self, orders: List[dict], positions: List[dict]):
+        with self._lock:
+            self._orders = {o.get('id'): o for o in orders if o.get('id') is not None}
+            self._positions = {str(p.get('contractId')): p for p in positions if p.get('contractId')}
+
+    def add_listener(self, fn: Callable):
+        with self._lock:
+            if fn not in self._listeners:
+                self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable):
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    def open_orders(self, contract_id=None) -> List[dict]:
+        with self._lock:
+            orders = list(self._orders.values())
+        if contract_id is None:
+            return orders
+        return [o for o in orders if str(o.get('contractId', '')) == str(contract_id)]
+
+    def position(self, contract_id) -> Optional[dict]:
+        with self._lock:
+            return self._positions.get(str(contract_id))
+
+    def positions(self) -> List[dict]:
+        with self._lock:
+            return list(self._positions.values())
+
+    def on_push(self, kind: str, data):
+        """ProjectXWebSocket callback: apply the push to the snapshot, then notify listeners."""
+        if not isinstance(data, dict):
+            return
+        account_id = data.get('accountId', data.get('id') if kind == 'account' else None)
+        if account_id is not None and str(account_id) != str(self.account_id):
+            return
+        with self._lock:
+            if kind == 'order' and data.get('id') is not None:
+                if data.get('status') in _OPEN_ORDER_STATUSES:
+                    self._orders[data['id']] = data
+                else:
+                    self._orders.pop(data['id'], None)
+            elif kind == 'position' and data.get('contractId'):
+                if data.get('size', 0):
+                    self._positions[str(data['contractId'])] = data
+                else:
+                    self._positions.pop(str(data['contractId']), None)
+            self.last_push = time.time()
+            self.pushes += 1
+            listeners = list(self._listeners)
+        for fn in listeners:
+            try:
+                fn(self.account_id, kind, data)
+            except Exception as e:
+                logger.error(f"ProjectX stream listener error ({kind}, account {self.account_id}): {e}")
+
+
+class TradovateSocketLease:
+    """
+    A pooled TradovateOrderSocket as seen from another event loop: request()
+    runs on the session loop, so concurrent requests still go out back to back
+    on the one socket. Same interface TradovateIntegration.attach_order_socket expects.
+    """
+
+    def __init__(self, sessions: 'BrokerSessions', socket):
+        self._sessions = sessions
+        self._socket = socket
+
+    @property
+    def closed(self) -> bool:
+        return self._socket.closed
+
+    async def request(self, endpoint: str, body: Any = None, timeout: Optional[float] = None):
+        kwargs = {} if timeout is None else {'timeout': timeout}
+        return await self._sessions.call(self._socket.request(endpoint, body, **kwargs), timeout=None)
+
+
+class BrokerSessions:
+    """Cached broker sessions and account streams on one dedicated event loop."""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True, name='BrokerSessions')
+        self._thread.start()
+        self._sessions: Dict[tuple, _Session] = {}
+        self._contracts: Dict[tuple, Tuple[float, dict]] = {}
+        self._streams: Dict[int, ProjectXAccountStream] = {}
+        self._order_sockets: Dict[int, tuple] = {}        # Tradovate account id -> (token hash, socket)
+        self._order_socket_attempts: Dict[int, float] = {}
+        self._stream_listeners: List[Callable] = []
+        self._lock = threading.Lock()
+        self.stats = {'logins': 0, 'reused': 0, 'login_failures': 0,
+                      'contract_hits': 0, 'contract_misses': 0, 'streams': 0,
+                      'order_sockets': 0, 'order_socket_reused': 0, 'order_socket_failures': 0}
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    # ── Running coroutines on the session loop ──────────────────────────────
+
+    def on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro, timeout: float = RUN_TIMEOUT):
+        """Run a coroutine on the session loop from sync code and return its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise asyncio.TimeoutError(f"Broker operation timed out after {timeout}s")
+
+    async def call(self, coro, timeout: Optional[float] = RUN_TIMEOUT):
+        """Await a coroutine on the session loop from any event loop."""
+        if self.on_loop():
+            return await coro
+        future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+        return await asyncio.wait_for(future, timeout=timeout)
+
+    def submit(self, coro):
+        """Schedule a long-running coroutine (monitor, stream) on the session loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ── Sessions ────────────────────────────────────────────────────────────
+
+    async def _lease(self, key: tuple, factory: Callable, login: Callable, valid: Callable) -> _Session:
+        session = self._sessions.get(key)
+        if session is not None and time.time() - session.last_used > SESSION_IDLE:
+            await self._close(key)
+            session = None
+        if session is None:
+            session = self._sessions[key] = _Session(factory())
+        async with session.lock:
+            if not session.opened:
+                await session.client.__aenter__()
+                session.opened = True
+            if session.login_result and session.login_result.get('success') and await valid(session.client):
+                self.stats['reused'] += 1
+            else:
+                session.login_result = await login(session.client)
+                if session.login_result.get('success'):
+                    self.stats['logins'] += 1
+                else:
+                    self.stats['login_failures'] += 1
+        session.last_used = time.time()
+        if not session.login_result.get('success'):
+            await self._close(key)
+        return session
+
+    async def _close(self, key: tuple):
+        session = self._sessions.pop(key, None)
+        if session is not None and session.opened:
+            try:
+                await session.client.__aexit__(None, None, None)
+            except Exception as e:
+                logger.debug(f"Closing broker session {key[:3]} failed: {e}")
+
+    @contextlib.asynccontextmanager
+    async def projectx(self, username: str, password: str = None, api_key: str = None,
+                       demo: bool = True, prop_firm: str = 'default'):
+        """
+        Lease a logged-in ProjectXIntegration: `async with ... as (projectx, login_result)`.
+        login_result is the dict ProjectXIntegration.login() returned; projectx is
+        None when it failed.
+        """
+        from phantom_scraper.projectx_integration import ProjectXIntegration
+
+        prop_firm = (prop_firm or 'default').lower()
+        key = ('projectx', prop_firm, bool(demo), username, _secret_hash(password, api_key))
+        session = await self._lease(
+            key,
+            lambda: ProjectXIntegration(demo=demo, prop_firm=prop_firm),
+            lambda px: px.login(username, password=password, api_key=api_key),
+            lambda px: px._ensure_valid_token(),
+        )
+        yield (session.client if session.login_result.get('success') else None), session.login_result
+
+    @contextlib.asynccontextmanager
+    async def projectx_token(self, session_token: str, demo: bool = True, prop_firm: str = 'default'):
+        """Lease a ProjectXIntegration for a stored session token (no credentials to log in with)."""
+        from phantom_scraper.projectx_integration import ProjectXIntegration
+
+        async def adopt(px):
+            px.session_token = session_token
+            return {'success': bool(session_token), 'method': 'token'}
+
+        prop_firm = (prop_firm or 'default').lower()
+        key = ('projectx_token', prop_firm, bool(demo), _secret_hash(session_token))
+        session = await self._lease(
+            key,
+            lambda: ProjectXIntegration(demo=demo, prop_firm=prop_firm),
+            adopt,
+            lambda px: px._ensure_valid_token(),
+        )
+        yield session.client if session.login_result.get('success') else None
+
+    @contextlib.asynccontextmanager
+    async def webull(self, app_key: str, app_secret: str):
+        """Lease a logged-in WebullIntegration: `async with ... as (webull, login_result)`."""
+        from phantom_scraper.webull_integration import WebullIntegration
+
+        async def token_valid(webull):
+            return bool(webull.access_token and webull.token_expires and
+                        (webull.token_expires.timestamp() - time.time()) > WEBULL_TOKEN_MARGIN)
+
+        key = ('webull', app_key, _secret_hash(app_secret))
+        session = await self._lease(
+            key,
+            lambda: WebullIntegration(app_key, app_secret),
+            lambda webull: webull.login(),
+            token_valid,
+        )
+        yield (session.client if session.login_result.get('success') else None), session.login_result
+
+    # ── Contracts ───────────────────────────────────────────────────────────
+
+    async def projectx_contract(self, projectx, symbol: str, symbol_root: str) -> Tuple[Optional[dict], List[dict]]:
+        """
+        (contract, contracts_searched) for a symbol. A cached resolution returns
+        an empty search list; an unresolved symbol is not cached.
+        """
+        key = (projectx.prop_firm, projectx.is_demo, (symbol or '').strip().upper(), symbol_root)
+        with self._lock:
+            cached = self._contracts.get(key)
+        if cached is not None and time.time() - cached[0] < CONTRACT_TTL:
+            self.stats['contract_hits'] += 1
+            return cached[1], []
+
+        self.stats['contract_misses'] += 1
+        # Contract/search works on TopStepX and all ProjectX firms; Contract/available is the older endpoint
+        contracts = await projectx.search_contracts(symbol_root)
+        if not contracts:
+            contracts = await projectx.get_available_contracts()
+        contract = match_projectx_contract(contracts, symbol, symbol_root)
+        if contract is not None:
+            with self._lock:
+                self._contracts[key] = (time.time(), contract)
+        return contract, contracts
+
+    # ── Streams ─────────────────────────────────────────────────────────────
+
+    def add_stream_listener(self, fn: Callable):
+        """fn(account_id, kind, data) for pushes on every ProjectX account stream, current and future."""
+        with self._lock:
+            self._stream_listeners.append(fn)
+            streams = list(self._streams.values())
+        for stream in streams:
+            stream.add_listener(fn)
+
+    def get_stream(self, account_id) -> Optional[ProjectXAccountStream]:
+        """Live stream for a ProjectX account, or None (callers fall back to REST)."""
+        try:
+            stream = self._streams.get(int(account_id))
+        except (TypeError, ValueError):
+            return None
+        return stream if stream is not None and stream.connected else None
+
+    async def watch_projectx(self, projectx, account_id: int) -> ProjectXAccountStream:
+        """
+        Start (once) the user-hub stream for an account on this client's session.
+        Returns the stream even when it could not connect (check .connected); a
+        failed stream is retried after STREAM_RETRY.
+        """
+        from phantom_scraper.projectx_integration import ProjectXWebSocket
+
+        account_id = int(account_id)
+        stream = self._streams.get(account_id)
+        if stream is not None and (stream.connected or time.time() - stream.started_at < STREAM_RETRY):
+            return stream
+        if stream is not None:
+            await stream.websocket.disconnect()
+
+        websocket = ProjectXWebSocket(projectx.session_token, demo=projectx.is_demo,
+                                      hub_url=projectx.ws_user_hub,
+                                      token_factory=lambda: projectx.session_token)
+        stream = ProjectXAccountStream(account_id, websocket)
+        for kind, register in (('position', websocket.on_position_update),
+                               ('order', websocket.on_order_update),
+                               ('account', websocket.on_account_update),
+                               ('trade', websocket.on_trade_update)):
+            register(lambda data, kind=kind: stream.on_push(kind, data))
+        # Pushes sent while the hub was reconnecting are lost - re-read the snapshot
+        websocket.on_reconnect(lambda: self.submit(self._seed_stream(projectx, stream)))
+        with self._lock:
+            for fn in self._stream_listeners:
+                stream.add_listener(fn)
+            self._streams[account_id] = stream
+
+        if await websocket.connect() and await websocket.subscribe_account(account_id):
+            await self._seed_stream(projectx, stream)
+            self.stats['streams'] += 1
+            logger.info(f"📡 ProjectX account {account_id} streaming (orders/positions via SignalR)")
+        else:
+            logger.info(f"ProjectX account {account_id} has no stream - REST fallback")
+        return stream
+
+    async def _seed_stream(self, projectx, stream: ProjectXAccountStream):
+        stream.seed(await projectx.get_orders(stream.account_id), await projectx.get_positions(stream.account_id))
+
+    # ── Tradovate order sockets ─────────────────────────────────────────────
+
+    def tradovate_order_socket(self, account_id, demo: bool, access_token: str) -> Optional[TradovateSocketLease]:
+        """
+        Lease on the account's authorized order socket, or None (use REST).
+        Never waits: a missing, closed or stale-token socket is reopened in the
+        background, at most once per STREAM_RETRY per account.
+        """
+        if not access_token:
+            return None
+        account_id = int(account_id)
+        token_key = _secret_hash(access_token)
+        entry = self._order_sockets.get(account_id)
+        if entry is not None and entry[0] == token_key and not entry[1].closed:
+            self.stats['order_socket_reused'] += 1
+            return TradovateSocketLease(self, entry[1])
+        with self._lock:
+            if time.time() - self._order_socket_attempts.get(account_id, 0) < STREAM_RETRY:
+                return None
+            self._order_socket_attempts[account_id] = time.time()
+        self.submit(self._open_order_socket(account_id, demo, access_token, token_key))
+        return None
+
+    async def _open_order_socket(self, account_id: int, demo: bool, access_token: str, token_key: str):
+        from phantom_scraper.tradovate_integration import TradovateOrderSocket, tradovate_ws_url
+
+        previous = self._order_sockets.pop(account_id, None)
+        if previous is not None:
+            await previous[1].close()
+        try:
+            socket = await TradovateOrderSocket.connect(tradovate_ws_url(demo), access_token)
+        except Exception as e:
+            socket = None
+            logger.info(f"Tradovate order socket for account {account_id} failed to connect: {e}")
+        if socket is None:
+            self.stats['order_socket_failures'] += 1
+            return None
+        socket.start_heartbeat()
+        self._order_sockets[account_id] = (token_key, socket)
+        self.stats['order_sockets'] += 1
+        with self._lock:
+            self._order_socket_attempts.pop(account_id, None)
+        logger.info(f"🔌 Tradovate order socket ready for account {account_id}")
+        return socket
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            streaming = sum(1 for s in self._streams.values() if s.connected)
+        order_sockets = sum(1 for _, s in list(self._order_sockets.values()) if not s.closed)
+        return {'sessions': len(self._sessions), 'contracts': len(self._contracts),
+                'streaming_accounts': streaming, 'open_order_sockets': order_sockets, **self.stats}
+
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def get_broker_sessions() -> BrokerSessions:
+    """Process-wide BrokerSessions (starts its event loop thread on first use)."""
+    global _sessions
+    if _sessions is None:
+        with _sessions_lock:
+            if _sessions is None:
+                _sessions = BrokerSessions()
+    return _sessions
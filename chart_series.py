@@ -0,0 +1,245 @@
+"""
+Chart Series - Server-side equity / drawdown series for the dashboard charts
+============================================================================
+BEFORE: /api/dashboard/pnl-drawdown-chart, /api/dashboard/chart-data and
+/api/paper-trades/equity-curve shipped one JSON object per trade (or per day)
+and the browser re-aggregated them. Multi-year accounts produced multi-megabyte
+responses for a chart that is at most a few hundred pixels wide.
+
+AFTER:
+- Equity and drawdown are computed once on the server in a single pass.
+- The series is downsampled to the requested pixel width with LTTB
+  (Largest-Triangle-Three-Buckets) or min/max bucketing, always keeping the
+  first / last point and the deepest drawdown.
+- Responses are columnar ({"t": [...], "equity": [...], "drawdown": [...]})
+  or a compact binary frame of little-endian float64 columns.
+- ETags are derived from the filters plus the latest trade id / trade count,
+  so unchanged charts cost one aggregate query and a 304; computed series are
+  kept in a small LRU keyed by the same tag.
+
+Binary frame layout (format=binary):
+    uint32 LE   header length H
+    H bytes     JSON header {"n": N, "columns": [...], "dtype": "<f8"}, space-padded to 8-byte alignment
+    N * 8 bytes per column, in header order (Float64Array-ready)
+
+Usage:
+    from chart_series import build_series, downsample, encode_binary
+
+    series = build_series(rows)                   # rows: (timestamp, pnl) ordered by time
+    series = downsample(series, width=800, method='lttb')
+"""
+
+import sys
+import json
+import struct
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+MIN_WIDTH = 16                  # Smallest downsampling target honoured
+MAX_WIDTH = 4000                # Anything wider is clamped (no screen needs more)
+CACHE_SIZE = 128                # Computed series kept per process, keyed by ETag
+COLUMNS = ('t', 'equity', 'drawdown', 'pnl')
+
+
+def epoch(value):
+    """exit_time / closed_at (datetime or ISO-ish string, naive = UTC) -> epoch seconds."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        text = str(value or '').strip().replace('Z', '+00:00')
+        if not text:
+            return 0.0
+        try:
+            dt = datetime.fromisoformat(text.replace(' ', 'T', 1))
+        except ValueError:
+            return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def build_series(rows):
+    """
+    (timestamp, pnl) rows ordered by time -> columnar series.
+
+    equity is the running sum of pnl, drawdown the distance below the running
+    peak (peak starts at 0, matching the existing dashboard endpoints).
+    """
+    t, equity, drawdown, pnl = array('d'), array('d'), array('d'), array('d')
+    running = 0.0
+    peak = 0.0
+    for ts, value in rows:
+        value = float(value or 0.0)
+        running += value
+        if running > peak:
+            peak = running
+        t.append(epoch(ts))
+        equity.append(running)
+        drawdown.append(peak - running)
+        pnl.append(value)
+    return {'t': t, 'equity': equity, 'drawdown': drawdown, 'pnl': pnl}
+
+
+def _lttb_indices(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` representative points."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        if span <= 0:
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        indices.append(best)
+        a = best
+    indices.append(n - 1)
+    return indices
+
+
+def _minmax_indices(ys, width):
+    """Min and max of each of `width` buckets (in time order) - preserves every spike."""
+    n = len(ys)
+    if width * 2 >= n:
+        return list(range(n))
+    picked = {0, n - 1}
+    size = n / width
+    for b in range(width):
+        start = int(b * size)
+        end = min(int((b + 1) * size), n)
+        if start >= end:
+            continue
+        lo = hi = start
+        for j in range(start + 1, end):
+            if ys[j] < ys[lo]:
+                lo = j
+            elif ys[j] > ys[hi]:
+                hi = j
+        picked.add(lo)
+        picked.add(hi)
+    return sorted(picked)
+
+
+def downsample(series, width, method='lttb'):
+    """
+    Reduce a series to about `width` points (2x width for min/max).
+
+    Points are chosen on the equity curve; the point of maximum drawdown is
+    always kept so the reported max drawdown never shrinks with zoom level.
+    Per-point pnl is dropped when points are merged (it no longer means one trade).
+    """
+    n = len(series['t'])
+    width = max(MIN_WIDTH, min(int(width or MAX_WIDTH), MAX_WIDTH))
+    if n <= width:
+        return series
+    if method == 'minmax':
+        indices = _minmax_indices(series['equity'], width)
+    else:
+        # Use the point index as x when timestamps are missing/duplicated
+        xs = series['t'] if series['t'][-1] > series['t'][0] else range(n)
+        indices = _lttb_indices(xs, series['equity'], width)
+
+    drawdown = series['drawdown']
+    deepest = max(range(n), key=drawdown.__getitem__)
+    if drawdown[deepest] > 0 and deepest not in indices:
+        indices = sorted(set(indices) | {deepest})
+
+    return {name: array('d', (col[i] for i in indices))
+            for name, col in series.items() if name != 'pnl'}
+
+
+def summary(series):
+    """Headline numbers computed on the full (not downsampled) series."""
+    n = len(series['t'])
+    return {
+        'points': n,
+        'net_pnl': round(series['equity'][-1], 2) if n else 0.0,
+        'max_drawdown': round(max(series['drawdown']), 2) if n else 0.0,
+        'start': series['t'][0] if n else None,
+        'end': series['t'][-1] if n else None,
+    }
+
+
+def to_columns(series, decimals=2):
+    """Series -> JSON-friendly columnar dict (times stay whole seconds)."""
+    out = {}
+    for name, col in series.items():
+        if name == 't':
+            out[name] = [int(v) for v in col]
+        else:
+            out[name] = [round(v, decimals) for v in col]
+    return out
+
+
+def encode_binary(series):
+    """Series -> binary frame (see module docstring)."""
+    names = [name for name in COLUMNS if name in series]
+    n = len(series['t'])
+    header = json.dumps({'n': n, 'columns': names, 'dtype': '<f8'}).encode()
+    header += b' ' * (-(4 + len(header)) % 8)
+    parts = [struct.pack('<I', len(header)), header]
+    for name in names:
+        col = array('d', series[name])
+        if sys.byteorder == 'big':
+            col.byteswap()
+        parts.append(col.tobytes())
+    return b''.join(parts)
+
+
+def make_etag(*parts):
+    """ETag value (sent weak) over the request filters and the data version (latest id, count, ...)."""
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()[:20]
+
+
+class SeriesCache:
+    """Tiny thread-safe LRU of computed series keyed by ETag."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self._size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+
+
+_series_cache = SeriesCache()
+
+
+def get_series_cache():
+    return _series_cache
@@ -0,0 +1,482 @@
+"""
+Chat Hub - Push delivery for community chat
+===========================================
+BEFORE: every open chat tab polled /api/chat/messages every 3s (one
+"SELECT ... WHERE id > after" per tab) and POSTed /api/chat/heartbeat every 30s.
+
+AFTER:
+- Clients join the "/chat" Socket.IO namespace; new messages are pushed once
+  to the namespace and late joiners get the tail of an in-memory ring buffer.
+- Message ids come from a Redis counter (ID_KEY, seeded from MAX(id)), so every
+  web worker allocates from the same sequence. Messages are persisted by a
+  writer thread that inserts them in batches; a failed batch is retried row by
+  row and a row that keeps failing is dropped after MAX_ATTEMPTS (logged as a
+  dead letter), so one bad row never blocks the rest. A slow database never
+  blocks a sender.
+- New messages and presence changes are published on CHANNEL; every worker adds
+  them to its ring and hands them to its listener (set_listener) to emit to its
+  own sockets.
+- Presence is a Redis sorted set of user ids seen on a socket (refreshed by each
+  worker) or a legacy heartbeat within HEARTBEAT_TTL.
+
+Without Redis each message is inserted directly and takes the id the database
+assigns; ring, presence and pushes are then per process.
+
+The REST endpoints stay for clients without a socket and read from the ring
+whenever it covers the requested range.
+"""
+
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('chat_hub')
+
+RING_SIZE = 500                # Recent messages kept in memory
+FLUSH_INTERVAL = 0.5           # Seconds between batched inserts
+RETRY_DELAY = 2                # Seconds to back off after a failed insert
+MAX_ATTEMPTS = 5               # Row-level insert failures before a message is dropped
+HEARTBEAT_TTL = 60             # Socket / REST heartbeat counts as online for this long
+PRESENCE_REFRESH = 20          # Seconds between presence refreshes of this worker's sockets
+RESUBSCRIBE_DELAY = 5          # Seconds between Redis subscribe attempts
+
+CHANNEL = 'jt:chat'
+ID_KEY = 'jt:chat_next_id'
+PRESENCE_KEY = 'jt:chat_online'
+
+_ORIGIN = uuid.uuid4().hex     # Identifies this process on CHANNEL and in PRESENCE_KEY
+
+# Raise the id counter to MAX(id) without ever moving it backwards
+_SEED_ID = ("local current = tonumber(redis.call('GET', KEYS[1]) or '0') "
+            "if current < tonumber(ARGV[1]) then redis.call('SET', KEYS[1], ARGV[1]) end "
+            "return 1")
+
+_COLUMNS = ('id', 'user_id', 'username', 'display_name', 'is_admin', 'message', 'created_at')
+
+
+def _iso(value):
+    """Normalize a stored created_at (datetime or 'YYYY-MM-DD HH:MM:SS' UTC) to ISO-8601 UTC."""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    text = str(value or '')
+    if text and not text.endswith('Z') and '+' not in text[10:]:
+        return text.replace(' ', 'T')[:19] + 'Z'
+    return text
+
+
+def message_from_row(row):
+    """chat_messages row (dict-like or tuple in _COLUMNS order) -> wire message."""
+    msg = dict(row) if hasattr(row, 'keys') else dict(zip(_COLUMNS, row))
+    msg['is_admin'] = bool(msg.get('is_admin'))
+    msg['created_at'] = _iso(msg.get('created_at'))
+    return msg
+
+
+def _row_values(msg):
+    return (msg['user_id'], msg['username'], msg['display_name'], msg['is_admin'],
+            msg['message'], msg['created_at'].replace('T', ' ').rstrip('Z'))
+
+
+class ChatHub:
+    """Ring buffer + batched writer + shared presence for the chat room."""
+
+    def __init__(self, get_connection, is_postgres):
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres
+        self._lock = threading.Condition()
+        self._ring = deque(maxlen=RING_SIZE)
+        self._pending = []
+        self._attempts = {}        # message id -> failed row inserts
+        self._loaded = False
+        self._reseed = True        # Seed ID_KEY from MAX(id) before the next allocation
+        self._writer = None
+        self._subscriber = None
+        self._listener = None
+        self._sockets = {}         # sid -> user_id
+        self._heartbeats = {}      # user_id -> last REST heartbeat (no Redis)
+        self.stats = {'posted': 0, 'flushed': 0, 'flushes': 0, 'failures': 0, 'dropped': 0,
+                      'direct_inserts': 0, 'remote': 0, 'last_error': None}
+        atexit.register(self.flush)
+
+    def set_listener(self, fn):
+        """fn(event, message) for events from other workers: ('message', msg) or ('presence', None)."""
+        self._listener = fn
+        self._ensure_subscriber()
+
+    # ------------------------------------------------------------------
+    # Ring buffer
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        """Seed the ring from the database (once, and again after a resubscribe)."""
+        if self._loaded:
+            return
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, user_id, username, display_name, is_admin, message, created_at
+                FROM chat_messages ORDER BY id DESC LIMIT {RING_SIZE}
+            ''')
+            rows = [message_from_row(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        rows.reverse()
+        self._ring.clear()
+        self._ring.extend(rows)
+        for msg in self._pending:
+            self._add_to_ring(msg)
+        self._loaded = True
+
+    def _add_to_ring(self, msg):
+        """Append, keeping id order (messages from other workers can arrive late)."""
+        if not self._ring or msg['id'] > self._ring[-1]['id']:
+            self._ring.append(msg)
+            return
+        messages = [m for m in self._ring if m['id'] != msg['id']]
+        messages.append(msg)
+        messages.sort(key=lambda m: m['id'])
+        self._ring.clear()
+        self._ring.extend(messages[-RING_SIZE:])
+
+    def recent(self, limit=100, after_id=0):
+        """
+        Messages from the ring (oldest first). Returns None when the ring does
+        not cover the request and the caller must read the database.
+        """
+        with self._lock:
+            self._load()
+            ring = list(self._ring)
+        if after_id:
+            if ring and after_id < ring[0]['id'] - 1:
+                return None
+            return [m for m in ring if m['id'] > after_id][:limit]
+        if limit > len(ring) and len(ring) == RING_SIZE:
+            return None
+        return ring[-limit:]
+
+    # ------------------------------------------------------------------
+    # Posting + batched persistence
+    # ------------------------------------------------------------------
+
+    def _allocate_id(self):
+        """Next id from the shared Redis counter, or None when Redis is unavailable."""
+        r = _get_redis()
+        if not r:
+            return None
+        try:
+            if self._reseed:
+                conn = self._get_connection()
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT MAX(id) AS max_id FROM chat_messages')
+                    row = cursor.fetchone()
+                    max_id = (row['max_id'] if hasattr(row, 'keys') else row[0]) if row else None
+                finally:
+                    conn.close()
+                r.eval(_SEED_ID, 1, ID_KEY, max_id or 0)
+                self._reseed = False
+            return int(r.incr(ID_KEY))
+        except Exception as e:
+            logger.warning(f"Chat id allocation via Redis failed, inserting directly: {e}")
+            return None
+
+    def _insert_direct(self, msg):
+        """Insert one message and return the id the database assigned."""
+        is_postgres = self._is_postgres()
+        ph = '%s' if is_postgres else '?'
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            sql = f'''
+                INSERT INTO chat_messages ({', '.join(_COLUMNS[1:])})
+                VALUES ({', '.join([ph] * (len(_COLUMNS) - 1))})
+            '''
+            if is_postgres:
+                cursor.execute(sql + ' RETURNING id', _row_values(msg))
+                row = cursor.fetchone()
+                msg_id = row['id'] if hasattr(row, 'keys') else row[0]
+            else:
+                cursor.execute(sql, _row_values(msg))
+                msg_id = cursor.lastrowid
+            conn.commit()
+        finally:
+            conn.close()
+        return int(msg_id)
+
+    def post(self, user_id, username, display_name, is_admin, message):
+        """Add a message to the ring, persist it (queued, or directly without Redis) and publish it."""
+        with self._lock:
+            self._load()
+        msg = {
+            'id': None,
+            'user_id': user_id,
+            'username': username,
+            'display_name': display_name,
+            'is_admin': bool(is_admin),
+            'message': message,
+            'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        }
+        msg['id'] = self._allocate_id()
+        queued = msg['id'] is not None
+        if not queued:
+            # Ids the database hands out may be ahead of ID_KEY once Redis is back
+            msg['id'] = self._insert_direct(msg)
+            self._reseed = True
+        with self._lock:
+            self._add_to_ring(msg)
+            self.stats['posted'] += 1
+            if queued:
+                self._pending.append(msg)
+                self._lock.notify()
+            else:
+                self.stats['direct_inserts'] += 1
+        if queued:
+            self._ensure_writer()
+        self._publish({'event': 'message', 'message': msg})
+        return msg
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._writer_loop, daemon=True, name='chat-writer')
+                    self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._lock.wait()
+            time.sleep(FLUSH_INTERVAL)  # Let a burst accumulate into one batch
+            if not self.flush():
+                time.sleep(RETRY_DELAY)
+
+    @staticmethod
+    def _insert(cursor, batch, ph):
+        row_ph = '(' + ', '.join([ph] * len(_COLUMNS)) + ')'
+        params = []
+        for m in batch:
+            params.append(m['id'])
+            params.extend(_row_values(m))
+        cursor.execute(f'''
+            INSERT INTO chat_messages ({', '.join(_COLUMNS)})
+            VALUES {', '.join([row_ph] * len(batch))}
+        ''', tuple(params))
+
+    def flush(self):
+        """
+        Insert every pending message in one statement; when that fails, insert
+        them one at a time. Returns False when anything is left to retry.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return True
+        is_postgres = self._is_postgres()
+        ph = '%s' if is_postgres else '?'
+        try:
+            conn = self._get_connection()
+        except Exception as e:
+            # Database unreachable: not the rows' fault, keep them without counting an attempt
+            with self._lock:
+                self._pending[:0] = batch
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(e)
+            logger.warning(f"Chat batch insert failed ({len(batch)} message(s)), will retry: {e}")
+            return False
+
+        failed = []
+        try:
+            cursor = conn.cursor()
+            try:
+                self._insert(cursor, batch, ph)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Chat batch insert failed ({len(batch)} message(s)), retrying row by row: {e}")
+                for msg in batch:
+                    try:
+                        self._insert(cursor, [msg], ph)
+                        conn.commit()
+                    except Exception as row_error:
+                        conn.rollback()
+                        failed.append((msg, row_error))
+            if is_postgres and len(failed) < len(batch):
+                # Ids are assigned by ID_KEY; keep the SERIAL sequence (direct inserts) ahead of them
+                cursor.execute("SELECT setval(pg_get_serial_sequence('chat_messages', 'id'), "
+                               "(SELECT MAX(id) FROM chat_messages))")
+                conn.commit()
+        finally:
+            conn.close()
+
+        retry = []
+        with self._lock:
+            failed_ids = {msg['id'] for msg, _ in failed}
+            for msg in batch:
+                if msg['id'] not in failed_ids:
+                    self._attempts.pop(msg['id'], None)
+            for msg, error in failed:
+                attempts = self._attempts.pop(msg['id'], 0) + 1
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(error)
+                if attempts >= MAX_ATTEMPTS:
+                    self.stats['dropped'] += 1
+                    if msg in self._ring:
+                        self._ring.remove(msg)
+                    logger.error(f"Chat message dropped after {attempts} failed inserts: "
+                                 f"{json.dumps(msg, default=str)} ({error})")
+                else:
+                    self._attempts[msg['id']] = attempts
+                    retry.append(msg)
+            self._pending[:0] = retry
+            self.stats['flushed'] += len(batch) - len(failed)
+            self.stats['flushes'] += 1
+        return not retry
+
+    # ------------------------------------------------------------------
+    # Cross-worker fan-out
+    # ------------------------------------------------------------------
+
+    def _publish(self, payload):
+        r = _get_redis()
+        if not r:
+            return
+        self._ensure_subscriber()
+        try:
+            r.publish(CHANNEL, json.dumps(dict(payload, origin=_ORIGIN), default=str))
+        except Exception as e:
+            logger.debug(f"Chat publish failed: {e}")
+
+    def _ensure_subscriber(self):
+        if self._subscriber is None and _get_redis():
+            with self._lock:
+                if self._subscriber is None:
+                    self._subscriber = threading.Thread(target=self._subscribe_loop, daemon=True,
+                                                        name='chat-sub')
+                    self._subscriber.start()
+
+    def _apply_remote(self, payload):
+        event = payload.get('event')
+        if event == 'message' and payload.get('message'):
+            msg = payload['message']
+            with self._lock:
+                self._add_to_ring(msg)
+                self.stats['remote'] += 1
+        elif event != 'presence':
+            return
+        listener = self._listener
+        if listener:
+            try:
+                listener(event, payload.get('message'))
+            except Exception as e:
+                logger.error(f"Chat listener error ({event}): {e}")
+
+    def _subscribe_loop(self):
+        while True:
+            r = _get_redis()
+            if not r:
+                time.sleep(RESUBSCRIBE_DELAY)
+                continue
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Anything published while we were not listening is lost: reload the ring
+                with self._lock:
+                    self._loaded = False
+                refreshed = 0
+                while True:
+                    if time.time() - refreshed >= PRESENCE_REFRESH:
+                        self._refresh_presence(r)
+                        refreshed = time.time()
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+                    try:
+                        payload = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get('origin') != _ORIGIN:
+                        self._apply_remote(payload)
+            except Exception as e:
+                logger.warning(f"Chat subscription lost, resubscribing: {e}")
+            time.sleep(RESUBSCRIBE_DELAY)
+
+    # ------------------------------------------------------------------
+    # Presence
+    # ------------------------------------------------------------------
+
+    def _refresh_presence(self, r):
+        """Re-stamp this worker's socket users and expire everyone not seen within HEARTBEAT_TTL."""
+        now = time.time()
+        with self._lock:
+            users = set(self._sockets.values())
+        if users:
+            r.zadd(PRESENCE_KEY, {f'{user_id}:{_ORIGIN}': now for user_id in users})
+        r.zremrangebyscore(PRESENCE_KEY, '-inf', now - HEARTBEAT_TTL)
+
+    def _presence_changed(self):
+        self._publish({'event': 'presence'})
+
+    def join(self, sid, user_id):
+        with self._lock:
+            self._sockets[sid] = user_id
+        r = _get_redis()
+        if r:
+            try:
+                r.zadd(PRESENCE_KEY, {f'{user_id}:{_ORIGIN}': time.time()})
+            except Exception as e:
+                logger.debug(f"Chat presence update failed: {e}")
+        self._presence_changed()
+        return self.online_count()
+
+    def leave(self, sid):
+        with self._lock:
+            user_id = self._sockets.pop(sid, None)
+            still_here = user_id in self._sockets.values()
+        r = _get_redis()
+        if r and user_id is not None and not still_here:
+            try:
+                r.zrem(PRESENCE_KEY, f'{user_id}:{_ORIGIN}')
+            except Exception as e:
+                logger.debug(f"Chat presence update failed: {e}")
+        self._presence_changed()
+        return self.online_count()
+
+    def heartbeat(self, user_id):
+        r = _get_redis()
+        if r:
+            try:
+                r.zadd(PRESENCE_KEY, {f'{user_id}:heartbeat': time.time()})
+                return
+            except Exception as e:
+                logger.debug(f"Chat heartbeat update failed: {e}")
+        with self._lock:
+            self._heartbeats[user_id] = time.time()
+
+    def online_count(self):
+        now = time.time()
+        r = _get_redis()
+        if r:
+            try:
+                members = r.zrangebyscore(PRESENCE_KEY, now - HEARTBEAT_TTL, '+inf')
+                return len({member.rsplit(':', 1)[0] for member in members})
+            except Exception as e:
+                logger.debug(f"Chat presence read failed: {e}")
+        with self._lock:
+            users = set(self._sockets.values())
+            users.update(uid for uid, ts in self._heartbeats.items() if now - ts < HEARTBEAT_TTL)
+        return len(users)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending), ring=len(self._ring),
+                        sockets=len(self._sockets),
+                        subscribed=bool(self._subscriber and self._subscriber.is_alive()))
@@ -0,0 +1,400 @@
+"""
+Config Registry
+===============
+Versioned in-memory copy of the configuration the signal path reads on every
+webhook: recorders, their enabled traders, and the linked accounts (tokens and
+credentials) those traders trade on.
+
+BEFORE: get_cached_recorder() kept an unbounded dict of `SELECT * FROM
+recorders` rows with a fixed 60s TTL, keyed only by webhook token.
+execute_trade_simple() re-queried `traders JOIN accounts`, the enabled traders,
+`recorders.avg_down_enabled`, the recorder owner and the account credentials
+on every signal. An edit through api_update_recorder only reached a worker
+when its TTL expired (or if that worker happened to serve the edit).
+
+AFTER:
+- One entry per recorder (row + enabled traders), indexed by recorder id,
+  webhook token and subaccount id; account rows are cached separately by id.
+- CRUD paths call invalidate_recorder() / invalidate_traders() /
+  invalidate_account() / invalidate_all(). The change is applied locally and published on the Redis
+  channel CHANNEL, so every worker drops exactly the affected entries.
+- Per-signal trader counters written by the signal path are patched in place
+  with patch_trader() (and dropped on the other workers).
+- Memory is bounded: entries live in LRUs of MAX_RECORDERS / MAX_ACCOUNTS.
+  A load that overlaps an invalidation is returned but not cached, and
+  entries older than MAX_AGE are reloaded as a safety net for writes that
+  bypass the registry (SQL consoles, other services).
+
+Without Redis the registry still works; invalidations then only reach the
+process that made the change, and MAX_AGE bounds staleness elsewhere.
+
+Usage:
+    from config_registry import get_config_registry
+    registry = get_config_registry(get_db_connection, is_using_postgres)
+    recorder = registry.recorder_by_token(webhook_token)
+    traders = registry.traders(recorder['id'])
+    accounts = registry.accounts([t['account_id'] for t in traders])
+    registry.invalidate_recorder(recorder_id)
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('config_registry')
+
+CHANNEL = 'jt:config_invalidate'
+MAX_RECORDERS = int(os.environ.get('CONFIG_REGISTRY_MAX_RECORDERS', '2000'))
+MAX_ACCOUNTS = int(os.environ.get('CONFIG_REGISTRY_MAX_ACCOUNTS', '5000'))
+MAX_AGE = 300                  # Seconds before an entry is reloaded even without an invalidation
+ACCOUNT_MAX_AGE = 60           # Account rows carry tokens; refreshed more often as a safety net
+RESUBSCRIBE_DELAY = 5          # Seconds between Redis subscribe attempts
+
+_ORIGIN = uuid.uuid4().hex     # Identifies this process on the invalidation channel
+
+
+def _rows(cursor):
+    """fetchall() as plain dicts, whatever the connection's row type."""
+    rows = cursor.fetchall()
+    if rows and not hasattr(rows[0], 'keys'):
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+    return [dict(row) for row in rows]
+
+
+def _subaccount_ids(trader):
+    """Subaccounts a trader row trades on (legacy column + enabled_accounts JSON)."""
+    ids = set()
+    if trader.get('subaccount_id'):
+        ids.add(str(trader['subaccount_id']))
+    raw = trader.get('enabled_accounts')
+    if raw and raw not in ('[]', 'null'):
+        try:
+            accounts = json.loads(raw) if isinstance(raw, str) else raw
+        except (TypeError, ValueError):
+            accounts = []
+        for acct in accounts if isinstance(accounts, list) else []:
+            if isinstance(acct, dict) and acct.get('subaccount_id'):
+                ids.add(str(acct['subaccount_id']))
+    return ids
+
+
+class ConfigRegistry:
+    """Recorders, enabled traders and linked accounts, invalidated on CRUD."""
+
+    def __init__(self, get_connection, is_postgres):
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres
+        self._lock = threading.RLock()
+        # recorder_id -> {'recorder': row, 'traders': [rows] | None, 'loaded_at': ts}
+        self._recorders = OrderedDict()
+        self._by_token = {}            # webhook_token -> recorder_id
+        self._by_subaccount = {}       # subaccount_id (str) -> {recorder_id}
+        self._accounts = OrderedDict()  # account_id -> (row, loaded_at)
+        self.version = 0               # Bumped by every invalidation (local or remote)
+        self._subscriber = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'remote_invalidations': 0,
+                      'evictions': 0, 'discarded_loads': 0}
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def recorder_by_token(self, webhook_token):
+        """The recorder row for a webhook token (enabled or not), or None."""
+        if not webhook_token:
+            return None
+        with self._lock:
+            recorder_id = self._by_token.get(webhook_token)
+            entry = self._fresh_entry(recorder_id)
+            if entry:
+                return dict(entry['recorder'])
+        return self._load_recorder('webhook_token', webhook_token)
+
+    def recorder(self, recorder_id):
+        """The recorder row by id, or None."""
+        if recorder_id is None:
+            return None
+        recorder_id = int(recorder_id)
+        with self._lock:
+            entry = self._fresh_entry(recorder_id)
+            if entry:
+                return dict(entry['recorder'])
+        return self._load_recorder('id', recorder_id)
+
+    def traders(self, recorder_id):
+        """Enabled trader rows linked to a recorder (SELECT * FROM traders), ordered by id."""
+        recorder_id = int(recorder_id)
+        with self._lock:
+            entry = self._fresh_entry(recorder_id)
+            if entry and entry['traders'] is not None:
+                return [dict(t) for t in entry['traders']]
+        if entry is None and self.recorder(recorder_id) is None:
+            return []
+        version = self.version
+        conn = self._get_connection()
+        try:
+            is_postgres = self._is_postgres()  # After connecting: the factory decides the backend
+            ph = '%s' if is_postgres else '?'
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT * FROM traders
+                WHERE recorder_id = {ph} AND enabled = {'TRUE' if is_postgres else '1'}
+                ORDER BY id
+            ''', (recorder_id,))
+            traders = _rows(cursor)
+        finally:
+            conn.close()
+        with self._lock:
+            entry = self._recorders.get(recorder_id)
+            if entry and version == self.version:
+                entry['traders'] = traders
+                self._index_traders(recorder_id, traders)
+            else:
+                self.stats['discarded_loads'] += 1
+        return [dict(t) for t in traders]
+
+    def accounts(self, account_ids):
+        """{account_id: accounts row} for the given ids; misses are loaded in one query."""
+        ids = list(dict.fromkeys(int(a) for a in account_ids if a))
+        now = time.time()
+        result, missing = {}, []
+        with self._lock:
+            for account_id in ids:
+                cached = self._accounts.get(account_id)
+                if cached and now - cached[1] < ACCOUNT_MAX_AGE:
+                    self._accounts.move_to_end(account_id)
+                    result[account_id] = dict(cached[0])
+                    self.stats['hits'] += 1
+                else:
+                    missing.append(account_id)
+        if not missing:
+            return result
+        self.stats['misses'] += len(missing)
+        version = self.version
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM accounts WHERE id IN ({','.join(str(a) for a in missing)})")
+            rows = _rows(cursor)
+        finally:
+            conn.close()
+        with self._lock:
+            for row in rows:
+                result[row['id']] = dict(row)
+                if version == self.version:
+                    self._accounts[row['id']] = (row, now)
+                    self._accounts.move_to_end(row['id'])
+            while len(self._accounts) > MAX_ACCOUNTS:
+                self._accounts.popitem(last=False)
+                self.stats['evictions'] += 1
+        return result
+
+    def recorders_for_subaccount(self, subaccount_id):
+        """Ids of cached recorders whose enabled traders trade this subaccount."""
+        with self._lock:
+            return set(self._by_subaccount.get(str(subaccount_id), ()))
+
+    def _fresh_entry(self, recorder_id):
+        entry = self._recorders.get(recorder_id) if recorder_id is not None else None
+        if entry and time.time() - entry['loaded_at'] < MAX_AGE:
+            self._recorders.move_to_end(recorder_id)
+            self.stats['hits'] += 1
+            return entry
+        if entry:
+            self._drop_recorder(recorder_id)
+        return None
+
+    def _load_recorder(self, column, value):
+        self.stats['misses'] += 1
+        version = self.version
+        conn = self._get_connection()
+        try:
+            ph = '%s' if self._is_postgres() else '?'
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT * FROM recorders WHERE {column} = {ph}', (value,))
+            rows = _rows(cursor)
+        finally:
+            conn.close()
+        if not rows:
+            return None
+        recorder = rows[0]
+        with self._lock:
+            if version != self.version:
+                self.stats['discarded_loads'] += 1
+                return dict(recorder)
+            recorder_id = recorder['id']
+            self._drop_recorder(recorder_id)
+            self._recorders[recorder_id] = {'recorder': recorder, 'traders': None, 'loaded_at': time.time()}
+            if recorder.get('webhook_token'):
+                self._by_token[recorder['webhook_token']] = recorder_id
+            while len(self._recorders) > MAX_RECORDERS:
+                self._drop_recorder(next(iter(self._recorders)))
+                self.stats['evictions'] += 1
+        return dict(recorder)
+
+    def _index_traders(self, recorder_id, traders):
+        for trader in traders:
+            for sub_id in _subaccount_ids(trader):
+                self._by_subaccount.setdefault(sub_id, set()).add(recorder_id)
+
+    def _unindex_traders(self, recorder_id, traders):
+        for trader in traders or ():
+            for sub_id in _subaccount_ids(trader):
+                recorders = self._by_subaccount.get(sub_id)
+                if recorders:
+                    recorders.discard(recorder_id)
+                    if not recorders:
+                        del self._by_subaccount[sub_id]
+
+    def _drop_recorder(self, recorder_id):
+        entry = self._recorders.pop(recorder_id, None)
+        if not entry:
+            return
+        token = entry['recorder'].get('webhook_token')
+        if token and self._by_token.get(token) == recorder_id:
+            del self._by_token[token]
+        self._unindex_traders(recorder_id, entry['traders'])
+
+    # ------------------------------------------------------------------
+    # Writes / invalidation
+    # ------------------------------------------------------------------
+
+    def patch_trader(self, recorder_id, trader_id, **fields):
+        """Write-through for per-signal trader counters the caller just persisted."""
+        with self._lock:
+            entry = self._recorders.get(recorder_id)
+            for trader in (entry or {}).get('traders') or ():
+                if trader.get('id') == trader_id:
+                    trader.update(fields)
+        self._publish({'kind': 'traders', 'id': recorder_id})
+
+    def invalidate_recorder(self, recorder_id=None, webhook_token=None):
+        """A recorder, or the traders linked to it, changed (update/delete/toggle)."""
+        self._apply({'kind': 'recorder', 'id': recorder_id, 'token': webhook_token})
+        self._publish({'kind': 'recorder', 'id': recorder_id, 'token': webhook_token})
+
+    def invalidate_traders(self, recorder_id=None):
+        """Traders of a recorder were added/edited/toggled/deleted (all recorders when unknown)."""
+        self._apply({'kind': 'traders', 'id': recorder_id})
+        self._publish({'kind': 'traders', 'id': recorder_id})
+
+    def invalidate_account(self, account_id):
+        """A linked account (token, credentials, broker, subaccounts) changed or was deleted."""
+        self._apply({'kind': 'account', 'id': account_id})
+        self._publish({'kind': 'account', 'id': account_id})
+
+    def invalidate_all(self):
+        """Bulk change (user delete, global toggles): drop everything."""
+        self._apply({'kind': 'all'})
+        self._publish({'kind': 'all'})
+
+    def _apply(self, msg, remote=False):
+        kind = msg.get('kind')
+        with self._lock:
+            self.version += 1
+            self.stats['remote_invalidations' if remote else 'invalidations'] += 1
+            if kind == 'all':
+                self._recorders.clear()
+                self._by_token.clear()
+                self._by_subaccount.clear()
+                self._accounts.clear()
+            elif kind == 'account':
+                try:
+                    self._accounts.pop(int(msg.get('id')), None)
+                except (TypeError, ValueError):
+                    self._accounts.clear()
+            elif kind == 'traders':
+                if msg.get('id') is None:
+                    recorder_ids = list(self._recorders)
+                else:
+                    recorder_ids = [int(msg['id'])]
+                for recorder_id in recorder_ids:
+                    entry = self._recorders.get(recorder_id)
+                    if entry:
+                        self._unindex_traders(recorder_id, entry['traders'])
+                        entry['traders'] = None
+            elif kind == 'recorder':
+                recorder_id = int(msg['id']) if msg.get('id') is not None else None
+                if recorder_id is None and msg.get('token'):
+                    recorder_id = self._by_token.get(msg['token'])
+                self._drop_recorder(recorder_id)
+                if msg.get('token'):
+                    self._by_token.pop(msg['token'], None)
+
+    def _publish(self, msg):
+        r = _get_redis()
+        if not r:
+            return
+        self._ensure_subscriber()
+        try:
+            r.publish(CHANNEL, json.dumps(dict(msg, origin=_ORIGIN)))
+        except Exception as e:
+            logger.debug(f"Config invalidation publish failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Cross-worker invalidation
+    # ------------------------------------------------------------------
+
+    def _ensure_subscriber(self):
+        if self._subscriber is None and _get_redis():
+            with self._lock:
+                if self._subscriber is None:
+                    self._subscriber = threading.Thread(target=self._subscribe_loop, daemon=True,
+                                                        name='config-registry-sub')
+                    self._subscriber.start()
+
+    def _subscribe_loop(self):
+        while True:
+            r = _get_redis()
+            if not r:
+                time.sleep(RESUBSCRIBE_DELAY)
+                continue
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Anything published while we were not listening is lost: start clean
+                self._apply({'kind': 'all'}, remote=True)
+                for message in pubsub.listen():
+                    try:
+                        msg = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if msg.get('origin') != _ORIGIN:
+                        self._apply(msg, remote=True)
+            except Exception as e:
+                logger.warning(f"Config invalidation subscription lost, resubscribing: {e}")
+            time.sleep(RESUBSCRIBE_DELAY)
+
+    def get_stats(self):
+        with self._lock:
+            traders = sum(len(e['traders']) for e in self._recorders.values() if e['traders'])
+            return dict(self.stats, version=self.version, recorders=len(self._recorders),
+                        traders=traders, accounts=len(self._accounts),
+                        subscribed=bool(self._subscriber and self._subscriber.is_alive()))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry(get_connection=None, is_postgres=None):
+    """
+    The process-wide registry. The first caller supplies the connection factory
+    and the is_postgres callable; later callers may omit them.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if get_connection is None:
+                    raise RuntimeError('config registry used before it was configured')
+                _registry = ConfigRegistry(get_connection, is_postgres)
+                _registry._ensure_subscriber()
+    return _registry
@@ -0,0 +1,230 @@
+"""
+Digest Engine - Concurrent watchlist digest sections over a shared TTL cache
+=============================================================================
+BEFORE: generate_digest() called movers, news (one ticker at a time, three
+upstreams each), rating changes, politician trades (two multi-MB S3 files) and
+the market-context helpers strictly one after another. A digest took the sum of
+every upstream latency, one hung source stalled the whole run, and the
+/api/watchlist/news, /api/market-context and /api/watchlist/movers endpoints
+repeated the same HTTP calls on every page load.
+
+AFTER:
+- SourceCache: process-wide TTL cache of upstream responses. Concurrent misses
+  for the same key share one fetch (single-flight); a failed refresh keeps
+  serving the last good value for up to STALE_GRACE.
+- DigestEngine.run(): independent sections run concurrently on a section pool,
+  each with its own timeout and fallback; per-section timings are returned so
+  they can be stored on digest_runs.
+- DigestEngine.map(): per-item fan-out (e.g. news per ticker) on a separate
+  fetch pool, so a section never waits on its own pool.
+
+Usage:
+    from digest_engine import get_digest_engine, get_source_cache, Section
+
+    cache = get_source_cache()
+    ndx = cache.get_or_fetch('ndx_expected_move', fetch_ndx_expected_move, ttl=300)
+
+    results, timings = get_digest_engine().run([
+        Section('movers', get_movers, timeout=15, default=[]),
+        Section('news', get_news, timeout=30, default=[]),
+    ])
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger('digest_engine')
+
+STALE_GRACE = 3600              # Serve the last good value this long after a failed refresh
+SECTION_WORKERS = 8
+FETCH_WORKERS = 16
+
+
+class Section(NamedTuple):
+    """One independent digest section: fn() -> value, `default` on timeout / error."""
+    name: str
+    fn: Callable[[], Any]
+    timeout: float = 30.0
+    default: Any = None
+
+
+class _SectionError(Exception):
+    """A section raised; carries how long it ran before failing."""
+
+    def __init__(self, error: Exception, ms: int):
+        super().__init__(str(error))
+        self.error = error
+        self.ms = ms
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SourceCache:
+    """Thread-safe TTL cache of upstream responses with single-flight refresh."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, Tuple[float, float, Any]] = {}   # key -> (stored_at, ttl, value)
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'shared': 0, 'stale': 0, 'errors': 0}
+
+    def get(self, key: str, max_age: float = None) -> Optional[Any]:
+        """Fresh cached value (or None). max_age overrides the TTL it was stored with."""
+        with self._lock:
+            item = self._items.get(key)
+        if item is None:
+            return None
+        stored_at, ttl, value = item
+        if time.time() - stored_at > (ttl if max_age is None else max_age):
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._items[key] = (time.time(), ttl, value)
+
+    def invalidate(self, prefix: str = ''):
+        with self._lock:
+            for key in [k for k in self._items if k.startswith(prefix)]:
+                del self._items[key]
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], ttl: float) -> Any:
+        """
+        Cached value if younger than ttl, else fetch() once for all concurrent
+        callers. If fetch() raises, the previous value (if not older than
+        STALE_GRACE) is returned instead and the error is logged.
+        """
+        value = self.get(key, max_age=ttl)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.stats['shared'] += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        self.stats['misses'] += 1
+        try:
+            flight.value = fetch()
+            self.set(key, flight.value, ttl)
+        except Exception as e:
+            self.stats['errors'] += 1
+            with self._lock:
+                item = self._items.get(key)
+            if item is not None and time.time() - item[0] <= STALE_GRACE:
+                self.stats['stale'] += 1
+                logger.warning(f"Digest source '{key}' refresh failed ({e}); serving stale value")
+                flight.value = item[2]
+            else:
+                flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            keys = len(self._items)
+        return {'keys': keys, **self.stats}
+
+
+class DigestEngine:
+    """Runs digest sections concurrently with per-section timeouts."""
+
+    def __init__(self, section_workers: int = SECTION_WORKERS, fetch_workers: int = FETCH_WORKERS):
+        self._sections = ThreadPoolExecutor(max_workers=section_workers, thread_name_prefix='digest-section')
+        self._fetches = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='digest-fetch')
+
+    def run(self, sections: Iterable[Section]) -> Tuple[Dict[str, Any], Dict[str, dict]]:
+        """
+        Run every section concurrently.
+
+        Returns (results, timings): results[name] is the section value or its
+        default; timings[name] = {'ms': ..., 'status': 'ok'|'timeout'|'error', 'error': ...}.
+        A timed-out section keeps running in the background; its result is discarded.
+        """
+        sections = list(sections)
+        started = time.monotonic()
+        futures = {s.name: self._sections.submit(self._timed, s.fn) for s in sections}
+        results, timings = {}, {}
+        for section in sections:
+            # Each section's deadline counts from the start of the run, not from the previous wait
+            remaining = max(0.0, section.timeout - (time.monotonic() - started))
+            try:
+                value, ms = futures[section.name].result(timeout=remaining)
+                results[section.name] = value
+                timings[section.name] = {'ms': ms, 'status': 'ok'}
+            except FutureTimeout:
+                results[section.name] = section.default
+                timings[section.name] = {'ms': round(section.timeout * 1000), 'status': 'timeout'}
+                logger.warning(f"Digest section '{section.name}' timed out after {section.timeout}s")
+            except _SectionError as e:
+                results[section.name] = section.default
+                timings[section.name] = {'ms': e.ms, 'status': 'error', 'error': str(e.error)[:200]}
+                logger.warning(f"Digest section '{section.name}' failed: {e.error}")
+        timings['_total'] = {'ms': round((time.monotonic() - started) * 1000), 'status': 'ok'}
+        return results, timings
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any]) -> Tuple[Any, int]:
+        started = time.monotonic()
+        try:
+            value = fn()
+        except Exception as e:
+            raise _SectionError(e, round((time.monotonic() - started) * 1000))
+        return value, round((time.monotonic() - started) * 1000)
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], timeout: float = 20.0) -> List[Any]:
+        """fn(item) for every item on the fetch pool; items that fail or miss the deadline yield None."""
+        futures = [self._fetches.submit(fn, item) for item in items]
+        deadline = time.monotonic() + timeout
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                results.append(None)
+            except Exception as e:
+                logger.debug(f"Digest fetch failed: {e}")
+                results.append(None)
+        return results
+
+
+_cache = SourceCache()
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_source_cache() -> SourceCache:
+    return _cache
+
+
+def get_digest_engine() -> DigestEngine:
+    """Get the singleton DigestEngine instance."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = DigestEngine()
+    return _engine
@@ -1,7 +1,9 @@
 from discord.ext import commands
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import asyncio
 import discord
 import os
+import time
 import aiohttp
 import yfinance as yf
 from datetime import datetime, timedelta
@@ -10,11 +12,16 @@ import pytz
 
 from src.bots.base_bot import TradingBot
 
+# Seconds a !stock quote is served from the local cache (yfinance is slow and rate limited)
+QUOTE_TTL = int(os.getenv('QUOTE_CACHE_TTL', '60'))
+
 class MarketDataBot(TradingBot):
     def __init__(self, command_prefix: str = "!", **options):
         super().__init__(command_prefix, "market_data_bot", **options)
         self.session: Optional[aiohttp.ClientSession] = None
         self.last_news_update: Dict[str, datetime] = {}
+        self.quote_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}   # symbol -> (fetched_at, data)
+        self.quote_fetches: Dict[str, asyncio.Task] = {}                 # symbol -> in-flight fetch
         
     async def setup_hook(self) -> None:
         """Setup tasks before bot connects."""
@@ -29,7 +36,25 @@ class MarketDataBot(TradingBot):
         await super().close()
         
     async def get_stock_data(self, symbol: str) -> Optional[Dict[str, Any]]:
-        """Get stock data for a given symbol."""
+        """Get stock data for a given symbol (cached for QUOTE_TTL seconds)."""
+        symbol = symbol.upper()
+        cached = self.quote_cache.get(symbol)
+        if cached and time.time() - cached[0] < QUOTE_TTL:
+            return cached[1]
+
+        # Concurrent commands for the same symbol share one fetch
+        task = self.quote_fetches.get(symbol)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(self._fetch_stock_data, symbol))
+            self.quote_fetches[symbol] = task
+            task.add_done_callback(lambda _: self.quote_fetches.pop(symbol, None))
+        data = await asyncio.shield(task)
+        if data:
+            self.quote_cache[symbol] = (time.time(), data)
+        return data
+
+    def _fetch_stock_data(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Blocking yfinance lookup; runs in a worker thread."""
         try:
             ticker = yf.Ticker(symbol)
             info = ticker.info
@@ -1,10 +1,15 @@
 import discord
+from discord import app_commands
 import asyncio
 import os
+import time
 import logging
+from collections import OrderedDict
 from dotenv import load_dotenv
 import aiohttp
 
+from platform_stream import ChannelOutbox, PlatformStream, QuoteCache
+
 # Load environment variables
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
 if os.path.exists(dotenv_path):
@@ -29,17 +34,38 @@ ALPACA_API_KEY = os.getenv("ALPACA_API_KEY", "")
 ALPACA_SECRET_KEY = os.getenv("ALPACA_SECRET_KEY", "")
 ALPACA_ENDPOINT = os.getenv("ALPACA_ENDPOINT", "https://paper-api.alpaca.markets/v2")
 
+# Platform price/signal stream (see platform_stream.py); without it the bot polls Yahoo
+PLATFORM_STREAM_URL = os.getenv("PLATFORM_STREAM_URL", "")
+SIGNAL_STREAM_TOKEN = os.getenv("SIGNAL_STREAM_TOKEN", "")
+# Only post signals from these recorders (names or ids, comma separated); empty = all
+SIGNAL_RECORDERS = {r.strip() for r in os.getenv("SIGNAL_RECORDERS", "").split(",") if r.strip()}
+ALERTS_PER_MINUTE = float(os.getenv("ALERTS_PER_MINUTE", "6"))
+ALERT_BURST = 3
+
+NEWS_INTERVAL = 300
+PREV_CLOSE_INTERVAL = 3600
+FALLBACK_POLL_INTERVAL = 300
+
+# Root symbol -> Yahoo symbol (prev close, and prices when there is no stream)
+YAHOO_SYMBOLS = {"NQ": "NQ=F", "ES": "ES=F"}
+# Setup symbol -> (target, stop) as a fraction of price
+SETUP_RANGES = {"NQ": (0.0015, 0.0008), "ES": (0.0012, 0.0006)}
+CALLOUT_SYMBOL = "NQ"
+
 if not TOKEN:
     raise SystemExit("Missing DISCORD_BOT_TOKEN in .env")
 
-# Initialize bot
+# Initialize bot (client, tree and outbox are created by build_client)
 intents = discord.Intents.default()
-client = discord.Client(intents=intents)
+client = None
+tree = None
+outbox = None
 
-# Store last alerts to prevent spam
-last_trade_alert = None
-last_sentiment_alert = None
-last_news_alert = None
+# Latest quotes from the stream, last posted state per alert rule, recent headlines
+quotes = QuoteCache()
+alert_state = {}
+posted_headlines = OrderedDict()
+background_tasks = []
 
 # HTTP session for async requests
 session = None
@@ -153,150 +179,191 @@ async def fetch_news() -> list:
 
 
 async def send_news_alerts():
-    """Fetch and send breaking news alerts."""
-    global last_news_alert
-    channel = client.get_channel(BREAKING_NEWS_CHANNEL_ID)
-    if not channel:
-        return
-
+    """Fetch and send breaking news headlines not posted before."""
     news = await fetch_news()
-    if not news:
-        return
-
     for title, url in news:
-        message = f"📰 **{title}**\n🔗 {url}"
-        if message != last_news_alert:
-            last_news_alert = message
-            try:
-                await channel.send(message)
-            except Exception as e:
-                logger.error(f"Error sending news alert: {e}")
-
-
-async def send_trade_setups():
-    """Analyze market data and send trade setup alerts with dynamic levels."""
-    global last_trade_alert
-    channel = client.get_channel(TRADE_SETUPS_CHANNEL_ID)
-    if not channel:
+        if title in posted_headlines:
+            continue
+        posted_headlines[title] = True
+        while len(posted_headlines) > 200:
+            posted_headlines.popitem(last=False)
+        outbox.post(BREAKING_NEWS_CHANNEL_ID, f"news:{title}", f"📰 **{title}**\n🔗 {url}")
+
+
+def parse_price_alerts(spec: str) -> list:
+    """'NQ>21500,ES<6000' -> [('NQ', '>', 21500.0), ('ES', '<', 6000.0)]"""
+    alerts = []
+    for item in (spec or '').split(','):
+        item = item.strip().upper()
+        for op in ('>', '<'):
+            if op in item:
+                symbol, level = item.split(op, 1)
+                try:
+                    alerts.append((symbol.strip(), op, float(level)))
+                except ValueError:
+                    logger.warning(f"Ignoring bad PRICE_ALERTS entry: {item}")
+                break
+    return alerts
+
+
+PRICE_ALERTS = parse_price_alerts(os.getenv("PRICE_ALERTS", ""))
+
+
+def sentiment_for(change_pct: float) -> str:
+    if change_pct > 0.3:
+        return "🟢 **Strong Bullish**"
+    elif change_pct > 0:
+        return "🟢 **Mildly Bullish**"
+    elif change_pct > -0.3:
+        return "🔴 **Mildly Bearish**"
+    return "🔴 **Strong Bearish**"
+
+
+def trade_setup_message(symbol: str, quote: dict) -> str:
+    """Setup with dynamic levels: target/stop are a fixed fraction of price (ATR-like range)."""
+    price, change_pct = quote['price'], quote['change_pct']
+    is_bull = quote['change'] > 0
+    direction = "🟢 **Bullish**" if is_bull else "🔴 **Bearish**"
+    target_frac, stop_frac = SETUP_RANGES[symbol]
+    target_price = price + price * target_frac if is_bull else price - price * target_frac
+    stop_loss = price - price * stop_frac if is_bull else price + price * stop_frac
+    return (
+        f"📊 **{symbol} Trade Setup:** {direction}\n"
+        f"Entry: {price:,.2f} ({change_pct:+.2f}% vs prev close)\n"
+        f"Target: {target_price:,.2f}\n"
+        f"Stop Loss: {stop_loss:,.2f}"
+    )
+
+
+async def on_price(previous: float | None, quote: dict):
+    """Alert rules, evaluated per price update; each posts only when its state changes."""
+    symbol, price = quote['symbol'], quote['price']
+
+    # Trade setup when the symbol crosses its previous close (direction flips)
+    if symbol in SETUP_RANGES and quote['change_pct'] is not None:
+        direction = quote['change'] > 0
+        if alert_state.get(f"setup:{symbol}") != direction:
+            alert_state[f"setup:{symbol}"] = direction
+            outbox.post(TRADE_SETUPS_CHANNEL_ID, f"setup:{symbol}", trade_setup_message(symbol, quote))
+
+    # Live callout when NQ moves into another sentiment band
+    if symbol == CALLOUT_SYMBOL and quote['change_pct'] is not None:
+        sentiment = sentiment_for(quote['change_pct'])
+        if alert_state.get("sentiment") != sentiment:
+            alert_state["sentiment"] = sentiment
+            outbox.post(LIVE_TRADES_CHANNEL_ID, "sentiment", (
+                f"🔥 **{symbol} Live Trade Callout:** {sentiment}\n"
+                f"Current Price: {price:,.2f} ({quote['change_pct']:+.2f}%)\n"
+                f"Previous Close: {quote['prev_close']:,.2f}"
+            ))
+
+    # Configured level crossings (PRICE_ALERTS)
+    if previous is None:
         return
-
-    # Try Alpaca first, fall back to Yahoo Finance
-    nq_data = await get_index_price("NQ=F")
-    es_data = await get_index_price("ES=F")
-
-    if nq_data and nq_data['price'] > 0:
-        price = nq_data['price']
-        change_pct = nq_data['change_pct']
-        prev = nq_data['prev_close']
-
-        # Dynamic direction based on price vs previous close
-        direction = "🟢 **Bullish**" if price > prev else "🔴 **Bearish**"
-        is_bull = price > prev
-
-        # Dynamic targets based on ATR-like range (0.15% of price)
-        target_offset = price * 0.0015
-        sl_offset = price * 0.0008
-
-        target_price = price + target_offset if is_bull else price - target_offset
-        stop_loss = price - sl_offset if is_bull else price + sl_offset
-
-        message = (
-            f"📊 **NQ Trade Setup:** {direction}\n"
-            f"Entry: {price:,.2f} ({change_pct:+.2f}% vs prev close)\n"
-            f"Target: {target_price:,.2f}\n"
-            f"Stop Loss: {stop_loss:,.2f}"
-        )
-        if message != last_trade_alert:
-            last_trade_alert = message
-            try:
-                await channel.send(message)
-            except Exception as e:
-                logger.error(f"Error sending NQ setup: {e}")
-
-    if es_data and es_data['price'] > 0:
-        price = es_data['price']
-        change_pct = es_data['change_pct']
-        prev = es_data['prev_close']
-
-        direction = "🟢 **Bullish**" if price > prev else "🔴 **Bearish**"
-        is_bull = price > prev
-
-        target_offset = price * 0.0012
-        sl_offset = price * 0.0006
-
-        target_price = price + target_offset if is_bull else price - target_offset
-        stop_loss = price - sl_offset if is_bull else price + sl_offset
-
-        message = (
-            f"📊 **ES Trade Setup:** {direction}\n"
-            f"Entry: {price:,.2f} ({change_pct:+.2f}% vs prev close)\n"
-            f"Target: {target_price:,.2f}\n"
-            f"Stop Loss: {stop_loss:,.2f}"
-        )
-        if message != last_trade_alert:
-            last_trade_alert = message
-            try:
-                await channel.send(message)
-            except Exception as e:
-                logger.error(f"Error sending ES setup: {e}")
-
-
-async def send_live_trade_signals():
-    """Determine sentiment and send live trade call-outs based on price action."""
-    global last_sentiment_alert
-    channel = client.get_channel(LIVE_TRADES_CHANNEL_ID)
-    if not channel:
+    for alert_symbol, op, level in PRICE_ALERTS:
+        if alert_symbol != symbol:
+            continue
+        crossed = previous <= level < price if op == '>' else previous >= level > price
+        if crossed:
+            arrow = "⬆️" if op == '>' else "⬇️"
+            outbox.post(LIVE_TRADES_CHANNEL_ID, f"level:{symbol}{op}{level}",
+                        f"{arrow} **{symbol}** crossed {level:,.2f} — now {price:,.2f}")
+
+
+async def on_signal(event: dict):
+    """Post a recorder signal (entry, exit or TP/SL hit) as it happens."""
+    recorder = event.get('recorder_name') or f"Recorder {event.get('recorder_id')}"
+    if SIGNAL_RECORDERS and recorder not in SIGNAL_RECORDERS and str(event.get('recorder_id')) not in SIGNAL_RECORDERS:
         return
+    action = str(event.get('action', '')).upper()
+    ticker = event.get('ticker', '')
+    price = event.get('price')
+    lines = [f"🚨 **{recorder}** — {action} {ticker}" + (f" @ {float(price):,.2f}" if price else "")]
+    trade = event.get('trade') or {}
+    if trade.get('action') == 'closed' and trade.get('pnl') is not None:
+        lines.append(f"Closed {trade.get('side', '')}: {float(trade['pnl']):+,.2f} USD")
+    elif trade.get('tp_price') or trade.get('sl_price'):
+        lines.append(f"TP: {trade.get('tp_price') or '—'} | SL: {trade.get('sl_price') or '—'}")
+    key = f"signal:{event.get('signal_id') or event.get('timestamp')}:{recorder}:{action}"
+    outbox.post(LIVE_TRADES_CHANNEL_ID, key, "\n".join(lines))
+
+
+async def refresh_prev_closes():
+    """Reference closes for change% (the stream carries live prices only)."""
+    for symbol, yahoo_symbol in YAHOO_SYMBOLS.items():
+        data = await get_index_price(yahoo_symbol)
+        if data and data['prev_close']:
+            quotes.seed(symbol, data['prev_close'])
+
+
+async def poll_yahoo():
+    """Fallback price source when PLATFORM_STREAM_URL is not configured."""
+    for symbol, yahoo_symbol in YAHOO_SYMBOLS.items():
+        data = await get_index_price(yahoo_symbol)
+        if data and data['price'] > 0:
+            quotes.seed(symbol, data['prev_close'])
+            previous, quote = quotes.update(symbol, data['price'], source='yahoo')
+            await on_price(previous, quote)
+
+
+async def run_every(interval: int, fn):
+    while True:
+        try:
+            await fn()
+        except Exception as e:
+            logger.error(f"Error in {fn.__name__}: {e}", exc_info=True)
+        await asyncio.sleep(interval)
 
-    nq_data = await get_index_price("NQ=F")
 
-    if nq_data and nq_data['price'] > 0:
-        price = nq_data['price']
-        prev = nq_data['prev_close']
-        change_pct = nq_data['change_pct']
+def build_client() -> discord.Client:
+    """Discord client with the /quote command; rebuilt after a failed login."""
+    global client, tree, outbox
+    client = discord.Client(intents=intents)
+    tree = app_commands.CommandTree(client)
+    outbox = ChannelOutbox(client, ALERTS_PER_MINUTE, ALERT_BURST)
+
+    @tree.command(name="quote", description="Latest cached price for a futures root (NQ, ES, ...)")
+    async def quote_command(interaction: discord.Interaction, symbol: str):
+        quote = quotes.get(symbol)
+        if not quote:
+            await interaction.response.send_message(f"No live price for {symbol.upper()} yet", ephemeral=True)
+            return
+        age = time.time() - quote['updated']
+        change = f" ({quote['change_pct']:+.2f}%)" if quote['change_pct'] is not None else ""
+        await interaction.response.send_message(
+            f"**{quote['symbol']}** {quote['price']:,.2f}{change} · {age:.0f}s ago via {quote.get('source') or 'stream'}")
+
+    client.event(on_ready)
+    return client
+
 
-        # Dynamic sentiment based on % change from previous close
-        if change_pct > 0.3:
-            sentiment = "🟢 **Strong Bullish**"
-        elif change_pct > 0:
-            sentiment = "🟢 **Mildly Bullish**"
-        elif change_pct > -0.3:
-            sentiment = "🔴 **Mildly Bearish**"
-        else:
-            sentiment = "🔴 **Strong Bearish**"
-
-        message = (
-            f"🔥 **NQ Live Trade Callout:** {sentiment}\n"
-            f"Current Price: {price:,.2f} ({change_pct:+.2f}%)\n"
-            f"Previous Close: {prev:,.2f}"
-        )
-        if message != last_sentiment_alert:
-            last_sentiment_alert = message
-            try:
-                await channel.send(message)
-            except Exception as e:
-                logger.error(f"Error sending live signal: {e}")
-
-
-@client.event
 async def on_ready():
-    global session
+    global session, background_tasks
     logger.info(f"Logged in as {client.user}")
+    if background_tasks:
+        return  # Reconnect after a gateway drop; the stream tasks are still running
     session = aiohttp.ClientSession()
+    try:
+        await tree.sync()
+    except Exception as e:
+        logger.warning(f"Could not sync /quote command: {e}")
+
+    background_tasks = [
+        asyncio.create_task(run_every(NEWS_INTERVAL, send_news_alerts)),
+        asyncio.create_task(run_every(PREV_CLOSE_INTERVAL, refresh_prev_closes)),
+    ]
+    if PLATFORM_STREAM_URL:
+        stream = PlatformStream(PLATFORM_STREAM_URL, quotes, SIGNAL_STREAM_TOKEN or None)
+        stream.on_price(on_price)
+        stream.on_signal(on_signal)
+        background_tasks.append(asyncio.create_task(stream.run(session)))
+    else:
+        logger.warning("PLATFORM_STREAM_URL not set - polling Yahoo every 5 minutes, no recorder signals")
+        background_tasks.append(asyncio.create_task(run_every(FALLBACK_POLL_INTERVAL, poll_yahoo)))
 
-    while True:
-        try:
-            await send_news_alerts()
-            await send_trade_setups()
-            await send_live_trade_signals()
-        except Exception as e:
-            logger.error(f"Error in main loop: {e}", exc_info=True)
-        await asyncio.sleep(300)  # Run every 5 minutes
-
-
-import time
 
 max_retries = 5
+build_client()
 for attempt in range(max_retries):
     try:
         client.run(TOKEN)
@@ -307,8 +374,7 @@ for attempt in range(max_retries):
             logger.warning(f"Rate limited by Discord (attempt {attempt+1}/{max_retries}). Waiting {wait}s...")
             time.sleep(wait)
             # Recreate client — old one's internal session is dead after failed login
-            client = discord.Client(intents=intents)
-            client.event(on_ready)
+            build_client()
         else:
             logger.error(f"Discord HTTP error: {e}")
             break
@@ -0,0 +1,234 @@
+"""
+Platform stream client for the trading-signals bot
+==================================================
+BEFORE: bot.py woke up every 5 minutes, fetched NQ/ES from Yahoo (NQ twice per
+cycle) and posted setups/callouts on that timer whether or not anything had
+changed; recorder signals never reached Discord.
+
+AFTER:
+- PlatformStream holds one connection to the platform's normalized price
+  stream (/api/price-stream, conflated per symbol) with recorder signal events
+  enabled, and reconnects with backoff.
+- QuoteCache keeps the latest quote per root symbol (NQ, ES, ...), so /quote is
+  answered without a request and alert rules see the previous price.
+- Price and signal handlers run as updates arrive, so alerts go out when a
+  threshold or signal fires instead of on a timer.
+- ChannelOutbox rate-limits each channel. Pending alerts with the same key are
+  collapsed (latest text wins); signal alerts use unique keys and are never
+  collapsed.
+
+Environment:
+    PLATFORM_STREAM_URL     e.g. https://<platform-host>/api/price-stream
+    SIGNAL_STREAM_TOKEN     unlocks recorder signal events on the stream
+    ALERTS_PER_MINUTE       per-channel send rate (default 6, burst 3)
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+logger = logging.getLogger('trading-signals.stream')
+
+STREAM_MAX_RATE = 1            # Frames/second requested from the conflated stream
+READ_TIMEOUT = 60              # Server sends a heartbeat every 15s; silence this long = dead
+MAX_BACKOFF = 60
+MAX_PENDING = 100              # Alerts queued per channel before the oldest is dropped
+
+
+class QuoteCache:
+    """Latest quote per root symbol, plus the reference prev_close used for change%."""
+
+    def __init__(self):
+        self.quotes = {}
+
+    def seed(self, symbol: str, prev_close: float):
+        quote = self.quotes.setdefault(symbol, {'symbol': symbol, 'price': None, 'updated': 0})
+        quote['prev_close'] = prev_close
+        self._derive(quote)
+
+    def update(self, symbol: str, price: float, bid=None, ask=None, source=None):
+        """Apply a price; returns (previous_price, quote)."""
+        quote = self.quotes.setdefault(symbol, {'symbol': symbol, 'price': None, 'prev_close': None})
+        previous = quote['price']
+        quote.update(price=price, bid=bid, ask=ask, source=source, updated=time.time())
+        self._derive(quote)
+        return previous, quote
+
+    def get(self, symbol: str, max_age: float = None) -> dict | None:
+        quote = self.quotes.get(symbol.upper())
+        if not quote or quote['price'] is None:
+            return None
+        if max_age is not None and time.time() - quote['updated'] > max_age:
+            return None
+        return quote
+
+    @staticmethod
+    def _derive(quote):
+        price, prev = quote.get('price'), quote.get('prev_close')
+        if price and prev:
+            quote['change'] = price - prev
+            quote['change_pct'] = (price - prev) / prev * 100
+        else:
+            quote['change'] = quote['change_pct'] = None
+
+
+class PlatformStream:
+    """SSE consumer for the platform price stream (price_update/snapshot frames and signal events)."""
+
+    def __init__(self, url: str, cache: QuoteCache, token: str = None, symbols=None):
+        self.url = url
+        self.cache = cache
+        self.token = token
+        self.symbols = symbols
+        self.price_handlers = []       # async fn(previous_price, quote)
+        self.signal_handlers = []      # async fn(event)
+        self.connected = False
+        self.stats = {'connects': 0, 'prices': 0, 'signals': 0, 'errors': 0}
+
+    def on_price(self, fn):
+        self.price_handlers.append(fn)
+        return fn
+
+    def on_signal(self, fn):
+        self.signal_handlers.append(fn)
+        return fn
+
+    async def run(self, session: aiohttp.ClientSession):
+        """Consume the stream forever, reconnecting with exponential backoff."""
+        backoff = 1
+        while True:
+            try:
+                await self._consume(session)
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Platform stream error: {e}. Reconnecting in {backoff}s")
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def _consume(self, session):
+        params = {'max_rate': str(STREAM_MAX_RATE)}
+        headers = {'Accept': 'text/event-stream'}
+        if self.symbols:
+            params['symbols'] = ','.join(self.symbols)
+        if self.token:
+            params['events'] = '1'
+            headers['Authorization'] = f'Bearer {self.token}'
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=READ_TIMEOUT)
+        async with session.get(self.url, params=params, headers=headers, timeout=timeout) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"stream returned HTTP {resp.status}")
+            self.connected = True
+            self.stats['connects'] += 1
+            logger.info(f"Connected to platform stream ({'prices + signals' if self.token else 'prices'})")
+            async for raw in resp.content:
+                line = raw.decode('utf-8', 'replace').strip()
+                if line.startswith('data:'):
+                    await self._dispatch(json.loads(line[5:]))
+
+    async def _dispatch(self, payload: dict):
+        kind = payload.get('type')
+        if kind == 'signal':
+            self.stats['signals'] += 1
+            for fn in self.signal_handlers:
+                await self._call(fn, payload)
+        elif kind == 'price_update':
+            await self._apply_price(payload)
+        elif kind == 'snapshot':
+            for quote in (payload.get('prices') or {}).values():
+                await self._apply_price(quote)
+
+    async def _apply_price(self, payload: dict):
+        symbol, price = payload.get('symbol'), payload.get('price')
+        if not symbol or not price:
+            return
+        self.stats['prices'] += 1
+        previous, quote = self.cache.update(symbol, float(price), payload.get('bid'), payload.get('ask'),
+                                            payload.get('source'))
+        for fn in self.price_handlers:
+            await self._call(fn, previous, quote)
+
+    @staticmethod
+    async def _call(fn, *args):
+        try:
+            await fn(*args)
+        except Exception as e:
+            logger.error(f"Stream handler {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+
+
+class _TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Box:
+    def __init__(self, rate_per_minute, burst):
+        self.pending = OrderedDict()   # key -> message, oldest first
+        self.ready = asyncio.Event()
+        self.bucket = _TokenBucket(rate_per_minute, burst)
+        self.task = None
+
+
+class ChannelOutbox:
+    """Per-channel rate-limited sender; post() never blocks the stream."""
+
+    def __init__(self, client, rate_per_minute: float = 6, burst: int = 3):
+        self.client = client
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.boxes = {}
+        self.stats = {'sent': 0, 'collapsed': 0, 'dropped': 0}
+
+    def post(self, channel_id: int, key: str, message: str):
+        if not channel_id:
+            return
+        box = self.boxes.get(channel_id)
+        if box is None:
+            box = self.boxes[channel_id] = _Box(self.rate_per_minute, self.burst)
+        if key in box.pending:
+            self.stats['collapsed'] += 1
+        elif len(box.pending) >= MAX_PENDING:
+            dropped, _ = box.pending.popitem(last=False)
+            self.stats['dropped'] += 1
+            logger.warning(f"Channel {channel_id} outbox full, dropped alert {dropped}")
+        box.pending[key] = message
+        box.ready.set()
+        if box.task is None or box.task.done():
+            box.task = asyncio.create_task(self._drain(channel_id, box))
+
+    async def _drain(self, channel_id: int, box: _Box):
+        while True:
+            if not box.pending:
+                box.ready.clear()
+                await box.ready.wait()
+            await box.bucket.acquire()
+            key, message = box.pending.popitem(last=False)
+            channel = self.client.get_channel(channel_id)
+            if channel is None:
+                logger.warning(f"Channel {channel_id} not found, alert {key} not sent")
+                continue
+            try:
+                await channel.send(message)
+                self.stats['sent'] += 1
+            except Exception as e:
+                logger.error(f"Error sending alert {key} to {channel_id}: {e}")
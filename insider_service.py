@@ -24,6 +24,8 @@ from datetime import datetime, timedelta
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from quote_service import get_quote_service
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -1526,67 +1528,27 @@ def get_watchlist_signals():
 # PRICE LOOKUP
 # =============================================================================
 
-# Simple price cache to avoid hammering APIs
-_price_cache = {}
-_price_cache_time = {}
+# Quotes come from the process-wide quote service (batched TradingView scanner,
+# Yahoo fallback for tickers it does not list); insider signals accept 5-minute-old prices
 PRICE_CACHE_TTL = 300  # 5 minutes
 
 def get_stock_price(ticker):
     """
-    Get current stock price using Yahoo Finance API (free, no key needed)
+    Get current stock price via the shared quote service
     Returns price and change info or None if unavailable
     """
     if not ticker:
         return None
     
-    ticker = ticker.upper()
-    
-    # Check cache
-    now = time.time()
-    if ticker in _price_cache and (now - _price_cache_time.get(ticker, 0)) < PRICE_CACHE_TTL:
-        return _price_cache[ticker]
-    
-    try:
-        # Use Yahoo Finance API (no auth required)
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
-        params = {'interval': '1d', 'range': '5d'}
-        headers = {'User-Agent': SEC_USER_AGENT}
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            result = data.get('chart', {}).get('result', [])
-            
-            if result:
-                meta = result[0].get('meta', {})
-                price = meta.get('regularMarketPrice')
-                prev_close = meta.get('previousClose') or meta.get('chartPreviousClose')
-                
-                if price:
-                    change = None
-                    change_pct = None
-                    if prev_close:
-                        change = price - prev_close
-                        change_pct = (change / prev_close) * 100
-                    
-                    price_data = {
-                        'price': round(price, 2),
-                        'change': round(change, 2) if change else None,
-                        'change_pct': round(change_pct, 2) if change_pct else None,
-                        'currency': meta.get('currency', 'USD')
-                    }
-                    
-                    # Cache it
-                    _price_cache[ticker] = price_data
-                    _price_cache_time[ticker] = now
-                    
-                    return price_data
-                    
-    except Exception as e:
-        logger.debug(f"Price lookup failed for {ticker}: {e}")
-    
-    return None
+    quote = get_quote_service().get_quote(ticker, max_age=PRICE_CACHE_TTL)
+    if not quote:
+        return None
+    return {
+        'price': quote['price'],
+        'change': quote['change'],
+        'change_pct': quote['change_pct'],
+        'currency': 'USD'
+    }
 
 
 @app.route('/api/insiders/price/<ticker>')
@@ -1632,10 +1594,13 @@ def get_signals_with_prices():
         LIMIT ?
     ''', (min_score, since_date, limit))
     
+    rows = [dict(row) for row in cursor.fetchall()]
+    
+    # One batched quote request for every ticker; get_stock_price then reads the cache
+    get_quote_service().get_quotes([r['ticker'] for r in rows if r.get('ticker')], max_age=PRICE_CACHE_TTL)
+    
     signals = []
-    for row in cursor.fetchall():
-        signal = dict(row)
-        
+    for signal in rows:
         # Get current price if ticker exists
         if signal.get('ticker'):
             price_data = get_stock_price(signal['ticker'])
@@ -10,6 +10,9 @@ For each connected account:
 2. Monitors openPnL against trader's max_daily_loss setting
 3. Auto-flattens all positions when max loss is breached
 
+ProjectX accounts are checked on the account's SignalR pushes (broker_sessions),
+with REST polling as the fallback.
+
 Usage:
     from live_max_loss_monitor import start_live_max_loss_monitor
     start_live_max_loss_monitor()
@@ -19,10 +22,12 @@ import asyncio
 import json
 import logging
 import os
-import threading
 import time
 from typing import Dict, Optional, Any, List
-from datetime import datetime, date
+from datetime import datetime
+
+from risk_engine import get_risk_engine
+from broker_sessions import get_broker_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -50,9 +55,14 @@ _account_connections: Dict[int, Any] = {}  # account_id -> connection info
 _max_loss_settings: Dict[int, float] = {}  # account_id -> max_daily_loss
 _daily_realized_pnl: Dict[int, float] = {}  # account_id -> today's realized P&L
 _last_pnl_check: Dict[int, float] = {}  # account_id -> last openPnL value
-_breached_today: Dict[int, bool] = {}  # account_id -> already breached today
 _max_loss_listeners: Dict[str, Any] = {}  # token_key -> MaxLossMonitorListener
-_projectx_thread = None  # Separate thread for ProjectX REST polling
+_projectx_task = None  # ProjectX monitors, running on the broker session loop
+
+# ProjectX checks run on every account / position / trade push; the intervals
+# below only bound the gap between checks when no push arrives
+PROJECTX_REST_POLL = 5          # Seconds between checks without a SignalR stream
+PROJECTX_STREAM_POLL = 15       # Seconds between checks while streaming (open P&L drifts with price)
+PROJECTX_PUSH_DEBOUNCE = 0.5    # Let a burst of pushes (fill + position + account) settle
 
 
 # ============================================================================
@@ -124,8 +134,6 @@ class MaxLossMonitorListener:
 
     async def _check_pnl_from_item(self, data: dict):
         """Check a single parsed message item for cashBalance P&L data."""
-        global _breached_today
-
         cash_balances = []
 
         # Props event with cashBalance entity
@@ -173,24 +181,17 @@ class MaxLossMonitorListener:
             trader_id = config.get('trader_id')
             recorder_id = config.get('recorder_id')
 
-            # Skip if already breached today
-            today = date.today().isoformat()
-            breach_key = f"{account_id}_{today}"
-            if _breached_today.get(breach_key):
-                continue
-
             open_pnl = cb.get('openPnL', 0)
             realized_pnl = cb.get('realizedPnL', 0)
             total_pnl = open_pnl + realized_pnl
 
-            # Check against max daily loss
-            if max_daily_loss > 0 and total_pnl <= -max_daily_loss:
+            # The risk engine claims a breach once per CME session (shared with every enforcer)
+            if get_risk_engine().on_account_pnl(account_id, realized_pnl, open_pnl, max_daily_loss,
+                                                name=config.get('account_name')):
                 logger.warning(f"🚨 MAX DAILY LOSS BREACHED for account {account_id}!")
                 logger.warning(f"   Open P&L: ${open_pnl:.2f} | Realized: ${realized_pnl:.2f} | "
                              f"Total: ${total_pnl:.2f} | Limit: -${max_daily_loss:.2f}")
 
-                _breached_today[breach_key] = True
-
                 try:
                     await flatten_account_positions(account_id, trader_id, recorder_id, total_pnl)
                 except Exception as e:
@@ -356,12 +357,8 @@ class TradovateMaxLossConnection:
 
     async def _check_pnl_update(self, data: dict, flatten_callback):
         """Check for P&L updates and enforce max loss"""
-        global _breached_today
-
-        # Skip if already breached today
-        today = date.today().isoformat()
-        breach_key = f"{self.account_id}_{today}"
-        if _breached_today.get(breach_key):
+        engine = get_risk_engine()
+        if engine.is_breached('account', self.account_id):
             return
 
         # Look for cashBalance data which contains openPnL
@@ -387,14 +384,11 @@ class TradovateMaxLossConnection:
             # Calculate total daily P&L
             total_pnl = open_pnl + realized_pnl
 
-            # Check against max daily loss
-            if self.max_daily_loss > 0 and total_pnl <= -self.max_daily_loss:
+            # Check against max daily loss (claimed once per session, prevents repeated flattens)
+            if engine.on_account_pnl(self.account_id, realized_pnl, open_pnl, self.max_daily_loss):
                 logger.warning(f"🚨 MAX DAILY LOSS BREACHED for account {self.account_id}!")
                 logger.warning(f"   Open P&L: ${open_pnl:.2f} | Realized: ${realized_pnl:.2f} | Total: ${total_pnl:.2f} | Limit: -${self.max_daily_loss:.2f}")
 
-                # Mark as breached to prevent repeated flattens
-                _breached_today[breach_key] = True
-
                 # Call flatten callback
                 if flatten_callback:
                     try:
@@ -635,8 +629,7 @@ async def _run_max_loss_monitor():
                 if await conn.connect():
                     tasks.append(asyncio.create_task(conn.run(flatten_account_positions)))
 
-            # Handle ProjectX accounts (uses REST polling since SignalR requires extra dep)
-            # For now, we'll check ProjectX via periodic REST calls
+            # Handle ProjectX accounts (SignalR pushes via broker_sessions, REST polling fallback)
             for acc in projectx_accounts:
                 conn_key = f"projectx_{acc['account_id']}"
 
@@ -657,7 +650,7 @@ async def _run_max_loss_monitor():
                     'connected': True
                 }
 
-                # Start ProjectX REST monitoring task
+                # Start ProjectX monitoring task (runs on the broker session loop)
                 tasks.append(asyncio.create_task(
                     _monitor_projectx_account(acc, flatten_projectx_positions)
                 ))
@@ -687,8 +680,18 @@ async def _run_max_loss_monitor():
 
 
 async def _monitor_projectx_account(acc: dict, flatten_callback):
-    """Monitor a ProjectX account for max daily loss via REST API polling"""
-    global _breached_today, _monitor_running
+    """Monitor a ProjectX account for max daily loss.
+
+    Runs on the broker session loop with a cached session. The P&L check runs
+    when the account's SignalR stream pushes an account / position / trade
+    update, and at least every PROJECTX_STREAM_POLL seconds (PROJECTX_REST_POLL
+    when the stream is unavailable).
+    """
+    global _monitor_running
+
+    sessions = get_broker_sessions()
+    if not sessions.on_loop():
+        return await sessions.call(_monitor_projectx_account(acc, flatten_callback), timeout=None)
 
     account_id = acc['account_id']
     projectx_account_id = acc.get('projectx_account_id')
@@ -697,23 +700,37 @@ async def _monitor_projectx_account(acc: dict, flatten_callback):
     is_demo = acc['is_demo']
     prop_firm = acc.get('prop_firm', 'default')
 
-    today = date.today().isoformat()
-    breach_key = f"projectx_{account_id}_{today}"
+    breach_key = f"projectx_{account_id}"
+    engine = get_risk_engine()
+    status = _account_connections.setdefault(breach_key, {
+        'broker': 'projectx',
+        'account_id': account_id,
+        'projectx_account_id': projectx_account_id,
+        'connected': True,
+    })
+
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    stream = None
+
+    def on_push(_account_id, _kind, _data):
+        loop.call_soon_threadsafe(wake.set)
 
     logger.info(f"📡 Starting ProjectX monitor for account {account_id} (max_loss=${max_daily_loss})")
 
     while _monitor_running:
         try:
             # Skip if already breached today
-            if _breached_today.get(breach_key):
+            if engine.is_breached('account', breach_key):
                 await asyncio.sleep(60)
                 continue
 
-            # Get current P&L via REST
-            from phantom_scraper.projectx_integration import ProjectXIntegration
-
-            async with ProjectXIntegration(demo=is_demo, prop_firm=prop_firm) as px:
-                px.session_token = access_token
+            wake.clear()
+            async with sessions.projectx_token(access_token, demo=is_demo, prop_firm=prop_firm) as px:
+                if projectx_account_id and (stream is None or not stream.connected):
+                    stream = await sessions.watch_projectx(px, int(projectx_account_id))
+                    stream.add_listener(on_push)
+                status['streaming'] = bool(stream and stream.connected)
 
                 # Get account info which may contain P&L
                 account_info = await px.get_account_info(projectx_account_id or account_id)
@@ -734,38 +751,44 @@ async def _monitor_projectx_account(acc: dict, flatten_callback):
                     if trailing_dd < 0 and abs(trailing_dd) > abs(total_pnl):
                         total_pnl = trailing_dd
 
-                # Check max loss
-                if total_pnl <= -max_daily_loss:
+                # Check max loss (trailing drawdown counts as open P&L)
+                if engine.on_account_pnl(breach_key, realized_pnl, total_pnl - realized_pnl, max_daily_loss):
                     logger.warning(f"🚨 MAX DAILY LOSS BREACHED for ProjectX account {account_id}!")
                     logger.warning(f"   Open P&L: ${open_pnl:.2f} | Realized: ${realized_pnl:.2f} | Total: ${total_pnl:.2f}")
 
-                    _breached_today[breach_key] = True
-
                     if flatten_callback:
                         await flatten_callback(acc, total_pnl)
 
-            # Poll every 5 seconds (reasonable for REST)
-            await asyncio.sleep(5)
+            # Next check on the next push, or after the poll interval
+            interval = PROJECTX_STREAM_POLL if status['streaming'] else PROJECTX_REST_POLL
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=interval)
+                await asyncio.sleep(PROJECTX_PUSH_DEBOUNCE)
+            except asyncio.TimeoutError:
+                pass
 
         except Exception as e:
             logger.error(f"ProjectX monitor error for account {account_id}: {e}")
             await asyncio.sleep(30)
 
+    if stream is not None:
+        stream.remove_listener(on_push)
+
 
 async def flatten_projectx_positions(acc: dict, current_pnl: float = 0):
     """Flatten all positions for a ProjectX account using liquidate_position"""
-    try:
-        from phantom_scraper.projectx_integration import ProjectXIntegration
+    sessions = get_broker_sessions()
+    if not sessions.on_loop():
+        return await sessions.call(flatten_projectx_positions(acc, current_pnl))
 
+    try:
         account_id = acc.get('projectx_account_id') or acc.get('account_id')
         is_demo = acc.get('is_demo', True)
         prop_firm = acc.get('prop_firm', 'default')
         access_token = acc.get('access_token')
         account_name = acc.get('account_name', f'ProjectX-{account_id}')
 
-        async with ProjectXIntegration(demo=is_demo, prop_firm=prop_firm) as px:
-            px.session_token = access_token
-
+        async with sessions.projectx_token(access_token, demo=is_demo, prop_firm=prop_firm) as px:
             # Get all positions
             positions = await px.get_positions(account_id)
 
@@ -801,13 +824,10 @@ async def flatten_projectx_positions(acc: dict, current_pnl: float = 0):
 
 
 async def _run_projectx_max_loss_monitor(projectx_accounts: list):
-    """Run REST polling loop for ProjectX accounts' max daily loss.
-
-    ProjectX uses REST (not Tradovate WebSocket), so it stays in its own thread.
-    """
+    """Run the ProjectX accounts' max daily loss monitors (on the broker session loop)."""
     global _monitor_running
 
-    logger.info(f"🛡️ ProjectX max loss REST polling started for {len(projectx_accounts)} accounts")
+    logger.info(f"🛡️ ProjectX max loss monitor started for {len(projectx_accounts)} accounts")
 
     tasks = []
     for acc in projectx_accounts:
@@ -823,9 +843,9 @@ def start_live_max_loss_monitor():
     """Start the live max loss monitor.
 
     Tradovate accounts: registered as listeners on the shared connection manager.
-    ProjectX accounts: monitored via REST polling in a separate daemon thread.
+    ProjectX accounts: push-driven monitors on the broker session loop (REST fallback).
     """
-    global _monitor_thread, _monitor_running, _max_loss_listeners, _projectx_thread
+    global _monitor_thread, _monitor_running, _max_loss_listeners, _projectx_task
 
     if _monitor_running:
         logger.info("Live max loss monitor already running")
@@ -892,23 +912,10 @@ def start_live_max_loss_monitor():
     elif tradovate_accounts:
         logger.warning("🛡️ Connection manager not available — Tradovate max loss monitoring disabled")
 
-    # --- ProjectX: REST polling in separate thread ---
+    # --- ProjectX: SignalR-driven checks on the broker session loop ---
     if projectx_accounts:
-        def _run_projectx_polling():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(_run_projectx_max_loss_monitor(projectx_accounts))
-            except Exception as e:
-                logger.error(f"ProjectX max loss monitor thread error: {e}")
-            finally:
-                loop.close()
-
-        _projectx_thread = threading.Thread(
-            target=_run_projectx_polling, daemon=True, name="ProjectXMaxLossMonitor"
-        )
-        _projectx_thread.start()
-        logger.info(f"🛡️ ProjectX max loss monitor thread started "
+        _projectx_task = get_broker_sessions().submit(_run_projectx_max_loss_monitor(projectx_accounts))
+        logger.info(f"🛡️ ProjectX max loss monitor scheduled "
                     f"({len(projectx_accounts)} accounts)")
 
     logger.info("🛡️ Live max loss monitor started")
@@ -939,7 +946,7 @@ def get_max_loss_monitor_status() -> dict:
         if listener.connected:
             tradovate_connected += account_count
 
-    # ProjectX accounts from _account_connections (REST polling)
+    # ProjectX accounts from _account_connections (registered by _monitor_projectx_account)
     projectx_connected = 0
     for key, conn in _account_connections.items():
         if key.startswith('projectx_'):
@@ -951,22 +958,10 @@ def get_max_loss_monitor_status() -> dict:
         'tradovate_accounts': tradovate_connected,
         'projectx_accounts': projectx_connected,
         'total_accounts': tradovate_total + projectx_connected,
-        'breached_today': list(_breached_today.keys())
+        'breached_today': [b['scope'][1] for b in get_risk_engine().breaches('account')]
     }
 
 
-# Reset breach flags at midnight
-def _reset_daily_breach_flags():
-    """Reset breach flags at start of new day"""
-    global _breached_today
-    today = date.today().isoformat()
-
-    # Remove old dates
-    old_keys = [k for k in _breached_today.keys() if not k.endswith(today)]
-    for k in old_keys:
-        del _breached_today[k]
-
-
 if __name__ == '__main__':
     # Test run
     logging.basicConfig(level=logging.INFO)
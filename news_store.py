@@ -0,0 +1,365 @@
+"""
+News Store - Persistent, incrementally deduplicated watchlist news
+==================================================================
+BEFORE: every /api/watchlist/news request re-fetched every ticker's feeds,
+re-normalized every headline and deduplicated only within that one response
+(in-memory url / exact-headline sets). The news_items table existed but was
+never written.
+
+AFTER:
+- Articles are stored once in news_items, keyed by url_hash (generate_url_hash).
+  news_item_tickers maps each story to every ticker whose feed carried it
+  (PRIMARY KEY (url_hash, ticker)), so a story about two watchlist tickers is
+  stored once and listed under both.
+- Near-duplicate headlines (same story syndicated under a different URL or with
+  a reworded title) are found with a MinHash signature over character shingles
+  of normalize_headline(). The in-memory LSH index buckets each signature by
+  BANDS bands of ROWS values, so a lookup only compares against headlines that
+  agree on a whole band; candidates count as duplicates at an estimated
+  Jaccard similarity >= SIMILARITY. Duplicates are stored with
+  duplicate_of = canonical url_hash, so their URLs are remembered across
+  restarts but never returned; their ticker is mapped onto the canonical story.
+- news_feed_cursors keeps, per (ticker, source), the newest url_hash seen and
+  when the ticker was last fetched. A refresh stops reading a feed at the
+  cursor (feeds are newest-first) and tickers fetched within the TTL are not
+  fetched again, even after a restart.
+- Watchlist queries read news_item_tickers (indexed on ticker) joined to
+  news_items, one row per story.
+- Items written by other processes are folded into the index by id
+  (catch_up) before each refresh. The scan starts CATCH_UP_OVERLAP ids below
+  the highest id seen, so a row whose id was allocated before but committed
+  after that one is still picked up.
+- The index is only updated once a refresh's rows are committed; a failed
+  write leaves those stories unknown, and the next refresh stores them.
+
+Usage:
+    from news_store import get_news_store
+    store = get_news_store(get_db_connection, is_using_postgres, normalize_headline)
+    store.refresh('AAPL', lambda: fetch_news_for_ticker('AAPL'), ttl=300)
+    news = store.query(['AAPL', 'MSFT'], limit=50)
+"""
+
+import hashlib
+import logging
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger('news_store')
+
+SHINGLE = 4                     # Character shingle length over the normalized headline
+BANDS = 8                       # LSH bands x rows = signature length
+ROWS = 4
+SIMILARITY = 0.7                # Estimated Jaccard similarity that counts as the same story
+INDEX_DAYS = 14                 # Headlines older than this are not compared against
+CATCH_UP_OVERLAP = 200          # Ids below the watermark re-read by catch_up (late-committing inserts)
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x6E657773)    # Fixed seed: signatures are persisted and must stay comparable
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def minhash(text: str) -> tuple:
+    """MinHash signature (BANDS * ROWS values) of a normalized headline's character shingles."""
+    if len(text) <= SHINGLE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    values = [int.from_bytes(hashlib.md5(shingle.encode()).digest()[:8], 'big') for shingle in shingles]
+    return tuple(min((a * v + b) % _PRIME for v in values) for a, b in _PERMUTATIONS)
+
+
+def similarity(left: tuple, right: tuple) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+def _bands(signature: tuple):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def _encode(signature: tuple) -> str:
+    return ''.join(f'{v:016x}' for v in signature)
+
+
+def _decode(text: str) -> Optional[tuple]:
+    if not text or len(text) != 16 * BANDS * ROWS:
+        return None
+    return tuple(int(text[i:i + 16], 16) for i in range(0, len(text), 16))
+
+
+def parse_published(value) -> Optional[datetime]:
+    """RSS pubDate (RFC 822) or ISO 8601 -> naive UTC datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        text = str(value).strip()
+        try:
+            dt = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            try:
+                dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class NewsStore:
+    """news_items + news_item_tickers + news_feed_cursors with an in-memory url / MinHash LSH index."""
+
+    def __init__(self, get_connection: Callable, is_postgres: Callable, normalize: Callable[[str], str]):
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres
+        self._normalize = normalize
+        self._lock = threading.Lock()
+        self._ticker_locks: Dict[str, list] = {}         # ticker -> [lock, refreshes using it]
+        self._loaded = False
+        self._last_id = 0
+        self._urls: Dict[str, str] = {}                  # url_hash -> canonical url_hash
+        self._signatures: Dict[str, tuple] = {}          # canonical url_hash -> minhash signature
+        self._buckets: Dict[tuple, set] = {}             # (band, value) -> canonical url_hashes
+        self.stats = {'fetches': 0, 'skipped_fresh': 0, 'new': 0, 'duplicates': 0, 'known': 0}
+
+    # ── Index ───────────────────────────────────────────────────────────────
+
+    def _index(self, url_hash: str, signature: tuple):
+        self._signatures[url_hash] = signature
+        for band in _bands(signature):
+            self._buckets.setdefault(band, set()).add(url_hash)
+
+    def _near_duplicate(self, signature: tuple) -> Optional[str]:
+        checked = set()
+        for band in _bands(signature):
+            for url_hash in self._buckets.get(band, ()):
+                if url_hash in checked:
+                    continue
+                checked.add(url_hash)
+                if similarity(self._signatures[url_hash], signature) >= SIMILARITY:
+                    return url_hash
+        return None
+
+    def catch_up(self):
+        """Fold rows inserted since the last load (this or another process) into the index."""
+        ph = '%s' if self._is_postgres() else '?'
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            if self._loaded:
+                cursor.execute(f'''
+                    SELECT id, url_hash, minhash, duplicate_of FROM news_items
+                    WHERE id > {ph} ORDER BY id
+                ''', (self._last_id - CATCH_UP_OVERLAP,))
+            else:
+                since = datetime.utcnow() - timedelta(days=INDEX_DAYS)
+                cursor.execute(f'''
+                    SELECT id, url_hash, minhash, duplicate_of FROM news_items
+                    WHERE inserted_at >= {ph} ORDER BY id
+                ''', (since,))
+            rows = [tuple(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        with self._lock:
+            for row_id, url_hash, encoded, duplicate_of in rows:
+                self._last_id = max(self._last_id, row_id)
+                if url_hash in self._urls:
+                    continue
+                self._urls[url_hash] = duplicate_of or url_hash
+                signature = _decode(encoded)
+                if signature is not None and not duplicate_of:
+                    self._index(url_hash, signature)
+            if not self._loaded:
+                self._loaded = True
+                logger.info(f"News store index loaded: {len(self._urls)} urls, {len(self._signatures)} stories")
+
+    # ── Refresh ─────────────────────────────────────────────────────────────
+
+    def refresh(self, ticker: str, fetch: Callable[[], List[dict]], ttl: float) -> int:
+        """
+        Fetch a ticker's feeds unless they were fetched within ttl seconds and
+        store only items newer than each feed's cursor. Returns items stored.
+        Concurrent refreshes of the same ticker wait for the first one.
+        """
+        with self._lock:
+            entry = self._ticker_locks.setdefault(ticker, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                return self._refresh(ticker, fetch, ttl)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._ticker_locks[ticker]
+
+    def _refresh(self, ticker: str, fetch: Callable[[], List[dict]], ttl: float) -> int:
+        cursors = self._load_cursors(ticker)
+        fetched_at = max((c['fetched_at'] for c in cursors.values() if c['fetched_at']), default=None)
+        if fetched_at and (datetime.utcnow() - fetched_at).total_seconds() < ttl:
+            self.stats['skipped_fresh'] += 1
+            return 0
+        self.catch_up()
+        items = fetch() or []
+        self.stats['fetches'] += 1
+        return self._ingest(ticker, items, cursors)
+
+    def _load_cursors(self, ticker: str) -> Dict[str, dict]:
+        ph = '%s' if self._is_postgres() else '?'
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT source, last_url_hash, fetched_at FROM news_feed_cursors WHERE ticker = {ph}
+            ''', (ticker,))
+            return {row[0]: {'last_url_hash': row[1], 'fetched_at': parse_published(row[2])}
+                    for row in (tuple(r) for r in cursor.fetchall())}
+        finally:
+            conn.close()
+
+    def _ingest(self, ticker: str, items: List[dict], cursors: Dict[str, dict]) -> int:
+        rows = []
+        mappings = set()        # (canonical url_hash, ticker)
+        newest: Dict[str, str] = {}
+        stopped = set()
+        staged: Dict[str, str] = {}              # url_hash -> canonical, indexed once written
+        staged_signatures: Dict[str, tuple] = {}
+        counts = {'new': 0, 'duplicates': 0, 'known': 0}
+        with self._lock:
+            for item in items:
+                source = item.get('source', '')
+                url_hash = item.get('url_hash')
+                if not url_hash or source in stopped:
+                    continue
+                newest.setdefault(source, url_hash)
+                if url_hash == cursors.get(source, {}).get('last_url_hash'):
+                    stopped.add(source)      # Everything after the cursor was processed last time
+                    continue
+                known = self._urls.get(url_hash) or staged.get(url_hash)
+                if known:
+                    # Already stored (possibly from another ticker's feed): list it here too
+                    counts['known'] += 1
+                    mappings.add((known, ticker))
+                    continue
+                signature = minhash(self._normalize(item.get('headline', '')))
+                duplicate_of = self._near_duplicate(signature) or next(
+                    (h for h, sig in staged_signatures.items() if similarity(sig, signature) >= SIMILARITY), None)
+                staged[url_hash] = duplicate_of or url_hash
+                mappings.add((duplicate_of or url_hash, ticker))
+                if duplicate_of:
+                    counts['duplicates'] += 1
+                else:
+                    staged_signatures[url_hash] = signature
+                    counts['new'] += 1
+                rows.append((url_hash, ticker, source, item.get('headline', ''), item.get('summary', ''),
+                             item.get('url', ''), parse_published(item.get('published_at')),
+                             _encode(signature), duplicate_of))
+        self._write(ticker, rows, sorted(mappings), newest)
+        with self._lock:
+            for url_hash, canonical in staged.items():
+                if url_hash in self._urls:
+                    continue        # Stored meanwhile by another refresh (INSERT ignored)
+                self._urls[url_hash] = canonical
+                if url_hash in staged_signatures:
+                    self._index(url_hash, staged_signatures[url_hash])
+            for key, value in counts.items():
+                self.stats[key] += value
+        return len(rows)
+
+    def _write(self, ticker: str, rows: list, mappings: list, newest: Dict[str, str]):
+        is_postgres = self._is_postgres()
+        ph = '%s' if is_postgres else '?'
+        now = datetime.utcnow()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            if rows:
+                values = ', '.join([ph] * 9)
+                if is_postgres:
+                    sql = f'''INSERT INTO news_items (url_hash, ticker, source, headline, summary, url,
+                                                      published_at, minhash, duplicate_of)
+                              VALUES ({values}) ON CONFLICT (url_hash) DO NOTHING'''
+                else:
+                    sql = f'''INSERT OR IGNORE INTO news_items (url_hash, ticker, source, headline, summary, url,
+                                                                published_at, minhash, duplicate_of)
+                              VALUES ({values})'''
+                cursor.executemany(sql, rows)
+            if mappings:
+                if is_postgres:
+                    sql = f'''INSERT INTO news_item_tickers (url_hash, ticker) VALUES ({ph}, {ph})
+                              ON CONFLICT (url_hash, ticker) DO NOTHING'''
+                else:
+                    sql = f'INSERT OR IGNORE INTO news_item_tickers (url_hash, ticker) VALUES ({ph}, {ph})'
+                cursor.executemany(sql, mappings)
+            sources = set(newest) or {''}
+            for source in sources:
+                params = (ticker, source, newest.get(source), now)
+                # Same upsert syntax on PostgreSQL and SQLite >= 3.24
+                cursor.execute(f'''
+                    INSERT INTO news_feed_cursors (ticker, source, last_url_hash, fetched_at)
+                    VALUES ({ph}, {ph}, {ph}, {ph})
+                    ON CONFLICT (ticker, source) DO UPDATE SET
+                        last_url_hash = COALESCE(excluded.last_url_hash, news_feed_cursors.last_url_hash),
+                        fetched_at = excluded.fetched_at
+                ''', params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ── Read ────────────────────────────────────────────────────────────────
+
+    def query(self, tickers: List[str], limit: int = 50) -> List[dict]:
+        """Newest canonical stories for these tickers, once each (a story on several tickers lists the first)."""
+        if not tickers:
+            return []
+        ph = '%s' if self._is_postgres() else '?'
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT MIN(m.ticker), n.source, n.headline, n.summary, n.url, n.published_at, n.url_hash
+                FROM news_item_tickers m JOIN news_items n ON n.url_hash = m.url_hash
+                WHERE m.ticker IN ({', '.join([ph] * len(tickers))}) AND n.duplicate_of IS NULL
+                GROUP BY n.url_hash, n.source, n.headline, n.summary, n.url, n.published_at
+                ORDER BY n.published_at IS NULL, n.published_at DESC
+                LIMIT {int(limit)}
+            ''', tuple(tickers))
+            rows = [tuple(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        news = []
+        for ticker, source, headline, summary, url, published_at, url_hash in rows:
+            published = parse_published(published_at)
+            news.append({
+                'ticker': ticker,
+                'source': source,
+                'headline': headline,
+                'summary': summary or '',
+                'url': url,
+                'published_at': published.isoformat() + 'Z' if published else None,
+                'url_hash': url_hash,
+            })
+        return news
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'urls': len(self._urls), 'stories': len(self._signatures), **self.stats}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_news_store(get_connection: Callable = None, is_postgres: Callable = None,
+                   normalize: Callable[[str], str] = None) -> NewsStore:
+    """Process-wide NewsStore (configured by the first caller)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = NewsStore(get_connection, is_postgres, normalize)
+    return _store
@@ -0,0 +1,441 @@
+"""
+Order Event Engine
+==================
+Event-driven OCO, break-even and trailing-stop rules.
+
+BEFORE: four `while True` threads (OCO, Tradovate BE, ProjectX BE, ProjectX
+trailing) each re-read the accounts table and polled broker REST / the price
+cache every 1-2s. Cancel-partner latency was bounded by the sleep interval.
+
+AFTER: rules are registered here and react to events:
+  - Order/fill/position events arrive through OrderEventListener, registered
+    on the shared TradovateConnectionManager (ws_connection_manager.py).
+    An OCO partner cancel is dispatched on the same event-loop tick as the fill.
+  - Price rules (break-even, trailing) are evaluated on every tick pushed via
+    on_price(); a slow sweep only covers symbols that stopped ticking.
+  - Broker actions (cancel / place) run on a small worker pool so the
+    WebSocket event loop never blocks on REST.
+  - Registrations are mirrored to redis_state (jt:oco_*, jt:be_monitors) and
+    restored on startup for crash recovery.
+
+The web server supplies the broker actions via set_handlers(), and keeps a
+REST fallback only for accounts without a live socket (has_live_socket()).
+
+Usage:
+    from order_event_engine import get_order_event_engine
+    engine = get_order_event_engine()
+    engine.set_handlers(oco=..., price={'be': ..., 'px_be': ..., 'px_trail': ...},
+                        price_source=get_cached_price)
+    engine.start()
+    engine.register_oco(tp_id, sl_id, account_id, 'MNQZ5')
+    engine.on_price('MNQ', 21500.25)
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from redis_state import (
+    redis_register_oco, redis_get_oco_details, redis_remove_oco,
+    redis_register_break_even, redis_get_break_even_monitors, redis_remove_break_even,
+)
+
+try:
+    from ws_connection_manager import get_connection_manager, Listener
+    WS_MANAGER_AVAILABLE = True
+except ImportError:
+    WS_MANAGER_AVAILABLE = False
+    Listener = object
+
+logger = logging.getLogger('order_event_engine')
+
+# Order statuses that end an OCO leg without a fill
+_DEAD_ORDER_STATUSES = ('canceled', 'cancelled', 'rejected', 'expired')
+# Never persisted in a rule (handlers read credentials from the account when they fire)
+_RULE_SECRETS = ('session_token', 'api_key', 'username', 'password')
+
+
+class OrderEventListener(Listener):
+    """Routes Tradovate order/fill/position events into the engine."""
+
+    def __init__(self, engine: 'OrderEventEngine', token_key: str):
+        self._engine = engine
+        self._token_key = token_key
+
+    @property
+    def listener_id(self) -> str:
+        return f'order-events-{self._token_key}'
+
+    async def on_message(self, items: list, raw_message: str):
+        for data in items:
+            if data.get('e') != 'props':
+                continue
+            d = data.get('d', {})
+            entity_type = d.get('entityType')
+            entity = d.get('entity') or d
+            if not isinstance(entity, dict):
+                continue
+            if entity_type == 'order':
+                self._engine.on_order_event(entity)
+            elif entity_type == 'fill' and d.get('eventType') == 'Created':
+                self._engine.on_fill_event(entity)
+            elif entity_type == 'position':
+                self._engine.on_position_event(entity)
+
+
+class OrderEventEngine:
+    """Registry of OCO pairs and price rules, driven by broker + price events."""
+
+    SWEEP_INTERVAL = 2.0        # seconds between stale-price sweeps
+    STALE_TICK_SECONDS = 2.0    # symbols silent this long are priced via price_source
+    MAX_TRAIL_AGE = 86400       # trailing rules expire after 24h
+    ACTION_COOLDOWN = 2.0       # seconds before a rule may act again (retry / next trail step)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # OCO: order_id -> {account_id, symbol, type, partner_id, created_at}
+        self._oco: Dict[int, dict] = {}
+        # Price rules: key -> rule dict (rule['kind'] in 'be' | 'px_be' | 'px_trail')
+        self._rules: Dict[str, dict] = {}
+        self._rules_by_symbol: Dict[str, set] = {}
+        self._inflight: set = set()
+        self._last_tick: Dict[str, float] = {}
+
+        self._oco_handler: Optional[Callable] = None
+        self._price_handlers: Dict[str, Callable] = {}
+        self._price_source: Optional[Callable] = None
+
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='order-events')
+        self._listeners: Dict[str, OrderEventListener] = {}
+        self._started = False
+        self.stats = {
+            'oco_ws_fills': 0,
+            'oco_rest_fills': 0,
+            'rules_triggered': 0,
+            'ticks': 0,
+            'swept_prices': 0,
+        }
+
+    # ── Wiring ──────────────────────────────────────────────────────────────
+
+    def set_handlers(self, oco: Callable = None, price: Dict[str, Callable] = None,
+                     price_source: Callable = None):
+        """
+        oco(partner_id, filled_id, details) -> None
+        price[kind](key, rule, price) -> bool  (True = rule finished, drop it)
+        price_source(symbol_root) -> float|None  (used only for silent symbols)
+        """
+        if oco:
+            self._oco_handler = oco
+        if price:
+            self._price_handlers.update(price)
+        if price_source:
+            self._price_source = price_source
+
+    def start(self):
+        """Restore persisted registrations and start the stale-price sweep. Idempotent."""
+        if self._started:
+            return
+        self._started = True
+        self._restore()
+        threading.Thread(target=self._sweep_loop, daemon=True, name='order-events-sweep').start()
+        logger.info(f"Order event engine started: {len(self._oco) // 2} OCO pairs, "
+                    f"{len(self._rules)} price rules restored")
+
+    def attach_token_groups(self, groups: List[dict]):
+        """Register one OrderEventListener per Tradovate token group."""
+        if not WS_MANAGER_AVAILABLE:
+            return
+        manager = get_connection_manager()
+        for group in groups:
+            token_key = group['token_key']
+            if token_key in self._listeners:
+                continue
+            listener = OrderEventListener(self, token_key)
+            self._listeners[token_key] = listener
+            manager.register_listener(
+                token=group['access_token'],
+                is_demo=group['is_demo'],
+                subaccount_ids=group['subaccount_ids'],
+                listener=listener,
+                db_account_ids=group['account_db_ids'],
+            )
+        logger.info(f"Order event engine: {len(self._listeners)} listener(s) on shared connections")
+
+    def has_live_socket(self, account_id) -> bool:
+        """True when one of our listeners is subscribed to this subaccount on a live WebSocket
+        (another listener's socket covering the account does not deliver order events here)."""
+        if not WS_MANAGER_AVAILABLE or not self._listeners:
+            return False
+        try:
+            account_id = int(account_id)
+        except (TypeError, ValueError):
+            return False
+        manager = get_connection_manager()
+        return any(manager.is_listening(listener.listener_id, account_id)
+                   for listener in list(self._listeners.values()))
+
+    def _restore(self):
+        try:
+            for order_id, details in redis_get_oco_details().items():
+                details = dict(details)
+                details.setdefault('created_at', time.time())
+                self._oco[int(order_id)] = details
+            for key, rule in redis_get_break_even_monitors().items():
+                rule.setdefault('kind', 'be')
+                if rule.get('symbol_root') and not rule.get('triggered'):
+                    self._index_rule(key, rule)
+                    if any(field in rule for field in _RULE_SECRETS):
+                        # Rules persisted before credentials were looked up at trigger time
+                        for field in _RULE_SECRETS:
+                            rule.pop(field, None)
+                        redis_register_break_even(key, rule)
+        except Exception as e:
+            logger.warning(f"Order event engine restore failed: {e}")
+
+    # ── OCO ─────────────────────────────────────────────────────────────────
+
+    def register_oco(self, tp_order_id: int, sl_order_id: int, account_id: int, symbol: str):
+        now = time.time()
+        with self._lock:
+            self._oco[tp_order_id] = {'account_id': account_id, 'symbol': symbol, 'type': 'tp',
+                                      'partner_id': sl_order_id, 'created_at': now}
+            self._oco[sl_order_id] = {'account_id': account_id, 'symbol': symbol, 'type': 'sl',
+                                      'partner_id': tp_order_id, 'created_at': now}
+        redis_register_oco(tp_order_id, sl_order_id, account_id, symbol)
+
+    def unregister_oco(self, order_id: int):
+        with self._lock:
+            details = self._oco.pop(order_id, None)
+            if details:
+                self._oco.pop(details.get('partner_id'), None)
+        if details:
+            redis_remove_oco(order_id)
+
+    def get_oco_snapshot(self) -> Dict[int, dict]:
+        with self._lock:
+            return {oid: dict(d) for oid, d in self._oco.items()}
+
+    def handle_order_filled(self, order_id, source: str = 'ws'):
+        """One OCO leg filled: drop the pair and cancel the partner off-loop."""
+        try:
+            order_id = int(order_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            details = self._oco.get(order_id)
+            if not details:
+                return
+        self.unregister_oco(order_id)
+        self.stats['oco_ws_fills' if source == 'ws' else 'oco_rest_fills'] += 1
+        partner_id = details.get('partner_id')
+        logger.info(f"🎯 OCO: {details.get('type', '?').upper()} order {order_id} FILLED for "
+                    f"{details.get('symbol')} (account {details.get('account_id')}, via {source}) "
+                    f"— cancelling partner {partner_id}")
+        if self._oco_handler and partner_id:
+            self._executor.submit(self._safe_call, self._oco_handler, partner_id, order_id, details)
+
+    def on_order_event(self, entity: dict):
+        order_id = entity.get('id')
+        status = str(entity.get('ordStatus', '')).lower()
+        if order_id is None or order_id not in self._oco:
+            return
+        if status == 'filled':
+            self.handle_order_filled(order_id, source='ws')
+        elif status in _DEAD_ORDER_STATUSES:
+            self.unregister_oco(order_id)
+
+    def on_fill_event(self, entity: dict):
+        order_id = entity.get('orderId')
+        if order_id is not None and order_id in self._oco:
+            self.handle_order_filled(order_id, source='ws')
+
+    def on_position_event(self, entity: dict):
+        """Flat position → drop Tradovate break-even rules for that account."""
+        if entity.get('netPos', 0) != 0:
+            return
+        account_id = entity.get('accountId')
+        with self._lock:
+            stale = [k for k, r in self._rules.items()
+                     if r.get('kind') == 'be' and r.get('account_id') == account_id
+                     and k not in self._inflight]
+        for key in stale:
+            logger.info(f"📊 Break-even rule {key} dropped: position flat")
+            self.unregister_rule(key)
+
+    # ── Price rules ─────────────────────────────────────────────────────────
+
+    def register_rule(self, key: str, kind: str, rule: dict):
+        """rule needs symbol_root, entry_price, is_long, tick_size, activation_ticks (+ kind-specific fields)."""
+        rule = dict(rule, kind=kind, created_at=rule.get('created_at', time.time()))
+        with self._lock:
+            self._index_rule(key, rule)
+        redis_register_break_even(key, rule)
+
+    def update_rule(self, key: str, **fields):
+        with self._lock:
+            rule = self._rules.get(key)
+            if not rule:
+                return
+            rule.update(fields)
+            snapshot = dict(rule)
+        redis_register_break_even(key, snapshot)
+
+    def unregister_rule(self, key: str):
+        with self._lock:
+            rule = self._rules.pop(key, None)
+            if rule:
+                keys = self._rules_by_symbol.get(rule['symbol_root'])
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        self._rules_by_symbol.pop(rule['symbol_root'], None)
+        if rule:
+            redis_remove_break_even(key)
+
+    def get_rules_snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {k: dict(r) for k, r in self._rules.items()}
+
+    def _index_rule(self, key: str, rule: dict):
+        self._rules[key] = rule
+        self._rules_by_symbol.setdefault(rule['symbol_root'], set()).add(key)
+
+    def on_price(self, symbol_root: str, price: float):
+        """Evaluate every rule on this symbol against a new tick."""
+        if not price or symbol_root not in self._rules_by_symbol:
+            return
+        now = time.time()
+        self._last_tick[symbol_root] = now
+        self.stats['ticks'] += 1
+        fire = []
+        with self._lock:
+            for key in list(self._rules_by_symbol.get(symbol_root, ())):
+                rule = self._rules.get(key)
+                if rule is None or key in self._inflight or rule.get('cooldown_until', 0) > now:
+                    continue
+                if self._evaluate(rule, price):
+                    self._inflight.add(key)
+                    fire.append((key, dict(rule)))
+        for key, rule in fire:
+            self.stats['rules_triggered'] += 1
+            self._executor.submit(self._run_rule, key, rule, price)
+
+    def _evaluate(self, rule: dict, price: float) -> bool:
+        """Pure rule math (called under lock). Returns True when the rule should act."""
+        tick_size = rule['tick_size']
+        entry = rule['entry_price']
+        is_long = rule['is_long']
+
+        if rule['kind'] in ('be', 'px_be'):
+            profit_ticks = (price - entry) / tick_size if is_long else (entry - price) / tick_size
+            return profit_ticks >= rule['activation_ticks']
+
+        if rule['kind'] == 'px_trail':
+            best = rule.get('best_price', entry)
+            if (is_long and price > best) or (not is_long and price < best):
+                rule['best_price'] = best = price
+            if not rule.get('trail_active'):
+                profit_ticks = (best - entry) / tick_size if is_long else (entry - best) / tick_size
+                if profit_ticks < rule['activation_ticks']:
+                    return False
+                rule['trail_active'] = True
+                logger.info(f"🎯 ProjectX trailing ACTIVATED: {rule['symbol_root']} "
+                            f"({profit_ticks:.1f} >= {rule['activation_ticks']} ticks)")
+            distance = rule['offset_ticks'] * tick_size
+            new_sl = best - distance if is_long else best + distance
+            new_sl = round(round(new_sl / tick_size) * tick_size, 10)
+            last_sl = rule.get('last_sl_price')
+            freq = rule.get('frequency_ticks') or 0
+            if last_sl is None:
+                pass
+            elif is_long and new_sl > last_sl:
+                if freq and (new_sl - last_sl) / tick_size < freq:
+                    return False
+            elif not is_long and new_sl < last_sl:
+                if freq and (last_sl - new_sl) / tick_size < freq:
+                    return False
+            else:
+                return False
+            rule['pending_sl_price'] = new_sl
+            return True
+
+        return False
+
+    def _run_rule(self, key: str, rule: dict, price: float):
+        handler = self._price_handlers.get(rule['kind'])
+        finished = False
+        try:
+            if handler:
+                finished = bool(handler(key, rule, price))
+        except Exception as e:
+            logger.warning(f"Order event rule {key} action error: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+                if key in self._rules:
+                    self._rules[key]['cooldown_until'] = time.time() + self.ACTION_COOLDOWN
+            if finished:
+                self.unregister_rule(key)
+
+    # ── Stale-price sweep ───────────────────────────────────────────────────
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.SWEEP_INTERVAL)
+            try:
+                now = time.time()
+                with self._lock:
+                    symbols = list(self._rules_by_symbol)
+                    expired = [k for k, r in self._rules.items()
+                               if r.get('kind') == 'px_trail' and now - r.get('created_at', now) > self.MAX_TRAIL_AGE]
+                for key in expired:
+                    logger.info(f"🧹 ProjectX trailing monitor expired (24h): {key}")
+                    self.unregister_rule(key)
+                if not self._price_source:
+                    continue
+                for symbol_root in symbols:
+                    if now - self._last_tick.get(symbol_root, 0) < self.STALE_TICK_SECONDS:
+                        continue
+                    price = self._price_source(symbol_root)
+                    if price:
+                        self.stats['swept_prices'] += 1
+                        self.on_price(symbol_root, float(price))
+            except Exception as e:
+                logger.error(f"Order event sweep error: {e}")
+
+    @staticmethod
+    def _safe_call(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Order event action error: {e}")
+
+    def get_status(self) -> dict:
+        with self._lock:
+            kinds = {}
+            for r in self._rules.values():
+                kinds[r['kind']] = kinds.get(r['kind'], 0) + 1
+            return {
+                'oco_pairs': len(self._oco) // 2,
+                'rules': kinds,
+                'inflight': len(self._inflight),
+                'listeners': sorted(self._listeners),
+                **self.stats,
+            }
+
+
+_engine_instance = None
+_engine_lock = threading.Lock()
+
+
+def get_order_event_engine() -> OrderEventEngine:
+    """Get the singleton OrderEventEngine instance."""
+    global _engine_instance
+    if _engine_instance is None:
+        with _engine_lock:
+            if _engine_instance is None:
+                _engine_instance = OrderEventEngine()
+    return _engine_instance
@@ -7,8 +7,11 @@ Uses DATABASE_URL env var (same as production). Falls back to SQLite for local d
 
 import os
 import json
+import time
+import atexit
 import logging
 import threading
+from collections import deque
 from datetime import datetime
 from contextlib import contextmanager
 
@@ -189,77 +192,24 @@ class PaperTradeDB:
         """Placeholder: %s for PostgreSQL, ? for SQLite."""
         return '%s' if self._use_pg else '?'
 
-    def upsert_trade(self, trade, account="default", user_id=None):
-        """Insert or update a paper trade record."""
-        ph = self._ph()
-        legs_json = json.dumps(trade.get('legs', []))
-
-        # Use ON CONFLICT for upsert
-        if self._use_pg:
-            sql = f"""
-                INSERT INTO paper_trades_v3 (
-                    id, account, symbol, side, qty, avg_entry, exit_price,
-                    strategy_id, comment, exit_comment,
-                    realized_pnl, gross_pnl, commission, unrealized_pnl,
-                    mae_points, mfe_points, mae_ticks, mfe_ticks,
-                    mae_dollars, mfe_dollars, mae_price, mfe_price,
-                    capture_ratio, efficiency, tick_count, highest_seen, lowest_seen,
-                    hold_time_seconds, tp, sl, trail_points,
-                    entry_time, exit_time, legs, status, source, user_id
-                ) VALUES (
-                    {ph},{ph},{ph},{ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},
-                    {ph},{ph},{ph},{ph},{ph},{ph}
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    exit_price=EXCLUDED.exit_price,
-                    realized_pnl=EXCLUDED.realized_pnl,
-                    gross_pnl=EXCLUDED.gross_pnl,
-                    commission=EXCLUDED.commission,
-                    unrealized_pnl=EXCLUDED.unrealized_pnl,
-                    mae_points=EXCLUDED.mae_points, mfe_points=EXCLUDED.mfe_points,
-                    mae_ticks=EXCLUDED.mae_ticks, mfe_ticks=EXCLUDED.mfe_ticks,
-                    mae_dollars=EXCLUDED.mae_dollars, mfe_dollars=EXCLUDED.mfe_dollars,
-                    mae_price=EXCLUDED.mae_price, mfe_price=EXCLUDED.mfe_price,
-                    capture_ratio=EXCLUDED.capture_ratio, efficiency=EXCLUDED.efficiency,
-                    tick_count=EXCLUDED.tick_count,
-                    highest_seen=EXCLUDED.highest_seen, lowest_seen=EXCLUDED.lowest_seen,
-                    hold_time_seconds=EXCLUDED.hold_time_seconds,
-                    exit_time=EXCLUDED.exit_time,
-                    exit_comment=EXCLUDED.exit_comment,
-                    legs=EXCLUDED.legs, status=EXCLUDED.status,
-                    qty=EXCLUDED.qty, avg_entry=EXCLUDED.avg_entry,
-                    user_id=EXCLUDED.user_id
-            """
-        else:
-            sql = """
-                INSERT OR REPLACE INTO paper_trades_v3 (
-                    id, account, symbol, side, qty, avg_entry, exit_price,
-                    strategy_id, comment, exit_comment,
-                    realized_pnl, gross_pnl, commission, unrealized_pnl,
-                    mae_points, mfe_points, mae_ticks, mfe_ticks,
-                    mae_dollars, mfe_dollars, mae_price, mfe_price,
-                    capture_ratio, efficiency, tick_count, highest_seen, lowest_seen,
-                    hold_time_seconds, tp, sl, trail_points,
-                    entry_time, exit_time, legs, status, source, user_id
-                ) VALUES (
-                    ?,?,?,?,?,?,?,
-                    ?,?,?,
-                    ?,?,?,?,
-                    ?,?,?,?,
-                    ?,?,?,?,
-                    ?,?,?,?,?,
-                    ?,?,?,?,
-                    ?,?,?,?,?,?
-                )
-            """
-
-        params = (
+    # Column order shared by every upsert (37 columns)
+    _UPSERT_COLUMNS = (
+        'id', 'account', 'symbol', 'side', 'qty', 'avg_entry', 'exit_price',
+        'strategy_id', 'comment', 'exit_comment',
+        'realized_pnl', 'gross_pnl', 'commission', 'unrealized_pnl',
+        'mae_points', 'mfe_points', 'mae_ticks', 'mfe_ticks',
+        'mae_dollars', 'mfe_dollars', 'mae_price', 'mfe_price',
+        'capture_ratio', 'efficiency', 'tick_count', 'highest_seen', 'lowest_seen',
+        'hold_time_seconds', 'tp', 'sl', 'trail_points',
+        'entry_time', 'exit_time', 'legs', 'status', 'source', 'user_id',
+    )
+    # Rows per statement: keeps SQLite under its 999 bound-variable limit
+    _UPSERT_BATCH_PG = 500
+    _UPSERT_BATCH_SQLITE = 25
+
+    @staticmethod
+    def _trade_params(trade, account, user_id):
+        return (
             trade.get('id'),
             account,
             trade.get('symbol'),
@@ -293,14 +243,64 @@ class PaperTradeDB:
             trade.get('trail_points'),
             trade.get('entry_time'),
             trade.get('exit_time'),
-            legs_json,
+            json.dumps(trade.get('legs', [])),
             trade.get('status', 'open'),
             trade.get('source', 'webhook'),
             user_id,
         )
 
+    def upsert_trade(self, trade, account="default", user_id=None):
+        """Insert or update a paper trade record."""
+        self.upsert_trades([(trade, account, user_id)])
+
+    def upsert_trades(self, rows):
+        """
+        Insert or update many paper trades with multi-row INSERT statements.
+        rows: iterable of (trade, account, user_id). Trade ids must be unique
+        within one call (PostgreSQL rejects a row conflicting twice).
+        """
+        params = [self._trade_params(t, a, u) for t, a, u in rows]
+        if not params:
+            return
+        ph = self._ph()
+        columns = ', '.join(self._UPSERT_COLUMNS)
+        row_ph = '(' + ','.join([ph] * len(self._UPSERT_COLUMNS)) + ')'
+
+        if self._use_pg:
+            batch = self._UPSERT_BATCH_PG
+            prefix = f"INSERT INTO paper_trades_v3 ({columns}) VALUES "
+            suffix = """
+                ON CONFLICT (id) DO UPDATE SET
+                    exit_price=EXCLUDED.exit_price,
+                    realized_pnl=EXCLUDED.realized_pnl,
+                    gross_pnl=EXCLUDED.gross_pnl,
+                    commission=EXCLUDED.commission,
+                    unrealized_pnl=EXCLUDED.unrealized_pnl,
+                    mae_points=EXCLUDED.mae_points, mfe_points=EXCLUDED.mfe_points,
+                    mae_ticks=EXCLUDED.mae_ticks, mfe_ticks=EXCLUDED.mfe_ticks,
+                    mae_dollars=EXCLUDED.mae_dollars, mfe_dollars=EXCLUDED.mfe_dollars,
+                    mae_price=EXCLUDED.mae_price, mfe_price=EXCLUDED.mfe_price,
+                    capture_ratio=EXCLUDED.capture_ratio, efficiency=EXCLUDED.efficiency,
+                    tick_count=EXCLUDED.tick_count,
+                    highest_seen=EXCLUDED.highest_seen, lowest_seen=EXCLUDED.lowest_seen,
+                    hold_time_seconds=EXCLUDED.hold_time_seconds,
+                    exit_time=EXCLUDED.exit_time,
+                    exit_comment=EXCLUDED.exit_comment,
+                    legs=EXCLUDED.legs, status=EXCLUDED.status,
+                    qty=EXCLUDED.qty, avg_entry=EXCLUDED.avg_entry,
+                    user_id=EXCLUDED.user_id
+            """
+        else:
+            batch = self._UPSERT_BATCH_SQLITE
+            prefix = f"INSERT OR REPLACE INTO paper_trades_v3 ({columns}) VALUES "
+            suffix = ""
+
         with self._lock, self._conn() as conn:
-            conn.cursor().execute(sql, params)
+            cur = conn.cursor()
+            for i in range(0, len(params), batch):
+                chunk = params[i:i + batch]
+                sql = prefix + ','.join([row_ph] * len(chunk)) + suffix
+                cur.execute(sql, [v for row in chunk for v in row])
 
     def load_history(self, account="default", limit=200, user_id=None):
         """Load closed trades from DB. Filter by user_id if provided."""
@@ -388,6 +388,127 @@ class PaperTradeDB:
         return dict(row)
 
 
+# ─── Write-behind persistence ──────────────────────────────────────────────────
+
+class PaperWriteBehind:
+    """
+    Single background writer for paper trade upserts.
+    Updates are keyed by trade id, so a burst of open → partial → close
+    updates for one trade coalesces into the latest snapshot, and everything
+    pending is written with one multi-row upsert per flush. When that upsert
+    fails the rows are retried one at a time, so a bad row cannot hold back
+    the others; a row that fails MAX_ATTEMPTS writes is dead-lettered (logged
+    and kept in dead_letters) instead of being retried forever.
+    """
+
+    FLUSH_INTERVAL = 0.25   # seconds to gather a batch after the first enqueue
+    RETRY_DELAY = 2.0       # seconds to back off after a failed flush (doubles while failing)
+    MAX_RETRY_DELAY = 60.0
+    MAX_ATTEMPTS = 10       # failed writes before a row is dead-lettered
+
+    def __init__(self, db):
+        self.db = db
+        self._cond = threading.Condition()
+        self._pending = {}          # trade id -> (trade, account, user_id)
+        self._attempts = {}         # trade id -> failed writes of its pending snapshot
+        self._failed_flushes = 0
+        self.dead_letters = deque(maxlen=100)
+        self._stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'flushed_rows': 0,
+            'flushes': 0,
+            'failures': 0,
+            'dead_lettered': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'last_flush_at': None,
+            'last_error': None,
+        }
+        self._thread = threading.Thread(target=self._run, daemon=True, name="paper-write-behind")
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def enqueue(self, trade, account="default", user_id=None):
+        """Queue a trade snapshot; replaces any pending snapshot for the same id."""
+        with self._cond:
+            self._stats['enqueued'] += 1
+            if trade.get('id') in self._pending:
+                self._stats['coalesced'] += 1
+            self._pending[trade.get('id')] = (trade, account, user_id)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self.FLUSH_INTERVAL)
+            if self.flush():
+                self._failed_flushes = 0
+            else:
+                self._failed_flushes += 1
+                time.sleep(min(self.RETRY_DELAY * 2 ** (self._failed_flushes - 1), self.MAX_RETRY_DELAY))
+
+    def flush(self):
+        """Write everything pending now. Returns False if any row is left to retry."""
+        with self._cond:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, {}
+
+        start = time.perf_counter()
+        failed = {}                 # trade id -> (row, error)
+        try:
+            self.db.upsert_trades(batch.values())
+        except Exception as e:
+            if len(batch) == 1:
+                failed = {trade_id: (row, e) for trade_id, row in batch.items()}
+            else:
+                logger.warning(f"[PaperPipeline] DB persist failed ({len(batch)} trades), retrying row by row: {e}")
+                for trade_id, row in batch.items():
+                    try:
+                        self.db.upsert_trades([row])
+                    except Exception as row_error:
+                        failed[trade_id] = (row, row_error)
+            if failed:
+                logger.error(f"[PaperPipeline] {len(failed)} of {len(batch)} trades not persisted: {e}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            for trade_id in batch:
+                if trade_id not in failed:
+                    self._attempts.pop(trade_id, None)
+            for trade_id, (row, error) in failed.items():
+                attempts = self._attempts.get(trade_id, 0) + 1
+                self._stats['last_error'] = str(error)[:200]
+                if trade_id in self._pending:
+                    # A newer snapshot arrived meanwhile and replaces this one
+                    self._attempts[trade_id] = attempts
+                elif attempts >= self.MAX_ATTEMPTS:
+                    self._attempts.pop(trade_id, None)
+                    self._stats['dead_lettered'] += 1
+                    self.dead_letters.append({'trade': row[0], 'account': row[1], 'user_id': row[2],
+                                              'error': str(error)[:200], 'at': datetime.now().isoformat()})
+                    logger.error(f"[PaperPipeline] Trade {trade_id} dead-lettered after {attempts} failed writes: "
+                                 f"{json.dumps(row[0], default=str)[:500]} ({error})")
+                else:
+                    self._attempts[trade_id] = attempts
+                    self._pending[trade_id] = row
+            if failed:
+                self._stats['failures'] += 1
+            self._stats['flushes'] += 1
+            self._stats['flushed_rows'] += len(batch) - len(failed)
+            self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 2)
+            self._stats['last_flush_at'] = datetime.now().isoformat()
+        return not failed
+
+    def get_stats(self):
+        with self._cond:
+            return {'queue_depth': len(self._pending), **self._stats}
+
+
 # ─── The Pipeline ──────────────────────────────────────────────────────────────
 
 class PaperPipeline:
@@ -398,6 +519,7 @@ class PaperPipeline:
 
     def __init__(self, socketio=None, broadcast_namespace="/paper"):
         self.db = PaperTradeDB()
+        self.writer = PaperWriteBehind(self.db)
         self.engine = PaperTradingEngine(socketio=None, broadcast_namespace=broadcast_namespace)
         self.socketio = socketio
         self.namespace = broadcast_namespace
@@ -438,26 +560,14 @@ class PaperPipeline:
             original_close(account, symbol, exit_price, comment)
             if self.engine._history:
                 trade = dict(self.engine._history[-1])  # copy for thread safety
-                uid = _extract_user_id(account)
-                def _persist():
-                    try:
-                        self.db.upsert_trade(trade, account, user_id=uid)
-                    except Exception as e:
-                        logger.error(f"[PaperPipeline] DB persist failed: {e}")
-                threading.Thread(target=_persist, daemon=True).start()
+                self.writer.enqueue(trade, account, user_id=_extract_user_id(account))
             self._broadcast(account)
 
         def patched_partial(account, symbol, close_qty, exit_price, comment=""):
             original_partial(account, symbol, close_qty, exit_price, comment)
             if self.engine._history:
                 trade = dict(self.engine._history[-1])
-                uid = _extract_user_id(account)
-                def _persist():
-                    try:
-                        self.db.upsert_trade(trade, account, user_id=uid)
-                    except Exception as e:
-                        logger.error(f"[PaperPipeline] DB persist failed: {e}")
-                threading.Thread(target=_persist, daemon=True).start()
+                self.writer.enqueue(trade, account, user_id=_extract_user_id(account))
             self._broadcast(account)
 
         self.engine._close_position_locked = patched_close
@@ -474,19 +584,13 @@ class PaperPipeline:
             payload = dict(payload, account=account)
         result = self.engine.on_signal(payload)
 
-        # Persist open position to DB in background (so we have a record before close)
+        # Persist open position via the write-behind queue (so we have a record before close)
         symbol = str(payload.get("ticker", payload.get("symbol", ""))).upper()
         pos = self.engine._get_position(account, symbol)
         if pos is not None and pos.get("status") == "open":
             trade_record = {k: v for k, v in pos.items() if not k.startswith('_')}
             trade_record['unrealized_pnl'] = pos.get('unrealized_pnl', 0)
-            uid = user_id  # capture for closure
-            def _persist_open():
-                try:
-                    self.db.upsert_trade(trade_record, account, user_id=uid)
-                except Exception as e:
-                    logger.error(f"[PaperPipeline] open position persist failed: {e}")
-            threading.Thread(target=_persist_open, daemon=True).start()
+            self.writer.enqueue(trade_record, account, user_id=user_id)
 
         self._broadcast(account)
         return {**result, "account": account, "symbol": symbol}
@@ -524,7 +628,9 @@ class PaperPipeline:
     # ── State access ────────────────────────────────────────────────────────
 
     def get_state(self, account="default"):
-        return self.engine.get_state(account)
+        state = self.engine.get_state(account)
+        state['persistence'] = self.writer.get_stats()
+        return state
 
     def get_analysis(self, account="default", strategy_id=None):
         return self.engine.get_mae_mfe_analysis(account, strategy_id=strategy_id)
@@ -0,0 +1,394 @@
+"""
+Bulk lead enrichment
+====================
+Enriching a lead export (e.g. "Leads-All Leads.csv") used to mean calling
+verify_email / search_clearbit_enrichment one lead at a time and saving the
+result through DataManager, so thousands of leads took hours and any failure
+started the whole run over.
+
+EnrichmentPipeline:
+- load():   dedups leads up front by normalized email (else LinkedIn URL, else
+            name + domain) and bulk-inserts them into enrichment_leads.
+- run():    enriches pending leads in batches on a thread pool; every finished
+            batch is written back with one executemany + commit, so a crashed or
+            interrupted job resumes from the last checkpoint with the same job_id.
+- export(): streams the enriched rows to CSV or Parquet in chunks without
+            loading the whole job into memory.
+
+CLI:
+    python -m core.enrichment "Leads-All Leads.csv" --job leads-oct --out enriched.csv
+    python -m core.enrichment "Leads-All Leads.csv" --job leads-oct --out enriched.parquet   # resumes
+"""
+
+import csv
+import json
+import re
+import sqlite3
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Enricher = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+# Column names used by the scrapers and by the Airtable lead export
+EMAIL_FIELDS = ('email', 'Contact Email', 'contact_email')
+LINKEDIN_FIELDS = ('linkedin', 'profile_url', 'Contact LinkedIN', 'linkedin_url')
+NAME_FIELDS = ('name', 'Contact Full Name', 'full_name')
+DOMAIN_FIELDS = ('domain', 'Domain', 'company_domain', 'website')
+
+INSERT_CHUNK = 1000
+EXPORT_CHUNK = 1000
+
+
+def normalize_domain(value: Any) -> str:
+    """'https://www.Example.com/about' -> 'example.com'"""
+    domain = str(value or '').strip().lower()
+    domain = re.sub(r'^[a-z]+://', '', domain)
+    domain = domain.split('/')[0].split('?')[0].split(':')[0]
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain.rstrip('.')
+
+
+def normalize_email(value: Any) -> str:
+    """'John.Doe+leads@WWW.Example.com ' -> 'john.doe@example.com' ('' if not an email)"""
+    email = str(value or '').strip().lower()
+    local, sep, domain = email.rpartition('@')
+    if not sep or not local or not domain:
+        return ''
+    return f"{local.split('+', 1)[0]}@{normalize_domain(domain)}"
+
+
+def _first(lead: Dict[str, Any], fields: Iterable[str]) -> str:
+    for field in fields:
+        value = lead.get(field)
+        if value is not None and str(value).strip() and str(value).strip().lower() != 'nan':
+            return str(value).strip()
+    return ''
+
+
+def lead_key(lead: Dict[str, Any]) -> str:
+    """Identity used for dedup and checkpointing"""
+    email = normalize_email(_first(lead, EMAIL_FIELDS))
+    if email:
+        return f"email:{email}"
+    linkedin = _first(lead, LINKEDIN_FIELDS).lower()
+    if linkedin:
+        linkedin = re.sub(r'^[a-z]+://(www\.)?', '', linkedin).rstrip('/')
+        return f"linkedin:{linkedin}"
+    name = ' '.join(_first(lead, NAME_FIELDS).lower().split())
+    domain = normalize_domain(_first(lead, DOMAIN_FIELDS))
+    if name or domain:
+        return f"name:{name}@{domain}"
+    return "row:" + hashlib.sha1(json.dumps(lead, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def dedup_leads(leads: Iterable[Dict[str, Any]]) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    """(key, lead) in first-seen order; later duplicates only fill fields the first one left blank"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    duplicates = 0
+    for lead in leads:
+        key = lead_key(lead)
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = dict(lead)
+            continue
+        duplicates += 1
+        for field, value in lead.items():
+            if not _first(existing, (field,)) and _first(lead, (field,)):
+                existing[field] = value
+    return list(merged.items()), duplicates
+
+
+def flatten(lead: Dict[str, Any], enrichment: Dict[str, Any]) -> Dict[str, Any]:
+    """Lead columns plus one '<enricher>.<field>' column per enrichment value"""
+    row = dict(lead)
+    for name, result in (enrichment or {}).items():
+        if isinstance(result, dict):
+            for field, value in result.items():
+                row[f"{name}.{field}"] = json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+        elif result is not None:
+            row[name] = json.dumps(result, default=str) if isinstance(result, list) else result
+    return row
+
+
+class EnrichmentPipeline:
+    def __init__(self, db_path: str = "phantom_scraper.db", batch_size: int = 50, workers: int = 8):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_database(self):
+        """Create enrichment tables"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS enrichment_jobs (
+                job_id TEXT PRIMARY KEY,
+                source TEXT,
+                total INTEGER DEFAULT 0,
+                duplicates INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'loaded',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS enrichment_leads (
+                job_id TEXT NOT NULL,
+                lead_key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                enrichment TEXT,
+                status TEXT DEFAULT 'pending',
+                error TEXT,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (job_id, lead_key)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_enrichment_leads_status ON enrichment_leads (job_id, status, position)')
+
+        conn.commit()
+        conn.close()
+
+    def load(self, job_id: str, leads: Iterable[Dict[str, Any]], source: str = "") -> Dict[str, Any]:
+        """Dedup and bulk-insert leads for a new job. An existing job is left as is (resume)."""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM enrichment_jobs WHERE job_id = ?', (job_id,))
+            if cursor.fetchone():
+                self.logger.info(f"Enrichment job {job_id} already loaded; resuming")
+                return self.progress(job_id)
+
+            unique, duplicates = dedup_leads(leads)
+            rows = [(job_id, key, position, json.dumps(lead, default=str))
+                    for position, (key, lead) in enumerate(unique)]
+            for i in range(0, len(rows), INSERT_CHUNK):
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO enrichment_leads (job_id, lead_key, position, data)
+                    VALUES (?, ?, ?, ?)
+                ''', rows[i:i + INSERT_CHUNK])
+            cursor.execute('''
+                INSERT INTO enrichment_jobs (job_id, source, total, duplicates)
+                VALUES (?, ?, ?, ?)
+            ''', (job_id, source, len(unique), duplicates))
+            conn.commit()
+            self.logger.info(f"Enrichment job {job_id}: {len(unique)} leads loaded, {duplicates} duplicates dropped")
+        finally:
+            conn.close()
+        return self.progress(job_id)
+
+    def run(self, job_id: str, enrichers: Dict[str, Enricher], retry_errors: bool = False,
+            on_batch: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Enrich every pending lead; each batch is committed as one checkpoint"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            if retry_errors:
+                cursor.execute("UPDATE enrichment_leads SET status = 'pending' WHERE job_id = ? AND status = 'error'",
+                               (job_id,))
+            cursor.execute("UPDATE enrichment_jobs SET status = 'running', updated_at = ? WHERE job_id = ?",
+                           (datetime.now().isoformat(), job_id))
+            conn.commit()
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    cursor.execute('''
+                        SELECT lead_key, data FROM enrichment_leads
+                        WHERE job_id = ? AND status = 'pending'
+                        ORDER BY position
+                        LIMIT ?
+                    ''', (job_id, self.batch_size))
+                    batch = cursor.fetchall()
+                    if not batch:
+                        break
+
+                    leads = [json.loads(data) for _, data in batch]
+                    outcomes = list(executor.map(lambda lead: self._enrich_one(lead, enrichers), leads))
+                    now = datetime.now().isoformat()
+                    cursor.executemany('''
+                        UPDATE enrichment_leads SET enrichment = ?, status = ?, error = ?, updated_at = ?
+                        WHERE job_id = ? AND lead_key = ?
+                    ''', [(json.dumps(enrichment, default=str), status, error, now, job_id, key)
+                          for (key, _), (enrichment, status, error) in zip(batch, outcomes)])
+                    conn.commit()
+
+                    if on_batch:
+                        on_batch(self.progress(job_id))
+
+            cursor.execute("UPDATE enrichment_jobs SET status = 'completed', updated_at = ? WHERE job_id = ?",
+                           (datetime.now().isoformat(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.progress(job_id)
+
+    def _enrich_one(self, lead: Dict[str, Any], enrichers: Dict[str, Enricher]) -> Tuple[Dict[str, Any], str, Optional[str]]:
+        """Run every enricher on one lead. Exceptions mark the lead 'error' (retried with retry_errors)."""
+        enrichment = {}
+        errors = []
+        for name, enricher in enrichers.items():
+            try:
+                enrichment[name] = enricher(lead)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            return enrichment, 'error', '; '.join(errors)[:500]
+        return enrichment, 'done', None
+
+    def progress(self, job_id: str) -> Dict[str, Any]:
+        """Lead counts by status for a job"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT source, total, duplicates, status FROM enrichment_jobs WHERE job_id = ?', (job_id,))
+            job = cursor.fetchone()
+            if not job:
+                return {}
+            cursor.execute('SELECT status, COUNT(*) FROM enrichment_leads WHERE job_id = ? GROUP BY status', (job_id,))
+            counts = dict(cursor.fetchall())
+            return {
+                "job_id": job_id,
+                "source": job[0],
+                "total": job[1],
+                "duplicates": job[2],
+                "status": job[3],
+                "pending": counts.get('pending', 0),
+                "done": counts.get('done', 0),
+                "errors": counts.get('error', 0)
+            }
+        finally:
+            conn.close()
+
+    def iter_rows(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Flattened lead + enrichment rows in load order, fetched EXPORT_CHUNK at a time"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT data, enrichment, status FROM enrichment_leads
+                WHERE job_id = ? ORDER BY position
+            ''', (job_id,))
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK)
+                if not rows:
+                    break
+                for data, enrichment, status in rows:
+                    row = flatten(json.loads(data), json.loads(enrichment) if enrichment else {})
+                    row['enrichment_status'] = status
+                    yield row
+        finally:
+            conn.close()
+
+    def export(self, job_id: str, path: str, format: Optional[str] = None) -> str:
+        """Stream a job to CSV or Parquet (format defaults to the file extension)"""
+        format = format or ('parquet' if path.endswith('.parquet') else 'csv')
+
+        # First pass collects the column set (enrichers return different fields per lead)
+        columns: Dict[str, None] = {}
+        for row in self.iter_rows(job_id):
+            for column in row:
+                columns.setdefault(column, None)
+        columns = list(columns)
+
+        if format == "csv":
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+                writer.writeheader()
+                for row in self.iter_rows(job_id):
+                    writer.writerow(row)
+        elif format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+            schema = pa.schema([(column, pa.string()) for column in columns])
+            with pq.ParquetWriter(path, schema) as writer:
+                chunk = []
+                for row in self.iter_rows(job_id):
+                    chunk.append(row)
+                    if len(chunk) >= EXPORT_CHUNK:
+                        writer.write_table(self._arrow_table(pa, schema, columns, chunk))
+                        chunk = []
+                if chunk:
+                    writer.write_table(self._arrow_table(pa, schema, columns, chunk))
+        else:
+            raise ValueError(f"Unsupported format: {format}")
+
+        self.logger.info(f"Enrichment job {job_id} exported to {path}")
+        return path
+
+    @staticmethod
+    def _arrow_table(pa, schema, columns: List[str], rows: List[Dict[str, Any]]):
+        arrays = [pa.array([None if row.get(c) is None else str(row.get(c)) for row in rows], type=pa.string())
+                  for c in columns]
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def generator_enrichers(generator) -> Dict[str, Enricher]:
+    """verify_email / search_clearbit_enrichment of a RealLeadsGenerator as pipeline enrichers"""
+    from real_leads_scraper import CLEARBIT_API_KEY
+
+    def with_email(method):
+        def enrich(lead):
+            email = normalize_email(_first(lead, EMAIL_FIELDS))
+            if not email:
+                return None
+            result = method(email)
+            # Failures come back as {"error": ...}; raise so the lead is marked 'error' and retried
+            if isinstance(result, dict) and result.get("error"):
+                raise RuntimeError(result["error"])
+            return result
+        return enrich
+
+    enrichers = {"email_verification": with_email(generator.verify_email)}
+    if CLEARBIT_API_KEY != "your_clearbit_key_here":
+        enrichers["clearbit"] = with_email(generator.search_clearbit_enrichment)
+    return enrichers
+
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows of a CSV export (handles the BOM Airtable writes)"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+if __name__ == '__main__':
+    import argparse
+    from real_leads_scraper import RealLeadsGenerator
+
+    parser = argparse.ArgumentParser(description="Dedup, enrich and export a lead CSV (resumable)")
+    parser.add_argument('input', help="Lead CSV export")
+    parser.add_argument('--job', required=True, help="Job id; rerun with the same id to resume")
+    parser.add_argument('--out', required=True, help="Output .csv or .parquet")
+    parser.add_argument('--db', default="phantom_scraper.db")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--retry-errors', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    pipeline = EnrichmentPipeline(args.db, batch_size=args.batch_size, workers=args.workers)
+    print(f"📥 {pipeline.load(args.job, read_csv(args.input), source=args.input)}")
+
+    def report(progress):
+        print(f"✅ {progress['done']}/{progress['total']} enriched, {progress['errors']} errors")
+
+    pipeline.run(args.job, generator_enrichers(RealLeadsGenerator()), retry_errors=args.retry_errors,
+                 on_batch=report)
+    print(f"📤 Exported to {pipeline.export(args.job, args.out)}")
@@ -5,16 +5,16 @@ Uses Apollo, Clearbit, Hunter, and web scraping
 No complex LinkedIn setup required
 """
 
-import requests
 import json
 import time
 import csv
 import io
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, render_template_string, request, jsonify, send_file, Response
 from flask_cors import CORS
 import pandas as pd
 from datetime import datetime
 import base64
+from source_fetch import get_fetcher, iter_sources, stream_ndjson
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -29,6 +29,8 @@ class EasyScraper:
     def __init__(self):
         self.results = []
         self.search_history = []
+        # Shared rate-limited, disk-cached fetcher (drop-in for requests.get/post)
+        self.fetch = get_fetcher()
     
     def format_apollo_results(self, data):
         """Format Apollo.io results for better display"""
@@ -147,7 +149,7 @@ class EasyScraper:
                 "person_locations": ["United States", "Canada", "United Kingdom"]
             }
             
-            response = requests.post(url, headers=headers, json=data)
+            response = self.fetch.post(url, headers=headers, json=data)
             if response.status_code == 200:
                 return response.json()
             elif response.status_code == 403:
@@ -163,7 +165,7 @@ class EasyScraper:
             url = f"https://person.clearbit.com/v2/people/find?email={email}"
             headers = {"Authorization": f"Bearer {CLEARBIT_API_KEY}"}
             
-            response = requests.get(url, headers=headers)
+            response = self.fetch.get(url, headers=headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -182,7 +184,7 @@ class EasyScraper:
                 "api_key": HUNTER_API_KEY
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -201,7 +203,7 @@ class EasyScraper:
                 "premium_proxy": "true"
             }
             
-            response = requests.get(api_url, params=params)
+            response = self.fetch.get(api_url, params=params)
             if response.status_code == 200:
                 return {"content": response.text, "status": "success"}
             else:
@@ -228,7 +230,7 @@ class EasyScraper:
                 "sort": "followers"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 users = data.get("items", [])
@@ -240,7 +242,7 @@ class EasyScraper:
                         # Get full user profile
                         profile_url = user.get("url")
                         if profile_url:
-                            profile_response = requests.get(profile_url)
+                            profile_response = self.fetch.get(profile_url)
                             if profile_response.status_code == 200:
                                 profile_data = profile_response.json()
                                 detailed_users.append({
@@ -321,7 +323,7 @@ class EasyScraper:
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
             }
             
-            response = requests.get(url, params=params, headers=headers)
+            response = self.fetch.get(url, params=params, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 users = []
@@ -356,7 +358,7 @@ class EasyScraper:
                 "tags": "story"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 posts = []
@@ -392,7 +394,7 @@ class EasyScraper:
                 "pagesize": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 questions = []
@@ -516,68 +518,53 @@ class EasyScraper:
         except Exception as e:
             return {"error": f"Google Scholar search failed: {str(e)}"}
     
-    def run_comprehensive_search(self, query, search_type="all"):
-        """Run a comprehensive search across multiple sources"""
+    def _search_jobs(self, query, search_type):
+        """(source name, search callable) for every source this search type covers"""
+        # (search type, source name, label, search method)
+        sources = [
+            ("apollo", "apollo", "🔍 Apollo.io", self.search_apollo),
+            ("github", "github", "👨‍💻 GitHub", self.search_github_users),
+            ("reddit", "reddit", "🔴 Reddit", self.search_reddit_users),
+            ("hackernews", "hackernews", "📰 Hacker News", self.search_hackernews),
+            ("stackoverflow", "stackoverflow", "💻 Stack Overflow", self.search_stackoverflow),
+            ("medium", "medium", "📝 Medium", self.search_medium),
+            ("producthunt", "producthunt", "🚀 Product Hunt", self.search_producthunt),
+            ("scholar", "scholar", "🎓 Google Scholar", self.search_google_scholar),
+            ("companies", "companies", "🏢 companies", self.search_company_websites),
+            ("maps", "google_maps", "🗺️ Google Maps", self.search_google_maps),
+            ("website", "website", "🌐 website", self.scrape_website),
+        ]
+        jobs = []
+        for source_type, name, label, search in sources:
+            if search_type in ["all", source_type]:
+                print(f"{label} search for: {query}")
+                jobs.append((name, lambda search=search: search(query)))
+        return jobs
+    
+    def _add_source(self, results, name, data):
+        """Merge one finished source into the results"""
+        results["sources"][name] = data
+        if name == "apollo":
+            results["formatted_sources"]["apollo"] = self.format_apollo_results(data)
+        elif name == "github":
+            results["formatted_sources"]["github"] = self.format_github_results(data)
+    
+    def iter_comprehensive_search(self, query, search_type="all"):
+        """Run all sources concurrently; yield the merged results after each one finishes"""
         results = {
             "query": query,
             "timestamp": datetime.now().isoformat(),
             "sources": {},
             "formatted_sources": {}
         }
+        jobs = self._search_jobs(query, search_type)
+        results["pending"] = [name for name, _ in jobs]
+        yield results
         
-        if search_type in ["all", "apollo"]:
-            print(f"🔍 Searching Apollo.io for: {query}")
-            apollo_data = self.search_apollo(query)
-            results["sources"]["apollo"] = apollo_data
-            results["formatted_sources"]["apollo"] = self.format_apollo_results(apollo_data)
-        
-        if search_type in ["all", "github"]:
-            print(f"👨‍💻 Searching GitHub for: {query}")
-            github_data = self.search_github_users(query)
-            results["sources"]["github"] = github_data
-            results["formatted_sources"]["github"] = self.format_github_results(github_data)
-        
-        if search_type in ["all", "reddit"]:
-            print(f"🔴 Searching Reddit for: {query}")
-            reddit_data = self.search_reddit_users(query)
-            results["sources"]["reddit"] = reddit_data
-        
-        if search_type in ["all", "hackernews"]:
-            print(f"📰 Searching Hacker News for: {query}")
-            hn_data = self.search_hackernews(query)
-            results["sources"]["hackernews"] = hn_data
-        
-        if search_type in ["all", "stackoverflow"]:
-            print(f"💻 Searching Stack Overflow for: {query}")
-            so_data = self.search_stackoverflow(query)
-            results["sources"]["stackoverflow"] = so_data
-        
-        if search_type in ["all", "medium"]:
-            print(f"📝 Searching Medium for: {query}")
-            medium_data = self.search_medium(query)
-            results["sources"]["medium"] = medium_data
-        
-        if search_type in ["all", "producthunt"]:
-            print(f"🚀 Searching Product Hunt for: {query}")
-            ph_data = self.search_producthunt(query)
-            results["sources"]["producthunt"] = ph_data
-        
-        if search_type in ["all", "scholar"]:
-            print(f"🎓 Searching Google Scholar for: {query}")
-            scholar_data = self.search_google_scholar(query)
-            results["sources"]["scholar"] = scholar_data
-        
-        if search_type in ["all", "companies"]:
-            print(f"🏢 Searching companies for: {query}")
-            results["sources"]["companies"] = self.search_company_websites(query)
-        
-        if search_type in ["all", "maps"]:
-            print(f"🗺️ Searching Google Maps for: {query}")
-            results["sources"]["google_maps"] = self.search_google_maps(query)
-        
-        if search_type in ["all", "website"]:
-            print(f"🌐 Scraping website: {query}")
-            results["sources"]["website"] = self.scrape_website(query)
+        for name, data in iter_sources(jobs):
+            self._add_source(results, name, data)
+            results["pending"].remove(name)
+            yield results
         
         # Add to search history
         self.search_history.append({
@@ -588,7 +575,11 @@ class EasyScraper:
                                for data in results["formatted_sources"].values() 
                                if isinstance(data, dict))
         })
-        
+    
+    def run_comprehensive_search(self, query, search_type="all"):
+        """Run a comprehensive search across multiple sources"""
+        for results in self.iter_comprehensive_search(query, search_type):
+            pass
         return results
 
 # Initialize scraper
@@ -990,26 +981,26 @@ def index():
             
             try {
                 console.log('Making API request...');
-                const response = await fetch('/search', {
+                const response = await fetch('/search/stream', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ query, searchType })
                 });
                 
                 console.log('Response status:', response.status);
-                const data = await response.json();
-                console.log('Response data:', data);
-                currentResults = data;
+                if (!response.ok || !response.body) {
+                    const data = await response.json();
+                    throw new Error(data.error || `HTTP ${response.status}`);
+                }
                 
-                if (data.error) {
-                    console.error('API error:', data.error);
-                    document.getElementById('contactsContent').innerHTML = `<div class="error">❌ Error: ${data.error}</div>`;
-                } else {
-                    console.log('Search successful, displaying results...');
+                // Results are redrawn as each source finishes
+                await readResultStream(response, (data) => {
+                    currentResults = data;
                     displayResults(data);
-                    exportBtn.style.display = 'inline-block';
-                    loadStats(); // Refresh stats
-                }
+                });
+                console.log('Search successful');
+                exportBtn.style.display = 'inline-block';
+                loadStats(); // Refresh stats
             } catch (error) {
                 console.error('Fetch error:', error);
                 document.getElementById('contactsContent').innerHTML = `<div class="error">❌ Error: ${error.message}</div>`;
@@ -1019,6 +1010,24 @@ def index():
             }
         });
         
+        // Read a /search/stream response, calling onSnapshot with the merged results after each source
+        async function readResultStream(response, onSnapshot) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let newline;
+                while ((newline = buffer.indexOf('\\n')) >= 0) {
+                    const line = buffer.slice(0, newline);
+                    buffer = buffer.slice(newline + 1);
+                    if (line.trim()) onSnapshot(JSON.parse(line));
+                }
+            }
+        }
+        
         function displayResults(data) {
             console.log('Displaying results:', data); // Debug log
             
@@ -1221,6 +1230,19 @@ def search():
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Same search as /search, streamed as one JSON line per finished source"""
+    data = request.get_json() or {}
+    query = data.get('query', '')
+    search_type = data.get('searchType', 'all')
+    
+    if not query:
+        return jsonify({"error": "Query is required"})
+    
+    snapshots = scraper.iter_comprehensive_search(query, search_type)
+    return Response(stream_ndjson(snapshots), mimetype='application/x-ndjson')
+
 @app.route('/export/<search_id>')
 def export_results(search_id):
     """Export search results to CSV"""
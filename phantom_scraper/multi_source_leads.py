@@ -4,12 +4,12 @@ Multi-Source Lead Generator - Combines Multiple Free APIs
 Gets closer to Apollo.io quality by combining multiple data sources
 """
 
-import requests
 import json
 import time
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template_string, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime
+from source_fetch import get_fetcher, iter_sources, stream_ndjson
 
 app = Flask(__name__)
 CORS(app)
@@ -21,10 +21,8 @@ SCRAPINGBEE_API_KEY = "1DF3YNRNHU5IJ295DZSRVKWHEEP0C6AZXLE0HI6KP1O87LLUEQ88K3CFK
 
 class MultiSourceLeadGenerator:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        # Shared rate-limited, disk-cached fetcher (drop-in for requests.get)
+        self.fetch = get_fetcher()
     
     def search_hunter_contacts(self, domain, limit=20):
         """Get contacts from Hunter.io"""
@@ -36,7 +34,7 @@ class MultiSourceLeadGenerator:
                 "limit": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 contacts = []
@@ -72,7 +70,7 @@ class MultiSourceLeadGenerator:
             params = {"name": domain}
             headers = {"Authorization": f"Bearer {CLEARBIT_API_KEY}"}
             
-            response = requests.get(url, params=params, headers=headers)
+            response = self.fetch.get(url, params=params, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -102,7 +100,7 @@ class MultiSourceLeadGenerator:
                 "sort": "followers"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 employees = []
@@ -111,7 +109,7 @@ class MultiSourceLeadGenerator:
                     # Get detailed profile
                     profile_url = user.get("url")
                     if profile_url:
-                        profile_response = requests.get(profile_url)
+                        profile_response = self.fetch.get(profile_url)
                         if profile_response.status_code == 200:
                             profile_data = profile_response.json()
                             
@@ -166,7 +164,7 @@ class MultiSourceLeadGenerator:
                 "render_js": "false"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 # Parse HTML for contact information
                 # This is simplified - real implementation would parse HTML
@@ -181,13 +179,38 @@ class MultiSourceLeadGenerator:
             print(f"Website scraping error: {e}")
             return {}
     
-    def run_comprehensive_search(self, query):
-        """Run search across all available sources"""
+    def _search_jobs(self, domain, company_name):
+        """(source name, search callable) for every source"""
+        return [
+            ("hunter", lambda: self.search_hunter_contacts(domain)),
+            ("clearbit", lambda: self.search_clearbit_contacts(domain)),
+            ("github", lambda: self.search_github_company_employees(company_name)),
+            ("linkedin", lambda: self.search_linkedin_company_page(company_name)),
+            ("website", lambda: self.search_company_websites(domain)),
+        ]
+    
+    def _add_source(self, results, name, data):
+        """Merge one finished source into the results"""
+        if name == "hunter":
+            results["sources"]["hunter"] = {"contacts": data, "total": len(data)}
+        elif name == "github":
+            results["sources"]["github"] = {"employees": data, "total": len(data)}
+        else:
+            results["sources"][name] = data
+        
+        # Hunter contacts first, then GitHub, whatever order the sources finished in
+        results["all_contacts"] = (results["sources"].get("hunter", {}).get("contacts", []) +
+                                   results["sources"].get("github", {}).get("employees", []))
+        results["total_contacts"] = len(results["all_contacts"])
+    
+    def iter_comprehensive_search(self, query):
+        """Run all sources concurrently; yield the merged results after each one finishes"""
         results = {
             "query": query,
             "timestamp": datetime.now().isoformat(),
             "sources": {},
-            "all_contacts": []
+            "all_contacts": [],
+            "total_contacts": 0
         }
         
         # Extract domain/company name
@@ -200,44 +223,22 @@ class MultiSourceLeadGenerator:
             domain = f"{query}.com"
             company_name = query
         
-        print(f"🔍 Searching for: {company_name} ({domain})")
-        
-        # 1. Hunter.io contacts
-        print("📧 Searching Hunter.io...")
-        hunter_contacts = self.search_hunter_contacts(domain)
-        results["sources"]["hunter"] = {
-            "contacts": hunter_contacts,
-            "total": len(hunter_contacts)
-        }
-        results["all_contacts"].extend(hunter_contacts)
-        
-        # 2. Clearbit company info
-        print("🏢 Searching Clearbit...")
-        clearbit_info = self.search_clearbit_contacts(domain)
-        results["sources"]["clearbit"] = clearbit_info
-        
-        # 3. GitHub employees
-        print("👨‍💻 Searching GitHub...")
-        github_employees = self.search_github_company_employees(company_name)
-        results["sources"]["github"] = {
-            "employees": github_employees,
-            "total": len(github_employees)
-        }
-        results["all_contacts"].extend(github_employees)
-        
-        # 4. LinkedIn (mock)
-        print("💼 Searching LinkedIn...")
-        linkedin_info = self.search_linkedin_company_page(company_name)
-        results["sources"]["linkedin"] = linkedin_info
-        
-        # 5. Company website
-        print("🌐 Searching company website...")
-        website_info = self.search_company_websites(domain)
-        results["sources"]["website"] = website_info
-        
-        # Calculate total contacts found
-        results["total_contacts"] = len(results["all_contacts"])
+        print(f"🔍 Searching Hunter.io, Clearbit, GitHub, LinkedIn and website for: {company_name} ({domain})")
+        jobs = self._search_jobs(domain, company_name)
+        results["pending"] = [name for name, _ in jobs]
+        yield results
         
+        for name, data in iter_sources(jobs):
+            if isinstance(data, dict) and "error" in data and name in ["hunter", "github"]:
+                data = []  # These sources return contact lists; a crashed one contributes none
+            self._add_source(results, name, data)
+            results["pending"].remove(name)
+            yield results
+    
+    def run_comprehensive_search(self, query):
+        """Run search across all available sources"""
+        for results in self.iter_comprehensive_search(query):
+            pass
         return results
 
 # Initialize the multi-source generator
@@ -441,6 +442,24 @@ def index():
     </div>
 
     <script>
+        // Read a /search/stream response, calling onSnapshot with the merged results after each source
+        async function readResultStream(response, onSnapshot) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let newline;
+                while ((newline = buffer.indexOf('\\n')) >= 0) {
+                    const line = buffer.slice(0, newline);
+                    buffer = buffer.slice(newline + 1);
+                    if (line.trim()) onSnapshot(JSON.parse(line));
+                }
+            }
+        }
+        
         document.getElementById('searchForm').addEventListener('submit', async (e) => {
             e.preventDefault();
             
@@ -459,100 +478,104 @@ def index():
             contactsDiv.innerHTML = '';
             
             try {
-                const response = await fetch('/search', {
+                const response = await fetch('/search/stream', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ query })
                 });
                 
-                const data = await response.json();
-                
-                if (data.error) {
-                    sourcesDiv.innerHTML = `<div class="error">Error: ${data.error}</div>`;
-                } else {
-                    // Update stats
-                    document.getElementById('totalContacts').textContent = data.total_contacts || 0;
-                    document.getElementById('hunterContacts').textContent = data.sources?.hunter?.total || 0;
-                    document.getElementById('githubContacts').textContent = data.sources?.github?.total || 0;
-                    document.getElementById('verifiedEmails').textContent = 
-                        (data.all_contacts || []).filter(c => c.verified).length;
+                // Redrawn as each source finishes
+                const renderData = (data) => {
+                    if (data.error) {
+                        sourcesDiv.innerHTML = `<div class="error">Error: ${data.error}</div>`;
+                    } else {
+                        // Update stats
+                        document.getElementById('totalContacts').textContent = data.total_contacts || 0;
+                        document.getElementById('hunterContacts').textContent = data.sources?.hunter?.total || 0;
+                        document.getElementById('githubContacts').textContent = data.sources?.github?.total || 0;
+                        document.getElementById('verifiedEmails').textContent = 
+                            (data.all_contacts || []).filter(c => c.verified).length;
                     
-                    statsDiv.style.display = 'grid';
+                        statsDiv.style.display = 'grid';
                     
-                    // Display sources
-                    let sourcesHtml = '<div class="success">✅ Multi-source search completed!</div>';
-                    sourcesHtml += '<div class="sources-grid">';
+                        // Display sources
+                        let sourcesHtml = data.pending?.length
+                            ? `<div class="loading">Still searching: ${data.pending.join(', ')}...</div>`
+                            : '<div class="success">✅ Multi-source search completed!</div>';
+                        sourcesHtml += '<div class="sources-grid">';
                     
-                    // Hunter.io results
-                    if (data.sources?.hunter?.total > 0) {
-                        sourcesHtml += `
-                            <div class="source-card">
-                                <div class="source-title">📧 Hunter.io</div>
-                                <div>Found ${data.sources.hunter.total} contacts with emails</div>
-                            </div>
-                        `;
-                    }
+                        // Hunter.io results
+                        if (data.sources?.hunter?.total > 0) {
+                            sourcesHtml += `
+                                <div class="source-card">
+                                    <div class="source-title">📧 Hunter.io</div>
+                                    <div>Found ${data.sources.hunter.total} contacts with emails</div>
+                                </div>
+                            `;
+                        }
                     
-                    // GitHub results
-                    if (data.sources?.github?.total > 0) {
-                        sourcesHtml += `
-                            <div class="source-card">
-                                <div class="source-title">👨‍💻 GitHub</div>
-                                <div>Found ${data.sources.github.total} developers</div>
-                            </div>
-                        `;
-                    }
+                        // GitHub results
+                        if (data.sources?.github?.total > 0) {
+                            sourcesHtml += `
+                                <div class="source-card">
+                                    <div class="source-title">👨‍💻 GitHub</div>
+                                    <div>Found ${data.sources.github.total} developers</div>
+                                </div>
+                            `;
+                        }
                     
-                    // Clearbit results
-                    if (data.sources?.clearbit?.name) {
-                        sourcesHtml += `
-                            <div class="source-card">
-                                <div class="source-title">🏢 Clearbit</div>
-                                <div>Company: ${data.sources.clearbit.name}</div>
-                                <div>Employees: ${data.sources.clearbit.employees?.toLocaleString() || 'N/A'}</div>
-                                <div>Industry: ${data.sources.clearbit.industry || 'N/A'}</div>
-                            </div>
-                        `;
-                    }
+                        // Clearbit results
+                        if (data.sources?.clearbit?.name) {
+                            sourcesHtml += `
+                                <div class="source-card">
+                                    <div class="source-title">🏢 Clearbit</div>
+                                    <div>Company: ${data.sources.clearbit.name}</div>
+                                    <div>Employees: ${data.sources.clearbit.employees?.toLocaleString() || 'N/A'}</div>
+                                    <div>Industry: ${data.sources.clearbit.industry || 'N/A'}</div>
+                                </div>
+                            `;
+                        }
                     
-                    sourcesHtml += '</div>';
-                    sourcesDiv.innerHTML = sourcesHtml;
+                        sourcesHtml += '</div>';
+                        sourcesDiv.innerHTML = sourcesHtml;
                     
-                    // Display all contacts
-                    if (data.all_contacts && data.all_contacts.length > 0) {
-                        let contactsHtml = '<h2>All Contacts Found</h2>';
-                        contactsHtml += '<div class="contacts-grid">';
+                        // Display all contacts
+                        if (data.all_contacts && data.all_contacts.length > 0) {
+                            let contactsHtml = '<h2>All Contacts Found</h2>';
+                            contactsHtml += '<div class="contacts-grid">';
                         
-                        data.all_contacts.forEach(contact => {
-                            const sourceClass = contact.source?.toLowerCase().replace('.', '') || 'unknown';
-                            contactsHtml += `
-                                <div class="contact-card">
-                                    <div class="contact-name">
-                                        ${contact.first_name || contact.name || 'N/A'} ${contact.last_name || ''}
-                                        <span class="source-badge ${sourceClass}">${contact.source || 'Unknown'}</span>
-                                    </div>
-                                    <div class="contact-details">
-                                        ${contact.email ? `<strong>Email:</strong> ${contact.email}<br>` : ''}
-                                        ${contact.position ? `<strong>Position:</strong> ${contact.position}<br>` : ''}
-                                        ${contact.company ? `<strong>Company:</strong> ${contact.company}<br>` : ''}
-                                        ${contact.department ? `<strong>Department:</strong> ${contact.department}<br>` : ''}
-                                        ${contact.confidence ? `<strong>Confidence:</strong> ${contact.confidence}%<br>` : ''}
-                                        ${contact.followers ? `<strong>Followers:</strong> ${contact.followers.toLocaleString()}<br>` : ''}
-                                        ${contact.verified ? '<span style="color: #28a745;">✓ Verified Email</span><br>' : ''}
-                                        ${contact.linkedin ? `<a href="${contact.linkedin}" target="_blank" style="color: #0077b5;">LinkedIn Profile</a><br>` : ''}
-                                        ${contact.profile_url ? `<a href="${contact.profile_url}" target="_blank" style="color: #6f42c1;">GitHub Profile</a><br>` : ''}
-                                        ${contact.email ? `<a href="mailto:${contact.email}" style="color: #667eea;">Send Email</a>` : ''}
+                            data.all_contacts.forEach(contact => {
+                                const sourceClass = contact.source?.toLowerCase().replace('.', '') || 'unknown';
+                                contactsHtml += `
+                                    <div class="contact-card">
+                                        <div class="contact-name">
+                                            ${contact.first_name || contact.name || 'N/A'} ${contact.last_name || ''}
+                                            <span class="source-badge ${sourceClass}">${contact.source || 'Unknown'}</span>
+                                        </div>
+                                        <div class="contact-details">
+                                            ${contact.email ? `<strong>Email:</strong> ${contact.email}<br>` : ''}
+                                            ${contact.position ? `<strong>Position:</strong> ${contact.position}<br>` : ''}
+                                            ${contact.company ? `<strong>Company:</strong> ${contact.company}<br>` : ''}
+                                            ${contact.department ? `<strong>Department:</strong> ${contact.department}<br>` : ''}
+                                            ${contact.confidence ? `<strong>Confidence:</strong> ${contact.confidence}%<br>` : ''}
+                                            ${contact.followers ? `<strong>Followers:</strong> ${contact.followers.toLocaleString()}<br>` : ''}
+                                            ${contact.verified ? '<span style="color: #28a745;">✓ Verified Email</span><br>' : ''}
+                                            ${contact.linkedin ? `<a href="${contact.linkedin}" target="_blank" style="color: #0077b5;">LinkedIn Profile</a><br>` : ''}
+                                            ${contact.profile_url ? `<a href="${contact.profile_url}" target="_blank" style="color: #6f42c1;">GitHub Profile</a><br>` : ''}
+                                            ${contact.email ? `<a href="mailto:${contact.email}" style="color: #667eea;">Send Email</a>` : ''}
+                                        </div>
                                     </div>
-                                </div>
-                            `;
-                        });
+                                `;
+                            });
                         
-                        contactsHtml += '</div>';
-                        contactsDiv.innerHTML = contactsHtml;
-                    } else {
-                        contactsDiv.innerHTML = '<div class="error">No contacts found across all sources.</div>';
+                            contactsHtml += '</div>';
+                            contactsDiv.innerHTML = contactsHtml;
+                        } else if (!data.pending?.length) {
+                            contactsDiv.innerHTML = '<div class="error">No contacts found across all sources.</div>';
+                        }
                     }
-                }
+                };
+                await readResultStream(response, renderData);
                 
             } catch (error) {
                 sourcesDiv.innerHTML = `<div class="error">Search failed: ${error.message}</div>`;
@@ -582,6 +605,18 @@ def search():
         print(f"Error in search: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Same search as /search, streamed as one JSON line per finished source"""
+    data = request.get_json() or {}
+    query = data.get('query', '').strip()
+    
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    
+    snapshots = lead_generator.iter_comprehensive_search(query)
+    return Response(stream_ndjson(snapshots), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     print("🚀 Starting Multi-Source Lead Generator...")
     print("📱 Open your browser and go to: http://localhost:5008")
@@ -4,16 +4,16 @@ Premium Business Lead Generator
 Focuses on real business contacts, executives, and decision makers
 """
 
-import requests
 import json
 import time
 import csv
 import io
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, render_template_string, request, jsonify, send_file, Response
 from flask_cors import CORS
 import pandas as pd
 from datetime import datetime
 import base64
+from source_fetch import get_fetcher, iter_sources, stream_ndjson
 
 app = Flask(__name__)
 CORS(app)
@@ -24,10 +24,8 @@ SCRAPINGBEE_API_KEY = "1DF3YNRNHU5IJ295DZSRVKWHEEP0C6AZXLE0HI6KP1O87LLUEQ88K3CFK
 
 class PremiumLeadGenerator:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        # Shared rate-limited, disk-cached fetcher (drop-in for requests.get)
+        self.fetch = get_fetcher()
     
     def search_company_executives(self, domain, limit=20):
         """Find executives and decision makers at companies"""
@@ -39,7 +37,7 @@ class PremiumLeadGenerator:
                 "limit": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 executives = []
@@ -81,7 +79,7 @@ class PremiumLeadGenerator:
                 "limit": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 contacts = []
@@ -121,7 +119,7 @@ class PremiumLeadGenerator:
                 "api_key": HUNTER_API_KEY
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -247,60 +245,63 @@ class PremiumLeadGenerator:
         
         return min(score, 100)
     
-    def run_premium_lead_search(self, query, search_type="all"):
-        """Run premium lead search focusing on business contacts"""
-        results = {
-            "query": query,
-            "timestamp": datetime.now().isoformat(),
-            "sources": {},
-            "formatted_sources": {}
-        }
-        
-        if search_type in ["all", "company", "executives"] and "." in query:
-            # Extract domain from query
-            domain = query.replace("https://", "").replace("http://", "").replace("www.", "")
-            if not domain.startswith("http"):
-                domain = domain.split("/")[0].split("?")[0]
-            
-            print(f"🔍 Searching executives for: {domain}")
-            print(f"🔍 Domain after extraction: '{domain}'")
-            executive_results = self.search_company_executives(domain)
-            print(f"🔍 Executive results: {executive_results}")
-            results["sources"]["executives"] = executive_results
-            
-            if "executives" in executive_results:
-                results["formatted_sources"]["executives"] = {
-                    "contacts": executive_results["executives"],
-                    "total_count": executive_results.get("total", 0)
-                }
+    def _search_jobs(self, query, search_type):
+        """(source name, search callable) for every source this search type covers"""
+        jobs = []
         
-        if search_type in ["all", "company", "contacts"] and "." in query:
+        if "." in query:
             # Extract domain from query
             domain = query.replace("https://", "").replace("http://", "").replace("www.", "")
             if not domain.startswith("http"):
                 domain = domain.split("/")[0].split("?")[0]
             
-            print(f"🔍 Searching all contacts for: {domain}")
-            contact_results = self.search_company_contacts(domain)
-            results["sources"]["contacts"] = contact_results
+            if search_type in ["all", "company", "executives"]:
+                print(f"🔍 Searching executives for: {domain}")
+                jobs.append(("executives", lambda: self.search_company_executives(domain)))
             
-            if "contacts" in contact_results:
-                results["formatted_sources"]["contacts"] = {
-                    "contacts": contact_results["contacts"],
-                    "total_count": contact_results.get("total", 0)
-                }
+            if search_type in ["all", "company", "contacts"]:
+                print(f"🔍 Searching all contacts for: {domain}")
+                jobs.append(("contacts", lambda: self.search_company_contacts(domain)))
         
-        if search_type in ["all", "industry"] and not "." in query:
+        elif search_type in ["all", "industry"]:
             print(f"🔍 Searching industry: {query}")
-            industry_results = self.search_by_industry(query)
-            results["sources"]["industry"] = industry_results
-            
-            if "contacts" in industry_results:
-                results["formatted_sources"]["industry"] = {
-                    "contacts": industry_results["contacts"],
-                    "total_count": industry_results.get("total", 0)
-                }
+            jobs.append(("industry", lambda: self.search_by_industry(query)))
+        
+        return jobs
+    
+    def _add_source(self, results, name, data):
+        """Merge one finished source into the results"""
+        results["sources"][name] = data
+        
+        # executives -> data["executives"], contacts / industry -> data["contacts"]
+        key = "executives" if name == "executives" else "contacts"
+        if key in data:
+            results["formatted_sources"][name] = {
+                "contacts": data[key],
+                "total_count": data.get("total", 0)
+            }
+    
+    def iter_premium_lead_search(self, query, search_type="all"):
+        """Run all sources concurrently; yield the merged results after each one finishes"""
+        results = {
+            "query": query,
+            "timestamp": datetime.now().isoformat(),
+            "sources": {},
+            "formatted_sources": {}
+        }
+        jobs = self._search_jobs(query, search_type)
+        results["pending"] = [name for name, _ in jobs]
+        yield results
         
+        for name, data in iter_sources(jobs):
+            self._add_source(results, name, data)
+            results["pending"].remove(name)
+            yield results
+    
+    def run_premium_lead_search(self, query, search_type="all"):
+        """Run premium lead search focusing on business contacts"""
+        for results in self.iter_premium_lead_search(query, search_type):
+            pass
         return results
 
 # Initialize the premium lead generator
@@ -670,6 +671,24 @@ def index():
             document.getElementById('lastSearch').textContent = new Date().toLocaleTimeString();
         }
         
+        // Read a /search/stream response, calling onSnapshot with the merged results after each source
+        async function readResultStream(response, onSnapshot) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let newline;
+                while ((newline = buffer.indexOf('\\n')) >= 0) {
+                    const line = buffer.slice(0, newline);
+                    buffer = buffer.slice(newline + 1);
+                    if (line.trim()) onSnapshot(JSON.parse(line));
+                }
+            }
+        }
+        
         function displayResults(results) {
             currentResults = results;
             updateStats(results);
@@ -837,14 +856,14 @@ def index():
             document.getElementById('rawResults').innerHTML = '<div class="loading"><div class="spinner"></div><p>Fetching raw data...</p></div>';
             
             try {
-                const response = await fetch('/search', {
+                const response = await fetch('/search/stream', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ query, searchType })
                 });
                 
-                const results = await response.json();
-                displayResults(results);
+                // Results are redrawn as each source finishes
+                await readResultStream(response, displayResults);
                 
             } catch (error) {
                 console.error('Search error:', error);
@@ -875,6 +894,19 @@ def search():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Same search as /search, streamed as one JSON line per finished source"""
+    data = request.get_json() or {}
+    query = data.get('query', '').strip()
+    search_type = data.get('searchType', 'all')
+    
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    
+    snapshots = lead_generator.iter_premium_lead_search(query, search_type)
+    return Response(stream_ndjson(snapshots), mimetype='application/x-ndjson')
+
 @app.route('/health')
 def health():
     return jsonify({
@@ -1318,21 +1318,37 @@ class ProjectXWebSocket:
     Usage:
         ws = ProjectXWebSocket(session_token, demo=True)
         await ws.connect()
-        await ws.subscribe_positions()
+        await ws.subscribe_account(account_id)
         # Updates received via callbacks
     """
     
-    def __init__(self, session_token: str, demo: bool = True):
+    def __init__(self, session_token: str, demo: bool = True, hub_url: str = None,
+                 token_factory: callable = None):
+        """
+        Args:
+            session_token: ProjectX session token
+            demo: Demo environment flag
+            hub_url: User hub URL (ProjectXIntegration.ws_user_hub; TopstepX has its own)
+            token_factory: Returns the current token on (re)connect, so a
+                renewed session token is picked up without rebuilding the hub
+        """
         self.session_token = session_token
         self.demo = demo
         
         # ProjectX uses demo URLs for all accounts (live gateway DNS is dead)
-        self.hub_url = "https://gateway-rtc-demo.s2f.projectx.com/hubs/user"
+        self.hub_url = hub_url or "https://gateway-rtc-demo.s2f.projectx.com/hubs/user"
+        self.token_factory = token_factory
         
         self.connection = None
         self.is_connected = False
         self.position_callbacks: List[callable] = []
         self.order_callbacks: List[callable] = []
+        self.account_callbacks: List[callable] = []
+        self.trade_callbacks: List[callable] = []
+        self.reconnect_callbacks: List[callable] = []
+        self.subscribed_account: Optional[int] = None
+        self._hub_open = False
+        self._opened_once = False
         
     async def connect(self) -> bool:
         """
@@ -1351,8 +1367,12 @@ class ProjectXWebSocket:
                 return False
             
             # Build connection with access token
-            self.connection = HubConnectionBuilder() \
-                .with_url(f"{self.hub_url}?access_token={self.session_token}") \
+            if self.token_factory:
+                builder = HubConnectionBuilder().with_url(
+                    self.hub_url, options={"access_token_factory": self.token_factory})
+            else:
+                builder = HubConnectionBuilder().with_url(f"{self.hub_url}?access_token={self.session_token}")
+            self.connection = builder \
                 .with_automatic_reconnect({
                     "type": "raw",
                     "keep_alive_interval": 10,
@@ -1365,9 +1385,16 @@ class ProjectXWebSocket:
             self.connection.on("RealTimePosition", self._on_position_update)
             self.connection.on("RealTimeOrder", self._on_order_update)
             self.connection.on("RealTimeBalance", self._on_balance_update)
+            # Gateway user hub events (per-account subscriptions, see subscribe_account)
+            self.connection.on("GatewayUserPosition", self._on_position_update)
+            self.connection.on("GatewayUserOrder", self._on_order_update)
+            self.connection.on("GatewayUserAccount", self._on_balance_update)
+            self.connection.on("GatewayUserTrade", self._on_trade_update)
+            self.connection.on_open(self._on_open)
+            self.connection.on_close(self._on_close)
             
-            # Start connection
-            self.connection.start()
+            # start() blocks on the handshake; keep it off the caller's event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.connection.start)
             self.is_connected = True
             logger.info("✅ ProjectX SignalR WebSocket connected")
             return True
@@ -1404,6 +1431,29 @@ class ProjectXWebSocket:
             logger.error(f"Subscribe orders error: {e}")
             return False
     
+    async def subscribe_account(self, account_id: int) -> bool:
+        """Subscribe to account, order, position and trade updates for one account."""
+        if not self.is_connected or not self.connection:
+            return False
+        
+        self.subscribed_account = account_id
+        if self._hub_open:
+            return self._send_account_subscriptions()
+        return True  # Sent by _on_open once the handshake completes
+    
+    def _send_account_subscriptions(self) -> bool:
+        account_id = self.subscribed_account
+        try:
+            self.connection.send("SubscribeAccounts", [])
+            self.connection.send("SubscribeOrders", [account_id])
+            self.connection.send("SubscribePositions", [account_id])
+            self.connection.send("SubscribeTrades", [account_id])
+            logger.info(f"📡 Subscribed to ProjectX updates for account {account_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Subscribe account {account_id} error: {e}")
+            return False
+    
     def on_position_update(self, callback: callable):
         """Register callback for position updates."""
         self.position_callbacks.append(callback)
@@ -1412,33 +1462,79 @@ class ProjectXWebSocket:
         """Register callback for order updates."""
         self.order_callbacks.append(callback)
     
-    def _on_position_update(self, data):
-        """Internal handler for position updates."""
-        logger.info(f"📊 Position update: {data}")
-        for callback in self.position_callbacks:
+    def on_account_update(self, callback: callable):
+        """Register callback for account / balance updates."""
+        self.account_callbacks.append(callback)
+    
+    def on_trade_update(self, callback: callable):
+        """Register callback for trade (fill) updates."""
+        self.trade_callbacks.append(callback)
+    
+    def on_reconnect(self, callback: callable):
+        """Register callback() for every reopen after the first (pushes were missed meanwhile)."""
+        self.reconnect_callbacks.append(callback)
+    
+    @staticmethod
+    def _payload(data):
+        """signalrcore passes the hub arguments as a list; gateway events wrap the entity as {action, data}."""
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        if isinstance(data, dict) and isinstance(data.get('data'), dict):
+            data = data['data']
+        return data
+    
+    def _dispatch(self, callbacks: List[callable], data, label: str):
+        data = self._payload(data)
+        for callback in callbacks:
             try:
                 callback(data)
             except Exception as e:
-                logger.error(f"Position callback error: {e}")
+                logger.error(f"{label} callback error: {e}")
+    
+    def _on_position_update(self, data):
+        """Internal handler for position updates."""
+        logger.info(f"📊 Position update: {data}")
+        self._dispatch(self.position_callbacks, data, "Position")
     
     def _on_order_update(self, data):
         """Internal handler for order updates."""
         logger.info(f"📋 Order update: {data}")
-        for callback in self.order_callbacks:
-            try:
-                callback(data)
-            except Exception as e:
-                logger.error(f"Order callback error: {e}")
+        self._dispatch(self.order_callbacks, data, "Order")
     
     def _on_balance_update(self, data):
         """Internal handler for balance updates."""
         logger.debug(f"💰 Balance update: {data}")
+        self._dispatch(self.account_callbacks, data, "Account")
+    
+    def _on_trade_update(self, data):
+        """Internal handler for trade updates."""
+        logger.debug(f"💱 Trade update: {data}")
+        self._dispatch(self.trade_callbacks, data, "Trade")
+    
+    def _on_open(self):
+        self._hub_open = True
+        self.is_connected = True
+        # Subscriptions do not survive a reconnect
+        if self.subscribed_account is not None:
+            self._send_account_subscriptions()
+        if self._opened_once:
+            for callback in self.reconnect_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Reconnect callback error: {e}")
+        self._opened_once = True
+    
+    def _on_close(self):
+        self._hub_open = False
+        self.is_connected = False
+        logger.info("ProjectX SignalR connection closed")
     
     async def disconnect(self):
         """Disconnect from SignalR hub."""
         if self.connection:
             try:
-                self.connection.stop()
+                await asyncio.get_running_loop().run_in_executor(None, self.connection.stop)
             except:
                 pass
         self.is_connected = False
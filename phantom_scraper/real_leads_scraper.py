@@ -4,16 +4,16 @@ Real LinkedIn-Style Lead Generator
 Uses legitimate APIs and methods to find professional contacts
 """
 
-import requests
 import json
 import time
 import csv
 import io
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, render_template_string, request, jsonify, send_file, Response
 from flask_cors import CORS
 import pandas as pd
 from datetime import datetime
 import base64
+from source_fetch import get_fetcher, iter_sources, stream_ndjson
 
 app = Flask(__name__)
 CORS(app)
@@ -25,10 +25,8 @@ SCRAPINGBEE_API_KEY = "1DF3YNRNHU5IJ295DZSRVKWHEEP0C6AZXLE0HI6KP1O87LLUEQ88K3CFK
 
 class RealLeadsGenerator:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        # Shared rate-limited, disk-cached fetcher (drop-in for requests.get)
+        self.fetch = get_fetcher()
     
     def search_hunter_contacts(self, domain, limit=10):
         """Find contacts using Hunter.io API"""
@@ -40,7 +38,7 @@ class RealLeadsGenerator:
                 "limit": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 contacts = []
@@ -73,7 +71,7 @@ class RealLeadsGenerator:
             params = {"email": email}
             headers = {"Authorization": f"Bearer {CLEARBIT_API_KEY}"}
             
-            response = requests.get(url, params=params, headers=headers)
+            response = self.fetch.get(url, params=params, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -104,7 +102,7 @@ class RealLeadsGenerator:
                 "sort": "followers"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 professionals = []
@@ -114,7 +112,7 @@ class RealLeadsGenerator:
                         # Get detailed profile
                         profile_url = user.get("url")
                         if profile_url:
-                            profile_response = requests.get(profile_url)
+                            profile_response = self.fetch.get(profile_url)
                             if profile_response.status_code == 200:
                                 profile_data = profile_response.json()
                                 
@@ -126,7 +124,7 @@ class RealLeadsGenerator:
                                 repos_url = profile_data.get("repos_url")
                                 company_info = ""
                                 if repos_url:
-                                    repos_response = requests.get(f"{repos_url}?per_page=5")
+                                    repos_response = self.fetch.get(f"{repos_url}?per_page=5")
                                     if repos_response.status_code == 200:
                                         repos = repos_response.json()
                                         companies = set()
@@ -352,7 +350,7 @@ class RealLeadsGenerator:
                 "filter": "!6WPIom7QzJhJf"
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 professionals = []
@@ -411,7 +409,7 @@ class RealLeadsGenerator:
             params = {"name": company_name}
             headers = {"Authorization": f"Bearer {CLEARBIT_API_KEY}"}
             
-            response = requests.get(url, params=params, headers=headers)
+            response = self.fetch.get(url, params=params, headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -441,7 +439,7 @@ class RealLeadsGenerator:
                 "limit": limit
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 employees = []
@@ -477,7 +475,7 @@ class RealLeadsGenerator:
                 "api_key": HUNTER_API_KEY
             }
             
-            response = requests.get(url, params=params)
+            response = self.fetch.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -492,36 +490,17 @@ class RealLeadsGenerator:
         except Exception as e:
             return {"error": f"Email verification failed: {str(e)}"}
     
-    def run_comprehensive_lead_search(self, query, search_type="all"):
-        """Run comprehensive lead search across multiple sources"""
-        results = {
-            "query": query,
-            "timestamp": datetime.now().isoformat(),
-            "sources": {},
-            "formatted_sources": {}
-        }
+    def _search_jobs(self, query, search_type):
+        """(source name, search callable) for every source this search type covers"""
+        jobs = []
         
         if search_type in ["all", "github"]:
             print(f"🔍 Searching GitHub for high-quality professionals: {query}")
-            github_results = self.search_github_professionals(query, min_followers=50, min_repos=5)
-            results["sources"]["github"] = github_results
-            
-            if "professionals" in github_results:
-                results["formatted_sources"]["github"] = {
-                    "developers": github_results["professionals"],
-                    "total_count": github_results.get("total_count", 0)
-                }
+            jobs.append(("github", lambda: self.search_github_professionals(query, min_followers=50, min_repos=5)))
         
         if search_type in ["all", "stackoverflow"]:
             print(f"🔍 Searching Stack Overflow for high-reputation professionals: {query}")
-            so_results = self.search_stackoverflow_professionals(query, min_reputation=500)
-            results["sources"]["stackoverflow"] = so_results
-            
-            if "professionals" in so_results:
-                results["formatted_sources"]["stackoverflow"] = {
-                    "developers": so_results["professionals"],
-                    "total_count": so_results.get("total", 0)
-                }
+            jobs.append(("stackoverflow", lambda: self.search_stackoverflow_professionals(query, min_reputation=500)))
         
         if search_type in ["all", "company", "employees"] and "." in query:
             # Extract domain from query
@@ -530,21 +509,51 @@ class RealLeadsGenerator:
                 domain = domain.split("/")[0].split("?")[0]
             
             print(f"🔍 Searching employees for: {domain}")
-            employee_results = self.search_company_employees(domain)
-            results["sources"]["employees"] = employee_results
-            
-            if "employees" in employee_results:
-                results["formatted_sources"]["employees"] = {
-                    "contacts": employee_results["employees"],
-                    "total_count": employee_results.get("total", 0)
-                }
+            jobs.append(("employees", lambda: self.search_company_employees(domain)))
             
             # Also try to get company info if Clearbit is available
             if CLEARBIT_API_KEY != "your_clearbit_key_here":
                 print(f"🔍 Searching company info for: {domain}")
-                company_results = self.search_company_domains(domain)
-                results["sources"]["company"] = company_results
+                jobs.append(("company", lambda: self.search_company_domains(domain)))
+        
+        return jobs
+    
+    def _add_source(self, results, name, data):
+        """Merge one finished source into the results"""
+        results["sources"][name] = data
+        
+        if name in ["github", "stackoverflow"] and "professionals" in data:
+            results["formatted_sources"][name] = {
+                "developers": data["professionals"],
+                "total_count": data.get("total_count", data.get("total", 0))
+            }
+        elif name == "employees" and "employees" in data:
+            results["formatted_sources"]["employees"] = {
+                "contacts": data["employees"],
+                "total_count": data.get("total", 0)
+            }
+    
+    def iter_comprehensive_lead_search(self, query, search_type="all"):
+        """Run all sources concurrently; yield the merged results after each one finishes"""
+        results = {
+            "query": query,
+            "timestamp": datetime.now().isoformat(),
+            "sources": {},
+            "formatted_sources": {}
+        }
+        jobs = self._search_jobs(query, search_type)
+        results["pending"] = [name for name, _ in jobs]
+        yield results
         
+        for name, data in iter_sources(jobs):
+            self._add_source(results, name, data)
+            results["pending"].remove(name)
+            yield results
+    
+    def run_comprehensive_lead_search(self, query, search_type="all"):
+        """Run comprehensive lead search across multiple sources"""
+        for results in self.iter_comprehensive_lead_search(query, search_type):
+            pass
         return results
 
 # Initialize the lead generator
@@ -887,6 +896,24 @@ def index():
             document.getElementById('lastSearch').textContent = new Date().toLocaleTimeString();
         }
         
+        // Read a /search/stream response, calling onSnapshot with the merged results after each source
+        async function readResultStream(response, onSnapshot) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let newline;
+                while ((newline = buffer.indexOf('\\n')) >= 0) {
+                    const line = buffer.slice(0, newline);
+                    buffer = buffer.slice(newline + 1);
+                    if (line.trim()) onSnapshot(JSON.parse(line));
+                }
+            }
+        }
+        
         function displayResults(results) {
             currentResults = results;
             updateStats(results);
@@ -1064,14 +1091,14 @@ def index():
             document.getElementById('rawResults').innerHTML = '<div class="loading"><div class="spinner"></div><p>Fetching raw data...</p></div>';
             
             try {
-                const response = await fetch('/search', {
+                const response = await fetch('/search/stream', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ query, searchType })
                 });
                 
-                const results = await response.json();
-                displayResults(results);
+                // Results are redrawn as each source finishes
+                await readResultStream(response, displayResults);
                 
             } catch (error) {
                 console.error('Search error:', error);
@@ -1102,6 +1129,19 @@ def search():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Same search as /search, streamed as one JSON line per finished source"""
+    data = request.get_json() or {}
+    query = data.get('query', '').strip()
+    search_type = data.get('searchType', 'all')
+    
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    
+    snapshots = lead_generator.iter_comprehensive_lead_search(query, search_type)
+    return Response(stream_ndjson(snapshots), mimetype='application/x-ndjson')
+
 @app.route('/health')
 def health():
     return jsonify({
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Shared source-fetch layer for the lead generators
+=================================================
+The lead generators (real_leads_scraper, multi_source_leads, premium_leads,
+easy_scraper) used to call Hunter, Clearbit, GitHub, Stack Overflow, Reddit,
+HN, ... one after another with bare requests.get(), so a comprehensive search
+took the sum of every source's latency and repeated searches hit the APIs again.
+
+This module gives them:
+- SourceFetcher.get()/post(): drop-in for requests.get()/post() with a pooled
+  session, a default timeout, a per-provider rate limit (token bucket), a global
+  concurrency bound and an on-disk response cache keyed by (provider, request).
+- iter_sources(): runs each source of a search concurrently and yields
+  (name, result) as each one finishes, so /search/stream can push partial
+  results to the UI while slower sources are still running.
+
+Usage:
+    from source_fetch import get_fetcher, iter_sources
+
+    fetch = get_fetcher()
+    response = fetch.get("https://api.github.com/search/users", params={"q": "rust"})
+
+    for name, result in iter_sources([("github", lambda: search_github(q)),
+                                      ("hunter", lambda: search_hunter(d))]):
+        ...
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+CACHE_DIR = os.environ.get("SOURCE_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".source_cache"))
+MAX_CONCURRENT = 8            # Upstream requests in flight across all searches
+SOURCE_WORKERS = 8            # Sources of one search running at once
+REQUEST_TIMEOUT = 15
+DEFAULT_TTL = 6 * 3600        # Seconds a cached 200 response is reused
+
+# Host -> provider name (cache namespace and rate-limit bucket)
+PROVIDERS = {
+    "api.hunter.io": "hunter",
+    "person.clearbit.com": "clearbit",
+    "company.clearbit.com": "clearbit",
+    "api.github.com": "github",
+    "api.stackexchange.com": "stackoverflow",
+    "www.reddit.com": "reddit",
+    "hn.algolia.com": "hackernews",
+    "api.apollo.io": "apollo",
+    "app.scrapingbee.com": "scrapingbee",
+}
+
+# provider -> (requests per second, burst)
+RATE_LIMITS = {
+    "hunter": (10, 10),
+    "clearbit": (5, 5),
+    "github": (10, 20),
+    "stackoverflow": (10, 10),
+    "reddit": (1, 2),           # Reddit asks unauthenticated clients for <= 60/min
+    "hackernews": (10, 10),
+    "apollo": (2, 4),
+    "scrapingbee": (2, 2),
+}
+DEFAULT_RATE = (5, 5)
+
+# provider -> cache TTL (seconds); community feeds change faster than profiles
+CACHE_TTL = {
+    "reddit": 3600,
+    "hackernews": 3600,
+}
+
+
+class CachedResponse:
+    """The subset of requests.Response the generators use (status_code, text, content, json())."""
+
+    def __init__(self, status_code, text, from_cache=False):
+        self.status_code = status_code
+        self.text = text
+        self.from_cache = from_cache
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RateLimiter:
+    """Thread-safe token bucket."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SourceFetcher:
+    def __init__(self, cache_dir=CACHE_DIR, max_concurrent=MAX_CONCURRENT):
+        self.cache_dir = cache_dir
+        self.session = requests.Session()
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.limiters = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0}
+
+    def get(self, url, params=None, headers=None, ttl=None, **kwargs):
+        return self.request("GET", url, params=params, headers=headers, ttl=ttl, **kwargs)
+
+    def post(self, url, params=None, headers=None, json=None, ttl=None, **kwargs):
+        return self.request("POST", url, params=params, headers=headers, json=json, ttl=ttl, **kwargs)
+
+    def request(self, method, url, params=None, headers=None, json=None, ttl=None, **kwargs):
+        """Cached, rate-limited request. Only 200 responses are cached; ttl=0 bypasses the cache."""
+        provider = provider_for(url)
+        if ttl is None:
+            ttl = CACHE_TTL.get(provider, DEFAULT_TTL)
+        path = self._cache_path(provider, method, url, params, json)
+
+        if ttl > 0:
+            cached = self._read_cache(path, ttl)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+
+        self._limiter(provider).acquire()
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        with self.slots:
+            self.stats["requests"] += 1
+            try:
+                response = self.session.request(method, url, params=params, headers=headers, json=json, **kwargs)
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+        result = CachedResponse(response.status_code, response.text)
+        if response.status_code == 200 and ttl > 0:
+            self._write_cache(path, result)
+        return result
+
+    def _limiter(self, provider):
+        with self.lock:
+            limiter = self.limiters.get(provider)
+            if limiter is None:
+                limiter = self.limiters[provider] = RateLimiter(*RATE_LIMITS.get(provider, DEFAULT_RATE))
+            return limiter
+
+    def _cache_path(self, provider, method, url, params, body):
+        key = json.dumps([method, url, params or {}, body], sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, provider, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_cache(self, path, ttl):
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            return CachedResponse(entry["status_code"], entry["text"], from_cache=True)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, path, response):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"status_code": response.status_code, "text": response.text}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not write source cache {path}: {e}")
+
+
+def provider_for(url):
+    host = urlparse(url).netloc.lower()
+    return PROVIDERS.get(host, host or "unknown")
+
+
+_executor = ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix="lead-source")
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Process-wide SourceFetcher (one cache, one set of rate limits)."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = SourceFetcher()
+    return _fetcher
+
+
+def iter_sources(jobs):
+    """
+    Run (name, fn) jobs concurrently; yield (name, result) in completion order.
+    A job that raises yields {"error": ...} like the generators' own error results.
+    """
+    futures = {_executor.submit(fn): name for name, fn in jobs}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            yield name, future.result()
+        except Exception as e:
+            yield name, {"error": f"{name} search failed: {str(e)}"}
+
+
+def stream_ndjson(snapshots):
+    """Encode an iterator of result snapshots as newline-delimited JSON for a streaming response."""
+    for snapshot in snapshots:
+        yield json.dumps(snapshot, default=str) + "\n"
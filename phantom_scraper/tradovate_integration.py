@@ -6,10 +6,15 @@ Based on Trade Manager's approach - credentials-based authentication
 
 import asyncio
 import aiohttp
+import itertools
 import json
 import logging
+import os
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import sqlite3
 
 # WebSocket support
@@ -24,11 +29,207 @@ logger = logging.getLogger(__name__)
 if not WEBSOCKETS_AVAILABLE:
     logger.warning("websockets library not installed. WebSocket order strategies will not work. Install with: pip install websockets")
 
+# ============================================================================
+# PIPELINED ORDER SOCKET
+# ============================================================================
+# Tradovate's WebSocket speaks "endpoint\nrequestId\n\nbody" and answers inside
+# "a[...]" frames as {"i": requestId, "s": status, "d": data}. One reader task
+# resolves a future per request id, so requests for an account are written
+# back to back and answered as they complete instead of one send/recv at a time.
+# ============================================================================
+
+WS_REQUEST_TIMEOUT = 10.0       # Seconds to wait for the response to one request
+WS_HEARTBEAT_INTERVAL = 2.5     # Tradovate drops sockets that send nothing for ~3s
+RTT_WINDOW = 500                # Round trips kept per endpoint for the exported percentiles
+OUTCOME_UNKNOWN = (408, 503)    # Sent but unanswered: the broker may have acted on it
+
+# Opt-in: orders go WebSocket-first only when TRADOVATE_WS_ORDERS=1. Callers that
+# build a TradovateIntegration per trade should only enable it on a pooled
+# (already authorized) connection - see recorder_service.get_pooled_connection.
+WS_ORDERS_ENABLED = os.environ.get('TRADOVATE_WS_ORDERS', '').lower() in ('1', 'true', 'yes')
+
+
+class _RoundTripStats:
+    """Per-endpoint order-socket round-trip times (process-wide, all accounts)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, ms: Optional[float], outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, {'ok': 0, 'error': 0, 'timeout': 0})
+            counts[outcome] += 1
+            if ms is not None:
+                self._samples.setdefault(endpoint, deque(maxlen=RTT_WINDOW)).append(ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for endpoint, counts in self._counts.items():
+                samples = sorted(self._samples.get(endpoint, ()))
+                entry = dict(counts)
+                if samples:
+                    entry.update(
+                        p50_ms=round(samples[len(samples) // 2], 1),
+                        p95_ms=round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+                        max_ms=round(samples[-1], 1),
+                    )
+                result[endpoint] = entry
+            return result
+
+
+_rtt_stats = _RoundTripStats()
+
+
+def tradovate_ws_url(demo: bool) -> str:
+    return "wss://demo.tradovateapi.com/v1/websocket" if demo else "wss://api.tradovate.com/v1/websocket"
+
+
+def get_order_socket_stats() -> Dict[str, Dict[str, Any]]:
+    """{endpoint: {ok, error, timeout, p50_ms, p95_ms, max_ms}} for order-socket requests."""
+    return _rtt_stats.snapshot()
+
+
+class TradovateOrderSocket:
+    """
+    Request multiplexer on one authorized Tradovate WebSocket.
+
+    request() may be called concurrently; each call gets its own request id and
+    future. The caller's coroutine only waits for its own response.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @classmethod
+    async def connect(cls, ws_url: str, access_token: str) -> Optional['TradovateOrderSocket']:
+        """Open, wait for the 'o' frame and authorize. Returns None if authorization fails."""
+        websocket = await websockets.connect(ws_url, ping_interval=None, ping_timeout=None, close_timeout=5,
+                                             max_size=10 * 1024 * 1024)
+        try:
+            await asyncio.wait_for(websocket.recv(), timeout=10.0)     # 'o' (open) frame
+        except Exception:
+            await websocket.close()
+            raise
+        sock = cls(websocket)
+        sock._reader = asyncio.create_task(sock._read_loop())
+        status, data = await sock.request('authorize', access_token)
+        if status != 200:
+            logger.error(f"WebSocket authentication failed (s={status}): {data}")
+            await sock.close()
+            return None
+        return sock
+
+    async def request(self, endpoint: str, body: Any = None,
+                      timeout: float = WS_REQUEST_TIMEOUT) -> Tuple[int, Any]:
+        """
+        Send one request and wait for its response: (status, data).
+
+        Raises ConnectionError only when the request was not written (socket
+        already closed, so the caller may fall back to REST). Once the write has
+        started nothing is raised: a failed or stalled send returns (503, ...)
+        and an unanswered request (408, ...), since a frame stuck in drain may
+        already be on the wire and the broker may act on it.
+        """
+        if self.closed or not self._is_open():
+            self.closed = True
+            raise ConnectionError("order socket closed")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        if body is None:
+            payload = ''
+        elif isinstance(body, str):
+            payload = body
+        else:
+            payload = json.dumps(body)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.websocket.send(f"{endpoint}\n{request_id}\n\n{payload}"), timeout=5.0)
+        except Exception as e:
+            self._pending.pop(request_id, None)
+            self.closed = True
+            _rtt_stats.record(endpoint, None, 'error')
+            return 503, {'errorText': f'Send of {endpoint} failed after the write started: {e or type(e).__name__}'}
+        try:
+            status, data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            _rtt_stats.record(endpoint, None, 'timeout')
+            return 408, {'errorText': f'No response to {endpoint} within {timeout:.0f}s'}
+        except Exception as e:
+            _rtt_stats.record(endpoint, None, 'error')
+            return 503, {'errorText': f'Connection lost before {endpoint} was answered: {e}'}
+        finally:
+            self._pending.pop(request_id, None)
+        _rtt_stats.record(endpoint, (time.perf_counter() - started) * 1000, 'ok' if status == 200 else 'error')
+        return status, data
+
+    def _is_open(self) -> bool:
+        state = getattr(self.websocket, 'state', None)
+        return state is None or getattr(state, 'name', 'OPEN') == 'OPEN'
+
+    def start_heartbeat(self):
+        """Keep an idle socket open ("[]" every WS_HEARTBEAT_INTERVAL) until it closes."""
+        async def beat():
+            while not self.closed:
+                await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+                try:
+                    await self.websocket.send("[]")
+                except Exception as e:
+                    logger.debug(f"Order socket heartbeat failed: {e}")
+                    self.closed = True
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(beat())
+
+    async def _read_loop(self):
+        error = None
+        try:
+            async for raw in self.websocket:
+                if not raw or raw[0] != 'a':
+                    if raw and raw[0] == 'c':
+                        break
+                    continue                                   # 'o', 'h' and '[]' frames
+                try:
+                    items = json.loads(raw[1:])
+                except ValueError:
+                    continue
+                for item in items:
+                    if isinstance(item, dict) and 'i' in item:
+                        future = self._pending.get(item['i'])
+                        if future is not None and not future.done():
+                            future.set_result((item.get('s'), item.get('d')))
+        except Exception as e:
+            error = e
+        finally:
+            self.closed = True
+            lost = ConnectionError(str(error) if error else 'socket closed')
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(lost)
+
+    async def close(self):
+        self.closed = True
+        for task in (self._reader, self._heartbeat):
+            if task and not task.done():
+                task.cancel()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
 class TradovateIntegration:
     def __init__(self, demo=True):
         self.base_url = "https://demo.tradovateapi.com/v1" if demo else "https://live.tradovateapi.com/v1"
         # Demo: demo.tradovateapi.com, Live: api.tradovate.com (per API docs)
-        self.ws_url = "wss://demo.tradovateapi.com/v1/websocket" if demo else "wss://api.tradovate.com/v1/websocket"
+        self.ws_url = tradovate_ws_url(demo)
         self.session = None
         self.websocket = None
         self.ws_connected = False
@@ -40,14 +241,17 @@ class TradovateIntegration:
         self.contract_cache: Dict[int, Optional[str]] = {}
         
         # 🚀 WEBSOCKET ORDERS CONFIG (Added Jan 12, 2025)
-        # Set to False to disable WebSocket orders and use REST only
+        # Off unless TRADOVATE_WS_ORDERS=1 (REST only); the recorder pool turns it on
+        # for connections that already hold an authorized socket
         # WebSocket bypasses REST rate limits (80/min) for scalability
-        self.use_websocket_orders = True
+        self.use_websocket_orders = WS_ORDERS_ENABLED
 
         # 🔄 PERSISTENT WEBSOCKET (Added Jan 16, 2025)
         # Keeps WebSocket alive with heartbeats to avoid reconnection overhead
         self._ws_heartbeat_task: Optional[asyncio.Task] = None
-        self._ws_lock = asyncio.Lock()  # Prevent concurrent connection attempts
+        self._ws_lock = asyncio.Lock()  # Prevent concurrent connection attempts (requests are not serialized)
+        self._order_socket: Optional[TradovateOrderSocket] = None
+        self._shared_order_socket = None  # Pooled socket (attach_order_socket); never connected/closed here
         self._ws_last_heartbeat: float = 0
         self._ws_reconnect_attempts: int = 0
         self._ws_max_reconnect_attempts: int = 5
@@ -89,12 +293,7 @@ class TradovateIntegration:
         await self._stop_websocket_heartbeat()
         if self.session:
             await self.session.close()
-        if self.websocket:
-            try:
-                await self.websocket.close()
-            except:
-                pass
-            self.ws_connected = False
+        await self._close_websocket()
 
     # ========================================================================
     # PERSISTENT WEBSOCKET HEARTBEAT (Added Jan 16, 2025)
@@ -114,8 +313,9 @@ class TradovateIntegration:
                 try:
                     await asyncio.sleep(2.5)
 
-                    if not self.websocket or not self.ws_connected:
+                    if not self.websocket or not self.ws_connected or self._order_socket is None or self._order_socket.closed:
                         logger.debug("💔 Heartbeat: WebSocket not connected, stopping")
+                        self.ws_connected = False
                         break
 
                     # Send heartbeat - Tradovate expects empty array []
@@ -155,12 +355,15 @@ class TradovateIntegration:
     async def _close_websocket(self):
         """Properly close WebSocket and stop heartbeat."""
         await self._stop_websocket_heartbeat()
-        if self.websocket:
+        if self._order_socket:
+            await self._order_socket.close()
+            self._order_socket = None
+        elif self.websocket:
             try:
                 await self.websocket.close()
             except:
                 pass
-            self.websocket = None
+        self.websocket = None
         self.ws_connected = False
 
     async def login_with_credentials(self, username: str, password: str, client_id: str = None, client_secret: str = None) -> bool:
@@ -570,30 +773,17 @@ class TradovateIntegration:
             return False
 
         # Quick check if already connected (before acquiring lock)
-        if self.ws_connected and self.websocket:
-            try:
-                if hasattr(self.websocket, 'closed') and not self.websocket.closed:
-                    return True
-                elif hasattr(self.websocket, 'open') and self.websocket.open:
-                    return True
-            except:
-                pass
+        if self.ws_connected and self._order_socket and not self._order_socket.closed:
+            return True
 
         # Use lock to prevent multiple concurrent connection attempts
         async with self._ws_lock:
             # Double-check after acquiring lock (another task may have connected)
-            if self.ws_connected and self.websocket:
-                try:
-                    if hasattr(self.websocket, 'closed') and not self.websocket.closed:
-                        return True
-                    elif hasattr(self.websocket, 'open') and self.websocket.open:
-                        return True
-                    else:
-                        logger.info("🔌 WebSocket connection closed, reconnecting...")
-                        await self._close_websocket()
-                except Exception as e:
-                    logger.warning(f"🔌 WebSocket check failed: {e}, reconnecting...")
-                    await self._close_websocket()
+            if self.ws_connected and self._order_socket and not self._order_socket.closed:
+                return True
+            if self._order_socket or self.websocket:
+                logger.info("🔌 WebSocket connection closed, reconnecting...")
+                await self._close_websocket()
 
             # Check token validity and refresh if needed
             await self._ensure_valid_token()
@@ -606,52 +796,16 @@ class TradovateIntegration:
 
             try:
                 async def connect_and_auth() -> bool:
-                    # Connect to WebSocket (URL aligned with base_url)
+                    # Connect to WebSocket (URL aligned with base_url); heartbeats are ours ([] every 2.5s)
                     logger.info(f"🔌 Connecting to Tradovate WebSocket: {self.ws_url}")
-                    # Use ping_interval and ping_timeout to help keep connection alive
-                    self.websocket = await websockets.connect(
-                        self.ws_url,
-                        ping_interval=None,  # We'll handle our own heartbeats
-                        ping_timeout=None,
-                        close_timeout=5
-                    )
-
-                    # Authenticate via WebSocket
-                    auth_message = {
-                        "url": "authorize",
-                        "token": self.access_token
-                    }
-                    logger.debug(f"🔐 Sending WebSocket auth with token: {self.access_token[:20]}...")
-                    await self.websocket.send(json.dumps(auth_message))
-
-                    # Wait for authentication response
-                    response = await asyncio.wait_for(self.websocket.recv(), timeout=10.0)
-                    raw_response = response
-                    if not raw_response:
-                        logger.error("WebSocket auth response is empty/None")
-                    else:
-                        logger.debug(f"WebSocket auth raw (first 200 chars): {str(raw_response)[:200]}")
-                    try:
-                        auth_result = json.loads(response)
-                    except Exception:
-                        auth_result = raw_response
-
-                    # Check if auth was successful
-                    is_ok = False
-                    if isinstance(auth_result, dict):
-                        is_ok = auth_result.get('ok') or auth_result.get('success') or auth_result.get('status') == 'ok'
-                    elif isinstance(auth_result, list) and len(auth_result) > 0:
-                        is_ok = auth_result[0] == 'ok' or (isinstance(auth_result[0], dict) and auth_result[0].get('ok'))
-
-                    if is_ok or (isinstance(auth_result, str) and auth_result and 'error' not in str(auth_result).lower()):
-                        self.ws_connected = True
-                        logger.info("✅ WebSocket authenticated successfully")
-                        return True
-                    else:
-                        logger.error(f"WebSocket authentication failed: {auth_result}")
-                        await self.websocket.close()
-                        self.websocket = None
+                    sock = await TradovateOrderSocket.connect(self.ws_url, self.access_token)
+                    if sock is None:
                         return False
+                    self._order_socket = sock
+                    self.websocket = sock.websocket
+                    self.ws_connected = True
+                    logger.info("✅ WebSocket authenticated successfully")
+                    return True
 
                 # Attempt auth; if it fails, force a refresh and retry once
                 self._ws_reconnect_attempts += 1
@@ -680,45 +834,57 @@ class TradovateIntegration:
                 await self._close_websocket()
                 return False
     
-    async def _send_websocket_message(self, message_type: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def attach_order_socket(self, order_socket):
         """
-        Send a message via WebSocket using Tradovate's format.
-        
-        Format: {"n": "messageType", "o": {payload}}
+        Send WebSocket-first orders over a pooled, already authorized order socket
+        (anything with .closed and request(), e.g. a broker_sessions lease).
+        This instance never connects or closes it; a closed one means REST.
         """
-        if not await self._ensure_websocket_connected():
+        self._shared_order_socket = order_socket
+        self.use_websocket_orders = True
+
+    async def _ws_request(self, endpoint: str, body: Any) -> Optional[Tuple[int, Any]]:
+        """
+        One request on the pipelined order socket: (status, data).
+
+        Returns None only when the request was NOT sent (no socket, or it was
+        already closed) - the one case where a REST retry cannot duplicate it.
+        A write that started and failed comes back as (503, ...).
+        """
+        order_socket = self._shared_order_socket
+        if order_socket is not None:
+            if order_socket.closed:
+                return None
+        elif await self._ensure_websocket_connected():
+            order_socket = self._order_socket
+        else:
             return None
-        
         try:
-            # Per DCA guide: {"n": "orderStrategy/startOrderStrategy", "o": {...}}
-            message = {
-                "n": message_type,
-                "o": payload
-            }
-            
-            message_json = json.dumps(message)
-            logger.info(f"📤 Sending WebSocket message: {message_type}")
-            logger.debug(f"   Payload: {json.dumps(payload, indent=2)}")
-            
-            # Add timeout to send to prevent hanging on dead connections
-            await asyncio.wait_for(self.websocket.send(message_json), timeout=5.0)
-            
-            # Wait for response (with timeout)
-            # Note: Tradovate WebSocket may send multiple messages, we need the response to our request
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=30.0)
-            result = json.loads(response)
-            
-            logger.info(f"📥 WebSocket response received for {message_type}")
-            logger.debug(f"   Response: {result}")
-            return result
-            
-        except asyncio.TimeoutError:
-            logger.error(f"WebSocket message timeout for {message_type}")
-            return None
-        except Exception as e:
-            logger.error(f"Error sending WebSocket message: {e}")
+            return await order_socket.request(endpoint, body)
+        except ConnectionError as e:
+            logger.warning(f"⚠️ [WS] {endpoint} not sent ({e})")
             self.ws_connected = False
             return None
+
+    async def _send_websocket_message(self, message_type: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Send a request on the order socket and return its response data.
+
+        Non-200 responses come back as {'errorText': ..., 's': status}; None
+        means the request was not sent.
+        """
+        logger.info(f"📤 Sending WebSocket message: {message_type}")
+        logger.debug(f"   Payload: {json.dumps(payload, indent=2)}")
+        response = await self._ws_request(message_type, payload)
+        if response is None:
+            return None
+        status, data = response
+        logger.info(f"📥 WebSocket response received for {message_type} (s={status})")
+        logger.debug(f"   Response: {data}")
+        if status != 200:
+            error = data.get('errorText') if isinstance(data, dict) else data
+            return {'errorText': error or f'HTTP {status}', 's': status}
+        return data if isinstance(data, dict) else {'ok': True, 'd': data}
     
     def _get_headers(self, use_basic_auth: bool = False, username: str = None, password: str = None) -> Dict[str, str]:
         """
@@ -974,7 +1140,11 @@ class TradovateIntegration:
     # ============================================================================
     # Added: Jan 12, 2025
     # Purpose: Place ALL orders via WebSocket to bypass REST API rate limits
-    # Fallback: If WebSocket fails, automatically uses REST API
+    # Fallback: REST only when the request never reached the socket (not connected /
+    #           socket already closed). A request whose write started - even if the
+    #           send then failed or timed out - is NOT retried via REST: the order
+    #           may already be working.
+    # Requests are pipelined on one socket per account and matched to responses by id.
     # Config: Set self.use_websocket_orders = False to disable
     # REVERT: git checkout WORKING_JAN12_2025_PRE_WEBSOCKET -- phantom_scraper/tradovate_integration.py
     # ============================================================================
@@ -991,90 +1161,49 @@ class TradovateIntegration:
         
         Returns:
             Dict with 'success', 'orderId', etc. - same format as REST place_order()
-            Returns None if WebSocket unavailable (signals caller to use REST fallback)
+            Returns None only if the request was not sent (signals caller to use REST fallback)
         """
+        logger.info(f"📤 [WS] Placing order: {order_data.get('action')} {order_data.get('orderQty')} {order_data.get('symbol')}")
         try:
-            # Ensure WebSocket is connected
-            if not await self._ensure_websocket_connected():
-                logger.warning("⚠️ [WS] WebSocket not available for order, will use REST fallback")
-                return None  # Signal to caller to use REST fallback
-            
-            # Build WebSocket message for order/placeOrder
-            # Format: {"n": "order/placeOrder", "o": {order_data}}
-            ws_message = {
-                "n": "order/placeOrder",
-                "o": order_data
-            }
-            
-            logger.info(f"📤 [WS] Placing order: {order_data.get('action')} {order_data.get('orderQty')} {order_data.get('symbol')}")
-            
-            # Send via WebSocket
-            message_json = json.dumps(ws_message)
-            # Add timeout to send
-            await asyncio.wait_for(self.websocket.send(message_json), timeout=5.0)
-            
-            # Wait for response with timeout
-            try:
-                response = await asyncio.wait_for(self.websocket.recv(), timeout=30.0)
-                result = json.loads(response)
-                
-                logger.debug(f"📥 [WS] Order response: {result}")
-                
-                # Parse response - Tradovate WebSocket responses can vary in format
-                if isinstance(result, dict):
-                    # Check for success indicators
-                    order_id = result.get('orderId') or result.get('id') or result.get('d', {}).get('orderId')
-                    
-                    if order_id:
-                        logger.info(f"✅ [WS] Order placed successfully: orderId={order_id}")
-                        return {
-                            'success': True,
-                            'orderId': order_id,
-                            'data': result,
-                            'via': 'websocket'
-                        }
-                    
-                    # Check for error
-                    error_msg = result.get('errorText') or result.get('error') or (result.get('s') == 'error')
-                    if error_msg and error_msg is not True:
-                        logger.warning(f"⚠️ [WS] Order failed: {error_msg}")
-                        return {
-                            'success': False,
-                            'error': str(error_msg),
-                            'via': 'websocket'
-                        }
-                    
-                    # Check for 's': 'error' format
-                    if result.get('s') == 'error':
-                        error_detail = result.get('d') or result
-                        logger.warning(f"⚠️ [WS] Order rejected: {error_detail}")
-                        return {
-                            'success': False,
-                            'error': str(error_detail),
-                            'via': 'websocket'
-                        }
-                    
-                    # Ambiguous response - might be success with different format
-                    if result.get('s') == 'ok' or result.get('ok'):
-                        logger.info(f"✅ [WS] Order accepted (response: {result})")
-                        return {
-                            'success': True,
-                            'data': result,
-                            'via': 'websocket'
-                        }
-                
-                # If we can't parse definitively, return None to trigger REST fallback
-                logger.warning(f"⚠️ [WS] Ambiguous response format, using REST fallback: {result}")
-                return None
-                
-            except asyncio.TimeoutError:
-                logger.warning("⚠️ [WS] Order timeout after 30s, using REST fallback")
-                return None
-                
+            # Raises / returns None only before anything was written
+            response = await self._ws_request("order/placeorder", order_data)
         except Exception as e:
-            logger.warning(f"⚠️ [WS] Order exception ({e}), using REST fallback")
+            logger.warning(f"⚠️ [WS] Order not sent ({e}), using REST fallback")
             self.ws_connected = False  # Mark connection as dead for reconnect
             return None
+        if response is None:
+            logger.warning("⚠️ [WS] WebSocket not available for order, will use REST fallback")
+            return None  # Signal to caller to use REST fallback
+
+        try:
+            status, result = response
+            logger.debug(f"📥 [WS] Order response (s={status}): {result}")
+            result = result if isinstance(result, dict) else {}
+            order_id = result.get('orderId')
+            if status == 200 and order_id:
+                logger.info(f"✅ [WS] Order placed successfully: orderId={order_id}")
+                return {
+                    'success': True,
+                    'orderId': order_id,
+                    'data': result,
+                    'via': 'websocket'
+                }
+
+            # Sent but rejected or unanswered - never retried via REST (could duplicate the order)
+            error_msg = result.get('failureText') or result.get('errorText') or result.get('failureReason') or f'HTTP {status}'
+            logger.warning(f"⚠️ [WS] Order failed: {error_msg}")
+            return {
+                'success': False,
+                'error': str(error_msg),
+                'raw': result,
+                'via': 'websocket',
+                'outcome_unknown': status in OUTCOME_UNKNOWN
+            }
+
+        except Exception as e:
+            # The request went out: never hand it to REST (the order may be working)
+            logger.error(f"❌ [WS] Order response unreadable ({e}) - outcome unknown, not retrying via REST")
+            return {'success': False, 'error': str(e), 'via': 'websocket', 'outcome_unknown': True}
 
     async def place_order_smart(self, order_data: Dict[str, Any], use_websocket: bool = True) -> Optional[Dict[str, Any]]:
         """
@@ -1132,33 +1261,19 @@ class TradovateIntegration:
         """
         if use_websocket and getattr(self, 'use_websocket_orders', True):
             try:
-                if not await self._ensure_websocket_connected():
+                logger.info(f"📤 [WS] Modifying order {order_id}")
+                response = await self._ws_request("order/modifyorder", {**order_data, 'orderId': order_id})
+                if response is None:
                     logger.warning("⚠️ [WS] WebSocket not available for modify, using REST")
                 else:
-                    # Build modify message
-                    modify_data = {**order_data, 'orderId': order_id}
-                    ws_message = {
-                        "n": "order/modifyOrder",
-                        "o": modify_data
-                    }
-                    
-                    logger.info(f"📤 [WS] Modifying order {order_id}")
-                    # Add timeout to send
-                    await asyncio.wait_for(self.websocket.send(json.dumps(ws_message)), timeout=5.0)
-                    
-                    response = await asyncio.wait_for(self.websocket.recv(), timeout=30.0)
-                    result = json.loads(response)
-                    
-                    if isinstance(result, dict):
-                        if result.get('orderId') or result.get('s') == 'ok' or result.get('ok'):
-                            logger.info(f"✅ [WS] Order {order_id} modified successfully")
-                            return {'success': True, 'data': result, 'via': 'websocket'}
-                        elif result.get('s') == 'error' or result.get('error'):
-                            error = result.get('d') or result.get('error') or result
-                            logger.warning(f"⚠️ [WS] Modify failed: {error}")
-                            return {'success': False, 'error': str(error), 'via': 'websocket'}
-                    
-                    logger.warning(f"⚠️ [WS] Ambiguous modify response, using REST: {result}")
+                    status, result = response
+                    result = result if isinstance(result, dict) else {}
+                    if status == 200 and not result.get('failureReason') and not result.get('errorText'):
+                        logger.info(f"✅ [WS] Order {order_id} modified successfully")
+                        return {'success': True, 'data': result, 'via': 'websocket'}
+                    error = result.get('failureText') or result.get('errorText') or result.get('failureReason') or f'HTTP {status}'
+                    logger.warning(f"⚠️ [WS] Modify failed: {error}")
+                    return {'success': False, 'error': str(error), 'via': 'websocket'}
             except Exception as e:
                 logger.warning(f"⚠️ [WS] Modify exception ({e}), using REST")
                 self.ws_connected = False
@@ -1190,31 +1305,19 @@ class TradovateIntegration:
         """
         if use_websocket and getattr(self, 'use_websocket_orders', True):
             try:
-                if not await self._ensure_websocket_connected():
+                logger.info(f"📤 [WS] Cancelling order {order_id}")
+                response = await self._ws_request("order/cancelorder", {"orderId": order_id})
+                if response is None:
                     logger.warning("⚠️ [WS] WebSocket not available for cancel, using REST")
                 else:
-                    ws_message = {
-                        "n": "order/cancelOrder",
-                        "o": {"orderId": order_id}
-                    }
-                    
-                    logger.info(f"📤 [WS] Cancelling order {order_id}")
-                    # Add timeout to send
-                    await asyncio.wait_for(self.websocket.send(json.dumps(ws_message)), timeout=5.0)
-                    
-                    response = await asyncio.wait_for(self.websocket.recv(), timeout=30.0)
-                    result = json.loads(response)
-                    
-                    if isinstance(result, dict):
-                        if result.get('s') == 'ok' or result.get('ok') or result.get('orderId'):
-                            logger.info(f"✅ [WS] Order {order_id} cancelled successfully")
-                            return {'success': True, 'data': result, 'via': 'websocket'}
-                        elif result.get('s') == 'error' or result.get('error'):
-                            error = result.get('d') or result.get('error') or result
-                            logger.warning(f"⚠️ [WS] Cancel failed: {error}")
-                            return {'success': False, 'error': str(error), 'via': 'websocket'}
-                    
-                    logger.warning(f"⚠️ [WS] Ambiguous cancel response, using REST: {result}")
+                    status, result = response
+                    result = result if isinstance(result, dict) else {}
+                    if status == 200 and not result.get('failureReason') and not result.get('errorText'):
+                        logger.info(f"✅ [WS] Order {order_id} cancelled successfully")
+                        return {'success': True, 'data': result, 'via': 'websocket'}
+                    error = result.get('failureText') or result.get('errorText') or result.get('failureReason') or f'HTTP {status}'
+                    logger.warning(f"⚠️ [WS] Cancel failed: {error}")
+                    return {'success': False, 'error': str(error), 'via': 'websocket'}
             except Exception as e:
                 logger.warning(f"⚠️ [WS] Cancel exception ({e}), using REST")
                 self.ws_connected = False
@@ -2020,9 +2123,36 @@ class TradovateIntegration:
                 "params": json.dumps(params)  # Must be stringified JSON
             }
 
-            logger.info(f"📊 Placing bracket order strategy via REST: entry={entry_side}, qty={quantity}, TP={profit_target_ticks} ticks, SL={stop_loss_ticks} ticks")
+            logger.info(f"📊 Placing bracket order strategy: entry={entry_side}, qty={quantity}, TP={profit_target_ticks} ticks, SL={stop_loss_ticks} ticks")
             logger.debug(f"Strategy payload: {strategy_payload}")
 
+            # WebSocket first; REST only if the request could not be sent
+            if getattr(self, 'use_websocket_orders', True):
+                response = await self._ws_request("orderStrategy/startOrderStrategy", strategy_payload)
+                if response is not None:
+                    status, data = response
+                    data = data if isinstance(data, dict) else {}
+                    if status in OUTCOME_UNKNOWN:
+                        # The strategy may be live at the broker - the caller must not place another entry
+                        error = data.get('errorText') or f'HTTP {status}'
+                        logger.error(f"❌ Bracket strategy outcome unknown: {error}")
+                        return {'success': False, 'error': error, 'via': 'websocket', 'outcome_unknown': True}
+                    if status != 200 or data.get('errorText'):
+                        error = data.get('errorText') or f'HTTP {status}'
+                        logger.error(f"❌ Bracket strategy rejected via WebSocket: {error}")
+                        return {'success': False, 'error': error, 'via': 'websocket'}
+                    strategy_data = data.get('orderStrategy', data)
+                    strategy_id = strategy_data.get('id') or strategy_data.get('orderStrategyId')
+                    logger.info(f"✅ Bracket order strategy created via WebSocket: ID={strategy_id}")
+                    return {
+                        'success': True,
+                        'data': strategy_data,
+                        'strategy_id': strategy_id,
+                        'orderId': strategy_data.get('orderId'),
+                        'via': 'websocket'
+                    }
+                logger.warning("⚠️ [WS] WebSocket not available for bracket order, using REST")
+
             # Ensure valid token before request
             if not await self._ensure_valid_token():
                 return {'success': False, 'error': 'Token invalid and refresh failed'}
@@ -2204,10 +2334,12 @@ class TradovateIntegration:
             logger.info(f"📊 Placing MULTI-BRACKET order: {entry_side} {total_quantity} {symbol}, {len(brackets)} legs")
             logger.debug(f"Multi-bracket payload: {strategy_payload}")
 
-            ws_response = await self._send_websocket_message(
-                "orderStrategy/startOrderStrategy",
-                strategy_payload
-            )
+            ws_response = None
+            if getattr(self, 'use_websocket_orders', True):
+                ws_response = await self._send_websocket_message(
+                    "orderStrategy/startOrderStrategy",
+                    strategy_payload
+                )
 
             if ws_response:
                 if isinstance(ws_response, dict):
@@ -2229,13 +2361,40 @@ class TradovateIntegration:
                     else:
                         error_msg = actual_response.get('errorText') or actual_response.get('error') or str(ws_response)
                         logger.error(f"❌ Multi-bracket failed: {error_msg}")
-                        return {'success': False, 'error': error_msg}
+                        return {'success': False, 'error': error_msg,
+                                'outcome_unknown': ws_response.get('s') in OUTCOME_UNKNOWN}
                 else:
                     logger.error(f"❌ Unexpected response format: {ws_response}")
                     return {'success': False, 'error': f'Unexpected response format: {ws_response}'}
             else:
-                logger.error("❌ Multi-bracket: no WebSocket response")
-                return {'success': False, 'error': 'WebSocket connection failed or no response received'}
+                # Request was never sent - safe to place via REST instead
+                logger.warning("⚠️ [WS] Multi-bracket: WebSocket not available, using REST")
+                if not await self._ensure_valid_token():
+                    return {'success': False, 'error': 'Token invalid and refresh failed'}
+                async with self.session.post(
+                    f"{self.base_url}/orderStrategy/startOrderStrategy",
+                    json=strategy_payload,
+                    headers=self._get_headers()
+                ) as response:
+                    try:
+                        data = await response.json()
+                    except Exception:
+                        data = {'errorText': await response.text()}
+                    data = data if isinstance(data, dict) else {}
+                    if response.status != 200 or data.get('errorText'):
+                        error_msg = data.get('errorText') or f'HTTP {response.status}'
+                        logger.error(f"❌ Multi-bracket failed via REST: {error_msg}")
+                        return {'success': False, 'error': error_msg}
+                    strategy_data = data.get('orderStrategy', data)
+                    strategy_id = strategy_data.get('id') or strategy_data.get('orderStrategyId')
+                    logger.info(f"✅ Multi-bracket order created via REST: ID={strategy_id}, {len(brackets)} legs")
+                    return {
+                        'success': True,
+                        'data': data,
+                        'strategy_id': strategy_id,
+                        'orderId': strategy_data.get('orderId'),
+                        'legs': len(brackets)
+                    }
 
         except Exception as e:
             logger.error(f"Error creating multi-bracket order: {e}", exc_info=True)
@@ -2293,11 +2452,13 @@ class TradovateIntegration:
             
             logger.info(f"📊 Placing OCO exit via WebSocket: {exit_side} {quantity} {symbol}, TP={take_profit_price}, SL={stop_loss_price}")
             
-            # Send via WebSocket (REQUIRED per Tradovate documentation)
-            ws_response = await self._send_websocket_message(
-                "orderStrategy/startOrderStrategy",
-                strategy_payload
-            )
+            # Send via WebSocket (REQUIRED per Tradovate documentation); without it, individual orders
+            ws_response = None
+            if getattr(self, 'use_websocket_orders', True):
+                ws_response = await self._send_websocket_message(
+                    "orderStrategy/startOrderStrategy",
+                    strategy_payload
+                )
             
             if ws_response:
                 if isinstance(ws_response, dict):
@@ -2311,6 +2472,10 @@ class TradovateIntegration:
                         }
                     else:
                         error_msg = ws_response.get('errorText') or ws_response.get('error') or str(ws_response)
+                        if ws_response.get('s') in OUTCOME_UNKNOWN:
+                            # Sent but unanswered - the OCO may be live, so don't add a second set of exits
+                            logger.error(f"❌ OCO exit outcome unknown: {error_msg}")
+                            return {'success': False, 'error': error_msg, 'via': 'websocket', 'outcome_unknown': True}
                         logger.warning(f"⚠️ OCO strategy returned error: {error_msg}")
                         logger.info(f"📊 Falling back to individual TP/SL orders...")
                         # Fallback to placing individual orders
@@ -2344,32 +2509,32 @@ class TradovateIntegration:
         """
         Fallback: Place TP and SL as individual orders with custom OCO monitoring.
         The server will monitor these orders and cancel the partner when one fills.
+        Both legs are sent together (pipelined on the order socket) rather than
+        waiting for the TP round trip before sending the SL.
         """
         results = {'success': False, 'tp_order': None, 'sl_order': None, 'tp_order_id': None, 'sl_order_id': None}
         
         try:
             tp_order_id = None
             sl_order_id = None
-            
+            legs = []
             if take_profit_price:
-                tp_data = self.create_limit_order(account_spec, symbol, exit_side, quantity, take_profit_price, account_id)
-                tp_result = await self.place_order(tp_data)
-                results['tp_order'] = tp_result
-                if tp_result and tp_result.get('success'):
-                    results['success'] = True
-                    tp_order_id = tp_result.get('orderId') or tp_result.get('data', {}).get('orderId')
-                    results['tp_order_id'] = tp_order_id
-                    logger.info(f"✅ TP order placed: ID={tp_order_id}, Price={take_profit_price}")
-            
+                legs.append(('tp', 'TP', take_profit_price,
+                             self.create_limit_order(account_spec, symbol, exit_side, quantity, take_profit_price, account_id)))
             if stop_loss_price:
-                sl_data = self.create_stop_order(account_spec, symbol, exit_side, quantity, stop_loss_price, account_id)
-                sl_result = await self.place_order(sl_data)
-                results['sl_order'] = sl_result
-                if sl_result and sl_result.get('success'):
+                legs.append(('sl', 'SL', stop_loss_price,
+                             self.create_stop_order(account_spec, symbol, exit_side, quantity, stop_loss_price, account_id)))
+
+            leg_results = await asyncio.gather(*(self.place_order_smart(order) for _, _, _, order in legs))
+            for (key, label, price, _), result in zip(legs, leg_results):
+                results[f'{key}_order'] = result
+                if result and result.get('success'):
                     results['success'] = True
-                    sl_order_id = sl_result.get('orderId') or sl_result.get('data', {}).get('orderId')
-                    results['sl_order_id'] = sl_order_id
-                    logger.info(f"✅ SL order placed: ID={sl_order_id}, Price={stop_loss_price}")
+                    order_id = result.get('orderId') or (result.get('data') or {}).get('orderId')
+                    results[f'{key}_order_id'] = order_id
+                    logger.info(f"✅ {label} order placed: ID={order_id}, Price={price}")
+            tp_order_id = results['tp_order_id']
+            sl_order_id = results['sl_order_id']
             
             # Register the pair for custom OCO monitoring
             if tp_order_id and sl_order_id:
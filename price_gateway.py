@@ -0,0 +1,410 @@
+"""
+Price Gateway - Conflated SSE price streaming
+=============================================
+BEFORE: every dashboard tab held a WSGI worker thread blocked on
+Queue.get(timeout=15), and every tick was JSON-encoded and put_nowait'ed into
+every client queue (200 slots, slow clients dropped when full).
+
+AFTER:
+- PriceConflator keeps ONE serialized SSE frame per symbol (latest value only).
+  publish() is O(1): encode once, bump a sequence number, wake waiters.
+- Each client remembers the last sequence it sent per symbol and, at most
+  max_rate times per second, sends the frames for symbols that changed since.
+  Intermediate ticks are conflated away, so a slow client only ever lags by
+  one frame per symbol instead of filling a queue.
+- Clients may subscribe to a symbol list (?symbols=NQ,ES); others are ignored.
+- PriceGateway serves the same stream from an aiohttp event loop running in a
+  daemon thread on PRICE_GATEWAY_PORT, so thousands of viewers cost one
+  coroutine each instead of a web worker. The Flask /api/price-stream route
+  stays as the fallback and uses the same conflator.
+- Recorder signals ride the same stream as events (?events=1). Events are not
+  conflated: every client with access gets each one, in order, from a bounded
+  backlog. They carry recorder names, so a client must present
+  SIGNAL_STREAM_TOKEN (Authorization: Bearer ... or ?token=); the Discord
+  signal bot is the intended consumer.
+- relay_event() publishes an event on the Redis channel EVENT_CHANNEL and every
+  worker's conflator (this one included) appends it, so a signal handled by one
+  gunicorn worker reaches a bot connected to another. Without Redis the event
+  only reaches this process's clients.
+
+Environment:
+    PRICE_GATEWAY_PORT      start the asyncio gateway on this port (off if unset)
+    PRICE_GATEWAY_URL       public stream URL the dashboard connects to
+                            (defaults to the Flask /api/price-stream route)
+    PRICE_STREAM_MAX_RATE   default per-client frames/second (default 4)
+    SIGNAL_STREAM_TOKEN     token that unlocks signal events (events off if unset)
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+import logging
+import threading
+import uuid
+from collections import deque
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('price_gateway')
+
+HEARTBEAT_INTERVAL = 15        # Seconds of silence before an SSE comment
+DEFAULT_MAX_RATE = float(os.environ.get('PRICE_STREAM_MAX_RATE', '4'))
+MIN_RATE, MAX_RATE = 0.2, 20.0
+HEARTBEAT_FRAME = b': heartbeat\n\n'
+EVENT_BACKLOG = 256            # Events kept for clients that are between sends
+EVENT_CHANNEL = 'jt:stream_events'
+RESUBSCRIBE_DELAY = 5          # Seconds between Redis subscribe attempts
+
+_ORIGIN = uuid.uuid4().hex     # Identifies this process on EVENT_CHANNEL
+
+
+def _encode(payload):
+    return ('data: ' + json.dumps(payload, separators=(',', ':'), default=str) + '\n\n').encode('utf-8')
+
+
+class StreamClient:
+    """Per-connection conflation state (symbol filter, rate, last-sent sequences)."""
+
+    def __init__(self, start_seq, symbols=None, max_rate=None, events=False):
+        self.symbols = frozenset(symbols) if symbols else None
+        rate = DEFAULT_MAX_RATE if max_rate is None else max_rate
+        self.min_interval = 1.0 / max(MIN_RATE, min(MAX_RATE, rate))
+        self.start_seq = start_seq
+        self.sent = {}             # symbol -> last sequence delivered
+        self.events = events
+        self.event_seq = start_seq # last event sequence delivered
+        self.last_send = 0.0
+
+    def next_send_delay(self):
+        return max(0.0, self.last_send + self.min_interval - time.time())
+
+
+class PriceConflator:
+    """Latest-value-per-symbol store shared by every streaming client."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._latest = {}          # symbol -> (seq, frame bytes)
+        self._events = deque(maxlen=EVENT_BACKLOG)   # (seq, frame bytes), oldest first
+        self._seq = 0
+        self._wakers = []          # callables run after every publish (event loops)
+        self._snapshot_provider = None
+        self._clients = 0
+        self._subscriber = None
+        self.stats = {'publishes': 0, 'events': 0, 'relayed_events': 0, 'frames_sent': 0,
+                      'bytes_sent': 0, 'connects': 0}
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def client_count(self):
+        return self._clients
+
+    def set_snapshot_provider(self, fn):
+        """fn() -> {symbol: payload}; used for the initial snapshot on connect."""
+        self._snapshot_provider = fn
+
+    def add_waker(self, fn):
+        with self._cond:
+            self._wakers.append(fn)
+
+    def remove_waker(self, fn):
+        with self._cond:
+            if fn in self._wakers:
+                self._wakers.remove(fn)
+
+    def publish(self, symbol, payload):
+        """Store the latest payload for a symbol, serialized once for all clients."""
+        frame = _encode(payload)
+        with self._cond:
+            self._seq += 1
+            self._latest[symbol] = (self._seq, frame)
+            self.stats['publishes'] += 1
+            self._cond.notify_all()
+            wakers = list(self._wakers)
+        self._wake(wakers)
+
+    def publish_event(self, payload):
+        """Append an event (e.g. a recorder signal) that every events client receives once."""
+        frame = _encode(payload)
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, frame))
+            self.stats['events'] += 1
+            self._cond.notify_all()
+            wakers = list(self._wakers)
+        self._wake(wakers)
+
+    def relay_event(self, payload):
+        """publish_event() on every worker: locally, and on EVENT_CHANNEL for the others."""
+        if self._clients:
+            self.publish_event(payload)
+        r = _get_redis()
+        if not r:
+            return
+        self._ensure_subscriber()
+        try:
+            r.publish(EVENT_CHANNEL, json.dumps({'origin': _ORIGIN, 'payload': payload}, default=str))
+        except Exception as e:
+            logger.debug(f"Stream event relay publish failed: {e}")
+
+    def _ensure_subscriber(self):
+        if self._subscriber is None and _get_redis():
+            with self._cond:
+                if self._subscriber is None:
+                    self._subscriber = threading.Thread(target=self._subscribe_loop, daemon=True,
+                                                        name='stream-events-sub')
+                    self._subscriber.start()
+
+    def _subscribe_loop(self):
+        while True:
+            r = _get_redis()
+            if not r:
+                time.sleep(RESUBSCRIBE_DELAY)
+                continue
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(EVENT_CHANNEL)
+                for message in pubsub.listen():
+                    try:
+                        msg = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if msg.get('origin') != _ORIGIN and self._clients and isinstance(msg.get('payload'), dict):
+                        self.stats['relayed_events'] += 1
+                        self.publish_event(msg['payload'])
+            except Exception as e:
+                logger.warning(f"Stream event subscription lost, resubscribing: {e}")
+            time.sleep(RESUBSCRIBE_DELAY)
+
+    @staticmethod
+    def _wake(wakers):
+        for wake in wakers:
+            try:
+                wake()
+            except Exception as e:
+                logger.debug(f"Price gateway waker error: {e}")
+
+    def wait(self, seq, timeout):
+        """Block (thread transports) until a publish after `seq` or timeout. Returns the new seq."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._seq
+
+    def open(self, symbols=None, max_rate=None, events=False):
+        with self._cond:
+            self._clients += 1
+            self.stats['connects'] += 1
+            return StreamClient(self._seq, symbols, max_rate, events)
+
+    def close(self, client):
+        with self._cond:
+            self._clients = max(0, self._clients - 1)
+
+    def snapshot_frame(self, client):
+        prices = {}
+        if self._snapshot_provider:
+            try:
+                prices = self._snapshot_provider() or {}
+            except Exception as e:
+                logger.warning(f"Price snapshot provider error: {e}")
+        if client.symbols is not None:
+            prices = {s: p for s, p in prices.items() if s in client.symbols}
+        return _encode({'type': 'snapshot', 'prices': prices})
+
+    def collect(self, client):
+        """Frames for every symbol that changed since this client's last send (b'' if none)."""
+        with self._cond:
+            if client.symbols is None:
+                items = list(self._latest.items())
+            else:
+                items = [(s, self._latest[s]) for s in client.symbols if s in self._latest]
+            events = [e for e in self._events if e[0] > client.event_seq] if client.events else ()
+        frames = []
+        for symbol, (seq, frame) in items:
+            if seq > client.start_seq and seq > client.sent.get(symbol, 0):
+                client.sent[symbol] = seq
+                frames.append(frame)
+        for seq, frame in events:
+            client.event_seq = seq
+            frames.append(frame)
+        if not frames:
+            return b''
+        data = b''.join(frames)
+        client.last_send = time.time()
+        self.stats['frames_sent'] += len(frames)
+        self.stats['bytes_sent'] += len(data)
+        return data
+
+    def iter_stream(self, symbols=None, max_rate=None, events=False):
+        """Blocking generator for WSGI transports (Flask fallback route)."""
+        client = self.open(symbols, max_rate, events)
+        try:
+            yield self.snapshot_frame(client)
+            while True:
+                delay = client.next_send_delay()
+                if delay:
+                    time.sleep(delay)
+                seq = self._seq
+                data = self.collect(client)
+                if data:
+                    yield data
+                elif self.wait(seq, HEARTBEAT_INTERVAL) == seq:
+                    yield HEARTBEAT_FRAME
+        finally:
+            self.close(client)
+
+    def get_stats(self):
+        with self._cond:
+            return dict(self.stats, clients=self._clients, symbols=len(self._latest), seq=self._seq)
+
+
+def parse_stream_args(args):
+    """(symbols, max_rate) from ?symbols=NQ,ES&max_rate=2 query args."""
+    raw = (args.get('symbols') or '').strip()
+    symbols = [s.strip().upper() for s in raw.split(',') if s.strip()] or None
+    try:
+        max_rate = float(args['max_rate']) if args.get('max_rate') else None
+    except (TypeError, ValueError):
+        max_rate = None
+    return symbols, max_rate
+
+
+def events_allowed(args, headers):
+    """True if the request asked for events (?events=1) and presented SIGNAL_STREAM_TOKEN."""
+    token = os.environ.get('SIGNAL_STREAM_TOKEN', '')
+    if not token or (args.get('events') or '').lower() not in ('1', 'true', 'signals'):
+        return False
+    auth = headers.get('Authorization') or ''
+    given = auth[7:] if auth.startswith('Bearer ') else (args.get('token') or '')
+    return hmac.compare_digest(given.encode('utf-8'), token.encode('utf-8'))
+
+
+class PriceGateway:
+    """aiohttp SSE server on its own event loop thread, fed by a PriceConflator."""
+
+    def __init__(self, conflator, port, host='0.0.0.0'):
+        self.conflator = conflator
+        self.port = port
+        self.host = host
+        self._loop = None
+        self._tick = None
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return True
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            logger.warning("aiohttp not installed - price gateway disabled")
+            return False
+        self._thread = threading.Thread(target=self._run, daemon=True, name='price-gateway')
+        self._thread.start()
+        return True
+
+    def _run(self):
+        from aiohttp import web
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._tick = asyncio.Event()
+
+        def wake():
+            self._loop.call_soon_threadsafe(self._fire_tick)
+        self.conflator.add_waker(wake)
+
+        app = web.Application()
+        app.router.add_get('/api/price-stream', self._handle_stream)
+        app.router.add_get('/health', self._handle_health)
+        runner = web.AppRunner(app, access_log=None)
+        try:
+            self._loop.run_until_complete(runner.setup())
+            self._loop.run_until_complete(web.TCPSite(runner, self.host, self.port).start())
+            logger.info(f"📡 Price gateway listening on {self.host}:{self.port}")
+            self._loop.run_forever()
+        except Exception as e:
+            logger.error(f"Price gateway stopped: {e}")
+        finally:
+            self.conflator.remove_waker(wake)
+
+    def _fire_tick(self):
+        # Swap before setting so waiters that re-arm after this tick wait on a fresh event
+        tick, self._tick = self._tick, asyncio.Event()
+        tick.set()
+
+    async def _handle_health(self, request):
+        from aiohttp import web
+        return web.json_response(self.conflator.get_stats())
+
+    async def _handle_stream(self, request):
+        from aiohttp import web
+
+        symbols, max_rate = parse_stream_args(request.query)
+        events = events_allowed(request.query, request.headers)
+        resp = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'Access-Control-Allow-Origin': '*',
+        })
+        await resp.prepare(request)
+
+        conflator = self.conflator
+        client = conflator.open(symbols, max_rate, events)
+        try:
+            await resp.write(conflator.snapshot_frame(client))
+            while True:
+                delay = client.next_send_delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                tick = self._tick
+                data = conflator.collect(client)
+                if data:
+                    await resp.write(data)
+                    continue
+                try:
+                    await asyncio.wait_for(tick.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    await resp.write(HEARTBEAT_FRAME)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            conflator.close(client)
+        return resp
+
+
+# ============================================================================
+# SINGLETONS
+# ============================================================================
+
+_conflator = None
+_gateway = None
+_singleton_lock = threading.Lock()
+
+
+def get_price_conflator():
+    global _conflator
+    if _conflator is None:
+        with _singleton_lock:
+            if _conflator is None:
+                _conflator = PriceConflator()
+                # Subscribe up front: a worker holding the bot's stream may never relay anything itself
+                _conflator._ensure_subscriber()
+    return _conflator
+
+
+def start_price_gateway(port=None):
+    """Start the asyncio gateway if PRICE_GATEWAY_PORT (or `port`) is set."""
+    global _gateway
+    port = port or os.environ.get('PRICE_GATEWAY_PORT')
+    if not port:
+        return None
+    with _singleton_lock:
+        if _gateway is None:
+            _gateway = PriceGateway(get_price_conflator(), int(port))
+    return _gateway if _gateway.start() else None
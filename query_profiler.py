@@ -0,0 +1,644 @@
+"""
+Query Profiler & Index Advisor
+==============================
+Opt-in instrumentation for the hand-written SQL layer.
+
+BEFORE: only a handful of indexes are created inline, while hundreds of
+f-string statements filter on status / recorder_id / exit_time / webhook_token /
+user_id / subaccount_id. Nobody could see which of them were slow or scanning.
+
+AFTER:
+- PostgresCursorWrapper and the SQLite connection factory report each
+  statement here (only while the profiler is enabled - off by default).
+- Statements are grouped by a normalized fingerprint (literals, placeholders
+  and IN-lists collapsed) with call counts and latency percentiles.
+- Slow fingerprints are EXPLAIN-sampled by a background thread on its own
+  connection (never inside the caller's transaction), at most once per
+  EXPLAIN_INTERVAL, recording which tables were sequentially scanned.
+- advise() turns scanned WHERE clauses into composite / partial index
+  proposals, skipping anything an existing index already covers.
+- apply_index() / run_index_migrations() create indexes (CONCURRENTLY on
+  PostgreSQL) and record them in the index_migrations table.
+
+Environment:
+    QUERY_PROFILER                   "1" to record from startup (admin endpoint can toggle)
+    QUERY_PROFILER_SLOW_MS           EXPLAIN-sample statements slower than this (default 50)
+    QUERY_PROFILER_EXPLAIN_INTERVAL  re-EXPLAIN a fingerprint at most this often (default 300s)
+"""
+
+import os
+import re
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger('query_profiler')
+
+SLOW_MS = float(os.environ.get('QUERY_PROFILER_SLOW_MS', '50'))
+EXPLAIN_INTERVAL = float(os.environ.get('QUERY_PROFILER_EXPLAIN_INTERVAL', '300'))
+LATENCY_SAMPLES = 512          # Latencies kept per fingerprint for percentiles
+MAX_FINGERPRINTS = 2000        # Hard cap on distinct statements tracked
+MAX_SQL_VARIANTS = 8           # Raw SQL texts remembered per fingerprint
+ADVISE_MIN_TOTAL_MS = 1000     # Unexplained fingerprints need this much total time to be advised
+
+MIGRATIONS_TABLE = 'index_migrations'
+
+# Curated indexes for the hottest filters in the server / recorder_service.
+# (name, table, columns, partial WHERE or None) - applied once, recorded in index_migrations.
+INDEX_MIGRATIONS = [
+    ('idx_rt_recorder_open', 'recorded_trades', ('recorder_id',), "status = 'open'"),
+    ('idx_rt_recorder_exit_time', 'recorded_trades', ('recorder_id', 'exit_time'), None),
+    ('idx_rs_recorder_created', 'recorded_signals', ('recorder_id', 'created_at'), None),
+    ('idx_rp_recorder_ticker_open', 'recorder_positions', ('recorder_id', 'ticker'), "status = 'open'"),
+    ('idx_traders_user', 'traders', ('user_id',), None),
+    ('idx_traders_account_subaccount', 'traders', ('account_id', 'subaccount_id'), None),
+]
+
+
+# ============================================================================
+# FINGERPRINTS
+# ============================================================================
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s|\?")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS_RE = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_WS_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Normalize a statement so every execution of the same query shares one key."""
+    fp = _STRING_RE.sub('?', sql)
+    fp = _PLACEHOLDER_RE.sub('?', fp)
+    fp = _NUMBER_RE.sub('?', fp)
+    fp = _LIST_RE.sub('(?+)', fp)
+    fp = _ROWS_RE.sub('(?+), ...', fp)
+    return _WS_RE.sub(' ', fp).strip()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _QueryStats:
+    """Counters for one fingerprint."""
+
+    __slots__ = ('fingerprint', 'calls', 'total_ms', 'max_ms', 'latencies', 'variants',
+                 'first_seen', 'last_seen', 'explain_at', 'plan',
+                 'seq_scans', 'plan_error')
+
+    def __init__(self, fp):
+        self.fingerprint = fp
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.variants = []         # Distinct raw SQL texts (capped)
+        self.first_seen = self.last_seen = time.time()
+        self.explain_at = 0.0
+        self.plan = None
+        self.seq_scans = ()
+        self.plan_error = None
+
+    def add(self, sql, elapsed_ms):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.latencies.append(elapsed_ms)
+        self.last_seen = time.time()
+        if len(self.variants) < MAX_SQL_VARIANTS and sql not in self.variants:
+            self.variants.append(sql)
+
+    @property
+    def constant_sql(self):
+        """True when every call used the same SQL text (its literals are constants)."""
+        return len(self.variants) == 1
+
+    def to_dict(self):
+        lat = sorted(self.latencies)
+        return {
+            'fingerprint': self.fingerprint,
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 2),
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'p50_ms': round(_percentile(lat, 50), 3),
+            'p95_ms': round(_percentile(lat, 95), 3),
+            'p99_ms': round(_percentile(lat, 99), 3),
+            'max_ms': round(self.max_ms, 3),
+            'sql_variants': len(self.variants),
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'explained_at': self.explain_at or None,
+            'plan': self.plan,
+            'seq_scans': list(self.seq_scans),
+            'plan_error': self.plan_error,
+        }
+
+
+# ============================================================================
+# PROFILER
+# ============================================================================
+
+class QueryProfiler:
+    """Per-process statement statistics with background EXPLAIN sampling."""
+
+    def __init__(self):
+        self.enabled = os.environ.get('QUERY_PROFILER', '').lower() in ('1', 'true', 'yes')
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._explain_queue = queue.Queue(maxsize=100)
+        self._explain_thread = None
+        self._get_connection = None
+        self._is_postgres = None
+        self.started_at = time.time()
+        self.dropped = 0
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def set_explainer(self, get_connection, is_postgres):
+        """Connection source used for EXPLAIN samples (same database as the app)."""
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.dropped = 0
+            self.started_at = time.time()
+
+    def record(self, sql, params, started):
+        """Called by the cursor wrappers with time.perf_counter() taken before execute."""
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if not isinstance(sql, str) or sql.lstrip()[:7].upper() == 'EXPLAIN':
+            return
+        fp = fingerprint(sql)
+        now = time.time()
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    self.dropped += 1
+                    return
+                stats = self._stats[fp] = _QueryStats(fp)
+            stats.add(sql, elapsed_ms)
+            explain = (elapsed_ms >= SLOW_MS and self._get_connection is not None
+                       and now - stats.explain_at >= EXPLAIN_INTERVAL and _explainable(sql))
+            if explain:
+                stats.explain_at = now
+        if explain:
+            self._queue_explain(stats, sql, params)
+
+    # ------------------------------------------------------------------
+    # EXPLAIN sampling
+    # ------------------------------------------------------------------
+
+    def _queue_explain(self, stats, sql, params):
+        try:
+            self._explain_queue.put_nowait((stats, sql, params))
+        except queue.Full:
+            stats.explain_at = 0.0
+            return
+        if self._explain_thread is None or not self._explain_thread.is_alive():
+            with self._lock:
+                if self._explain_thread is None or not self._explain_thread.is_alive():
+                    self._explain_thread = threading.Thread(
+                        target=self._explain_loop, daemon=True, name='query-explain')
+                    self._explain_thread.start()
+
+    def _explain_loop(self):
+        while True:
+            stats, sql, params = self._explain_queue.get()
+            try:
+                stats.plan, stats.seq_scans = explain(self._get_connection, self._is_postgres(), sql, params)
+                stats.plan_error = None
+            except Exception as e:
+                stats.plan_error = str(e)[:200]
+                logger.debug(f"EXPLAIN failed for {stats.fingerprint[:80]}: {e}")
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def top(self, limit=50, order='total_ms'):
+        with self._lock:
+            rows = [s.to_dict() for s in self._stats.values()]
+        if order not in ('total_ms', 'calls', 'p95_ms', 'p99_ms', 'max_ms', 'mean_ms'):
+            order = 'total_ms'
+        rows.sort(key=lambda r: r[order], reverse=True)
+        return rows[:limit]
+
+    def snapshot(self, limit=50, order='total_ms'):
+        with self._lock:
+            fingerprints = len(self._stats)
+            calls = sum(s.calls for s in self._stats.values())
+            total_ms = sum(s.total_ms for s in self._stats.values())
+        return {
+            'enabled': self.enabled,
+            'since': self.started_at,
+            'fingerprints': fingerprints,
+            'dropped_fingerprints': self.dropped,
+            'calls': calls,
+            'total_ms': round(total_ms, 2),
+            'slow_ms': SLOW_MS,
+            'explain_interval': EXPLAIN_INTERVAL,
+            'queries': self.top(limit, order),
+        }
+
+    def stats_items(self):
+        with self._lock:
+            return list(self._stats.values())
+
+
+def _explainable(sql):
+    head = sql.lstrip()[:6].upper()
+    return head in ('SELECT', 'UPDATE', 'DELETE') or head.startswith('WITH')
+
+
+def explain(get_connection, is_postgres, sql, params):
+    """(plan lines, scanned table names) for one statement, on a separate connection."""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        if is_postgres:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params or None)
+            row = cursor.fetchone()
+            doc = None if row is None else list(row.values())[0] if hasattr(row, 'values') else row[0]
+            if isinstance(doc, str):
+                import json
+                doc = json.loads(doc)
+            lines, scans = [], []
+            _walk_pg_plan(doc[0]['Plan'] if doc else {}, 0, lines, scans)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params or ())
+            lines = [row[3] for row in cursor.fetchall()]
+            scans = []
+            for line in lines:
+                parts = line.split()
+                if parts and parts[0] == 'SCAN' and 'USING' not in parts:
+                    name = parts[2] if len(parts) > 2 and parts[1] == 'TABLE' else parts[1]
+                    scans.append(name)
+        return lines, tuple(dict.fromkeys(scans))
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        conn.close()
+
+
+def _walk_pg_plan(node, depth, lines, scans):
+    if not node:
+        return
+    label = node.get('Node Type', '?')
+    if node.get('Relation Name'):
+        label += f" on {node['Relation Name']}"
+    if node.get('Index Name'):
+        label += f" using {node['Index Name']}"
+    if node.get('Filter'):
+        label += f" filter {node['Filter']}"
+    lines.append('  ' * depth + f"{label} (cost={node.get('Total Cost')}, rows={node.get('Plan Rows')})")
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name'):
+        scans.append(node['Relation Name'])
+    for child in node.get('Plans', []):
+        _walk_pg_plan(child, depth + 1, lines, scans)
+
+
+# ============================================================================
+# INDEX ADVISOR
+# ============================================================================
+
+_KEYWORDS = {'WHERE', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'FULL', 'CROSS', 'ON', 'ORDER',
+             'GROUP', 'LIMIT', 'SET', 'USING', 'HAVING', 'UNION', 'RETURNING', 'OFFSET', 'AS'}
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+_SUBQUERY_RE = re.compile(r'\(\s*SELECT\b[^()]*\)', re.I)
+_WHERE_RE = re.compile(r'\bWHERE\b(.*?)(?=\bORDER\s+BY\b|\bGROUP\s+BY\b|\bLIMIT\b|\bOFFSET\b|'
+                       r'\bRETURNING\b|\bFOR\s+UPDATE\b|\bHAVING\b|\bUNION\b|$)', re.I | re.S)
+_ORDER_RE = re.compile(r'\bORDER\s+BY\s+(?:(\w+)\.)?(\w+)', re.I)
+_PRED_RE = re.compile(r'^\(*\s*(?:(\w+)\.)?(\w+)\s*(=|\bIN\b|\bIS\s+NULL\b|>=|<=|>|<|\bBETWEEN\b)\s*(.*)$', re.I | re.S)
+_CONST_RE = re.compile(r"^('[^']*'|TRUE|FALSE)\s*\)*$", re.I)
+_RANGE_OPS = ('>=', '<=', '>', '<', 'BETWEEN')
+_CATALOG_PREFIXES = ('sqlite_', 'pg_', 'information_schema', MIGRATIONS_TABLE)
+_CONJ_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|[()]|\b(?:AND|OR|BETWEEN)\b", re.I)
+
+
+def _split_conjuncts(where):
+    """Top-level AND terms, keeping BETWEEN x AND y together; None if the clause ORs."""
+    depth, start, terms, between = 0, 0, [], False
+    for token in _CONJ_TOKEN_RE.finditer(where):
+        word = token.group(0).upper()
+        if word == '(':
+            depth += 1
+        elif word == ')':
+            depth -= 1
+        elif depth or word.startswith("'"):
+            continue
+        elif word == 'OR':
+            return None
+        elif word == 'BETWEEN':
+            between = True
+        elif between:
+            between = False
+        else:
+            terms.append(where[start:token.start()])
+            start = token.end()
+    terms.append(where[start:])
+    return [t.strip() for t in terms if t.strip()]
+
+
+def _candidate_indexes(sql, constant_sql):
+    """[(table, key_columns, partial_where)] suggested by one statement's WHERE clause."""
+    flat = sql
+    while True:
+        reduced = _SUBQUERY_RE.sub('(?)', flat)
+        if reduced == flat:
+            break
+        flat = reduced
+    tables = {}
+    for table, alias in _TABLE_RE.findall(flat):
+        if table.lower().startswith(_CATALOG_PREFIXES):
+            return []
+        tables[table] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            tables[alias] = table
+    if not tables:
+        return []
+    match = _WHERE_RE.search(flat)
+    if not match:
+        return []
+    terms = _split_conjuncts(match.group(1))
+    if not terms:
+        return []
+    single = next(iter(set(tables.values()))) if len(set(tables.values())) == 1 else None
+
+    per_table = {}
+    for term in terms:
+        pred = _PRED_RE.match(term)
+        if not pred:
+            continue
+        qualifier, column, op, rest = pred.groups()
+        table = tables.get(qualifier) if qualifier else single
+        if not table:
+            continue
+        op = ' '.join(op.upper().split())
+        rest = rest.strip()
+        if rest[:1].isalpha() and '.' in rest.split()[0] and not _CONST_RE.match(rest):
+            continue  # Join condition (a.x = b.y)
+        entry = per_table.setdefault(table, {'eq': [], 'range': [], 'partial': []})
+        if op in _RANGE_OPS:
+            entry['range'].append(column)
+        elif op == '=' and constant_sql and _CONST_RE.match(rest):
+            entry['partial'].append(f"{column} = {_CONST_RE.match(rest).group(1)}")
+        else:
+            entry['eq'].append(column)
+
+    order = _ORDER_RE.search(flat)
+    order_table = order_column = None
+    if order:
+        order_table = tables.get(order.group(1)) if order.group(1) else single
+        order_column = order.group(2)
+
+    candidates = []
+    for table, entry in per_table.items():
+        if 'id' in entry['eq']:
+            continue  # Primary-key lookup
+        keys = list(dict.fromkeys(entry['eq']))
+        partial = entry['partial']
+        if entry['range']:
+            keys.append(entry['range'][0])
+        elif order_table == table and order_column and keys and order_column not in keys and order_column != 'id':
+            keys.append(order_column)
+        if not keys and partial:
+            keys, partial = [p.split(' = ')[0] for p in partial], []
+        if not keys:
+            continue
+        candidates.append((table, tuple(dict.fromkeys(keys)), ' AND '.join(partial) or None))
+    return candidates
+
+
+_INDEX_COLS_RE = re.compile(r'\bON\s+(?:\w+\.)?"?(\w+)"?\s*(?:USING\s+\w+\s*)?\(([^)]*)\)', re.I)
+
+
+def existing_indexes(cursor, is_postgres):
+    """{table: [[columns], ...]} from the catalog, primary keys included."""
+    if is_postgres:
+        cursor.execute("SELECT indexdef AS ddl FROM pg_indexes WHERE schemaname = current_schema()")
+    else:
+        cursor.execute("SELECT sql AS ddl FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    result = {}
+    for row in cursor.fetchall():
+        ddl = row['ddl'] if hasattr(row, 'keys') else row[0]
+        match = _INDEX_COLS_RE.search(ddl or '')
+        if not match:
+            continue
+        cols = [c.strip().split()[0].strip('"').lower() for c in match.group(2).split(',') if c.strip()]
+        result.setdefault(match.group(1).lower(), []).append(cols)
+    return result
+
+
+def _covered(table, keys, indexes):
+    """An existing index whose leading columns are the proposal's columns (in any order)."""
+    keys = {k.lower() for k in keys}
+    return any(set(cols[:len(keys)]) == keys for cols in indexes.get(table.lower(), []))
+
+
+def index_name(table, columns, where=None):
+    name = f"idx_{table}_{'_'.join(columns)}"
+    if where:
+        name += '_' + re.sub(r'\W+', '_', where.split('=')[-1]).strip('_').lower()
+    return name[:63]
+
+
+def index_ddl(name, table, columns, where=None):
+    for ident in (name, table) + tuple(columns):
+        if not re.match(r'^\w+$', ident):
+            raise ValueError(f"Invalid identifier: {ident!r}")
+    if where and not re.match(r"^\w+ = ('[^']*'|TRUE|FALSE)( AND \w+ = ('[^']*'|TRUE|FALSE))*$", where, re.I):
+        raise ValueError(f"Invalid partial predicate: {where!r}")
+    ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    return ddl + (f" WHERE {where}" if where else '')
+
+
+def advise(profiler, get_connection, is_postgres, limit=25):
+    """Index proposals for fingerprints that scan, ranked by the time they cost."""
+    conn = get_connection()
+    try:
+        indexes = existing_indexes(conn.cursor(), is_postgres)
+    finally:
+        conn.close()
+
+    proposals = {}
+    for stats in profiler.stats_items():
+        if not stats.variants:
+            continue
+        sql = stats.variants[0]
+        if stats.plan is not None:
+            if not stats.seq_scans:
+                continue
+            evidence = 'seq_scan'
+        elif stats.total_ms >= ADVISE_MIN_TOTAL_MS:
+            evidence = 'unexplained'
+        else:
+            continue
+        aliases = {alias: table for table, alias in _TABLE_RE.findall(sql) if alias}
+        scanned = {aliases.get(name, name).lower() for name in stats.seq_scans}
+        for table, keys, where in _candidate_indexes(sql, stats.constant_sql):
+            if evidence == 'seq_scan' and table.lower() not in scanned:
+                continue
+            if _covered(table, keys, indexes):
+                continue
+            name = index_name(table, keys, where)
+            prop = proposals.get(name)
+            if prop is None:
+                prop = proposals[name] = {
+                    'name': name, 'table': table, 'columns': list(keys), 'where': where,
+                    'ddl': index_ddl(name, table, keys, where), 'evidence': evidence,
+                    'calls': 0, 'total_ms': 0.0, 'fingerprints': [],
+                }
+            prop['calls'] += stats.calls
+            prop['total_ms'] = round(prop['total_ms'] + stats.total_ms, 2)
+            if evidence == 'seq_scan':
+                prop['evidence'] = 'seq_scan'
+            if len(prop['fingerprints']) < 3:
+                prop['fingerprints'].append(stats.fingerprint[:300])
+    return sorted(proposals.values(), key=lambda p: p['total_ms'], reverse=True)[:limit]
+
+
+# ============================================================================
+# INDEX MIGRATIONS
+# ============================================================================
+
+def _ensure_migrations_table(cursor, is_postgres):
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            name {'VARCHAR(63)' if is_postgres else 'TEXT'} PRIMARY KEY,
+            ddl TEXT NOT NULL,
+            source {'VARCHAR(20)' if is_postgres else 'TEXT'},
+            duration_ms REAL,
+            applied_at {'TIMESTAMP' if is_postgres else 'TEXT'} DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def applied_migrations(get_connection, is_postgres):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        _ensure_migrations_table(cursor, is_postgres)
+        conn.commit()
+        cursor.execute(f'SELECT name, ddl, source, duration_ms, applied_at FROM {MIGRATIONS_TABLE} ORDER BY applied_at')
+        return [dict(row) if hasattr(row, 'keys') else dict(zip(('name', 'ddl', 'source', 'duration_ms', 'applied_at'), row))
+                for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def apply_index(get_connection, is_postgres, name, table, columns, where=None, source='advisor'):
+    """Create one index (CONCURRENTLY on PostgreSQL) and record it. Returns the migration row."""
+    ddl = index_ddl(name, table, columns, where)
+    ph = '%s' if is_postgres else '?'
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        _ensure_migrations_table(cursor, is_postgres)
+        conn.commit()
+        started = time.perf_counter()
+        if is_postgres:
+            # CONCURRENTLY cannot run inside a transaction block
+            raw = getattr(conn, '_conn', conn)
+            raw.autocommit = True
+            try:
+                cursor.execute(ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+            except Exception:
+                # A failed concurrent build leaves an INVALID index behind
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+                raise
+            finally:
+                raw.autocommit = False
+        else:
+            cursor.execute(ddl)
+        duration_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        conflict = 'ON CONFLICT (name) DO NOTHING' if is_postgres else ''
+        cursor.execute(f'''
+            INSERT {'' if is_postgres else 'OR IGNORE '}INTO {MIGRATIONS_TABLE} (name, ddl, source, duration_ms)
+            VALUES ({ph}, {ph}, {ph}, {ph}) {conflict}
+        ''', (name, ddl, source, duration_ms))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"🗂️ Index {name} applied in {duration_ms}ms ({source})")
+    return {'name': name, 'ddl': ddl, 'source': source, 'duration_ms': duration_ms}
+
+
+def run_index_migrations(get_connection, is_postgres, migrations=None):
+    """Apply curated INDEX_MIGRATIONS not yet recorded. Failures are retried on the next start."""
+    done = {m['name'] for m in applied_migrations(get_connection, is_postgres)}
+    applied = []
+    for name, table, columns, where in (migrations or INDEX_MIGRATIONS):
+        if name in done:
+            continue
+        try:
+            applied.append(apply_index(get_connection, is_postgres, name, table, columns, where, source='migration'))
+        except Exception as e:
+            logger.warning(f"Index migration {name} failed: {e}")
+    return applied
+
+
+# ============================================================================
+# SQLITE INSTRUMENTATION
+# ============================================================================
+
+class ProfiledSQLiteCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports every statement to the profiler."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _profiler.record(sql, parameters, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _profiler.record(sql, None, started)
+
+
+class ProfiledSQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (and shortcut execute) are profiled."""
+
+    def cursor(self, factory=ProfiledSQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def sqlite_connection_factory():
+    """`factory=` for sqlite3.connect: profiled only while the profiler is on."""
+    return ProfiledSQLiteConnection if _profiler.enabled else sqlite3.Connection
+
+
+# ============================================================================
+# SINGLETON
+# ============================================================================
+
+_profiler = QueryProfiler()
+
+
+def get_query_profiler():
+    return _profiler
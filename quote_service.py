@@ -0,0 +1,265 @@
+"""
+Quote Service - One batched, cached source of equity quotes
+===========================================================
+BEFORE: fetch_live_stock_prices (quant screener, movers, ticker reports),
+insider_service.get_stock_price, /api/insiders/price and the stock heatmap each
+fetched quotes on their own: separate dict caches with different TTLs (30s,
+300s, none), one TradingView scanner call per caller and one Yahoo request per
+symbol, serially, for the heatmap and insider signals.
+
+AFTER:
+- get_quotes(symbols) serves fresh symbols from a bounded LRU. Misses join the
+  batch currently being collected; the first caller waits BATCH_WINDOW for
+  other callers, then fetches the whole batch in one scanner call (chunked at
+  CHUNK_SYMBOLS). A symbol already being fetched is never requested twice.
+- Freshness is per call (max_age), so the heatmap, the screener and insider
+  signals read the same snapshot at their own tolerance.
+- If a refresh fails (the scanner request raised) the last known quote is
+  returned; a symbol a successful scan did not list is simply missing.
+- get_quote() falls back to Yahoo's chart API for symbols the US scanner does
+  not list (OTC insider tickers) and for a last known quote older than max_age;
+  the result is stored in the same LRU.
+
+Usage:
+    from quote_service import get_quote_service
+    quotes = get_quote_service().get_quotes(['AAPL', 'MSFT'], max_age=30)
+    aapl = get_quote_service().get_quote('AAPL', max_age=300)
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+import requests
+
+logger = logging.getLogger('quote_service')
+
+SCANNER_URL = 'https://scanner.tradingview.com/america/scan'
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}'
+EXCHANGES = ('NASDAQ', 'NYSE', 'AMEX')
+COLUMNS = ['close', 'change', 'change_abs', 'volume', 'name', 'market_cap_basic']
+
+DEFAULT_MAX_AGE = 30            # Seconds a quote is served without refetching
+BATCH_WINDOW = 0.05             # How long the first caller waits for others to join its batch
+CHUNK_SYMBOLS = 300             # Symbols per scanner request (x len(EXCHANGES) tickers)
+MAX_SYMBOLS = 5000              # LRU bound
+FETCH_TIMEOUT = 10
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Origin': 'https://www.tradingview.com',
+    'Referer': 'https://www.tradingview.com/'
+}
+
+
+class _Batch:
+    __slots__ = ('symbols', 'quotes', 'event', 'failed')
+
+    def __init__(self):
+        self.symbols = set()
+        self.quotes = {}
+        self.event = threading.Event()
+        self.failed = False
+
+
+class QuoteService:
+    """Coalescing, LRU-cached TradingView scanner quotes."""
+
+    def __init__(self, cookies: Callable[[], Optional[dict]] = None, max_symbols: int = MAX_SYMBOLS,
+                 window: float = BATCH_WINDOW):
+        self._cookies = cookies
+        self._max_symbols = max_symbols
+        self._window = window
+        self._lock = threading.Lock()
+        self._quotes: OrderedDict = OrderedDict()        # symbol -> quote dict (with 'updated')
+        self._collecting: Optional[_Batch] = None
+        self._inflight: Dict[str, _Batch] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'batches': 0, 'requests': 0,
+                      'errors': 0, 'fallbacks': 0}
+
+    def set_cookies(self, cookies: Callable[[], Optional[dict]]):
+        """TradingView session cookies provider (real-time data when logged in)."""
+        self._cookies = cookies
+
+    # ── Reads ───────────────────────────────────────────────────────────────
+
+    def get_quotes(self, symbols: Iterable[str], max_age: float = DEFAULT_MAX_AGE) -> Dict[str, dict]:
+        """
+        {symbol: quote} for every symbol the scanner knows. Quotes younger than
+        max_age come from the cache; the rest are fetched in one shared batch.
+        """
+        wanted = list(dict.fromkeys(s.upper().strip() for s in symbols if s and s.strip()))
+        results = {}
+        waits = {}
+        leader = None
+        now = time.time()
+        with self._lock:
+            for symbol in wanted:
+                quote = self._quotes.get(symbol)
+                if quote is not None and now - quote['updated'] < max_age:
+                    self._quotes.move_to_end(symbol)
+                    results[symbol] = quote
+                    self.stats['hits'] += 1
+                    continue
+                batch = self._inflight.get(symbol)
+                if batch is not None:
+                    self.stats['coalesced'] += 1
+                else:
+                    self.stats['misses'] += 1
+                    if self._collecting is None:
+                        self._collecting = leader = _Batch()
+                    batch = self._collecting
+                    batch.symbols.add(symbol)
+                    self._inflight[symbol] = batch
+                waits[symbol] = batch
+
+        if leader is not None:
+            self._run(leader)
+        for symbol, batch in waits.items():
+            finished = batch.event.wait(timeout=FETCH_TIMEOUT * 2 + self._window)
+            quote = batch.quotes.get(symbol)
+            if quote is None and (batch.failed or not finished):
+                with self._lock:
+                    quote = self._quotes.get(symbol)     # Last known quote if the refresh failed
+            if quote is not None:
+                results[symbol] = quote
+        return results
+
+    def get_quote(self, symbol: str, max_age: float = DEFAULT_MAX_AGE, fallback: bool = True) -> Optional[dict]:
+        """Single quote; symbols the scanner does not return are looked up on Yahoo (if fallback)."""
+        symbol = (symbol or '').upper().strip()
+        if not symbol:
+            return None
+        quote = self.get_quotes([symbol], max_age=max_age).get(symbol)
+        if fallback and (quote is None or time.time() - quote['updated'] >= max_age):
+            fresh = self._fetch_yahoo(symbol)
+            if fresh is not None:
+                self.stats['fallbacks'] += 1
+                self._store({symbol: fresh})
+                quote = fresh
+        return quote
+
+    # ── Fetching ────────────────────────────────────────────────────────────
+
+    def _run(self, batch: _Batch):
+        time.sleep(self._window)                         # Let concurrent callers join this batch
+        with self._lock:
+            if self._collecting is batch:
+                self._collecting = None
+            symbols = sorted(batch.symbols)
+        try:
+            self.stats['batches'] += 1
+            for i in range(0, len(symbols), CHUNK_SYMBOLS):
+                batch.quotes.update(self._fetch_scanner(symbols[i:i + CHUNK_SYMBOLS]))
+            self._store(batch.quotes)
+        except Exception as e:
+            batch.failed = True
+            self.stats['errors'] += 1
+            logger.error(f"Error fetching stock prices from TradingView: {e}")
+        finally:
+            with self._lock:
+                for symbol in symbols:
+                    if self._inflight.get(symbol) is batch:
+                        del self._inflight[symbol]
+            batch.event.set()
+
+    def _store(self, quotes: Dict[str, dict]):
+        with self._lock:
+            for symbol, quote in quotes.items():
+                self._quotes[symbol] = quote
+                self._quotes.move_to_end(symbol)
+            while len(self._quotes) > self._max_symbols:
+                self._quotes.popitem(last=False)
+
+    def _fetch_scanner(self, symbols: list) -> Dict[str, dict]:
+        cookies = {}
+        session = self._cookies() if self._cookies else None
+        if session:
+            cookies = {
+                'sessionid': session.get('sessionid', ''),
+                'sessionid_sign': session.get('sessionid_sign', '')
+            }
+        payload = {
+            'symbols': {'tickers': [f'{exchange}:{symbol}' for symbol in symbols for exchange in EXCHANGES]},
+            'columns': COLUMNS
+        }
+        self.stats['requests'] += 1
+        response = requests.post(SCANNER_URL, json=payload, headers=HEADERS, cookies=cookies,
+                                 timeout=FETCH_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"scanner returned HTTP {response.status_code}")
+
+        wanted = set(symbols)
+        now = time.time()
+        quotes = {}
+        for item in response.json().get('data', []):
+            symbol_full = item.get('s', '')
+            values = item.get('d', [])
+            symbol = symbol_full.split(':')[-1]
+            if len(values) < 4 or symbol not in wanted or symbol in quotes:
+                continue
+            price, change_pct, change_abs, volume = values[:4]
+            market_cap = values[5] if len(values) > 5 else None
+            quotes[symbol] = {
+                'price': round(float(price), 2) if price else 0,
+                'change': round(float(change_abs), 2) if change_abs else 0,
+                'change_pct': round(float(change_pct), 2) if change_pct else 0,
+                'volume': int(volume) if volume else 0,
+                'market_cap': float(market_cap) if market_cap else None,
+                'exchange': symbol_full.split(':')[0],
+                'updated': now
+            }
+        return quotes
+
+    def _fetch_yahoo(self, symbol: str) -> Optional[dict]:
+        try:
+            response = requests.get(YAHOO_CHART_URL.format(symbol=symbol),
+                                    params={'interval': '1d', 'range': '5d'},
+                                    headers={'User-Agent': 'Mozilla/5.0'}, timeout=FETCH_TIMEOUT)
+            if response.status_code != 200:
+                return None
+            result = response.json().get('chart', {}).get('result') or []
+            if not result:
+                return None
+            meta = result[0].get('meta', {})
+            price = meta.get('regularMarketPrice')
+            if not price:
+                return None
+            prev_close = meta.get('previousClose') or meta.get('chartPreviousClose')
+            change = price - prev_close if prev_close else 0
+            return {
+                'price': round(price, 2),
+                'change': round(change, 2),
+                'change_pct': round(change / prev_close * 100, 2) if prev_close else 0,
+                'volume': int(meta.get('regularMarketVolume') or 0),
+                'market_cap': None,
+                'exchange': meta.get('exchangeName'),
+                'updated': time.time()
+            }
+        except Exception as e:
+            logger.debug(f"Yahoo quote lookup failed for {symbol}: {e}")
+            return None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            cached = len(self._quotes)
+        return {'cached': cached, **self.stats}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_quote_service(cookies: Callable[[], Optional[dict]] = None) -> QuoteService:
+    """Process-wide QuoteService (the first caller that passes a cookie provider configures it)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = QuoteService(cookies)
+    if cookies is not None and _service._cookies is None:
+        _service.set_cookies(cookies)
+    return _service
@@ -0,0 +1,231 @@
+"""
+Recorder Counters
+=================
+Live per-recorder counters for the control center, one compact Redis hash per
+recorder ("jt:rc:{recorder_id}"):
+
+    open_trades, closed_trades, signal_count, last_signal, last_signal_at, built_at
+
+BEFORE: /api/control-center/stats joined recorded_trades (all history) and ran
+a correlated "latest recorded_signals row" subquery per recorder on every poll.
+
+AFTER: the webhook and trade-close paths adjust the hash once their write has
+committed (HINCRBY / HSET, each refreshing the key's TTL). Bulk changes (manual close, history reset, other processes)
+call invalidate(); the next read rebuilds only those recorders with one
+grouped query. A hash older than REBUILD_INTERVAL is rebuilt on read, so a
+write path that forgets to report heals on its own.
+
+Without Redis the counters live in a process-local dict with a shorter
+rebuild interval (writes from other processes are invisible there).
+"""
+
+import time
+import logging
+import threading
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('recorder_counters')
+
+KEY_PREFIX = 'jt:rc:'
+REBUILD_INTERVAL = 600         # Seconds before a Redis hash is recomputed from the DB
+LOCAL_REBUILD_INTERVAL = 30    # Same, for the in-process fallback
+KEY_TTL = 86400                # Idle hashes are dropped after a day
+
+_INT_FIELDS = ('open_trades', 'closed_trades', 'signal_count')
+
+_local_lock = threading.Lock()
+_local = {}                    # recorder_id -> counters dict
+
+
+def _key(recorder_id):
+    return f'{KEY_PREFIX}{recorder_id}'
+
+
+def _write(recorder_id, apply):
+    """Run apply(pipe, key) and refresh the key's TTL, so hashes created by a
+    write to a missing key (no built_at, never read) still expire."""
+    r = _get_redis()
+    if not r:
+        return False
+    try:
+        key = _key(recorder_id)
+        pipe = r.pipeline(transaction=False)
+        apply(pipe, key)
+        pipe.expire(key, KEY_TTL)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.debug(f"Redis counter error: {e}")
+        return False
+
+
+def _local_update(recorder_id, fn):
+    with _local_lock:
+        counters = _local.get(recorder_id)
+        if counters is not None:
+            fn(counters)
+
+
+# ============================================================================
+# WRITE PATHS
+# ============================================================================
+
+def record_signal(recorder_id, action):
+    """A signal was recorded for this recorder."""
+    if not recorder_id:
+        return
+    now = time.time()
+    if _write(recorder_id, lambda pipe, key: pipe.hset(
+            key, mapping={'last_signal': action or '', 'last_signal_at': repr(now)})):
+        return
+    _local_update(recorder_id, lambda c: c.update(last_signal=action, last_signal_at=now))
+
+
+def set_signal_count(recorder_id, signal_count):
+    """recorders.signal_count was written."""
+    if not recorder_id:
+        return
+    if _write(recorder_id, lambda pipe, key: pipe.hset(key, 'signal_count', int(signal_count))):
+        return
+    _local_update(recorder_id, lambda c: c.update(signal_count=int(signal_count)))
+
+
+def trade_opened(recorder_id, count=1):
+    """`count` recorded_trades rows were inserted as open."""
+    _adjust(recorder_id, count, 0)
+
+
+def trade_closed(recorder_id, count=1):
+    """`count` open recorded_trades rows were closed."""
+    _adjust(recorder_id, -count, count)
+
+
+def _adjust(recorder_id, open_delta, closed_delta):
+    if not recorder_id or (not open_delta and not closed_delta):
+        return
+
+    def incr(pipe, key):
+        if open_delta:
+            pipe.hincrby(key, 'open_trades', open_delta)
+        if closed_delta:
+            pipe.hincrby(key, 'closed_trades', closed_delta)
+    if _write(recorder_id, incr):
+        return
+
+    def apply(c):
+        c['open_trades'] = max(0, c.get('open_trades', 0) + open_delta)
+        c['closed_trades'] = c.get('closed_trades', 0) + closed_delta
+    _local_update(recorder_id, apply)
+
+
+def invalidate(*recorder_ids):
+    """Drop counters so the next read rebuilds them (bulk updates/deletes)."""
+    ids = [rid for rid in recorder_ids if rid]
+    if not ids:
+        return
+    r = _get_redis()
+    if r:
+        try:
+            r.delete(*[_key(rid) for rid in ids])
+        except Exception as e:
+            logger.debug(f"Redis counter error: {e}")
+    with _local_lock:
+        for rid in ids:
+            _local.pop(rid, None)
+
+
+def invalidate_all():
+    """Drop every recorder's counters (global history reset)."""
+    r = _get_redis()
+    if r:
+        try:
+            keys = list(r.scan_iter(match=f'{KEY_PREFIX}*', count=500))
+            if keys:
+                r.delete(*keys)
+        except Exception as e:
+            logger.debug(f"Redis counter error: {e}")
+    with _local_lock:
+        _local.clear()
+
+
+# ============================================================================
+# READ PATH
+# ============================================================================
+
+def _decode(raw):
+    counters = {f: int(raw.get(f) or 0) for f in _INT_FIELDS}
+    counters['last_signal'] = raw.get('last_signal') or None
+    counters['last_signal_at'] = float(raw['last_signal_at']) if raw.get('last_signal_at') else None
+    counters['built_at'] = float(raw.get('built_at') or 0)
+    return counters
+
+
+def get_counters(recorder_ids, loader):
+    """
+    {recorder_id: counters} for the given recorders.
+    loader(missing_ids) -> {recorder_id: counters} rebuilds missing or stale
+    entries from the database in one pass; the result is written back.
+    """
+    ids = list(dict.fromkeys(rid for rid in recorder_ids if rid))
+    if not ids:
+        return {}
+    now = time.time()
+    result = {}
+    r = _get_redis()
+
+    if r:
+        try:
+            pipe = r.pipeline(transaction=False)
+            for rid in ids:
+                pipe.hgetall(_key(rid))
+            for rid, raw in zip(ids, pipe.execute()):
+                if raw and raw.get('built_at') and now - float(raw['built_at']) < REBUILD_INTERVAL:
+                    result[rid] = _decode(raw)
+        except Exception as e:
+            logger.debug(f"Redis counter read error: {e}")
+            r = None
+    if not r:
+        with _local_lock:
+            for rid in ids:
+                counters = _local.get(rid)
+                if counters and now - counters['built_at'] < LOCAL_REBUILD_INTERVAL:
+                    result[rid] = dict(counters)
+
+    missing = [rid for rid in ids if rid not in result]
+    if missing:
+        built = loader(missing) or {}
+        for rid in missing:
+            counters = {'open_trades': 0, 'closed_trades': 0, 'signal_count': 0,
+                        'last_signal': None, 'last_signal_at': None}
+            counters.update(built.get(rid) or {})
+            counters['built_at'] = now
+            result[rid] = counters
+        _store(missing, result, r)
+    return result
+
+
+def _store(recorder_ids, counters_by_id, r):
+    if r:
+        try:
+            pipe = r.pipeline(transaction=False)
+            for rid in recorder_ids:
+                c = counters_by_id[rid]
+                key = _key(rid)
+                pipe.delete(key)
+                pipe.hset(key, mapping={
+                    'open_trades': c['open_trades'],
+                    'closed_trades': c['closed_trades'],
+                    'signal_count': c['signal_count'],
+                    'last_signal': c['last_signal'] or '',
+                    'last_signal_at': repr(c['last_signal_at']) if c['last_signal_at'] else '',
+                    'built_at': repr(c['built_at']),
+                })
+                pipe.expire(key, KEY_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.debug(f"Redis counter write error: {e}")
+    with _local_lock:
+        for rid in recorder_ids:
+            _local[rid] = dict(counters_by_id[rid])
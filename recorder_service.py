@@ -54,6 +54,13 @@ except ImportError:
     DEFAULT_USER_TZ = pytz.timezone('America/Chicago')
 from flask import Flask, request, jsonify, render_template
 from async_utils import run_async  # Safe async execution - avoids "Event loop is closed" errors
+import recorder_counters  # Live per-recorder trade/signal counters (control center)
+from config_registry import get_config_registry  # Recorder/trader/account config, invalidated on CRUD
+from token_manager import get_token_manager  # Single owner of Tradovate tokens (expiry heap, single-flight renewal)
+from risk_engine import get_risk_engine  # Session daily-loss ledgers shared by every max-loss enforcer
+import query_profiler  # Opt-in SQL fingerprint/latency profiler (QUERY_PROFILER=1)
+from broker_sessions import get_broker_sessions  # Cached ProjectX sessions, contract lookups and account streams
+from tv_protocol import decode, encode_message, quote_price, symbol_root  # TradingView frame codec (shared with the server)
 
 # ============================================================================
 # Configuration
@@ -70,13 +77,6 @@ SERVICE_PORT = 8083
 DATABASE_PATH = 'just_trades.db'
 LOG_LEVEL = logging.INFO
 
-# ============================================================================
-# Token Cache - Prevents re-authentication on every trade (avoids rate limiting)
-# ============================================================================
-# Structure: {account_id: {'token': str, 'expires': datetime, 'md_token': str}}
-_TOKEN_CACHE: Dict[int, Dict] = {}
-_TOKEN_CACHE_LOCK = threading.Lock()
-
 # ============================================================================
 # 🚀 SCALABILITY CONFIG - HIVE MIND for 500+ accounts
 # ============================================================================
@@ -127,102 +127,60 @@ async def wait_for_rate_limit():
         await asyncio.sleep(0.5)
         logger.debug("⏳ Waiting for rate limit...")
 
+def _token_manager():
+    """Token manager (shared with the web server when this module is imported there)."""
+    return get_token_manager(get_db_connection, lambda: is_postgres, DATABASE_PATH)
+
 def get_cached_token(account_id: int) -> Optional[str]:
-    """Get cached token if still valid (with 5 minute buffer)."""
-    with _TOKEN_CACHE_LOCK:
-        cached = _TOKEN_CACHE.get(account_id)
-        if cached:
-            # Check if token expires in more than 5 minutes
-            expires = cached.get('expires')
-            if expires and isinstance(expires, datetime):
-                from datetime import timedelta
-                if datetime.utcnow() + timedelta(minutes=5) < expires:
-                    return cached.get('token')
-    return None
+    """Get the in-memory token if still valid (with 5 minute buffer). Never hits the DB or the API."""
+    return _token_manager().cached_token(account_id, min_ttl=300)
 
 def cache_token(account_id: int, token: str, expires: datetime, md_token: str = None):
-    """Cache a token for an account."""
-    with _TOKEN_CACHE_LOCK:
-        _TOKEN_CACHE[account_id] = {
-            'token': token,
-            'expires': expires,
-            'md_token': md_token
-        }
+    """Record a token obtained on the trade path (already written to the DB by the caller)."""
+    _token_manager().store(account_id, token, expires, md_token)
+    # Every token refresh lands here: drop the account row from the config registry
+    _config_registry().invalidate_account(account_id)
 
 def clear_cached_token(account_id: int):
-    """Clear cached token for an account."""
-    with _TOKEN_CACHE_LOCK:
-        _TOKEN_CACHE.pop(account_id, None)
+    """Forget an account's token (it will be reloaded from the DB on next use)."""
+    _token_manager().forget(account_id)
 
 def clear_all_cached_tokens():
-    """Clear all cached tokens - useful when re-enabling strategies after being away."""
-    with _TOKEN_CACHE_LOCK:
-        _TOKEN_CACHE.clear()
-        logger.info("🧹 Cleared all cached tokens")
+    """Reload every token from the DB - useful when re-enabling strategies after being away."""
+    _token_manager()._load()
+    logger.info("🧹 Reloaded all tokens from the database")
 
 # ============================================================================
-# WebSocket Connection Pool - Keep persistent connections (TradeManager's secret)
+# WebSocket Order Sockets - one authorized socket per account (opt-in)
 # ============================================================================
-# Structure: {subaccount_id: TradovateIntegration instance with active WebSocket}
-_WS_POOL: Dict[int, Any] = {}
-_WS_POOL_LOCK = asyncio.Lock()  # ASYNC lock - doesn't block event loop!
-
-async def get_pooled_connection(subaccount_id: int, is_demo: bool, access_token: str):
-    """Get or create a pooled WebSocket connection for an account. INSTANT if pooled."""
-    # DISABLED: WebSocket pool was NEVER functional (CLAUDE.md Rule 10).
-    # All orders use REST API. This function tried _ensure_websocket_connected()
-    # which hangs indefinitely, blocking ALL trades via _WS_POOL_LOCK.
-    # Root cause of 60-second async timeouts on every trade (Feb 24, 2026).
-    return None
-    from phantom_scraper.tradovate_integration import TradovateIntegration
-
-    # Fast path - check without lock first (read is safe)
-    if subaccount_id in _WS_POOL:
-        conn = _WS_POOL[subaccount_id]
-        if conn and getattr(conn, 'ws_connected', False):
-            return conn
-
-    # Need to create/update - use async lock
-    async with _WS_POOL_LOCK:
-        # Double-check after acquiring lock
-        if subaccount_id in _WS_POOL:
-            conn = _WS_POOL[subaccount_id]
-            if conn and getattr(conn, 'ws_connected', False):
-                return conn
-            # Connection dead, remove it
-            _WS_POOL.pop(subaccount_id, None)
-
-        # Create new connection
-        conn = TradovateIntegration(demo=is_demo)
-        await conn.__aenter__()
-        conn.access_token = access_token
-
-        # Establish WebSocket connection
-        ws_connected = await conn._ensure_websocket_connected()
-        if ws_connected:
-            _WS_POOL[subaccount_id] = conn
-            logger.info(f"🔌 WebSocket pool: Added connection for account {subaccount_id}")
-            return conn
-        else:
-            await conn.__aexit__(None, None, None)
-            return None
-
-def close_pooled_connection(subaccount_id: int):
-    """Close and remove a pooled connection."""
-    # Direct dict access is safe for removal
-    conn = _WS_POOL.pop(subaccount_id, None)
-    if conn:
-        try:
-            asyncio.create_task(conn.__aexit__(None, None, None))
-        except:
-            pass
+# The old pool cached whole TradovateIntegration objects and connected inline
+# under a global lock, which stalled every trade (Feb 24, 2026) - and run_async
+# gives each signal its own event loop, so nothing socket-bound survived a trade
+# anyway. Sockets now live on the broker-sessions loop (broker_sessions
+# .tradovate_order_socket): a trade gets a lease only if its account's socket
+# is already up, otherwise it goes over REST and the socket opens in the
+# background. Enabled with TRADOVATE_WS_ORDERS=1.
+
+def get_pooled_order_socket(subaccount_id: int, is_demo: bool, access_token: str):
+    """Lease on the account's order socket for TradovateIntegration.attach_order_socket, or None (REST)."""
+    from phantom_scraper.tradovate_integration import WS_ORDERS_ENABLED
+    if not WS_ORDERS_ENABLED:
+        return None
+    try:
+        return get_broker_sessions().tradovate_order_socket(subaccount_id, is_demo, access_token)
+    except Exception as e:
+        logger.warning(f"⚠️ Order socket lookup failed for account {subaccount_id}: {e}")
+        return None
 
-async def prewarm_websocket_connections():
+def prewarm_websocket_connections():
     """
-    Pre-warm WebSocket connections for all active trading accounts.
-    Called at startup for INSTANT execution on first trade.
+    Open order sockets for all active trading accounts in the background,
+    so the first trade after startup already has one.
     """
-    logger.info("🔥 PRE-WARMING WebSocket connections for instant execution...")
+    from phantom_scraper.tradovate_integration import WS_ORDERS_ENABLED
+    if not WS_ORDERS_ENABLED:
+        return
+    logger.info("🔥 PRE-WARMING Tradovate order sockets...")
 
     try:
         conn = get_db_connection()
@@ -242,290 +200,54 @@ async def prewarm_websocket_connections():
         accounts = cursor.fetchall()
         conn.close()
 
-        if not accounts:
-            logger.info("🔥 No accounts to pre-warm")
-            return
-
-        logger.info(f"🔥 Pre-warming {len(accounts)} WebSocket connections...")
+        for row in accounts:
+            subaccount_id = row[0] if isinstance(row, tuple) else row.get('subaccount_id')
+            token = row[1] if isinstance(row, tuple) else row.get('tradovate_token')
+            env = row[2] if isinstance(row, tuple) else row.get('environment', 'demo')
+            if subaccount_id and token:
+                get_pooled_order_socket(subaccount_id, env != 'live', token)
 
-        # Warm up connections in parallel (batches of 50 to avoid overwhelming)
-        batch_size = 50
-        warmed = 0
-        failed = 0
-
-        for i in range(0, len(accounts), batch_size):
-            batch = accounts[i:i+batch_size]
-            tasks = []
-
-            for row in batch:
-                subaccount_id = row[0] if isinstance(row, tuple) else row.get('subaccount_id')
-                token = row[1] if isinstance(row, tuple) else row.get('tradovate_token')
-                env = row[2] if isinstance(row, tuple) else row.get('environment', 'demo')
-                is_demo = env != 'live'
-
-                if subaccount_id and token:
-                    tasks.append(get_pooled_connection(subaccount_id, is_demo, token))
-
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for r in results:
-                if isinstance(r, Exception):
-                    failed += 1
-                elif r:
-                    warmed += 1
-                else:
-                    failed += 1
-
-        logger.info(f"🔥 WebSocket pre-warm complete: {warmed} connected, {failed} failed")
-        logger.info(f"🔥 Pool size: {len(_WS_POOL)} connections ready for INSTANT execution")
+        logger.info(f"🔥 Order socket pre-warm scheduled for {len(accounts)} accounts")
 
     except Exception as e:
         logger.error(f"❌ WebSocket pre-warm failed: {e}")
 
 def start_websocket_prewarm():
     """Start WebSocket pre-warming in background."""
-    def run_prewarm():
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(prewarm_websocket_connections())
-            loop.close()
-        except Exception as e:
-            logger.error(f"❌ Prewarm thread error: {e}")
-
-    thread = threading.Thread(target=run_prewarm, daemon=True, name="WebSocket-Prewarm")
+    thread = threading.Thread(target=prewarm_websocket_connections, daemon=True, name="WebSocket-Prewarm")
     thread.start()
     logger.info("🔥 WebSocket pre-warm thread started")
 
 # ============================================================================
 # 🛡️ BULLETPROOF TOKEN MANAGEMENT - Auto-refresh before expiry
 # ============================================================================
-# Tracks accounts that need re-authentication (OAuth expired and refresh failed)
-_ACCOUNTS_NEED_REAUTH: Set[int] = set()
-_TOKEN_REFRESH_RUNNING = False
+# token_manager.TokenManager renews each credential group once, shortly before
+# its token expires (expiry heap + jitter), writes the SAME token to every account
+# in the group and broadcasts it - this replaces the 5-minute polling daemon.
 
 def start_token_refresh_daemon():
     """
-    Start background daemon that proactively refreshes tokens before they expire.
+    Start the token manager's scheduler, which proactively renews tokens before they expire.
     This is how TradeManager avoids auth failures during trading.
     """
-    global _TOKEN_REFRESH_RUNNING
-    if _TOKEN_REFRESH_RUNNING:
-        return
-    _TOKEN_REFRESH_RUNNING = True
-    
-    def refresh_loop():
-        import requests
-        from datetime import timedelta
-        
-        logger.info("🛡️ Token refresh daemon started - will auto-refresh tokens before expiry")
-        
-        while _TOKEN_REFRESH_RUNNING:
-            try:
-                # CRITICAL FIX: Use get_db_connection() for PostgreSQL support in production
-                # Previously used sqlite3.connect(DATABASE_PATH) which is WRONG in production
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                ph = '%s' if is_postgres else '?'
-
-                # Get all accounts with tokens
-                cursor.execute('''
-                    SELECT id, name, tradovate_token, tradovate_refresh_token,
-                           token_expires_at, environment, username, password
-                    FROM accounts
-                    WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
-                ''')
-                accounts_raw = cursor.fetchall()
-                # Normalize rows to dicts (works for both psycopg2 RealDictCursor and sqlite3.Row)
-                accounts = [dict(a) for a in accounts_raw]
-
-                now = datetime.utcnow()
-
-                def _parse_token_expiry(expires_str):
-                    """Parse token expiry string into datetime."""
-                    if not expires_str:
-                        return None
-                    try:
-                        for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z']:
-                            try:
-                                return datetime.strptime(str(expires_str).split('+')[0].split('Z')[0], fmt.replace('%z', ''))
-                            except:
-                                continue
-                    except:
-                        pass
-                    return None
-
-                # GROUP accounts by credential set (username + environment)
-                # TradeSyncer pattern: refresh ONCE per credential, write SAME token to ALL accounts
-                # This prevents token divergence that causes the 429 storm in ws_connection_manager
-                from collections import defaultdict
-                credential_groups = defaultdict(list)
-                for acct in accounts:
-                    env = (acct.get('environment') or 'demo').lower()
-                    uname = (acct.get('username') or '').strip()
-                    group_key = (uname, env) if uname else (str(acct['id']), env)  # OAuth-only accounts get their own group
-                    credential_groups[group_key].append(acct)
-
-                logger.debug(f"🛡️ Token refresh: {len(accounts)} accounts in {len(credential_groups)} credential groups")
-
-                for group_key, group_accounts in credential_groups.items():
-                    # Find the first account in this group that needs refresh
-                    needs_refresh = False
-                    representative = None
-                    for acct in group_accounts:
-                        expires = _parse_token_expiry(acct.get('token_expires_at'))
-                        if not expires:
-                            continue
-                        time_until_expiry = expires - now
-                        if time_until_expiry < timedelta(minutes=30):
-                            needs_refresh = True
-                            representative = acct
-                            break
-
-                    # Also check for accounts that were re-authed (remove from reauth list)
-                    for acct in group_accounts:
-                        acct_id = acct['id']
-                        if acct_id in _ACCOUNTS_NEED_REAUTH:
-                            expires = _parse_token_expiry(acct.get('token_expires_at'))
-                            if expires and (expires - now) > timedelta(hours=1):
-                                _ACCOUNTS_NEED_REAUTH.discard(acct_id)
-                                logger.info(f"✅ [{acct.get('name')}] Token is valid again - removed from re-auth list")
-
-                    if not needs_refresh or not representative:
-                        continue
-
-                    env = (representative.get('environment') or 'demo').lower()
-                    refresh_token = representative.get('tradovate_refresh_token')
-                    username = representative.get('username')
-                    password = representative.get('password')
-                    acct_name = representative.get('name')
-                    group_ids = [a['id'] for a in group_accounts]
-                    group_names = [a.get('name', '?') for a in group_accounts]
-
-                    logger.info(f"🔄 [{acct_name}] Token expires soon, refreshing for group of {len(group_accounts)} accounts: {group_names}")
-
-                    base_url = 'https://demo.tradovateapi.com/v1' if env == 'demo' else 'https://live.tradovateapi.com/v1'
-                    refreshed = False
-                    new_token = None
-                    new_expiry = None
-
-                    # METHOD 1: Try refresh token
-                    if refresh_token and not refreshed:
-                        try:
-                            response = requests.post(
-                                f'{base_url}/auth/renewaccesstoken',
-                                headers={'Authorization': f'Bearer {refresh_token}', 'Content-Type': 'application/json'},
-                                timeout=10
-                            )
-                            if response.status_code == 200:
-                                data = response.json()
-                                new_token = data.get('accessToken')
-                                new_expiry = data.get('expirationTime')
-                                if new_token:
-                                    # Write SAME token to ALL accounts in this credential group
-                                    for gid in group_ids:
-                                        cursor.execute(f'''
-                                            UPDATE accounts
-                                            SET tradovate_token = {ph}, token_expires_at = {ph}
-                                            WHERE id = {ph}
-                                        ''', (new_token, new_expiry, gid))
-                                    conn.commit()
-                                    # Update cache for all accounts in group
-                                    try:
-                                        from dateutil.parser import parse as parse_date
-                                        parsed_expiry = parse_date(new_expiry)
-                                        for gid in group_ids:
-                                            cache_token(gid, new_token, parsed_expiry)
-                                    except:
-                                        pass
-                                    logger.info(f"✅ [{acct_name}] Token refreshed via refresh_token for {len(group_ids)} accounts! Expires: {new_expiry}")
-                                    refreshed = True
-                                    for gid in group_ids:
-                                        _ACCOUNTS_NEED_REAUTH.discard(gid)
-                        except Exception as e:
-                            logger.warning(f"⚠️ [{acct_name}] Refresh token failed: {e}")
-
-                    # METHOD 2: Try API Access with username/password
-                    if username and password and not refreshed:
-                        try:
-                            from tradovate_api_access import TradovateAPIAccess
-                            import asyncio
-
-                            async def do_api_access():
-                                api = TradovateAPIAccess(demo=(env == 'demo'))
-                                return await api.login(username, password, DATABASE_PATH, representative['id'])
-
-                            # Run async in sync context
-                            loop = asyncio.new_event_loop()
-                            result = loop.run_until_complete(do_api_access())
-                            loop.close()
-
-                            if result.get('success'):
-                                new_token = result.get('accessToken')
-                                new_expiry = result.get('expirationTime')
-                                # Write SAME token to ALL accounts in group
-                                for gid in group_ids:
-                                    cursor.execute(f'''
-                                        UPDATE accounts
-                                        SET tradovate_token = {ph}, token_expires_at = {ph}
-                                        WHERE id = {ph}
-                                    ''', (new_token, new_expiry, gid))
-                                conn.commit()
-                                try:
-                                    from dateutil.parser import parse as parse_date
-                                    parsed_expiry = parse_date(new_expiry)
-                                    for gid in group_ids:
-                                        cache_token(gid, new_token, parsed_expiry)
-                                except:
-                                    pass
-                                logger.info(f"✅ [{acct_name}] Token refreshed via API Access for {len(group_ids)} accounts!")
-                                refreshed = True
-                                for gid in group_ids:
-                                    _ACCOUNTS_NEED_REAUTH.discard(gid)
-                        except Exception as e:
-                            logger.warning(f"⚠️ [{acct_name}] API Access failed: {e}")
-
-                    # METHOD 3: Check if account has credentials (trading will still work)
-                    if not refreshed:
-                        if username and password:
-                            logger.warning(f"⚠️ [{acct_name}] Token refresh failed but has credentials - trades will work")
-                            for gid in group_ids:
-                                _ACCOUNTS_NEED_REAUTH.discard(gid)
-                        else:
-                            logger.error(f"❌ [{acct_name}] ALL REFRESH METHODS FAILED and no credentials - needs OAuth!")
-                            for gid in group_ids:
-                                _ACCOUNTS_NEED_REAUTH.add(gid)
-
-                conn.close()
-                
-            except Exception as e:
-                logger.error(f"❌ Token refresh daemon error: {e}")
-            
-            # Check every 5 minutes
-            time.sleep(300)
-    
-    thread = threading.Thread(target=refresh_loop, daemon=True, name="TokenRefreshDaemon")
-    thread.start()
-    logger.info("🛡️ Token refresh daemon thread started")
+    _token_manager().start()
 
 def get_accounts_needing_reauth() -> List[int]:
     """Get list of account IDs that need manual OAuth re-authentication."""
-    return list(_ACCOUNTS_NEED_REAUTH)
+    return _token_manager().accounts_needing_reauth()
 
 def is_account_auth_valid(account_id: int) -> bool:
     """Check if an account's authentication is valid (not in re-auth list)."""
-    return account_id not in _ACCOUNTS_NEED_REAUTH
+    return account_id not in _token_manager().need_reauth
 
 # Auto-start the token refresh daemon when module is imported
 # This ensures it runs whether this file is run directly or imported
 def _auto_start_daemon():
     """Auto-start daemon on module load."""
-    global _TOKEN_REFRESH_RUNNING
-    if not _TOKEN_REFRESH_RUNNING:
-        try:
-            start_token_refresh_daemon()
-        except Exception as e:
-            print(f"Warning: Could not start token refresh daemon: {e}")
+    try:
+        start_token_refresh_daemon()
+    except Exception as e:
+        print(f"Warning: Could not start token refresh daemon: {e}")
 
 # Delay daemon start slightly to allow imports to complete
 threading.Timer(2.0, _auto_start_daemon).start()
@@ -754,6 +476,9 @@ except ImportError:
 # Database Helpers - PostgreSQL + SQLite Support
 # ============================================================================
 
+_query_profiler = query_profiler.get_query_profiler()
+
+
 class PostgresCursorWrapper:
     """Wrapper to auto-convert SQLite ? to PostgreSQL %s."""
     def __init__(self, cursor):
@@ -773,10 +498,13 @@ class PostgresCursorWrapper:
         sql = sql.replace('recording_enabled = 0', 'recording_enabled = false')
         sql = sql.replace('r.recording_enabled = 1', 'r.recording_enabled = true')
         sql = sql.replace('r.recording_enabled = 0', 'r.recording_enabled = false')
+        started = time.perf_counter() if _query_profiler.enabled else None
         if params:
             self._cursor.execute(sql, params)
         else:
             self._cursor.execute(sql)
+        if started is not None:
+            _query_profiler.record(sql, params, started)
         if self._cursor.description:
             self._keys = [desc[0] for desc in self._cursor.description]
         return self
@@ -820,7 +548,10 @@ class PostgresConnectionWrapper:
     def execute(self, sql, params=None):
         sql = sql.replace('?', '%s')
         cursor = self._conn.cursor()
+        started = time.perf_counter() if _query_profiler.enabled else None
         cursor.execute(sql, params or ())
+        if started is not None:
+            _query_profiler.record(sql, params, started)
         return PostgresCursorWrapper(cursor)
 
     def commit(self):
@@ -906,13 +637,21 @@ def get_db_connection():
         _is_postgres_verified = True
         logger.info("✅ recorder_service: Using SQLite, using ? placeholders")
     
-    conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+    conn = sqlite3.connect(DATABASE_PATH, timeout=30, factory=query_profiler.sqlite_connection_factory())
     conn.execute('PRAGMA journal_mode=WAL')
     conn.execute('PRAGMA busy_timeout=30000')
     conn.row_factory = sqlite3.Row
     return conn
 
 
+_query_profiler.set_explainer(get_db_connection, lambda: is_postgres)
+
+
+def _config_registry():
+    """Config registry (shared with the web server when this module is imported there)."""
+    return get_config_registry(get_db_connection, lambda: is_postgres)
+
+
 # ============================================================================
 # SIMPLE TRADE EXECUTION - The Formula (Multi-Account Support)
 # ============================================================================
@@ -967,28 +706,41 @@ def execute_trade_simple(
         cursor = conn.cursor()
         placeholder = '%s' if is_postgres else '?'
         
+        # Recorder, enabled traders and their linked accounts come from the config
+        # registry (no queries on a warm cache; CRUD paths invalidate it)
+        registry = _config_registry()
+        recorder_row = registry.recorder(recorder_id)
+        enabled_traders = registry.traders(recorder_id)
+
+        # Pre-fetch ALL account credentials in one lookup (avoid N+1 queries per account)
+        all_acct_ids = set()
+        for _trd in enabled_traders:
+            _ea_raw = _trd.get('enabled_accounts')
+            if _ea_raw and _ea_raw != '[]':
+                try:
+                    _ea_list = json.loads(_ea_raw) if isinstance(_ea_raw, str) else _ea_raw
+                    for _a in (_ea_list if isinstance(_ea_list, list) else []):
+                        _aid = _a.get('account_id')
+                        if _aid:
+                            all_acct_ids.add(_aid)
+                except:
+                    pass
+            if _trd.get('account_id'):
+                all_acct_ids.add(_trd['account_id'])
+        _cached_account_creds = registry.accounts(all_acct_ids)
+
         # Get ALL traders linked to this recorder (multi-user support)
-        # CRITICAL: Include a.environment - this is the source of truth for demo vs live
-        cursor.execute(f'''
-            SELECT t.id, t.enabled_accounts, t.subaccount_id, t.subaccount_name, t.is_demo,
-                   a.tradovate_token, a.username, a.password, a.id as account_id, a.environment
-            FROM traders t
-            JOIN accounts a ON t.account_id = a.id
-            WHERE t.recorder_id = {placeholder} AND t.enabled = {'true' if is_postgres else '1'}
-        ''', (recorder_id,))
-        trader_rows = cursor.fetchall()
-        
-        if not trader_rows:
+        # A trader counts as linked only when its account row exists (was: traders JOIN accounts)
+        linked_traders = [t for t in enabled_traders if t.get('account_id') in _cached_account_creds]
+        if not linked_traders:
             conn.close()
             result['error'] = 'No trader linked'
             logger.error(f"❌ No trader linked to recorder {recorder_id}")
             logger.error(f"   Check: 1) Is there a trader record? 2) Is trader.enabled = true? 3) Is recorder_id correct?")
             return result
         
-        # Get recorder settings to check avg_down_enabled
-        cursor.execute(f'SELECT avg_down_enabled FROM recorders WHERE id = {placeholder}', (recorder_id,))
-        recorder_row = cursor.fetchone()
-        avg_down_enabled = bool(recorder_row['avg_down_enabled']) if recorder_row else False
+        # Recorder settings: avg_down_enabled
+        avg_down_enabled = bool(recorder_row.get('avg_down_enabled')) if recorder_row else False
         logger.info(f"📊 Recorder {recorder_id}: avg_down_enabled = {avg_down_enabled}")
         
         # Build list of ALL accounts to trade on from ALL traders
@@ -997,31 +749,14 @@ def execute_trade_simple(
         skipped_duplicates = []  # Track duplicates for logging
 
         # Log how many traders are linked to this recorder
-        logger.info(f"📋 Found {len(list(trader_rows))} trader(s) linked to recorder {recorder_id}")
-
-        # Reset cursor - OPTIMIZED QUERY: Only fetch traders with VALID accounts
-        # This filters at DB level for fastest execution (no wasted loops)
-        if is_postgres:
-            cursor.execute(f'''
-                SELECT * FROM traders
-                WHERE recorder_id = {placeholder}
-                AND enabled = TRUE
-                AND (
-                    (enabled_accounts IS NOT NULL AND enabled_accounts != '[]' AND enabled_accounts != 'null' AND LENGTH(enabled_accounts) > 2)
-                    OR (subaccount_id IS NOT NULL AND account_id IS NOT NULL)
-                )
-            ''', (recorder_id,))
-        else:
-            cursor.execute(f'''
-                SELECT * FROM traders
-                WHERE recorder_id = {placeholder}
-                AND enabled = 1
-                AND (
-                    (enabled_accounts IS NOT NULL AND enabled_accounts != '[]' AND enabled_accounts != 'null' AND LENGTH(enabled_accounts) > 2)
-                    OR (subaccount_id IS NOT NULL AND account_id IS NOT NULL)
-                )
-            ''', (recorder_id,))
-        trader_rows = cursor.fetchall()
+        logger.info(f"📋 Found {len(linked_traders)} trader(s) linked to recorder {recorder_id}")
+
+        # Only traders with VALID accounts (enabled_accounts JSON or legacy subaccount + account)
+        trader_rows = [
+            t for t in enabled_traders
+            if (t.get('enabled_accounts') and t['enabled_accounts'] not in ('[]', 'null') and len(str(t['enabled_accounts'])) > 2)
+            or (t.get('subaccount_id') is not None and t.get('account_id') is not None)
+        ]
         logger.info(f"📋 {len(trader_rows)} trader(s) with valid accounts ready for execution")
 
         # --- BATCH PRE-FETCH: Avoid repeated identical queries inside the trader loop ---
@@ -1042,34 +777,6 @@ def execute_trade_simple(
         except Exception:
             pass  # Will fall back to per-trader query
 
-        # 2) Pre-fetch ALL account credentials in one query (avoid N+1 queries per account)
-        _cached_account_creds = {}
-        try:
-            all_acct_ids = set()
-            for _tr in trader_rows:
-                _trd = dict(_tr)
-                _ea_raw = _trd.get('enabled_accounts')
-                if _ea_raw and _ea_raw != '[]':
-                    try:
-                        _ea_list = json.loads(_ea_raw) if isinstance(_ea_raw, str) else _ea_raw
-                        for _a in (_ea_list if isinstance(_ea_list, list) else []):
-                            _aid = _a.get('account_id')
-                            if _aid:
-                                all_acct_ids.add(_aid)
-                    except:
-                        pass
-                _legacy_aid = _trd.get('account_id')
-                if _legacy_aid:
-                    all_acct_ids.add(_legacy_aid)
-            if all_acct_ids:
-                id_list = ','.join(str(int(x)) for x in all_acct_ids)
-                cursor.execute(f'SELECT id, tradovate_token, username, password, broker, api_key, environment, projectx_username, projectx_api_key, projectx_prop_firm, tradovate_refresh_token, token_expires_at FROM accounts WHERE id IN ({id_list})')
-                for _row in cursor.fetchall():
-                    _cached_account_creds[dict(_row)['id']] = dict(_row)
-                logger.info(f"⚡ Pre-fetched {len(_cached_account_creds)} account credentials in 1 query")
-        except Exception as _pf_err:
-            logger.warning(f"⚠️ Account pre-fetch failed, will query per-account: {_pf_err}")
-
         # 3) Pre-fetch user timezones for time filter (per-trader, not per-recorder)
         # Each trader's time filter should use THEIR user's timezone, not the recorder owner's
         _cached_user_tz = DEFAULT_USER_TZ  # fallback for recorder-level
@@ -1083,12 +790,9 @@ def execute_trade_simple(
                 if _tuid:
                     _trader_user_ids.add(int(_tuid))
             # Also include recorder owner
-            cursor.execute(f'SELECT user_id FROM recorders WHERE id = {placeholder}', (recorder_id,))
-            _rec_owner = cursor.fetchone()
-            if _rec_owner:
-                _rec_owner_id = _rec_owner['user_id'] if hasattr(_rec_owner, 'keys') else _rec_owner[0]
-                if _rec_owner_id:
-                    _trader_user_ids.add(int(_rec_owner_id))
+            _rec_owner_id = recorder_row.get('user_id') if recorder_row else None
+            if _rec_owner_id:
+                _trader_user_ids.add(int(_rec_owner_id))
             # Batch fetch all user timezones in one query
             if _trader_user_ids:
                 _uid_list = ','.join(str(uid) for uid in _trader_user_ids)
@@ -1134,6 +838,7 @@ def execute_trade_simple(
                 try:
                     cursor.execute(f'UPDATE traders SET signal_count = {placeholder} WHERE id = {placeholder}', (trader_signal_count, trader_id))
                     conn.commit()  # Persist immediately so counter is accurate
+                    registry.patch_trader(recorder_id, trader_id, signal_count=trader_signal_count)
                 except Exception as cnt_err:
                     logger.warning(f"⚠️ Could not update signal_count for trader {trader_id}: {cnt_err}")
 
@@ -1263,6 +968,8 @@ def execute_trade_simple(
                 cursor.execute(f'UPDATE traders SET last_trade_time = {placeholder}, today_signal_count = {placeholder}, today_signal_date = {placeholder} WHERE id = {placeholder}',
                                (now_utc, new_count, today_str, trader_id))
                 conn.commit()
+                registry.patch_trader(recorder_id, trader_id, last_trade_time=now_utc,
+                                      today_signal_count=new_count, today_signal_date=today_str)
             except Exception as track_err:
                 logger.warning(f"⚠️ Could not update trader tracking: {track_err}")
 
@@ -1483,9 +1190,8 @@ def execute_trade_simple(
         # ProjectX Trade Execution (Added Jan 2026)
         # ============================================================
         async def do_trade_projectx(trader, trader_idx, adjusted_quantity):
-            """Execute trade on ProjectX broker (TopstepX, Apex, etc.)"""
-            from phantom_scraper.projectx_integration import ProjectXIntegration
-
+            """Execute trade on ProjectX broker (TopstepX, Apex, etc.) - runs on the broker session loop"""
+            sessions = get_broker_sessions()
             acct_name = trader.get('subaccount_name', 'Unknown')
             username = trader.get('username') or trader.get('projectx_username')
             password = trader.get('password')  # FREE auth method (like Trade Manager)
@@ -1507,44 +1213,26 @@ def execute_trade_simple(
                 return {'success': False, 'error': 'ProjectX credentials missing'}
 
             try:
-                async with ProjectXIntegration(demo=is_demo, prop_firm=prop_firm) as projectx:
-                    # Smart authenticate - tries password (FREE) first, then API key
-                    if not await projectx.login(username, password=password, api_key=api_key):
-                        logger.error(f"❌ [{acct_name}] ProjectX authentication failed")
+                # Cached session - password (FREE) first, then API key; logs in only when the token is gone
+                async with sessions.projectx(username, password=password, api_key=api_key,
+                                             demo=is_demo, prop_firm=prop_firm) as (projectx, login_result):
+                    if not login_result.get('success'):
+                        logger.error(f"❌ [{acct_name}] ProjectX authentication failed: {login_result.get('error')}")
                         return {'success': False, 'error': 'ProjectX authentication failed'}
                     
                     logger.info(f"✅ [{acct_name}] ProjectX authenticated via {projectx.auth_method or 'unknown'} method")
+
+                    # Stream orders/positions so break-even / trailing rules see fills and flat positions
+                    if subaccount_id:
+                        sessions.submit(sessions.watch_projectx(projectx, int(subaccount_id)))
                     
-                    logger.info(f"✅ [{acct_name}] ProjectX authenticated successfully")
-                    
-                    # Get contracts — use extract_symbol_root() for proper symbol handling
+                    # Get contract — use extract_symbol_root() for proper symbol handling (resolution is cached)
                     symbol_root = extract_symbol_root(ticker) if ticker else 'MNQ'
-                    symbol_upper = ticker.strip().upper() if ticker else ''
-
-                    # Try Contract/search first (works on TopStepX), fallback to available
-                    contracts = await projectx.search_contracts(symbol_root)
-                    if not contracts:
-                        contracts = await projectx.get_available_contracts()
-
-                    logger.info(f"📋 [{acct_name}] Looking for symbol_root='{symbol_root}' full='{symbol_upper}' in {len(contracts)} contracts")
-
-                    contract_id = None
-                    matched_contract = None
-                    for contract in contracts:
-                        c_name = (contract.get('name') or contract.get('symbol') or '').upper()
-                        c_id_str = str(contract.get('id') or '').upper()
-                        # Strategy 1: Full symbol match (MNQH6 in CON.F.US.MNQH6.H26)
-                        if symbol_upper and (symbol_upper in c_name or symbol_upper in c_id_str):
-                            contract_id = contract.get('id')
-                            matched_contract = contract
-                            logger.info(f"📋 [{acct_name}] Found contract (full match): {c_name} (ID: {contract_id})")
-                            break
-                        # Strategy 2: Root symbol match (MNQ in contract)
-                        if symbol_root and (symbol_root in c_name or symbol_root in c_id_str):
-                            contract_id = contract.get('id')
-                            matched_contract = contract
-                            logger.info(f"📋 [{acct_name}] Found contract (root match): {c_name} (ID: {contract_id})")
-                            break
+                    matched_contract, contracts = await sessions.projectx_contract(projectx, ticker, symbol_root)
+                    contract_id = matched_contract.get('id') if matched_contract else None
+                    if contract_id:
+                        c_name = (matched_contract.get('name') or matched_contract.get('symbol') or '').upper()
+                        logger.info(f"📋 [{acct_name}] Found contract: {c_name} (ID: {contract_id})")
 
                     if not contract_id:
                         contract_names = [f"{c.get('name') or c.get('symbol') or 'N/A'} (id={c.get('id')})" for c in contracts[:20]]
@@ -1759,11 +1447,9 @@ def execute_trade_simple(
                                         frequency_ticks=trail_frequency,
                                         tick_size=tick_size,
                                         quantity=broker_qty,
-                                        session_token=projectx.session_token,
+                                        account_record_id=trader.get('account_id'),
                                         base_url=projectx.base_url,
-                                        prop_firm=prop_firm,
-                                        username=username,
-                                        api_key=api_key
+                                        prop_firm=prop_firm
                                     )
                                     logger.info(f"📊 [{acct_name}] ProjectX trailing monitor registered (DCA, trigger={trail_activation}t, offset={trail_offset}t)")
                                 except Exception as trail_err:
@@ -1881,11 +1567,9 @@ def execute_trade_simple(
                                                 offset_ticks=px_be_offset,
                                                 tick_size=tick_size,
                                                 quantity=adjusted_quantity,
-                                                session_token=projectx.session_token,
+                                                account_record_id=trader.get('account_id'),
                                                 base_url=projectx.base_url,
-                                                prop_firm=prop_firm,
-                                                username=username,
-                                                api_key=api_key
+                                                prop_firm=prop_firm
                                             )
                                             logger.info(f"📊 [{acct_name}] ProjectX break-even monitor registered "
                                                         f"(activation={px_be_ticks}t, entry={be_entry_price})")
@@ -1926,11 +1610,9 @@ def execute_trade_simple(
                                                 frequency_ticks=trail_freq_val,
                                                 tick_size=tick_size,
                                                 quantity=adjusted_quantity,
-                                                session_token=projectx.session_token,
+                                                account_record_id=trader.get('account_id'),
                                                 base_url=projectx.base_url,
-                                                prop_firm=prop_firm,
-                                                username=username,
-                                                api_key=api_key
+                                                prop_firm=prop_firm
                                             )
                                             logger.info(f"📊 [{acct_name}] ProjectX trailing monitor registered "
                                                         f"(multi-bracket, trigger={trail_trigger_val}t, offset={trail_offset_val}t)")
@@ -2001,11 +1683,9 @@ def execute_trade_simple(
                                             offset_ticks=px_be_offset,
                                             tick_size=tick_size,
                                             quantity=adjusted_quantity,
-                                            session_token=projectx.session_token,
+                                            account_record_id=trader.get('account_id'),
                                             base_url=projectx.base_url,
-                                            prop_firm=prop_firm,
-                                            username=username,
-                                            api_key=api_key
+                                            prop_firm=prop_firm
                                         )
                                         logger.info(f"📊 [{acct_name}] ProjectX break-even monitor registered "
                                                     f"(activation={px_be_ticks}t, entry={be_entry_price})")
@@ -2046,11 +1726,9 @@ def execute_trade_simple(
                                             frequency_ticks=trail_freq_val,
                                             tick_size=tick_size,
                                             quantity=adjusted_quantity,
-                                            session_token=projectx.session_token,
+                                            account_record_id=trader.get('account_id'),
                                             base_url=projectx.base_url,
-                                            prop_firm=prop_firm,
-                                            username=username,
-                                            api_key=api_key
+                                            prop_firm=prop_firm
                                         )
                                         logger.info(f"📊 [{acct_name}] ProjectX trailing monitor registered "
                                                     f"(single-bracket, trigger={trail_trigger_val}t, offset={trail_offset_val}t)")
@@ -2121,7 +1799,7 @@ def execute_trade_simple(
             # BROKER ROUTING - ProjectX vs Tradovate (Added Jan 2026)
             # ============================================================
             if broker_type == 'ProjectX':
-                return await do_trade_projectx(trader, trader_idx, adjusted_quantity)
+                return await get_broker_sessions().call(do_trade_projectx(trader, trader_idx, adjusted_quantity))
             # Default: Continue with Tradovate execution below
             
             tradovate_account_id = trader['subaccount_id']
@@ -2315,32 +1993,20 @@ def execute_trade_simple(
                 logger.info(f"⏱️ [{acct_name}] Auth completed in {time.time() - _acct_start:.2f}s (method: {auth_method})")
 
                 # ============================================================
-                # 🚀 SCALABLE CONNECTIONS - Reuse WebSocket connections when possible
+                # 🚀 SCALABLE CONNECTIONS - Reuse the account's order socket when it is up
                 # ============================================================
-                # Try to get pooled connection first (faster, less overhead)
-                # Fall back to creating new connection if needed
+                # REST session per trade; orders go WebSocket-first only when the
+                # account already has an authorized socket (never connects here)
                 # ============================================================
-                
-                tradovate = None
-                pooled_conn = None
-                try:
-                    # Try to get pooled WebSocket connection
-                    pooled_conn = await get_pooled_connection(tradovate_account_id, is_demo, access_token)
-                    if pooled_conn:
-                        tradovate = pooled_conn
-                        logger.debug(f"⚡ [{acct_name}] Using POOLED WebSocket connection")
-                    else:
-                        # Create new connection (will be closed after trade)
-                        tradovate = TradovateIntegration(demo=is_demo)
-                        await tradovate.__aenter__()
-                        tradovate.access_token = access_token
-                        logger.debug(f"🔌 [{acct_name}] Created new connection")
-                except Exception as pool_err:
-                    logger.warning(f"⚠️ [{acct_name}] Pool error, creating new connection: {pool_err}")
-                    tradovate = TradovateIntegration(demo=is_demo)
-                    await tradovate.__aenter__()
-                    tradovate.access_token = access_token
-                
+
+                tradovate = TradovateIntegration(demo=is_demo)
+                await tradovate.__aenter__()
+                tradovate.access_token = access_token
+                order_socket = get_pooled_order_socket(tradovate_account_id, is_demo, access_token)
+                if order_socket:
+                    tradovate.attach_order_socket(order_socket)
+                    logger.debug(f"⚡ [{acct_name}] Using pooled order socket")
+
                 try:
                     # STEP 0: Check if this is a new entry or DCA (adding to position)
                     order_action = 'Buy' if action == 'BUY' else 'Sell'
@@ -2819,23 +2485,30 @@ def execute_trade_simple(
                                 'method': 'BRACKET_WS',  # 1 API call for entry + TP!
                                 'subaccount_id': tradovate_account_id  # For break-even monitoring
                             }
+                        elif bracket_result and bracket_result.get('outcome_unknown'):
+                            # Sent but unanswered - the bracket may be live. A market-order fallback
+                            # could double the entry; position reconciliation picks up whatever filled.
+                            logger.error(f"❌ [{acct_name}] Bracket order outcome unknown - NOT falling back: {bracket_result.get('error')}")
+                            return {'success': False, 'error': bracket_result.get('error'), 'outcome_unknown': True,
+                                    'acct_name': acct_name}
                         else:
                             # Bracket order failed - fall back to REST
                             logger.warning(f"⚠️ [{acct_name}] Bracket order failed, falling back to REST: {bracket_result}")
                     
-                    # FALLBACK: REST API for DCA or if bracket fails
-                    # STEP 1: Place market order via REST
+                    # FALLBACK: market order for DCA or if bracket fails
+                    # STEP 1: Place market order (pooled order socket if attached, else REST)
                     order_data = tradovate.create_market_order(
                         tradovate_account_spec, local_tradovate_symbol,
                         order_action, adjusted_quantity, tradovate_account_id
                     )
 
                     logger.info(f"📤 [{acct_name}] Placing {order_action} {adjusted_quantity} {local_tradovate_symbol}...")
-                    order_result = await tradovate.place_order_smart(order_data, use_websocket=False)
+                    order_result = await tradovate.place_order_smart(order_data)
 
                     if not order_result or not order_result.get('success'):
                         error = order_result.get('error', 'Order failed') if order_result else 'No response'
-                        return {'success': False, 'error': error}
+                        return {'success': False, 'error': error,
+                                'outcome_unknown': bool(order_result and order_result.get('outcome_unknown'))}
                     
                     order_id = order_result.get('orderId') or order_result.get('id')
                     logger.info(f"✅ [{acct_name}] Market order placed: {order_id}")
@@ -3065,6 +2738,42 @@ def execute_trade_simple(
                                     logger.warning(f"⚠️ [{acct_name}] TP MODIFY FAILED: {error_msg} - will place new")
                                     existing_tp_id = None  # Fall through to place new
                     
+                    async def place_protective_order(order_data, label, price):
+                        """
+                        Place a TP/SL, retrying with backoff - protection is never given up on.
+                        Returns (order_id, last_result). An order that was sent but never
+                        answered is not retried: it may already be working at the broker.
+                        """
+                        result = None
+                        max_attempts = 10  # Increased from 3 to 10
+                        for attempt in range(max_attempts):
+                            try:
+                                result = await tradovate.place_order_smart(order_data)
+                            except Exception as place_err:
+                                result = {'success': False, 'error': str(place_err)}
+                            if result and result.get('success'):
+                                order_id = result.get('orderId') or result.get('id')
+                                logger.info(f"✅ [{acct_name}] {label} PLACED @ {price} (order_id: {order_id}) after {attempt+1} attempt(s)")
+                                return order_id, result
+                            error_msg = result.get('error', 'Unknown error') if result else 'No response'
+                            if result and result.get('outcome_unknown'):
+                                logger.error(f"❌ [{acct_name}] {label} outcome unknown - not retrying (may be working): {error_msg}")
+                                break
+                            logger.warning(f"⚠️ [{acct_name}] {label} placement attempt {attempt+1}/{max_attempts} failed: {error_msg}")
+
+                            # Exponential backoff: 1s, 2s, 4s, 8s, etc. (max 10s)
+                            wait_time = min(2 ** attempt, 10)
+                            if attempt < max_attempts - 1:
+                                logger.info(f"   ⏳ Retrying {label} in {wait_time}s...")
+                                await asyncio.sleep(wait_time)
+                        return None, result
+
+                    # TP and SL are started as tasks and collected together below, so the
+                    # SL goes out right behind the TP (pipelined on the order socket when
+                    # one is attached) instead of after the TP's round trip
+                    tp_task = None
+                    sl_task = None
+
                     # Place new TP if needed (only if TP is enabled)
                     if tp_price is not None and not tp_order_id:
                         # CRITICAL: Cancel ALL existing TP orders on broker before placing new!
@@ -3103,122 +2812,95 @@ def execute_trade_simple(
                         
                         # CRITICAL: NEVER GIVE UP on TP placement - keep retrying until success
                         # TP protection is essential - positions without TP are at risk
-                        tp_result = None
-                        max_attempts = 10  # Increased from 3 to 10
-                        tp_placed = False
-                        
-                        for tp_attempt in range(max_attempts):
-                            tp_result = await tradovate.place_order_smart(tp_order_data, use_websocket=False)
-                            if tp_result and tp_result.get('success'):
-                                tp_order_id = tp_result.get('orderId') or tp_result.get('id')
-                                logger.info(f"✅ [{acct_name}] TP PLACED @ {tp_price} (order_id: {tp_order_id}) after {tp_attempt+1} attempt(s)")
-                                tp_placed = True
-                                break
+                        tp_task = asyncio.create_task(place_protective_order(tp_order_data, 'TP', tp_price))
+                    
+                    # The TP task is already running: if building the SL raises, let the TP
+                    # finish instead of orphaning it mid-placement
+                    try:
+                        # STEP 5: Place SL order if configured (sl_ticks > 0)
+                        sl_price = None
+                        sl_order_id = None
+
+                        if sl_ticks and sl_ticks > 0:
+                            # CRITICAL: Validate broker_avg before calculating SL price
+                            # If broker_avg is 0 or None, we can't calculate a valid SL price
+                            if not broker_avg or broker_avg <= 0:
+                                logger.error(f"❌ [{acct_name}] CANNOT PLACE SL: broker_avg is invalid ({broker_avg})")
+                                logger.error(f"   This usually means the fill price wasn't available from order result")
+                                logger.error(f"   SL would have been calculated as: {broker_avg} - ({sl_ticks} * {local_tick_size}) = INVALID")
+                                logger.error(f"   ⚠️ POSITION HAS NO STOP LOSS PROTECTION!")
                             else:
-                                error_msg = tp_result.get('error', 'Unknown error') if tp_result else 'No response'
-                                logger.warning(f"⚠️ [{acct_name}] TP placement attempt {tp_attempt+1}/{max_attempts} failed: {error_msg}")
-                                
-                                # Exponential backoff: 1s, 2s, 4s, 8s, etc. (max 10s)
-                                wait_time = min(2 ** tp_attempt, 10)
-                                if tp_attempt < max_attempts - 1:
-                                    logger.info(f"   ⏳ Retrying in {wait_time}s...")
-                                    await asyncio.sleep(wait_time)
-                        
-                        if not tp_placed:
+                                # Calculate SL price (opposite direction from TP)
+                                if broker_side == 'LONG':
+                                    sl_price_raw = broker_avg - (sl_ticks * local_tick_size)
+                                    sl_action = 'Sell'  # SL sells to close LONG
+                                else:
+                                    sl_price_raw = broker_avg + (sl_ticks * local_tick_size)
+                                    sl_action = 'Buy'   # SL buys to close SHORT
+                                # CRITICAL: Round to nearest valid tick increment
+                                sl_price = round(round(sl_price_raw / local_tick_size) * local_tick_size, 10)
+
+                                # Additional validation: SL price must be positive
+                                if sl_price <= 0:
+                                    logger.error(f"❌ [{acct_name}] CANNOT PLACE SL: calculated sl_price is invalid ({sl_price})")
+                                    logger.error(f"   broker_avg={broker_avg}, sl_ticks={sl_ticks}, tick_size={local_tick_size}")
+                                    logger.error(f"   ⚠️ POSITION HAS NO STOP LOSS PROTECTION!")
+                                else:
+                                    use_trail_sl = trader.get('sl_type') in ('Trail', 'Trailing')
+                                    if use_trail_sl:
+                                        trail_offset_points = sl_ticks * local_tick_size
+                                        logger.info(f"📊 [{acct_name}] PLACING TRAILING SL: {sl_ticks} ticks ({trail_offset_points} pts), initial @ {sl_price}")
+                                        sl_order_data = tradovate.create_trailing_stop_order(
+                                            account_spec=tradovate_account_spec,
+                                            symbol=local_tradovate_symbol,
+                                            side=sl_action,
+                                            quantity=broker_qty,
+                                            offset=trail_offset_points,
+                                            account_id=tradovate_account_id,
+                                            initial_stop_price=sl_price
+                                        )
+                                    else:
+                                        logger.info(f"📊 [{acct_name}] PLACING SL @ {sl_price} ({sl_ticks} ticks from entry {broker_avg})")
+                                        sl_order_data = {
+                                            "accountId": tradovate_account_id,
+                                            "accountSpec": tradovate_account_spec,
+                                            "symbol": local_tradovate_symbol,
+                                            "action": sl_action,
+                                            "orderQty": broker_qty,
+                                            "orderType": "Stop",
+                                            "stopPrice": sl_price,
+                                            "timeInForce": "GTC",
+                                            "isAutomated": True
+                                        }
+                                    # CRITICAL: NEVER GIVE UP on SL placement - keep retrying until success
+                                    # SL protection is essential - positions without SL have UNLIMITED loss potential
+                                    sl_task = asyncio.create_task(place_protective_order(sl_order_data, 'SL', sl_price))
+                    except Exception:
+                        if tp_task is not None:
+                            await asyncio.gather(tp_task, return_exceptions=True)
+                        raise
+
+                    if tp_task is not None:
+                        tp_order_id, tp_result = await tp_task
+                        if not tp_order_id:
                             # CRITICAL ERROR: Position has NO TP protection
-                            logger.error(f"❌❌❌ [{acct_name}] CRITICAL: FAILED to place TP after {max_attempts} attempts!")
+                            logger.error(f"❌❌❌ [{acct_name}] CRITICAL: FAILED to place TP!")
                             logger.error(f"   Position: {broker_side} {broker_qty} @ {broker_avg} has NO TP PROTECTION!")
                             logger.error(f"   TP should be @ {tp_price} ({tp_action} {broker_qty})")
                             logger.error(f"   Last error: {tp_result.get('error') if tp_result else 'No response'}")
                             logger.error(f"   ⚠️ MANUAL INTERVENTION REQUIRED - Position is unprotected!")
-                            
+
                             # Still return success for the entry, but mark TP as failed
                             # The position monitoring system should detect this and retry
-                    
-                    # STEP 5: Place SL order if configured (sl_ticks > 0)
-                    sl_price = None
-                    sl_order_id = None
-
-                    if sl_ticks and sl_ticks > 0:
-                        # CRITICAL: Validate broker_avg before calculating SL price
-                        # If broker_avg is 0 or None, we can't calculate a valid SL price
-                        if not broker_avg or broker_avg <= 0:
-                            logger.error(f"❌ [{acct_name}] CANNOT PLACE SL: broker_avg is invalid ({broker_avg})")
-                            logger.error(f"   This usually means the fill price wasn't available from order result")
-                            logger.error(f"   SL would have been calculated as: {broker_avg} - ({sl_ticks} * {local_tick_size}) = INVALID")
-                            logger.error(f"   ⚠️ POSITION HAS NO STOP LOSS PROTECTION!")
-                        else:
-                            # Calculate SL price (opposite direction from TP)
-                            if broker_side == 'LONG':
-                                sl_price_raw = broker_avg - (sl_ticks * local_tick_size)
-                                sl_action = 'Sell'  # SL sells to close LONG
-                            else:
-                                sl_price_raw = broker_avg + (sl_ticks * local_tick_size)
-                                sl_action = 'Buy'   # SL buys to close SHORT
-                            # CRITICAL: Round to nearest valid tick increment
-                            sl_price = round(round(sl_price_raw / local_tick_size) * local_tick_size, 10)
-
-                            # Additional validation: SL price must be positive
-                            if sl_price <= 0:
-                                logger.error(f"❌ [{acct_name}] CANNOT PLACE SL: calculated sl_price is invalid ({sl_price})")
-                                logger.error(f"   broker_avg={broker_avg}, sl_ticks={sl_ticks}, tick_size={local_tick_size}")
-                                logger.error(f"   ⚠️ POSITION HAS NO STOP LOSS PROTECTION!")
-                            else:
-                                use_trail_sl = trader.get('sl_type') in ('Trail', 'Trailing')
-                                if use_trail_sl:
-                                    trail_offset_points = sl_ticks * local_tick_size
-                                    logger.info(f"📊 [{acct_name}] PLACING TRAILING SL: {sl_ticks} ticks ({trail_offset_points} pts), initial @ {sl_price}")
-                                    sl_order_data = tradovate.create_trailing_stop_order(
-                                        account_spec=tradovate_account_spec,
-                                        symbol=local_tradovate_symbol,
-                                        side=sl_action,
-                                        quantity=broker_qty,
-                                        offset=trail_offset_points,
-                                        account_id=tradovate_account_id,
-                                        initial_stop_price=sl_price
-                                    )
-                                else:
-                                    logger.info(f"📊 [{acct_name}] PLACING SL @ {sl_price} ({sl_ticks} ticks from entry {broker_avg})")
-                                    sl_order_data = {
-                                        "accountId": tradovate_account_id,
-                                        "accountSpec": tradovate_account_spec,
-                                        "symbol": local_tradovate_symbol,
-                                        "action": sl_action,
-                                        "orderQty": broker_qty,
-                                        "orderType": "Stop",
-                                        "stopPrice": sl_price,
-                                        "timeInForce": "GTC",
-                                        "isAutomated": True
-                                    }
-                                # CRITICAL: NEVER GIVE UP on SL placement - keep retrying until success
-                                # SL protection is essential - positions without SL have UNLIMITED loss potential
-                                sl_result = None
-                                sl_max_attempts = 10
-                                sl_placed = False
-
-                                for sl_attempt in range(sl_max_attempts):
-                                    sl_result = await tradovate.place_order_smart(sl_order_data, use_websocket=False)
-                                    if sl_result and sl_result.get('success'):
-                                        sl_order_id = sl_result.get('orderId') or sl_result.get('id')
-                                        logger.info(f"✅ [{acct_name}] SL PLACED @ {sl_price} after {sl_attempt+1} attempt(s)")
-                                        sl_placed = True
-                                        break
-                                    else:
-                                        error_msg = sl_result.get('error', 'Unknown error') if sl_result else 'No response'
-                                        logger.warning(f"⚠️ [{acct_name}] SL placement attempt {sl_attempt+1}/{sl_max_attempts} failed: {error_msg}")
 
-                                        # Exponential backoff: 1s, 2s, 4s, 8s, etc. (max 10s)
-                                        sl_wait = min(2 ** sl_attempt, 10)
-                                        if sl_attempt < sl_max_attempts - 1:
-                                            logger.info(f"   ⏳ Retrying SL in {sl_wait}s...")
-                                            await asyncio.sleep(sl_wait)
-
-                                if not sl_placed:
-                                    logger.error(f"❌❌❌ [{acct_name}] CRITICAL: FAILED to place SL after {sl_max_attempts} attempts!")
-                                    logger.error(f"   Position: {broker_side} {broker_qty} @ {broker_avg} has NO STOP LOSS PROTECTION!")
-                                    logger.error(f"   SL should be @ {sl_price} ({sl_action} {broker_qty})")
-                                    logger.error(f"   Last error: {sl_result.get('error') if sl_result else 'No response'}")
-                                    logger.error(f"   ⚠️ MANUAL INTERVENTION REQUIRED - Position has UNLIMITED downside risk!")
+                    if sl_task is not None:
+                        sl_order_id, sl_result = await sl_task
+                        if not sl_order_id:
+                            logger.error(f"❌❌❌ [{acct_name}] CRITICAL: FAILED to place SL!")
+                            logger.error(f"   Position: {broker_side} {broker_qty} @ {broker_avg} has NO STOP LOSS PROTECTION!")
+                            logger.error(f"   SL should be @ {sl_price} ({sl_action} {broker_qty})")
+                            logger.error(f"   Last error: {sl_result.get('error') if sl_result else 'No response'}")
+                            logger.error(f"   ⚠️ MANUAL INTERVENTION REQUIRED - Position has UNLIMITED downside risk!")
                     
                     # CRITICAL: Register TP/SL as OCO pair so one cancels the other when filled
                     if tp_order_id and sl_order_id:
@@ -3288,8 +2970,8 @@ def execute_trade_simple(
                         'sl_failed': (sl_ticks and sl_ticks > 0 and not sl_order_id),
                     }
                 finally:
-                    # Clean up non-pooled connections to prevent resource leaks
-                    if tradovate and not pooled_conn:
+                    # Close the per-trade REST session (a pooled order socket stays open)
+                    if tradovate:
                         try:
                             await tradovate.__aexit__(None, None, None)
                         except:
@@ -3814,6 +3496,8 @@ def sync_position_with_broker(recorder_id: int, ticker: str) -> Dict[str, Any]:
                             ''', (recorder_id, ticker, broker_side, broker_qty_abs, broker_price))
                         
                         conn.commit()
+                        if not existing_trade:
+                            recorder_counters.trade_opened(recorder_id)
                         result['synced'] = True
                         logger.info(f"✅ Created database record for orphaned position: {broker_side} {broker_qty_abs} @ {broker_price}")
         
@@ -4753,6 +4437,7 @@ def execute_live_trade_with_bracket(
                                     ''', (recorder_id, ticker, broker_side, broker_qty_abs, existing_price))
                                 
                                     conn_sync.commit()
+                                    recorder_counters.trade_opened(recorder_id)
                                     logger.info(f"✅ Created database record for orphaned position: {broker_side} {broker_qty_abs} @ {existing_price}")
                     
                         conn_sync.close()
@@ -5740,6 +5425,7 @@ def sync_position_from_broker(recorder_id: int, ticker: str) -> Dict[str, Any]:
                         DELETE FROM recorder_positions WHERE recorder_id = ? AND status = 'open'
                     ''', (recorder_id,))
                     conn.commit()
+                    recorder_counters.trade_closed(recorder_id)
                     result['db_updated'] = True
         
         result['success'] = True
@@ -6141,16 +5827,87 @@ def get_price_from_tradingview_api(symbol: str) -> Optional[float]:
         return None
 
 
+# ============================================================================
+# Position Reconciliation - one broker snapshot per (account, subaccount, env)
+# ============================================================================
+# Recorders that share a subaccount share ONE positions snapshot (and at most
+# one orders snapshot). The snapshot comes from the scalability StateCache when
+# that subaccount's WebSocket is fresh, otherwise from REST. The diff runs in
+# memory against prefetched open trades and every DB fix in a run is committed
+# in a single transaction. Stats: get_reconcile_stats().
+RECONCILE_WS_MAX_AGE = 10.0  # Seconds since last WS message for the StateCache to count as fresh
+_WORKING_ORDER_STATUSES = ('New', 'Working', 'PartiallyFilled', 'PendingNew', 'Accepted')
+_reconcile_contract_symbols: Dict[Any, str] = {}  # contractId -> symbol, shared across runs (resolved only)
+_reconcile_stats: Dict[str, Any] = {'runs': 0}
+
+
+def get_reconcile_stats() -> Dict[str, Any]:
+    """Duration, API calls made/saved and drift counts of the last reconciliation run."""
+    return dict(_reconcile_stats)
+
+
+def _reconcile_ws_snapshot(subaccount_id) -> Optional[Tuple[List[dict], List[dict]]]:
+    """
+    (positions, orders) for a subaccount from the StateCache in Tradovate REST
+    shape (without 'symbol'), or None when its WebSocket isn't fresh.
+    """
+    try:
+        from scalability import FEATURES, get_ws_manager, get_state_cache
+    except ImportError:
+        return None
+    if not FEATURES.get('ws_state_manager_enabled'):
+        return None
+    manager = get_ws_manager()
+    if not manager or not manager.is_account_fresh(int(subaccount_id), RECONCILE_WS_MAX_AGE):
+        return None
+    cache = get_state_cache()
+    positions = [{
+        'contractId': p.get('contractId', p.get('contract_id')),
+        'netPos': p.get('netPos', p.get('net_pos', 0)),
+        'netPrice': p.get('netPrice', p.get('net_price')),
+    } for p in cache.get_positions(int(subaccount_id))]
+    orders = [{
+        'id': o.get('id'),
+        'contractId': o.get('contractId', o.get('contract_id')),
+        'action': o.get('action'),
+        'orderType': o.get('orderType', o.get('order_type')),
+        'ordStatus': o.get('ordStatus', o.get('status')),
+        'price': o.get('price'),
+    } for o in cache.get_orders(int(subaccount_id))]
+    return positions, orders
+
+
+def _load_open_trades_for_reconcile(cursor, recorder_ids, ph) -> Tuple[Dict[int, List[dict]], Dict[int, Any]]:
+    """Open recorded_trades (newest id first) and tp_targets for all recorders in one pass."""
+    ids = sorted(set(recorder_ids))
+    in_list = ', '.join([ph] * len(ids))
+    cursor.execute(f'''
+        SELECT id, recorder_id, updated_at, entry_time, broker_managed_tp_sl,
+               tp_order_id, tp_price, side, quantity
+        FROM recorded_trades
+        WHERE status = 'open' AND recorder_id IN ({in_list})
+        ORDER BY id DESC
+    ''', tuple(ids))
+    open_trades: Dict[int, List[dict]] = {}
+    for row in cursor.fetchall():
+        row = dict(row)
+        open_trades.setdefault(row['recorder_id'], []).append(row)
+    cursor.execute(f'SELECT id, tp_targets FROM recorders WHERE id IN ({in_list})', tuple(ids))
+    tp_targets = {row['id']: row['tp_targets'] for row in cursor.fetchall()}
+    return open_trades, tp_targets
+
+
 def reconcile_positions_with_broker():
     """
     Periodically reconcile database positions with broker positions.
     Runs every 60 seconds to catch any drift or mismatches.
     REDUCED FREQUENCY to avoid rate limiting.
     """
+    started = time.time()
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
+
         # Get all open positions from database - CRITICAL: Include environment for demo/live detection
         is_postgres = is_using_postgres()
         enabled_val = 'true' if is_postgres else '1'
@@ -6164,396 +5921,426 @@ def reconcile_positions_with_broker():
             JOIN accounts a ON t.account_id = a.id
             WHERE rp.status = 'open'
         ''')
-        
+
         db_positions = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
         if not db_positions:
+            conn.close()
             return
-        
-        # Skip reconciliation if we're getting rate limited - don't make it worse
-        # Only reconcile if we haven't seen 429 errors recently
-        logger.debug(f"🔄 Position reconciliation: checking {len(db_positions)} position(s)")
-        
+        open_trades, recorder_tp_targets = _load_open_trades_for_reconcile(
+            cursor, [p['recorder_id'] for p in db_positions], ph)
+        conn.close()
+
+        # Group rows sharing a broker view: same account token, subaccount and environment
+        groups: Dict[Tuple, List[dict]] = {}
+        for db_pos in db_positions:
+            # CRITICAL FIX: Use environment as source of truth for demo vs live
+            env = (db_pos.get('environment') or 'demo').lower()
+            groups.setdefault((db_pos['account_id'], db_pos['subaccount_id'], env), []).append(db_pos)
+
+        logger.debug(f"🔄 Position reconciliation: checking {len(db_positions)} position(s) in {len(groups)} broker snapshot group(s)")
+
         from phantom_scraper.tradovate_integration import TradovateIntegration
         from tradovate_api_access import TradovateAPIAccess
-        import asyncio
-        
-        async def check_all_positions():
-            for db_pos in db_positions:
-                try:
-                    recorder_id = db_pos['recorder_id']
-                    ticker = db_pos['ticker']
-                    db_qty = db_pos['total_quantity']
-                    db_avg = db_pos['avg_entry_price']
-                    # CRITICAL FIX: Use environment as source of truth for demo vs live
-                    env = (db_pos.get('environment') or 'demo').lower()
-                    is_demo = env != 'live'
-                    account_id = db_pos['account_id']
-                    username = db_pos['username']
-                    password = db_pos['password']
-                    access_token = db_pos['tradovate_token']
-                    subaccount_id = db_pos['subaccount_id']
-                    
-                    # Authenticate
+
+        timestamp_fn = 'NOW()' if is_postgres else "datetime('now')"
+        fixes: List[Tuple[str, tuple]] = []       # applied in one transaction after the diff
+        after_commit: List[Tuple[str, int, str, Optional[str]]] = []  # signal-blocking updates
+        stats = {
+            'rows': len(db_positions), 'groups': len(groups),
+            'ws_snapshots': 0, 'rest_snapshots': 0,
+            'api_reads': 0, 'api_reads_legacy': 0, 'api_writes': 0,
+            'drift': {
+                'closed_flat': 0, 'quantity_fixed': 0, 'avg_price_fixed': 0, 'orphaned': 0,
+                'tp_placed': 0, 'duplicate_tps_cancelled': 0, 'in_sync': 0,
+                'skipped_grace': 0, 'skipped_signal_only': 0,
+            },
+        }
+        drift = stats['drift']
+
+        async def reconcile_group(key, rows):
+            account_id, subaccount_id, env = key
+            is_demo = env != 'live'
+            first = rows[0]
+            current_access_token = first['tradovate_token']
+            needs_login = not current_access_token and first['username'] and first['password']
+
+            async with TradovateIntegration(demo=is_demo) as tradovate:
+                tradovate.contract_cache.update(_reconcile_contract_symbols)
+                snapshot = _reconcile_ws_snapshot(subaccount_id)
+
+                if snapshot is None and needs_login:
+                    # Authenticate once for the whole group
                     api_access = TradovateAPIAccess(demo=is_demo)
-                    current_access_token = access_token
-                    
-                    if not current_access_token and username and password:
-                        login_result = await api_access.login(
-                            username=username,
-                            password=password,
-                            db_path=DATABASE_PATH,
-                            account_id=account_id
-                        )
-                        if login_result.get('success'):
-                            current_access_token = login_result.get('accessToken')
-                    
-                    # Get broker position
-                    async with TradovateIntegration(demo=is_demo) as tradovate:
-                        tradovate.access_token = current_access_token
-                        positions = await tradovate.get_positions(account_id=str(subaccount_id))
-                        
-                        tradovate_symbol = convert_ticker_to_tradovate(ticker)
-                        broker_pos = None
-                        for pos in positions:
-                            pos_symbol = pos.get('symbol', '')
-                            if tradovate_symbol[:3] in pos_symbol:
-                                broker_pos = pos
-                                break
-                        
-                        broker_qty = broker_pos.get('netPos', 0) if broker_pos else 0
-                        broker_avg = broker_pos.get('netPrice') if broker_pos else None
-                        
-                        # Compare AND TAKE ACTION
-                        if broker_qty == 0 and db_qty != 0:
-                            # BROKER IS FLAT BUT DB SHOWS OPEN - CHECK GRACE PERIOD FIRST!
-                            # Don't close trades that were recently updated (broker API can be slow)
-                            conn_check = get_db_connection()
-                            cursor_check = conn_check.cursor()
-                            cursor_check.execute(f'''
-                                SELECT updated_at, entry_time FROM recorded_trades
-                                WHERE recorder_id = {ph} AND status = 'open'
-                                ORDER BY entry_time DESC LIMIT 1
-                            ''', (recorder_id,))
-                            trade_check = cursor_check.fetchone()
-                            conn_check.close()
-                            
-                            if trade_check:
-                                from datetime import datetime as dt
-                                
-                                # CHECK: Is this a signal-only trade? If so, DON'T sync with broker
-                                # Signal-only trades (broker_managed_tp_sl = 0) should be closed by TP/SL polling, not broker sync
-                                conn_signal_check = get_db_connection()
-                                cursor_signal_check = conn_signal_check.cursor()
-                                sync_ph = '%s' if is_using_postgres() else '?'
-                                cursor_signal_check.execute(f'''
-                                    SELECT broker_managed_tp_sl, tp_order_id FROM recorded_trades
-                                    WHERE recorder_id = {sync_ph} AND status = 'open' LIMIT 1
-                                ''', (recorder_id,))
-                                signal_check = cursor_signal_check.fetchone()
-                                conn_signal_check.close()
-                                
-                                if signal_check:
-                                    broker_managed = signal_check['broker_managed_tp_sl'] or 0
-                                    has_broker_tp = bool(signal_check['tp_order_id'])
-                                    
-                                    # SKIP BROKER SYNC for signal-only trades (Trade Manager style)
-                                    if broker_managed == 0 and not has_broker_tp:
-                                        logger.debug(f"📊 SYNC SKIP: Signal-only trade for {ticker} - letting TP/SL polling handle close")
-                                        continue
-                                
-                                try:
-                                    updated_str = trade_check['updated_at'] or trade_check['entry_time']
-                                    if updated_str:
-                                        # Handle both formats - DB stores UTC via datetime('now')
-                                        if 'T' in str(updated_str):
-                                            updated_at = dt.fromisoformat(str(updated_str).replace('Z', ''))
-                                        else:
-                                            updated_at = dt.strptime(str(updated_str), '%Y-%m-%d %H:%M:%S')
-                                        # Use utcnow() since SQLite datetime('now') stores UTC
-                                        age_seconds = (dt.utcnow() - updated_at).total_seconds()
-                                        
-                                        # GRACE PERIOD: Don't close trades updated in last 90 seconds
-                                        if age_seconds < 90:
-                                            logger.warning(f"⏳ SYNC SKIP: Broker says flat but trade updated {age_seconds:.0f}s ago - waiting (90s grace period)")
-                                            continue  # Skip this closure, check again next cycle
-                                except Exception as e:
-                                    logger.debug(f"Could not parse timestamp: {e}")
-                            
-                            # Past grace period - safe to close
-                            logger.warning(f"🔄 SYNC FIX: Broker is FLAT but DB shows {db_qty} {ticker} - CLOSING DB RECORD")
-                            
-                            conn_fix = get_db_connection()
-                            cursor_fix = conn_fix.cursor()
-                            
-                            # Close the recorded_trades entry
-                            timestamp_fn = 'NOW()' if is_postgres else "datetime('now')"
-                            placeholder = '%s' if is_postgres else '?'
-                            cursor_fix.execute(f'''
-                                UPDATE recorded_trades 
-                                SET status = 'closed', 
-                                    exit_reason = 'broker_sync_flat',
-                                    exit_time = {timestamp_fn},
-                                    updated_at = {timestamp_fn}
-                                WHERE recorder_id = {placeholder} AND status = 'open'
-                            ''', (recorder_id,))
-                            
-                            # Clear recorder_positions
-                            cursor_fix.execute(f'''
-                                UPDATE recorder_positions
-                                SET total_quantity = 0, avg_entry_price = NULL, status = 'closed'
-                                WHERE recorder_id = {ph}
-                            ''', (recorder_id,))
-                            
-                            conn_fix.commit()
-                            conn_fix.close()
-                            logger.info(f"✅ SYNC FIX COMPLETE: Closed DB record for {ticker} (broker was flat)")
-                            # Signal blocking: clear position when broker confirms flat
-                            try:
-                                from ultra_simple_server import clear_signal_blocking_position, extract_symbol_root
-                                clear_signal_blocking_position(recorder_id, extract_symbol_root(ticker))
-                            except Exception:
-                                pass
+                    login_result = await api_access.login(
+                        username=first['username'],
+                        password=first['password'],
+                        db_path=DATABASE_PATH,
+                        account_id=account_id
+                    )
+                    stats['api_reads'] += 1
+                    if login_result.get('success'):
+                        current_access_token = login_result.get('accessToken')
+                tradovate.access_token = current_access_token
 
-                        elif broker_qty != 0 and db_qty == 0:
-                            logger.warning(f"⚠️ ORPHAN: Broker shows {broker_qty} {ticker} but DB shows 0 - manual intervention needed")
-                            
-                        elif abs(broker_qty) != abs(db_qty):
-                            # QUANTITY MISMATCH - UPDATE DB TO MATCH BROKER
-                            logger.warning(f"🔄 SYNC FIX: DB shows {db_qty} but broker shows {broker_qty} for {ticker} - UPDATING DB")
-                            
-                            conn_fix = get_db_connection()
-                            cursor_fix = conn_fix.cursor()
-                            
-                            timestamp_fn = 'NOW()' if is_postgres else "datetime('now')"
-                            placeholder = '%s' if is_postgres else '?'
-                            cursor_fix.execute(f'''
-                                UPDATE recorded_trades 
-                                SET quantity = {placeholder},
-                                    updated_at = {timestamp_fn}
-                                WHERE recorder_id = {placeholder} AND status = 'open'
-                            ''', (abs(broker_qty), recorder_id))
-                            
-                            cursor_fix.execute(f'''
-                                UPDATE recorder_positions
-                                SET total_quantity = {ph}
-                                WHERE recorder_id = {ph}
-                            ''', (abs(broker_qty), recorder_id))
-                            
-                            conn_fix.commit()
-                            conn_fix.close()
-                            logger.info(f"✅ SYNC FIX: Updated {ticker} quantity to {abs(broker_qty)}")
-                            
-                        elif broker_avg and db_avg and abs(broker_avg - db_avg) > 0.5:
-                            # PRICE MISMATCH - UPDATE DB AVG TO MATCH BROKER
-                            logger.warning(f"🔄 SYNC FIX: DB avg {db_avg} but broker avg {broker_avg} for {ticker} - UPDATING DB")
-                            
-                            conn_fix = get_db_connection()
-                            cursor_fix = conn_fix.cursor()
-                            
-                            timestamp_fn = 'NOW()' if is_postgres else "datetime('now')"
-                            placeholder = '%s' if is_postgres else '?'
-                            cursor_fix.execute(f'''
-                                UPDATE recorded_trades 
-                                SET entry_price = {placeholder},
-                                    updated_at = {timestamp_fn}
-                                WHERE recorder_id = {placeholder} AND status = 'open'
-                            ''', (broker_avg, recorder_id))
-                            
-                            cursor_fix.execute(f'''
-                                UPDATE recorder_positions
-                                SET avg_entry_price = {ph}
-                                WHERE recorder_id = {ph}
-                            ''', (broker_avg, recorder_id))
-                            
-                            conn_fix.commit()
-                            conn_fix.close()
-                            logger.info(f"✅ SYNC FIX: Updated {ticker} avg price to {broker_avg}")
-                        else:
-                            logger.debug(f"✅ Position in sync: {ticker} - DB: {db_qty} @ {db_avg}, Broker: {broker_qty} @ {broker_avg}")
-                        
-                        # Signal blocking: refresh staleness timer while position is open
-                        # Only refresh if already tracked (avoids creating entries for non-signal-blocking recorders)
-                        if broker_qty != 0:
-                            try:
-                                from ultra_simple_server import set_signal_blocking_position, check_signal_blocking, extract_symbol_root
-                                sr = extract_symbol_root(ticker)
-                                if check_signal_blocking(recorder_id, sr):
-                                    set_signal_blocking_position(recorder_id, sr, 'LONG' if broker_qty > 0 else 'SHORT')
-                            except Exception:
-                                pass
-
-                        # Check for missing TP orders if position exists
-                        if broker_qty != 0 and broker_avg:
-                            # Get DB trade to check if TP should exist
-                            conn2 = get_db_connection()
-                            cursor2 = conn2.cursor()
-                            cursor2.execute(f'''
-                                SELECT tp_price, side, quantity
-                                FROM recorded_trades
-                                WHERE recorder_id = {ph} AND status = 'open'
-                                ORDER BY id DESC LIMIT 1
-                            ''', (recorder_id,))
-                            db_trade = cursor2.fetchone()
-                            conn2.close()
-                            
-                            if db_trade:
-                                db_trade = dict(db_trade)
-                                db_tp_price = db_trade.get('tp_price')
-                                db_side = db_trade.get('side')
-                                
-                                if db_tp_price:
-                                    # Check if TP order exists on broker
-                                    orders = await tradovate.get_orders(account_id=str(subaccount_id))
-                                    has_tp_order = False
-                                    existing_tp_orders = []  # Track all matching TPs for duplicate cleanup
-                                    # Rule 15: extract symbol root for matching (handles 2-letter roots like GC, CL)
-                                    ticker_root = extract_symbol_root(ticker)
-                                    for order in orders:
-                                        order_symbol = order.get('symbol', '')
-                                        order_type = order.get('orderType', '') or ''
-                                        order_status = order.get('ordStatus', '') or ''
-                                        order_action = order.get('action', '')
-
-                                        # Rule 15: match by symbol root (3-char then 2-char), not hardcoded 'MNQ'
-                                        order_root = extract_symbol_root(order_symbol)
-                                        symbol_matches = (order_root == ticker_root) if (order_root and ticker_root) else (tradovate_symbol[:3] in order_symbol)
-
-                                        if symbol_matches and \
-                                           'limit' in order_type.lower() and \
-                                           order_status in ['New', 'Working', 'PartiallyFilled', 'PendingNew', 'Accepted']:
-                                            # Check if action matches (SELL for LONG, BUY for SHORT)
-                                            if (db_side == 'LONG' and order_action == 'Sell') or \
-                                               (db_side == 'SHORT' and order_action == 'Buy'):
-                                                has_tp_order = True
-                                                existing_tp_orders.append(order)
-                                                logger.debug(f"✅ TP order found for {ticker}: {order_action} @ {order.get('price')} (order {order.get('id', order.get('orderId', '?'))})")
-
-
-                                    # Duplicate TP cleanup: if more than 1 TP found, cancel extras (zero new API calls for detection)
-                                    if len(existing_tp_orders) > 1:
-                                        logger.warning(f"⚠️ DUPLICATE TPs: Found {len(existing_tp_orders)} TP orders for {ticker} — cancelling extras")
-                                        for extra_tp in existing_tp_orders[1:]:  # Keep the first, cancel the rest
-                                            extra_tp_id = extra_tp.get('id') or extra_tp.get('orderId')
-                                            if extra_tp_id:
-                                                try:
-                                                    await tradovate.cancel_order(order_id=str(extra_tp_id))
-                                                    logger.info(f"🗑️ Cancelled duplicate TP order {extra_tp_id} for {ticker}")
-                                                    await asyncio.sleep(0.2)  # 200ms between cancels for broker processing
-                                                except Exception as cancel_err:
-                                                    logger.warning(f"Could not cancel duplicate TP {extra_tp_id}: {cancel_err}")
-
-                                    if not has_tp_order:
-                                        # Skip auto-TP if WS position monitor is connected (it handles TPs in real-time)
-                                        try:
-                                            from ws_position_monitor import is_position_ws_connected
-                                            if is_position_ws_connected(recorder_id):
-                                                logger.debug(f"WS connected for {ticker} — skipping auto-TP (WS handles it)")
-                                                continue
-                                        except ImportError:
-                                            pass  # WS monitor not available — proceed with REST placement
-                                        logger.warning(f"🔄 SYNC FIX: MISSING TP ORDER for {ticker} - PLACING NOW")
-
-                                        # Calculate correct TP based on broker avg price
-                                        is_long = db_side == 'LONG'
-                                        # Rule 15: Look up tick size by symbol root (handles 2-letter roots GC, CL, SI)
-                                        ticker_root_ts = extract_symbol_root(ticker)
-                                        tick_size = TICK_SIZES.get(ticker_root_ts, TICK_SIZES.get(ticker_root_ts[:2], 0.25)) if ticker_root_ts else 0.25
-                                        tp_ticks = 0  # No TP by default - let strategy handle it
-
-                                        # Get TP ticks from recorder settings
-                                        conn_tp = get_db_connection()
-                                        cursor_tp = conn_tp.cursor()
-                                        cursor_tp.execute(f'SELECT tp_targets FROM recorders WHERE id = {ph}', (recorder_id,))
-                                        rec_row = cursor_tp.fetchone()
-                                        conn_tp.close()
-
-                                        if rec_row and rec_row['tp_targets']:
-                                            try:
-                                                import json
-                                                tp_config = json.loads(rec_row['tp_targets'])
-                                                if isinstance(tp_config, list) and len(tp_config) > 0:
-                                                    tp_ticks = tp_config[0].get('ticks', 0) or 0
-                                                elif isinstance(tp_config, dict):
-                                                    tp_ticks = tp_config.get('ticks', 0) or 0
-                                            except:
-                                                pass
-
-                                        # Only place TP if tp_ticks > 0 (skip if 0 - let strategy handle)
-                                        if tp_ticks and tp_ticks > 0:
-                                            # Calculate TP price from BROKER avg (source of truth)
-                                            if is_long:
-                                                new_tp_price_raw = broker_avg + (tp_ticks * tick_size)
-                                                tp_action = 'Sell'
-                                            else:
-                                                new_tp_price_raw = broker_avg - (tp_ticks * tick_size)
-                                                tp_action = 'Buy'
-                                            # Round to nearest valid tick increment
-                                            new_tp_price = round(round(new_tp_price_raw / tick_size) * tick_size, 10)
-
-                                            # Cancel ALL existing TPs before placing new (uses orders already fetched — zero extra API calls)
-                                            tp_direction = 'Sell' if is_long else 'Buy'
-                                            for existing_order in orders:
-                                                eo_symbol = existing_order.get('symbol', '')
-                                                eo_root = extract_symbol_root(eo_symbol)
-                                                eo_action = existing_order.get('action', '')
-                                                eo_status = existing_order.get('ordStatus', '') or ''
-                                                eo_type = existing_order.get('orderType', '') or ''
-                                                if eo_root == ticker_root and eo_action == tp_direction and \
-                                                   'limit' in eo_type.lower() and \
-                                                   eo_status in ['New', 'Working', 'PartiallyFilled', 'PendingNew', 'Accepted']:
-                                                    eo_id = existing_order.get('id') or existing_order.get('orderId')
-                                                    if eo_id:
-                                                        try:
-                                                            await tradovate.cancel_order(order_id=str(eo_id))
-                                                            logger.info(f"🗑️ Cancelled existing TP {eo_id} before re-placing for {ticker}")
-                                                            await asyncio.sleep(0.2)
-                                                        except Exception as cancel_err:
-                                                            logger.warning(f"Could not cancel TP {eo_id}: {cancel_err}")
-
-                                            # Place the TP order
-                                            try:
-                                                result = await tradovate.place_order_smart(
-                                                    account_id=str(subaccount_id),
-                                                    symbol=tradovate_symbol,
-                                                    action=tp_action,
-                                                    quantity=abs(broker_qty),
-                                                    order_type='Limit',
-                                                    price=new_tp_price,
-                                                    time_in_force='GTC',
-                                                    use_websocket=False
-                                                )
-
-                                                if result and result.get('orderId'):
-                                                    new_tp_order_id = result.get('orderId')
-                                                    logger.info(f"✅ SYNC FIX: Placed TP order {new_tp_order_id}: {tp_action} {abs(broker_qty)} @ {new_tp_price}")
-
-                                                    # Update DB with new TP order ID
-                                                    conn_upd = get_db_connection()
-                                                    cursor_upd = conn_upd.cursor()
-                                                    tp_upd_ph2 = '%s' if is_postgres else '?'
-                                                    cursor_upd.execute(f'''
-                                                        UPDATE recorded_trades
-                                                        SET tp_order_id = {tp_upd_ph2}, tp_price = {tp_upd_ph2}
-                                                        WHERE id = (
-                                                            SELECT id FROM recorded_trades
-                                                            WHERE recorder_id = {tp_upd_ph2} AND status = 'open'
-                                                            ORDER BY id DESC LIMIT 1
-                                                        )
-                                                    ''', (str(new_tp_order_id), new_tp_price, recorder_id))
-                                                    conn_upd.commit()
-                                                    conn_upd.close()
-                                                else:
-                                                    logger.error(f"❌ Failed to place TP order: {result}")
-                                            except Exception as tp_err:
-                                                logger.error(f"❌ Error placing TP order: {tp_err}")
-                            
+                if snapshot is not None:
+                    positions, cached_orders = snapshot
+                    for item in positions + cached_orders:
+                        if item.get('contractId'):
+                            item['symbol'] = await tradovate._get_contract_symbol(item['contractId']) or ''
+                    stats['ws_snapshots'] += 1
+                else:
+                    positions = await tradovate.get_positions(account_id=str(subaccount_id))
+                    cached_orders = None
+                    stats['api_reads'] += 1
+                    stats['rest_snapshots'] += 1
+
+                async def get_orders():
+                    nonlocal cached_orders
+                    if cached_orders is None:
+                        cached_orders = await tradovate.get_orders(account_id=str(subaccount_id))
+                        stats['api_reads'] += 1
+                    return cached_orders
+
+                for db_pos in rows:
+                    # Per-row REST calls the pre-batching loop made (login + positions [+ orders])
+                    stats['api_reads_legacy'] += 2 if needs_login else 1
+                    try:
+                        await reconcile_row(db_pos, tradovate, positions, get_orders, subaccount_id)
+                    except Exception as e:
+                        logger.error(f"Error reconciling position for {db_pos.get('ticker', 'unknown')}: {e}")
+
+                # A failed lookup is cached as None for this run only; persisting it would
+                # leave positions symbol-less and close their trades as broker_sync_flat
+                _reconcile_contract_symbols.update(
+                    (cid, sym) for cid, sym in tradovate.contract_cache.items() if sym)
+
+        async def reconcile_row(db_pos, tradovate, positions, get_orders, subaccount_id):
+            recorder_id = db_pos['recorder_id']
+            ticker = db_pos['ticker']
+            db_qty = db_pos['total_quantity']
+            db_avg = db_pos['avg_entry_price']
+            trades = open_trades.get(recorder_id, [])
+
+            tradovate_symbol = convert_ticker_to_tradovate(ticker)
+            broker_pos = None
+            for pos in positions:
+                pos_symbol = pos.get('symbol', '') or ''
+                if tradovate_symbol[:3] in pos_symbol:
+                    broker_pos = pos
+                    break
+
+            broker_qty = broker_pos.get('netPos', 0) if broker_pos else 0
+            broker_avg = broker_pos.get('netPrice') if broker_pos else None
+
+            if broker_pos is None and db_qty != 0 and any(
+                    pos.get('netPos') and not pos.get('symbol') for pos in positions):
+                # An open position whose contract lookup failed could be this one — never read it as flat
+                logger.warning(f"⏳ SYNC SKIP: {ticker} not matched and a broker position has no resolved symbol")
+                drift['skipped_grace'] += 1
+                return
+
+            # Compare AND TAKE ACTION
+            if broker_qty == 0 and db_qty != 0:
+                # BROKER IS FLAT BUT DB SHOWS OPEN - CHECK GRACE PERIOD FIRST!
+                # Don't close trades that were recently updated (broker API can be slow)
+                trade_check = max(trades, key=lambda t: str(t.get('entry_time') or '')) if trades else None
+
+                if trade_check:
+                    from datetime import datetime as dt
+
+                    # CHECK: Is this a signal-only trade? If so, DON'T sync with broker
+                    # Signal-only trades (broker_managed_tp_sl = 0) should be closed by TP/SL polling, not broker sync
+                    signal_check = trades[0]
+                    broker_managed = signal_check['broker_managed_tp_sl'] or 0
+                    has_broker_tp = bool(signal_check['tp_order_id'])
+
+                    # SKIP BROKER SYNC for signal-only trades (Trade Manager style)
+                    if broker_managed == 0 and not has_broker_tp:
+                        logger.debug(f"📊 SYNC SKIP: Signal-only trade for {ticker} - letting TP/SL polling handle close")
+                        drift['skipped_signal_only'] += 1
+                        return
+
+                    try:
+                        updated_str = trade_check['updated_at'] or trade_check['entry_time']
+                        if updated_str:
+                            # Handle both formats - DB stores UTC via datetime('now')
+                            if 'T' in str(updated_str):
+                                updated_at = dt.fromisoformat(str(updated_str).replace('Z', ''))
+                            else:
+                                updated_at = dt.strptime(str(updated_str), '%Y-%m-%d %H:%M:%S')
+                            # Use utcnow() since SQLite datetime('now') stores UTC
+                            age_seconds = (dt.utcnow() - updated_at).total_seconds()
+
+                            # GRACE PERIOD: Don't close trades updated in last 90 seconds
+                            if age_seconds < 90:
+                                logger.warning(f"⏳ SYNC SKIP: Broker says flat but trade updated {age_seconds:.0f}s ago - waiting (90s grace period)")
+                                drift['skipped_grace'] += 1
+                                return  # Skip this closure, check again next cycle
+                    except Exception as e:
+                        logger.debug(f"Could not parse timestamp: {e}")
+
+                # Past grace period - safe to close
+                logger.warning(f"🔄 SYNC FIX: Broker is FLAT but DB shows {db_qty} {ticker} - CLOSING DB RECORD")
+
+                # Close the recorded_trades entry
+                fixes.append((f'''
+                    UPDATE recorded_trades
+                    SET status = 'closed',
+                        exit_reason = 'broker_sync_flat',
+                        exit_time = {timestamp_fn},
+                        updated_at = {timestamp_fn}
+                    WHERE recorder_id = {ph} AND status = 'open'
+                ''', (recorder_id,)))
+
+                # Clear recorder_positions
+                fixes.append((f'''
+                    UPDATE recorder_positions
+                    SET total_quantity = 0, avg_entry_price = NULL, status = 'closed'
+                    WHERE recorder_id = {ph}
+                ''', (recorder_id,)))
+                drift['closed_flat'] += 1
+                # Signal blocking: clear position when broker confirms flat
+                after_commit.append(('clear', recorder_id, ticker, None))
+
+            elif broker_qty != 0 and db_qty == 0:
+                logger.warning(f"⚠️ ORPHAN: Broker shows {broker_qty} {ticker} but DB shows 0 - manual intervention needed")
+                drift['orphaned'] += 1
+
+            elif abs(broker_qty) != abs(db_qty):
+                # QUANTITY MISMATCH - UPDATE DB TO MATCH BROKER
+                logger.warning(f"🔄 SYNC FIX: DB shows {db_qty} but broker shows {broker_qty} for {ticker} - UPDATING DB")
+                fixes.append((f'''
+                    UPDATE recorded_trades
+                    SET quantity = {ph},
+                        updated_at = {timestamp_fn}
+                    WHERE recorder_id = {ph} AND status = 'open'
+                ''', (abs(broker_qty), recorder_id)))
+                fixes.append((f'''
+                    UPDATE recorder_positions
+                    SET total_quantity = {ph}
+                    WHERE recorder_id = {ph}
+                ''', (abs(broker_qty), recorder_id)))
+                drift['quantity_fixed'] += 1
+
+            elif broker_avg and db_avg and abs(broker_avg - db_avg) > 0.5:
+                # PRICE MISMATCH - UPDATE DB AVG TO MATCH BROKER
+                logger.warning(f"🔄 SYNC FIX: DB avg {db_avg} but broker avg {broker_avg} for {ticker} - UPDATING DB")
+                fixes.append((f'''
+                    UPDATE recorded_trades
+                    SET entry_price = {ph},
+                        updated_at = {timestamp_fn}
+                    WHERE recorder_id = {ph} AND status = 'open'
+                ''', (broker_avg, recorder_id)))
+                fixes.append((f'''
+                    UPDATE recorder_positions
+                    SET avg_entry_price = {ph}
+                    WHERE recorder_id = {ph}
+                ''', (broker_avg, recorder_id)))
+                drift['avg_price_fixed'] += 1
+            else:
+                logger.debug(f"✅ Position in sync: {ticker} - DB: {db_qty} @ {db_avg}, Broker: {broker_qty} @ {broker_avg}")
+                drift['in_sync'] += 1
+
+            # Signal blocking: refresh staleness timer while position is open
+            # Only refresh if already tracked (avoids creating entries for non-signal-blocking recorders)
+            if broker_qty != 0:
+                after_commit.append(('refresh', recorder_id, ticker, 'LONG' if broker_qty > 0 else 'SHORT'))
+
+            # Check for missing TP orders if position exists
+            if not (broker_qty != 0 and broker_avg and trades):
+                return
+            db_trade = trades[0]
+            db_tp_price = db_trade.get('tp_price')
+            db_side = db_trade.get('side')
+            if not db_tp_price:
+                return
+
+            # Check if TP order exists on broker (one orders snapshot per group)
+            stats['api_reads_legacy'] += 1
+            orders = await get_orders()
+            has_tp_order = False
+            existing_tp_orders = []  # Track all matching TPs for duplicate cleanup
+            # Rule 15: extract symbol root for matching (handles 2-letter roots like GC, CL)
+            ticker_root = extract_symbol_root(ticker)
+            for order in orders:
+                order_symbol = order.get('symbol', '') or ''
+                order_type = order.get('orderType', '') or ''
+                order_status = order.get('ordStatus', '') or ''
+                order_action = order.get('action', '')
+
+                # Rule 15: match by symbol root (3-char then 2-char), not hardcoded 'MNQ'
+                order_root = extract_symbol_root(order_symbol)
+                symbol_matches = (order_root == ticker_root) if (order_root and ticker_root) else (tradovate_symbol[:3] in order_symbol)
+
+                if symbol_matches and \
+                   'limit' in order_type.lower() and \
+                   order_status in _WORKING_ORDER_STATUSES:
+                    # Check if action matches (SELL for LONG, BUY for SHORT)
+                    if (db_side == 'LONG' and order_action == 'Sell') or \
+                       (db_side == 'SHORT' and order_action == 'Buy'):
+                        has_tp_order = True
+                        existing_tp_orders.append(order)
+                        logger.debug(f"✅ TP order found for {ticker}: {order_action} @ {order.get('price')} (order {order.get('id', order.get('orderId', '?'))})")
+
+            # Duplicate TP cleanup: if more than 1 TP found, cancel extras (zero new API calls for detection)
+            if len(existing_tp_orders) > 1:
+                logger.warning(f"⚠️ DUPLICATE TPs: Found {len(existing_tp_orders)} TP orders for {ticker} — cancelling extras")
+                for extra_tp in existing_tp_orders[1:]:  # Keep the first, cancel the rest
+                    extra_tp_id = extra_tp.get('id') or extra_tp.get('orderId')
+                    if extra_tp_id:
+                        try:
+                            await tradovate.cancel_order(order_id=str(extra_tp_id))
+                            stats['api_writes'] += 1
+                            drift['duplicate_tps_cancelled'] += 1
+                            logger.info(f"🗑️ Cancelled duplicate TP order {extra_tp_id} for {ticker}")
+                            await asyncio.sleep(0.2)  # 200ms between cancels for broker processing
+                        except Exception as cancel_err:
+                            logger.warning(f"Could not cancel duplicate TP {extra_tp_id}: {cancel_err}")
+
+            if has_tp_order:
+                return
+            # Skip auto-TP if WS position monitor is connected (it handles TPs in real-time)
+            try:
+                from ws_position_monitor import is_position_ws_connected
+                if is_position_ws_connected(recorder_id):
+                    logger.debug(f"WS connected for {ticker} — skipping auto-TP (WS handles it)")
+                    return
+            except ImportError:
+                pass  # WS monitor not available — proceed with REST placement
+            logger.warning(f"🔄 SYNC FIX: MISSING TP ORDER for {ticker} - PLACING NOW")
+
+            # Calculate correct TP based on broker avg price
+            is_long = db_side == 'LONG'
+            # Rule 15: Look up tick size by symbol root (handles 2-letter roots GC, CL, SI)
+            tick_size = TICK_SIZES.get(ticker_root, TICK_SIZES.get(ticker_root[:2], 0.25)) if ticker_root else 0.25
+            tp_ticks = 0  # No TP by default - let strategy handle it
+
+            # Get TP ticks from recorder settings
+            tp_targets_raw = recorder_tp_targets.get(recorder_id)
+            if tp_targets_raw:
+                try:
+                    tp_config = json.loads(tp_targets_raw)
+                    if isinstance(tp_config, list) and len(tp_config) > 0:
+                        tp_ticks = tp_config[0].get('ticks', 0) or 0
+                    elif isinstance(tp_config, dict):
+                        tp_ticks = tp_config.get('ticks', 0) or 0
+                except:
+                    pass
+
+            # Only place TP if tp_ticks > 0 (skip if 0 - let strategy handle)
+            if not (tp_ticks and tp_ticks > 0):
+                return
+            # Calculate TP price from BROKER avg (source of truth)
+            if is_long:
+                new_tp_price_raw = broker_avg + (tp_ticks * tick_size)
+                tp_action = 'Sell'
+            else:
+                new_tp_price_raw = broker_avg - (tp_ticks * tick_size)
+                tp_action = 'Buy'
+            # Round to nearest valid tick increment
+            new_tp_price = round(round(new_tp_price_raw / tick_size) * tick_size, 10)
+
+            # Cancel ALL existing TPs before placing new (uses orders already fetched — zero extra API calls)
+            tp_direction = 'Sell' if is_long else 'Buy'
+            for existing_order in orders:
+                eo_symbol = existing_order.get('symbol', '') or ''
+                eo_root = extract_symbol_root(eo_symbol)
+                eo_action = existing_order.get('action', '')
+                eo_status = existing_order.get('ordStatus', '') or ''
+                eo_type = existing_order.get('orderType', '') or ''
+                if eo_root == ticker_root and eo_action == tp_direction and \
+                   'limit' in eo_type.lower() and \
+                   eo_status in _WORKING_ORDER_STATUSES:
+                    eo_id = existing_order.get('id') or existing_order.get('orderId')
+                    if eo_id:
+                        try:
+                            await tradovate.cancel_order(order_id=str(eo_id))
+                            stats['api_writes'] += 1
+                            logger.info(f"🗑️ Cancelled existing TP {eo_id} before re-placing for {ticker}")
+                            await asyncio.sleep(0.2)
+                        except Exception as cancel_err:
+                            logger.warning(f"Could not cancel TP {eo_id}: {cancel_err}")
+
+            # Place the TP order
+            try:
+                result = await tradovate.place_order_smart(
+                    account_id=str(subaccount_id),
+                    symbol=tradovate_symbol,
+                    action=tp_action,
+                    quantity=abs(broker_qty),
+                    order_type='Limit',
+                    price=new_tp_price,
+                    time_in_force='GTC',
+                    use_websocket=False
+                )
+                stats['api_writes'] += 1
+
+                if result and result.get('orderId'):
+                    new_tp_order_id = result.get('orderId')
+                    logger.info(f"✅ SYNC FIX: Placed TP order {new_tp_order_id}: {tp_action} {abs(broker_qty)} @ {new_tp_price}")
+                    drift['tp_placed'] += 1
+
+                    # Update DB with new TP order ID
+                    fixes.append((f'''
+                        UPDATE recorded_trades
+                        SET tp_order_id = {ph}, tp_price = {ph}
+                        WHERE id = {ph}
+                    ''', (str(new_tp_order_id), new_tp_price, db_trade['id'])))
+                else:
+                    logger.error(f"❌ Failed to place TP order: {result}")
+            except Exception as tp_err:
+                logger.error(f"❌ Error placing TP order: {tp_err}")
+
+        async def check_all_positions():
+            for key, rows in groups.items():
+                try:
+                    await reconcile_group(key, rows)
                 except Exception as e:
-                    logger.error(f"Error reconciling position for {db_pos.get('ticker', 'unknown')}: {e}")
+                    logger.error(f"Error reconciling subaccount {key[1]} ({len(rows)} position(s)): {e}")
 
         run_async(check_all_positions())
-        
+
+        # Apply every DB fix from this run in a single transaction
+        if fixes:
+            conn_fix = get_db_connection()
+            try:
+                cursor_fix = conn_fix.cursor()
+                for sql, params in fixes:
+                    cursor_fix.execute(sql, params)
+                conn_fix.commit()
+                logger.info(f"✅ SYNC FIX COMPLETE: applied {len(fixes)} DB update(s) in one transaction")
+            except Exception as e:
+                conn_fix.rollback()
+                logger.error(f"❌ Reconciliation DB fixes rolled back: {e}")
+                after_commit.clear()
+            finally:
+                conn_fix.close()
+
+        for action, recorder_id, ticker, side in after_commit:
+            if action == 'clear':
+                recorder_counters.invalidate(recorder_id)
+            try:
+                from ultra_simple_server import (clear_signal_blocking_position, set_signal_blocking_position,
+                                                 check_signal_blocking, extract_symbol_root as _root)
+                sr = _root(ticker)
+                if action == 'clear':
+                    clear_signal_blocking_position(recorder_id, sr)
+                elif check_signal_blocking(recorder_id, sr):
+                    set_signal_blocking_position(recorder_id, sr, side)
+            except Exception:
+                pass
+
+        stats['api_calls_saved'] = max(0, stats['api_reads_legacy'] - stats['api_reads'])
+        stats['duration_ms'] = round((time.time() - started) * 1000, 1)
+        stats['finished_at'] = time.time()
+        stats['runs'] = _reconcile_stats.get('runs', 0) + 1
+        _reconcile_stats.clear()
+        _reconcile_stats.update(stats)
+        drifted = {k: v for k, v in drift.items() if v and k != 'in_sync'}
+        logger.info(f"🔄 Reconciliation: {stats['rows']} position(s) / {stats['groups']} snapshot(s) "
+                    f"({stats['ws_snapshots']} WS, {stats['rest_snapshots']} REST) in {stats['duration_ms']}ms, "
+                    f"{stats['api_reads']} API reads ({stats['api_calls_saved']} saved), drift: {drifted or 'none'}")
+
     except Exception as e:
         logger.error(f"Error in position reconciliation: {e}")
 
@@ -6787,6 +6574,7 @@ def start_daily_state_reset():
                 cursor.execute(f"UPDATE recorded_trades SET status = 'closed' WHERE status = 'open' AND recorder_id IN ({id_list})")
                 trades_closed = cursor.rowcount
                 logger.info(f"🧹 Closed {trades_closed} stale open recorded_trades (live recorders)")
+                recorder_counters.invalidate(*live_ids)
 
                 # 3) Zero signal counters on traders for live recorders
                 cursor.execute(f'UPDATE traders SET signal_count = 0, today_signal_count = 0 WHERE recorder_id IN ({id_list})')
@@ -6795,6 +6583,8 @@ def start_daily_state_reset():
 
                 conn.commit()
                 conn.close()
+                for rid in live_ids:
+                    _config_registry().invalidate_recorder(rid)
                 _reset_done_date[0] = today_str
                 logger.info(f"✅ Daily state reset complete — next reset tomorrow")
             except Exception as e:
@@ -6808,36 +6598,16 @@ def check_max_daily_loss_safety():
     """Safety net: Check all recorders with max_daily_loss against realized P&L.
 
     Logging-only — alerts if webhook filter somehow missed a breach.
-    Auto-flatten is handled by WS P&L monitor (ws_position_monitor.py).
+    Auto-flatten is handled by the risk engine on every tick (risk_engine.py);
+    this reads its session ledgers instead of one SUM query per recorder.
     """
     try:
-        is_postgres = is_using_postgres()
-        if not is_postgres:
-            return  # Production only (PostgreSQL)
-        conn = get_db_connection()
-        if not conn:
-            return
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT r.id, r.name, r.max_daily_loss
-            FROM recorders r
-            WHERE r.max_daily_loss > 0 AND r.recording_enabled = TRUE
-        ''')
-        recorders = cursor.fetchall()
-
-        for rec_id, rec_name, max_loss in recorders:
-            cursor.execute('''
-                SELECT COALESCE(SUM(pnl), 0) FROM recorded_trades
-                WHERE recorder_id = %s AND DATE(exit_time) = CURRENT_DATE AND status = 'closed'
-            ''', (rec_id,))
-            realized = float(cursor.fetchone()[0] or 0)
-
-            if realized <= -float(max_loss):
-                logger.warning(f"🚨 SAFETY NET: [{rec_name}] Realized P&L ${realized:.2f} "
-                               f"exceeds max daily loss -${max_loss} — should be blocked at webhook")
-
-        conn.close()
+        engine = get_risk_engine(get_db_connection, lambda: is_postgres)
+        if not engine.started:
+            engine.refresh()  # Standalone process: one reseed instead of a sweep thread
+        for row in engine.over_limit('live', realized_only=True):
+            logger.warning(f"🚨 SAFETY NET: [{row['name']}] Realized P&L ${row['realized']:.2f} "
+                           f"exceeds max daily loss -${row['limit']} — should be blocked at webhook")
     except Exception as e:
         logger.error(f"Max daily loss safety net error: {e}")
 
@@ -7162,13 +6932,11 @@ async def connect_tradingview_websocket():
                 logger.info("✅ TradingView WebSocket connected!")
                 
                 # Auth
-                auth_msg = json.dumps({"m": "set_auth_token", "p": ["unauthorized_user_token"]})
-                await ws.send(f"~m~{len(auth_msg)}~m~{auth_msg}")
+                await ws.send(encode_message("set_auth_token", ["unauthorized_user_token"]))
                 
                 # Create quote session
                 quote_session = f"qs_{int(time.time())}"
-                create_msg = json.dumps({"m": "quote_create_session", "p": [quote_session]})
-                await ws.send(f"~m~{len(create_msg)}~m~{create_msg}")
+                await ws.send(encode_message("quote_create_session", [quote_session]))
                 
                 # Subscribe to default symbols
                 await subscribe_symbols(ws, quote_session)
@@ -7176,8 +6944,12 @@ async def connect_tradingview_websocket():
                 # Listen for messages
                 async for message in ws:
                     try:
-                        if message.startswith('~h~'):
-                            await ws.send(message)
+                        # Heartbeats arrive framed (~m~4~m~~h~12) and must be echoed as-is
+                        heartbeats, quotes = decode(message)
+                        for frame in heartbeats:
+                            await ws.send(frame)
+                        if quotes:
+                            await process_quotes(quotes)
                             continue
                         
                         # Check for auth errors in message
@@ -7185,8 +6957,6 @@ async def connect_tradingview_websocket():
                             logger.warning("⚠️ Auth error detected in WebSocket message")
                             consecutive_failures = max_failures_before_refresh  # Trigger refresh
                             break
-                        
-                        await process_message(message)
                     except Exception as e:
                         logger.warning(f"Error processing message: {e}")
                         
@@ -7265,47 +7035,21 @@ async def subscribe_symbols(ws, quote_session: str):
     
     for symbol in symbols:
         if symbol not in _tradingview_subscribed_symbols:
-            add_msg = json.dumps({"m": "quote_add_symbols", "p": [quote_session, symbol]})
-            await ws.send(f"~m~{len(add_msg)}~m~{add_msg}")
+            await ws.send(encode_message("quote_add_symbols", [quote_session, symbol]))
             _tradingview_subscribed_symbols.add(symbol)
             logger.info(f"📈 Subscribed: {symbol}")
 
 
-async def process_message(message: str):
-    """Process TradingView message and update prices"""
-    try:
-        if not message or not message.startswith('~m~'):
-            return
-        
-        parts = message.split('~m~')
-        for part in parts:
-            if not part or part.isdigit():
-                continue
-            try:
-                data = json.loads(part)
-                if isinstance(data, dict) and data.get('m') == 'qsd':
-                    params = data.get('p', [])
-                    if len(params) >= 2:
-                        symbol_data = params[1]
-                        symbol = symbol_data.get('n', '')
-                        values = symbol_data.get('v', {})
-                        
-                        if symbol and values:
-                            last_price = values.get('lp') or values.get('last_price')
-                            bid = values.get('bid')
-                            ask = values.get('ask')
-                            
-                            if not last_price and bid and ask:
-                                last_price = (float(bid) + float(ask)) / 2
-                            
-                            if last_price:
-                                root = symbol.split(':')[-1].replace('1!', '').replace('!', '')
-                                # THE KEY CALL
-                                on_price_update(root, float(last_price))
-            except json.JSONDecodeError:
-                continue
-    except Exception as e:
-        logger.debug(f"Error processing message: {e}")
+async def process_quotes(quotes: list):
+    """Update prices from decoded TradingView qsd updates ((symbol, values) pairs)"""
+    for symbol, values in quotes:
+        try:
+            last_price = quote_price(values)
+            if symbol and last_price:
+                # THE KEY CALL
+                on_price_update(symbol_root(symbol), last_price)
+        except Exception as e:
+            logger.debug(f"Error processing quote for {symbol}: {e}")
 
 
 def start_tradingview_websocket():
@@ -7472,12 +7216,29 @@ def status():
             'websocket_connected': _tradingview_ws is not None,
             'subscribed_symbols': list(_tradingview_subscribed_symbols),
             'cached_prices': {k: v.get('last') for k, v in _market_data_cache.items()},
+            'reconciliation': get_reconcile_stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({'status': 'error', 'error': str(e)}), 500
 
 
+@app.route('/query-profile', methods=['GET', 'POST'])
+def query_profile():
+    """
+    Statement fingerprints for this process (see query_profiler.py).
+    POST {"enabled": true|false, "reset": true} toggles / clears the profiler.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if 'enabled' in data:
+            _query_profiler.set_enabled(data['enabled'])
+        if data.get('reset'):
+            _query_profiler.reset()
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify(_query_profiler.snapshot(limit, request.args.get('order', 'total_ms')))
+
+
 @app.route('/refresh-index', methods=['POST'])
 def refresh_index():
     """
@@ -7745,6 +7506,7 @@ def api_update_recorder(recorder_id):
             conn.commit()
         
         conn.close()
+        _config_registry().invalidate_recorder(recorder_id)
         
         logger.info(f"Updated recorder ID: {recorder_id}")
         
@@ -7784,6 +7546,7 @@ def api_delete_recorder(recorder_id):
         cursor.execute('DELETE FROM recorders WHERE id = ?', (recorder_id,))
         conn.commit()
         conn.close()
+        _config_registry().invalidate_recorder(recorder_id)
         
         logger.info(f"Deleted recorder: {name} (ID: {recorder_id})")
         
@@ -7988,6 +7751,7 @@ def api_toggle_simulation_mode(recorder_id):
         ''', (new_mode, recorder_id))
         conn.commit()
         conn.close()
+        _config_registry().invalidate_recorder(recorder_id)
 
         mode_str = 'SIMULATION (Paper Trading)' if new_mode else 'LIVE (Broker Execution)'
         logger.info(f"📝 Recorder {recorder_id} mode changed to: {mode_str}")
@@ -8203,10 +7967,9 @@ def receive_webhook(webhook_token):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT * FROM recorders WHERE webhook_token = ? AND recording_enabled = 1
-        ''', (webhook_token,))
-        recorder = cursor.fetchone()
+        recorder = _config_registry().recorder_by_token(webhook_token)
+        if recorder and not recorder.get('recording_enabled'):
+            recorder = None
         
         if not recorder:
             logger.warning(f"Webhook received for unknown/disabled token: {webhook_token[:8]}...")
@@ -8348,6 +8111,7 @@ def receive_webhook(webhook_token):
                 
                 signal_id = cursor.lastrowid
                 conn.commit()
+                recorder_counters.record_signal(recorder_id, normalized_action)
                 break  # Success - exit retry loop
                 
             except sqlite3.OperationalError as e:
@@ -8899,6 +8663,8 @@ def receive_webhook(webhook_token):
                 logger.info(f"📉 SHORT OPENED (signal-only) for '{recorder_name}': {ticker} @ {entry_price} x{quantity} | TP: {calculated_tp} | Internal TP/SL monitoring")
         
         conn.commit()
+        if trade_result and trade_result.get('action') == 'opened':
+            recorder_counters.trade_opened(recorder_id)
         
         # Rebuild index since positions may have changed
         rebuild_index()
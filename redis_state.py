@@ -128,51 +128,20 @@ def get_broker_failures_from_redis(limit=20):
 
 
 # ============================================================================
-# SIGNAL TRACKING (Redis Hash: "jt:signal_pipeline")
+# SIGNAL TRACKING (Stream "jt:signal_steps" + Hash "jt:sig:{id}")
 # ============================================================================
+# Steps are buffered and flushed in one pipelined write by signal_tracking.
 
 def redis_track_signal_step(signal_id, step, details=None):
-    """Track a signal step in Redis."""
-    r = _get_redis()
-    if r:
-        try:
-            key = f'jt:signal:{signal_id}'
-            existing = r.get(key)
-            if existing:
-                data = json.loads(existing)
-            else:
-                data = {
-                    'created': datetime.now().isoformat(),
-                    'steps': [],
-                    'status': 'pending',
-                    'last_update': datetime.now().isoformat()
-                }
-            data['steps'].append({
-                'step': step,
-                'timestamp': datetime.now().isoformat(),
-                'details': details or {}
-            })
-            data['last_update'] = datetime.now().isoformat()
-            r.setex(key, 3600, json.dumps(data, default=str))  # TTL 1 hour
-        except Exception as e:
-            logger.warning(f"Redis track_signal_step error: {e}")
+    """Track a signal step (buffered; flushed to Redis in a pipeline)."""
+    import signal_tracking
+    signal_tracking.track_step(signal_id, step, details)
 
 
 def redis_complete_signal(signal_id, status='complete', error=None):
-    """Mark a signal as complete/failed in Redis."""
-    r = _get_redis()
-    if r:
-        try:
-            key = f'jt:signal:{signal_id}'
-            existing = r.get(key)
-            if existing:
-                data = json.loads(existing)
-                data['status'] = status
-                if error:
-                    data['error'] = error
-                r.setex(key, 3600, json.dumps(data, default=str))
-        except Exception as e:
-            logger.warning(f"Redis complete_signal error: {e}")
+    """Mark a signal as complete/failed and flush its buffered steps."""
+    import signal_tracking
+    signal_tracking.complete(signal_id, status, error)
 
 
 # ============================================================================
@@ -285,20 +254,13 @@ def redis_remove_oco(order_id):
 
 
 # ============================================================================
-# WEBHOOK DEDUP (Redis key with TTL: "jt:dedup:{hash}")
+# WEBHOOK DEDUP (Redis key with PX TTL: "jt:dedup:{hash}")
 # ============================================================================
 
 def redis_check_dedup(dedup_key, window_seconds=1):
     """Check and set dedup key. Returns True if duplicate (already exists)."""
-    r = _get_redis()
-    if r:
-        try:
-            # SET NX (only if not exists) with EX (expiry)
-            result = r.set(f'jt:dedup:{dedup_key}', '1', nx=True, ex=window_seconds)
-            return result is None  # None means key already existed = duplicate
-        except Exception as e:
-            logger.warning(f"Redis dedup error: {e}")
-    return False  # If Redis fails, allow through
+    import signal_tracking
+    return signal_tracking.check_duplicate(dedup_key, window_seconds * 1000)[0]
 
 
 # ============================================================================
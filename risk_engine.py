@@ -0,0 +1,655 @@
+"""
+Risk Engine
+===========
+In-memory daily-loss ledgers shared by every max-loss enforcer.
+
+BEFORE: daily-loss enforcement existed four times, each recomputing from the DB:
+  - ws_position_monitor._check_pnl_limits ran two synchronous psycopg2 queries
+    per recorder every 30s inside the asyncio loop;
+  - check_paper_max_daily_loss ran 1 + 2N queries every 500ms;
+  - recorder_service.check_max_daily_loss_safety ran N SUM queries every 5 min;
+  - live_max_loss_monitor kept its own _breached_today dict keyed by local date.
+  "Today" meant DATE(exit_time) = CURRENT_DATE, i.e. a UTC-midnight reset in the
+  middle of the CME session.
+
+AFTER: one engine per process holds
+  - realized ledgers per (book, recorder) - book is 'live' (recorded_trades) or
+    'paper' (paper_trades) - keyed by trade id, so a DB reseed and a
+    record_close() for the same trade never double count;
+  - broker-reported per-account P&L (cashBalance realized + open);
+  - open positions indexed by symbol root, marked to the live tick stream.
+    Broker positions carry their account_id and are evaluated per
+    (recorder, account): each account copying a recorder is held to the
+    recorder's limit on its own, as the per-connection check did before.
+  Limits are evaluated on every tick (on_price) and on every close
+  (record_close). Ledgers reset at the CME session boundary (17:00 America/Chicago;
+  Friday evening through Sunday rolls into Monday's session).
+  A 5s sweep reseeds ledgers with one query per book (picking up trades closed
+  by other code paths or processes) and re-prices symbols that stopped ticking.
+
+Flattening goes through one deduplicated path: a breach is claimed once per
+session and scope, and each position is flattened at most once (retried after
+ACTION_COOLDOWN if the handler fails). Positions may carry their own `flatten`
+callable (broker positions owned by a WebSocket connection); otherwise the
+book's handler from set_flatten_handler() is used.
+
+Usage:
+    from risk_engine import get_risk_engine
+    engine = get_risk_engine(get_db_connection, is_using_postgres)
+    engine.set_flatten_handler('paper', close_paper_position)
+    engine.set_price_source(get_live_price)
+    engine.start()
+    engine.on_price('MNQ', 21500.25)
+    engine.record_close('paper', trade_id, recorder_id, pnl)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from chart_series import epoch
+
+try:
+    from zoneinfo import ZoneInfo
+    CHICAGO_TZ = ZoneInfo('America/Chicago')
+except ImportError:
+    import pytz
+    CHICAGO_TZ = pytz.timezone('America/Chicago')
+
+logger = logging.getLogger('risk_engine')
+
+BOOKS = ('live', 'paper')
+SESSION_ROLL_HOUR = 17          # CME Globex session opens 17:00 CT
+
+
+def trading_date(now: datetime = None):
+    """CME trading date for a moment (aware, or naive UTC). After 17:00 CT counts as the next day."""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    local = now.astimezone(CHICAGO_TZ)
+    day = local.date()
+    if local.hour >= SESSION_ROLL_HOUR:
+        day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def session_start(day) -> float:
+    """Epoch seconds of the 17:00 CT open of the session for trading date `day`."""
+    prev = day - timedelta(days=1)
+    while prev.weekday() >= 5:
+        prev -= timedelta(days=1)
+    naive = datetime(prev.year, prev.month, prev.day, SESSION_ROLL_HOUR)
+    if hasattr(CHICAGO_TZ, 'localize'):
+        local = CHICAGO_TZ.localize(naive)
+    else:
+        local = naive.replace(tzinfo=CHICAGO_TZ)
+    return local.timestamp()
+
+
+def _point_value(symbol_root: str) -> float:
+    try:
+        from tv_price_service import FUTURES_SPECS
+        return float(FUTURES_SPECS.get(symbol_root, {}).get('point_value', 1.0))
+    except Exception:
+        return 1.0
+
+
+def _paper_connection():
+    """paper_trades lives in DATABASE_URL (production) or the local paper_trades.db."""
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url:
+        import psycopg2
+        return psycopg2.connect(database_url), True
+    return sqlite3.connect('paper_trades.db'), False
+
+
+class RiskEngine:
+    """Per-session realized ledgers + tick-marked positions, checked against recorders.max_daily_loss."""
+
+    SWEEP_INTERVAL = 1.0        # seconds between stale-price sweeps
+    REFRESH_INTERVAL = 5.0      # seconds between ledger / limit reseeds from the DB
+    STALE_TICK_SECONDS = 2.0    # symbols silent this long are priced via price_source
+    ACTION_COOLDOWN = 10.0      # seconds before a failed flatten is retried
+
+    def __init__(self, get_connection: Callable = None, is_postgres: Callable = None,
+                 paper_connection: Callable = None):
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres or (lambda: False)
+        self._paper_connection = paper_connection or _paper_connection
+        self._lock = threading.RLock()
+
+        self._session = trading_date()
+        # (book, recorder_id) -> {trade_id: pnl}, plus the running sum
+        self._ledgers: Dict[tuple, Dict] = {}
+        self._realized: Dict[tuple, float] = {}
+        # record_close() entries newer than the last reseed query: key -> (recorder_id, pnl, ts)
+        self._recent_closes: Dict[tuple, tuple] = {}
+        # recorder_id -> (max_daily_loss, name)
+        self._limits: Dict[int, tuple] = {}
+        # position key -> {book, recorder_ids, symbol_root, side, qty, entry_price, point_value, ...}
+        self._positions: Dict[str, dict] = {}
+        self._positions_by_symbol: Dict[str, set] = {}
+        # account key -> {realized, open_pnl, limit, updated}
+        self._accounts: Dict[str, dict] = {}
+        self._marks: Dict[str, float] = {}
+        self._last_tick: Dict[str, float] = {}
+
+        # scope (book|'account', id[, account_id]) -> breach details, cleared at the session roll
+        self._breaches: Dict[tuple, dict] = {}
+        self._flattened: Dict[str, float] = {}      # position key -> flatten time
+        self._inflight: set = set()
+        self._retry_after: Dict[str, float] = {}
+
+        self._flatten_handlers: Dict[str, Callable] = {}
+        self._price_source: Optional[Callable] = None
+        self._symbol_root: Optional[Callable] = None
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='risk-flatten')
+        self._ready = set()
+        self._started = False
+        self.stats = {
+            'ticks': 0,
+            'evaluations': 0,
+            'breaches_claimed': 0,
+            'flattens': 0,
+            'refreshes': 0,
+            'swept_prices': 0,
+            'session_rolls': 0,
+        }
+
+    # ── Wiring ──────────────────────────────────────────────────────────────
+
+    def set_flatten_handler(self, book: str, handler: Callable):
+        """handler(position, price, breach) -> bool (False/exception = retry later)."""
+        self._flatten_handlers[book] = handler
+
+    def set_price_source(self, price_source: Callable, symbol_root: Callable = None):
+        """
+        price_source(symbol_root) -> float|None  (used for symbols that stopped ticking)
+        symbol_root(symbol) -> str  (maps paper_trades.symbol onto tick roots)
+        """
+        self._price_source = price_source
+        if symbol_root:
+            self._symbol_root = symbol_root
+
+    def start(self):
+        """Seed the ledgers and start the sweep thread. Idempotent."""
+        if self._started:
+            return
+        self._started = True
+        self.refresh()
+        threading.Thread(target=self._sweep_loop, daemon=True, name='risk-engine-sweep').start()
+        logger.info(f"Risk engine started: session {self._session}, {len(self._limits)} recorder limit(s)")
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def is_ready(self, book: str = None) -> bool:
+        """True once the ledgers for `book` (default: all books) have been seeded from the DB."""
+        return book in self._ready if book else len(self._ready) == len(BOOKS)
+
+    # ── Session ─────────────────────────────────────────────────────────────
+
+    def _check_session(self) -> bool:
+        """Reset every ledger and breach when the CME session rolls. Returns True on a roll."""
+        today = trading_date()
+        if today == self._session:
+            return False
+        with self._lock:
+            if today == self._session:
+                return False
+            logger.info(f"🔄 Risk engine session roll {self._session} -> {today}: "
+                        f"clearing {len(self._breaches)} breach(es)")
+            self._session = today
+            self._ledgers.clear()
+            self._realized.clear()
+            self._recent_closes.clear()
+            self._accounts.clear()
+            self._breaches.clear()
+            self._flattened.clear()
+            self._retry_after.clear()
+            self._ready.clear()
+            self.stats['session_rolls'] += 1
+        return True
+
+    # ── Ledgers ─────────────────────────────────────────────────────────────
+
+    def record_close(self, book: str, trade_id, recorder_id: int, pnl: float, closed_at=None):
+        """A trade closed: book its P&L (idempotent per trade id) and re-check the recorder."""
+        self._check_session()
+        if closed_at is not None and epoch(closed_at) < session_start(self._session):
+            return
+        recorder_id = int(recorder_id)
+        with self._lock:
+            self._book_trade(book, recorder_id, trade_id, float(pnl or 0.0))
+            self._recent_closes[(book, trade_id)] = (recorder_id, float(pnl or 0.0), time.time())
+            self._drop_position(f'{book}:{trade_id}')
+        self._evaluate_recorders(book, [recorder_id])
+
+    def _book_trade(self, book: str, recorder_id: int, trade_id, pnl: float):
+        ledger = self._ledgers.setdefault((book, recorder_id), {})
+        previous = ledger.get(trade_id, 0.0)
+        ledger[trade_id] = pnl
+        self._realized[(book, recorder_id)] = self._realized.get((book, recorder_id), 0.0) + pnl - previous
+
+    def realized_pnl(self, book: str, recorder_id: int) -> float:
+        return self._realized.get((book, int(recorder_id)), 0.0)
+
+    def unrealized_pnl(self, book: str, recorder_id: int, account_id=None) -> float:
+        """Open P&L for a recorder; pass account_id to mark only that broker account's positions."""
+        recorder_id = int(recorder_id)
+        with self._lock:
+            return sum(self._mark_position(p) for p in self._positions.values()
+                       if p['book'] == book and recorder_id in p['recorder_ids']
+                       and (account_id is None or p.get('account_id') == account_id))
+
+    def daily_pnl(self, book: str, recorder_id: int, account_id=None) -> float:
+        """Session realized + unrealized P&L for a recorder (optionally one account) in one book."""
+        return (self.realized_pnl(book, recorder_id)
+                + self.unrealized_pnl(book, recorder_id, account_id))
+
+    def limit_for(self, recorder_id: int) -> float:
+        return self._limits.get(int(recorder_id), (0.0, ''))[0]
+
+    # ── Positions ───────────────────────────────────────────────────────────
+
+    def update_position(self, key: str, book: str, recorder_ids: List[int], symbol_root: str,
+                        side: str, qty: float, entry_price: float, flatten: Callable = None, **meta):
+        """Add or replace an open position. qty == 0 removes it."""
+        if not qty or not entry_price:
+            self.remove_position(key)
+            return
+        position = {
+            'key': key,
+            'book': book,
+            'recorder_ids': [int(r) for r in recorder_ids],
+            'symbol_root': symbol_root,
+            'side': side,
+            'qty': float(qty),
+            'entry_price': float(entry_price),
+            'point_value': _point_value(symbol_root),
+            'flatten': flatten,
+            **meta,
+        }
+        with self._lock:
+            self._drop_position(key)
+            self._positions[key] = position
+            self._positions_by_symbol.setdefault(symbol_root, set()).add(key)
+        if symbol_root not in self._marks and self._price_source:
+            price = self._price_source(symbol_root)
+            if price:
+                self._marks[symbol_root] = float(price)
+        self._evaluate_recorders(book, position['recorder_ids'])
+
+    def remove_position(self, key: str):
+        """Position went flat; a re-opened position under the same key may be flattened again."""
+        with self._lock:
+            self._drop_position(key)
+            self._flattened.pop(key, None)
+            self._retry_after.pop(key, None)
+
+    def _drop_position(self, key: str):
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        keys = self._positions_by_symbol.get(position['symbol_root'])
+        if keys:
+            keys.discard(key)
+            if not keys:
+                self._positions_by_symbol.pop(position['symbol_root'], None)
+
+    def _mark_position(self, position: dict) -> float:
+        price = self._marks.get(position['symbol_root'])
+        if not price:
+            return 0.0
+        move = price - position['entry_price']
+        if position['side'] != 'LONG':
+            move = -move
+        return move * position['point_value'] * position['qty']
+
+    # ── Evaluation ──────────────────────────────────────────────────────────
+
+    def on_price(self, symbol_root: str, price: float):
+        """Mark a new tick and check every recorder holding this symbol."""
+        if not price:
+            return
+        self._marks[symbol_root] = float(price)
+        self._last_tick[symbol_root] = time.time()
+        keys = self._positions_by_symbol.get(symbol_root)
+        if not keys:
+            return
+        self.stats['ticks'] += 1
+        affected = {}
+        with self._lock:
+            for key in keys:
+                position = self._positions[key]
+                for recorder_id in position['recorder_ids']:
+                    if recorder_id in self._limits:
+                        affected.setdefault(position['book'], set()).add(recorder_id)
+        for book, recorder_ids in affected.items():
+            self._evaluate_recorders(book, recorder_ids)
+
+    def evaluate(self, book: str = None):
+        """Check every limited recorder (default: all books) against its in-memory P&L."""
+        for name in ([book] if book else BOOKS):
+            self._evaluate_recorders(name, list(self._limits))
+
+    def _exposures(self, book: str, recorder_id: int) -> Dict:
+        """account_id (None for paper) -> that account's open positions following the recorder."""
+        groups = {}
+        for p in self._positions.values():
+            if p['book'] == book and recorder_id in p['recorder_ids']:
+                groups.setdefault(p.get('account_id'), []).append(p)
+        return groups or {None: []}
+
+    def _evaluate_recorders(self, book: str, recorder_ids):
+        fire = []
+        now = time.time()
+        with self._lock:
+            for recorder_id in recorder_ids:
+                limit, name = self._limits.get(recorder_id, (0.0, ''))
+                if limit <= 0:
+                    continue
+                self.stats['evaluations'] += 1
+                # recorded_trades has no account column: realized is the recorder's, while
+                # unrealized is marked per account so N copies don't trip at 1/N of the limit
+                realized = self._realized.get((book, recorder_id), 0.0)
+                for account_id, positions in self._exposures(book, recorder_id).items():
+                    unrealized = sum(self._mark_position(p) for p in positions)
+                    total = realized + unrealized
+                    if total > -limit:
+                        continue
+                    scope = (book, recorder_id) if account_id is None else (book, recorder_id, account_id)
+                    breach = self._claim(scope, name=name, limit=limit, realized=realized,
+                                         unrealized=unrealized, total=total)
+                    fire.extend(self._claim_flattens(positions, breach, now))
+        for position, breach in fire:
+            self.stats['flattens'] += 1
+            price = self._marks.get(position['symbol_root'])
+            self._executor.submit(self._run_flatten, position, price, breach)
+
+    def _claim_flattens(self, positions: List[dict], breach: dict, now: float) -> List[tuple]:
+        """Positions not yet flattened, in flight or cooling down. Called under lock."""
+        fire = []
+        for position in positions:
+            key = position['key']
+            if (key in self._flattened or key in self._inflight
+                    or self._retry_after.get(key, 0) > now):
+                continue
+            self._inflight.add(key)
+            fire.append((position, breach))
+        return fire
+
+    def _claim(self, scope: tuple, **details) -> dict:
+        """Record a breach for this session; logs only the first time. Called under lock."""
+        breach = self._breaches.get(scope)
+        if breach is None:
+            breach = {'scope': scope, 'session': str(self._session), 'at': time.time(), **details}
+            self._breaches[scope] = breach
+            self.stats['breaches_claimed'] += 1
+            label = details.get('name') or scope[1]
+            if len(scope) > 2:
+                label = f'{label} (account {scope[2]})'
+            logger.warning(f"🚨 MAX DAILY LOSS BREACHED [{scope[0]}] {label}: "
+                           f"realized=${details.get('realized', 0):.2f} + "
+                           f"unrealized=${details.get('unrealized', 0):.2f} = "
+                           f"${details.get('total', 0):.2f} (limit: -${details.get('limit', 0):.2f})")
+        return breach
+
+    def _run_flatten(self, position: dict, price: float, breach: dict):
+        key = position['key']
+        handler = position.get('flatten') or self._flatten_handlers.get(position['book'])
+        done = False
+        try:
+            if handler:
+                done = handler(position, price, breach) is not False
+            else:
+                logger.error(f"Risk engine: no flatten handler for {position['book']} position {key}")
+        except Exception as e:
+            logger.error(f"Risk engine flatten error for {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+                if done:
+                    self._flattened[key] = time.time()
+                else:
+                    self._retry_after[key] = time.time() + self.ACTION_COOLDOWN
+
+    # ── Broker-reported account P&L ─────────────────────────────────────────
+
+    def on_account_pnl(self, account_key, realized: float, open_pnl: float, limit: float, **details) -> bool:
+        """
+        Broker cashBalance update for an account. Returns True exactly once per
+        session when realized + open crosses -limit; the caller then flattens.
+        """
+        self._check_session()
+        realized, open_pnl = float(realized or 0.0), float(open_pnl or 0.0)
+        total = realized + open_pnl
+        scope = ('account', str(account_key))
+        with self._lock:
+            self._accounts[str(account_key)] = {'realized': realized, 'open_pnl': open_pnl,
+                                                'limit': limit, 'updated': time.time()}
+            if not limit or limit <= 0 or total > -limit or scope in self._breaches:
+                return False
+            self._claim(scope, limit=limit, realized=realized, unrealized=open_pnl, total=total, **details)
+            return True
+
+    def account_pnl(self, account_key) -> Optional[dict]:
+        snapshot = self._accounts.get(str(account_key))
+        return dict(snapshot) if snapshot else None
+
+    def is_breached(self, kind: str, scope_id, account_id=None) -> bool:
+        """
+        kind is a book name ('live' / 'paper', scope_id = recorder id) or 'account'.
+        For live recorders, account_id narrows the check to one copying broker account.
+        """
+        if self._check_session():
+            return False
+        if kind == 'account':
+            return (kind, str(scope_id)) in self._breaches
+        scope = (kind, int(scope_id)) if account_id is None else (kind, int(scope_id), account_id)
+        return scope in self._breaches
+
+    def breaches(self, kind: str = None) -> List[dict]:
+        with self._lock:
+            return [dict(b) for s, b in self._breaches.items() if kind is None or s[0] == kind]
+
+    def over_limit(self, book: str, realized_only: bool = False) -> List[dict]:
+        """(Recorder, account) exposures at or past their limit right now (reporting; does not flatten)."""
+        rows = []
+        with self._lock:
+            for recorder_id, (limit, name) in self._limits.items():
+                if limit <= 0:
+                    continue
+                realized = self._realized.get((book, recorder_id), 0.0)
+                groups = {None: []} if realized_only else self._exposures(book, recorder_id)
+                for account_id, positions in groups.items():
+                    unrealized = sum(self._mark_position(p) for p in positions)
+                    if realized + unrealized <= -limit:
+                        rows.append({'recorder_id': recorder_id, 'account_id': account_id,
+                                     'name': name, 'limit': limit, 'realized': realized,
+                                     'unrealized': unrealized, 'total': realized + unrealized})
+        return rows
+
+    # ── DB reseed ───────────────────────────────────────────────────────────
+
+    def refresh(self):
+        """Reload limits, session ledgers and open paper positions (one query per table)."""
+        self._check_session()
+        started = time.time()
+        since = session_start(self._session)
+        since_day = datetime.fromtimestamp(since, timezone.utc).strftime('%Y-%m-%d')
+        self._load_limits()
+        self._load_book('live', self._get_connection, self._is_postgres, since, since_day, started)
+        self._load_book('paper', self._paper_connection, None, since, since_day, started)
+        self.stats['refreshes'] += 1
+        self.evaluate()
+
+    def _load_limits(self):
+        if not self._get_connection:
+            return
+        conn = None
+        try:
+            conn = self._get_connection()
+            if conn is None:
+                return
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, name, max_daily_loss FROM recorders WHERE max_daily_loss > 0')
+            limits = {int(row[0]): (float(row[2]), row[1] or f'Recorder {row[0]}')
+                      for row in cursor.fetchall()}
+            with self._lock:
+                self._limits = limits
+        except Exception as e:
+            logger.warning(f"Risk engine limit reload failed: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _load_book(self, book: str, get_connection: Callable, is_postgres: Optional[Callable],
+                   since: float, since_day: str, started: float):
+        """Closed trades since the session open (+ open paper trades) in one pass."""
+        if not get_connection:
+            return
+        conn = None
+        try:
+            if is_postgres is None:
+                conn, use_postgres = get_connection()
+            else:
+                conn, use_postgres = get_connection(), is_postgres()
+            if conn is None:
+                return
+            ph = '%s' if use_postgres else '?'
+            cursor = conn.cursor()
+            if book == 'live':
+                cursor.execute(f'''
+                    SELECT id, recorder_id, pnl, exit_time FROM recorded_trades
+                    WHERE status = 'closed' AND DATE(exit_time) >= DATE({ph})
+                ''', (since_day,))
+            else:
+                cursor.execute(f'''
+                    SELECT id, recorder_id, pnl, closed_at FROM paper_trades
+                    WHERE status = 'closed' AND DATE(closed_at) >= DATE({ph})
+                ''', (since_day,))
+            closed = [tuple(row) for row in cursor.fetchall()]
+            open_rows = []
+            if book == 'paper':
+                cursor.execute('''
+                    SELECT id, recorder_id, symbol, side, quantity, entry_price
+                    FROM paper_trades WHERE status = 'open'
+                ''')
+                open_rows = [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.warning(f"Risk engine {book} reseed failed: {e}")
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        with self._lock:
+            for key in [k for k in self._ledgers if k[0] == book]:
+                del self._ledgers[key]
+                self._realized.pop(key, None)
+            seen = set()
+            for trade_id, recorder_id, pnl, closed_at in closed:
+                if recorder_id is None or epoch(closed_at) < since:
+                    continue
+                self._book_trade(book, int(recorder_id), trade_id, float(pnl or 0.0))
+                seen.add(trade_id)
+            # Closes reported after the query began may not be visible to it yet
+            for key, (recorder_id, pnl, ts) in list(self._recent_closes.items()):
+                if key[0] != book:
+                    continue
+                if ts < started:
+                    del self._recent_closes[key]
+                elif key[1] not in seen:
+                    self._book_trade(book, recorder_id, key[1], pnl)
+            if book == 'paper':
+                self._sync_paper_positions(open_rows)
+            self._ready.add(book)
+
+    def _sync_paper_positions(self, rows):
+        if not self._symbol_root:
+            return
+        current = set()
+        for trade_id, recorder_id, symbol, side, quantity, entry_price in rows:
+            key = f'paper:{trade_id}'
+            if recorder_id is None or ('paper', trade_id) in self._recent_closes:
+                continue
+            current.add(key)
+            existing = self._positions.get(key)
+            if existing and existing['qty'] == float(quantity or 0) and existing['side'] == side:
+                continue
+            root = self._symbol_root(symbol) if symbol else ''
+            if not root or not quantity or not entry_price:
+                continue
+            self._drop_position(key)
+            self._positions[key] = {
+                'key': key, 'book': 'paper', 'recorder_ids': [int(recorder_id)],
+                'symbol_root': root, 'side': side, 'qty': float(quantity),
+                'entry_price': float(entry_price), 'point_value': _point_value(root),
+                'flatten': None, 'trade_id': trade_id, 'symbol': symbol,
+            }
+            self._positions_by_symbol.setdefault(root, set()).add(key)
+        for key in [k for k, p in self._positions.items() if p['book'] == 'paper' and k not in current]:
+            self._drop_position(key)
+
+    # ── Sweep ───────────────────────────────────────────────────────────────
+
+    def _sweep_loop(self):
+        last_refresh = time.time()
+        while True:
+            time.sleep(self.SWEEP_INTERVAL)
+            try:
+                now = time.time()
+                if self._check_session() or now - last_refresh >= self.REFRESH_INTERVAL:
+                    last_refresh = now
+                    self.refresh()
+                if not self._price_source:
+                    continue
+                for symbol_root in list(self._positions_by_symbol):
+                    if now - self._last_tick.get(symbol_root, 0) < self.STALE_TICK_SECONDS:
+                        continue
+                    price = self._price_source(symbol_root)
+                    if price:
+                        self.stats['swept_prices'] += 1
+                        self.on_price(symbol_root, float(price))
+            except Exception as e:
+                logger.error(f"Risk engine sweep error: {e}")
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'session': str(self._session),
+                'ready': sorted(self._ready),
+                'limits': len(self._limits),
+                'positions': len(self._positions),
+                'accounts': len(self._accounts),
+                'breaches': [':'.join(str(part) for part in s) for s in self._breaches],
+                'inflight': len(self._inflight),
+                **self.stats,
+            }
+
+
+_engine_instance = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine(get_connection: Callable = None, is_postgres: Callable = None) -> RiskEngine:
+    """Process-wide RiskEngine. The first caller that passes a connection factory configures it."""
+    global _engine_instance
+    if _engine_instance is None or (_engine_instance._get_connection is None and get_connection is not None):
+        with _engine_lock:
+            if _engine_instance is None:
+                _engine_instance = RiskEngine(get_connection, is_postgres)
+            elif _engine_instance._get_connection is None and get_connection is not None:
+                _engine_instance._get_connection = get_connection
+                _engine_instance._is_postgres = is_postgres or (lambda: False)
+    return _engine_instance
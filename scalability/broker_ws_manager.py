@@ -941,6 +941,13 @@ class BrokerWSManager:
             'accounts_status': accounts_status,
         }
     
+    def is_account_fresh(self, account_id: int, max_age: float = 10.0) -> bool:
+        """True if the account's socket is synced and has spoken within max_age seconds"""
+        with self._accounts_lock:
+            conn = self._accounts.get(account_id)
+            return bool(conn and conn.connected and conn.synced
+                        and time.time() - conn.last_message_at < max_age)
+    
     def health_check(self) -> dict:
         """Check manager health"""
         with self._accounts_lock:
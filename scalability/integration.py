@@ -47,7 +47,6 @@ Enable features one at a time and test before enabling the next.
 
 import logging
 import time
-import threading
 from typing import Optional, Callable, Any
 
 logger = logging.getLogger(__name__)
@@ -142,7 +141,7 @@ def init_scalability(
                         accounts_loaded = _auto_load_tradovate_accounts(manager, db_connection_func)
                         logger.info(f"✅ Background: Auto-loaded {accounts_loaded} Tradovate accounts to WS Manager")
                         _start_ws_token_refresh_task(manager, db_connection_func)
-                        logger.info("✅ Background: WS Token refresh task started (every 5 minutes)")
+                        logger.info("✅ Background: WS token updates subscribed (pushed on renewal)")
                     except Exception as e:
                         logger.error(f"❌ Background account loading failed: {e}")
                 bg_thread = threading.Thread(target=_bg_load_accounts, daemon=True, name="scalability-account-loader")
@@ -320,67 +319,20 @@ def _auto_load_tradovate_accounts(manager, db_connection_func) -> int:
 
 def _start_ws_token_refresh_task(manager, db_connection_func):
     """
-    Start a background task that periodically refreshes tokens from the database
-    into the WebSocket manager. This ensures WS connections use fresh tokens.
-    
-    Runs every 5 minutes to catch any token refreshes that weren't propagated.
+    Push renewed tokens into the WebSocket manager as soon as the token manager
+    obtains them (in this process or, via its Redis broadcast, in another one).
+
+    Replaces the old 5-minute poll of the accounts table.
     """
-    import sqlite3
-    
-    def refresh_loop():
-        while True:
-            try:
-                time.sleep(300)  # 5 minutes
-                
-                conn = db_connection_func()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                # Get all accounts with valid Tradovate tokens
-                cursor.execute('''
-                    SELECT id, tradovate_token, tradovate_accounts, environment
-                    FROM accounts 
-                    WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
-                ''')
-                all_accounts = cursor.fetchall()
-                conn.close()
-                
-                tokens_updated = 0
-                
-                for account in all_accounts:
-                    try:
-                        token = account['tradovate_token']
-                        env = account['environment'] or 'demo'
-                        is_demo = (env.lower() == 'demo')
-                        tradovate_accounts_str = account['tradovate_accounts']
-                        
-                        if tradovate_accounts_str:
-                            import json
-                            subaccounts = json.loads(tradovate_accounts_str)
-                            for sub in subaccounts:
-                                sub_id = sub.get('id') or sub.get('accountId')
-                                if sub_id:
-                                    # Update token in WS manager
-                                    manager.update_token(sub_id, token)
-                                    tokens_updated += 1
-                    except Exception as e:
-                        logger.debug(f"Error updating token for account {account.get('id')}: {e}")
-                        continue
-                
-                if tokens_updated > 0:
-                    logger.info(f"📡 Refreshed {tokens_updated} WS tokens from database")
-                    
-            except Exception as e:
-                logger.error(f"Error in WS token refresh task: {e}")
-    
-    # Start background thread
-    refresh_thread = threading.Thread(
-        target=refresh_loop,
-        daemon=True,
-        name="WS-TokenRefresh"
-    )
-    refresh_thread.start()
-    logger.info("📡 WS Token refresh background task started")
+    from token_manager import get_token_manager
+
+    def on_token(account_id, token, entry):
+        for sub_id in entry.get('subaccount_ids') or ():
+            manager.update_token(sub_id, token)
+        logger.debug(f"📡 Pushed renewed token for account {account_id} to {len(entry.get('subaccount_ids') or ())} WS subaccount(s)")
+
+    get_token_manager().subscribe(on_token)
+    logger.info("📡 WS token updates subscribed to the token manager")
 
 
 def get_scalability_status() -> dict:
@@ -0,0 +1,214 @@
+"""
+Signal Tracking Module
+======================
+Cluster-wide webhook dedup and buffered signal pipeline tracking.
+
+- Dedup uses one SET NX PX key per webhook body hash ("jt:dedup:{key}"), so
+  every gunicorn worker and the trading engine share the same window.
+- Step markers (STEP1_RECEIVED ... STEP9_TRADE_SUCCESS) are buffered per
+  signal in-process and flushed in ONE pipelined write: each step becomes an
+  entry in the "jt:signal_steps" stream and the signal's status lives in the
+  "jt:sig:{signal_id}" hash. A background flusher drains buffers every
+  FLUSH_INTERVAL; complete() flushes immediately.
+- /api/signal-pipeline aggregates the stream into per-step latency percentiles.
+
+Without Redis everything falls back to in-process structures (single worker).
+"""
+
+import json
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('signal_tracking')
+
+STEP_STREAM = 'jt:signal_steps'
+STEP_STREAM_MAXLEN = 50000     # Approximate cap (XADD MAXLEN ~)
+SIGNAL_TTL = 3600              # Seconds to keep jt:sig:{id} status hashes
+FLUSH_INTERVAL = 0.5           # Seconds between background flushes
+
+_buffer_lock = threading.Lock()
+_step_buffer = {}              # signal_id -> [(step, ts, details), ...]
+_status_buffer = {}            # signal_id -> {'status': ..., 'error': ...}
+
+_local_lock = threading.Lock()
+_local_stream = deque(maxlen=5000)   # (signal_id, step, ts) when Redis is unavailable
+_local_status = {}                   # signal_id -> {'status': ..., 'error': ...}
+_local_dedup = {}                    # dedup_key -> expires_at
+
+_flusher_thread = None
+
+
+# ============================================================================
+# WEBHOOK DEDUP (Redis key with PX TTL: "jt:dedup:{key}")
+# ============================================================================
+
+def check_duplicate(dedup_key, window_ms=1000):
+    """
+    Atomically claim a dedup key for window_ms.
+    Returns (is_duplicate, age_seconds). age_seconds is how long ago the
+    first copy was claimed (None when not a duplicate).
+    """
+    now = time.time()
+    r = _get_redis()
+    if r:
+        try:
+            key = f'jt:dedup:{dedup_key}'
+            if r.set(key, repr(now), nx=True, px=int(window_ms)):
+                return False, None
+            first_seen = r.get(key)
+            return True, (now - float(first_seen)) if first_seen else 0.0
+        except Exception as e:
+            logger.warning(f"Redis dedup error: {e}")
+
+    with _local_lock:
+        expires_at = _local_dedup.get(dedup_key)
+        if expires_at and expires_at > now:
+            return True, (now - (expires_at - window_ms / 1000.0))
+        _local_dedup[dedup_key] = now + window_ms / 1000.0
+        if len(_local_dedup) > 1000:
+            for k in [k for k, exp in _local_dedup.items() if exp <= now]:
+                del _local_dedup[k]
+    return False, None
+
+
+# ============================================================================
+# STEP BUFFERING + PIPELINED FLUSH
+# ============================================================================
+
+def track_step(signal_id, step, details=None):
+    """Buffer a pipeline step; it reaches Redis on the next flush."""
+    with _buffer_lock:
+        _step_buffer.setdefault(signal_id, []).append((step, time.time(), details or {}))
+    _ensure_flusher()
+
+
+def complete(signal_id, status='complete', error=None):
+    """Record a terminal status and flush everything buffered so far."""
+    with _buffer_lock:
+        _status_buffer[signal_id] = {'status': status, 'error': error or ''}
+    flush()
+
+
+def flush():
+    """Drain all buffered steps/statuses in a single Redis round trip."""
+    with _buffer_lock:
+        if not _step_buffer and not _status_buffer:
+            return
+        steps, statuses = _step_buffer.copy(), _status_buffer.copy()
+        _step_buffer.clear()
+        _status_buffer.clear()
+
+    r = _get_redis()
+    if r:
+        try:
+            pipe = r.pipeline(transaction=False)
+            for signal_id, events in steps.items():
+                for step, ts, details in events:
+                    pipe.xadd(STEP_STREAM, {
+                        'sid': signal_id,
+                        'step': step,
+                        'ts': repr(ts),
+                        'details': json.dumps(details, default=str),
+                    }, maxlen=STEP_STREAM_MAXLEN, approximate=True)
+                key = f'jt:sig:{signal_id}'
+                pipe.hsetnx(key, 'status', 'pending')
+                pipe.hset(key, 'last_update', repr(events[-1][1]))
+                pipe.expire(key, SIGNAL_TTL)
+            for signal_id, status in statuses.items():
+                key = f'jt:sig:{signal_id}'
+                pipe.hset(key, mapping=status)
+                pipe.expire(key, SIGNAL_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Redis signal flush error: {e}")
+
+    with _local_lock:
+        for signal_id, events in steps.items():
+            _local_stream.extend((signal_id, step, ts) for step, ts, _ in events)
+        _local_status.update(statuses)
+        if len(_local_status) > 1000:
+            for k in list(_local_status)[:200]:
+                del _local_status[k]
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            logger.warning(f"Signal flusher error: {e}")
+
+
+def _ensure_flusher():
+    global _flusher_thread
+    if _flusher_thread is None or not _flusher_thread.is_alive():
+        with _buffer_lock:
+            if _flusher_thread is None or not _flusher_thread.is_alive():
+                _flusher_thread = threading.Thread(target=_flush_loop, daemon=True, name='signal-flusher')
+                _flusher_thread.start()
+
+
+# ============================================================================
+# LATENCY AGGREGATION
+# ============================================================================
+
+def _recent_events(count):
+    """Most recent (signal_id, step, ts) events, oldest first."""
+    r = _get_redis()
+    if r:
+        try:
+            entries = r.xrevrange(STEP_STREAM, count=count)
+            return [(f.get('sid'), f.get('step'), float(f.get('ts', 0))) for _id, f in reversed(entries)]
+        except Exception as e:
+            logger.warning(f"Redis signal stream read error: {e}")
+    with _local_lock:
+        return list(_local_stream)[-count:]
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    idx = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def get_latency_stats(count=5000):
+    """
+    Per-step latency percentiles (ms since the signal's first recorded step)
+    plus end-to-end latency, aggregated over the last `count` stream entries.
+    """
+    first_seen = {}
+    last_seen = {}
+    offsets = {}
+    for signal_id, step, ts in _recent_events(count):
+        if not signal_id:
+            continue
+        t0 = first_seen.setdefault(signal_id, ts)
+        last_seen[signal_id] = ts
+        offsets.setdefault(step, []).append((ts - t0) * 1000.0)
+
+    def summarize(values):
+        values.sort()
+        return {
+            'count': len(values),
+            'p50_ms': round(_percentile(values, 50), 1),
+            'p90_ms': round(_percentile(values, 90), 1),
+            'p99_ms': round(_percentile(values, 99), 1),
+            'max_ms': round(values[-1], 1),
+        }
+
+    end_to_end = [(last_seen[sid] - t0) * 1000.0 for sid, t0 in first_seen.items()]
+    return {
+        'signals': len(first_seen),
+        'end_to_end': summarize(end_to_end) if end_to_end else None,
+        'steps': {step: summarize(values) for step, values in sorted(offsets.items())},
+    }
+
@@ -0,0 +1,681 @@
+"""
+Token Manager - Single owner of Tradovate access tokens
+=======================================================
+BEFORE: five independent loops kept tokens alive - recorder_service's
+TokenRefreshDaemon, the web server's proactive_token_refresh thread,
+scalability's WS-TokenRefresh poller, and a _get_fresh_token() DB read in each
+WebSocket monitor. Every one of them re-read the accounts table on its own
+timer, and two of them could renew the same credential within seconds of each
+other - the renewAccessToken 429 storms (OAUTH_429_FIX_CRITICAL.md).
+
+AFTER:
+- Tokens live in memory, keyed by accounts.id, grouped by credential
+  (username + environment; OAuth-only accounts are their own group). One
+  renewal serves the whole group and is written to every account in it.
+- A min-heap orders groups by refresh deadline (expiry - REFRESH_AHEAD minus
+  up to JITTER seconds), so one scheduler thread sleeps until the next token
+  actually needs work instead of polling.
+- refresh() is single-flight per group: concurrent callers in a process wait
+  for the one in-flight renewal, and a short Redis lock elects one refresher
+  across processes (the others wait for its broadcast).
+- New tokens are published on jt:token_updates; every process reloads just
+  those rows and hands the token to its subscribe() callbacks (WebSocket
+  managers, monitors), so connection holders never poll the database.
+
+Usage:
+    from token_manager import get_token_manager
+
+    tokens = get_token_manager(get_db_connection, is_using_postgres)
+    tokens.start()                                # scheduler + broadcast listener
+    token = tokens.get_token(account_id)          # cached, refreshed when expiring
+    tokens.subscribe(lambda account_id, token, entry: ...)
+"""
+
+import os
+import json
+import time
+import uuid
+import heapq
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from redis_state import _get_redis
+
+logger = logging.getLogger('token_manager')
+
+CHANNEL = 'jt:token_updates'
+LOCK_PREFIX = 'jt:token_refresh:'
+REFRESH_AHEAD = 30 * 60        # Renew this long before expiry
+JITTER = 5 * 60                # Spread renewals of tokens that expire together
+MIN_TTL = 5 * 60               # get_token() refreshes tokens with less life left than this
+MIN_REFRESH_INTERVAL = 30      # Never renew one credential group more often than this
+RATE_LIMIT_BACKOFF = 120       # After a 429, leave the group alone this long (+ jitter)
+FAILURE_RETRY = 5 * 60         # Retry a failed renewal after this long
+REFRESH_SPACING = 2            # Seconds between scheduled renewals of different groups
+RELOAD_INTERVAL = 300          # Re-read the accounts table (new links, OAuth re-auth)
+LOCK_TTL = 30                  # Cross-process refresh lock lifetime
+REMOTE_WAIT = 15               # How long a lock loser waits for the winner's broadcast
+RESUBSCRIBE_DELAY = 5
+DEFAULT_TTL = 85 * 60          # Tradovate tokens last ~90 minutes when no expiry is returned
+
+_ORIGIN = uuid.uuid4().hex
+
+_ACCOUNT_COLUMNS = '''
+    id, name, tradovate_token, tradovate_refresh_token, md_access_token, token_expires_at,
+    environment, username, password, tradovate_accounts
+'''
+
+
+def parse_expiry(value):
+    """token_expires_at / expirationTime (datetime or string) -> naive UTC datetime or None."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        text = str(value).strip().replace('Z', '+00:00')
+        try:
+            dt = datetime.fromisoformat(text.replace(' ', 'T', 1))
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = (dt - dt.utcoffset()).replace(tzinfo=None)
+    return dt
+
+
+def _subaccount_ids(tradovate_accounts):
+    try:
+        subs = json.loads(tradovate_accounts) if isinstance(tradovate_accounts, str) else (tradovate_accounts or [])
+    except (TypeError, ValueError):
+        return []
+    ids = []
+    for sub in subs if isinstance(subs, list) else []:
+        sub_id = (sub.get('id') or sub.get('accountId')) if isinstance(sub, dict) else None
+        if sub_id:
+            ids.append(sub_id)
+    return ids
+
+
+class _Flight:
+    """One in-flight renewal that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = False
+
+
+class TokenManager:
+    """In-memory Tradovate tokens with an expiry heap and single-flight renewal."""
+
+    def __init__(self, get_connection, is_postgres, db_path=None):
+        self._get_connection = get_connection
+        self._is_postgres = is_postgres
+        self._db_path = db_path or os.environ.get('DATABASE_PATH', 'just_trades.db')
+        self._lock = threading.Condition()
+        self._entries = {}             # account_id -> entry dict
+        self._groups = {}              # group key -> set(account_id)
+        self._heap = []                # (due_ts, seq, group key); stale items skipped lazily
+        self._due = {}                 # group key -> due_ts currently scheduled
+        self._seq = 0
+        self._inflight = {}            # group key -> _Flight
+        self._last_attempt = {}        # group key -> ts of last renewal attempt
+        self._backoff_until = {}       # group key -> ts (after 429)
+        self._callbacks = []
+        self._loaded_at = 0.0
+        self._scheduler = None
+        self._subscriber = None
+        self.need_reauth = set()
+        self.stats = {'refreshes': 0, 'failures': 0, 'rate_limited': 0, 'coalesced': 0,
+                      'remote_waits': 0, 'broadcasts_received': 0, 'reloads': 0, 'last_error': None}
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _query(self, where='', params=()):
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {_ACCOUNT_COLUMNS} FROM accounts
+                WHERE tradovate_token IS NOT NULL AND tradovate_token != '' {where}
+            ''', params)
+            columns = [d[0] for d in cursor.description]
+            return [dict(row) if hasattr(row, 'keys') else dict(zip(columns, row))
+                    for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def _load(self, account_ids=None):
+        """(Re)load all token rows, or only `account_ids`. Returns the ids loaded."""
+        if account_ids is None:
+            rows = self._query()
+        else:
+            account_ids = [int(a) for a in account_ids]
+            if not account_ids:
+                return []
+            ph = '%s' if self._is_postgres() else '?'
+            rows = self._query(f"AND id IN ({', '.join([ph] * len(account_ids))})", tuple(account_ids))
+        with self._lock:
+            if account_ids is None:
+                self._entries.clear()
+                self._groups.clear()
+                self._due.clear()
+                self._loaded_at = time.time()
+                self.stats['reloads'] += 1
+            for row in rows:
+                self._put_entry(row)
+            for group in {self._entries[r['id']]['group'] for r in rows}:
+                self._schedule(group)
+            self._lock.notify_all()
+        return [row['id'] for row in rows]
+
+    def _put_entry(self, row):
+        env = (row.get('environment') or 'demo').lower()
+        username = (row.get('username') or '').strip()
+        group = f'{username}|{env}' if username else f'#{row["id"]}|{env}'
+        old = self._entries.get(row['id'])
+        if old and old['group'] != group:
+            self._groups.get(old['group'], set()).discard(row['id'])
+        self._entries[row['id']] = {
+            'id': row['id'],
+            'name': row.get('name') or f"Account {row['id']}",
+            'token': row.get('tradovate_token'),
+            'md_token': row.get('md_access_token'),
+            'refresh_token': row.get('tradovate_refresh_token'),
+            'expires': parse_expiry(row.get('token_expires_at')),
+            'env': env,
+            'username': username,
+            'password': row.get('password'),
+            'subaccount_ids': _subaccount_ids(row.get('tradovate_accounts')),
+            'group': group,
+        }
+        self._groups.setdefault(group, set()).add(row['id'])
+
+    def _ensure_loaded(self):
+        if not self._loaded_at:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def _schedule(self, group, not_before=None):
+        """Push the group's next renewal deadline (caller holds the lock)."""
+        members = [self._entries[a] for a in self._groups.get(group, ()) if a in self._entries]
+        if not members:
+            self._due.pop(group, None)
+            return
+        expiries = [m['expires'] for m in members if m['expires']]
+        now = time.time()
+        if expiries:
+            ttl = (min(expiries) - datetime.utcnow()).total_seconds()
+            due = now + ttl - REFRESH_AHEAD - random.uniform(0, JITTER)
+        else:
+            due = now + random.uniform(0, JITTER)   # Unknown expiry: renew soon, but spread out
+        due = max(due, not_before or 0, self._backoff_until.get(group, 0))
+        self._due[group] = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, group))
+
+    def _pop_due(self, now):
+        """Next group whose deadline has passed (caller holds the lock), else None."""
+        while self._heap:
+            due, _, group = self._heap[0]
+            if self._due.get(group) != due:
+                heapq.heappop(self._heap)       # Superseded by a later _schedule()
+                continue
+            if due > now:
+                return None
+            heapq.heappop(self._heap)
+            self._due.pop(group, None)
+            return group
+        return None
+
+    def start(self) -> threading.Thread:
+        """Start the scheduler (and broadcast listener). Safe to call more than once; returns the scheduler thread."""
+        if self._scheduler is None or not self._scheduler.is_alive():
+            with self._lock:
+                if self._scheduler is None or not self._scheduler.is_alive():
+                    self._scheduler = threading.Thread(target=self._scheduler_loop, daemon=True,
+                                                       name='token-manager')
+                    self._scheduler.start()
+        self._ensure_subscriber()
+        return self._scheduler
+
+    @property
+    def scheduler_thread(self):
+        """The renewal scheduler thread (None before start()), for the server's thread watchdog."""
+        return self._scheduler
+
+    def _scheduler_loop(self):
+        logger.info("🛡️ Token manager started - renewing tokens from an expiry heap")
+        while True:
+            try:
+                if time.time() - self._loaded_at >= RELOAD_INTERVAL:
+                    self._load()
+                with self._lock:
+                    group = self._pop_due(time.time())
+                    if group is None:
+                        next_due = self._heap[0][0] if self._heap else float('inf')
+                        wake = min(next_due, self._loaded_at + RELOAD_INTERVAL)
+                        self._lock.wait(max(0.5, min(wake - time.time(), RELOAD_INTERVAL)))
+                        continue
+                    account_id = next(iter(self._groups.get(group) or ()), None)
+                if account_id is not None:
+                    self.refresh(account_id, reason='scheduled')
+                    time.sleep(REFRESH_SPACING)
+            except Exception as e:
+                self.stats['last_error'] = str(e)
+                logger.error(f"❌ Token manager loop error: {e}")
+                time.sleep(10)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def cached_token(self, account_id, min_ttl=0):
+        """Token from memory only (no DB, no renewal); None if unknown or expiring within min_ttl."""
+        with self._lock:
+            entry = self._entries.get(int(account_id)) if account_id is not None else None
+            if not entry or not entry['token']:
+                return None
+            if min_ttl and entry['expires'] and \
+                    entry['expires'] <= datetime.utcnow() + timedelta(seconds=min_ttl):
+                return None
+            return entry['token']
+
+    def entry(self, account_id):
+        with self._lock:
+            entry = self._entries.get(int(account_id))
+            return dict(entry) if entry else None
+
+    def get_token(self, account_id, min_ttl=MIN_TTL):
+        """
+        A usable access token for an account, renewing it (single-flight) when
+        it has less than min_ttl left. Falls back to the current token if the
+        renewal fails - it may still work for a while.
+        """
+        account_id = int(account_id)
+        self._ensure_loaded()
+        if account_id not in self._entries:
+            self._load([account_id])
+        token = self.cached_token(account_id, min_ttl=min_ttl)
+        if token:
+            return token
+        with self._lock:
+            if account_id not in self._entries:
+                return None
+        self.refresh(account_id, reason='expiring')
+        return self.cached_token(account_id)
+
+    # ------------------------------------------------------------------
+    # Writes from other auth paths (OAuth callback, API Access login)
+    # ------------------------------------------------------------------
+
+    def store(self, account_id, token, expires=None, md_token=None, publish=True):
+        """Record a token obtained elsewhere (already persisted by the caller)."""
+        account_id = int(account_id)
+        if account_id not in self._entries:
+            self._load([account_id])
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is None:
+                return
+            unchanged = entry['token'] == token
+            entry['token'] = token
+            entry['expires'] = parse_expiry(expires) or entry['expires']
+            if md_token:
+                entry['md_token'] = md_token
+            self.need_reauth.discard(account_id)
+            if unchanged:
+                return      # Trade path re-confirming a token we already hold
+            self._schedule(entry['group'])
+            self._lock.notify_all()
+            snapshot = dict(entry)
+        self._notify([snapshot])
+        if publish:
+            self._publish([account_id])
+
+    def reload(self, account_ids):
+        """Re-read accounts whose tokens were written elsewhere (e.g. OAuth callback) and broadcast them."""
+        loaded = self._load(account_ids)
+        with self._lock:
+            self.need_reauth.difference_update(loaded)
+        self._notify([e for e in (self.entry(a) for a in loaded) if e])
+        self._publish(loaded)
+
+    def forget(self, account_id):
+        """Drop an account (unlinked / deleted)."""
+        with self._lock:
+            entry = self._entries.pop(int(account_id), None)
+            if entry:
+                self._groups.get(entry['group'], set()).discard(entry['id'])
+                self._schedule(entry['group'])
+
+    # ------------------------------------------------------------------
+    # Renewal
+    # ------------------------------------------------------------------
+
+    def refresh(self, account_id, force=False, reason='on-demand'):
+        """
+        Renew the token for the account's credential group. Concurrent callers
+        share one renewal. Returns True if the group holds a freshly renewed token.
+        """
+        account_id = int(account_id)
+        with self._lock:
+            entry = self._entries.get(account_id)
+        if entry is None:
+            self._load([account_id])
+            with self._lock:
+                entry = self._entries.get(account_id)
+            if entry is None:
+                return False
+        group = entry['group']
+
+        with self._lock:
+            flight = self._inflight.get(group)
+            leader = flight is None
+            if leader:
+                now = time.time()
+                if not force and (now - self._last_attempt.get(group, 0) < MIN_REFRESH_INTERVAL
+                                  or now < self._backoff_until.get(group, 0)):
+                    logger.debug(f"Skipping refresh for account {account_id} - tried recently")
+                    if group not in self._due:
+                        self._schedule(group, not_before=self._last_attempt[group] + MIN_REFRESH_INTERVAL)
+                    return False
+                self._last_attempt[group] = now
+                flight = self._inflight[group] = _Flight()
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            flight.done.wait(LOCK_TTL + REMOTE_WAIT)
+            return flight.result
+
+        try:
+            flight.result = self._refresh_group(group, reason)
+        except Exception as e:
+            self.stats['failures'] += 1
+            self.stats['last_error'] = str(e)
+            logger.error(f"❌ Token refresh error for {entry['name']}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(group, None)
+                if group not in self._due:
+                    # Failed renewals retry after FAILURE_RETRY instead of spinning
+                    self._schedule(group, not_before=time.time() + FAILURE_RETRY)
+                self._lock.notify_all()
+            flight.done.set()
+        return flight.result
+
+    def _refresh_group(self, group, reason):
+        with self._lock:
+            members = [dict(self._entries[a]) for a in sorted(self._groups.get(group, ())) if a in self._entries]
+        if not members:
+            return False
+        rep = members[0]
+        names = [m['name'] for m in members]
+
+        lock_key = LOCK_PREFIX + group
+        r = _get_redis()
+        if r:
+            try:
+                if not r.set(lock_key, _ORIGIN, nx=True, ex=LOCK_TTL):
+                    # Another process is renewing this credential right now
+                    return self._await_remote(group, rep)
+            except Exception as e:
+                logger.debug(f"Token refresh lock unavailable, refreshing locally: {e}")
+                r = None
+
+        try:
+            logger.info(f"🔄 [{rep['name']}] Renewing token ({reason}) for group of {len(members)}: {names}")
+            token, expires, md_token, rate_limited = self._renew(rep, members)
+            if token:
+                self._persist(members, token, expires)
+                now = datetime.utcnow()
+                with self._lock:
+                    for m in members:
+                        entry = self._entries.get(m['id'])
+                        if entry:
+                            entry['token'] = token
+                            entry['expires'] = expires
+                            if md_token:
+                                entry['md_token'] = md_token
+                        self.need_reauth.discard(m['id'])
+                    self._backoff_until.pop(group, None)
+                    self._schedule(group)
+                    snapshots = [dict(self._entries[m['id']]) for m in members if m['id'] in self._entries]
+                    self.stats['refreshes'] += 1
+                self._notify(snapshots)
+                self._publish([m['id'] for m in members])
+                logger.info(f"✅ [{rep['name']}] Token renewed for {len(members)} account(s), "
+                            f"valid {int((expires - now).total_seconds() / 60)} min")
+                return True
+
+            self.stats['failures'] += 1
+            with self._lock:
+                if rate_limited:
+                    self.stats['rate_limited'] += 1
+                    self._backoff_until[group] = time.time() + RATE_LIMIT_BACKOFF + random.uniform(0, 30)
+                    self._schedule(group)
+                if rep['username'] and rep['password']:
+                    # API Access at trade time still works - do not demand OAuth
+                    self.need_reauth.difference_update(m['id'] for m in members)
+                    logger.warning(f"⚠️ [{rep['name']}] Token renewal failed but has credentials - trades will work")
+                elif not rate_limited:
+                    self.need_reauth.update(m['id'] for m in members)
+                    logger.error(f"❌ [{rep['name']}] ALL REFRESH METHODS FAILED and no credentials - needs OAuth!")
+            return False
+        finally:
+            if r:
+                try:
+                    if r.get(lock_key) == _ORIGIN:
+                        r.delete(lock_key)
+                except Exception:
+                    pass
+
+    def _await_remote(self, group, rep):
+        """Lock loser: wait for the winner's broadcast, then fall back to the DB row."""
+        self.stats['remote_waits'] += 1
+        old_token = rep['token']
+        deadline = time.time() + REMOTE_WAIT
+        with self._lock:
+            while time.time() < deadline:
+                entry = self._entries.get(rep['id'])
+                if entry and entry['token'] != old_token:
+                    return True
+                self._lock.wait(deadline - time.time())
+        self._load([rep['id']])
+        entry = self.entry(rep['id'])
+        return bool(entry and entry['token'] != old_token)
+
+    def _renew(self, rep, members):
+        """
+        Try the renewal methods in order. Returns (token, expires, md_token, rate_limited).
+
+        1. renewAccessToken with the current access token
+        2. renewAccessToken with the stored refresh token (older OAuth links)
+        3. API Access login with username/password
+        """
+        import requests
+
+        base_url = ('https://demo.tradovateapi.com/v1' if rep['env'] == 'demo'
+                    else 'https://live.tradovateapi.com/v1')
+        rate_limited = False
+        bearers = []
+        for m in members:
+            for candidate in (m['token'], m['refresh_token']):
+                if candidate and candidate not in bearers:
+                    bearers.append(candidate)
+        for bearer in bearers[:3]:
+            try:
+                response = requests.post(f'{base_url}/auth/renewAccessToken',
+                                         headers={'Authorization': f'Bearer {bearer}',
+                                                  'Content-Type': 'application/json'},
+                                         timeout=10)
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"renewAccessToken request error: {e}")
+                continue
+            if response.status_code == 429:
+                rate_limited = True
+                logger.warning(f"⚠️ [{rep['name']}] Rate limited (429) renewing token - backing off")
+                break
+            if response.status_code != 200:
+                continue
+            try:
+                data = response.json()
+            except ValueError:
+                continue
+            if data.get('errorText'):
+                continue
+            token = data.get('accessToken') or data.get('access_token')
+            if token:
+                return token, self._expiry_from(data), data.get('mdAccessToken'), False
+
+        if rep['username'] and rep['password'] and not rate_limited:
+            try:
+                from tradovate_api_access import TradovateAPIAccess
+                api = TradovateAPIAccess(demo=(rep['env'] == 'demo'))
+                result = asyncio.run(api.login(rep['username'], rep['password'], self._db_path, rep['id']))
+                if result.get('success') and result.get('accessToken'):
+                    return result['accessToken'], self._expiry_from(result), result.get('mdAccessToken'), False
+            except Exception as e:
+                logger.warning(f"⚠️ [{rep['name']}] API Access renewal failed: {e}")
+        return None, None, None, rate_limited
+
+    @staticmethod
+    def _expiry_from(data):
+        expires = parse_expiry(data.get('expirationTime'))
+        if not expires and data.get('expiresIn'):
+            try:
+                expires = datetime.utcnow() + timedelta(seconds=int(data['expiresIn']))
+            except (TypeError, ValueError):
+                expires = None
+        return expires or datetime.utcnow() + timedelta(seconds=DEFAULT_TTL)
+
+    def _persist(self, members, token, expires):
+        """Write the SAME token to every account of the group (one statement)."""
+        ph = '%s' if self._is_postgres() else '?'
+        ids = [m['id'] for m in members]
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                UPDATE accounts SET tradovate_token = {ph}, token_expires_at = {ph}
+                WHERE id IN ({', '.join([ph] * len(ids))})
+            ''', (token, expires.strftime('%Y-%m-%d %H:%M:%S'), *ids))
+            conn.commit()
+        finally:
+            conn.close()
+        try:
+            from config_registry import get_config_registry
+            registry = get_config_registry()
+            for account_id in ids:
+                registry.invalidate_account(account_id)
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Broadcast
+    # ------------------------------------------------------------------
+
+    def subscribe(self, callback):
+        """callback(account_id, token, entry) for every new token (any process)."""
+        self._callbacks.append(callback)
+        self._ensure_subscriber()
+
+    def _notify(self, entries):
+        for entry in entries:
+            for callback in list(self._callbacks):
+                try:
+                    callback(entry['id'], entry['token'], entry)
+                except Exception as e:
+                    logger.debug(f"Token subscriber failed: {e}")
+
+    def _publish(self, account_ids):
+        r = _get_redis()
+        if not r:
+            return
+        self._ensure_subscriber()
+        try:
+            # Only ids go over the wire - receivers read the token from the database
+            r.publish(CHANNEL, json.dumps({'origin': _ORIGIN, 'account_ids': account_ids}))
+        except Exception as e:
+            logger.debug(f"Token broadcast failed: {e}")
+
+    def _ensure_subscriber(self):
+        if self._subscriber is None and _get_redis():
+            with self._lock:
+                if self._subscriber is None:
+                    self._subscriber = threading.Thread(target=self._subscribe_loop, daemon=True,
+                                                        name='token-manager-sub')
+                    self._subscriber.start()
+
+    def _subscribe_loop(self):
+        while True:
+            r = _get_redis()
+            if not r:
+                time.sleep(RESUBSCRIBE_DELAY)
+                continue
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    try:
+                        msg = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if msg.get('origin') == _ORIGIN or not msg.get('account_ids'):
+                        continue
+                    self.stats['broadcasts_received'] += 1
+                    loaded = self._load(msg['account_ids'])
+                    self._notify([e for e in (self.entry(a) for a in loaded) if e])
+            except Exception as e:
+                logger.warning(f"Token broadcast subscription lost, resubscribing: {e}")
+            time.sleep(RESUBSCRIBE_DELAY)
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def accounts_needing_reauth(self):
+        with self._lock:
+            return sorted(self.need_reauth)
+
+    def get_stats(self):
+        now = datetime.utcnow()
+        with self._lock:
+            next_due = min(self._due.values()) if self._due else None
+            expiring = sum(1 for e in self._entries.values()
+                           if e['expires'] and e['expires'] <= now + timedelta(seconds=REFRESH_AHEAD))
+            return dict(self.stats, accounts=len(self._entries), groups=len(self._groups),
+                        scheduled=len(self._due), in_flight=len(self._inflight),
+                        expiring_soon=expiring, need_reauth=len(self.need_reauth),
+                        next_refresh_in=round(next_due - time.time(), 1) if next_due else None,
+                        subscribers=len(self._callbacks))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_token_manager(get_connection=None, is_postgres=None, db_path=None):
+    """Process-wide TokenManager. The first caller that passes a connection factory configures it."""
+    global _manager
+    if _manager is None or (_manager._get_connection is None and get_connection is not None):
+        with _manager_lock:
+            if _manager is None:
+                _manager = TokenManager(get_connection, is_postgres or (lambda: False), db_path)
+            elif _manager._get_connection is None and get_connection is not None:
+                _manager._get_connection = get_connection
+                _manager._is_postgres = is_postgres or (lambda: False)
+                _manager._db_path = db_path or _manager._db_path
+    return _manager
+
+
+def is_configured():
+    """True once some caller in this process gave the manager a database connection."""
+    return _manager is not None and _manager._get_connection is not None
@@ -8,11 +8,10 @@ Streams live tick data from TradingView WebSocket for paper trading
 import json
 import random
 import string
-import re
 import threading
 import time
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Callable, Optional
 import logging
 
@@ -26,6 +25,8 @@ except ImportError:
 
 import os
 
+from tv_protocol import QuoteBook, decode, encode_message
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -247,11 +248,13 @@ class TradingViewTicker:
         self.ws = None
         self.session_id = self._generate_session()
         self.chart_session = self._generate_session("cs_")
-        self.prices: Dict[str, dict] = {}
+        # Records are updated in place (tv_protocol.QuoteBook); prices/lock stay as aliases
+        self._book = QuoteBook()
+        self.prices: Dict[str, dict] = self._book.records
         self.callbacks: list = []
         self.running = False
         self.connected = False
-        self.lock = threading.Lock()
+        self.lock = self._book.lock
         self.last_update_time = 0
         self.reconnect_count = 0
         self.health_thread = None
@@ -272,48 +275,22 @@ class TradingViewTicker:
         return prefix + ''.join(random.choice(chars) for _ in range(12))
 
     def _create_message(self, func: str, params: list) -> str:
-        """Create TradingView protocol message"""
-        return json.dumps({"m": func, "p": params})
+        """Create framed TradingView protocol message"""
+        return encode_message(func, params)
 
     def _send_message(self, func: str, params: list):
         """Send message to TradingView WebSocket"""
         if self.ws:
-            msg = "~m~" + str(len(self._create_message(func, params))) + "~m~" + self._create_message(func, params)
             try:
-                self.ws.send(msg)
+                self.ws.send(self._create_message(func, params))
             except Exception as e:
                 logger.error(f"Error sending message: {e}")
 
-    def _parse_message(self, message: str) -> list:
-        """Parse TradingView protocol message"""
-        results = []
-        pattern = re.compile(r'~m~(\d+)~m~')
-
-        pos = 0
-        while pos < len(message):
-            match = pattern.match(message, pos)
-            if match:
-                length = int(match.group(1))
-                pos = match.end()
-                data = message[pos:pos + length]
-                pos += length
-
-                if data.startswith('{'):
-                    try:
-                        results.append(json.loads(data))
-                    except:
-                        pass
-            else:
-                break
-
-        return results
-
     def _on_message(self, ws, message):
         """Handle incoming WebSocket message"""
-        # Handle TradingView application-level heartbeats (can be anywhere in message)
-        # Format: ~m~X~m~~h~Y where X is length and Y is the heartbeat number
-        heartbeat_pattern = re.compile(r'~m~\d+~m~~h~\d+')
-        heartbeats = heartbeat_pattern.findall(message)
+        # Heartbeats (~m~X~m~~h~Y, anywhere in a batched message) are echoed unchanged;
+        # only qsd quote frames are JSON-decoded
+        heartbeats, quotes = decode(message)
         for hb in heartbeats:
             try:
                 ws.send(hb)
@@ -321,48 +298,20 @@ class TradingViewTicker:
             except Exception as e:
                 logger.error(f"Failed to send heartbeat response: {e}")
 
-        parsed = self._parse_message(message)
-
-        for data in parsed:
-            if isinstance(data, dict) and data.get('m') == 'qsd':
-                # Quote data update
-                try:
-                    params = data.get('p', [])
-                    if len(params) >= 2:
-                        symbol_data = params[1]
-                        symbol = symbol_data.get('n', '')
-                        values = symbol_data.get('v', {})
-
-                        if values:
-                            with self.lock:
-                                self.prices[symbol] = {
-                                    'symbol': symbol,
-                                    'last_price': values.get('lp'),
-                                    'bid': values.get('bid'),
-                                    'ask': values.get('ask'),
-                                    'volume': values.get('volume'),
-                                    'change': values.get('ch'),
-                                    'change_percent': values.get('chp'),
-                                    'high': values.get('high_price'),
-                                    'low': values.get('low_price'),
-                                    'open': values.get('open_price'),
-                                    'prev_close': values.get('prev_close_price'),
-                                    'timestamp': datetime.now().isoformat(),
-                                    'update_time': time.time()
-                                }
-
-                            # Update last update time
-                            self.last_update_time = time.time()
-
-                            # Call registered callbacks
-                            for callback in self.callbacks:
-                                try:
-                                    callback(symbol, self.prices[symbol])
-                                except Exception as e:
-                                    logger.error(f"Callback error: {e}")
-
-                except Exception as e:
-                    logger.error(f"Error parsing quote data: {e}")
+        for symbol, values in quotes:
+            try:
+                record = self._book.apply(symbol, values)
+                self.last_update_time = record['update_time']
+
+                # Call registered callbacks
+                for callback in self.callbacks:
+                    try:
+                        callback(symbol, record)
+                    except Exception as e:
+                        logger.error(f"Callback error: {e}")
+
+            except Exception as e:
+                logger.error(f"Error parsing quote data: {e}")
 
     def _on_error(self, ws, error):
         """Handle WebSocket error"""
@@ -495,14 +444,12 @@ class TradingViewTicker:
         self.callbacks.append(callback)
 
     def get_price(self, symbol: str) -> Optional[dict]:
-        """Get current price for symbol"""
-        with self.lock:
-            return self.prices.get(symbol)
+        """Get current price for symbol (a copy, with ISO 'timestamp')"""
+        return self._book.get(symbol)
 
     def get_all_prices(self) -> Dict[str, dict]:
         """Get all current prices"""
-        with self.lock:
-            return dict(self.prices)
+        return self._book.snapshot()
 
     def add_symbol(self, symbol: str):
         """Add symbol to track"""
@@ -513,6 +460,80 @@ class TradingViewTicker:
                 logger.info(f"Added symbol: {symbol}")
 
 
+class PaperAnalyticsAccumulator:
+    """
+    Running analytics for one scope (a recorder, or scope 0 = all recorders).
+    Each closed trade is folded in once, so reports never rescan paper_trades.
+    """
+
+    def __init__(self, state: dict = None):
+        state = state or {}
+        self.total_trades = state.get('total_trades', 0)
+        self.winning_trades = state.get('winning_trades', 0)
+        self.losing_trades = state.get('losing_trades', 0)
+        self.gross_profit = state.get('gross_profit', 0.0)
+        self.gross_loss = state.get('gross_loss', 0.0)  # absolute value
+        self.largest_win = state.get('largest_win', 0.0)
+        self.largest_loss = state.get('largest_loss', 0.0)  # most negative
+        self.cumulative_pnl = state.get('cumulative_pnl', 0.0)
+        self.peak_pnl = state.get('peak_pnl', 0.0)
+        self.max_drawdown = state.get('max_drawdown', 0.0)
+        self.max_drawdown_pct = state.get('max_drawdown_pct', 0.0)
+        self.streak = state.get('streak', 0)  # +N = N wins in a row, -N = N losses
+        self.max_win_streak = state.get('max_win_streak', 0)
+        self.max_loss_streak = state.get('max_loss_streak', 0)
+        # symbol -> [trade_count, total_pnl, winners, losers, best, worst]
+        self.symbols: Dict[str, list] = state.get('symbols', {})
+        # 'YYYY-MM-DD' -> [trade_count, pnl, winners, losers]
+        self.daily: Dict[str, list] = state.get('daily', {})
+
+    def add(self, pnl: float, closed_at: str, symbol: str) -> float:
+        """Fold one closed trade in. Returns the drawdown from peak after this trade."""
+        self.total_trades += 1
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+            self.largest_win = max(self.largest_win, pnl)
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.max_win_streak = max(self.max_win_streak, self.streak)
+        elif pnl < 0:
+            self.losing_trades += 1
+            self.gross_loss += -pnl
+            self.largest_loss = min(self.largest_loss, pnl)
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.max_loss_streak = max(self.max_loss_streak, -self.streak)
+
+        self.cumulative_pnl += pnl
+        if self.cumulative_pnl > self.peak_pnl:
+            self.peak_pnl = self.cumulative_pnl
+        dd = self.peak_pnl - self.cumulative_pnl
+        if dd > self.max_drawdown:
+            self.max_drawdown = dd
+            if self.peak_pnl > 0:
+                self.max_drawdown_pct = (dd / self.peak_pnl) * 100
+
+        sym = self.symbols.setdefault(symbol, [0, 0.0, 0, 0, pnl, pnl])
+        sym[0] += 1
+        sym[1] += pnl
+        sym[2] += 1 if pnl > 0 else 0
+        sym[3] += 1 if pnl < 0 else 0
+        sym[4] = max(sym[4], pnl)
+        sym[5] = min(sym[5], pnl)
+
+        if closed_at:
+            day = self.daily.setdefault(closed_at[:10], [0, 0.0, 0, 0])
+            day[0] += 1
+            day[1] += pnl
+            day[2] += 1 if pnl > 0 else 0
+            day[3] += 1 if pnl < 0 else 0
+
+        return dd
+
+    def to_state(self) -> dict:
+        """Serializable state for the paper_analytics checkpoint row."""
+        return dict(self.__dict__)
+
+
 class PaperTradingEngine:
     """
     Paper trading engine that tracks theoretical trades using real-time prices.
@@ -534,8 +555,16 @@ class PaperTradingEngine:
         else:
             logger.info("Paper trading using SQLite (local)")
 
+        # Incremental analytics state (see _sync_analytics)
+        self._analytics_lock = threading.Lock()
+        self._accumulators: Dict[int, PaperAnalyticsAccumulator] = {}
+        self._equity: Dict[int, list] = {}  # scope -> [(closed_at, pnl, cumulative_pnl, drawdown, symbol, side)]
+        self._analytics_watermark = None  # 'YYYY-MM-DD HH:MM:SS' of the newest folded close (None = nothing folded)
+        self._analytics_synced_at = 0.0
+
         self._init_db()
         self._load_positions()
+        self._load_analytics()
 
     def _get_connection(self):
         """Get database connection (PostgreSQL or SQLite)"""
@@ -600,6 +629,29 @@ class PaperTradingEngine:
                     status TEXT DEFAULT 'open'
                 )
             ''')
+
+            # Incremental analytics: accumulator checkpoints + append-only equity series
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS paper_analytics (
+                    scope INTEGER PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS paper_equity_points (
+                    id SERIAL PRIMARY KEY,
+                    scope INTEGER NOT NULL,
+                    trade_id INTEGER NOT NULL,
+                    closed_at TEXT,
+                    pnl REAL NOT NULL,
+                    cumulative_pnl REAL NOT NULL,
+                    drawdown REAL NOT NULL,
+                    symbol TEXT,
+                    side TEXT,
+                    UNIQUE (scope, trade_id)
+                )
+            ''')
         else:
             # SQLite syntax
             cursor.execute('''
@@ -635,6 +687,29 @@ class PaperTradingEngine:
                 )
             ''')
 
+            # Incremental analytics: accumulator checkpoints + append-only equity series
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS paper_analytics (
+                    scope INTEGER PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS paper_equity_points (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope INTEGER NOT NULL,
+                    trade_id INTEGER NOT NULL,
+                    closed_at TEXT,
+                    pnl REAL NOT NULL,
+                    cumulative_pnl REAL NOT NULL,
+                    drawdown REAL NOT NULL,
+                    symbol TEXT,
+                    side TEXT,
+                    UNIQUE (scope, trade_id)
+                )
+            ''')
+
         conn.commit()
         conn.close()
         logger.info(f"Paper trading database initialized ({'PostgreSQL' if self.use_postgres else 'SQLite'})")
@@ -815,6 +890,9 @@ class PaperTradingEngine:
         # Remove from memory
         del self.positions[recorder_id][symbol]
 
+        # Fold the closed trades into the running analytics
+        self._sync_analytics(force=True)
+
         logger.info(f"📊 Closed paper position: {symbol} @ {exit_price}, P&L: ${pnl:.2f} for recorder {recorder_id}")
 
         return {
@@ -827,6 +905,191 @@ class PaperTradingEngine:
             'pnl': pnl
         }
 
+    # ------------------------------------------------------------------
+    # Incremental analytics
+    # ------------------------------------------------------------------
+    # Closed trades are folded into per-scope accumulators (scope 0 = all
+    # recorders) and appended to paper_equity_points exactly once. Trades
+    # closed outside close_position (TP/SL monitors in the web server write
+    # paper_trades directly) are picked up by the closed_at watermark tail.
+    # paper_trades ids are allocated at open, not close, so the tail cannot
+    # follow them; it re-reads ANALYTICS_OVERLAP behind the watermark (a close
+    # that commits late with an older closed_at) and the scope-0 row in
+    # paper_equity_points is the record of which trades are already folded.
+    # The in-memory equity series is thinned to at most EQUITY_POINTS_MAX points
+    # per scope; paper_equity_points keeps every point.
+
+    ANALYTICS_SYNC_INTERVAL = 5  # seconds between watermark tails on read
+    ANALYTICS_OVERLAP = 300  # seconds re-read behind the watermark
+    EQUITY_POINTS_MAX = 2000  # in-memory equity points per scope before thinning
+
+    @staticmethod
+    def _closed_at_key(closed_at) -> Optional[datetime]:
+        """closed_at (datetime, ISO text or SQLite CURRENT_TIMESTAMP text) -> naive datetime."""
+        if not closed_at:
+            return None
+        if not isinstance(closed_at, datetime):
+            try:
+                closed_at = datetime.fromisoformat(str(closed_at).replace('Z', '+00:00'))
+            except ValueError:
+                return None
+        return closed_at.replace(tzinfo=None)
+
+    def _append_equity(self, scope: int, point: tuple):
+        series = self._equity.setdefault(scope, [])
+        series.append(point)
+        if len(series) > self.EQUITY_POINTS_MAX:
+            # Drop every other point but keep the newest: the curve keeps its full span
+            self._equity[scope] = series[-1::-2][::-1]
+
+    def _load_analytics(self):
+        """Restore accumulators + equity series from their checkpoint tables, then tail new closes."""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT scope, state FROM paper_analytics')
+            for scope, state in cursor.fetchall():
+                state = json.loads(state) if state else {}
+                if scope == 0:
+                    self._analytics_watermark = state.pop('watermark', None) or None
+                    state.pop('watermark_ids', None)  # Older checkpoints
+                self._accumulators[scope] = PaperAnalyticsAccumulator(state)
+
+            cursor.execute('''
+                SELECT scope, pnl, cumulative_pnl, drawdown, closed_at, symbol, side
+                FROM paper_equity_points ORDER BY id ASC
+            ''')
+            for scope, pnl, cum_pnl, dd, closed_at, symbol, side in cursor.fetchall():
+                self._append_equity(scope, (closed_at, pnl, cum_pnl, dd, symbol, side))
+
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error loading paper analytics: {e}")
+
+        self._sync_analytics(force=True)
+        logger.info(f"Paper analytics ready: {self._accumulators.get(0, PaperAnalyticsAccumulator()).total_trades} closed trades")
+
+    def _sync_analytics(self, force: bool = False):
+        """Fold trades closed since the watermark into the accumulators and persist them."""
+        now = time.time()
+        if not force and now - self._analytics_synced_at < self.ANALYTICS_SYNC_INTERVAL:
+            return
+        with self._analytics_lock:
+            self._analytics_synced_at = now
+            try:
+                conn = self._get_connection()
+                cursor = conn.cursor()
+                ph = self._get_placeholder()
+
+                # No watermark yet means fold everything: a '0' sentinel is not a valid
+                # TIMESTAMP on Postgres. The space-separated bound sorts before both the
+                # ISO ('T') and CURRENT_TIMESTAMP forms of the same instant on SQLite.
+                since = f'AND t.closed_at >= {ph}' if self._analytics_watermark else ''
+                params = ()
+                if since:
+                    bound = self._closed_at_key(self._analytics_watermark) - timedelta(seconds=self.ANALYTICS_OVERLAP)
+                    params = (bound.strftime('%Y-%m-%d %H:%M:%S'),)
+                cursor.execute(f'''
+                    SELECT t.id, t.recorder_id, t.symbol, t.side, t.pnl, t.closed_at
+                    FROM paper_trades t
+                    WHERE t.status = 'closed' AND t.pnl IS NOT NULL {since}
+                      AND NOT EXISTS (SELECT 1 FROM paper_equity_points p WHERE p.scope = 0 AND p.trade_id = t.id)
+                    ORDER BY t.closed_at ASC, t.id ASC
+                ''', params)
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.close()
+                    return
+
+                # Fold into copies so a failed write leaves memory matching the checkpoints
+                accumulators = {}
+                new_points: Dict[int, list] = {}
+                points = []
+                watermark = self._closed_at_key(self._analytics_watermark)
+                for trade_id, recorder_id, symbol, side, pnl, closed_at in rows:
+                    key = self._closed_at_key(closed_at)
+                    if key and (watermark is None or key > watermark):
+                        watermark = key
+                    closed_at = closed_at.isoformat() if hasattr(closed_at, 'isoformat') else str(closed_at or '')
+                    # A trade without a recorder only counts toward the all-recorders scope
+                    for scope in ((0, recorder_id) if recorder_id else (0,)):
+                        if scope not in accumulators:
+                            current = self._accumulators.get(scope)
+                            accumulators[scope] = PaperAnalyticsAccumulator(
+                                json.loads(json.dumps(current.to_state())) if current else None)
+                        acc = accumulators[scope]
+                        dd = acc.add(pnl, closed_at, symbol)
+                        point = (closed_at, pnl, acc.cumulative_pnl, dd, symbol, side)
+                        new_points.setdefault(scope, []).append(point)
+                        points.append((scope, trade_id) + point)
+                watermark = watermark.strftime('%Y-%m-%d %H:%M:%S') if watermark else self._analytics_watermark
+
+                # Persist the appended points + accumulator checkpoints in one transaction
+                insert_sql = f'''
+                    INSERT INTO paper_equity_points
+                    (scope, trade_id, closed_at, pnl, cumulative_pnl, drawdown, symbol, side)
+                    VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+                '''
+                if self.use_postgres:
+                    insert_sql += ' ON CONFLICT (scope, trade_id) DO NOTHING'
+                    upsert_sql = f'''
+                        INSERT INTO paper_analytics (scope, state, updated_at) VALUES ({ph}, {ph}, {ph})
+                        ON CONFLICT (scope) DO UPDATE SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at
+                    '''
+                else:
+                    insert_sql = insert_sql.replace('INSERT INTO', 'INSERT OR IGNORE INTO', 1)
+                    upsert_sql = f'INSERT OR REPLACE INTO paper_analytics (scope, state, updated_at) VALUES ({ph}, {ph}, {ph})'
+                cursor.executemany(insert_sql, points)
+
+                stamp = datetime.now().isoformat()
+                checkpoints = []
+                for scope, acc in accumulators.items():
+                    state = acc.to_state()
+                    if scope == 0:
+                        state['watermark'] = watermark
+                    checkpoints.append((scope, json.dumps(state), stamp))
+                cursor.executemany(upsert_sql, checkpoints)
+
+                conn.commit()
+                conn.close()
+
+                self._accumulators.update(accumulators)
+                for scope, scope_points in new_points.items():
+                    for point in scope_points:
+                        self._append_equity(scope, point)
+                self._analytics_watermark = watermark
+            except Exception as e:
+                logger.error(f"Error syncing paper analytics: {e}")
+
+    def reset_analytics(self):
+        """
+        Paper trades were deleted (reset / delete endpoints): drop the checkpoints and
+        refold what is left. Every scope is rebuilt because scope 0 spans all recorders.
+        """
+        with self._analytics_lock:
+            try:
+                conn = self._get_connection()
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM paper_equity_points')
+                cursor.execute('DELETE FROM paper_analytics')
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error clearing paper analytics checkpoints: {e}")
+            self._accumulators = {}
+            self._equity = {}
+            self._analytics_watermark = None
+        self._sync_analytics(force=True)
+
+    def _get_accumulator(self, recorder_id: int = None) -> PaperAnalyticsAccumulator:
+        self._sync_analytics()
+        return self._accumulators.get(recorder_id or 0) or PaperAnalyticsAccumulator()
+
+    def _get_equity_series(self, recorder_id: int = None) -> list:
+        self._sync_analytics()
+        return self._equity.get(recorder_id or 0, [])
+
     def get_position(self, recorder_id: int, symbol: str = None) -> dict:
         """Get position(s) for a recorder"""
         if recorder_id not in self.positions:
@@ -893,53 +1156,18 @@ class PaperTradingEngine:
     def get_chart_data(self, recorder_id: int = None, limit: int = 500) -> dict:
         """Get PnL chart data: cumulative profit + drawdown arrays for Chart.js"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            ph = self._get_placeholder()
-
-            if recorder_id:
-                cursor.execute(f'''
-                    SELECT pnl, closed_at
-                    FROM paper_trades
-                    WHERE recorder_id = {ph} AND status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                    LIMIT {ph}
-                ''', (recorder_id, limit))
-            else:
-                cursor.execute(f'''
-                    SELECT pnl, closed_at
-                    FROM paper_trades
-                    WHERE status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                    LIMIT {ph}
-                ''', (limit,))
-
-            rows = cursor.fetchall()
-            conn.close()
-
-            if not rows:
+            points = self._get_equity_series(recorder_id)[:limit]
+            if not points:
                 return {'labels': [], 'profit': [], 'drawdown': []}
 
             labels = []
             profit = []
             drawdown = []
-            running_pnl = 0.0
-            peak_pnl = 0.0
-
-            for row in rows:
-                pnl_val = row[0]
-                closed_at = row[1] or ''
-                running_pnl += pnl_val
-
-                if running_pnl > peak_pnl:
-                    peak_pnl = running_pnl
-
-                dd = peak_pnl - running_pnl
 
+            for closed_at, _pnl, cum_pnl, dd, _symbol, _side in points:
                 # Format label from closed_at
                 if closed_at:
                     try:
-                        from datetime import datetime
                         dt = datetime.fromisoformat(str(closed_at).replace('Z', '+00:00'))
                         labels.append(dt.strftime('%b %d'))
                     except Exception:
@@ -947,7 +1175,7 @@ class PaperTradingEngine:
                 else:
                     labels.append(f'Trade {len(labels) + 1}')
 
-                profit.append(round(running_pnl, 2))
+                profit.append(round(cum_pnl, 2))
                 drawdown.append(round(-dd, 2))  # Negative for chart display
 
             return {'labels': labels, 'profit': profit, 'drawdown': drawdown}
@@ -1050,32 +1278,12 @@ class PaperTradingEngine:
         Get comprehensive trading analytics.
         If recorder_id is provided, returns analytics for that recorder only.
         Otherwise returns analytics for all trades.
+        Served from the running accumulators (no trade history scan).
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            ph = self._get_placeholder()
+            acc = self._get_accumulator(recorder_id)
 
-            # Get all closed trades
-            if recorder_id:
-                cursor.execute(f'''
-                    SELECT symbol, side, quantity, entry_price, exit_price, pnl, opened_at, closed_at
-                    FROM paper_trades
-                    WHERE recorder_id = {ph} AND status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                ''', (recorder_id,))
-            else:
-                cursor.execute('''
-                    SELECT symbol, side, quantity, entry_price, exit_price, pnl, opened_at, closed_at
-                    FROM paper_trades
-                    WHERE status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                ''')
-
-            trades = cursor.fetchall()
-            conn.close()
-
-            if not trades:
+            if not acc.total_trades:
                 return {
                     'total_trades': 0,
                     'winning_trades': 0,
@@ -1096,54 +1304,26 @@ class PaperTradingEngine:
                     'expectancy': 0,
                 }
 
-            # Calculate analytics
-            pnls = [t[5] for t in trades]  # pnl is index 5
-            winners = [p for p in pnls if p > 0]
-            losers = [p for p in pnls if p < 0]
-
-            total_trades = len(trades)
-            winning_trades = len(winners)
-            losing_trades = len(losers)
+            total_trades = acc.total_trades
+            winning_trades = acc.winning_trades
+            losing_trades = acc.losing_trades
             win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
 
-            total_pnl = sum(pnls)
-            gross_profit = sum(winners) if winners else 0
-            gross_loss = abs(sum(losers)) if losers else 0
+            total_pnl = acc.cumulative_pnl
+            gross_profit = acc.gross_profit
+            gross_loss = acc.gross_loss
             profit_factor = (gross_profit / gross_loss) if gross_loss > 0 else float('inf') if gross_profit > 0 else 0
 
             average_win = (gross_profit / winning_trades) if winning_trades > 0 else 0
             average_loss = (gross_loss / losing_trades) if losing_trades > 0 else 0
-            largest_win = max(winners) if winners else 0
-            largest_loss = min(losers) if losers else 0  # Most negative
-
             average_trade = total_pnl / total_trades if total_trades > 0 else 0
 
             # Expectancy = (Win% * Avg Win) - (Loss% * Avg Loss)
             loss_rate = losing_trades / total_trades if total_trades > 0 else 0
             expectancy = ((win_rate / 100) * average_win) - (loss_rate * average_loss)
 
-            # Calculate drawdown from equity curve
-            equity_curve = []
-            running_pnl = 0
-            peak_pnl = 0
-            max_dd = 0
-            max_dd_pct = 0
-
-            for pnl in pnls:
-                running_pnl += pnl
-                equity_curve.append(running_pnl)
-
-                if running_pnl > peak_pnl:
-                    peak_pnl = running_pnl
-
-                dd = peak_pnl - running_pnl
-                if dd > max_dd:
-                    max_dd = dd
-                    # Calculate percentage drawdown (from peak)
-                    if peak_pnl > 0:
-                        max_dd_pct = (dd / peak_pnl) * 100
-
-            current_dd = peak_pnl - running_pnl if running_pnl < peak_pnl else 0
+            current_dd = acc.peak_pnl - acc.cumulative_pnl if acc.cumulative_pnl < acc.peak_pnl else 0
+            equity_curve = [p[2] for p in self._get_equity_series(recorder_id)[-100:]]  # Last 100 points
 
             return {
                 'total_trades': total_trades,
@@ -1157,14 +1337,17 @@ class PaperTradingEngine:
                 'profit_factor': round(profit_factor, 2) if profit_factor != float('inf') else 'Infinite',
                 'average_win': round(average_win, 2),
                 'average_loss': round(average_loss, 2),
-                'largest_win': round(largest_win, 2),
-                'largest_loss': round(largest_loss, 2),
-                'max_drawdown': round(max_dd, 2),
-                'max_drawdown_pct': round(max_dd_pct, 2),
+                'largest_win': round(acc.largest_win, 2),
+                'largest_loss': round(acc.largest_loss, 2),
+                'max_drawdown': round(acc.max_drawdown, 2),
+                'max_drawdown_pct': round(acc.max_drawdown_pct, 2),
                 'current_drawdown': round(current_dd, 2),
                 'average_trade': round(average_trade, 2),
                 'expectancy': round(expectancy, 2),
-                'equity_curve': equity_curve[-100:] if len(equity_curve) > 100 else equity_curve,  # Last 100 points
+                'current_streak': acc.streak,
+                'max_win_streak': acc.max_win_streak,
+                'max_loss_streak': acc.max_loss_streak,
+                'equity_curve': equity_curve,
             }
 
         except Exception as e:
@@ -1172,47 +1355,18 @@ class PaperTradingEngine:
             return {'error': str(e)}
 
     def get_equity_curve(self, recorder_id: int = None, limit: int = 500) -> list:
-        """Get equity curve data points for charting."""
+        """Get equity curve data points for charting (from the append-only equity series)."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            ph = self._get_placeholder()
-
-            if recorder_id:
-                cursor.execute(f'''
-                    SELECT pnl, closed_at, symbol, side
-                    FROM paper_trades
-                    WHERE recorder_id = {ph} AND status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                    LIMIT {ph}
-                ''', (recorder_id, limit))
-            else:
-                cursor.execute(f'''
-                    SELECT pnl, closed_at, symbol, side
-                    FROM paper_trades
-                    WHERE status = 'closed' AND pnl IS NOT NULL
-                    ORDER BY closed_at ASC
-                    LIMIT {ph}
-                ''', (limit,))
-
-            trades = cursor.fetchall()
-            conn.close()
-
-            equity_points = []
-            running_pnl = 0
-
-            for trade in trades:
-                pnl, closed_at, symbol, side = trade
-                running_pnl += pnl
-                equity_points.append({
+            return [
+                {
                     'timestamp': closed_at,
                     'pnl': round(pnl, 2),
-                    'cumulative_pnl': round(running_pnl, 2),
+                    'cumulative_pnl': round(cum_pnl, 2),
                     'symbol': symbol,
                     'side': side
-                })
-
-            return equity_points
+                }
+                for closed_at, pnl, cum_pnl, _dd, symbol, side in self._get_equity_series(recorder_id)[:limit]
+            ]
 
         except Exception as e:
             logger.error(f"Error getting equity curve: {e}")
@@ -1221,52 +1375,14 @@ class PaperTradingEngine:
     def get_daily_pnl(self, recorder_id: int = None, days: int = 30) -> list:
         """Get daily P&L summary for the last N days."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            ph = self._get_placeholder()
-
-            if self.use_postgres:
-                date_func = "DATE(closed_at)"
-                date_filter = f"closed_at >= CURRENT_DATE - INTERVAL '{days} days'"
-            else:
-                date_func = "DATE(closed_at)"
-                date_filter = f"closed_at >= DATE('now', '-{days} days')"
-
-            if recorder_id:
-                cursor.execute(f'''
-                    SELECT {date_func} as trade_date,
-                           COUNT(*) as trade_count,
-                           SUM(pnl) as daily_pnl,
-                           SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winners,
-                           SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losers
-                    FROM paper_trades
-                    WHERE recorder_id = {ph} AND status = 'closed' AND pnl IS NOT NULL
-                    AND {date_filter}
-                    GROUP BY {date_func}
-                    ORDER BY trade_date DESC
-                ''', (recorder_id,))
-            else:
-                cursor.execute(f'''
-                    SELECT {date_func} as trade_date,
-                           COUNT(*) as trade_count,
-                           SUM(pnl) as daily_pnl,
-                           SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winners,
-                           SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losers
-                    FROM paper_trades
-                    WHERE status = 'closed' AND pnl IS NOT NULL
-                    AND {date_filter}
-                    GROUP BY {date_func}
-                    ORDER BY trade_date DESC
-                ''')
-
-            rows = cursor.fetchall()
-            conn.close()
+            acc = self._get_accumulator(recorder_id)
+            cutoff = (datetime.now().date() - timedelta(days=days)).isoformat()
 
             daily_data = []
-            for row in rows:
-                trade_date, trade_count, daily_pnl, winners, losers = row
+            for trade_date in sorted((d for d in acc.daily if d >= cutoff), reverse=True):
+                trade_count, daily_pnl, winners, losers = acc.daily[trade_date]
                 daily_data.append({
-                    'date': str(trade_date),
+                    'date': trade_date,
                     'trade_count': trade_count,
                     'pnl': round(daily_pnl, 2) if daily_pnl else 0,
                     'winners': winners or 0,
@@ -1283,47 +1399,11 @@ class PaperTradingEngine:
     def get_symbol_stats(self, recorder_id: int = None) -> list:
         """Get P&L breakdown by symbol."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            ph = self._get_placeholder()
-
-            if recorder_id:
-                cursor.execute(f'''
-                    SELECT symbol,
-                           COUNT(*) as trade_count,
-                           SUM(pnl) as total_pnl,
-                           SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winners,
-                           SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losers,
-                           AVG(pnl) as avg_pnl,
-                           MAX(pnl) as best_trade,
-                           MIN(pnl) as worst_trade
-                    FROM paper_trades
-                    WHERE recorder_id = {ph} AND status = 'closed' AND pnl IS NOT NULL
-                    GROUP BY symbol
-                    ORDER BY total_pnl DESC
-                ''', (recorder_id,))
-            else:
-                cursor.execute('''
-                    SELECT symbol,
-                           COUNT(*) as trade_count,
-                           SUM(pnl) as total_pnl,
-                           SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winners,
-                           SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losers,
-                           AVG(pnl) as avg_pnl,
-                           MAX(pnl) as best_trade,
-                           MIN(pnl) as worst_trade
-                    FROM paper_trades
-                    WHERE status = 'closed' AND pnl IS NOT NULL
-                    GROUP BY symbol
-                    ORDER BY total_pnl DESC
-                ''')
-
-            rows = cursor.fetchall()
-            conn.close()
+            acc = self._get_accumulator(recorder_id)
 
             symbol_stats = []
-            for row in rows:
-                symbol, trade_count, total_pnl, winners, losers, avg_pnl, best, worst = row
+            for symbol, (trade_count, total_pnl, winners, losers, best, worst) in acc.symbols.items():
+                avg_pnl = total_pnl / trade_count if trade_count else 0
                 symbol_stats.append({
                     'symbol': symbol,
                     'trade_count': trade_count,
@@ -1336,6 +1416,7 @@ class PaperTradingEngine:
                     'worst_trade': round(worst, 2) if worst else 0
                 })
 
+            symbol_stats.sort(key=lambda s: s['total_pnl'], reverse=True)
             return symbol_stats
 
         except Exception as e:
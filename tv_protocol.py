@@ -0,0 +1,279 @@
+"""
+TradingView Protocol - Shared quote-stream frame decoder
+========================================================
+BEFORE: TradingViewTicker (tv_price_service.py), recorder_service.process_message
+and ultra_simple_server.process_tradingview_message each parsed the socket.io
+stream on their own: regexes compiled per message, a separate regex pass for
+heartbeats, json.loads on every frame (quote_completed, symbol metadata, ...)
+and a fresh 13-field price dict per update. The two asyncio readers split on
+'~m~' and checked message.startswith('~h~'), which never matches a framed
+heartbeat (~m~4~m~~h~12), so their heartbeats were never answered.
+
+AFTER:
+- decode() walks the length-prefixed frames with str.find (no regex). Heartbeat
+  frames are returned ready to echo without touching JSON; only "qsd" frames are
+  JSON-decoded, with orjson when it is installed. Frames starting with
+  TradingView's compact QSD_PREFIX are decoded directly; any other JSON object
+  frame is decoded only if its payload contains "qsd" at all (spacing or key
+  order differs) and is kept only if its "m" is "qsd". quote_completed, symbol
+  metadata and the like are skipped without being decoded.
+- quote_price() / symbol_root() give the readers one definition of "the price
+  in this update" and "MNQ from CME_MINI:MNQ1!".
+- QuoteBook keeps one preallocated record per symbol and applies the (partial)
+  qsd fields in place; fields a frame does not carry keep their last value.
+
+Usage:
+    from tv_protocol import decode, encode_message, quote_price, symbol_root
+
+    heartbeats, quotes = decode(message)
+    for frame in heartbeats:
+        ws.send(frame)
+    for symbol, values in quotes:
+        price = quote_price(values)
+
+Benchmark:
+    python tv_protocol.py [--messages 200000]
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = 'json'
+
+FRAME = '~m~'
+HEARTBEAT = '~h~'
+QSD_PREFIX = '{"m":"qsd"'
+
+# TradingView quote field -> quote record key
+QUOTE_FIELDS = {
+    'lp': 'last_price',
+    'bid': 'bid',
+    'ask': 'ask',
+    'volume': 'volume',
+    'ch': 'change',
+    'chp': 'change_percent',
+    'high_price': 'high',
+    'low_price': 'low',
+    'open_price': 'open',
+    'prev_close_price': 'prev_close',
+}
+
+
+def encode_frame(payload: str) -> str:
+    return f"{FRAME}{len(payload)}{FRAME}{payload}"
+
+
+def encode_message(func: str, params: list) -> str:
+    """Framed protocol message, e.g. encode_message('quote_add_symbols', [session, symbol])."""
+    return encode_frame(json.dumps({"m": func, "p": params}))
+
+
+def iter_payloads(message: str):
+    """Yield each frame payload of a (possibly batched) socket.io message."""
+    pos = 0
+    end = len(message)
+    while pos < end and message.startswith(FRAME, pos):
+        sep = message.find(FRAME, pos + 3)
+        if sep < 0:
+            return
+        try:
+            length = int(message[pos + 3:sep])
+        except ValueError:
+            return
+        start = sep + 3
+        pos = start + length
+        yield message[start:pos]
+
+
+def decode(message: str) -> Tuple[List[str], List[Tuple[str, dict]]]:
+    """
+    (heartbeat_frames, quotes) for one socket.io message.
+
+    heartbeat_frames are the framed heartbeats to send back unchanged;
+    quotes are (symbol, values) for every qsd update. Frames starting with
+    QSD_PREFIX are decoded as qsd; other object frames are decoded only when the
+    payload mentions "qsd", and dropped unless their "m" is "qsd".
+    """
+    heartbeats = []
+    quotes = []
+    pos = 0
+    end = len(message)
+    # Same walk as iter_payloads, inlined: this runs for every message on the stream
+    while pos < end and message.startswith(FRAME, pos):
+        frame_start = pos
+        sep = message.find(FRAME, pos + 3)
+        if sep < 0:
+            break
+        try:
+            length = int(message[pos + 3:sep])
+        except ValueError:
+            break
+        start = sep + 3
+        pos = start + length
+        if message.startswith(HEARTBEAT, start):
+            heartbeats.append(message[frame_start:pos])
+        else:
+            fast = message.startswith(QSD_PREFIX, start)
+            # Fallback for qsd frames not in the compact form: only object frames that
+            # mention "qsd" are decoded, and "m" is checked once they are
+            if not fast and not (message.startswith('{', start) and message.find('"qsd"', start, pos) >= 0):
+                continue
+            try:
+                frame = _loads(message[start:pos])
+                if not fast and frame.get('m') != 'qsd':
+                    continue
+                symbol_data = frame['p'][1]
+                values = symbol_data.get('v')
+                if values:
+                    quotes.append((symbol_data.get('n', ''), values))
+            except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+                continue
+    return heartbeats, quotes
+
+
+def quote_price(values: dict) -> Optional[float]:
+    """Last price of a qsd update, or the bid/ask mid when it only moved the book."""
+    last_price = values.get('lp') or values.get('last_price')
+    if last_price:
+        return float(last_price)
+    bid = values.get('bid')
+    ask = values.get('ask')
+    if bid and ask:
+        return (float(bid) + float(ask)) / 2
+    return None
+
+
+def symbol_root(tv_symbol: str) -> str:
+    """CME_MINI:MNQ1! -> MNQ"""
+    return tv_symbol.split(':')[-1].replace('1!', '').replace('!', '')
+
+
+class QuoteBook:
+    """Per-symbol quote records (the dicts TradingViewTicker hands to callbacks), updated in place."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records: Dict[str, dict] = {}
+
+    @staticmethod
+    def _new_record(symbol: str) -> dict:
+        record = dict.fromkeys(QUOTE_FIELDS.values())
+        record['symbol'] = symbol
+        record['update_time'] = 0.0
+        return record
+
+    @staticmethod
+    def _copy(record: dict) -> dict:
+        """Reader copy; the ISO 'timestamp' is derived here rather than on every tick."""
+        copy = dict(record)
+        copy['timestamp'] = datetime.fromtimestamp(record['update_time']).isoformat()
+        return copy
+
+    def apply(self, symbol: str, values: dict) -> dict:
+        """
+        Merge one qsd update into the symbol's record and return the live record
+        (callbacks get this object; copy it to keep a snapshot).
+        """
+        with self.lock:
+            record = self.records.get(symbol)
+            if record is None:
+                record = self.records[symbol] = self._new_record(symbol)
+            for field, value in values.items():
+                key = QUOTE_FIELDS.get(field)
+                if key is not None:
+                    record[key] = value
+            record['update_time'] = time.time()
+        return record
+
+    def get(self, symbol: str) -> Optional[dict]:
+        with self.lock:
+            record = self.records.get(symbol)
+            return self._copy(record) if record is not None else None
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {symbol: self._copy(record) for symbol, record in self.records.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+
+def benchmark(messages: int = 200000) -> dict:
+    """
+    Messages/second for a representative stream (quote updates, batched quote
+    updates, heartbeats, quote_completed), previous parsing vs decode() + QuoteBook.
+    """
+    import re
+
+    def qsd(symbol, lp, extra=''):
+        return encode_frame(f'{{"m":"qsd","p":["qs_abc123",{{"n":"{symbol}","s":"ok","v":{{"lp":{lp},"ch":1.25,"chp":0.01{extra}}}}}]}}')
+
+    sample = [
+        qsd('CME_MINI:MNQ1!', 21500.25),
+        qsd('CME_MINI:MES1!', 6010.5, ',"bid":6010.25,"ask":6010.5,"volume":120034') + qsd('CME_MINI:NQ1!', 21500.5),
+        encode_frame('~h~42'),
+        encode_frame('{"m":"quote_completed","p":["qs_abc123","CME_MINI:MNQ1!"]}'),
+    ]
+    stream = [sample[i % len(sample)] for i in range(messages)]
+
+    def previous(message, prices):
+        for hb in re.compile(r'~m~\d+~m~~h~\d+').findall(message):
+            pass
+        pattern = re.compile(r'~m~(\d+)~m~')
+        pos = 0
+        while pos < len(message):
+            match = pattern.match(message, pos)
+            if not match:
+                break
+            length = int(match.group(1))
+            pos = match.end()
+            data = message[pos:pos + length]
+            pos += length
+            if data.startswith('{'):
+                frame = json.loads(data)
+                if frame.get('m') == 'qsd':
+                    symbol_data = frame['p'][1]
+                    values = symbol_data.get('v', {})
+                    prices[symbol_data['n']] = {
+                        'symbol': symbol_data['n'], 'last_price': values.get('lp'), 'bid': values.get('bid'),
+                        'ask': values.get('ask'), 'volume': values.get('volume'), 'change': values.get('ch'),
+                        'change_percent': values.get('chp'), 'high': values.get('high_price'),
+                        'low': values.get('low_price'), 'open': values.get('open_price'),
+                        'prev_close': values.get('prev_close_price'),
+                        'timestamp': datetime.now().isoformat(), 'update_time': time.time()}
+
+    def current(message, book):
+        heartbeats, quotes = decode(message)
+        for symbol, values in quotes:
+            book.apply(symbol, values)
+
+    results = {'messages': messages, 'json_backend': JSON_BACKEND}
+    for name, fn, state in (('previous', previous, {}), ('decoder', current, QuoteBook())):
+        started = time.perf_counter()
+        for message in stream:
+            fn(message, state)
+        elapsed = time.perf_counter() - started
+        results[name] = round(messages / elapsed)
+    results['speedup'] = round(results['decoder'] / results['previous'], 2)
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='TradingView frame decoder micro-benchmark')
+    parser.add_argument('--messages', type=int, default=200000)
+    args = parser.parse_args()
+    result = benchmark(args.messages)
+    print(f"{result['messages']} messages, JSON backend: {result['json_backend']}")
+    print(f"  previous parser : {result['previous']:>10,} msg/s")
+    print(f"  tv_protocol     : {result['decoder']:>10,} msg/s  ({result['speedup']}x)")
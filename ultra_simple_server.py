@@ -32,7 +32,13 @@ import requests
 from typing import Optional
 from queue import Queue, Empty, Full
 from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, session, Response
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
+from chat_hub import ChatHub, message_from_row
+from account_snapshots import get_account_snapshots, RateLimited
+from config_registry import get_config_registry
+from token_manager import get_token_manager
+import chart_series
+import query_profiler  # Opt-in SQL fingerprint/latency profiler + index advisor
 from datetime import datetime, timedelta
 try:
     from zoneinfo import ZoneInfo
@@ -164,21 +170,16 @@ _paper_trade_dedup = {}  # (recorder_id, symbol, action) -> timestamp
 
 
 # --- SSE Price Streaming Infrastructure ---
-_sse_price_queues = []       # list of queue.Queue, one per connected SSE client
-_sse_price_lock = threading.Lock()
+# Ticks are conflated per symbol in price_gateway.PriceConflator: one shared
+# serialization per update, each client gets the latest value at its own rate.
+from price_gateway import get_price_conflator, start_price_gateway, parse_stream_args, events_allowed
+from tv_protocol import (decode as decode_tradingview, encode_message as encode_tradingview,
+                         quote_price, symbol_root as tradingview_root)
+_price_conflator = get_price_conflator()
 
 
-def _broadcast_sse_price(root: str):
-    """Push current cached price for a symbol to all SSE subscribers.
-    Called from TradingView WebSocket handler after _market_data_cache update.
-    Thread-safe, non-blocking. Silently skips if no subscribers."""
-    if not _sse_price_queues:
-        return
-    data = _market_data_cache.get(root)
-    if not data or not isinstance(data, dict):
-        return
-    msg = {
-        'type': 'price_update',
+def _sse_price_payload(root: str, data: dict) -> dict:
+    return {
         'symbol': root,
         'price': data.get('last'),
         'bid': data.get('bid'),
@@ -187,15 +188,37 @@ def _broadcast_sse_price(root: str):
         'change_percent': data.get('chp'),
         'source': data.get('source'),
     }
-    with _sse_price_lock:
-        dead = []
-        for q in _sse_price_queues:
-            try:
-                q.put_nowait(msg)
-            except Full:
-                dead.append(q)
-        for q in dead:
-            _sse_price_queues.remove(q)
+
+
+def _broadcast_sse_price(root: str):
+    """Publish current cached price for a symbol to the price conflator.
+    Called from TradingView WebSocket handler after _market_data_cache update.
+    Thread-safe, non-blocking. Silently skips if no subscribers."""
+    if not _price_conflator.client_count:
+        return
+    data = _market_data_cache.get(root)
+    if not data or not isinstance(data, dict):
+        return
+    msg = _sse_price_payload(root, data)
+    msg['type'] = 'price_update'
+    _price_conflator.publish(root, msg)
+
+
+def _publish_signal_event(payload: dict):
+    """Put a recorder signal on the price stream's event channel (Discord signal bot) of every worker.
+    Same payload as the 'signal_received' Socket.IO event, plus type='signal'."""
+    _price_conflator.relay_event(dict(payload, type='signal'))
+
+
+def _sse_price_snapshot() -> dict:
+    return {
+        sym: _sse_price_payload(sym, sdata)
+        for sym, sdata in dict(_market_data_cache).items()
+        if isinstance(sdata, dict) and 'last' in sdata and ':' not in sym
+    }
+
+
+_price_conflator.set_snapshot_provider(_sse_price_snapshot)
 
 
 def _paper_should_execute_signal(recorder_id: int, action: str, recorder: dict) -> tuple:
@@ -236,7 +259,11 @@ def _paper_should_execute_signal(recorder_id: int, action: str, recorder: dict)
 
         # --- Filter 3: Max Daily Loss ---
         max_daily_loss = float(recorder.get('max_daily_loss') or 0)
-        if max_daily_loss > 0:
+        if max_daily_loss > 0 and _risk_engine.is_ready('paper'):
+            daily_pnl = _risk_engine.realized_pnl('paper', recorder_id)
+            if daily_pnl <= -abs(max_daily_loss):
+                return False, f'max_daily_loss (${daily_pnl:.2f} <= -${max_daily_loss:.2f})'
+        elif max_daily_loss > 0:
             try:
                 import os
                 database_url = os.environ.get('DATABASE_URL')
@@ -697,6 +724,7 @@ def _record_paper_trade_direct_inner(recorder_id: int, symbol: str, action: str,
                 cumulative_pnl = {ph}, drawdown = {ph}, exit_reason = {ph}, commission = {ph}, closed_at = {ph}
                 WHERE id = {ph}
             ''', (exit_px, _pnl, _cum, trade_dd, reason, _comm, now, pos_id))
+            _risk_engine.record_close('paper', pos_id, recorder_id, _pnl)
             return _pnl
 
         if side in ['LONG', 'SHORT']:
@@ -953,9 +981,13 @@ def _close_paper_trade_tpsl(trade_id: int, exit_price: float, exit_reason: str,
         cursor.execute(f'''
             UPDATE paper_trades SET status = 'closed', exit_price = {ph}, pnl = {ph},
             cumulative_pnl = {ph}, drawdown = {ph}, exit_reason = {ph}, commission = {ph}, closed_at = {ph}
-            WHERE id = {ph}
+            WHERE id = {ph} AND status = 'open'
         ''', (exit_price, pnl, cumulative, trade_drawdown, exit_reason, commission, now, trade_id))
+        closed = cursor.rowcount
         conn.commit()
+        if not closed:
+            return  # Already closed by another path (TP/SL vs max-loss flatten)
+        _risk_engine.record_close('paper', trade_id, recorder_id, pnl)
 
         # Clean up DCA, MAE, and trail tracking for closed trade
         global _paper_dca_next_price
@@ -1025,104 +1057,16 @@ def _calculate_unrealized_pnl(symbol: str, side: str, quantity: float, entry_pri
 
 
 def check_paper_max_daily_loss():
-    """Check all open paper trades against max_daily_loss and auto-close if breached"""
-    import os
-    from datetime import datetime
-
-    database_url = os.environ.get('DATABASE_URL')
-    use_postgres = bool(database_url)
-
-    if use_postgres:
-        import psycopg2
-        conn = psycopg2.connect(database_url)
-        ph = '%s'
-        today_filter = "DATE(closed_at) = CURRENT_DATE"
-    else:
-        conn = sqlite3.connect('paper_trades.db')
-        ph = '?'
-        today_filter = "DATE(closed_at) = DATE('now')"
-
-    cursor = conn.cursor()
+    """Check all open paper trades against max_daily_loss and auto-close if breached.
 
+    Ledgers, marks and the flatten path live in the shared risk engine
+    (risk_engine.py), which already evaluates on every tick; this in-memory pass
+    only covers the monitor loop while no ticks arrive.
+    """
     try:
-        # Get all open paper trades
-        cursor.execute('''
-            SELECT id, recorder_id, symbol, side, quantity, entry_price
-            FROM paper_trades
-            WHERE status = 'open'
-        ''')
-        open_trades = cursor.fetchall()
-
-        if not open_trades:
-            return
-
-        # Group trades by recorder_id
-        recorder_trades = {}
-        for trade in open_trades:
-            trade_id, recorder_id, symbol, side, quantity, entry_price = trade
-            if recorder_id not in recorder_trades:
-                recorder_trades[recorder_id] = []
-            recorder_trades[recorder_id].append({
-                'id': trade_id,
-                'symbol': symbol,
-                'side': side,
-                'quantity': quantity,
-                'entry_price': entry_price
-            })
-
-        # Check each recorder's max_daily_loss
-        for recorder_id, trades in recorder_trades.items():
-            # Get recorder's max_daily_loss setting
-            cursor.execute(f'SELECT max_daily_loss, name FROM recorders WHERE id = {ph}', (recorder_id,))
-            rec_row = cursor.fetchone()
-            if not rec_row:
-                continue
-
-            max_daily_loss = float(rec_row[0] or 0)
-            recorder_name = rec_row[1] if len(rec_row) > 1 else f"Recorder {recorder_id}"
-
-            if max_daily_loss <= 0:
-                continue  # No max loss set
-
-            # Calculate today's realized P&L (closed trades)
-            cursor.execute(f'''
-                SELECT COALESCE(SUM(pnl), 0) FROM paper_trades
-                WHERE recorder_id = {ph} AND status = 'closed' AND {today_filter}
-            ''', (recorder_id,))
-            realized_pnl = cursor.fetchone()[0] or 0
-
-            # Calculate unrealized P&L for all open positions
-            unrealized_pnl = 0
-            for trade in trades:
-                live_price = _get_live_price_for_symbol(trade['symbol'])
-                if live_price:
-                    unrealized_pnl += _calculate_unrealized_pnl(
-                        trade['symbol'], trade['side'], trade['quantity'],
-                        trade['entry_price'], live_price
-                    )
-
-            # Total daily P&L = realized + unrealized
-            total_daily_pnl = realized_pnl + unrealized_pnl
-
-            # Check if max daily loss breached
-            if total_daily_pnl <= -max_daily_loss:
-                print(f"🚨 MAX DAILY LOSS BREACHED for [{recorder_name}]!", flush=True)
-                print(f"   Realized: ${realized_pnl:.2f} | Unrealized: ${unrealized_pnl:.2f} | Total: ${total_daily_pnl:.2f} | Limit: -${max_daily_loss:.2f}", flush=True)
-
-                # Close all open positions for this recorder
-                for trade in trades:
-                    live_price = _get_live_price_for_symbol(trade['symbol'])
-                    if live_price:
-                        _close_paper_trade_tpsl(
-                            trade['id'], live_price, 'max_loss', recorder_id,
-                            trade['side'], trade['entry_price'], trade['quantity'], trade['symbol']
-                        )
-                        print(f"   💀 Auto-closed {trade['side']} {trade['symbol']} @ {live_price:.2f}", flush=True)
-
+        _risk_engine.evaluate('paper')
     except Exception as e:
         print(f"⚠️ Error checking paper max daily loss: {e}", flush=True)
-    finally:
-        conn.close()
 
 
 def check_paper_trades_tpsl():
@@ -2020,6 +1964,9 @@ _webhook_activity_max_size = 300  # Keep last 300 webhook activities (increased
 import uuid
 import threading
 
+import signal_tracking  # Buffered, pipelined Redis copy of every step (shared across workers)
+import recorder_counters  # Live per-recorder trade/signal counters for the control center
+
 _signal_pipeline = {}  # Key: signal_id -> {steps: [...], status: 'pending'|'complete'|'failed'}
 _signal_pipeline_lock = threading.Lock()
 _signal_pipeline_max_size = 500
@@ -2041,7 +1988,9 @@ def track_signal_step(signal_id: str, step: str, details: dict = None):
             'details': details or {}
         })
         _signal_pipeline[signal_id]['last_update'] = datetime.now().isoformat()
+    signal_tracking.track_step(signal_id, step, details)
 
+    with _signal_pipeline_lock:
         # Cleanup old entries
         if len(_signal_pipeline) > _signal_pipeline_max_size:
             # Remove oldest entries
@@ -2057,6 +2006,7 @@ def complete_signal(signal_id: str, status: str = 'complete', error: str = None)
             _signal_pipeline[signal_id]['status'] = status
             if error:
                 _signal_pipeline[signal_id]['error'] = error
+    signal_tracking.complete(signal_id, status, error)
 
 def get_signal_pipeline(limit: int = 50):
     """Get recent signals and their pipeline status."""
@@ -2127,9 +2077,8 @@ def get_webhook_activity_log(limit=50):
 
 # WEBHOOK DEDUPLICATION - Prevent duplicate webhook processing
 # ============================================================================
-_webhook_dedup_cache = {}  # Key: "token:action:body_hash" -> timestamp
+# Keys are claimed cluster-wide via signal_tracking.check_duplicate (Redis SET NX PX)
 _webhook_dedup_window = 1  # Seconds - reject duplicate webhooks within this window (TV duplicates arrive within ms)
-_webhook_dedup_max_size = 1000  # Max cache entries before cleanup
 
 # ============================================================================
 # 🚀 BROKER API QUEUE SYSTEM - Bulk requests, rate limit protection
@@ -2478,6 +2427,7 @@ _using_postgres = False
 _tables_initialized = False
 _db_url = None
 _pg_pool = None  # ThreadedConnectionPool for PostgreSQL
+_query_profiler = query_profiler.get_query_profiler()
 
 def is_using_postgres():
     """Check if we're actually using PostgreSQL"""
@@ -2588,7 +2538,7 @@ def get_db_connection():
         raise Exception(f"Database connection failed after {max_retries} attempts")
 
     # SQLite fallback (only for local development when DATABASE_URL is not set)
-    conn = sqlite3.connect('just_trades.db', timeout=30)
+    conn = sqlite3.connect('just_trades.db', timeout=30, factory=query_profiler.sqlite_connection_factory())
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -2630,15 +2580,28 @@ class PostgresCursorWrapper:
     def execute(self, sql, params=None):
         # Convert SQLite ? placeholders to PostgreSQL %s
         sql = sql.replace('?', '%s')
+        started = time.perf_counter() if _query_profiler.enabled else None
         if params:
             self._cursor.execute(sql, params)
         else:
             self._cursor.execute(sql)
+        if started is not None:
+            _query_profiler.record(sql, params, started)
         # Cache column names
         if self._cursor.description:
             self._keys = [desc[0] for desc in self._cursor.description]
         return self
     
+    def executemany(self, sql, seq_of_params, page_size=500):
+        """Batched executemany - sends page_size rows per round trip like sqlite3's executemany."""
+        from psycopg2.extras import execute_batch
+        sql = sql.replace('?', '%s')
+        started = time.perf_counter() if _query_profiler.enabled else None
+        execute_batch(self._cursor, sql, seq_of_params, page_size=page_size)
+        if started is not None:
+            _query_profiler.record(sql, None, started)
+        return self
+    
     def _wrap_row(self, row):
         """Wrap a dict row to support both dict and index access."""
         if row is None:
@@ -2704,10 +2667,13 @@ class PostgresConnectionWrapper:
     def execute(self, sql, params=None):
         sql = sql.replace('?', '%s')
         cursor = self._conn.cursor()
+        started = time.perf_counter() if _query_profiler.enabled else None
         if params:
             cursor.execute(sql, params)
         else:
             cursor.execute(sql)
+        if started is not None:
+            _query_profiler.record(sql, params, started)
         return PostgresCursorWrapper(cursor)
 
     def commit(self):
@@ -5816,6 +5782,22 @@ def init_db():
         ''')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_tv_backtest_trades_import ON tv_backtest_trades(import_id)')
 
+    # Background import job state + precomputed chart/calendar series (Mar 2026)
+    for col_name, pg_type, sqlite_type in (
+        ('status', "VARCHAR(20) DEFAULT 'complete'", "TEXT DEFAULT 'complete'"),
+        ('progress', 'INTEGER DEFAULT 100', 'INTEGER DEFAULT 100'),
+        ('error_message', 'TEXT', 'TEXT'),
+        ('chart_series', 'TEXT', 'TEXT'),
+        ('daily_pnl_series', 'TEXT', 'TEXT'),
+    ):
+        try:
+            if is_postgres:
+                cursor.execute(f'ALTER TABLE tv_backtest_imports ADD COLUMN IF NOT EXISTS {col_name} {pg_type}')
+            else:
+                cursor.execute(f'ALTER TABLE tv_backtest_imports ADD COLUMN {col_name} {sqlite_type}')
+        except Exception:
+            pass  # Column already exists
+
     # One-time migration: backfill symbol from raw_filename for existing imports
     try:
         ph = '%s' if is_postgres else '?'
@@ -5963,6 +5945,7 @@ def fetch_and_store_tradovate_accounts(account_id: int, access_token: str, base_
         """, (json.dumps(combined_accounts), json.dumps(combined_subaccounts), account_id))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         logger.info(f"Stored {len(combined_subaccounts)} Tradovate subaccounts for account {account_id}")
         return {"success": True, "subaccounts": combined_subaccounts}
     except Exception as e:
@@ -6020,6 +6003,7 @@ def fix_trader_sizes(recorder_id):
         affected = cursor.rowcount
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders(recorder_id)
         return jsonify({'success': True, 'affected': affected, 'message': f'Reset {affected} traders to use recorder defaults'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -6083,6 +6067,7 @@ def run_migrations():
                 pcur.execute('DELETE FROM paper_trades')
                 pconn.commit()
                 pconn.close()
+                _reset_paper_analytics()
                 results.append(f"🗑️ RESET: Deleted {count} paper trades")
         except Exception as e:
             results.append(f"❌ Paper trades reset failed: {str(e)[:100]}")
@@ -6197,6 +6182,8 @@ def run_migrations():
         results.append(f"⚠️ max_contracts fix failed: {str(e)[:100]}")
 
     conn.close()
+    # Migrations rewrite recorder/trader rows (dca_enabled, max_contracts, NULL fixes)
+    _config_registry.invalidate_all()
     return jsonify({'success': True, 'migrations': results})
 
 @app.route('/api/whop/status', methods=['GET'])
@@ -7004,6 +6991,7 @@ def admin_delete_user(user_id):
         # Finally delete the user
         cursor.execute(f'DELETE FROM users WHERE id = {ph}', (user_id,))
         conn.commit()
+        _config_registry.invalidate_all()
         return jsonify({'success': True})
     except Exception as e:
         conn.rollback()
@@ -7434,11 +7422,7 @@ def admin_get_user_live_pnl(user_id):
     if not current or not current.is_admin:
         return jsonify({'success': False, 'error': 'Not authorized'}), 403
 
-    cached_data = _tradovate_pnl_cache.get('data', {})
-    user_pnl = {}
-    for acc_id, acc_data in cached_data.items():
-        if acc_data.get('user_id') == user_id:
-            user_pnl[acc_id] = acc_data
+    user_pnl, _ = _account_snapshots.snapshot(user_id=user_id)
     return jsonify({'success': True, 'pnl_data': user_pnl})
 
 
@@ -8236,6 +8220,7 @@ def admin_set_recorder_user(recorder_id):
         conn.commit()
         cursor.close()
         conn.close()
+        _config_registry.invalidate_recorder(recorder_id)
         
         logger.info(f"Admin set recorder {recorder_id} user_id to {target_user_id}")
         return jsonify({'success': True, 'message': f'Recorder {recorder_id} assigned to user {target_user_id}'})
@@ -8262,7 +8247,8 @@ def admin_max_loss_monitor_status():
             'monitor_running': False,
             'connected_accounts': 0,
             'breached_today': []
-        }
+        },
+        'risk_engine': _risk_engine.get_status(),
     }
 
     try:
@@ -8275,6 +8261,76 @@ def admin_max_loss_monitor_status():
     return jsonify(status)
 
 
+@app.route('/api/admin/account-snapshots', methods=['GET'])
+@login_required
+def admin_account_snapshots():
+    """Admin: live account snapshot service health (WS events, REST fallbacks, staleness)."""
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify(_account_snapshots.get_stats())
+
+
+@app.route('/api/admin/query-profile', methods=['GET', 'POST'])
+@login_required
+def admin_query_profile():
+    """
+    Admin: statement fingerprints with call counts and latency percentiles.
+    GET ?limit=50&order=total_ms|calls|p95_ms|p99_ms|max_ms|mean_ms
+    POST {"enabled": true|false, "reset": true} to toggle / clear the profiler.
+    """
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({'error': 'Admin access required'}), 403
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if 'enabled' in data:
+            _query_profiler.set_enabled(data['enabled'])
+        if data.get('reset'):
+            _query_profiler.reset()
+
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify(_query_profiler.snapshot(limit, request.args.get('order', 'total_ms')))
+
+
+@app.route('/api/admin/index-advisor', methods=['GET', 'POST'])
+@login_required
+def admin_index_advisor():
+    """
+    Admin: composite / partial index proposals from the profiled, EXPLAIN-sampled queries.
+    GET lists proposals and applied index migrations.
+    POST {"name": "<proposal name>"} builds that index (CONCURRENTLY on PostgreSQL)
+    and records it in index_migrations.
+    """
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({'error': 'Admin access required'}), 403
+
+    is_postgres = is_using_postgres()
+    try:
+        proposals = query_profiler.advise(_query_profiler, get_db_connection, is_postgres,
+                                          limit=request.args.get('limit', 25, type=int))
+        if request.method == 'POST':
+            name = (request.get_json(silent=True) or {}).get('name')
+            proposal = next((p for p in proposals if p['name'] == name), None)
+            if not proposal:
+                return jsonify({'success': False, 'error': f'No current proposal named {name!r}'}), 404
+            applied = query_profiler.apply_index(get_db_connection, is_postgres, proposal['name'],
+                                                 proposal['table'], proposal['columns'], proposal['where'])
+            return jsonify({'success': True, 'applied': applied})
+
+        return jsonify({
+            'success': True,
+            'profiler_enabled': _query_profiler.enabled,
+            'proposals': proposals,
+            'migrations': query_profiler.applied_migrations(get_db_connection, is_postgres),
+        })
+    except Exception as e:
+        logger.error(f"Index advisor error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/admin/export-configs', methods=['GET'])
 @admin_or_api_key_required
 def admin_export_configs():
@@ -8381,6 +8437,7 @@ def admin_fix_all_recorder_user_ids():
         conn.commit()
         cursor.close()
         conn.close()
+        _config_registry.invalidate_all()
         
         logger.info(f"Admin fixed {affected} recorders, assigned to user {target_user_id}")
         return jsonify({'success': True, 'fixed_count': affected, 'message': f'Assigned {affected} recorders to user {target_user_id}'})
@@ -8501,6 +8558,12 @@ def broker_queue_clear_cache():
     broker_api_queue.clear_cache()
     return jsonify({'success': True, 'message': 'Cache cleared'})
 
+@app.route('/api/tradovate/order-socket/stats')
+def tradovate_order_socket_stats():
+    """Round-trip latency (p50/p95/max) and outcomes for requests on the Tradovate order sockets."""
+    from phantom_scraper.tradovate_integration import get_order_socket_stats
+    return jsonify(get_order_socket_stats())
+
 
 @app.route('/api/webhook-activity')
 @admin_or_api_key_required
@@ -8715,6 +8778,8 @@ def api_price_update():
                         'updated': time.time()
                     }
                     updated.append({'symbol': root, 'price': float(price)})
+                    _order_events.on_price(root, float(price))
+                    _risk_engine.on_price(root, float(price))
                     logger.info(f"💰 Real-time price update: {root} = {price}")
 
         # Handle batch price updates
@@ -8732,6 +8797,8 @@ def api_price_update():
                             'updated': time.time()
                         }
                         updated.append({'symbol': root, 'price': float(price)})
+                        _order_events.on_price(root, float(price))
+                        _risk_engine.on_price(root, float(price))
 
         return jsonify({
             'success': True,
@@ -9227,6 +9294,7 @@ def save_api_credentials(account_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         logger.info(f"✅ API credentials saved for account {account_id}")
         return jsonify({'success': True, 'message': 'API credentials saved'})
@@ -9341,7 +9409,8 @@ def dashboard():
                           has_platform_subscription=has_platform_subscription,
                           user_tier=user_tier,
                           platform_subscription=platform_subscription,
-                          is_admin=is_admin)
+                          is_admin=is_admin,
+                          price_stream_url=PRICE_STREAM_URL)
 
 # =============================================================================
 # INSIDER SIGNALS ROUTES (Added Dec 8, 2025)
@@ -9855,6 +9924,8 @@ try:
     _fix_cur.close()
     _fix_conn.close()
     if _jadvix_fixed > 0:
+        # Other workers may hold these traders in their config registry
+        get_config_registry(get_db_connection, is_using_postgres).invalidate_traders()
         print(f"✅ STARTUP FIX: Enabled dca_enabled on {_jadvix_fixed} JADVIX traders")
 except Exception as _fix_err:
     print(f"⚠️ JADVIX DCA startup fix failed: {_fix_err}")
@@ -10501,42 +10572,22 @@ def api_insiders_refresh():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+INSIDER_PRICE_MAX_AGE = 300     # Insider signals tolerate 5-minute-old quotes
+
 @app.route('/api/insiders/price/<ticker>')
 @feature_required('insider_signals')
 def api_insiders_price(ticker):
-    """Get stock price using Yahoo Finance"""
+    """Get stock price from the shared quote service (Yahoo fallback for unlisted tickers)"""
     try:
-        # Use Yahoo Finance directly (no insider_service dependency)
-        import time as time_module
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker.upper()}"
-        params = {'interval': '1d', 'range': '5d'}
-        headers = {'User-Agent': 'JustTrades/1.0'}
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            result = data.get('chart', {}).get('result', [])
-            
-            if result:
-                meta = result[0].get('meta', {})
-                price = meta.get('regularMarketPrice')
-                prev_close = meta.get('previousClose') or meta.get('chartPreviousClose')
-                
-                if price:
-                    change = None
-                    change_pct = None
-                    if prev_close:
-                        change = round(price - prev_close, 2)
-                        change_pct = round((change / prev_close) * 100, 2)
-                    
-                    return jsonify({
-                        'success': True,
-                        'ticker': ticker.upper(),
-                        'price': round(price, 2),
-                        'change': change,
-                        'change_pct': change_pct
-                    })
+        quote = _quote_service.get_quote(ticker, max_age=INSIDER_PRICE_MAX_AGE)
+        if quote:
+            return jsonify({
+                'success': True,
+                'ticker': ticker.upper(),
+                'price': quote['price'],
+                'change': quote['change'],
+                'change_pct': quote['change_pct']
+            })
         
         return jsonify({'success': False, 'ticker': ticker.upper(), 'error': 'Price unavailable'}), 404
     except Exception as e:
@@ -10876,6 +10927,7 @@ def set_broker(account_id):
         cursor.execute(f"UPDATE accounts SET broker = {ph} WHERE id = {ph}", (broker_name, account_id))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         return jsonify({'success': True, 'broker': broker_name})
     except Exception as e:
@@ -11414,6 +11466,7 @@ def store_credentials(account_id):
         """, (username, password, environment, account_id))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         logger.info(f"Stored credentials for account {account_id}")
         
@@ -11435,6 +11488,11 @@ def store_credentials(account_id):
 # ProjectX / TopstepX Routes (Added Jan 2026)
 # ============================================================
 
+# Logged-in ProjectX / Webull sessions, contract lookups and account streams
+# live on one background loop and are reused across requests (broker_sessions.py)
+from broker_sessions import get_broker_sessions
+_broker_sessions = get_broker_sessions()
+
 @app.route('/accounts/<int:account_id>/projectx-credentials')
 @subscription_required('platform')
 def projectx_credentials(account_id):
@@ -11470,25 +11528,20 @@ def projectx_connect(account_id):
                 'error': 'API key is required for API key authentication'
             }), 400
         
-        # Test connection with ProjectX
-        import asyncio
-        from phantom_scraper.projectx_integration import ProjectXIntegration
-        
+        # Test connection with ProjectX (the session is kept for later trades)
         async def test_projectx():
             is_demo = environment == 'demo'
             prop_firm = data.get('prop_firm', 'default')
             
-            async with ProjectXIntegration(demo=is_demo, prop_firm=prop_firm) as projectx:
-                # Need either password or API key
-                if not password and not api_key:
-                    return {
-                        'success': False,
-                        'error': 'Please provide either password (FREE) or API key ($14.50/mo subscription)',
-                    }
-                
-                # Try authentication with provided credentials
-                login_result = await projectx.login(username, password=password, api_key=api_key)
-                
+            # Need either password or API key
+            if not password and not api_key:
+                return {
+                    'success': False,
+                    'error': 'Please provide either password (FREE) or API key ($14.50/mo subscription)',
+                }
+            
+            async with _broker_sessions.projectx(username, password=password, api_key=api_key,
+                                                 demo=is_demo, prop_firm=prop_firm) as (projectx, login_result):
                 if not login_result.get('success'):
                     # Return the detailed error message from the auth attempt
                     error_detail = login_result.get('error', 'Unknown authentication error')
@@ -11514,13 +11567,7 @@ def projectx_connect(account_id):
                     'prop_firm': prop_firm
                 }
         
-        # Run async test
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(test_projectx())
-        finally:
-            loop.close()
+        result = _broker_sessions.run(test_projectx())
         
         if not result.get('success'):
             return jsonify(result), 400
@@ -11573,6 +11620,7 @@ def projectx_connect(account_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         auth_desc = "FREE (password)" if auth_method == 'password' else "API key"
         logger.info(f"✅ ProjectX credentials stored for account {account_id} ({auth_desc})")
@@ -11620,14 +11668,9 @@ def webull_connect(account_id):
                 'error': 'App Key and App Secret are required'
             }), 400
 
-        # Test connection with Webull
-        import asyncio
-        from phantom_scraper.webull_integration import WebullIntegration
-
+        # Test connection with Webull (the session is kept for later calls)
         async def test_webull():
-            async with WebullIntegration(app_key, app_secret) as webull:
-                login_result = await webull.login()
-                
+            async with _broker_sessions.webull(app_key, app_secret) as (webull, login_result):
                 if not login_result.get('success'):
                     return {
                         'success': False,
@@ -11641,13 +11684,7 @@ def webull_connect(account_id):
                     'total_accounts': len(accounts),
                 }
 
-        # Run async test
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(test_webull())
-        finally:
-            loop.close()
+        result = _broker_sessions.run(test_webull())
         
         if not result.get('success'):
             return jsonify(result), 400
@@ -11677,6 +11714,7 @@ def webull_connect(account_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         logger.info(f"✅ Webull credentials stored for account {account_id}")
         
@@ -11922,6 +11960,7 @@ def direct_connect_account(account_id):
         
         cursor.close()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         return jsonify({
             'success': True, 
@@ -12094,6 +12133,8 @@ def oauth_callback():
             """, (access_token, refresh_token, md_access_token, expires_at, oauth_env, account_id))
             conn.commit()
             conn.close()
+            _config_registry.invalidate_account(account_id)
+            _token_manager.reload([account_id])
             logger.info(f"✅ Stored tokens for account {account_id} with environment={oauth_env}")
             
             # Clear any reauth flag - account is now authenticated!
@@ -12227,6 +12268,7 @@ def delete_account(account_id):
         conn.commit()
         deleted = cursor.rowcount
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         if deleted > 0:
             logger.info(f"Deleted account {account_id}")
@@ -12272,9 +12314,6 @@ def refresh_account_subaccounts(account_id):
         # ProjectX accounts - re-fetch accounts via ProjectX API
         if is_projectx:
             try:
-                import asyncio
-                from phantom_scraper.projectx_integration import ProjectXIntegration
-
                 px_username = row.get('projectx_username') or row.get('username') or ''
                 px_password = row.get('password') or ''
                 px_api_key = row.get('projectx_api_key') or row.get('api_key') or ''
@@ -12285,19 +12324,14 @@ def refresh_account_subaccounts(account_id):
                     return jsonify({'success': False, 'error': 'No ProjectX username stored. Please reconnect.'}), 400
 
                 async def refresh_projectx():
-                    async with ProjectXIntegration(demo=is_demo, prop_firm=px_prop_firm) as projectx:
-                        login_result = await projectx.login(px_username, password=px_password if px_password else None, api_key=px_api_key if px_api_key else None)
+                    async with _broker_sessions.projectx(px_username, password=px_password or None, api_key=px_api_key or None,
+                                                         demo=is_demo, prop_firm=px_prop_firm) as (projectx, login_result):
                         if not login_result.get('success'):
                             return {'success': False, 'error': login_result.get('error', 'ProjectX login failed. Please reconnect.')}
                         accounts = await projectx.get_accounts()
                         return {'success': True, 'accounts': accounts}
 
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(refresh_projectx())
-                finally:
-                    loop.close()
+                result = _broker_sessions.run(refresh_projectx())
 
                 if not result.get('success'):
                     return jsonify(result), 400
@@ -12309,6 +12343,7 @@ def refresh_account_subaccounts(account_id):
                 cursor2.execute("UPDATE accounts SET tradovate_accounts = ?, broker = 'ProjectX' WHERE id = ?", (json.dumps(px_accounts), account_id))
                 conn2.commit()
                 conn2.close()
+                _config_registry.invalidate_account(account_id)
 
                 logger.info(f"Refreshed ProjectX subaccounts for account {account_id}: {len(px_accounts)} accounts")
                 return jsonify({'success': True, 'subaccounts': px_accounts})
@@ -12464,6 +12499,7 @@ def fetch_md_access_token(account_id):
                 """, (md_access_token, access_token, refresh_token, expires_at, account_id))
                 conn.commit()
                 conn.close()
+                _config_registry.invalidate_account(account_id)
                 
                 logger.info(f"✅ Successfully stored mdAccessToken for account {account_id}")
                 return jsonify({
@@ -12548,6 +12584,7 @@ def store_tradingview_session():
 
         conn.commit()
         conn.close()
+        _config_registry.invalidate_account(account_id)
         
         logger.info("✅ TradingView session stored successfully")
         
@@ -13738,19 +13775,12 @@ def api_update_recorder(recorder_id):
             ''', values)
             conn.commit()
 
-        # CRITICAL: Clear recorder cache so webhooks use updated settings immediately
-        cursor.execute(f'SELECT webhook_token FROM recorders WHERE id = {placeholder}', (recorder_id,))
-        token_row = cursor.fetchone()
-        if token_row:
-            webhook_token = token_row[0] if isinstance(token_row, tuple) else token_row.get('webhook_token')
-            if webhook_token and webhook_token in recorder_cache:
-                del recorder_cache[webhook_token]
-                if webhook_token in recorder_cache_time:
-                    del recorder_cache_time[webhook_token]
-                logger.info(f"🧹 Cleared cache for recorder {recorder_id} after update")
-
         conn.close()
 
+        # CRITICAL: Invalidate the recorder so webhooks (on every worker) use updated settings immediately
+        _config_registry.invalidate_recorder(recorder_id)
+        logger.info(f"🧹 Invalidated config for recorder {recorder_id} after update")
+
         logger.info(f"Updated recorder ID: {recorder_id}")
         
         return jsonify({
@@ -13793,6 +13823,7 @@ def api_delete_recorder(recorder_id):
         # CASCADE DELETE: Delete all associated data FIRST
         cursor.execute(f'DELETE FROM recorded_trades WHERE recorder_id = {ph}', (recorder_id,))
         trades_deleted = cursor.rowcount
+        recorder_counters.invalidate(recorder_id)
 
         cursor.execute(f'DELETE FROM recorded_signals WHERE recorder_id = {ph}', (recorder_id,))
         signals_deleted = cursor.rowcount
@@ -13805,9 +13836,8 @@ def api_delete_recorder(recorder_id):
         conn.commit()
         conn.close()
 
-        # Bug #58: Clear entire recorder cache on delete
-        recorder_cache.clear()
-        recorder_cache_time.clear()
+        # Bug #58: Drop the deleted recorder (and its traders) from the config registry
+        _config_registry.invalidate_recorder(recorder_id)
 
         logger.info(f"Deleted recorder: {name} (ID: {recorder_id}) - Cascade deleted {trades_deleted} trades, {signals_deleted} signals, {positions_deleted} positions")
         
@@ -13946,6 +13976,7 @@ def api_start_recorder(recorder_id):
         cursor.execute(f'UPDATE recorders SET is_recording = 1, updated_at = CURRENT_TIMESTAMP WHERE id = {ph}', (recorder_id,))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_recorder(recorder_id)
         
         logger.info(f"Started recording: {name} (ID: {recorder_id})")
         
@@ -13979,6 +14010,7 @@ def api_stop_recorder(recorder_id):
         cursor.execute(f'UPDATE recorders SET is_recording = 0, updated_at = CURRENT_TIMESTAMP WHERE id = {ph}', (recorder_id,))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_recorder(recorder_id)
         
         logger.info(f"Stopped recording: {name} (ID: {recorder_id})")
         
@@ -14011,6 +14043,7 @@ def api_reset_recorder_history(recorder_id):
         # Delete all trades for this recorder
         cursor.execute(f'DELETE FROM recorded_trades WHERE recorder_id = {ph}', (recorder_id,))
         trades_deleted = cursor.rowcount
+        recorder_counters.invalidate(recorder_id)
 
         # Delete all signals for this recorder
         cursor.execute(f'DELETE FROM recorded_signals WHERE recorder_id = {ph}', (recorder_id,))
@@ -14149,12 +14182,9 @@ def api_set_inverse_signals(recorder_id):
         conn.commit()
         conn.close()
         
-        # CRITICAL: Clear the recorder cache so next webhook uses updated value
-        if webhook_token and webhook_token in recorder_cache:
-            del recorder_cache[webhook_token]
-            if webhook_token in recorder_cache_time:
-                del recorder_cache_time[webhook_token]
-            logger.info(f"🧹 Cleared cache for recorder {recorder_id} (token: {webhook_token[:8]}...)")
+        # CRITICAL: Invalidate the recorder so next webhook uses updated value
+        _config_registry.invalidate_recorder(recorder_id, webhook_token)
+        logger.info(f"🧹 Invalidated config for recorder {recorder_id}")
         
         logger.info(f"🔄 Recorder {recorder_id} inverse_signals set to {inverse_enabled}")
         return jsonify({'success': True, 'inverse_signals': inverse_enabled})
@@ -14780,6 +14810,7 @@ def api_create_trader():
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders(recorder_id)
 
         # Check subaccount ownership for abuse detection (flag-only, non-fatal)
         if subaccount_id and current_user_id:
@@ -14836,6 +14867,8 @@ def api_update_trader(trader_id):
         updates = []
         params = []
         
+        recorder_changed = False  # is_private / required_tier live on the recorder row
+
         # Update enabled status if provided
         if 'enabled' in data:
             # PostgreSQL needs boolean True/False, SQLite needs 1/0
@@ -15119,6 +15152,7 @@ def api_update_trader(trader_id):
                     if is_owner or current_is_admin:
                         priv_val = bool(data['recorder_is_private']) if is_postgres else (1 if data['recorder_is_private'] else 0)
                         cursor.execute(f'UPDATE recorders SET is_private = {placeholder} WHERE id = {placeholder}', (priv_val, rec_id))
+                        recorder_changed = True
                         logger.info(f"Updated recorder {rec_id} is_private={data['recorder_is_private']}")
 
                 # required_tier: admin only
@@ -15126,10 +15160,20 @@ def api_update_trader(trader_id):
                     if current_is_admin:
                         tier_val = data['required_tier'] if data['required_tier'] in ('public', 'premium', 'elite') else 'public'
                         cursor.execute(f'UPDATE recorders SET required_tier = {placeholder} WHERE id = {placeholder}', (tier_val, rec_id))
+                        recorder_changed = True
                         logger.info(f"Updated recorder {rec_id} required_tier={tier_val}")
 
         conn.commit()
 
+        # execute_trade_simple reads traders (enabled_accounts, multipliers, risk) from the config registry
+        cursor.execute(f'SELECT recorder_id FROM traders WHERE id = {placeholder}', (trader_id,))
+        owner_row = cursor.fetchone()
+        trader_recorder_id = (owner_row[0] if isinstance(owner_row, tuple) else owner_row.get('recorder_id')) if owner_row else None
+        if recorder_changed and trader_recorder_id is not None:
+            _config_registry.invalidate_recorder(trader_recorder_id)
+        else:
+            _config_registry.invalidate_traders(trader_recorder_id)
+
         # ============================================================
         # 🔍 VERIFY max_daily_loss was saved correctly
         # ============================================================
@@ -15256,6 +15300,7 @@ def api_delete_trader(trader_id):
         cursor.execute(f'DELETE FROM traders WHERE id = {placeholder}', (trader_id,))
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders()
         
         logger.info(f"Deleted trader {trader_id}")
         return jsonify({'success': True, 'message': 'Trader deleted'})
@@ -15332,6 +15377,7 @@ def api_cleanup_duplicate_traders():
 
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders()
 
         return jsonify({
             'success': True,
@@ -15407,6 +15453,7 @@ def api_toggle_trader(trader_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders()
         
         action = 'enabled' if enabled else 'disabled'
         logger.info(f"📊 {action.upper()} trader #{trader_id}: {recorder_name} → {account_name}")
@@ -15467,6 +15514,7 @@ def api_close_trader_position(trader_id):
         
         conn.commit()
         conn.close()
+        recorder_counters.trade_closed(recorder_id, closed_count)
         
         logger.info(f"📊 Closed {closed_count} position(s) for {recorder_name} on {account_name}")
         
@@ -15984,32 +16032,14 @@ def api_retry_failed_webhooks():
 # HIGH-PERFORMANCE SIGNAL PROCESSOR (Background Thread)
 # ============================================================
 
-# Cache for recorder lookups (avoid repeated DB queries)
-recorder_cache = {}
-recorder_cache_time = {}
-CACHE_TTL = 60  # Cache recorder info for 60 seconds
+# Recorder / trader / linked-account config for the signal path.
+# Invalidated precisely by the CRUD routes (and across workers via Redis pub/sub).
+_config_registry = get_config_registry(get_db_connection, is_using_postgres)
 
 def get_cached_recorder(webhook_token):
-    """Get recorder from cache or database"""
-    now = time.time()
-    if webhook_token in recorder_cache:
-        if now - recorder_cache_time.get(webhook_token, 0) < CACHE_TTL:
-            return recorder_cache[webhook_token]
-    
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    if is_using_postgres():
-        cursor.execute('SELECT * FROM recorders WHERE webhook_token = %s AND recording_enabled = true', (webhook_token,))
-    else:
-        cursor.execute('SELECT * FROM recorders WHERE webhook_token = ? AND recording_enabled = 1', (webhook_token,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        recorder = dict(row)
-        recorder_cache[webhook_token] = recorder
-        recorder_cache_time[webhook_token] = now
+    """Get the enabled recorder for a webhook token from the config registry"""
+    recorder = _config_registry.recorder_by_token(webhook_token)
+    if recorder and recorder.get('recording_enabled'):
         return recorder
     return None
 
@@ -16042,6 +16072,8 @@ def process_signal_batch(signals):
                 sig['timestamp']
             ))
         conn.commit()
+        for sig in signals:
+            recorder_counters.record_signal(sig['recorder_id'], sig['action'])
     except Exception as e:
         logger.error(f"Batch signal insert error: {e}")
         conn.rollback()
@@ -16767,7 +16799,6 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
 
     # Track webhook received time for health monitoring
     global _webhook_last_received, _webhook_last_processed, _webhook_processing_count, _webhook_error_count
-    global _webhook_dedup_cache, _webhook_dedup_window, _webhook_dedup_max_size
     webhook_start_time = time.time()
     _webhook_last_received = webhook_start_time
 
@@ -16794,34 +16825,24 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
     body_hash = hashlib.md5(raw_body.encode()).hexdigest()[:8]
     dedup_key = f"{webhook_token}:{body_hash}"
 
-    # Check if we've seen this exact webhook recently
-    if dedup_key in _webhook_dedup_cache:
-        last_seen = _webhook_dedup_cache[dedup_key]
-        age = webhook_start_time - last_seen
-        if age < _webhook_dedup_window:
-            _logger.warning(f"⚠️ DUPLICATE WEBHOOK BLOCKED: Same signal received {age:.2f}s ago (token: {webhook_token[:8]}...)")
-            # Log blocked webhook for monitoring
-            log_webhook_activity(
-                recorder_name=f"Token:{webhook_token[:8]}",
-                action='Unknown',
-                symbol='Unknown',
-                status='blocked',
-                error=f'Duplicate signal ({age:.2f}s ago)'
-            )
-            return jsonify({
-                'success': False,
-                'blocked': True,
-                'reason': 'duplicate',
-                'message': f'Duplicate signal blocked (same webhook {age:.2f}s ago)'
-            }), 200
-
-    # Store this webhook in dedup cache
-    _webhook_dedup_cache[dedup_key] = webhook_start_time
-
-    # Cleanup old entries if cache is too large
-    if len(_webhook_dedup_cache) > _webhook_dedup_max_size:
-        cutoff = webhook_start_time - 60  # Keep last 60 seconds
-        _webhook_dedup_cache = {k: v for k, v in _webhook_dedup_cache.items() if v > cutoff}
+    # Check if any worker has seen this exact webhook recently (atomic claim)
+    is_duplicate, age = signal_tracking.check_duplicate(dedup_key, _webhook_dedup_window * 1000)
+    if is_duplicate:
+        _logger.warning(f"⚠️ DUPLICATE WEBHOOK BLOCKED: Same signal received {age:.2f}s ago (token: {webhook_token[:8]}...)")
+        # Log blocked webhook for monitoring
+        log_webhook_activity(
+            recorder_name=f"Token:{webhook_token[:8]}",
+            action='Unknown',
+            symbol='Unknown',
+            status='blocked',
+            error=f'Duplicate signal ({age:.2f}s ago)'
+        )
+        return jsonify({
+            'success': False,
+            'blocked': True,
+            'reason': 'duplicate',
+            'message': f'Duplicate signal blocked (same webhook {age:.2f}s ago)'
+        }), 200
 
     # Log that we're starting to process (helps track where signals get lost)
     track_signal_step(signal_id, 'STEP5_DEDUP_PASSED', {'dedup_key': dedup_key})
@@ -16851,18 +16872,8 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
             except:
                 pass
         
-        # Bug #58: Check in-memory cache first (0 DB queries on hit)
-        now = time.time()
-        if webhook_token in recorder_cache and (now - recorder_cache_time.get(webhook_token, 0)) < CACHE_TTL:
-            recorder_row = recorder_cache[webhook_token]
-        else:
-            cursor.execute(f'SELECT * FROM recorders WHERE webhook_token = {placeholder}', (webhook_token,))
-            recorder_row = cursor.fetchone()
-            if recorder_row:
-                cached = dict(recorder_row) if not isinstance(recorder_row, dict) else recorder_row
-                recorder_cache[webhook_token] = cached
-                recorder_cache_time[webhook_token] = now
-                recorder_row = cached
+        # Bug #58: Config registry first (0 DB queries on hit, invalidated on recorder edits)
+        recorder_row = _config_registry.recorder_by_token(webhook_token)
 
         if not recorder_row:
             _logger.warning(f"Webhook received for unknown token: {webhook_token[:8]}...")
@@ -16957,6 +16968,24 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
         prev_position_size = data.get('prev_position_size', data.get('prev_market_position_size'))
         is_strategy_alert = position_size is not None or market_position
 
+        def publish_signal(result: dict):
+            """Recorder signal for the price stream's event channel (Discord signal bot)."""
+            try:
+                _publish_signal_event({
+                    'recorder_id': recorder_id,
+                    'recorder_name': recorder_name,
+                    'signal_id': signal_id,
+                    'action': action,
+                    'ticker': ticker,
+                    'price': result.get('exit_price') or result.get('entry_price') or price,
+                    'position_size': position_size,
+                    'signal_type': 'strategy' if is_strategy_alert else 'alert',
+                    'timestamp': datetime.now().isoformat(),
+                    'trade': result
+                })
+            except Exception as pub_err:
+                _logger.debug(f"Signal stream publish error: {pub_err}")
+
         # ============================================================
         # NEW WEBHOOK FIELDS - PickMyTrade/TradersPost compatible
         # These override recorder/trader settings when provided
@@ -17197,8 +17226,10 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                     SET status = 'closed', exit_price = {ph}, exit_time = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
                     WHERE recorder_id = {ph} AND ticker = {ph} AND status = 'open'
                 ''', (current_price, recorder_id, ticker))
+                closed_trades = trade_cursor.rowcount
                 
                 trade_conn.commit()
+                recorder_counters.trade_closed(recorder_id, closed_trades)
                 trade_conn.close()
                 
             except Exception as e:
@@ -17237,7 +17268,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                 clear_signal_blocking_position(recorder_id, extract_symbol_root(ticker))
 
             conn.close()
-            return jsonify({
+            result = {
                 'success': True,
                 'action': 'close',
                 'side': 'FLAT',
@@ -17246,7 +17277,9 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                 'broker_queued': True,
                 'tracking': 'signal-based',
                 'processing_time_ms': int(processing_time * 1000)
-            })
+            }
+            publish_signal(result)
+            return jsonify(result)
         
         # Determine side early (needed for filters)
         if action in ['buy', 'long']:
@@ -17300,6 +17333,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                     ''', (close_price, pnl, pnl_ticks, trade_id))
                     
                     conn.commit()
+                    recorder_counters.trade_closed(recorder_id)
                     _logger.info(f"📊 Trade #{trade_id} closed: {trade_side} {ticker} @ {entry_price} → {close_price} | PnL: ${pnl:.2f}")
 
                     # Track paper trade close
@@ -17331,7 +17365,9 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                 clear_signal_blocking_position(recorder_id, extract_symbol_root(ticker))
 
             conn.close()
-            return jsonify({'success': True, 'action': 'close', 'message': 'Close signal processed', 'broker_queued': True})
+            result = {'success': True, 'action': 'close', 'message': 'Close signal processed', 'broker_queued': True}
+            publish_signal(dict(result, exit_price=close_price))
+            return jsonify(result)
         else:
             _logger.error(f"❌ UNKNOWN ACTION: '{action}' - not in buy/long/sell/short/close/flat/exit")
             track_signal_step(signal_id, 'STEP5_UNKNOWN_ACTION', {'action': action})
@@ -17655,6 +17691,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                     ''', (recorder_id, action, ticker, price))
                 conn.commit()
                 conn.close()
+                recorder_counters.record_signal(recorder_id, action)
                 return jsonify({'success': False, 'blocked': True, 'reason': f'Signal delay ({signal_number} mod {add_delay} != 0)'}), 200
             _logger.info(f"✅ Signal delay passed: #{signal_number} (every {add_delay})")
 
@@ -17681,6 +17718,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                     VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {timestamp_fn}, 1)
                 ''', (recorder_id, action, ticker, price))
             conn.commit()
+            recorder_counters.record_signal(recorder_id, action)
         except Exception as e:
             _logger.warning(f"Could not record signal: {e}")
 
@@ -18295,7 +18333,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                         _logger.info(f"🧹 STALE: Cleaned up DB record only - NO broker order sent")
                     
                     conn.close()
-                    return jsonify({
+                    result = {
                         'success': True,
                         'action': 'closed',
                         'trade_id': strategy_open_trade['id'],
@@ -18306,7 +18344,9 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                         'pnl_ticks': pnl_ticks_close,
                         'exit_reason': 'signal',
                         'broker_queued': True
-                    })
+                    }
+                    publish_signal(result)
+                    return jsonify(result)
                 except Exception as close_err:
                     _logger.warning(f"⚠️ Could not close LONG: {close_err}")
             
@@ -18356,7 +18396,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                         _logger.info(f"🧹 STALE: Cleaned up DB record only - NO broker order sent")
                     
                     conn.close()
-                    return jsonify({
+                    result = {
                         'success': True,
                         'action': 'closed',
                         'trade_id': strategy_open_trade['id'],
@@ -18367,7 +18407,9 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                         'pnl_ticks': pnl_ticks_close,
                         'exit_reason': 'signal',
                         'broker_queued': True
-                    })
+                    }
+                    publish_signal(result)
+                    return jsonify(result)
                 except Exception as close_err:
                     _logger.warning(f"⚠️ Could not close SHORT: {close_err}")
         
@@ -18413,6 +18455,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                 existing_trade = trade_cursor.fetchone()
 
                 recorded_trade_id = None
+                opened_count = closed_count = 0  # Applied to recorder_counters once committed
 
                 if existing_trade:
                     existing_id, existing_side, existing_entry, existing_qty = existing_trade
@@ -18431,6 +18474,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                                 exit_reason = 'signal', exit_time = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
                             WHERE id = {ph}
                         ''', (c_price, pnl_dollars, pnl_ticks, existing_id))
+                        closed_count += 1
 
                         _logger.info(f"📊 {existing_side} CLOSED by {t_side} signal | Entry: {existing_entry} | Exit: {c_price} | P&L: ${pnl_dollars:.2f} ({pnl_ticks:.1f} ticks)")
 
@@ -18441,6 +18485,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                             (recorder_id, ticker, action, side, entry_price, entry_time, quantity, status, tp_price, sl_price, broker_managed_tp_sl, created_at, updated_at)
                             VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, {ph}, 'open', {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                         ''', (rec_id, tkr, t_action, t_side, c_price, qty, t_tp_price, t_sl_price, broker_managed))
+                        opened_count += 1
                         _logger.info(f"📈 NEW {t_side} opened @ {c_price} x{qty} | TP: {t_tp_price} | SL: {t_sl_price}")
 
                         try:
@@ -18457,6 +18502,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                                 (recorder_id, ticker, action, side, entry_price, entry_time, quantity, status, tp_price, sl_price, broker_managed_tp_sl, created_at, updated_at)
                                 VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, {ph}, 'open', {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                             ''', (rec_id, tkr, t_action, t_side, c_price, qty, t_tp_price, t_sl_price, broker_managed))
+                            opened_count += 1
                             _logger.info(f"📈 DCA {t_side} +{qty} @ {c_price}")
 
                             try:
@@ -18471,6 +18517,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                                     exit_time = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
                                 WHERE id = {ph}
                             ''', (c_price, existing_id))
+                            closed_count += 1
                             _logger.info(f"📊 [{rec_name}] DCA OFF - Closed stale {existing_side} #{existing_id}, opening fresh entry")
 
                             trade_cursor.execute(f'''
@@ -18478,6 +18525,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                                 (recorder_id, ticker, action, side, entry_price, entry_time, quantity, status, tp_price, sl_price, broker_managed_tp_sl, created_at, updated_at)
                                 VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, {ph}, 'open', {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                             ''', (rec_id, tkr, t_action, t_side, c_price, qty, t_tp_price, t_sl_price, broker_managed))
+                            opened_count += 1
                             _logger.info(f"📈 NEW {t_side} opened @ {c_price} x{qty} | TP: {t_tp_price} | SL: {t_sl_price}")
 
                             try:
@@ -18492,6 +18540,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
                         (recorder_id, ticker, action, side, entry_price, entry_time, quantity, status, tp_price, sl_price, broker_managed_tp_sl, created_at, updated_at)
                         VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, {ph}, 'open', {ph}, {ph}, {ph}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                     ''', (rec_id, tkr, t_action, t_side, c_price, qty, t_tp_price, t_sl_price, broker_managed))
+                    opened_count += 1
                     _logger.info(f"📈 NEW {t_side} opened @ {c_price} x{qty} | TP: {t_tp_price} | SL: {t_sl_price}")
 
                     try:
@@ -18540,6 +18589,8 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
 
                 trade_conn.commit()
                 trade_conn.close()
+                recorder_counters.trade_closed(rec_id, closed_count)
+                recorder_counters.trade_opened(rec_id, opened_count)
                 _logger.info(f"✅ SIGNAL TRACKED (bg): {t_side} {tkr} @ {c_price}")
             except Exception as track_err:
                 _logger.error(f"❌ Signal tracking error (bg): {track_err}")
@@ -18722,7 +18773,7 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
         _logger.info(f"✅ Webhook processed in {processing_time:.2f}s (total: {_webhook_processing_count})")
         _logger.info(f"   Final status: Queue size={queue_status}, HIVE MIND workers={workers_alive}/{_broker_execution_worker_count}, Broker task queued={'YES' if queue_status > 0 or 'broker_task' in locals() else 'NO'}")
         
-        return jsonify({
+        result = {
             'success': True,
             'action': trade_action,
             'side': trade_side,
@@ -18735,7 +18786,9 @@ def process_webhook_directly(webhook_token, raw_body_override=None, signal_id=No
             'broker_queued': broker_was_queued,  # Reflects actual queue status
             'tracking': 'signal-based',
             'processing_time_ms': int(processing_time * 1000)
-        })
+        }
+        publish_signal(result)
+        return jsonify(result)
             
     except NameError as name_err:
         # CRITICAL: Close DB connection to prevent pool poisoning
@@ -18913,6 +18966,7 @@ def _DISABLED_receive_webhook_legacy(webhook_token):
             UPDATE recorders SET signal_count = {ph}, updated_at = CURRENT_TIMESTAMP WHERE id = {ph}
         ''', (signal_count, recorder_id))
         conn.commit()
+        recorder_counters.set_signal_count(recorder_id, signal_count)
         
         # Check if we should skip this signal
         if signal_delay > 1 and signal_count % signal_delay != 0:
@@ -20804,7 +20858,7 @@ def api_quant_screener_screen():
         min_price = filters.get('min_price', 0)
         max_price = filters.get('max_price', None)
         
-        # Generate sample stock universe with quant ratings
+        # Filter the precomputed factor snapshot
         results = generate_quant_stock_data(
             min_score=min_score,
             min_rating=min_rating,
@@ -20822,7 +20876,9 @@ def api_quant_screener_screen():
         return jsonify({
             'success': True,
             'results': results,
-            'count': len(results)
+            'count': len(results),
+            'snapshot_version': _quant_snapshot.get('version'),
+            'computed_at': _quant_snapshot.get('computed_at')
         })
         
     except Exception as e:
@@ -21338,6 +21394,91 @@ STOCK_SECTOR_MAP = {
 }
 
 
+# Request fundamental columns we need for quant analysis
+# TradingView Scanner API - VALIDATED column names only
+QUANT_TV_COLUMNS = [
+    # Price & Basic Info
+    "close", "change", "change_abs", "volume", "name", "description",
+    "sector", "industry", "market_cap_basic", "type", "subtype",
+    # Valuation metrics (TTM = trailing twelve months)
+    "price_earnings_ttm", "earnings_per_share_basic_ttm",
+    "price_book_ratio", "price_sales_ratio",  # P/B, P/S
+    "enterprise_value_ebitda_ttm",  # EV/EBITDA (no standalone enterprise_value)
+    "price_free_cash_flow_ttm",
+    # Profitability metrics (as percentages)
+    "gross_margin", "operating_margin", "pre_tax_margin", "net_margin",  
+    "return_on_equity", "return_on_assets", "return_on_invested_capital",
+    # Momentum metrics
+    "SMA50", "SMA200",  # Moving averages
+    "Perf.W", "Perf.1M", "Perf.3M", "Perf.6M", "Perf.Y", "Perf.YTD",  # Performance
+    # Analyst data
+    "Recommend.All", "number_of_employees", "average_volume_10d_calc"
+]
+
+
+def _tradingview_row_to_stock_data(symbol, col_map):
+    """Map a TradingView Scanner row (column name -> value) to our stock_data dict."""
+    # Determine sector - FIRST check our hardcoded map, then TradingView data
+    sector = STOCK_SECTOR_MAP.get(symbol.upper())  # Our reliable map FIRST
+    if not sector:
+        # Try TradingView data as fallback
+        sector = col_map.get('sector') or col_map.get('type')
+    if not sector or sector == 'Unknown' or len(str(sector)) < 2:
+        sector = 'Technology'  # Default fallback
+
+    return {
+        'symbol': symbol.upper(),
+        'name': col_map.get('name') or col_map.get('description') or symbol,
+        'sector': sector,
+        'industry': col_map.get('industry') or col_map.get('subtype') or 'Unknown',
+        'price': col_map.get('close', 0),
+        'change_pct': col_map.get('change', 0),
+        'market_cap': col_map.get('market_cap_basic', 0),
+
+        # Valuation metrics
+        'pe_ratio': col_map.get('price_earnings_ttm'),
+        'forward_pe': col_map.get('price_earnings_ttm'),  # TV doesn't have forward, use TTM
+        'peg_ratio': None,  # TradingView doesn't provide PEG directly
+        'price_to_book': col_map.get('price_book_ratio'),
+        'price_to_sales': col_map.get('price_sales_ratio'),
+        'ev_to_ebitda': col_map.get('enterprise_value_ebitda_ttm'),
+        'ev_to_revenue': None,
+
+        # Profitability metrics (TradingView returns as decimals or percentages - check format)
+        'profit_margin': col_map.get('net_margin') / 100 if col_map.get('net_margin') and col_map.get('net_margin') > 1 else col_map.get('net_margin'),
+        'operating_margin': col_map.get('operating_margin') / 100 if col_map.get('operating_margin') and col_map.get('operating_margin') > 1 else col_map.get('operating_margin'),
+        'gross_margin': col_map.get('gross_margin') / 100 if col_map.get('gross_margin') and col_map.get('gross_margin') > 1 else col_map.get('gross_margin'),
+        'roe': col_map.get('return_on_equity') / 100 if col_map.get('return_on_equity') and col_map.get('return_on_equity') > 1 else col_map.get('return_on_equity'),
+        'roa': col_map.get('return_on_assets') / 100 if col_map.get('return_on_assets') and col_map.get('return_on_assets') > 1 else col_map.get('return_on_assets'),
+
+        # Growth metrics - TradingView Scanner doesn't provide these, set to None
+        # Growth calculation will fall back to sector median comparison
+        'revenue_growth': None,  # TradingView Scanner doesn't provide this
+        'earnings_growth': None,  # TradingView Scanner doesn't provide this
+        'earnings_quarterly_growth': None,  # TradingView Scanner doesn't provide this
+
+        # Momentum metrics
+        'fifty_two_week_high': col_map.get('price_52_week_high'),
+        'fifty_two_week_low': col_map.get('price_52_week_low'),
+        'fifty_day_average': col_map.get('SMA50'),
+        'two_hundred_day_average': col_map.get('SMA200'),
+
+        # Analyst data - TradingView Recommend.All is -1 to 1 scale, convert to 1-5
+        'recommendation_mean': (col_map.get('Recommend.All') + 1) * 2 + 1 if col_map.get('Recommend.All') is not None else None,
+        'target_mean_price': None,  # TradingView doesn't provide target price in scan
+        'number_of_analyst_opinions': 10,  # Default estimate
+
+        # Performance data for momentum
+        'perf_week': col_map.get('Perf.W'),
+        'perf_month': col_map.get('Perf.1M'),
+        'perf_quarter': col_map.get('Perf.3M'),
+        'perf_half': col_map.get('Perf.6M'),
+        'perf_year': col_map.get('Perf.Y'),
+
+        '_data_source': 'tradingview'
+    }
+
+
 def get_stock_data_from_tradingview(symbol):
     """
     Fetch fundamental stock data from TradingView Scanner API.
@@ -21363,26 +21504,7 @@ def get_stock_data_from_tradingview(symbol):
             f"AMEX:{symbol}"
         ]
         
-        # Request fundamental columns we need for quant analysis
-        # TradingView Scanner API - VALIDATED column names only
-        columns = [
-            # Price & Basic Info
-            "close", "change", "change_abs", "volume", "name", "description",
-            "sector", "industry", "market_cap_basic", "type", "subtype",
-            # Valuation metrics (TTM = trailing twelve months)
-            "price_earnings_ttm", "earnings_per_share_basic_ttm",
-            "price_book_ratio", "price_sales_ratio",  # P/B, P/S
-            "enterprise_value_ebitda_ttm",  # EV/EBITDA (no standalone enterprise_value)
-            "price_free_cash_flow_ttm",
-            # Profitability metrics (as percentages)
-            "gross_margin", "operating_margin", "pre_tax_margin", "net_margin",  
-            "return_on_equity", "return_on_assets", "return_on_invested_capital",
-            # Momentum metrics
-            "SMA50", "SMA200",  # Moving averages
-            "Perf.W", "Perf.1M", "Perf.3M", "Perf.6M", "Perf.Y", "Perf.YTD",  # Performance
-            # Analyst data
-            "Recommend.All", "number_of_employees", "average_volume_10d_calc"
-        ]
+        columns = QUANT_TV_COLUMNS
         
         payload = {
             "symbols": {"tickers": tv_symbols},
@@ -21412,66 +21534,7 @@ def get_stock_data_from_tradingview(symbol):
                         # Log raw data for debugging
                         logger.info(f"TradingView raw data for {symbol}: sector={col_map.get('sector')}, industry={col_map.get('industry')}")
                         
-                        # Determine sector - FIRST check our hardcoded map, then TradingView data
-                        sector = STOCK_SECTOR_MAP.get(symbol.upper())  # Our reliable map FIRST
-                        if not sector:
-                            # Try TradingView data as fallback
-                            sector = col_map.get('sector') or col_map.get('type')
-                        if not sector or sector == 'Unknown' or len(str(sector)) < 2:
-                            sector = 'Technology'  # Default fallback
-                        
-                        # Build stock data dict
-                        stock_data = {
-                            'symbol': symbol.upper(),
-                            'name': col_map.get('name') or col_map.get('description') or symbol,
-                            'sector': sector,
-                            'industry': col_map.get('industry') or col_map.get('subtype') or 'Unknown',
-                            'price': col_map.get('close', 0),
-                            'change_pct': col_map.get('change', 0),
-                            'market_cap': col_map.get('market_cap_basic', 0),
-                            
-                            # Valuation metrics
-                            'pe_ratio': col_map.get('price_earnings_ttm'),
-                            'forward_pe': col_map.get('price_earnings_ttm'),  # TV doesn't have forward, use TTM
-                            'peg_ratio': None,  # TradingView doesn't provide PEG directly
-                            'price_to_book': col_map.get('price_book_ratio'),
-                            'price_to_sales': col_map.get('price_sales_ratio'),
-                            'ev_to_ebitda': col_map.get('enterprise_value_ebitda_ttm'),
-                            'ev_to_revenue': None,
-                            
-                            # Profitability metrics (TradingView returns as decimals or percentages - check format)
-                            'profit_margin': col_map.get('net_margin') / 100 if col_map.get('net_margin') and col_map.get('net_margin') > 1 else col_map.get('net_margin'),
-                            'operating_margin': col_map.get('operating_margin') / 100 if col_map.get('operating_margin') and col_map.get('operating_margin') > 1 else col_map.get('operating_margin'),
-                            'gross_margin': col_map.get('gross_margin') / 100 if col_map.get('gross_margin') and col_map.get('gross_margin') > 1 else col_map.get('gross_margin'),
-                            'roe': col_map.get('return_on_equity') / 100 if col_map.get('return_on_equity') and col_map.get('return_on_equity') > 1 else col_map.get('return_on_equity'),
-                            'roa': col_map.get('return_on_assets') / 100 if col_map.get('return_on_assets') and col_map.get('return_on_assets') > 1 else col_map.get('return_on_assets'),
-                            
-                            # Growth metrics - TradingView Scanner doesn't provide these, set to None
-                            # Growth calculation will fall back to sector median comparison
-                            'revenue_growth': None,  # TradingView Scanner doesn't provide this
-                            'earnings_growth': None,  # TradingView Scanner doesn't provide this
-                            'earnings_quarterly_growth': None,  # TradingView Scanner doesn't provide this
-                            
-                            # Momentum metrics
-                            'fifty_two_week_high': col_map.get('price_52_week_high'),
-                            'fifty_two_week_low': col_map.get('price_52_week_low'),
-                            'fifty_day_average': col_map.get('SMA50'),
-                            'two_hundred_day_average': col_map.get('SMA200'),
-                            
-                            # Analyst data - TradingView Recommend.All is -1 to 1 scale, convert to 1-5
-                            'recommendation_mean': (col_map.get('Recommend.All') + 1) * 2 + 1 if col_map.get('Recommend.All') is not None else None,
-                            'target_mean_price': None,  # TradingView doesn't provide target price in scan
-                            'number_of_analyst_opinions': 10,  # Default estimate
-                            
-                            # Performance data for momentum
-                            'perf_week': col_map.get('Perf.W'),
-                            'perf_month': col_map.get('Perf.1M'),
-                            'perf_quarter': col_map.get('Perf.3M'),
-                            'perf_half': col_map.get('Perf.6M'),
-                            'perf_year': col_map.get('Perf.Y'),
-                            
-                            '_data_source': 'tradingview'
-                        }
+                        stock_data = _tradingview_row_to_stock_data(symbol, col_map)
                         
                         logger.info(f"✅ TradingView data for {symbol}: sector={stock_data['sector']}, P/E={stock_data['pe_ratio']}, ROE={stock_data['roe']}")
                         return stock_data
@@ -22114,8 +22177,26 @@ def get_real_factor_grades(symbol):
     Get real factor grades for a stock based on actual financial data.
     This replaces the fake generate_factor_grade() function.
     """
-    stock_data = get_real_stock_data(symbol)
-    
+    return _factor_grades_from_stock_data(symbol, get_real_stock_data(symbol),
+                                          _quant_snapshot.get('sector_medians'))
+
+
+def _grading_sector(symbol, stock_data):
+    """Sector a stock is graded against - STOCK_SECTOR_MAP first, then the fetched sector."""
+    sector = STOCK_SECTOR_MAP.get(symbol.upper())  # Our reliable map FIRST
+    if not sector:
+        sector = stock_data.get('sector', 'Default')
+    if sector == 'Unknown' or not sector:
+        sector = 'Default'
+    return sector
+
+
+def _factor_grades_from_stock_data(symbol, stock_data, universe_medians=None):
+    """
+    Grade an already-fetched stock_data dict (shared by per-symbol and snapshot paths).
+    universe_medians ({sector: {metric: median}}, from the factor snapshot) override
+    the static SECTOR_MEDIANS for the metrics they cover.
+    """
     if not stock_data:
         # Fallback to random if data unavailable
         logger.warning(f"No real data for {symbol}, using fallback")
@@ -22130,13 +22211,10 @@ def get_real_factor_grades(symbol):
             '_data_source': 'fallback'
         }
     
-    # Get sector medians - use STOCK_SECTOR_MAP as primary source
-    sector = STOCK_SECTOR_MAP.get(symbol.upper())  # Our reliable map FIRST
-    if not sector:
-        sector = stock_data.get('sector', 'Default')
-    if sector == 'Unknown' or not sector:
-        sector = 'Default'
+    sector = _grading_sector(symbol, stock_data)
     sector_medians = SECTOR_MEDIANS.get(sector, SECTOR_MEDIANS['Default'])
+    if universe_medians and universe_medians.get(sector):
+        sector_medians = {**sector_medians, **universe_medians[sector]}
     
     # Calculate all factor grades
     factors = {
@@ -22246,115 +22324,300 @@ def generate_single_stock_factors(symbol):
     }
 
 
-def generate_quant_stock_data(min_score=0, min_rating='', value_grade='', growth_grade='',
-                               profitability_grade='', momentum_grade='', eps_revisions_grade='',
-                               sector='', market_cap='', min_price=0, max_price=None):
-    """Generate Seeking Alpha style quant stock data with REAL financial data from yfinance."""
+# ============================================================================
+# QUANT FACTOR SNAPSHOT - batch-computed grades served from memory
+# ============================================================================
+# The screener used to fetch + grade every symbol inside the request. A
+# background job now batch-fetches the whole universe from the TradingView
+# scanner, grades it once, and publishes a versioned snapshot (in-process and
+# via the shared cache so every gunicorn worker sees the same version).
+# /api/quant-screener/screen only filters the in-memory rows.
+
+QUANT_SNAPSHOT_INTERVAL = int(os.environ.get('QUANT_SNAPSHOT_INTERVAL', '3600'))  # seconds
+QUANT_SNAPSHOT_BATCH_SIZE = 100  # symbols per scanner request (x3 exchanges)
+QUANT_SNAPSHOT_CACHE_KEY = 'quant:factor_snapshot'
+QUANT_SNAPSHOT_VERSION_KEY = 'quant:factor_snapshot_version'
+
+# Raw metrics summarized per sector in the snapshot (universe medians)
+QUANT_MEDIAN_METRICS = ['pe_ratio', 'price_to_book', 'price_to_sales', 'ev_to_ebitda',
+                        'profit_margin', 'operating_margin', 'gross_margin', 'roe', 'roa']
+# A sector needs this many values for a metric before its snapshot median replaces SECTOR_MEDIANS
+QUANT_MEDIAN_MIN_SAMPLES = 5
+
+_quant_snapshot = {'version': 0, 'computed_at': None, 'rows': [], 'sector_medians': {}}
+_quant_snapshot_lock = threading.Lock()
+_quant_snapshot_build_lock = threading.Lock()
+
+
+def fetch_tradingview_fundamentals_batch(symbols):
+    """
+    Fetch fundamentals for many symbols with one TradingView scanner call per batch.
+    Returns {symbol: stock_data} for every symbol the scanner knew about.
+    """
+    url = "https://scanner.tradingview.com/america/scan"
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+        'Origin': 'https://www.tradingview.com',
+        'Referer': 'https://www.tradingview.com/'
+    }
+    cookies = {}
+    session = get_tradingview_session_for_stocks()
+    if session:
+        cookies = {
+            'sessionid': session.get('sessionid', ''),
+            'sessionid_sign': session.get('sessionid_sign', '')
+        }
+    
+    results = {}
+    symbols = [s.upper() for s in symbols]
+    for i in range(0, len(symbols), QUANT_SNAPSHOT_BATCH_SIZE):
+        batch = symbols[i:i + QUANT_SNAPSHOT_BATCH_SIZE]
+        tickers = [f"{exchange}:{sym}" for sym in batch for exchange in ('NASDAQ', 'NYSE', 'AMEX')]
+        try:
+            response = requests.post(url, json={"symbols": {"tickers": tickers}, "columns": QUANT_TV_COLUMNS},
+                                     headers=headers, cookies=cookies, timeout=20)
+            if response.status_code != 200:
+                logger.warning(f"TradingView batch scan returned {response.status_code} for {len(batch)} symbols")
+                continue
+            for item in response.json().get('data') or []:
+                values = item.get('d', [])
+                symbol = item.get('s', '').split(':')[-1]
+                if not values or values[0] is None or symbol in results:
+                    continue
+                col_map = dict(zip(QUANT_TV_COLUMNS, values))
+                results[symbol] = _tradingview_row_to_stock_data(symbol, col_map)
+        except Exception as e:
+            logger.error(f"TradingView batch scan error ({len(batch)} symbols): {e}")
+    return results
+
+
+def _build_quant_row(stock, real_factors, live_prices):
+    """Build one screener row from graded factors. Returns None if no usable price."""
     import random
     
-    stocks = get_stock_universe()
+    symbol = stock['symbol']
+    stock_data = real_factors.get('_stock_data', {})
+    data_source = real_factors.get('_data_source', 'fallback')
+    
+    # Use real price from yfinance if available, otherwise use TradingView prices
+    if stock_data.get('price'):
+        price = stock_data['price']
+        change = stock_data.get('change_pct', 0)
+    elif symbol in live_prices:
+        price = live_prices[symbol].get('price', 0)
+        change = live_prices[symbol].get('change_pct', 0)
+    else:
+        random.seed(hash(symbol) + 1)
+        price = 50 + random.random() * 450
+        change = (random.random() - 0.5) * 8
+    
+    if not price or price <= 0:
+        return None
+    
+    # Extract factor grades (excluding metadata keys)
+    factors = {
+        'value': real_factors.get('value', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
+        'growth': real_factors.get('growth', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
+        'profitability': real_factors.get('profitability', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
+        'momentum': real_factors.get('momentum', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
+        'eps_revisions': real_factors.get('eps_revisions', {'grade': 'C', 'score': 0.5, 'metrics': {}})
+    }
+    
+    # Calculate quant score (1.0-5.0 scale) based on REAL scores
+    quant_score = (
+        (factors['value']['score'] * 4 + 1) * 0.20 +
+        (factors['growth']['score'] * 4 + 1) * 0.20 +
+        (factors['profitability']['score'] * 4 + 1) * 0.25 +
+        (factors['momentum']['score'] * 4 + 1) * 0.20 +
+        (factors['eps_revisions']['score'] * 4 + 1) * 0.15
+    )
+    
+    # Use real company name and sector if available
+    company_name = stock_data.get('name') or stock['name']
+    company_sector = stock_data.get('sector') or stock['sector'].replace('_', ' ').title()
+    
+    return {
+        'symbol': symbol,
+        'name': company_name,
+        'sector': company_sector,
+        'market_cap': stock['market_cap'].title(),
+        'price': round(price, 2),
+        'change': round(change, 2),
+        'quant_score': round(quant_score, 2),
+        'rating': score_to_quant_rating(quant_score),
+        'factors': factors,
+        'data_source': data_source,  # Track if using real or fallback data
+        # Universe keys used by the sector / market cap filters
+        'sector_key': stock['sector'],
+        'market_cap_key': stock['market_cap'],
+    }
+
+
+def build_quant_factor_snapshot():
+    """
+    Batch-fetch fundamentals for the whole universe, grade every stock once and
+    compute per-sector medians + universe percentiles in a single pass.
+    """
+    import statistics
     
-    # Fetch live prices as fallback
+    started = time.time()
+    stocks = get_stock_universe()
     all_symbols = [s['symbol'] for s in stocks]
-    live_prices = fetch_live_stock_prices(all_symbols)
     
-    results = []
+    fundamentals = fetch_tradingview_fundamentals_batch(all_symbols)
+    live_prices = {}
+    if len(fundamentals) < len(all_symbols):
+        live_prices = fetch_live_stock_prices([s for s in all_symbols if s not in fundamentals])
+    
+    sector_values = {}
+    now = time.time()
+    for symbol, stock_data in fundamentals.items():
+        # Warm the per-symbol cache used by the ticker report endpoint
+        _quant_data_cache[symbol] = stock_data
+        _quant_cache_expiry[symbol] = now + QUANT_CACHE_DURATION
+        sector_bucket = sector_values.setdefault(_grading_sector(symbol, stock_data),
+                                                 {m: [] for m in QUANT_MEDIAN_METRICS})
+        for metric in QUANT_MEDIAN_METRICS:
+            value = stock_data.get(metric)
+            if value is not None:
+                sector_bucket[metric].append(value)
+    
+    # Medians are keyed like SECTOR_MEDIANS so grading can use them directly
+    sector_medians = {
+        sector: {m: round(statistics.median(v), 4) for m, v in metrics.items()
+                 if len(v) >= QUANT_MEDIAN_MIN_SAMPLES}
+        for sector, metrics in sector_values.items()
+    }
     
+    rows = []
     for stock in stocks:
         symbol = stock['symbol']
-        
-        if sector and stock['sector'] != sector:
-            continue
-        if market_cap and stock['market_cap'] != market_cap:
-            continue
-        
-        # Get REAL factor grades from yfinance
-        real_factors = get_real_factor_grades(symbol)
-        stock_data = real_factors.get('_stock_data', {})
-        data_source = real_factors.get('_data_source', 'fallback')
-        
-        # Use real price from yfinance if available, otherwise use TradingView prices
-        if stock_data.get('price'):
-            price = stock_data['price']
-            change = stock_data.get('change_pct', 0)
-        elif symbol in live_prices:
-            price = live_prices[symbol].get('price', 0)
-            change = live_prices[symbol].get('change_pct', 0)
-        else:
-            random.seed(hash(symbol) + 1)
-            price = 50 + random.random() * 450
-            change = (random.random() - 0.5) * 8
-        
-        if price <= 0:
-            continue
-        
-        # Extract factor grades (excluding metadata keys)
-        factors = {
-            'value': real_factors.get('value', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
-            'growth': real_factors.get('growth', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
-            'profitability': real_factors.get('profitability', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
-            'momentum': real_factors.get('momentum', {'grade': 'C', 'score': 0.5, 'metrics': {}}),
-            'eps_revisions': real_factors.get('eps_revisions', {'grade': 'C', 'score': 0.5, 'metrics': {}})
-        }
-        
-        # Calculate quant score (1.0-5.0 scale) based on REAL scores
-        quant_score = (
-            (factors['value']['score'] * 4 + 1) * 0.20 +
-            (factors['growth']['score'] * 4 + 1) * 0.20 +
-            (factors['profitability']['score'] * 4 + 1) * 0.25 +
-            (factors['momentum']['score'] * 4 + 1) * 0.20 +
-            (factors['eps_revisions']['score'] * 4 + 1) * 0.15
-        )
-        
-        rating = score_to_quant_rating(quant_score)
-        
-        # Apply filters
-        if min_score > 0:
-            effective_min = min_score if min_score > 1 else 1.0 + min_score * 4.0
-            if quant_score < effective_min:
-                continue
-        
-        if min_rating:
-            rating_order = {'strong_buy': 5, 'buy': 4, 'hold': 3, 'sell': 2, 'strong_sell': 1}
-            min_rating_val = rating_order.get(min_rating, 0)
-            current_rating_val = rating_order.get(rating.lower().replace(' ', '_'), 0)
-            if current_rating_val < min_rating_val:
-                continue
-        
-        if value_grade and not grade_meets_minimum(factors['value']['grade'], value_grade):
+        real_factors = _factor_grades_from_stock_data(symbol, fundamentals.get(symbol), sector_medians)
+        row = _build_quant_row(stock, real_factors, live_prices)
+        if row:
+            rows.append(row)
+    
+    # Universe percentile of the quant score (ties share the lower rank)
+    rows.sort(key=lambda x: x['quant_score'])
+    n = len(rows)
+    rank = 0
+    for i, row in enumerate(rows):
+        if i and row['quant_score'] != rows[i - 1]['quant_score']:
+            rank = i
+        row['percentile'] = round(rank / (n - 1) * 100, 1) if n > 1 else 100.0
+    rows.reverse()
+    
+    snapshot = {
+        'version': int(started * 1000),
+        'computed_at': datetime.now().isoformat(),
+        'duration_ms': round((time.time() - started) * 1000, 1),
+        'rows': rows,
+        'sector_medians': sector_medians,
+        'symbols_fetched': len(fundamentals),
+        'symbols_total': len(all_symbols),
+    }
+    logger.info(f"📊 Quant snapshot v{snapshot['version']}: {len(rows)} rows, "
+                f"{len(fundamentals)}/{len(all_symbols)} fetched in {snapshot['duration_ms']}ms")
+    return snapshot
+
+
+def _publish_quant_snapshot(snapshot):
+    """Install a snapshot locally and share it with other workers."""
+    global _quant_snapshot
+    with _quant_snapshot_lock:
+        _quant_snapshot = snapshot
+    if CACHE_AVAILABLE:
+        try:
+            cache.set(QUANT_SNAPSHOT_CACHE_KEY, snapshot, ttl=QUANT_SNAPSHOT_INTERVAL * 3)
+            cache.set(QUANT_SNAPSHOT_VERSION_KEY, snapshot['version'], ttl=QUANT_SNAPSHOT_INTERVAL * 3)
+        except Exception as e:
+            logger.warning(f"Could not share quant snapshot: {e}")
+
+
+def _load_shared_quant_snapshot():
+    """Adopt a newer snapshot published by another worker. Returns True if one was loaded."""
+    global _quant_snapshot
+    if not CACHE_AVAILABLE:
+        return False
+    try:
+        shared_version = cache.get(QUANT_SNAPSHOT_VERSION_KEY)
+        if not shared_version or int(shared_version) <= _quant_snapshot['version']:
+            return False
+        shared = cache.get(QUANT_SNAPSHOT_CACHE_KEY)
+        if shared and shared.get('rows'):
+            with _quant_snapshot_lock:
+                _quant_snapshot = shared
+            return True
+    except Exception as e:
+        logger.warning(f"Could not load shared quant snapshot: {e}")
+    return False
+
+
+def get_quant_snapshot():
+    """Return the current factor snapshot, building one synchronously on a cold start."""
+    _load_shared_quant_snapshot()
+    if not _quant_snapshot['rows']:
+        with _quant_snapshot_build_lock:
+            if not _quant_snapshot['rows'] and not _load_shared_quant_snapshot():
+                _publish_quant_snapshot(build_quant_factor_snapshot())
+    return _quant_snapshot
+
+
+def _quant_snapshot_loop():
+    """Background job: rebuild the factor snapshot every QUANT_SNAPSHOT_INTERVAL seconds."""
+    time.sleep(30)  # Let the server finish starting
+    while True:
+        try:
+            _load_shared_quant_snapshot()
+            computed_at = _quant_snapshot.get('version', 0) / 1000
+            # Another worker already refreshed it recently - skip the fetch
+            if time.time() - computed_at >= QUANT_SNAPSHOT_INTERVAL:
+                with _quant_snapshot_build_lock:
+                    _publish_quant_snapshot(build_quant_factor_snapshot())
+        except Exception as e:
+            logger.error(f"Quant snapshot job error: {e}")
+        time.sleep(QUANT_SNAPSHOT_INTERVAL)
+
+
+_quant_snapshot_thread = threading.Thread(target=_quant_snapshot_loop, daemon=True)
+_quant_snapshot_thread.start()
+
+
+def generate_quant_stock_data(min_score=0, min_rating='', value_grade='', growth_grade='',
+                               profitability_grade='', momentum_grade='', eps_revisions_grade='',
+                               sector='', market_cap='', min_price=0, max_price=None):
+    """Filter the precomputed quant factor snapshot (see build_quant_factor_snapshot)."""
+    rating_order = {'strong_buy': 5, 'buy': 4, 'hold': 3, 'sell': 2, 'strong_sell': 1}
+    min_rating_val = rating_order.get(min_rating, 0) if min_rating else 0
+    effective_min = 0
+    if min_score > 0:
+        effective_min = min_score if min_score > 1 else 1.0 + min_score * 4.0
+    grade_filters = [(f, g) for f, g in (('value', value_grade), ('growth', growth_grade),
+                                          ('profitability', profitability_grade),
+                                          ('momentum', momentum_grade),
+                                          ('eps_revisions', eps_revisions_grade)) if g]
+    
+    results = []
+    
+    # Rows are already sorted by quant_score (highest first)
+    for row in get_quant_snapshot()['rows']:
+        if sector and row['sector_key'] != sector:
             continue
-        if growth_grade and not grade_meets_minimum(factors['growth']['grade'], growth_grade):
+        if market_cap and row['market_cap_key'] != market_cap:
             continue
-        if profitability_grade and not grade_meets_minimum(factors['profitability']['grade'], profitability_grade):
+        if effective_min and row['quant_score'] < effective_min:
             continue
-        if momentum_grade and not grade_meets_minimum(factors['momentum']['grade'], momentum_grade):
+        if min_rating_val and rating_order.get(row['rating'].lower().replace(' ', '_'), 0) < min_rating_val:
             continue
-        if eps_revisions_grade and not grade_meets_minimum(factors['eps_revisions']['grade'], eps_revisions_grade):
+        if any(not grade_meets_minimum(row['factors'][f]['grade'], g) for f, g in grade_filters):
             continue
-        
-        if min_price and price < min_price:
+        if min_price and row['price'] < min_price:
             continue
-        if max_price and price > max_price:
+        if max_price and row['price'] > max_price:
             continue
-        
-        # Use real company name and sector if available
-        company_name = stock_data.get('name') or stock['name']
-        company_sector = stock_data.get('sector') or stock['sector'].replace('_', ' ').title()
-        
-        results.append({
-            'symbol': stock['symbol'],
-            'name': company_name,
-            'sector': company_sector,
-            'market_cap': stock['market_cap'].title(),
-            'price': round(price, 2),
-            'change': round(change, 2),
-            'quant_score': round(quant_score, 2),
-            'rating': rating,
-            'factors': factors,
-            'data_source': data_source  # Track if using real or fallback data
-        })
+        results.append(row)
     
-    results.sort(key=lambda x: x['quant_score'], reverse=True)
     return results
 
 
@@ -22362,8 +22625,9 @@ def generate_quant_stock_data(min_score=0, min_rating='', value_grade='', growth
 # LIVE STOCK PRICES FROM TRADINGVIEW
 # ============================================================================
 
-_stock_price_cache = {}
-_stock_price_cache_ttl = 30
+from quote_service import get_quote_service
+
+STOCK_PRICE_MAX_AGE = 30
 
 
 def get_tradingview_session_for_stocks():
@@ -22385,92 +22649,13 @@ def get_tradingview_session_for_stocks():
         return None
 
 
+# Shared by the screener, movers, insider prices and the heatmap (quote_service.py)
+_quote_service = get_quote_service(get_tradingview_session_for_stocks)
+
+
 def fetch_live_stock_prices(symbols: list) -> dict:
-    """Fetch live stock prices from TradingView Scanner API."""
-    global _stock_price_cache
-    import time
-    
-    results = {}
-    symbols_to_fetch = []
-    
-    current_time = time.time()
-    for symbol in symbols:
-        if symbol in _stock_price_cache:
-            cached = _stock_price_cache[symbol]
-            if current_time - cached.get('updated', 0) < _stock_price_cache_ttl:
-                results[symbol] = cached
-                continue
-        symbols_to_fetch.append(symbol)
-    
-    if not symbols_to_fetch:
-        return results
-    
-    try:
-        import requests
-        
-        session = get_tradingview_session_for_stocks()
-        cookies = {}
-        if session:
-            cookies = {
-                'sessionid': session.get('sessionid', ''),
-                'sessionid_sign': session.get('sessionid_sign', '')
-            }
-        
-        url = "https://scanner.tradingview.com/america/scan"
-        
-        tv_symbols = []
-        for symbol in symbols_to_fetch:
-            tv_symbols.extend([
-                f"NASDAQ:{symbol}",
-                f"NYSE:{symbol}",
-                f"AMEX:{symbol}"
-            ])
-        
-        payload = {
-            "symbols": {"tickers": tv_symbols},
-            "columns": ["close", "change", "change_abs", "volume", "name"]
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-            'Origin': 'https://www.tradingview.com',
-            'Referer': 'https://www.tradingview.com/'
-        }
-        
-        response = requests.post(url, json=payload, headers=headers, cookies=cookies, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            for item in data.get('data', []):
-                symbol_full = item.get('s', '')
-                values = item.get('d', [])
-                
-                if len(values) >= 4:
-                    symbol = symbol_full.split(':')[-1] if ':' in symbol_full else symbol_full
-                    
-                    if symbol in symbols_to_fetch:
-                        price = values[0] if values[0] else 0
-                        change_pct = values[1] if values[1] else 0
-                        change_abs = values[2] if values[2] else 0
-                        volume = values[3] if values[3] else 0
-                        
-                        price_data = {
-                            'price': round(float(price), 2) if price else 0,
-                            'change': round(float(change_abs), 2) if change_abs else 0,
-                            'change_pct': round(float(change_pct), 2) if change_pct else 0,
-                            'volume': int(volume) if volume else 0,
-                            'updated': current_time
-                        }
-                        
-                        results[symbol] = price_data
-                        _stock_price_cache[symbol] = price_data
-                        
-    except Exception as e:
-        logger.error(f"Error fetching stock prices from TradingView: {e}")
-    
-    return results
+    """Fetch live stock prices from TradingView Scanner API (batched and cached by quote_service)."""
+    return _quote_service.get_quotes(symbols, max_age=STOCK_PRICE_MAX_AGE)
 
 
 # ============================================================================
@@ -22668,9 +22853,11 @@ def init_digest_database():
                 finished_at TIMESTAMP,
                 run_type TEXT,
                 status TEXT DEFAULT 'running',
-                error TEXT
+                error TEXT,
+                section_timings TEXT
             )
         ''')
+        cursor.execute('ALTER TABLE digest_runs ADD COLUMN IF NOT EXISTS section_timings TEXT')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS news_items (
@@ -22682,7 +22869,38 @@ def init_digest_database():
                 summary TEXT,
                 url TEXT,
                 published_at TIMESTAMP,
-                inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                minhash TEXT,
+                duplicate_of TEXT
+            )
+        ''')
+        cursor.execute('ALTER TABLE news_items ADD COLUMN IF NOT EXISTS minhash TEXT')
+        cursor.execute('ALTER TABLE news_items ADD COLUMN IF NOT EXISTS duplicate_of TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_items_ticker_published ON news_items(ticker, published_at)')
+        
+        # Story -> every ticker whose feed carried it (news_items.ticker is only the first)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS news_item_tickers (
+                url_hash TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                PRIMARY KEY (url_hash, ticker)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_item_tickers_ticker ON news_item_tickers(ticker)')
+        cursor.execute('SELECT 1 FROM news_item_tickers LIMIT 1')
+        if not cursor.fetchone():
+            cursor.execute('''
+                INSERT INTO news_item_tickers (url_hash, ticker)
+                SELECT DISTINCT COALESCE(duplicate_of, url_hash), ticker FROM news_items
+            ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS news_feed_cursors (
+                ticker TEXT NOT NULL,
+                source TEXT NOT NULL,
+                last_url_hash TEXT,
+                fetched_at TIMESTAMP,
+                PRIMARY KEY (ticker, source)
             )
         ''')
         
@@ -22757,9 +22975,14 @@ def init_digest_database():
                 finished_at TIMESTAMP,
                 run_type TEXT,
                 status TEXT DEFAULT 'running',
-                error TEXT
+                error TEXT,
+                section_timings TEXT
             )
         ''')
+        try:
+            cursor.execute('ALTER TABLE digest_runs ADD COLUMN section_timings TEXT')
+        except Exception:
+            pass  # Column already exists
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS news_items (
@@ -22772,9 +22995,43 @@ def init_digest_database():
                 url TEXT,
                 published_at TIMESTAMP,
                 inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                minhash TEXT,
+                duplicate_of TEXT,
                 UNIQUE(url_hash)
             )
         ''')
+        for column in ('minhash TEXT', 'duplicate_of TEXT'):
+            try:
+                cursor.execute(f'ALTER TABLE news_items ADD COLUMN {column}')
+            except Exception:
+                pass  # Column already exists
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_items_ticker_published ON news_items(ticker, published_at)')
+        
+        # Story -> every ticker whose feed carried it (news_items.ticker is only the first)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS news_item_tickers (
+                url_hash TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                PRIMARY KEY (url_hash, ticker)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_item_tickers_ticker ON news_item_tickers(ticker)')
+        cursor.execute('SELECT 1 FROM news_item_tickers LIMIT 1')
+        if not cursor.fetchone():
+            cursor.execute('''
+                INSERT INTO news_item_tickers (url_hash, ticker)
+                SELECT DISTINCT COALESCE(duplicate_of, url_hash), ticker FROM news_items
+            ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS news_feed_cursors (
+                ticker TEXT NOT NULL,
+                source TEXT NOT NULL,
+                last_url_hash TEXT,
+                fetched_at TIMESTAMP,
+                PRIMARY KEY (ticker, source)
+            )
+        ''')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ratings_snapshots (
@@ -22905,6 +23162,7 @@ def api_add_to_watchlist():
         
         conn.commit()
         conn.close()
+        _digest_cache.invalidate('digest:')  # Cached digest no longer matches the watchlist
         
         logger.info(f"✅ Added {ticker} to watchlist")
         return jsonify({'success': True, 'ticker': ticker, 'company_name': company_name})
@@ -22933,6 +23191,7 @@ def api_remove_from_watchlist(ticker):
         conn.close()
         
         if deleted > 0:
+            _digest_cache.invalidate('digest:')
             logger.info(f"✅ Removed {ticker} from watchlist")
             return jsonify({'success': True, 'ticker': ticker})
         else:
@@ -22969,6 +23228,31 @@ def normalize_headline(headline):
     return re.sub(r'[^a-zA-Z0-9]', '', headline.lower())
 
 
+# Upstream responses shared by the digest and the watchlist endpoints (digest_engine.py)
+from digest_engine import get_digest_engine, get_source_cache, Section
+_digest_cache = get_source_cache()
+
+NEWS_REFRESH_TTL = 300          # Per-ticker feed refresh interval (news_feed_cursors.fetched_at)
+MOVERS_CACHE_TTL = 60           # Watchlist movers (quotes themselves are shared via quote_service)
+POLITICIAN_TRADES_TTL = 3600    # Full House + Senate disclosure files (multi-MB, updated daily)
+DIGEST_CACHE_TTL = 300          # /api/digest without ?refresh=true
+MARKET_CONTEXT_TTL = {'ndx_expected_move': 300, 'spx_pe': 900, 'economic_calendar': 1800}
+
+
+def _get_watchlist_items():
+    """[{'ticker', 'company_name'}] for every watchlist item."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT ticker, company_name FROM watchlist_items')
+    rows = cursor.fetchall()
+    if rows and hasattr(rows[0], 'keys'):
+        watchlist = [dict(row) for row in rows]
+    else:
+        watchlist = [{'ticker': r[0], 'company_name': r[1]} for r in rows] if rows else []
+    conn.close()
+    return watchlist
+
+
 def fetch_news_for_ticker(ticker, company_name=None):
     """Fetch news from multiple sources for a ticker"""
     import requests
@@ -23054,58 +23338,38 @@ def fetch_news_for_ticker(ticker, company_name=None):
     return news_items
 
 
-def deduplicate_news(news_items):
-    """Deduplicate news items by URL hash and similar headlines"""
-    seen_hashes = set()
-    seen_headlines = set()
-    unique_items = []
-    
-    for item in news_items:
-        url_hash = item.get('url_hash', '')
-        headline_norm = normalize_headline(item.get('headline', ''))
-        
-        if url_hash in seen_hashes:
-            continue
-        if headline_norm in seen_headlines:
-            continue
-        
-        seen_hashes.add(url_hash)
-        seen_headlines.add(headline_norm)
-        unique_items.append(item)
-    
-    return unique_items
+# Persistent url / near-duplicate headline index over news_items (news_store.py)
+from news_store import get_news_store
+_news_store = get_news_store(get_db_connection, is_using_postgres, normalize_headline)
+
+
+def refresh_news_for_ticker(ticker, company_name=None):
+    """Store any new items from the ticker's feeds (no-op if fetched within NEWS_REFRESH_TTL)."""
+    try:
+        return _news_store.refresh(ticker, lambda: fetch_news_for_ticker(ticker, company_name),
+                                   NEWS_REFRESH_TTL)
+    except Exception as e:
+        logger.warning(f"News refresh failed for {ticker}: {e}")
+        return 0
+
+
+def collect_watchlist_news(watchlist):
+    """Deduplicated, newest-first news for the watchlist; stale tickers are refreshed concurrently."""
+    get_digest_engine().map(
+        lambda item: refresh_news_for_ticker(item['ticker'], item.get('company_name')),
+        watchlist, timeout=25)
+    return _news_store.query([item['ticker'] for item in watchlist], limit=50)
 
 
 @app.route('/api/watchlist/news', methods=['GET'])
 def api_get_watchlist_news():
     """Get aggregated news for all watchlist tickers"""
     try:
-        # Get watchlist
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT ticker, company_name FROM watchlist_items')
-        rows = cursor.fetchall()
-        if rows and hasattr(rows[0], 'keys'):
-            watchlist = [dict(row) for row in rows]
-        else:
-            watchlist = [{'ticker': r[0], 'company_name': r[1]} for r in rows] if rows else []
-        conn.close()
-        
+        watchlist = _get_watchlist_items()
         if not watchlist:
             return jsonify({'success': True, 'news': [], 'message': 'Watchlist is empty'})
         
-        all_news = []
-        for item in watchlist:
-            ticker_news = fetch_news_for_ticker(item['ticker'], item.get('company_name'))
-            all_news.extend(ticker_news)
-        
-        # Deduplicate
-        unique_news = deduplicate_news(all_news)
-        
-        # Sort by published date (newest first)
-        unique_news.sort(key=lambda x: x.get('published_at') or '', reverse=True)
-        
-        return jsonify({'success': True, 'news': unique_news[:50]})  # Limit to 50
+        return jsonify({'success': True, 'news': collect_watchlist_news(watchlist)})
     except Exception as e:
         logger.error(f"Error fetching watchlist news: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -23116,10 +23380,10 @@ def api_get_ticker_news(ticker):
     """Get news for a specific ticker"""
     try:
         ticker = ticker.upper().strip()
-        news = fetch_news_for_ticker(ticker)
-        unique_news = deduplicate_news(news)
+        refresh_news_for_ticker(ticker)
+        news = _news_store.query([ticker], limit=50)
         
-        return jsonify({'success': True, 'ticker': ticker, 'news': unique_news})
+        return jsonify({'success': True, 'ticker': ticker, 'news': news})
     except Exception as e:
         logger.error(f"Error fetching news for {ticker}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -23227,46 +23491,46 @@ def api_get_rating_changes():
 # MOVERS DETECTION (±2%)
 # ============================================================================
 
+def _compute_movers(watchlist):
+    """Watchlist tickers that moved ±2% or more, biggest first."""
+    # Fetch live prices
+    live_prices = fetch_live_stock_prices(watchlist)
+    
+    movers = []
+    for ticker in watchlist:
+        if ticker in live_prices:
+            price_data = live_prices[ticker]
+            price = price_data.get('price', 0)
+            change_pct = price_data.get('change_pct', 0)
+            
+            if abs(change_pct) >= 2.0:
+                movers.append({
+                    'ticker': ticker,
+                    'price': price,
+                    'change_pct': change_pct,
+                    'direction': 'up' if change_pct > 0 else 'down'
+                })
+    
+    # Sort by absolute change (biggest movers first)
+    movers.sort(key=lambda x: abs(x['change_pct']), reverse=True)
+    return movers
+
+
+def get_watchlist_movers(watchlist):
+    """_compute_movers through the shared cache, keyed by the watchlist contents."""
+    key = 'movers:' + ','.join(sorted(watchlist))
+    return _digest_cache.get_or_fetch(key, lambda: _compute_movers(watchlist), MOVERS_CACHE_TTL)
+
+
 @app.route('/api/watchlist/movers', methods=['GET'])
 def api_get_movers():
     """Get watchlist tickers that moved ±2% or more"""
     try:
-        # Get watchlist tickers
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT ticker FROM watchlist_items')
-        rows = cursor.fetchall()
-        if rows and hasattr(rows[0], 'keys'):
-            watchlist = [row['ticker'] for row in rows]
-        else:
-            watchlist = [r[0] for r in rows] if rows else []
-        conn.close()
-        
+        watchlist = [item['ticker'] for item in _get_watchlist_items()]
         if not watchlist:
             return jsonify({'success': True, 'movers': [], 'message': 'Watchlist is empty'})
         
-        # Fetch live prices
-        live_prices = fetch_live_stock_prices(watchlist)
-        
-        movers = []
-        for ticker in watchlist:
-            if ticker in live_prices:
-                price_data = live_prices[ticker]
-                price = price_data.get('price', 0)
-                change_pct = price_data.get('change_pct', 0)
-                
-                if abs(change_pct) >= 2.0:
-                    movers.append({
-                        'ticker': ticker,
-                        'price': price,
-                        'change_pct': change_pct,
-                        'direction': 'up' if change_pct > 0 else 'down'
-                    })
-        
-        # Sort by absolute change (biggest movers first)
-        movers.sort(key=lambda x: abs(x['change_pct']), reverse=True)
-        
-        return jsonify({'success': True, 'movers': movers})
+        return jsonify({'success': True, 'movers': get_watchlist_movers(watchlist)})
     except Exception as e:
         logger.error(f"Error getting movers: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -23350,7 +23614,9 @@ def get_politician_trades_for_watchlist():
     if not watchlist_tickers:
         return []
     
-    all_trades = fetch_politician_trades()
+    all_trades = _digest_cache.get_or_fetch('politician_trades', fetch_politician_trades, POLITICIAN_TRADES_TTL)
+    if not all_trades:
+        _digest_cache.invalidate('politician_trades')  # Both upstreams failed - retry on the next call
     
     # Filter to watchlist tickers only
     matching_trades = []
@@ -23533,20 +23799,26 @@ def fetch_economic_calendar():
     return events
 
 
+def get_market_context():
+    """NDX expected move, SPX P/E and economic calendar - fetched concurrently, each cached on its own TTL."""
+    sources = [('ndx_expected_move', fetch_ndx_expected_move),
+               ('spx_pe', fetch_spx_pe_ratio),
+               ('economic_calendar', fetch_economic_calendar)]
+    ndx, spx, econ = get_digest_engine().map(
+        lambda source: _digest_cache.get_or_fetch(source[0], source[1], MARKET_CONTEXT_TTL[source[0]]),
+        sources, timeout=20)
+    return {
+        'ndx_expected_move': ndx or {},
+        'spx_pe': spx or {},
+        'economic_calendar': econ or []
+    }
+
+
 @app.route('/api/market-context', methods=['GET'])
 def api_get_market_context():
     """Get market context data (NDX expected move, SPX P/E, economic calendar)"""
     try:
-        ndx = fetch_ndx_expected_move()
-        spx = fetch_spx_pe_ratio()
-        econ = fetch_economic_calendar()
-        
-        return jsonify({
-            'success': True,
-            'ndx_expected_move': ndx,
-            'spx_pe': spx,
-            'economic_calendar': econ
-        })
+        return jsonify({'success': True, **get_market_context()})
     except Exception as e:
         logger.error(f"Error getting market context: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -23596,61 +23868,38 @@ def generate_digest():
             'timestamp_cst': now.strftime('%Y-%m-%d %I:%M %p CT'),
         }
         
-        # 1. Movers (±2%)
-        try:
-            movers_resp = api_get_movers()
-            movers_data = movers_resp.get_json()
-            digest['movers'] = movers_data.get('movers', [])
-        except:
-            digest['movers'] = []
-        
-        # 2. News
-        try:
-            news_resp = api_get_watchlist_news()
-            news_data = news_resp.get_json()
-            digest['news'] = news_data.get('news', [])
-        except:
-            digest['news'] = []
-        
-        # 3. Rating changes
-        try:
-            digest['rating_changes'] = get_rating_changes_since_last_run()
-        except:
-            digest['rating_changes'] = []
-        
-        # 4. Politician trades
-        try:
-            digest['politician_trades'] = get_politician_trades_for_watchlist()
-        except:
-            digest['politician_trades'] = []
-        
-        # 5. Market context
-        try:
-            digest['market_context'] = {
-                'ndx_expected_move': fetch_ndx_expected_move(),
-                'spx_pe': fetch_spx_pe_ratio(),
-                'economic_calendar': fetch_economic_calendar()
-            }
-        except:
-            digest['market_context'] = {}
+        # Independent sections run concurrently; a slow or failing source only empties its own section
+        watchlist = _get_watchlist_items()
+        tickers = [item['ticker'] for item in watchlist]
+        sections, timings = get_digest_engine().run([
+            Section('movers', lambda: get_watchlist_movers(tickers) if tickers else [], timeout=20, default=[]),
+            Section('news', lambda: collect_watchlist_news(watchlist) if watchlist else [], timeout=30, default=[]),
+            Section('rating_changes', get_rating_changes_since_last_run, timeout=10, default=[]),
+            Section('politician_trades', get_politician_trades_for_watchlist, timeout=30, default=[]),
+            Section('market_context', get_market_context, timeout=25, default={}),
+        ])
+        digest.update(sections)
+        digest['section_timings'] = timings
         
         # Mark run as completed
         conn = get_db_connection()
         cursor = conn.cursor()
         if is_postgres:
             cursor.execute('''
-                UPDATE digest_runs SET status = 'completed', finished_at = CURRENT_TIMESTAMP
+                UPDATE digest_runs SET status = 'completed', finished_at = CURRENT_TIMESTAMP, section_timings = %s
                 WHERE run_id = %s
-            ''', (run_id,))
+            ''', (json.dumps(timings), run_id))
         else:
             cursor.execute('''
-                UPDATE digest_runs SET status = 'completed', finished_at = CURRENT_TIMESTAMP
+                UPDATE digest_runs SET status = 'completed', finished_at = CURRENT_TIMESTAMP, section_timings = ?
                 WHERE run_id = ?
-            ''', (run_id,))
+            ''', (json.dumps(timings), run_id))
         conn.commit()
         conn.close()
         
-        logger.info(f"✅ Digest run #{run_id} completed successfully")
+        _digest_cache.set('digest:latest', digest, DIGEST_CACHE_TTL)
+        section_ms = ', '.join(f"{name}={t['ms']}ms" for name, t in timings.items() if name != '_total')
+        logger.info(f"✅ Digest run #{run_id} completed in {timings['_total']['ms']}ms ({section_ms})")
         return digest
         
     except Exception as e:
@@ -23684,10 +23933,8 @@ def api_get_digest():
     try:
         force_refresh = request.args.get('refresh', '').lower() == 'true'
         
-        if force_refresh:
-            digest = generate_digest()
-        else:
-            # Return cached or generate new
+        digest = None if force_refresh else _digest_cache.get('digest:latest')
+        if digest is None:
             digest = generate_digest()
         
         return jsonify({'success': True, 'digest': digest})
@@ -23718,9 +23965,16 @@ def api_get_digest_runs():
                     'finished_at': r[2],
                     'run_type': r[3],
                     'status': r[4],
-                    'error': r[5] if len(r) > 5 else None
+                    'error': r[5] if len(r) > 5 else None,
+                    'section_timings': r[6] if len(r) > 6 else None
                 })
         conn.close()
+        for run in runs:
+            if isinstance(run.get('section_timings'), str):
+                try:
+                    run['section_timings'] = json.loads(run['section_timings'])
+                except ValueError:
+                    pass
         
         return jsonify({'success': True, 'runs': runs})
     except Exception as e:
@@ -23797,6 +24051,54 @@ except Exception as e:
 # ============================================================================
 
 
+def _load_recorder_counters(cursor, recorder_ids):
+    """Rebuild recorder_counters entries from the DB (one grouped pass per table)."""
+    placeholder = '%s' if is_using_postgres() else '?'
+    in_list = ','.join([placeholder] * len(recorder_ids))
+    ids = tuple(recorder_ids)
+    counters = {rid: {} for rid in recorder_ids}
+
+    cursor.execute(f'''
+        SELECT recorder_id,
+               SUM(CASE WHEN status = 'open' THEN 1 ELSE 0 END) as open_trades,
+               SUM(CASE WHEN status = 'closed' THEN 1 ELSE 0 END) as closed_trades
+        FROM recorded_trades
+        WHERE recorder_id IN ({in_list})
+        GROUP BY recorder_id
+    ''', ids)
+    for row in cursor.fetchall():
+        counters[row['recorder_id']].update(open_trades=int(row['open_trades'] or 0),
+                                            closed_trades=int(row['closed_trades'] or 0))
+
+    cursor.execute(f'SELECT id, signal_count FROM recorders WHERE id IN ({in_list})', ids)
+    for row in cursor.fetchall():
+        counters[row['id']]['signal_count'] = int(row['signal_count'] or 0)
+
+    cursor.execute(f'''
+        SELECT rs.recorder_id, rs.action, rs.created_at
+        FROM recorded_signals rs
+        JOIN (
+            SELECT recorder_id, MAX(created_at) as last_at
+            FROM recorded_signals
+            WHERE recorder_id IN ({in_list})
+            GROUP BY recorder_id
+        ) latest ON rs.recorder_id = latest.recorder_id AND rs.created_at = latest.last_at
+    ''', ids)
+    for row in cursor.fetchall():
+        created_at = row['created_at']
+        if isinstance(created_at, str):
+            try:
+                created_at = datetime.fromisoformat(created_at.replace('Z', ''))
+            except ValueError:
+                created_at = None
+        last_at = None
+        if isinstance(created_at, datetime):
+            # Naive timestamps are stored as UTC
+            last_at = created_at.timestamp() if created_at.tzinfo else (created_at - datetime(1970, 1, 1)).total_seconds()
+        counters[row['recorder_id']].update(last_signal=row['action'], last_signal_at=last_at)
+    return counters
+
+
 @app.route('/api/control-center/stats', methods=['GET'])
 def api_control_center_stats():
     """Get live recorder stats for control center (real-time updates)
@@ -23804,6 +24106,7 @@ def api_control_center_stats():
     FIXED: Now uses recorder_positions table (same as Live Positions section)
     and TradingView market data cache for consistent P&L calculations.
     Also filters by current user's traders to match /api/traders behavior.
+    Trade/signal counters come from recorder_counters (no trade-history scan).
     """
     try:
         # Get current user for filtering (same as /api/traders)
@@ -23827,18 +24130,13 @@ def api_control_center_stats():
                         r.name,
                         r.symbol,
                         r.recording_enabled,
-                        r.signal_count,
                         BOOL_OR(COALESCE(t.time_filter_1_enabled, r.time_filter_1_enabled)) as time_filter_1_enabled,
                         MAX(COALESCE(NULLIF(t.time_filter_1_start, ''), r.time_filter_1_start)) as time_filter_1_start,
                         MAX(COALESCE(NULLIF(t.time_filter_1_stop, ''), r.time_filter_1_stop)) as time_filter_1_stop,
                         BOOL_OR(COALESCE(t.time_filter_2_enabled, r.time_filter_2_enabled)) as time_filter_2_enabled,
                         MAX(COALESCE(NULLIF(t.time_filter_2_start, ''), r.time_filter_2_start)) as time_filter_2_start,
-                        MAX(COALESCE(NULLIF(t.time_filter_2_stop, ''), r.time_filter_2_stop)) as time_filter_2_stop,
-                        COUNT(CASE WHEN rt.status = 'open' THEN 1 END) as open_trades,
-                        COUNT(CASE WHEN rt.status = 'closed' THEN 1 END) as closed_trades,
-                        (SELECT action FROM recorded_signals WHERE recorder_id = r.id ORDER BY created_at DESC LIMIT 1) as last_signal
+                        MAX(COALESCE(NULLIF(t.time_filter_2_stop, ''), r.time_filter_2_stop)) as time_filter_2_stop
                     FROM recorders r
-                    LEFT JOIN recorded_trades rt ON r.id = rt.recorder_id
                     INNER JOIN traders t ON r.id = t.recorder_id
                     LEFT JOIN accounts a ON t.account_id = a.id
                     WHERE (t.user_id = %s OR a.user_id = %s)
@@ -23852,18 +24150,13 @@ def api_control_center_stats():
                         r.name,
                         r.symbol,
                         r.recording_enabled,
-                        r.signal_count,
                         MAX(COALESCE(t.time_filter_1_enabled, r.time_filter_1_enabled)) as time_filter_1_enabled,
                         MAX(COALESCE(NULLIF(t.time_filter_1_start, ''), r.time_filter_1_start)) as time_filter_1_start,
                         MAX(COALESCE(NULLIF(t.time_filter_1_stop, ''), r.time_filter_1_stop)) as time_filter_1_stop,
                         MAX(COALESCE(t.time_filter_2_enabled, r.time_filter_2_enabled)) as time_filter_2_enabled,
                         MAX(COALESCE(NULLIF(t.time_filter_2_start, ''), r.time_filter_2_start)) as time_filter_2_start,
-                        MAX(COALESCE(NULLIF(t.time_filter_2_stop, ''), r.time_filter_2_stop)) as time_filter_2_stop,
-                        COUNT(CASE WHEN rt.status = 'open' THEN 1 END) as open_trades,
-                        COUNT(CASE WHEN rt.status = 'closed' THEN 1 END) as closed_trades,
-                        (SELECT action FROM recorded_signals WHERE recorder_id = r.id ORDER BY created_at DESC LIMIT 1) as last_signal
+                        MAX(COALESCE(NULLIF(t.time_filter_2_stop, ''), r.time_filter_2_stop)) as time_filter_2_stop
                     FROM recorders r
-                    LEFT JOIN recorded_trades rt ON r.id = rt.recorder_id
                     INNER JOIN traders t ON r.id = t.recorder_id
                     LEFT JOIN accounts a ON t.account_id = a.id
                     WHERE (t.user_id = ? OR a.user_id = ?)
@@ -23882,23 +24175,20 @@ def api_control_center_stats():
                     r.name,
                     r.symbol,
                     r.recording_enabled,
-                    r.signal_count,
                     r.time_filter_1_enabled,
                     r.time_filter_1_start,
                     r.time_filter_1_stop,
                     r.time_filter_2_enabled,
                     r.time_filter_2_start,
-                    r.time_filter_2_stop,
-                    COUNT(CASE WHEN rt.status = 'open' THEN 1 END) as open_trades,
-                    COUNT(CASE WHEN rt.status = 'closed' THEN 1 END) as closed_trades,
-                    (SELECT action FROM recorded_signals WHERE recorder_id = r.id ORDER BY created_at DESC LIMIT 1) as last_signal
+                    r.time_filter_2_stop
                 FROM recorders r
-                LEFT JOIN recorded_trades rt ON r.id = rt.recorder_id
-                GROUP BY r.id
                 ORDER BY r.name
             ''')
         
         recorder_rows = cursor.fetchall()
+        counters_by_recorder = recorder_counters.get_counters(
+            [row['id'] for row in recorder_rows],
+            lambda missing: _load_recorder_counters(cursor, missing))
         
         # Get list of recorder IDs for current user (for filtering positions)
         user_recorder_ids = []
@@ -24022,6 +24312,8 @@ def api_control_center_stats():
             if unrealized_pnl != 0:
                 logger.debug(f"📊 Control Center Stats: Recorder {rid} ({row['name']}) | Total P&L: ${unrealized_pnl:.2f} | Positions: {len(positions_list)}")
             
+            counters = counters_by_recorder.get(rid, {})
+            last_signal_at = counters.get('last_signal_at')
             recorders.append({
                 'id': rid,
                 'name': row['name'],
@@ -24029,10 +24321,11 @@ def api_control_center_stats():
                 'enabled': bool(row['recording_enabled']),
                 'pnl': round(unrealized_pnl, 2),  # Round to match WebSocket format
                 'has_open_position': has_open_position,
-                'open_trades': row['open_trades'] or 0,
-                'closed_trades': row['closed_trades'] or 0,
-                'signal_count': row['signal_count'] or 0,
-                'last_signal': row['last_signal'],
+                'open_trades': counters.get('open_trades', 0),
+                'closed_trades': counters.get('closed_trades', 0),
+                'signal_count': counters.get('signal_count', 0),
+                'last_signal': counters.get('last_signal'),
+                'last_signal_at': datetime.utcfromtimestamp(last_signal_at).isoformat() + 'Z' if last_signal_at else None,
                 'open_trade_details': positions_list if has_open_position else [],
                 'time_filter_1_enabled': bool(row['time_filter_1_enabled']),
                 'time_filter_1_start': row['time_filter_1_start'] or '',
@@ -24215,6 +24508,7 @@ def api_control_center_clear_all():
         # Delete all recorded trades
         cursor.execute('DELETE FROM recorded_trades')
         trades_deleted = cursor.rowcount
+        recorder_counters.invalidate_all()
         
         # Delete all recorder positions
         cursor.execute('DELETE FROM recorder_positions')
@@ -24300,6 +24594,7 @@ def api_control_center_toggle_all():
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_all()
         
         action = 'enabled' if enabled else 'disabled'
         
@@ -24372,6 +24667,7 @@ def api_toggle_recorder_traders(recorder_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_recorder(recorder_id)
         
         action = 'enabled' if enabled else 'disabled'
         logger.info(f"📊 User {user_id} {action.upper()} {updated_count} trader(s) for recorder '{recorder_name}'")
@@ -24439,6 +24735,7 @@ def api_toggle_my_traders(recorder_id):
         
         conn.commit()
         conn.close()
+        _config_registry.invalidate_traders(recorder_id)
         
         action = 'enabled' if enabled else 'disabled'
         logger.info(f"📊 {action.upper()} {updated_count} trader(s) for '{recorder_name}' (user: {current_user_id})")
@@ -24521,6 +24818,7 @@ def api_close_recorder_positions(recorder_id):
         
         conn.commit()
         conn.close()
+        recorder_counters.trade_closed(recorder_id, closed_count)
         
         logger.info(f"📊 Closed {closed_count} position(s) for '{recorder['name']}': Total PnL ${total_pnl:.2f}")
         
@@ -24899,6 +25197,8 @@ def manual_trade():
                     """, (token_container['access_token'], token_container['refresh_token'], new_expiry, account_id))
                     save_conn.commit()
                     save_conn.close()
+                    _config_registry.invalidate_account(account_id)
+                    _token_manager.store(account_id, token_container['access_token'], new_expiry)
                     logger.info(f"✅ Refreshed and saved tokens for account {account_id}")
                 except Exception as save_err:
                     logger.warning(f"Token save error (non-fatal): {save_err}")
@@ -24917,8 +25217,6 @@ def manual_trade():
         # === ProjectX execution path ===
         if is_projectx:
             try:
-                from phantom_scraper.projectx_integration import ProjectXIntegration
-
                 px_username = account.get('projectx_username') or account.get('username') or ''
                 px_password = account.get('password') or ''
                 px_api_key_val = account.get('projectx_api_key') or ''
@@ -24928,43 +25226,19 @@ def manual_trade():
                     return jsonify({'success': False, 'error': 'No ProjectX username. Please reconnect.'}), 400
 
                 async def place_projectx_trade():
-                    async with ProjectXIntegration(demo=demo, prop_firm=px_prop_firm) as projectx:
-                        login_result = await projectx.login(
-                            px_username,
-                            password=px_password if px_password else None,
-                            api_key=px_api_key_val if px_api_key_val else None
-                        )
+                    async with _broker_sessions.projectx(px_username, password=px_password or None, api_key=px_api_key_val or None,
+                                                         demo=demo, prop_firm=px_prop_firm) as (projectx, login_result):
                         if not login_result.get('success'):
                             return {'success': False, 'error': login_result.get('error', 'ProjectX login failed')}
 
-                        # Find contract for symbol
+                        # Find contract for symbol (resolution cached per firm/environment/symbol)
                         symbol_root = extract_symbol_root(symbol)
                         symbol_upper = symbol.strip().upper() if symbol else ''
-                        contract_id = None
-                        contract_match_name = None
-
-                        # Try Contract/search first (works on TopStepX and all ProjectX firms)
-                        contracts = await projectx.search_contracts(symbol_root)
-                        if not contracts:
-                            # Fallback: try Contract/available (older ProjectX endpoint)
-                            contracts = await projectx.get_available_contracts()
-
-                        logger.info(f"ProjectX manual trade: looking for symbol_root='{symbol_root}' full='{symbol_upper}' in {len(contracts)} contracts")
-                        for c in contracts:
-                            c_name = (c.get('name') or c.get('symbol') or '').upper()
-                            c_id_str = str(c.get('id') or '').upper()
-                            # Strategy 1: Full Tradovate symbol in contract name/id (MNQH6 in CON.F.US.MNQH6.H26)
-                            if symbol_upper and (symbol_upper in c_name or symbol_upper in c_id_str):
-                                contract_id = c.get('id')
-                                contract_match_name = c_name or c_id_str
-                                break
-                            # Strategy 2: Root symbol match (MNQ in contract)
-                            if symbol_root and (symbol_root in c_name or symbol_root in c_id_str):
-                                contract_id = c.get('id')
-                                contract_match_name = c_name or c_id_str
-                                break
+                        contract, contracts = await _broker_sessions.projectx_contract(projectx, symbol, symbol_root)
+                        contract_id = contract.get('id') if contract else None
 
                         if contract_id:
+                            contract_match_name = (contract.get('name') or contract.get('symbol') or str(contract_id)).upper()
                             logger.info(f"ProjectX contract matched: {contract_match_name} (ID: {contract_id})")
                         else:
                             # Log all available contracts for debugging
@@ -25046,12 +25320,7 @@ def manual_trade():
                                 return {'success': True, 'message': f'{px_side} {quantity} {symbol} on ProjectX', 'order': result}
                             return {'success': False, 'error': result.get('error', 'Order placement failed'), 'details': result}
 
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(place_projectx_trade())
-                finally:
-                    loop.close()
+                result = _broker_sessions.run(place_projectx_trade())
 
                 if result.get('success'):
                     # Propagate to followers if this is a leader account (fire-and-forget)
@@ -26396,8 +26665,20 @@ def api_test_push_notification():
 # COMMUNITY CHAT - Public chat room for all users
 # ============================================================================
 
-# Store for tracking online users (in-memory, resets on server restart)
-_chat_online_users = {}  # user_id -> last_heartbeat_time
+# Ring buffer, batched writer and presence for the chat room (see chat_hub.py)
+_chat_hub = ChatHub(get_db_connection, is_using_postgres)
+CHAT_NAMESPACE = '/chat'
+
+def _on_remote_chat_event(event, msg):
+    """Messages / presence changes from another worker: emit them to this worker's sockets."""
+    if _sio_message_queue:
+        return  # socketio.emit already reached every worker through the message queue
+    if event == 'message':
+        socketio.emit('chat_message', msg, namespace=CHAT_NAMESPACE)
+    else:
+        socketio.emit('chat_presence', {'online_count': _chat_hub.online_count()}, namespace=CHAT_NAMESPACE)
+
+_chat_hub.set_listener(_on_remote_chat_event)
 
 def ensure_chat_table():
     """Ensure the chat_messages table exists."""
@@ -26466,58 +26747,41 @@ def get_chat_messages():
     limit = min(limit, 500)  # Cap at 500 messages
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        placeholder = '%s' if is_using_postgres() else '?'
-        
-        if after_id > 0:
-            cursor.execute(f'''
-                SELECT id, user_id, username, display_name, is_admin, message, created_at 
-                FROM chat_messages 
-                WHERE id > {placeholder}
-                ORDER BY id ASC
-                LIMIT {placeholder}
-            ''', (after_id, limit))
-        else:
-            # Get last N messages
-            cursor.execute(f'''
-                SELECT id, user_id, username, display_name, is_admin, message, created_at 
-                FROM chat_messages 
-                ORDER BY id DESC
-                LIMIT {placeholder}
-            ''', (limit,))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        messages = []
-        for row in rows:
-            if hasattr(row, 'keys'):
-                msg = dict(row)
+        messages = _chat_hub.recent(limit, after_id)
+        if messages is None:
+            # Older than the ring buffer - read the table
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            placeholder = '%s' if is_using_postgres() else '?'
+            
+            if after_id > 0:
+                cursor.execute(f'''
+                    SELECT id, user_id, username, display_name, is_admin, message, created_at 
+                    FROM chat_messages 
+                    WHERE id > {placeholder}
+                    ORDER BY id ASC
+                    LIMIT {placeholder}
+                ''', (after_id, limit))
             else:
-                msg = {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'username': row[2],
-                    'display_name': row[3],
-                    'is_admin': bool(row[4]),
-                    'message': row[5],
-                    'created_at': str(row[6])
-                }
-            messages.append(msg)
-        
-        # Reverse if we fetched in DESC order (initial load)
-        if after_id == 0:
-            messages.reverse()
-        
-        # Count online users (heartbeat within last 60 seconds)
-        now = time.time()
-        online_count = sum(1 for ts in _chat_online_users.values() if now - ts < 60)
+                # Get last N messages
+                cursor.execute(f'''
+                    SELECT id, user_id, username, display_name, is_admin, message, created_at 
+                    FROM chat_messages 
+                    ORDER BY id DESC
+                    LIMIT {placeholder}
+                ''', (limit,))
+            
+            messages = [message_from_row(row) for row in cursor.fetchall()]
+            conn.close()
+            
+            # Reverse if we fetched in DESC order (initial load)
+            if after_id == 0:
+                messages.reverse()
         
         return jsonify({
             'success': True,
             'messages': messages,
-            'online_count': max(online_count, 1)  # At least 1 (current user)
+            'online_count': max(_chat_hub.online_count(), 1)  # At least 1 (current user)
         })
     except Exception as e:
         logger.error(f"Error getting chat messages: {e}")
@@ -26537,38 +26801,15 @@ def send_chat_message():
     data = request.get_json()
     message = data.get('message', '').strip() if data else ''
     
-    if not message:
-        return jsonify({'success': False, 'error': 'Message is required'}), 400
-    
-    if len(message) > 5000:
-        return jsonify({'success': False, 'error': 'Message too long (max 5000 characters)'}), 400
+    error = _validate_chat_message(message)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        placeholder = '%s' if is_using_postgres() else '?'
-        
-        cursor.execute(f'''
-            INSERT INTO chat_messages (user_id, username, display_name, is_admin, message)
-            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-        ''', (user.id, user.username, user.display_name, user.is_admin, message))
-        
-        conn.commit()
-        
-        # Get the inserted message ID
-        if is_using_postgres():
-            cursor.execute('SELECT lastval()')
-            message_id = cursor.fetchone()[0]
-        else:
-            message_id = cursor.lastrowid
-        
-        conn.close()
-        
-        logger.info(f"💬 Chat message from {user.username}: {message[:50]}...")
-        
+        msg = _post_chat_message(user, message)
         return jsonify({
             'success': True,
-            'message_id': message_id
+            'message_id': msg['id']
         })
     except Exception as e:
         logger.error(f"Error sending chat message: {e}")
@@ -26583,11 +26824,84 @@ def chat_heartbeat():
     
     user = get_current_user()
     if user:
-        _chat_online_users[user.id] = time.time()
+        _chat_hub.heartbeat(user.id)
     
     return jsonify({'success': True})
 
 
+def _validate_chat_message(message):
+    """Error string for an invalid chat message, else None."""
+    if not message:
+        return 'Message is required'
+    if len(message) > 5000:
+        return 'Message too long (max 5000 characters)'
+    return None
+
+
+def _post_chat_message(user, message):
+    """Buffer a message for the batched writer and push it to every chat socket."""
+    msg = _chat_hub.post(user.id, user.username, user.display_name, user.is_admin, message)
+    socketio.emit('chat_message', msg, namespace=CHAT_NAMESPACE)
+    logger.info(f"💬 Chat message from {user.username}: {message[:50]}...")
+    return msg
+
+
+# Chat over Socket.IO: its own namespace so the global connect/disconnect
+# handlers are untouched. Idle tabs hold a socket and cost no queries.
+
+@socketio.on('connect', namespace=CHAT_NAMESPACE)
+def chat_socket_connect():
+    """Join the chat: send recent history and broadcast presence."""
+    if USER_AUTH_AVAILABLE and not is_logged_in():
+        return False
+    user = get_current_user()
+    if not user:
+        return False
+    online_count = _chat_hub.join(request.sid, user.id)
+    emit('chat_history', {'messages': _chat_hub.recent(100) or [], 'online_count': online_count})
+    socketio.emit('chat_presence', {'online_count': online_count}, namespace=CHAT_NAMESPACE)
+
+
+@socketio.on('disconnect', namespace=CHAT_NAMESPACE)
+def chat_socket_disconnect():
+    online_count = _chat_hub.leave(request.sid)
+    socketio.emit('chat_presence', {'online_count': online_count}, namespace=CHAT_NAMESPACE)
+
+
+@socketio.on('chat_sync', namespace=CHAT_NAMESPACE)
+def chat_socket_sync(data):
+    """Messages after the client's last id (after a reconnect)."""
+    after_id = int((data or {}).get('after') or 0)
+    messages = _chat_hub.recent(500, after_id)
+    return {'messages': messages or [], 'complete': messages is not None}
+
+
+@socketio.on('chat_send', namespace=CHAT_NAMESPACE)
+def chat_socket_send(data):
+    """Send a message; the ack carries the id, the message itself arrives as chat_message."""
+    user = get_current_user()
+    if not user:
+        return {'success': False, 'error': 'User not found'}
+    message = ((data or {}).get('message') or '').strip()
+    error = _validate_chat_message(message)
+    if error:
+        return {'success': False, 'error': error}
+    try:
+        msg = _post_chat_message(user, message)
+        return {'success': True, 'message_id': msg['id']}
+    except Exception as e:
+        logger.error(f"Error sending chat message: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+@app.route('/api/chat/stats', methods=['GET'])
+def chat_stats():
+    """Chat hub counters (ring size, pending writes, batch flushes, sockets)."""
+    if USER_AUTH_AVAILABLE and not is_logged_in():
+        return jsonify({'success': False, 'error': 'Not logged in'}), 401
+    return jsonify({'success': True, **_chat_hub.get_stats(), 'online_count': _chat_hub.online_count()})
+
+
 @app.route('/api/user/theme', methods=['GET', 'POST'])
 def api_user_theme():
     """Get or update user's theme preference (dark/light mode)."""
@@ -27709,6 +28023,103 @@ def api_pnl_drawdown_chart():
         traceback.print_exc()
         return jsonify({'chart_data': []})
 
+# source -> (table, time column) for /api/dashboard/chart-series
+_CHART_SERIES_SOURCES = {
+    'live': ('recorded_trades', 'exit_time'),
+    'paper': ('paper_trades', 'closed_at'),
+}
+
+@app.route('/api/dashboard/chart-series', methods=['GET'])
+def api_dashboard_chart_series():
+    """
+    Columnar equity + drawdown series, downsampled server-side to the chart width.
+
+    Query params: source=live|paper, strategy_id, symbol, start_date, end_date (YYYY-MM-DD),
+    width (pixels, default 800), method=lttb|minmax, format=json|binary.
+    Supports If-None-Match: the ETag changes only when a matching trade is added/removed.
+    """
+    try:
+        source = request.args.get('source', 'live')
+        if source not in _CHART_SERIES_SOURCES:
+            return jsonify({'error': f'Unknown source: {source}'}), 400
+        table, time_col = _CHART_SERIES_SOURCES[source]
+        strategy_id = request.args.get('strategy_id', type=int)
+        symbol = request.args.get('symbol')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        width = request.args.get('width', default=800, type=int)
+        method = 'minmax' if request.args.get('method') == 'minmax' else 'lttb'
+        fmt = 'binary' if request.args.get('format') == 'binary' else 'json'
+
+        ph = '%s' if is_using_postgres() else '?'
+        symbol_col = 'ticker' if source == 'live' else 'symbol'
+        where_clauses = ["status = 'closed'", f"{time_col} IS NOT NULL", "pnl IS NOT NULL"]
+        params = []
+        if strategy_id:
+            where_clauses.append(f'recorder_id = {ph}')
+            params.append(strategy_id)
+        if symbol:
+            where_clauses.append(f'{symbol_col} = {ph}')
+            params.append(symbol)
+        if start_date:
+            where_clauses.append(f'DATE({time_col}) >= {ph}')
+            params.append(start_date)
+        if end_date:
+            where_clauses.append(f'DATE({time_col}) <= {ph}')
+            params.append(end_date)
+        where_sql = ' AND '.join(where_clauses)
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            # Data version: latest trade id + count (catches inserts and deletes)
+            cursor.execute(f'SELECT MAX(id), COUNT(*) FROM {table} WHERE {where_sql}', tuple(params))
+            row = cursor.fetchone()
+            latest_id, trade_count = (row[0], row[1]) if row else (None, 0)
+            etag = chart_series.make_etag(source, strategy_id, symbol, start_date, end_date,
+                                          latest_id, trade_count)
+            cache_key = (etag, width, method)
+            if request.if_none_match.contains_weak(etag):
+                conn.close()
+                conn = None
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            cached = chart_series.get_series_cache().get(cache_key)
+            if cached is None:
+                cursor.execute(f'''
+                    SELECT {time_col}, pnl FROM {table}
+                    WHERE {where_sql}
+                    ORDER BY {time_col} ASC, id ASC
+                ''', tuple(params))
+                full = chart_series.build_series(cursor.fetchall())
+                cached = (chart_series.downsample(full, width, method), chart_series.summary(full))
+                chart_series.get_series_cache().put(cache_key, cached)
+        finally:
+            if conn is not None:
+                conn.close()
+
+        series, stats = cached
+        if fmt == 'binary':
+            response = Response(chart_series.encode_binary(series), mimetype='application/octet-stream')
+        else:
+            response = jsonify({
+                'source': source,
+                'method': method,
+                'summary': stats,
+                'series': chart_series.to_columns(series),
+            })
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Error building chart series: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Failed to build chart series'}), 500
+
 @app.route('/api/dashboard/metrics', methods=['GET'])
 def api_dashboard_metrics():
     """Get metric cards data from recorded trades"""
@@ -28087,10 +28498,24 @@ _TV_HEADER_MAP = {
 }
 
 
-def _parse_xlsx_trades(raw_bytes):
-    """Parse 'List of trades' sheet from TradingView XLSX export. Returns (rows, symbol, strategy_name)."""
+# Trade row fields in tv_backtest_trades column order (trade_num is the row index)
+_BACKTEST_TRADE_FIELDS = ('type', 'signal', 'date_time', 'price', 'contracts',
+                          'profit', 'cumulative_profit', 'run_up', 'drawdown')
+_BACKTEST_NUMERIC_FIELDS = ('price', 'contracts', 'profit', 'cumulative_profit', 'run_up', 'drawdown')
+_BACKTEST_INSERT_CHUNK = 2000
+BACKTEST_MAX_UPLOAD_MB = int(os.environ.get('BACKTEST_MAX_UPLOAD_MB', '50'))
+
+
+def _parse_xlsx_trades(source):
+    """
+    Open the 'List of trades' sheet of a TradingView XLSX export (path or bytes).
+    Returns (rows_iter, symbol, strategy_name); rows are streamed from the
+    read-only workbook, which is closed once the iterator is exhausted.
+    """
     import openpyxl
-    wb = openpyxl.load_workbook(io.BytesIO(raw_bytes), read_only=True, data_only=True)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
 
     # --- Extract symbol and strategy name from Properties sheet ---
     symbol = None
@@ -28132,30 +28557,267 @@ def _parse_xlsx_trades(raw_bytes):
         wb.close()
         raise ValueError('XLSX "List of trades" sheet missing required "Type" column')
 
-    rows = []
-    for row in trades_sheet.iter_rows(min_row=2, values_only=True):
-        if row[0] is None:
+    def _rows():
+        try:
+            for row in trades_sheet.iter_rows(min_row=2, values_only=True):
+                if row[0] is None:
+                    continue
+                mapped = {}
+                for idx, internal_key in col_map.items():
+                    val = row[idx] if idx < len(row) else None
+                    # Convert datetime objects to string
+                    if hasattr(val, 'strftime'):
+                        val = val.strftime('%Y-%m-%d %H:%M')
+                    mapped[internal_key] = val
+                yield mapped
+        finally:
+            wb.close()
+
+    return _rows(), symbol, strategy_name
+
+
+def _iter_csv_trades(path):
+    """Stream mapped rows from a TradingView CSV export on disk."""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        reader = csv.DictReader(f)
+
+        # Map raw headers to internal keys
+        if not reader.fieldnames:
+            raise ValueError('CSV has no headers')
+
+        col_map = {}
+        for raw_h in reader.fieldnames:
+            norm = _normalize_header(raw_h)
+            if norm in _TV_HEADER_MAP:
+                col_map[raw_h] = _TV_HEADER_MAP[norm]
+
+        if 'type' not in col_map.values():
+            raise ValueError('CSV missing required "Type" column')
+
+        for row in reader:
+            yield {internal_key: row.get(raw_h, '') for raw_h, internal_key in col_map.items()}
+
+
+def _rows_to_backtest_columns(rows):
+    """Incrementally parse mapped rows into columnar lists (strings stripped, numbers parsed once)."""
+    cols = {f: [] for f in _BACKTEST_TRADE_FIELDS}
+    text_cols = [(f, cols[f]) for f in ('type', 'signal', 'date_time')]
+    num_cols = [(f, cols[f]) for f in _BACKTEST_NUMERIC_FIELDS]
+    for r in rows:
+        for f, col in text_cols:
+            v = r.get(f)
+            col.append(str(v).strip() if v is not None else '')
+        for f, col in num_cols:
+            col.append(_parse_tv_number(r.get(f)))
+    return cols
+
+
+def _compute_backtest_metrics(cols):
+    """
+    Summary metrics plus the chart-data and daily-pnl series, computed in
+    whole-column passes over the parsed trade columns.
+    """
+    from itertools import accumulate, compress
+    from datetime import datetime as _dt
+
+    types = [t.lower() for t in cols['type']]
+    signals = [s.lower() for s in cols['signal']]
+    profits = cols['profit']
+    cum_all = cols['cumulative_profit']
+    dates = cols['date_time']
+
+    # XLSX uses "exit long"/"exit short"/"entry long"/"entry short"; CSV uses plain "exit"/"entry"
+    exit_mask = [t.startswith('exit') for t in types]
+    exit_profits = list(compress(profits, exit_mask))
+    exit_cum = list(compress(cum_all, exit_mask))
+    exit_dates = [d for d in compress(dates, exit_mask) if d]
+
+    # Long/short counts from entry rows (XLSX: type="Entry long" or signal="L")
+    long_count = short_count = 0
+    for t, sig in zip(types, signals):
+        if not t.startswith('entry'):
+            continue
+        if 'long' in t or 'long' in sig or sig == 'l':
+            long_count += 1
+        elif 'short' in t or 'short' in sig or sig == 's':
+            short_count += 1
+
+    win_profits = [p for p in exit_profits if p >= 0]
+    loss_profits = [p for p in exit_profits if p < 0]
+    wins, losses = len(win_profits), len(loss_profits)
+    gross_profit = sum(win_profits)
+    gross_loss = -sum(loss_profits)
+    total_trades = wins + losses
+    net_pnl = gross_profit - gross_loss
+
+    # Max drawdown from cumulative profit peak-to-trough (running peak starts at 0)
+    peaks = list(accumulate(exit_cum, max, initial=0.0))[1:]
+    max_dd = max([pk - cp for pk, cp in zip(peaks, exit_cum)] + [0.0])
+
+    metrics = {
+        'total_trades': total_trades,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': (wins / total_trades * 100) if total_trades else 0.0,
+        'profit_factor': (gross_profit / gross_loss) if gross_loss > 0 else (999.99 if gross_profit > 0 else 0.0),
+        'net_pnl': net_pnl,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'max_drawdown': max_dd,
+        'avg_win': (gross_profit / wins) if wins else 0.0,
+        'avg_loss': (gross_loss / losses) if losses else 0.0,
+        'largest_win': max(win_profits, default=0.0),
+        'largest_loss': min(loss_profits, default=0.0),
+        'avg_trade': (net_pnl / total_trades) if total_trades else 0.0,
+        'long_trades': long_count,
+        'short_trades': short_count,
+        'start_date': exit_dates[0] if exit_dates else None,
+        'end_date': exit_dates[-1] if exit_dates else None,
+    }
+
+    # Chart series: last cumulative P&L + worst trade drawdown per calendar day
+    day_last_cum, day_peak_dd = {}, {}
+    for idx, (raw_dt, cum_p, dd) in enumerate(zip(dates, cum_all, cols['drawdown'])):
+        label = ''
+        if raw_dt:
+            try:
+                label = _dt.strptime(raw_dt[:16], '%Y-%m-%d %H:%M').strftime('%b %d')
+            except Exception:
+                label = raw_dt[:10]
+        if not label:
+            label = f'Trade {idx + 1}'
+        day_last_cum[label] = cum_p
+        day_peak_dd[label] = max(day_peak_dd.get(label, 0.0), abs(dd))
+    chart_series = {
+        'labels': list(day_last_cum.keys()),
+        'profit': [round(v, 2) for v in day_last_cum.values()],
+        'drawdown': [round(day_peak_dd[k], 2) for k in day_last_cum],
+    }
+
+    # Daily P&L buckets for the calendar (newest first)
+    daily = {}
+    for raw_dt, profit in zip(dates, profits):
+        if len(raw_dt) < 10:
             continue
-        mapped = {}
-        for idx, internal_key in col_map.items():
-            val = row[idx] if idx < len(row) else None
-            # Convert datetime objects to string
-            if hasattr(val, 'strftime'):
-                val = val.strftime('%Y-%m-%d %H:%M')
-            mapped[internal_key] = val
-        rows.append(mapped)
+        d = daily.setdefault(raw_dt[:10], [0.0, 0, 0, 0])  # pnl, count, winners, losers
+        d[0] += profit
+        d[1] += 1
+        if profit > 0:
+            d[2] += 1
+        elif profit < 0:
+            d[3] += 1
+    daily_pnl_series = [
+        {
+            'date': date_str,
+            'trade_count': d[1],
+            'pnl': round(d[0], 2),
+            'winners': d[2],
+            'losers': d[3],
+            'win_rate': round((d[2] / d[1] * 100), 1) if d[1] else 0,
+        }
+        for date_str, d in sorted(daily.items(), reverse=True)
+    ]
+
+    return metrics, chart_series, daily_pnl_series
+
+
+def _set_backtest_progress(import_id, progress, status=None, error_message=None):
+    """Persist job progress so any worker can answer /api/backtest/<id>/status."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if status:
+            cursor.execute('UPDATE tv_backtest_imports SET progress = ?, status = ?, error_message = ? WHERE id = ?',
+                           (progress, status, error_message, import_id))
+        else:
+            cursor.execute('UPDATE tv_backtest_imports SET progress = ? WHERE id = ?', (progress, import_id))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning(f"Backtest {import_id}: progress update failed: {e}")
+
+
+def _run_backtest_import(import_id, path, is_xlsx, filename):
+    """Background job: stream-parse the upload, compute metrics, bulk insert trade rows."""
+    import time as _t
+    _t0 = _t.time()
+    try:
+        symbol = strategy_name_val = None
+        if is_xlsx:
+            rows, symbol, strategy_name_val = _parse_xlsx_trades(path)
+        else:
+            rows = _iter_csv_trades(path)
+        cols = _rows_to_backtest_columns(rows)
+        n_rows = len(cols['type'])
+        if not n_rows:
+            raise ValueError('File contains no data rows')
+        logger.info(f"Backtest {import_id}: parsed {n_rows} rows in {_t.time()-_t0:.2f}s")
+        _set_backtest_progress(import_id, 20)
+
+        metrics, chart_series, daily_pnl_series = _compute_backtest_metrics(cols)
+        _set_backtest_progress(import_id, 30)
+
+        # CSV fallback: extract symbol from filename (e.g. "JustTrades_DCA_V.1_CME_MINI_MNQ1!_2026-03-07.csv")
+        if not symbol and filename:
+            sym_match = re.search(r'([A-Z]{2,4}\d?!)', filename)
+            if sym_match:
+                symbol = sym_match.group(1)
+
+        # --- Bulk insert trade rows in chunks (executemany) ---
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            insert_sql = ('INSERT INTO tv_backtest_trades (import_id, trade_num, type, signal, date_time, price, '
+                          'contracts, profit, cumulative_profit, run_up, drawdown) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+            col_values = [cols[f] for f in _BACKTEST_TRADE_FIELDS]
+            for start in range(0, n_rows, _BACKTEST_INSERT_CHUNK):
+                stop = min(start + _BACKTEST_INSERT_CHUNK, n_rows)
+                batch = [(import_id, i + 1) + tuple(c[i] for c in col_values) for i in range(start, stop)]
+                cursor.executemany(insert_sql, batch)
+                cursor.execute('UPDATE tv_backtest_imports SET progress = ? WHERE id = ?',
+                               (30 + int(65 * stop / n_rows), import_id))
+                conn.commit()
 
-    wb.close()
-    return rows, symbol, strategy_name
+            m = {k: round(v, 2) if isinstance(v, float) else v for k, v in metrics.items()}
+            cursor.execute('''
+                UPDATE tv_backtest_imports SET
+                    symbol = ?, strategy_name = ?, total_trades = ?, wins = ?, losses = ?, win_rate = ?,
+                    profit_factor = ?, net_pnl = ?, gross_profit = ?, gross_loss = ?, max_drawdown = ?,
+                    avg_win = ?, avg_loss = ?, largest_win = ?, largest_loss = ?, avg_trade = ?,
+                    long_trades = ?, short_trades = ?, start_date = ?, end_date = ?,
+                    chart_series = ?, daily_pnl_series = ?, status = 'complete', progress = 100
+                WHERE id = ?
+            ''', (symbol, strategy_name_val, m['total_trades'], m['wins'], m['losses'], m['win_rate'],
+                  m['profit_factor'], m['net_pnl'], m['gross_profit'], m['gross_loss'], m['max_drawdown'],
+                  m['avg_win'], m['avg_loss'], m['largest_win'], m['largest_loss'], m['avg_trade'],
+                  m['long_trades'], m['short_trades'], m['start_date'], m['end_date'],
+                  json.dumps(chart_series), json.dumps(daily_pnl_series), import_id))
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Backtest {import_id}: import complete ({n_rows} rows) in {_t.time()-_t0:.2f}s")
+    except Exception as e:
+        logger.error(f"Backtest {import_id}: import failed: {e}")
+        import traceback
+        traceback.print_exc()
+        _set_backtest_progress(import_id, 100, status='failed', error_message=str(e)[:500])
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 
 @app.route('/api/backtest/upload', methods=['POST'])
 @admin_required
 def api_backtest_upload():
-    """Upload a TradingView Strategy Tester export (XLSX or CSV) and compute summary metrics."""
+    """
+    Upload a TradingView Strategy Tester export (XLSX or CSV).
+    The file is streamed to disk and imported by a background job;
+    poll /api/backtest/<id>/status for progress.
+    """
     try:
-        import time as _t
-        _t0 = _t.time()
+        import tempfile
         from app.database import SessionLocal
         from app.models import TVBacktestImport
 
@@ -28178,196 +28840,38 @@ def api_backtest_upload():
         if not is_xlsx and not is_csv:
             return jsonify({'success': False, 'error': 'File must be .xlsx or .csv'}), 400
 
-        # Read into memory (max 10 MB for xlsx)
-        max_size = 10 * 1024 * 1024
-        raw = file.read(max_size + 1)
-        if len(raw) > max_size:
-            return jsonify({'success': False, 'error': 'File exceeds 10 MB limit'}), 400
-        logger.info(f"Backtest upload: file read {len(raw)/1024:.0f}KB in {_t.time()-_t0:.2f}s")
-
-        # --- Parse based on file type ---
-        xlsx_symbol = None
-        xlsx_strategy_name = None
-
-        _t1 = _t.time()
-        if is_xlsx:
-            rows, xlsx_symbol, xlsx_strategy_name = _parse_xlsx_trades(raw)
-        else:
-            text = raw.decode('utf-8-sig', errors='replace')
-            reader = csv.DictReader(io.StringIO(text))
-
-            # Map raw headers to internal keys
-            if not reader.fieldnames:
-                return jsonify({'success': False, 'error': 'CSV has no headers'}), 400
-
-            col_map = {}
-            for raw_h in reader.fieldnames:
-                norm = _normalize_header(raw_h)
-                if norm in _TV_HEADER_MAP:
-                    col_map[raw_h] = _TV_HEADER_MAP[norm]
-
-            if 'type' not in col_map.values():
-                return jsonify({'success': False, 'error': 'CSV missing required "Type" column'}), 400
-
-            rows = []
-            for row in reader:
-                mapped = {}
-                for raw_h, internal_key in col_map.items():
-                    mapped[internal_key] = row.get(raw_h, '')
-                rows.append(mapped)
-
-        if not rows:
-            return jsonify({'success': False, 'error': 'File contains no data rows'}), 400
-        logger.info(f"Backtest upload: parsed {len(rows)} rows in {_t.time()-_t1:.2f}s")
-
-        # --- Compute summary metrics from Exit rows ---
-        wins, losses = 0, 0
-        gross_profit, gross_loss = 0.0, 0.0
-        win_profits, loss_profits = [], []
-        long_count, short_count = 0, 0
-        cum_profits = []
-        first_date, last_date = None, None
-
-        for r in rows:
-            row_type = str(r.get('type') or '').strip().lower()
-            # XLSX uses "exit long"/"exit short"/"entry long"/"entry short"
-            # CSV uses plain "exit"/"entry"
-            is_exit = row_type.startswith('exit')
-            is_entry = row_type.startswith('entry')
-
-            if not is_exit:
-                # Track entry for long/short counts
-                if is_entry:
-                    sig = str(r.get('signal') or '').strip().lower()
-                    # XLSX: type="Entry long" or signal="L"; CSV: signal contains "long"/"short"
-                    if 'long' in row_type or 'long' in sig or sig == 'l':
-                        long_count += 1
-                    elif 'short' in row_type or 'short' in sig or sig == 's':
-                        short_count += 1
-                continue
-
-            profit = _parse_tv_number(r.get('profit'))
-            cum_p = _parse_tv_number(r.get('cumulative_profit'))
-            cum_profits.append(cum_p)
-
-            dt = str(r.get('date_time') or '').strip()
-            if dt:
-                if first_date is None:
-                    first_date = dt
-                last_date = dt
+        # Stream the upload to a temp file instead of holding it in memory
+        fd, path = tempfile.mkstemp(prefix='tv_backtest_', suffix='.xlsx' if is_xlsx else '.csv')
+        os.close(fd)
+        file.save(path)
+        if os.path.getsize(path) > BACKTEST_MAX_UPLOAD_MB * 1024 * 1024:
+            os.remove(path)
+            return jsonify({'success': False, 'error': f'File exceeds {BACKTEST_MAX_UPLOAD_MB} MB limit'}), 400
 
-            if profit >= 0:
-                wins += 1
-                gross_profit += profit
-                win_profits.append(profit)
-            else:
-                losses += 1
-                gross_loss += abs(profit)
-                loss_profits.append(profit)
-
-        total_trades = wins + losses
-        win_rate = (wins / total_trades * 100) if total_trades > 0 else 0.0
-        net_pnl = gross_profit - gross_loss
-        profit_factor = (gross_profit / gross_loss) if gross_loss > 0 else (999.99 if gross_profit > 0 else 0.0)
-        avg_win = (gross_profit / wins) if wins > 0 else 0.0
-        avg_loss = (gross_loss / losses) if losses > 0 else 0.0
-        largest_win = max(win_profits) if win_profits else 0.0
-        largest_loss = min(loss_profits) if loss_profits else 0.0
-        avg_trade = (net_pnl / total_trades) if total_trades > 0 else 0.0
-
-        # Max drawdown from cumulative profit peak-to-trough
-        max_dd = 0.0
-        peak = 0.0
-        for cp in cum_profits:
-            if cp > peak:
-                peak = cp
-            dd = peak - cp
-            if dd > max_dd:
-                max_dd = dd
-
-        # Use symbol/strategy extracted from XLSX Properties sheet (if available)
-        symbol = xlsx_symbol
-        strategy_name_val = xlsx_strategy_name
-
-        # CSV fallback: extract symbol from filename (e.g. "JustTrades_DCA_V.1_CME_MINI_MNQ1!_2026-03-07.csv")
-        if not symbol and file.filename:
-            import re
-            sym_match = re.search(r'([A-Z]{2,4}\d?!)', file.filename)
-            if sym_match:
-                symbol = sym_match.group(1)
-
-        # --- Store in database ---
         db = SessionLocal()
         try:
             imp = TVBacktestImport(
                 user_id=None,  # TODO: session-based auth
                 strategy_id=strategy_id,
                 name=name,
-                symbol=symbol,
-                strategy_name=strategy_name_val,
-                total_trades=total_trades,
-                wins=wins,
-                losses=losses,
-                win_rate=round(win_rate, 2),
-                profit_factor=round(profit_factor, 2),
-                net_pnl=round(net_pnl, 2),
-                gross_profit=round(gross_profit, 2),
-                gross_loss=round(gross_loss, 2),
-                max_drawdown=round(max_dd, 2),
-                avg_win=round(avg_win, 2),
-                avg_loss=round(avg_loss, 2),
-                largest_win=round(largest_win, 2),
-                largest_loss=round(largest_loss, 2),
-                avg_trade=round(avg_trade, 2),
-                long_trades=long_count,
-                short_trades=short_count,
-                start_date=first_date,
-                end_date=last_date,
                 raw_filename=file.filename,
+                status='processing',
+                progress=0,
             )
             db.add(imp)
-            db.flush()  # get imp.id
-            # Store individual trade rows for dashboard display
-            from app.models import TVBacktestTrade
-            trade_objects = []
-            for idx, r in enumerate(rows):
-                trade_objects.append(TVBacktestTrade(
-                    import_id=imp.id,
-                    trade_num=idx + 1,
-                    type=str(r.get('type', '')).strip(),
-                    signal=str(r.get('signal', '')).strip(),
-                    date_time=str(r.get('date_time', '')).strip(),
-                    price=_parse_tv_number(r.get('price')),
-                    contracts=_parse_tv_number(r.get('contracts')),
-                    profit=_parse_tv_number(r.get('profit')),
-                    cumulative_profit=_parse_tv_number(r.get('cumulative_profit')),
-                    run_up=_parse_tv_number(r.get('run_up')),
-                    drawdown=_parse_tv_number(r.get('drawdown')),
-                ))
-            if trade_objects:
-                db.bulk_save_objects(trade_objects)
             db.commit()
-            logger.info(f"Backtest upload: DB commit done, total time {_t.time()-_t0:.2f}s")
-
-            metrics = {
-                'import_id': imp.id,
-                'total_trades': total_trades,
-                'wins': wins,
-                'losses': losses,
-                'win_rate': round(win_rate, 2),
-                'profit_factor': round(profit_factor, 2),
-                'net_pnl': round(net_pnl, 2),
-                'max_drawdown': round(max_dd, 2),
-                'avg_trade': round(avg_trade, 2),
-            }
-
-            return jsonify({'success': True, 'import_id': imp.id, 'metrics': metrics})
+            import_id = imp.id
         except Exception:
             db.rollback()
+            os.remove(path)
             raise
         finally:
             db.close()
 
+        threading.Thread(target=_run_backtest_import, args=(import_id, path, is_xlsx, file.filename),
+                         daemon=True).start()
+        return jsonify({'success': True, 'import_id': import_id, 'status': 'processing'}), 202
+
     except Exception as e:
         logger.error(f"Backtest upload error: {e}")
         import traceback
@@ -28375,6 +28879,43 @@ def api_backtest_upload():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/backtest/<int:import_id>/status', methods=['GET'])
+@admin_required
+def api_backtest_status(import_id):
+    """Progress of a background backtest import (status, progress 0-100, metrics when complete)."""
+    try:
+        ph = '%s' if is_using_postgres() else '?'
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT status, progress, error_message, total_trades, win_rate, profit_factor,
+                   net_pnl, max_drawdown, avg_trade
+            FROM tv_backtest_imports WHERE id = {ph}
+        ''', (import_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return jsonify({'success': False, 'error': 'Import not found'}), 404
+
+        r = dict(row)
+        status = r.get('status') or 'complete'
+        result = {
+            'success': True,
+            'import_id': import_id,
+            'status': status,
+            'progress': r.get('progress') if r.get('progress') is not None else 100,
+        }
+        if status == 'failed':
+            result['error'] = r.get('error_message')
+        elif status == 'complete':
+            result['metrics'] = {k: r.get(k) for k in ('total_trades', 'win_rate', 'profit_factor',
+                                                       'net_pnl', 'max_drawdown', 'avg_trade')}
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Backtest status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/backtest/list', methods=['GET'])
 def api_backtest_list():
     """Return all backtest imports with summary metrics."""
@@ -28418,6 +28959,8 @@ def api_backtest_list():
                     'start_date': imp.start_date,
                     'end_date': imp.end_date,
                     'raw_filename': imp.raw_filename,
+                    'status': imp.status or 'complete',
+                    'progress': imp.progress if imp.progress is not None else 100,
                     'created_at': imp.created_at.isoformat() if imp.created_at else None,
                 })
 
@@ -28519,6 +29062,14 @@ def api_backtest_chart_data(import_id):
         conn = get_db_connection()
         cursor = conn.cursor()
 
+        # Precomputed by the import job
+        cursor.execute(f'SELECT chart_series FROM tv_backtest_imports WHERE id = {ph}', (import_id,))
+        pre = cursor.fetchone()
+        if pre and dict(pre).get('chart_series'):
+            conn.close()
+            series = json.loads(dict(pre)['chart_series'])
+            return jsonify({'success': True, **series})
+
         cursor.execute(f'''
             SELECT trade_num, date_time, profit, cumulative_profit, drawdown
             FROM tv_backtest_trades
@@ -28584,6 +29135,13 @@ def api_backtest_daily_pnl(import_id):
         conn = get_db_connection()
         cursor = conn.cursor()
 
+        # Precomputed by the import job
+        cursor.execute(f'SELECT daily_pnl_series FROM tv_backtest_imports WHERE id = {ph}', (import_id,))
+        pre = cursor.fetchone()
+        if pre and dict(pre).get('daily_pnl_series'):
+            conn.close()
+            return jsonify({'success': True, 'daily_pnl': json.loads(dict(pre)['daily_pnl_series'])})
+
         cursor.execute(f'''
             SELECT trade_num, date_time, profit
             FROM tv_backtest_trades
@@ -29095,43 +29653,14 @@ def api_live_price_symbol(symbol):
 @app.route('/api/price-stream')
 def api_price_stream():
     """SSE endpoint for real-time price streaming to the dashboard.
-    Replaces 5-second polling with push-based tick-by-tick updates.
-    Frontend connects via EventSource('/api/price-stream')."""
-    def generate():
-        q = Queue(maxsize=200)
-        with _sse_price_lock:
-            _sse_price_queues.append(q)
-        try:
-            # Send initial snapshot of all cached prices
-            snapshot = {}
-            for sym, sdata in dict(_market_data_cache).items():
-                if isinstance(sdata, dict) and 'last' in sdata and ':' not in sym:
-                    snapshot[sym] = {
-                        'symbol': sym,
-                        'price': sdata.get('last'),
-                        'bid': sdata.get('bid'),
-                        'ask': sdata.get('ask'),
-                        'change': sdata.get('ch'),
-                        'change_percent': sdata.get('chp'),
-                        'source': sdata.get('source'),
-                    }
-            yield f"data: {json.dumps({'type': 'snapshot', 'prices': snapshot})}\n\n"
-
-            while True:
-                try:
-                    msg = q.get(timeout=15)
-                    yield f"data: {json.dumps(msg)}\n\n"
-                except Empty:
-                    yield ": heartbeat\n\n"
-        except GeneratorExit:
-            pass
-        finally:
-            with _sse_price_lock:
-                if q in _sse_price_queues:
-                    _sse_price_queues.remove(q)
-
+    Fallback for the asyncio price gateway (PRICE_GATEWAY_PORT); same conflated
+    stream, but holds a worker thread per client.
+    Query: ?symbols=NQ,ES (filter) &max_rate=4 (frames/second)
+    &events=1 (recorder signals; needs SIGNAL_STREAM_TOKEN)."""
+    symbols, max_rate = parse_stream_args(request.args)
+    events = events_allowed(request.args, request.headers)
     return Response(
-        generate(),
+        _price_conflator.iter_stream(symbols, max_rate, events),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -29141,6 +29670,18 @@ def api_price_stream():
     )
 
 
+@app.route('/api/price-stream/stats')
+def api_price_stream_stats():
+    """Conflation counters for the price stream (clients, publishes, frames sent)."""
+    return jsonify({'success': True, 'gateway_url': PRICE_STREAM_URL, **_price_conflator.get_stats()})
+
+
+# Asyncio SSE gateway: dashboard viewers stream from here instead of web workers
+PRICE_STREAM_URL = os.environ.get('PRICE_GATEWAY_URL') or '/api/price-stream'
+if start_price_gateway():
+    logger.info(f"📡 Dashboard price stream served by asyncio gateway ({PRICE_STREAM_URL})")
+
+
 # ============================================================================
 # Paper Trading — Dashboard API (reads from legacy paper_trades table)
 # ============================================================================
@@ -29894,6 +30435,7 @@ def api_set_recorder_premium(recorder_id):
 
         conn.commit()
         conn.close()
+        _config_registry.invalidate_recorder(recorder_id)
 
         return jsonify({
             'success': True,
@@ -29972,6 +30514,16 @@ def api_paper_test_direct():
         return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
 
 
+def _reset_paper_analytics():
+    """Paper trades were deleted: rebuild the paper engine's running analytics from the rest."""
+    if not TV_PRICE_SERVICE_AVAILABLE:
+        return
+    try:
+        get_paper_engine().reset_analytics()
+    except Exception as e:
+        logger.warning(f"Paper analytics reset failed: {e}")
+
+
 @app.route('/api/paper-trades/delete', methods=['POST'])
 @api_login_required
 def api_paper_delete_trade():
@@ -30002,6 +30554,7 @@ def api_paper_delete_trade():
         cursor.execute(f'DELETE FROM paper_trades WHERE id = {ph}', (trade_id,))
         conn.commit()
         conn.close()
+        _reset_paper_analytics()
 
         return jsonify({
             'success': True,
@@ -30035,6 +30588,7 @@ def api_paper_reset_all():
             cursor.execute(f'DELETE FROM paper_trades WHERE recorder_id = {ph}', (recorder_id,))
             conn.commit()
             conn.close()
+            _reset_paper_analytics()
             print(f"RESET: Deleted {trades_count} paper trades for recorder {recorder_id}", flush=True)
             return jsonify({
                 'success': True,
@@ -30049,6 +30603,7 @@ def api_paper_reset_all():
             cursor.execute('DELETE FROM paper_trades')
             conn.commit()
             conn.close()
+            _reset_paper_analytics()
             print(f"RESET: Deleted {trades_count} paper trades (all)", flush=True)
             return jsonify({
                 'success': True,
@@ -30242,7 +30797,7 @@ def api_futures_specs():
 
 @app.route('/api/stock-heatmap', methods=['GET'])
 def api_stock_heatmap():
-    """Get stock heatmap data from Finnhub (primary) or Yahoo Finance (fallback)"""
+    """Get stock heatmap data from Finnhub (primary) or the shared quote service (fallback)"""
     try:
         # Check if Finnhub API key is set (optional - falls back to Yahoo if not)
         finnhub_api_key = os.environ.get('FINNHUB_API_KEY', None)
@@ -30252,10 +30807,10 @@ def api_stock_heatmap():
             try:
                 return get_finnhub_heatmap_data(finnhub_api_key)
             except Exception as e:
-                logger.warning(f"Finnhub API failed, falling back to Yahoo Finance: {e}")
+                logger.warning(f"Finnhub API failed, falling back to quote service: {e}")
         
-        # Fallback to Yahoo Finance (current implementation)
-        return get_yahoo_heatmap_data()
+        # Fallback to the shared TradingView quote snapshot
+        return get_scanner_heatmap_data()
     except Exception as e:
         logger.error(f"Error fetching heatmap data: {e}")
         return get_sample_heatmap_data()
@@ -30348,8 +30903,8 @@ def get_finnhub_heatmap_data(api_key):
     else:
         raise Exception("No data from Finnhub")
 
-def get_yahoo_heatmap_data():
-    """Get stock heatmap data from Yahoo Finance (fallback)"""
+def get_scanner_heatmap_data():
+    """Get stock heatmap data from the shared quote service (one batched scanner call)"""
     try:
         # Most active tech stocks with approximate market cap order (largest first)
         # Market cap data for sizing the treemap
@@ -30370,65 +30925,35 @@ def get_yahoo_heatmap_data():
             {'symbol': 'MU', 'market_cap': 150},
             {'symbol': 'PLTR', 'market_cap': 50},
             {'symbol': 'HOOD', 'market_cap': 20},
-        ]
+        ][:16]  # Limit to 16 for treemap layout
+        
+        quotes = fetch_live_stock_prices([s['symbol'] for s in symbols_with_cap])
         
-        # Fetch data from Yahoo Finance (using their public API)
         heatmap_data = []
-        successful_fetches = 0
-        for stock_info in symbols_with_cap[:16]:  # Limit to 16 for treemap layout
+        for stock_info in symbols_with_cap:
             symbol = stock_info['symbol']
-            market_cap = stock_info['market_cap']
-            try:
-                # Yahoo Finance quote endpoint (no API key needed)
-                url = f'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval=1d&range=1d'
-                response = requests.get(url, timeout=5, headers={'User-Agent': 'Mozilla/5.0'})
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'chart' in data and 'result' in data['chart'] and len(data['chart']['result']) > 0:
-                        result = data['chart']['result'][0]
-                        if 'meta' in result:
-                            meta = result['meta']
-                            current_price = meta.get('regularMarketPrice', 0)
-                            # Yahoo Finance chart API uses 'chartPreviousClose', not 'previousClose'
-                            previous_close = meta.get('chartPreviousClose') or meta.get('previousClose', 0)
-                            
-                            # Calculate change percentage from prices
-                            if current_price > 0 and previous_close > 0:
-                                change_pct = ((current_price - previous_close) / previous_close) * 100
-                            else:
-                                change_pct = 0
-                            
-                            # Try to get real market cap from Yahoo Finance
-                            real_market_cap = meta.get('marketCap', None)
-                            if real_market_cap:
-                                # Convert to billions for easier comparison
-                                market_cap_billions = real_market_cap / 1_000_000_000
-                            else:
-                                # Fallback to provided market cap
-                                market_cap_billions = market_cap
-                            
-                            if current_price > 0:
-                                heatmap_data.append({
-                                    'symbol': symbol,
-                                    'price': round(current_price, 2),
-                                    'change': round(change_pct, 2),
-                                    'change_pct': f"{'+' if change_pct >= 0 else ''}{round(change_pct, 2)}%",
-                                    'market_cap': market_cap_billions  # Real market cap in billions
-                                })
-                                successful_fetches += 1
-                                logger.info(f"Successfully fetched {symbol}: ${current_price:.2f} ({change_pct:+.2f}%)")
-            except Exception as e:
-                logger.warning(f"Error fetching data for {symbol}: {e}")
+            quote = quotes.get(symbol)
+            if not quote or not quote.get('price'):
                 continue
+            change_pct = quote.get('change_pct') or 0
+            # Real market cap (in billions) when the scanner has it, else the static estimate
+            market_cap = quote['market_cap'] / 1_000_000_000 if quote.get('market_cap') else stock_info['market_cap']
+            heatmap_data.append({
+                'symbol': symbol,
+                'price': quote['price'],
+                'change': round(change_pct, 2),
+                'change_pct': f"{'+' if change_pct >= 0 else ''}{round(change_pct, 2)}%",
+                'market_cap': market_cap
+            })
         
-        logger.info(f"Yahoo Finance API: Successfully fetched {successful_fetches} stocks out of {len(symbols_with_cap[:16])}")
+        logger.debug(f"Heatmap: {len(heatmap_data)} of {len(symbols_with_cap)} stocks quoted")
         
         if heatmap_data:
             return jsonify({'stocks': heatmap_data})
         else:
-            raise Exception("No data from Yahoo Finance")
+            raise Exception("No data from quote service")
     except Exception as e:
-        logger.error(f"Error in Yahoo Finance API: {e}")
+        logger.error(f"Error building scanner heatmap: {e}")
         raise
 
 def get_sample_heatmap_data():
@@ -30543,6 +31068,13 @@ try:
 except Exception as e:
     logger.warning(f"Database initialization warning: {e}")
 
+# EXPLAIN samples use their own pooled connection; curated indexes build in the background
+_query_profiler.set_explainer(get_db_connection, is_using_postgres)
+if os.environ.get('INDEX_MIGRATIONS', '1') != '0':
+    threading.Thread(target=query_profiler.run_index_migrations,
+                     args=(get_db_connection, is_using_postgres()),
+                     daemon=True, name='index-migrations').start()
+
 # Initialize user authentication system
 if USER_AUTH_AVAILABLE:
     try:
@@ -30564,11 +31096,22 @@ def handle_connect():
         logger.warning('Rejected unauthenticated WebSocket connection')
         return False
     logger.info('Client connected to WebSocket')
+    # P&L / positions are pushed per user (see emit_realtime_updates)
+    user_id = None
+    if USER_AUTH_AVAILABLE:
+        user_id = get_current_user_id()
+        join_room(f'user_{user_id}')
+        user = get_current_user()
+        if user and user.is_admin:
+            join_room('admins')
+    else:
+        join_room('pnl_all')
     emit('status', {
         'connected': True,
         'message': 'Connected to server',
         'timestamp': datetime.now().isoformat()
     })
+    _emit_account_snapshot(user_id, room=request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -31013,10 +31556,12 @@ async def process_market_data_message(data):
                     if root_symbol:
                         _market_data_cache[root_symbol]['ask'] = float(ask)
         
-        # Push to SSE subscribers (dashboard real-time)
+        # Push to SSE subscribers (dashboard real-time) + break-even/trailing rules + daily-loss limits
         for _sse_sym in symbols_updated:
             if ':' not in _sse_sym:
                 _broadcast_sse_price(_sse_sym)
+                _order_events.on_price(_sse_sym, _market_data_cache[_sse_sym].get('last'))
+                _risk_engine.on_price(_sse_sym, _market_data_cache[_sse_sym].get('last'))
 
         # Update PnL for positions with this symbol
         update_position_pnl()
@@ -31219,7 +31764,7 @@ def check_recorder_trades_tp_sl(symbols_updated: set):
                         'timestamp': datetime.now().isoformat()
                     })
                     
-                    socketio.emit('signal_received', {
+                    signal_event = {
                         'recorder_id': trade['recorder_id'],
                         'recorder_name': trade['recorder_name'],
                         'action': f'{hit_type.upper()}_HIT',
@@ -31235,7 +31780,9 @@ def check_recorder_trades_tp_sl(symbols_updated: set):
                             'pnl': pnl,
                             'exit_reason': hit_type.upper()
                         }
-                    })
+                    }
+                    socketio.emit('signal_received', signal_event)
+                    _publish_signal_event(signal_event)
                 except Exception as e:
                     logger.warning(f"Could not emit WebSocket update: {e}")
                 
@@ -31666,20 +32213,12 @@ async def connect_tradingview_websocket():
                 logger.info("✅ TradingView WebSocket CONNECTED!")
                 
                 # Send JWT auth token — premium JWT = real-time data, "unauthorized_user_token" = delayed
-                auth_msg = json.dumps({
-                    "m": "set_auth_token",
-                    "p": [jwt_token]
-                })
-                await ws.send(f"~m~{len(auth_msg)}~m~{auth_msg}")
+                await ws.send(encode_tradingview("set_auth_token", [jwt_token]))
                 logger.info(f"Sent TradingView auth ({'PREMIUM JWT' if jwt_token != 'unauthorized_user_token' else 'PUBLIC delayed'})")
                 
                 # Create a quote session
                 quote_session = f"qs_{int(time.time())}"
-                create_session_msg = json.dumps({
-                    "m": "quote_create_session",
-                    "p": [quote_session]
-                })
-                await ws.send(f"~m~{len(create_session_msg)}~m~{create_session_msg}")
+                await ws.send(encode_tradingview("quote_create_session", [quote_session]))
                 
                 # Subscribe to symbols we need
                 await subscribe_tradingview_symbols(ws, quote_session)
@@ -31697,12 +32236,13 @@ async def connect_tradingview_websocket():
                         break
                     
                     try:
-                        # Handle ping/pong
-                        if message.startswith('~h~'):
-                            await ws.send(message)
-                            continue
-                        
-                        await process_tradingview_message(message)
+                        # Heartbeats arrive framed (~m~4~m~~h~12) and are echoed as-is;
+                        # only qsd frames are JSON-decoded
+                        heartbeats, quotes = decode_tradingview(message)
+                        for frame in heartbeats:
+                            await ws.send(frame)
+                        if quotes:
+                            await process_tradingview_message(quotes)
                         
                         # Log first few messages
                         if msg_count <= 5:
@@ -31761,11 +32301,7 @@ async def subscribe_tradingview_symbols(ws, quote_session):
         for symbol in symbols:
             if symbol not in _tradingview_subscribed_symbols:
                 # Add symbol to session - simplified format
-                add_msg = json.dumps({
-                    "m": "quote_add_symbols",
-                    "p": [quote_session, symbol]
-                })
-                await ws.send(f"~m~{len(add_msg)}~m~{add_msg}")
+                await ws.send(encode_tradingview("quote_add_symbols", [quote_session, symbol]))
                 _tradingview_subscribed_symbols.add(symbol)
                 logger.info(f"📈 Subscribed to TradingView: {symbol}")
                 
@@ -31773,92 +32309,43 @@ async def subscribe_tradingview_symbols(ws, quote_session):
         logger.warning(f"Error subscribing to TradingView symbols: {e}")
 
 
-async def process_tradingview_message(message):
-    """Process incoming TradingView WebSocket message"""
+async def process_tradingview_message(quotes):
+    """Apply decoded TradingView qsd updates ((symbol, values) pairs, see tv_protocol.decode)"""
     global _market_data_cache
     
-    try:
-        # TradingView messages are formatted as: ~m~{length}~m~{json}
-        if not message:
-            return
-        
-        # Log first few messages for debugging
-        if len(message) < 500:
-            logger.debug(f"TradingView raw msg: {message[:200]}")
-        
-        # Handle heartbeat
-        if message.startswith('~h~'):
-            return
-        
-        if not message.startswith('~m~'):
-            return
-        
-        # Extract JSON part
-        parts = message.split('~m~')
-        for part in parts:
-            if not part or part.isdigit():
+    for symbol, values in quotes:
+        try:
+            # Last price, or the bid/ask mid when the update only moved the book
+            last_price = quote_price(values)
+            if not symbol or not last_price:
                 continue
+            bid = values.get('bid')
+            ask = values.get('ask')
             
-            try:
-                data = json.loads(part)
-                
-                # Log message type
-                if isinstance(data, dict):
-                    msg_type = data.get('m', 'unknown')
-                    logger.debug(f"TradingView msg type: {msg_type}")
-                
-                # Handle quote update messages
-                if isinstance(data, dict) and data.get('m') == 'qsd':
-                    # Quote session data
-                    params = data.get('p', [])
-                    logger.debug(f"QSD params: {params}")
-                    if len(params) >= 2:
-                        symbol_data = params[1]
-                        symbol = symbol_data.get('n', '')  # Symbol name
-                        values = symbol_data.get('v', {})
-                        
-                        if symbol and values:
-                            # TradingView can send price in different fields
-                            last_price = values.get('lp') or values.get('last_price') or values.get('ch')
-                            bid = values.get('bid')
-                            ask = values.get('ask')
-                            
-                            # Log what we're getting
-                            if 'lp' in values or 'bid' in values or 'ask' in values:
-                                logger.info(f"📊 TradingView {symbol}: lp={values.get('lp')}, bid={bid}, ask={ask}")
-                            
-                            # Use mid price if we have bid/ask but no last
-                            if not last_price and bid and ask:
-                                last_price = (float(bid) + float(ask)) / 2
-                            
-                            if last_price:
-                                # Extract root symbol (CME_MINI:MNQ1! -> MNQ)
-                                root = symbol.split(':')[-1].replace('1!', '').replace('!', '')
-                                
-                                if root not in _market_data_cache:
-                                    _market_data_cache[root] = {}
-                                
-                                _market_data_cache[root]['last'] = float(last_price)
-                                if bid:
-                                    _market_data_cache[root]['bid'] = float(bid)
-                                if ask:
-                                    _market_data_cache[root]['ask'] = float(ask)
-                                _market_data_cache[root]['source'] = 'tradingview'
-                                _market_data_cache[root]['updated'] = time.time()
-
-                                # Push to SSE subscribers (dashboard real-time)
-                                _broadcast_sse_price(root)
-
-                                logger.info(f"💰 TradingView price: {root} = {last_price}")
-                                
-                                # Check TP/SL for recorder trades
-                                check_recorder_trades_tp_sl({root})
-                                
-            except json.JSONDecodeError:
-                continue
+            # Extract root symbol (CME_MINI:MNQ1! -> MNQ)
+            root = tradingview_root(symbol)
+            
+            if root not in _market_data_cache:
+                _market_data_cache[root] = {}
+            
+            _market_data_cache[root]['last'] = last_price
+            if bid:
+                _market_data_cache[root]['bid'] = float(bid)
+            if ask:
+                _market_data_cache[root]['ask'] = float(ask)
+            _market_data_cache[root]['source'] = 'tradingview'
+            _market_data_cache[root]['updated'] = time.time()
+
+            # Push to SSE subscribers (dashboard real-time)
+            _broadcast_sse_price(root)
+
+            logger.debug(f"💰 TradingView price: {root} = {last_price} (bid={bid}, ask={ask})")
+            
+            # Check TP/SL for recorder trades
+            check_recorder_trades_tp_sl({root})
                 
-    except Exception as e:
-        logger.debug(f"Error processing TradingView message: {e}")
+        except Exception as e:
+            logger.debug(f"Error processing TradingView quote for {symbol}: {e}")
 
 
 def start_tradingview_websocket():
@@ -32038,255 +32525,225 @@ def update_position_pnl():
 # ============================================================================
 # Custom OCO Monitor - Tracks TP/SL pairs and cancels the other when one fills
 # ============================================================================
-
-# Store paired orders: {tp_order_id: sl_order_id, sl_order_id: tp_order_id}
-_oco_pairs = {}
-# Store order details for monitoring: {order_id: {account_id, symbol, type: 'tp'|'sl', partner_id}}
-_oco_order_details = {}
-_oco_lock = threading.Lock()
+# Pairs are registered with the OrderEventEngine (order_event_engine.py).
+# Fills arrive over the shared Tradovate WebSocket and the partner cancel is
+# dispatched immediately; monitor_oco_orders is only the REST fallback for
+# accounts that have no live socket. Registrations persist in redis_state.
+from order_event_engine import get_order_event_engine
+_order_events = get_order_event_engine()
 
 def register_oco_pair(tp_order_id: int, sl_order_id: int, account_id: int, symbol: str):
     """Register a TP/SL pair for OCO monitoring"""
-    global _oco_pairs, _oco_order_details
-    
-    with _oco_lock:
-        # Store the pairing both ways for easy lookup
-        _oco_pairs[tp_order_id] = sl_order_id
-        _oco_pairs[sl_order_id] = tp_order_id
-        
-        # Store details for each order
-        _oco_order_details[tp_order_id] = {
-            'account_id': account_id,
-            'symbol': symbol,
-            'type': 'tp',
-            'partner_id': sl_order_id,
-            'created_at': time.time()
-        }
-        _oco_order_details[sl_order_id] = {
-            'account_id': account_id,
-            'symbol': symbol,
-            'type': 'sl',
-            'partner_id': tp_order_id,
-            'created_at': time.time()
-        }
-        
-        logger.info(f"🔗 OCO pair registered: TP={tp_order_id} <-> SL={sl_order_id} for {symbol}")
+    _order_events.register_oco(tp_order_id, sl_order_id, account_id, symbol)
+    logger.info(f"🔗 OCO pair registered: TP={tp_order_id} <-> SL={sl_order_id} for {symbol}")
 
 def unregister_oco_pair(order_id: int):
     """Remove an OCO pair from monitoring (called when one side fills/cancels)"""
-    global _oco_pairs, _oco_order_details
-    
-    with _oco_lock:
-        if order_id in _oco_pairs:
-            partner_id = _oco_pairs.pop(order_id, None)
-            if partner_id and partner_id in _oco_pairs:
-                _oco_pairs.pop(partner_id, None)
-            
-            # Remove details
-            _oco_order_details.pop(order_id, None)
-            if partner_id:
-                _oco_order_details.pop(partner_id, None)
+    _order_events.unregister_oco(order_id)
+
+_TRADOVATE_ROUTES_TTL = 60.0       # Seconds the subaccount -> account routing is reused
+_TRADOVATE_ROUTES_MISS_TTL = 5.0   # An unknown subaccount reloads it at most this often
+_tradovate_routes = {'built': 0.0, 'routes': {}, 'accounts': []}
+_tradovate_routes_lock = threading.Lock()
+
+def _build_tradovate_account_info_map(account_id=None):
+    """
+    Map Tradovate subaccount id -> {'token', 'env'} for every account with a token.
+    Returns (account_info_map, all_accounts).
+
+    The accounts query + JSON parsing is cached for _TRADOVATE_ROUTES_TTL (and
+    reloaded early when account_id is not in it); tokens are looked up from the
+    token manager on every call, so a cached route never carries a stale token.
+    """
+    now = time.time()
+    with _tradovate_routes_lock:
+        age = now - _tradovate_routes['built']
+        stale = age >= _TRADOVATE_ROUTES_TTL or (
+            account_id is not None and account_id not in _tradovate_routes['routes']
+            and age >= _TRADOVATE_ROUTES_MISS_TTL)
+        if stale:
+            routes, all_accounts = _load_tradovate_routes()
+            _tradovate_routes.update(built=now, routes=routes, accounts=all_accounts)
+        routes, all_accounts = _tradovate_routes['routes'], _tradovate_routes['accounts']
+
+    tokens = {}
+    account_info_map = {}
+    for sub_id, (account_record_id, env) in routes.items():
+        if account_record_id not in tokens:
+            # Get valid token (auto-refreshes if needed)
+            tokens[account_record_id] = get_valid_tradovate_token(account_record_id)
+            if not tokens[account_record_id]:
+                logger.warning(f"No valid token for account record {account_record_id} - skipping")
+        if tokens[account_record_id]:
+            account_info_map[sub_id] = {'token': tokens[account_record_id], 'env': env}
+    return account_info_map, all_accounts
+
+def _load_tradovate_routes():
+    """Subaccount id -> (account record id, env) for every account with a token, plus the rows."""
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, tradovate_token, environment, tradovate_accounts, subaccounts
+        FROM accounts
+        WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
+    ''')
+    all_accounts = cursor.fetchall()
+    conn.close()
+
+    # Account IDs in our system are the tradovate subaccount IDs (like 26029294)
+    routes = {}
+    for acc in all_accounts:
+        account_record_id = acc['id']
+        env = acc['environment'] or 'demo'
+
+        # Try tradovate_accounts field (JSON format)
+        tradovate_accounts_str = acc['tradovate_accounts'] or ''
+        if tradovate_accounts_str:
+            try:
+                tradovate_accounts = json.loads(tradovate_accounts_str)
+                for ta in tradovate_accounts:
+                    acc_id = ta.get('id') or ta.get('accountId')
+                    # CRITICAL FIX: Use environment as source of truth (already have env from acc)
+                    ta_env = (ta.get('environment') or env or 'demo').lower()
+                    if acc_id:
+                        routes[int(acc_id)] = (account_record_id, ta_env)
+            except:
+                pass
+
+        # Also try subaccounts field (comma-separated or JSON)
+        subaccounts_str = acc['subaccounts'] or ''
+        if subaccounts_str:
+            try:
+                subaccounts = json.loads(subaccounts_str)
+                for sa in subaccounts:
+                    if isinstance(sa, dict):
+                        acc_id = sa.get('id') or sa.get('accountId')
+                    else:
+                        acc_id = sa
+                    if acc_id:
+                        routes.setdefault(int(acc_id), (account_record_id, env))
+            except:
+                # Try comma-separated
+                for tid in subaccounts_str.split(','):
+                    tid = tid.strip()
+                    if tid:
+                        try:
+                            routes.setdefault(int(tid), (account_record_id, env))
+                        except ValueError:
+                            pass
+
+    return routes, all_accounts
+
+def _oco_cancel_partner(partner_id, filled_id, details):
+    """OrderEventEngine action: cancel the partner of a filled OCO leg."""
+    account_id = details.get('account_id')
+    symbol = details.get('symbol', 'unknown')
+
+    account_info_map, all_accounts = _build_tradovate_account_info_map(account_id)
+    acc_info = account_info_map.get(account_id)
+    if not acc_info:
+        # Try to find any token (fallback for accounts not in our map)
+        if not all_accounts:
+            logger.warning(f"⚠️ OCO: No token to cancel partner order {partner_id} (account {account_id})")
+            return
+        acc_info = {
+            'token': all_accounts[0]['tradovate_token'],
+            'env': all_accounts[0]['environment'] or 'demo'
+        }
+
+    base_url = 'https://demo.tradovateapi.com/v1' if acc_info['env'] == 'demo' else 'https://live.tradovateapi.com/v1'
+    headers = {'Authorization': f"Bearer {acc_info['token']}", 'Content-Type': 'application/json'}
+    try:
+        cancel_response = requests.post(
+            f'{base_url}/order/cancelorder',
+            json={'orderId': partner_id, 'isAutomated': True},
+            headers=headers,
+            timeout=5
+        )
+        if cancel_response.status_code == 200:
+            result = cancel_response.json()
+            if result.get('errorText'):
+                logger.warning(f"⚠️ OCO: Cancel returned error for {partner_id}: {result.get('errorText')}")
+            else:
+                logger.info(f"✅ OCO: Successfully cancelled partner order {partner_id} for {symbol} (account {account_id})")
+
+            # Emit event to frontend
+            socketio.emit('oco_triggered', {
+                'filled_order': filled_id,
+                'cancelled_order': partner_id,
+                'symbol': symbol,
+                'account_id': account_id,
+                'message': f'OCO triggered: cancelled partner order for {symbol}'
+            })
+        else:
+            logger.warning(f"⚠️ OCO: Failed to cancel partner order {partner_id}: {cancel_response.text[:200]}")
+    except Exception as e:
+        logger.error(f"❌ OCO: Error cancelling partner order {partner_id}: {e}")
 
 def monitor_oco_orders():
     """
-    Background thread that monitors OCO order pairs across ALL accounts.
-    When one order fills, it cancels the partner order on the SAME account.
+    REST fallback for OCO pairs on accounts WITHOUT a live WebSocket.
+    Accounts whose order events stream over ws_connection_manager are skipped;
+    their fills reach the OrderEventEngine directly.
     """
-    logger.info("🔄 OCO Monitor started - watching for TP/SL fills...")
-    
+    logger.info("🔄 OCO REST fallback started - polling only accounts without a live socket...")
+
     while True:
         try:
-            # Only process if we have pairs to monitor
-            with _oco_lock:
-                if not _oco_pairs:
-                    time.sleep(1)
-                    continue
-                
-                # Get a copy of current pairs
-                pairs_to_check = dict(_oco_pairs)
-                details_copy = dict(_oco_order_details)
-            
-            if not pairs_to_check:
+            # Group OCO pairs by account_id, skipping accounts covered by a socket
+            account_orders = {}  # {account_id: [order_ids]}
+            for order_id, details in _order_events.get_oco_snapshot().items():
+                acc_id = details.get('account_id')
+                if acc_id and not _order_events.has_live_socket(acc_id):
+                    account_orders.setdefault(acc_id, []).append(order_id)
+
+            if not account_orders:
                 time.sleep(1)
                 continue
-            
-            # Get ALL accounts with tokens (for multi-account support)
-            conn = get_db_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, tradovate_token, environment, tradovate_accounts, subaccounts
-                FROM accounts 
-                WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
-            ''')
-            all_accounts = cursor.fetchall()
-            conn.close()
-            
+
+            account_info_map, all_accounts = _build_tradovate_account_info_map()
             if not all_accounts:
                 time.sleep(2)
                 continue
-            
-            # Group OCO pairs by account_id for efficient processing
-            account_orders = {}  # {account_id: [order_ids]}
-            for order_id, details in details_copy.items():
-                acc_id = details.get('account_id')
-                if acc_id:
-                    if acc_id not in account_orders:
-                        account_orders[acc_id] = []
-                    account_orders[acc_id].append(order_id)
-            
-            # Build a map of account_id -> account info (token, env)
-            # Account IDs in our system are the tradovate subaccount IDs (like 26029294)
-            account_info_map = {}
-            for acc in all_accounts:
-                # Get valid token (auto-refreshes if needed)
-                account_record_id = acc['id']
-                token = get_valid_tradovate_token(account_record_id)
-                if not token:
-                    logger.warning(f"No valid token for account record {account_record_id} - skipping")
-                    continue
-                
-                env = acc['environment'] or 'demo'
-                
-                # Try tradovate_accounts field (JSON format)
-                tradovate_accounts_str = acc['tradovate_accounts'] or ''
-                if tradovate_accounts_str:
-                    try:
-                        import json
-                        tradovate_accounts = json.loads(tradovate_accounts_str)
-                        for ta in tradovate_accounts:
-                            acc_id = ta.get('id') or ta.get('accountId')
-                            if acc_id:
-                                account_info_map[int(acc_id)] = {'token': token, 'env': env}
-                    except:
-                        pass
-                
-                # Also try subaccounts field (comma-separated or JSON)
-                subaccounts_str = acc['subaccounts'] or ''
-                if subaccounts_str:
-                    try:
-                        import json
-                        subaccounts = json.loads(subaccounts_str)
-                        for sa in subaccounts:
-                            if isinstance(sa, dict):
-                                acc_id = sa.get('id') or sa.get('accountId')
-                            else:
-                                acc_id = sa
-                            if acc_id:
-                                account_info_map[int(acc_id)] = {'token': token, 'env': env}
-                    except:
-                        # Try comma-separated
-                        for tid in subaccounts_str.split(','):
-                            tid = tid.strip()
-                            if tid:
-                                try:
-                                    account_info_map[int(tid)] = {'token': token, 'env': env}
-                                except ValueError:
-                                    pass
-            
-            # Process each account's orders
-            orders_to_remove = []
-            partners_to_cancel = []  # [(partner_id, filled_id, symbol, account_id)]
-            
+
             for account_id, order_ids in account_orders.items():
-                # Get token for this account
                 acc_info = account_info_map.get(account_id)
                 if not acc_info:
-                    # Try to find any token (fallback for accounts not in our map)
-                    if all_accounts:
-                        acc_info = {
-                            'token': all_accounts[0]['tradovate_token'],
-                            'env': all_accounts[0]['environment'] or 'demo'
-                        }
-                    else:
-                        continue
-                
-                token = acc_info['token']
-                env = acc_info['env']
-                base_url = 'https://demo.tradovateapi.com/v1' if env == 'demo' else 'https://live.tradovateapi.com/v1'
-                headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-                
+                    acc_info = {
+                        'token': all_accounts[0]['tradovate_token'],
+                        'env': all_accounts[0]['environment'] or 'demo'
+                    }
+
+                base_url = 'https://demo.tradovateapi.com/v1' if acc_info['env'] == 'demo' else 'https://live.tradovateapi.com/v1'
+                headers = {'Authorization': f"Bearer {acc_info['token']}", 'Content-Type': 'application/json'}
+
                 # Get orders for this account
                 try:
                     response = requests.get(f'{base_url}/order/list', headers=headers, timeout=5)
                     if response.status_code != 200:
                         continue
-                    
-                    orders = response.json()
-                    order_status_map = {o.get('id'): o.get('ordStatus', '') for o in orders}
+                    order_status_map = {o.get('id'): o.get('ordStatus', '') for o in response.json()}
                 except Exception as e:
-                    logger.debug(f"OCO monitor fetch error for account {account_id}: {e}")
+                    logger.debug(f"OCO fallback fetch error for account {account_id}: {e}")
                     continue
-                
-                # Check each order for this account
+
                 for order_id in order_ids:
-                    if order_id not in pairs_to_check:
-                        continue
-                    
-                    partner_id = pairs_to_check.get(order_id)
-                    details = details_copy.get(order_id, {})
-                    status = order_status_map.get(order_id, '')
-                    
-                    # If order is filled, we need to cancel the partner
-                    if status.lower() == 'filled':
-                        order_type = details.get('type', 'unknown')
-                        symbol = details.get('symbol', 'unknown')
-                        
-                        logger.info(f"🎯 OCO: {order_type.upper()} order {order_id} FILLED for {symbol} (account {account_id})")
-                        logger.info(f"🎯 OCO: Cancelling partner order {partner_id}...")
-                        
-                        partners_to_cancel.append((partner_id, order_id, symbol, account_id, token, env))
-                        orders_to_remove.append(order_id)
-                    
-                    # If order is cancelled/rejected, just remove from monitoring
-                    elif status.lower() in ['canceled', 'cancelled', 'rejected', 'expired']:
-                        orders_to_remove.append(order_id)
-            
-            # Cancel partner orders (using the correct token for each account)
-            for partner_id, filled_id, symbol, account_id, token, env in partners_to_cancel:
-                try:
-                    base_url = 'https://demo.tradovateapi.com/v1' if env == 'demo' else 'https://live.tradovateapi.com/v1'
-                    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-                    
-                    cancel_response = requests.post(
-                        f'{base_url}/order/cancelorder',
-                        json={'orderId': partner_id, 'isAutomated': True},
-                        headers=headers,
-                        timeout=5
-                    )
-                    if cancel_response.status_code == 200:
-                        result = cancel_response.json()
-                        if result.get('errorText'):
-                            logger.warning(f"⚠️ OCO: Cancel returned error for {partner_id}: {result.get('errorText')}")
-                        else:
-                            logger.info(f"✅ OCO: Successfully cancelled partner order {partner_id} for {symbol} (account {account_id})")
-                        
-                        # Emit event to frontend
-                        socketio.emit('oco_triggered', {
-                            'filled_order': filled_id,
-                            'cancelled_order': partner_id,
-                            'symbol': symbol,
-                            'account_id': account_id,
-                            'message': f'OCO triggered: cancelled partner order for {symbol}'
-                        })
-                    else:
-                        logger.warning(f"⚠️ OCO: Failed to cancel partner order {partner_id}: {cancel_response.text[:200]}")
-                except Exception as e:
-                    logger.error(f"❌ OCO: Error cancelling partner order {partner_id}: {e}")
-            
-            # Remove processed orders from monitoring
-            for order_id in orders_to_remove:
-                unregister_oco_pair(order_id)
-            
+                    status = order_status_map.get(order_id, '').lower()
+                    if status == 'filled':
+                        _order_events.handle_order_filled(order_id, source='rest')
+                    elif status in ['canceled', 'cancelled', 'rejected', 'expired']:
+                        unregister_oco_pair(order_id)
+
             time.sleep(1)  # Check every second
-            
+
         except Exception as e:
             logger.error(f"OCO Monitor error: {e}")
             import traceback
             logger.debug(traceback.format_exc())
             time.sleep(2)
 
-# Start OCO monitor thread
+# Start OCO REST fallback thread
 oco_monitor_thread = threading.Thread(target=monitor_oco_orders, daemon=True)
 oco_monitor_thread.start()
 logger.info("🔄 OCO Monitor thread started")
@@ -32397,45 +32854,34 @@ cleanup_thread.start()
 # ============================================================================
 # Break-Even Monitor - Moves SL to entry price when position goes profitable
 # ============================================================================
-
-# Store break-even monitors: {key: {account_id, symbol, entry_price, is_long, activation_ticks, ...}}
-_break_even_monitors = {}
-_break_even_lock = threading.Lock()
+# Rules live in the OrderEventEngine and are evaluated on every price tick
+# (see _trigger_tradovate_break_even below for the broker action).
 
 def register_break_even_monitor(account_id: int, symbol: str, entry_price: float, is_long: bool,
                                  activation_ticks: int, tick_size: float, sl_order_id: int,
                                  quantity: int, account_spec: str):
     """Register a position for break-even monitoring"""
-    global _break_even_monitors
-    
     key = f"{account_id}:{symbol}"
-    
-    with _break_even_lock:
-        _break_even_monitors[key] = {
-            'account_id': account_id,
-            'symbol': symbol,
-            'entry_price': entry_price,
-            'is_long': is_long,
-            'activation_ticks': activation_ticks,
-            'tick_size': tick_size,
-            'sl_order_id': sl_order_id,
-            'quantity': quantity,
-            'account_spec': account_spec,
-            'triggered': False,
-            'created_at': time.time()
-        }
-        
-        activation_price = entry_price + (tick_size * activation_ticks) if is_long else entry_price - (tick_size * activation_ticks)
-        logger.info(f"📊 Break-even monitor registered: {symbol} on account {account_id}")
-        logger.info(f"   Entry: {entry_price}, Activation: {activation_price} ({activation_ticks} ticks)")
+    _order_events.register_rule(key, 'be', {
+        'account_id': account_id,
+        'symbol': symbol,
+        'symbol_root': extract_symbol_root(symbol),
+        'entry_price': entry_price,
+        'is_long': is_long,
+        'activation_ticks': activation_ticks,
+        'tick_size': tick_size,
+        'sl_order_id': sl_order_id,
+        'quantity': quantity,
+        'account_spec': account_spec,
+    })
+
+    activation_price = entry_price + (tick_size * activation_ticks) if is_long else entry_price - (tick_size * activation_ticks)
+    logger.info(f"📊 Break-even monitor registered: {symbol} on account {account_id}")
+    logger.info(f"   Entry: {entry_price}, Activation: {activation_price} ({activation_ticks} ticks)")
 
 def unregister_break_even_monitor(key: str):
     """Remove a break-even monitor"""
-    global _break_even_monitors
-    
-    with _break_even_lock:
-        if key in _break_even_monitors:
-            _break_even_monitors.pop(key)
+    _order_events.unregister_rule(key)
 
 # ============================================================================
 # Signal Blocking - Instant in-memory position tracking for broker-managed exits
@@ -32480,672 +32926,448 @@ def check_signal_blocking(recorder_id, symbol_root):
             return entry
     return None
 
-def monitor_break_even():
+def _trigger_tradovate_break_even(key, monitor, current_price):
     """
-    Background thread that monitors positions for break-even activation.
-    When price reaches activation_ticks profit, cancels old SL and places new SL at entry.
+    OrderEventEngine action for a 'be' rule whose activation price was reached.
+    Confirms the position is still open, cancels the old SL and places a new SL
+    at entry. Returns True when the rule is finished.
     """
-    logger.info("📊 Break-Even Monitor started")
-    
-    while True:
-        try:
-            with _break_even_lock:
-                if not _break_even_monitors:
-                    time.sleep(2)
-                    continue
-                
-                monitors_copy = dict(_break_even_monitors)
-            
-            if not monitors_copy:
-                time.sleep(2)
-                continue
-            
-            # Get tokens from database
-            conn = get_db_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, tradovate_token, environment, tradovate_accounts, subaccounts
-                FROM accounts 
-                WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
-            ''')
-            all_accounts = cursor.fetchall()
-            conn.close()
-            
-            if not all_accounts:
-                time.sleep(2)
-                continue
-            
-            # Build account info map
-            account_info_map = {}
-            for acc in all_accounts:
-                # Get valid token (auto-refreshes if needed)
-                account_record_id = acc['id']
-                token = get_valid_tradovate_token(account_record_id)
-                if not token:
-                    logger.warning(f"No valid token for account record {account_record_id} - skipping")
-                    continue
-                
-                env = acc['environment'] or 'demo'
-                
-                tradovate_accounts_str = acc['tradovate_accounts'] or ''
-                if tradovate_accounts_str:
-                    try:
-                        tradovate_accounts = json.loads(tradovate_accounts_str)
-                        for ta in tradovate_accounts:
-                            acc_id = ta.get('id') or ta.get('accountId')
-                            # CRITICAL FIX: Use environment as source of truth (already have env from acc)
-                            # Prioritize account-level environment over stale ta.is_demo
-                            ta_env = (ta.get('environment') or env or 'demo').lower()
-                            if acc_id:
-                                account_info_map[int(acc_id)] = {'token': token, 'env': ta_env}
-                    except:
-                        pass
-            
-            # Check each monitored position
-            monitors_to_remove = []
-            
-            for key, monitor in monitors_copy.items():
-                if monitor.get('triggered'):
-                    continue
-                
-                account_id = monitor['account_id']
-                symbol = monitor['symbol']
-                entry_price = monitor['entry_price']
-                is_long = monitor['is_long']
-                activation_ticks = monitor['activation_ticks']
-                tick_size = monitor['tick_size']
-                sl_order_id = monitor['sl_order_id']
-                quantity = monitor['quantity']
-                account_spec = monitor['account_spec']
-                
-                acc_info = account_info_map.get(account_id)
-                if not acc_info:
-                    continue
-                
-                token = acc_info['token']
-                env = acc_info['env']
-                base_url = 'https://demo.tradovateapi.com/v1' if env == 'demo' else 'https://live.tradovateapi.com/v1'
-                headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-                
-                try:
-                    # Get current positions
-                    pos_response = requests.get(f'{base_url}/position/list', headers=headers, timeout=5)
-                    if pos_response.status_code != 200:
-                        continue
-                    
-                    positions = pos_response.json()
-                    
-                    # Find matching position
-                    position = None
-                    for p in positions:
-                        if p.get('accountId') == account_id:
-                            pos_symbol = p.get('contractId')  # Need to resolve
-                            # For now, check by netPos direction matching
-                            net_pos = p.get('netPos', 0)
-                            if (is_long and net_pos > 0) or (not is_long and net_pos < 0):
-                                position = p
-                                break
-                    
-                    if not position:
-                        # Position closed, remove monitor
-                        monitors_to_remove.append(key)
-                        continue
-                    
-                    # Get current MARKET price (NOT position.netPrice which is entry price!)
-                    # Use market data cache for real-time prices
-                    symbol_root = extract_symbol_root(symbol)
-                    current_price = None
-                    
-                    # Try market data cache first (real-time WebSocket prices)
-                    if symbol_root in _market_data_cache:
-                        current_price = _market_data_cache[symbol_root].get('last')
-                    
-                    # Try exact symbol match
-                    if not current_price and symbol in _market_data_cache:
-                        current_price = _market_data_cache[symbol].get('last')
-                    
-                    # Fallback to cached price function
-                    if not current_price:
-                        current_price = get_cached_price(symbol)
-                    
-                    # Last resort: try TradingView API
-                    if not current_price:
-                        current_price = get_market_price_simple(symbol)
-                    
-                    if not current_price:
-                        logger.debug(f"Break-even monitor: No market price for {symbol}, skipping check")
-                        continue
-                    
-                    # Calculate profit in ticks
-                    if is_long:
-                        profit_ticks = (current_price - entry_price) / tick_size
-                    else:
-                        profit_ticks = (entry_price - current_price) / tick_size
-                    
-                    # Log monitoring progress (every ~10 seconds)
-                    monitor_age = time.time() - monitor.get('created_at', time.time())
-                    if int(monitor_age) % 10 < 2:  # Log roughly every 10 seconds
-                        logger.debug(f"📊 Break-even monitor: {symbol} | Entry: {entry_price:.2f} | Current: {current_price:.2f} | Profit: {profit_ticks:.1f}/{activation_ticks} ticks")
-                    
-                    # Check if activation threshold reached
-                    if profit_ticks >= activation_ticks:
-                        logger.info(f"🎯 Break-even triggered for {symbol}! Profit: {profit_ticks:.1f} ticks >= {activation_ticks} ticks")
-                        
-                        # Cancel old SL order
-                        if sl_order_id:
-                            cancel_response = requests.post(
-                                f'{base_url}/order/cancelorder',
-                                json={'orderId': sl_order_id, 'isAutomated': True},
-                                headers=headers,
-                                timeout=5
-                            )
-                            if cancel_response.status_code == 200:
-                                logger.info(f"✅ Cancelled old SL order {sl_order_id}")
-                        
-                        # Place new SL at entry price (break-even)
-                        exit_side = 'Sell' if is_long else 'Buy'
-                        new_sl_data = {
-                            "accountSpec": account_spec,
-                            "orderType": "Stop",
-                            "action": exit_side,
-                            "symbol": symbol,
-                            "orderQty": int(quantity),
-                            "stopPrice": float(entry_price),
-                            "timeInForce": "GTC",
-                            "isAutomated": True
-                        }
-                        
-                        sl_response = requests.post(
-                            f'{base_url}/order/placeorder',
-                            json=new_sl_data,
-                            headers=headers,
-                            timeout=5
-                        )
-                        
-                        if sl_response.status_code == 200:
-                            result = sl_response.json()
-                            new_sl_id = result.get('orderId')
-                            logger.info(f"✅ Break-even SL placed at {entry_price}, Order ID: {new_sl_id}")
-                            
-                            # Emit to frontend
-                            socketio.emit('break_even_triggered', {
-                                'symbol': symbol,
-                                'account_id': account_id,
-                                'entry_price': entry_price,
-                                'new_sl_order_id': new_sl_id,
-                                'message': f'Break-even activated for {symbol}'
-                            })
-                        else:
-                            logger.warning(f"⚠️ Failed to place break-even SL: {sl_response.text[:200]}")
-                        
-                        # Mark as triggered
-                        with _break_even_lock:
-                            if key in _break_even_monitors:
-                                _break_even_monitors[key]['triggered'] = True
-                        
-                        monitors_to_remove.append(key)
-                
-                except Exception as e:
-                    logger.debug(f"Break-even monitor error for {key}: {e}")
-                    continue
-            
-            # Remove processed monitors
-            for key in monitors_to_remove:
-                unregister_break_even_monitor(key)
-            
-            time.sleep(2)  # Check every 2 seconds
-            
-        except Exception as e:
-            logger.error(f"Break-Even Monitor error: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
-            time.sleep(3)
+    account_id = monitor['account_id']
+    symbol = monitor['symbol']
+    entry_price = monitor['entry_price']
+    is_long = monitor['is_long']
+    sl_order_id = monitor['sl_order_id']
+
+    account_info_map, _ = _build_tradovate_account_info_map(account_id)
+    acc_info = account_info_map.get(account_id)
+    if not acc_info:
+        return False  # retry on a later tick
+
+    base_url = 'https://demo.tradovateapi.com/v1' if acc_info['env'] == 'demo' else 'https://live.tradovateapi.com/v1'
+    headers = {'Authorization': f"Bearer {acc_info['token']}", 'Content-Type': 'application/json'}
+
+    # Get current positions (accounts on a live socket drop the rule on flat events already)
+    pos_response = requests.get(f'{base_url}/position/list', headers=headers, timeout=5)
+    if pos_response.status_code != 200:
+        return False
+
+    # Find matching position by account + netPos direction
+    position = None
+    for p in pos_response.json():
+        if p.get('accountId') == account_id:
+            net_pos = p.get('netPos', 0)
+            if (is_long and net_pos > 0) or (not is_long and net_pos < 0):
+                position = p
+                break
+
+    if not position:
+        # Position closed, remove monitor
+        return True
+
+    logger.info(f"🎯 Break-even triggered for {symbol}! Price {current_price} reached {monitor['activation_ticks']} ticks")
+
+    # Cancel old SL order
+    if sl_order_id:
+        cancel_response = requests.post(
+            f'{base_url}/order/cancelorder',
+            json={'orderId': sl_order_id, 'isAutomated': True},
+            headers=headers,
+            timeout=5
+        )
+        if cancel_response.status_code == 200:
+            logger.info(f"✅ Cancelled old SL order {sl_order_id}")
+
+    # Place new SL at entry price (break-even)
+    exit_side = 'Sell' if is_long else 'Buy'
+    new_sl_data = {
+        "accountSpec": monitor['account_spec'],
+        "orderType": "Stop",
+        "action": exit_side,
+        "symbol": symbol,
+        "orderQty": int(monitor['quantity']),
+        "stopPrice": float(entry_price),
+        "timeInForce": "GTC",
+        "isAutomated": True
+    }
 
-# Start break-even monitor thread
-break_even_thread = threading.Thread(target=monitor_break_even, daemon=True)
-break_even_thread.start()
-logger.info("📊 Break-Even Monitor thread started")
+    sl_response = requests.post(
+        f'{base_url}/order/placeorder',
+        json=new_sl_data,
+        headers=headers,
+        timeout=5
+    )
+
+    if sl_response.status_code == 200:
+        result = sl_response.json()
+        new_sl_id = result.get('orderId')
+        logger.info(f"✅ Break-even SL placed at {entry_price}, Order ID: {new_sl_id}")
+
+        # Emit to frontend
+        socketio.emit('break_even_triggered', {
+            'symbol': symbol,
+            'account_id': account_id,
+            'entry_price': entry_price,
+            'new_sl_order_id': new_sl_id,
+            'message': f'Break-even activated for {symbol}'
+        })
+    else:
+        logger.warning(f"⚠️ Failed to place break-even SL: {sl_response.text[:200]}")
+
+    return True
 
 # ============================================================================
 # ProjectX Break-Even Safety-Net Monitor (No native BE support)
 # ============================================================================
 # ProjectX bracket API only accepts ticks + type — no break-even.
-# This daemon polls price via get_cached_price (0 broker API calls),
+# Rules are evaluated on price ticks by the OrderEventEngine (0 broker API calls),
 # and on trigger: cancel old SL + place new SL at entry (3 broker calls, once).
-_projectx_break_even_monitors = {}
-_projectx_break_even_lock = threading.Lock()
+# Rules are mirrored to Redis, so they carry the accounts row id, never a token
+# or API key; credentials are read when the rule fires.
 
 def register_projectx_break_even_monitor(account_id: int, contract_id: str, symbol_root: str,
                                           entry_price: float, is_long: bool, activation_ticks: int,
                                           offset_ticks: int, tick_size: float, quantity: int,
-                                          session_token: str, base_url: str, prop_firm: str,
-                                          username: str, api_key: str):
-    """Register a ProjectX position for break-even monitoring"""
+                                          account_record_id: int, base_url: str, prop_firm: str):
+    """Register a ProjectX position for break-even monitoring (account_record_id = accounts.id)"""
     key = f"px:{account_id}:{contract_id}"
-    with _projectx_break_even_lock:
-        _projectx_break_even_monitors[key] = {
-            'account_id': account_id,
-            'contract_id': contract_id,
-            'symbol_root': symbol_root,
-            'entry_price': entry_price,
-            'is_long': is_long,
-            'activation_ticks': activation_ticks,
-            'offset_ticks': offset_ticks,
-            'tick_size': tick_size,
-            'quantity': quantity,
-            'session_token': session_token,
-            'base_url': base_url,
-            'prop_firm': prop_firm,
-            'username': username,
-            'api_key': api_key,
-            'triggered': False,
-            'created_at': time.time()
-        }
+    _order_events.register_rule(key, 'px_be', {
+        'account_id': account_id,
+        'contract_id': contract_id,
+        'symbol_root': symbol_root,
+        'entry_price': entry_price,
+        'is_long': is_long,
+        'activation_ticks': activation_ticks,
+        'offset_ticks': offset_ticks,
+        'tick_size': tick_size,
+        'quantity': quantity,
+        'account_record_id': account_record_id,
+        'base_url': base_url,
+        'prop_firm': prop_firm,
+    })
     activation_price = entry_price + (tick_size * activation_ticks) if is_long else entry_price - (tick_size * activation_ticks)
     logger.info(f"📊 ProjectX break-even monitor registered: {symbol_root} on account {account_id}")
     logger.info(f"   Entry: {entry_price}, Activation: {activation_price} ({activation_ticks} ticks)")
 
 def unregister_projectx_break_even_monitor(key: str):
     """Remove a ProjectX break-even monitor"""
-    with _projectx_break_even_lock:
-        _projectx_break_even_monitors.pop(key, None)
+    _order_events.unregister_rule(key)
 
-def monitor_projectx_break_even():
+def _projectx_monitor_headers(monitor, relogin=False):
     """
-    Background thread that monitors ProjectX positions for break-even activation.
-    Uses get_cached_price() for price (0 broker API calls per cycle).
-    On trigger: searchOpen → cancel SL → place new SL at entry (3 calls, once).
+    Bearer headers for a px_be / px_trail rule, or None. Credentials come from the
+    rule's accounts row and the token from the cached broker session (the same
+    lease the recorder traded on); relogin forces a fresh login after a 401.
     """
-    logger.info("📊 ProjectX Break-Even Monitor started")
-
-    while True:
-        try:
-            with _projectx_break_even_lock:
-                if not _projectx_break_even_monitors:
-                    time.sleep(2)
-                    continue
-                monitors_copy = dict(_projectx_break_even_monitors)
-
-            monitors_to_remove = []
-
-            for key, monitor in monitors_copy.items():
-                if monitor.get('triggered'):
-                    continue
-
-                symbol_root = monitor['symbol_root']
-                entry_price = monitor['entry_price']
-                is_long = monitor['is_long']
-                activation_ticks = monitor['activation_ticks']
-                offset_ticks = monitor['offset_ticks']
-                tick_size = monitor['tick_size']
-                quantity = monitor['quantity']
-                contract_id = monitor['contract_id']
-                account_id = monitor['account_id']
-                session_token = monitor['session_token']
-                base_url = monitor['base_url']
-
-                # Get current price (Yahoo/TradingView — 0 broker API calls)
-                current_price = get_cached_price(symbol_root)
-                if not current_price:
-                    continue
-
-                # Calculate profit in ticks
-                if is_long:
-                    profit_ticks = (current_price - entry_price) / tick_size
-                else:
-                    profit_ticks = (entry_price - current_price) / tick_size
-
-                # Debug logging every ~10 seconds
-                monitor_age = time.time() - monitor.get('created_at', time.time())
-                if int(monitor_age) % 10 < 2:
-                    logger.debug(f"📊 ProjectX BE monitor: {symbol_root} | Entry: {entry_price:.2f} | Current: {current_price:.2f} | Profit: {profit_ticks:.1f}/{activation_ticks} ticks")
-
-                if profit_ticks < activation_ticks:
-                    continue
-
-                # === TRIGGERED ===
-                logger.info(f"🎯 ProjectX break-even triggered for {symbol_root}! Profit: {profit_ticks:.1f} ticks >= {activation_ticks} ticks")
-                headers = {'Authorization': f'Bearer {session_token}', 'Content-Type': 'application/json'}
-
-                try:
-                    # Step 1: Find open SL orders for this contract
-                    search_resp = requests.post(
-                        f'{base_url}/Order/searchOpen',
-                        json={'accountId': account_id},
-                        headers=headers, timeout=5
-                    )
+    record_id = monitor.get('account_record_id')
+    if not record_id:
+        return None
+    ph = '%s' if is_using_postgres() else '?'
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT username, password, api_key, environment, projectx_username, projectx_api_key, projectx_prop_firm
+        FROM accounts WHERE id = {ph}
+    ''', (record_id,))
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+    row = dict(row)
+    # Same precedence as recorder_service.do_trade_projectx, so both share one cached session
+    username = row.get('username') or row.get('projectx_username')
+    password = row.get('password') or None
+    api_key = row.get('api_key') or row.get('projectx_api_key') or None
+    if not username or not (password or api_key):
+        return None
+    is_demo = (row.get('environment') or 'demo').lower() != 'live'
 
-                    if search_resp.status_code == 401:
-                        # Re-authenticate
-                        logger.info(f"🔑 ProjectX BE monitor: re-authenticating for account {account_id}")
-                        auth_resp = requests.post(
-                            f'{base_url}/Auth/loginKey',
-                            json={'userName': monitor['username'], 'apiKey': monitor['api_key']},
-                            headers={'Content-Type': 'application/json'}, timeout=5
-                        )
-                        if auth_resp.status_code == 200:
-                            new_token = auth_resp.json().get('token')
-                            if new_token:
-                                monitor['session_token'] = new_token
-                                session_token = new_token
-                                with _projectx_break_even_lock:
-                                    if key in _projectx_break_even_monitors:
-                                        _projectx_break_even_monitors[key]['session_token'] = new_token
-                                headers = {'Authorization': f'Bearer {new_token}', 'Content-Type': 'application/json'}
-                                search_resp = requests.post(
-                                    f'{base_url}/Order/searchOpen',
-                                    json={'accountId': account_id},
-                                    headers=headers, timeout=5
-                                )
+    async def session_token():
+        async with _broker_sessions.projectx(username, password=password, api_key=api_key, demo=is_demo,
+                                             prop_firm=row.get('projectx_prop_firm', 'default')) as (projectx, _):
+            if projectx is None:
+                return None
+            if relogin:
+                login_result = await projectx.login(username, password=password, api_key=api_key)
+                if not login_result.get('success'):
+                    return None
+            return projectx.session_token
 
-                    if search_resp.status_code != 200:
-                        logger.warning(f"⚠️ ProjectX BE: searchOpen failed ({search_resp.status_code})")
-                        continue
+    token = _broker_sessions.run(session_token())
+    if not token:
+        return None
+    return {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+def _projectx_search_open(key, monitor, headers):
+    """POST Order/searchOpen, logging in again once on 401. Returns (response, headers)."""
+    base_url = monitor['base_url']
+    account_id = monitor['account_id']
+    search_resp = requests.post(
+        f'{base_url}/Order/searchOpen',
+        json={'accountId': account_id},
+        headers=headers, timeout=5
+    )
 
-                    open_orders = search_resp.json() if isinstance(search_resp.json(), list) else search_resp.json().get('orders', [])
-
-                    # Step 2: Cancel matching SL orders (type 4=StopMarket, 5=StopLimit)
-                    sl_cancelled = 0
-                    for order in open_orders:
-                        order_contract = str(order.get('contractId', ''))
-                        order_type = order.get('type', 0)
-                        if order_contract == str(contract_id) and order_type in (4, 5):
-                            cancel_resp = requests.post(
-                                f'{base_url}/Order/cancel',
-                                json={'orderId': order.get('id')},
-                                headers=headers, timeout=5
-                            )
-                            if cancel_resp.status_code == 200:
-                                sl_cancelled += 1
-                                logger.info(f"✅ ProjectX BE: Cancelled SL order {order.get('id')}")
-                            else:
-                                logger.warning(f"⚠️ ProjectX BE: Cancel SL {order.get('id')} failed ({cancel_resp.status_code})")
+    if search_resp.status_code == 401:
+        logger.info(f"🔑 ProjectX monitor: re-authenticating for account {account_id}")
+        new_headers = _projectx_monitor_headers(monitor, relogin=True)
+        if new_headers:
+            headers = new_headers
+            search_resp = requests.post(
+                f'{base_url}/Order/searchOpen',
+                json={'accountId': account_id},
+                headers=headers, timeout=5
+            )
 
-                    # Step 3: Place new SL at break-even price
-                    if is_long:
-                        stop_price = entry_price + (offset_ticks * tick_size)
-                    else:
-                        stop_price = entry_price - (offset_ticks * tick_size)
-                    stop_price = round(round(stop_price / tick_size) * tick_size, 10)  # Rule 2: tick rounding
-
-                    exit_side = "Sell" if is_long else "Buy"
-                    new_sl_data = {
-                        'accountId': account_id,
-                        'contractId': contract_id,
-                        'type': 4,  # StopMarket
-                        'side': exit_side,
-                        'size': int(quantity),
-                        'stopPrice': float(stop_price),
-                        'timeInForce': 'GTC'
-                    }
+    return search_resp, headers
 
-                    sl_resp = requests.post(
-                        f'{base_url}/Order/place',
-                        json=new_sl_data,
-                        headers=headers, timeout=5
-                    )
+def _projectx_open_orders(key, monitor, headers, label):
+    """
+    Open orders for a px_be / px_trail rule from Order/searchOpen. Cancel/replace
+    always asks REST: the SignalR snapshot misses an SL placed moments ago until
+    its push arrives, so acting on it could leave two stops working.
+    """
+    search_resp, headers = _projectx_search_open(key, monitor, headers)
+    if search_resp.status_code != 200:
+        logger.warning(f"⚠️ ProjectX {label}: searchOpen failed ({search_resp.status_code})")
+        return None, headers
+    body = search_resp.json()
+    return (body if isinstance(body, list) else body.get('orders', [])), headers
+
+def _trigger_projectx_break_even(key, monitor, current_price):
+    """
+    OrderEventEngine action for a 'px_be' rule.
+    searchOpen → cancel SL → place new SL at entry (+offset). Returns True when finished.
+    """
+    symbol_root = monitor['symbol_root']
+    entry_price = monitor['entry_price']
+    is_long = monitor['is_long']
+    tick_size = monitor['tick_size']
+    offset_ticks = monitor['offset_ticks']
+    contract_id = monitor['contract_id']
+    account_id = monitor['account_id']
+    base_url = monitor['base_url']
+
+    if not monitor.get('account_record_id'):
+        # Registered before rules stopped carrying credentials - nothing to log in with
+        logger.warning(f"⚠️ ProjectX BE: rule {key} has no account record - dropped")
+        return True
 
-                    if sl_resp.status_code == 200:
-                        new_sl_id = sl_resp.json().get('id') or sl_resp.json().get('orderId')
-                        logger.info(f"✅ ProjectX break-even SL placed at {stop_price}, Order ID: {new_sl_id}")
-                        socketio.emit('break_even_triggered', {
-                            'symbol': symbol_root,
-                            'account_id': account_id,
-                            'entry_price': entry_price,
-                            'new_sl_order_id': new_sl_id,
-                            'message': f'ProjectX break-even activated for {symbol_root}'
-                        })
-                    else:
-                        logger.warning(f"⚠️ ProjectX BE: Place SL failed ({sl_resp.status_code}): {sl_resp.text[:200]}")
+    logger.info(f"🎯 ProjectX break-even triggered for {symbol_root}! Price {current_price} reached {monitor['activation_ticks']} ticks")
+    headers = _projectx_monitor_headers(monitor)
+    if headers is None:
+        logger.warning(f"⚠️ ProjectX BE: no session for account {account_id}")
+        return False
 
-                    # Mark triggered and queue for removal
-                    with _projectx_break_even_lock:
-                        if key in _projectx_break_even_monitors:
-                            _projectx_break_even_monitors[key]['triggered'] = True
-                    monitors_to_remove.append(key)
+    # Step 1: Find open SL orders for this contract
+    open_orders, headers = _projectx_open_orders(key, monitor, headers, 'BE')
+    if open_orders is None:
+        return False
 
-                except Exception as trigger_err:
-                    logger.warning(f"⚠️ ProjectX BE trigger error for {key}: {trigger_err}")
-                    continue
+    # Step 2: Cancel matching SL orders (type 4=StopMarket, 5=StopLimit)
+    for order in open_orders:
+        order_contract = str(order.get('contractId', ''))
+        order_type = order.get('type', 0)
+        if order_contract == str(contract_id) and order_type in (4, 5):
+            cancel_resp = requests.post(
+                f'{base_url}/Order/cancel',
+                json={'orderId': order.get('id')},
+                headers=headers, timeout=5
+            )
+            if cancel_resp.status_code == 200:
+                logger.info(f"✅ ProjectX BE: Cancelled SL order {order.get('id')}")
+            else:
+                logger.warning(f"⚠️ ProjectX BE: Cancel SL {order.get('id')} failed ({cancel_resp.status_code})")
 
-            # Remove processed monitors
-            for key in monitors_to_remove:
-                unregister_projectx_break_even_monitor(key)
+    # Step 3: Place new SL at break-even price
+    if is_long:
+        stop_price = entry_price + (offset_ticks * tick_size)
+    else:
+        stop_price = entry_price - (offset_ticks * tick_size)
+    stop_price = round(round(stop_price / tick_size) * tick_size, 10)  # Rule 2: tick rounding
+
+    exit_side = "Sell" if is_long else "Buy"
+    new_sl_data = {
+        'accountId': account_id,
+        'contractId': contract_id,
+        'type': 4,  # StopMarket
+        'side': exit_side,
+        'size': int(monitor['quantity']),
+        'stopPrice': float(stop_price),
+        'timeInForce': 'GTC'
+    }
 
-            time.sleep(2)
+    sl_resp = requests.post(
+        f'{base_url}/Order/place',
+        json=new_sl_data,
+        headers=headers, timeout=5
+    )
 
-        except Exception as e:
-            logger.error(f"ProjectX Break-Even Monitor error: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
-            time.sleep(3)
+    if sl_resp.status_code == 200:
+        new_sl_id = sl_resp.json().get('id') or sl_resp.json().get('orderId')
+        logger.info(f"✅ ProjectX break-even SL placed at {stop_price}, Order ID: {new_sl_id}")
+        socketio.emit('break_even_triggered', {
+            'symbol': symbol_root,
+            'account_id': account_id,
+            'entry_price': entry_price,
+            'new_sl_order_id': new_sl_id,
+            'message': f'ProjectX break-even activated for {symbol_root}'
+        })
+    else:
+        logger.warning(f"⚠️ ProjectX BE: Place SL failed ({sl_resp.status_code}): {sl_resp.text[:200]}")
 
-# Start ProjectX break-even monitor thread
-_projectx_be_thread = threading.Thread(target=monitor_projectx_break_even, daemon=True)
-_projectx_be_thread.start()
-logger.info("📊 ProjectX Break-Even Monitor thread started")
+    return True
 
 # ============================================================================
 # ProjectX Trailing Stop Emulator (Cancel/Replace)
 # ============================================================================
 # ProjectX type=5 trailing stop is BROKEN on buy/long side (inverts direction).
-# This daemon emulates trailing stops by polling price via get_cached_price
-# (0 broker API calls per cycle) and on SL move: cancel old SL + place new SL.
-_projectx_trailing_monitors = {}
-_projectx_trailing_lock = threading.Lock()
+# The OrderEventEngine tracks best price / activation on every tick and only
+# calls _move_projectx_trailing_stop when the SL should move:
+# cancel old SL + place new SL.
 
 def register_projectx_trailing_monitor(account_id, contract_id, symbol_root,
                                          entry_price, is_long, activation_ticks,
                                          offset_ticks, frequency_ticks, tick_size,
-                                         quantity, session_token, base_url,
-                                         prop_firm, username, api_key):
-    """Register a ProjectX position for trailing stop monitoring"""
+                                         quantity, account_record_id, base_url,
+                                         prop_firm):
+    """Register a ProjectX position for trailing stop monitoring (account_record_id = accounts.id)"""
     key = f"px_trail:{account_id}:{contract_id}"
-    with _projectx_trailing_lock:
-        _projectx_trailing_monitors[key] = {
-            'account_id': account_id,
-            'contract_id': contract_id,
-            'symbol_root': symbol_root,
-            'entry_price': entry_price,
-            'is_long': is_long,
-            'activation_ticks': activation_ticks,
-            'offset_ticks': offset_ticks,
-            'frequency_ticks': frequency_ticks,
-            'tick_size': tick_size,
-            'quantity': quantity,
-            'session_token': session_token,
-            'base_url': base_url,
-            'prop_firm': prop_firm,
-            'username': username,
-            'api_key': api_key,
-            'best_price': entry_price,
-            'trail_active': activation_ticks == 0,
-            'last_sl_price': None,
-            'created_at': time.time()
-        }
+    _order_events.register_rule(key, 'px_trail', {
+        'account_id': account_id,
+        'contract_id': contract_id,
+        'symbol_root': symbol_root,
+        'entry_price': entry_price,
+        'is_long': is_long,
+        'activation_ticks': activation_ticks,
+        'offset_ticks': offset_ticks,
+        'frequency_ticks': frequency_ticks,
+        'tick_size': tick_size,
+        'quantity': quantity,
+        'account_record_id': account_record_id,
+        'base_url': base_url,
+        'prop_firm': prop_firm,
+        'best_price': entry_price,
+        'trail_active': activation_ticks == 0,
+        'last_sl_price': None,
+    })
     logger.info(f"📊 ProjectX trailing monitor registered: {symbol_root} on account {account_id}")
     logger.info(f"   Entry: {entry_price}, Offset: {offset_ticks}t, Trigger: {activation_ticks}t, Freq: {frequency_ticks}t")
 
 def unregister_projectx_trailing_monitor(key):
-    with _projectx_trailing_lock:
-        _projectx_trailing_monitors.pop(key, None)
+    _order_events.unregister_rule(key)
 
-def monitor_projectx_trailing():
+def _move_projectx_trailing_stop(key, mon, current_price):
     """
-    Background thread emulating trailing stops for ProjectX.
-    Polls get_cached_price (0 broker API calls per cycle).
-    On SL move: searchOpen -> cancel type 4/5 -> place type 4 (3 calls).
+    OrderEventEngine action for a 'px_trail' rule whose SL should move to
+    mon['pending_sl_price']. searchOpen -> cancel type 4/5 -> place type 4.
+    Returns True when the position looks closed (rule finished).
     """
-    logger.info("📊 ProjectX Trailing Stop Emulator started")
-
-    while True:
-        try:
-            with _projectx_trailing_lock:
-                if not _projectx_trailing_monitors:
-                    time.sleep(2)
-                    continue
-                monitors_copy = dict(_projectx_trailing_monitors)
-
-            monitors_to_remove = []
-
-            for key, mon in monitors_copy.items():
-                symbol_root = mon['symbol_root']
-                entry_price = mon['entry_price']
-                is_long = mon['is_long']
-                tick_size = mon['tick_size']
-                offset_ticks = mon['offset_ticks']
-                activation_ticks = mon['activation_ticks']
-                frequency_ticks = mon['frequency_ticks']
-                contract_id = mon['contract_id']
-                account_id = mon['account_id']
-                session_token = mon['session_token']
-                base_url = mon['base_url']
-
-                # 24h staleness cleanup
-                if time.time() - mon['created_at'] > 86400:
-                    logger.info(f"🧹 ProjectX trailing monitor expired (24h): {key}")
-                    monitors_to_remove.append(key)
-                    continue
+    symbol_root = mon['symbol_root']
+    contract_id = mon['contract_id']
+    base_url = mon['base_url']
+    new_sl = mon['pending_sl_price']
+    last_sl = mon.get('last_sl_price')
+
+    if not mon.get('account_record_id'):
+        # Registered before rules stopped carrying credentials - nothing to log in with
+        logger.warning(f"⚠️ ProjectX trail: rule {key} has no account record - dropped")
+        return True
 
-                # Get current price (TradingView cache — 0 broker API calls)
-                current_price = get_cached_price(symbol_root)
-                if not current_price:
-                    continue
+    headers = _projectx_monitor_headers(mon)
+    if headers is None:
+        logger.warning(f"⚠️ ProjectX trail: no session for account {mon['account_id']}")
+        return False
 
-                # Update best_price (most favorable for our side)
-                best_price = mon['best_price']
-                if is_long:
-                    if current_price > best_price:
-                        best_price = current_price
-                        with _projectx_trailing_lock:
-                            if key in _projectx_trailing_monitors:
-                                _projectx_trailing_monitors[key]['best_price'] = best_price
-                else:
-                    if current_price < best_price:
-                        best_price = current_price
-                        with _projectx_trailing_lock:
-                            if key in _projectx_trailing_monitors:
-                                _projectx_trailing_monitors[key]['best_price'] = best_price
-
-                # Check activation
-                if not mon['trail_active']:
-                    if is_long:
-                        profit_ticks = (best_price - entry_price) / tick_size
-                    else:
-                        profit_ticks = (entry_price - best_price) / tick_size
-                    if profit_ticks >= activation_ticks:
-                        with _projectx_trailing_lock:
-                            if key in _projectx_trailing_monitors:
-                                _projectx_trailing_monitors[key]['trail_active'] = True
-                        mon['trail_active'] = True
-                        logger.info(f"🎯 ProjectX trailing ACTIVATED: {symbol_root} ({profit_ticks:.1f} >= {activation_ticks} ticks)")
-                    else:
-                        continue
+    # Step 1: open orders (streamed, or searchOpen)
+    open_orders, headers = _projectx_open_orders(key, mon, headers, 'trail')
+    if open_orders is None:
+        return False
 
-                # Calculate new SL price
-                sl_distance = offset_ticks * tick_size
-                if is_long:
-                    new_sl = best_price - sl_distance
-                else:
-                    new_sl = best_price + sl_distance
-                new_sl = round(round(new_sl / tick_size) * tick_size, 10)
-
-                # Only move SL in favorable direction
-                last_sl = mon['last_sl_price']
-                should_update = False
-                if last_sl is None:
-                    should_update = True
-                elif is_long and new_sl > last_sl:
-                    if frequency_ticks == 0 or (new_sl - last_sl) / tick_size >= frequency_ticks:
-                        should_update = True
-                elif not is_long and new_sl < last_sl:
-                    if frequency_ticks == 0 or (last_sl - new_sl) / tick_size >= frequency_ticks:
-                        should_update = True
-
-                if not should_update:
-                    continue
+    # Step 2: Cancel existing SL orders for this contract
+    sl_cancelled = 0
+    for order in open_orders:
+        if str(order.get('contractId', '')) == str(contract_id) and order.get('type', 0) in (4, 5):
+            cancel_resp = requests.post(f'{base_url}/Order/cancel',
+                json={'orderId': order.get('id')}, headers=headers, timeout=5)
+            if cancel_resp.status_code == 200:
+                sl_cancelled += 1
+
+    # If no SL orders found after first placement, position likely closed
+    if sl_cancelled == 0 and last_sl is not None:
+        logger.info(f"📊 ProjectX trail: No SL orders found for {symbol_root} — position likely closed")
+        return True
 
-                # === CANCEL/REPLACE SL ===
-                headers = {'Authorization': f'Bearer {session_token}', 'Content-Type': 'application/json'}
-
-                # Step 1: searchOpen
-                search_resp = requests.post(f'{base_url}/Order/searchOpen',
-                    json={'accountId': account_id}, headers=headers, timeout=5)
-
-                if search_resp.status_code == 401:
-                    auth_resp = requests.post(f'{base_url}/Auth/loginKey',
-                        json={'userName': mon['username'], 'apiKey': mon['api_key']},
-                        headers={'Content-Type': 'application/json'}, timeout=5)
-                    if auth_resp.status_code == 200:
-                        new_token = auth_resp.json().get('token')
-                        if new_token:
-                            session_token = new_token
-                            with _projectx_trailing_lock:
-                                if key in _projectx_trailing_monitors:
-                                    _projectx_trailing_monitors[key]['session_token'] = new_token
-                            headers = {'Authorization': f'Bearer {new_token}', 'Content-Type': 'application/json'}
-                            search_resp = requests.post(f'{base_url}/Order/searchOpen',
-                                json={'accountId': account_id}, headers=headers, timeout=5)
-
-                if search_resp.status_code != 200:
-                    logger.warning(f"⚠️ ProjectX trail: searchOpen failed ({search_resp.status_code})")
-                    continue
+    # Step 3: Place new SL
+    exit_side = 1 if mon['is_long'] else 0
+    new_sl_data = {
+        'accountId': mon['account_id'],
+        'contractId': contract_id,
+        'type': 4,
+        'side': exit_side,
+        'size': int(mon['quantity']),
+        'stopPrice': float(new_sl)
+    }
+    sl_resp = requests.post(f'{base_url}/Order/place',
+        json=new_sl_data, headers=headers, timeout=5)
 
-                open_orders = search_resp.json() if isinstance(search_resp.json(), list) else search_resp.json().get('orders', [])
-
-                # Step 2: Cancel existing SL orders for this contract
-                sl_cancelled = 0
-                for order in open_orders:
-                    if str(order.get('contractId', '')) == str(contract_id) and order.get('type', 0) in (4, 5):
-                        cancel_resp = requests.post(f'{base_url}/Order/cancel',
-                            json={'orderId': order.get('id')}, headers=headers, timeout=5)
-                        if cancel_resp.status_code == 200:
-                            sl_cancelled += 1
-
-                # If no SL orders found after first placement, position likely closed
-                if sl_cancelled == 0 and last_sl is not None:
-                    logger.info(f"📊 ProjectX trail: No SL orders found for {symbol_root} — position likely closed")
-                    monitors_to_remove.append(key)
-                    continue
+    if sl_resp.status_code == 200:
+        _order_events.update_rule(key, last_sl_price=new_sl)
+        logger.info(f"📊 ProjectX trail SL moved: {symbol_root} -> {new_sl} (best={mon['best_price']}, offset={mon['offset_ticks']}t)")
+    else:
+        logger.warning(f"⚠️ ProjectX trail: Place SL failed ({sl_resp.status_code})")
+    return False
+
+def _order_event_price(symbol_root):
+    """Price for symbols that stopped ticking: real-time cache first, then cached API price."""
+    cached = _market_data_cache.get(symbol_root) or {}
+    return cached.get('last') or get_cached_price(symbol_root)
+
+# Wire broker actions into the engine and restore persisted OCO pairs / rules
+_order_events.set_handlers(
+    oco=_oco_cancel_partner,
+    price={
+        'be': _trigger_tradovate_break_even,
+        'px_be': _trigger_projectx_break_even,
+        'px_trail': _move_projectx_trailing_stop,
+    },
+    price_source=_order_event_price,
+)
+_order_events.start()
+logger.info("📊 Order event engine started (OCO / break-even / ProjectX trailing)")
 
-                # Step 3: Place new SL
-                exit_side = 1 if is_long else 0
-                new_sl_data = {
-                    'accountId': account_id,
-                    'contractId': contract_id,
-                    'type': 4,
-                    'side': exit_side,
-                    'size': int(mon['quantity']),
-                    'stopPrice': float(new_sl)
-                }
-                sl_resp = requests.post(f'{base_url}/Order/place',
-                    json=new_sl_data, headers=headers, timeout=5)
-
-                if sl_resp.status_code == 200:
-                    with _projectx_trailing_lock:
-                        if key in _projectx_trailing_monitors:
-                            _projectx_trailing_monitors[key]['last_sl_price'] = new_sl
-                    logger.info(f"📊 ProjectX trail SL moved: {symbol_root} -> {new_sl} (best={best_price}, offset={offset_ticks}t)")
-                else:
-                    logger.warning(f"⚠️ ProjectX trail: Place SL failed ({sl_resp.status_code})")
+def _on_projectx_stream_push(account_id, kind, data):
+    """ProjectX position pushed flat -> drop its break-even / trailing rules (no REST round-trip to find out)."""
+    if kind != 'position' or data.get('size', 0) or not data.get('contractId'):
+        return
+    rules = _order_events.get_rules_snapshot()
+    for key in (f"px:{account_id}:{data['contractId']}", f"px_trail:{account_id}:{data['contractId']}"):
+        if key in rules:
+            logger.info(f"📊 ProjectX rule {key} dropped: position flat (stream)")
+            _order_events.unregister_rule(key)
 
-            # Cleanup
-            for key in monitors_to_remove:
-                unregister_projectx_trailing_monitor(key)
+_broker_sessions.add_stream_listener(_on_projectx_stream_push)
 
-            time.sleep(2)
+# ============================================================================
+# Daily-loss risk engine - shared by the paper monitor, ws_position_monitor,
+# live_max_loss_monitor and the recorder_service safety net (risk_engine.py)
+# ============================================================================
+from risk_engine import get_risk_engine
+_risk_engine = get_risk_engine(get_db_connection, is_using_postgres)
 
-        except Exception as e:
-            logger.error(f"ProjectX Trailing Stop Emulator error: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
-            time.sleep(3)
+def _risk_flatten_paper(position, price, breach):
+    """Close one paper trade for a recorder that breached max_daily_loss."""
+    price = price or _get_live_price_for_symbol(position['symbol'])
+    if not price:
+        return False
+    _close_paper_trade_tpsl(position['trade_id'], price, 'max_loss', position['recorder_ids'][0],
+                            position['side'], position['entry_price'], position['qty'], position['symbol'])
+    print(f"   💀 Auto-closed {position['side']} {position['symbol']} @ {price:.2f} "
+          f"[{breach.get('name')}] (daily P&L ${breach.get('total', 0):.2f})", flush=True)
+    return True
 
-# Start ProjectX trailing stop emulator thread
-_projectx_trail_thread = threading.Thread(target=monitor_projectx_trailing, daemon=True)
-_projectx_trail_thread.start()
-logger.info("📊 ProjectX Trailing Stop Emulator thread started")
+_risk_engine.set_flatten_handler('paper', _risk_flatten_paper)
+_risk_engine.set_price_source(_get_live_price_for_symbol, symbol_root=extract_symbol_root)
+_risk_engine.start()
 
 # Redis break-even request listener (receives requests from trading engine process)
 def _break_even_redis_listener():
@@ -33189,18 +33411,11 @@ if _EXTERNAL_ENGINE:
 # Tradovate PnL Fetching (Direct from API - No Market Data Required!)
 # ============================================================================
 
-# Cache for Tradovate PnL data
-# RESET on every server start to avoid stale data
-_tradovate_pnl_cache = {
-    'last_fetch': 0,
-    'data': {},
-    'positions': [],
-    'account_count': 10,  # Start slower (2 second interval) to avoid rate limits
-    'rate_limited_until': 0  # Timestamp when rate limit expires
-}
+# Live per-subaccount cashBalance + positions (WebSocket first, REST for stale accounts)
+_account_snapshots = get_account_snapshots()
 
-# Track last refresh attempt per account to avoid hammering API
-_last_refresh_attempt = {}
+# Tradovate tokens: in-memory, renewed once per credential group before expiry
+_token_manager = get_token_manager(get_db_connection, is_using_postgres)
 
 def get_valid_tradovate_token(account_id: int) -> str | None:
     """
@@ -33209,88 +33424,7 @@ def get_valid_tradovate_token(account_id: int) -> str | None:
     Returns the access token string, or None if unavailable.
     """
     try:
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT tradovate_token, tradovate_refresh_token, token_expires_at, name
-            FROM accounts WHERE id = ?
-        ''', (account_id,))
-        account = cursor.fetchone()
-        conn.close()
-        
-        if not account or not account['tradovate_token']:
-            logger.debug(f"No access token found for account {account_id}")
-            return None
-        
-        access_token = account['tradovate_token']
-        refresh_token = account['tradovate_refresh_token']
-        expires_at_str = account['token_expires_at']
-        
-        # Check if token needs refresh
-        needs_refresh = False
-        if not expires_at_str:
-            # No expiration time stored - refresh to be safe
-            logger.debug(f"Account {account_id} has no expiration time - refreshing token")
-            needs_refresh = True
-        else:
-            try:
-                from datetime import datetime as dt_class, timedelta
-                import datetime as dt_module
-                
-                # Handle both string and datetime objects (PostgreSQL returns datetime directly)
-                # Use multiple checks because isinstance can fail with some DB drivers
-                if isinstance(expires_at_str, (dt_class, dt_module.datetime)):
-                    expires_at = expires_at_str
-                elif hasattr(expires_at_str, 'strftime'):
-                    # Has datetime-like methods - treat as datetime
-                    expires_at = expires_at_str
-                elif isinstance(expires_at_str, str):
-                    expires_at = dt_class.strptime(expires_at_str, '%Y-%m-%d %H:%M:%S')
-                else:
-                    # Unknown type - try to convert to string first
-                    expires_at = dt_class.strptime(str(expires_at_str), '%Y-%m-%d %H:%M:%S')
-                
-                # Make both naive for comparison (strip timezone if present)
-                if hasattr(expires_at, 'tzinfo') and expires_at.tzinfo is not None:
-                    expires_at = expires_at.replace(tzinfo=None)
-                now = dt_class.now()
-                
-                # Refresh if expired or expiring within 15 minutes
-                time_until_expiry = (expires_at - now).total_seconds()
-                if time_until_expiry <= 0:
-                    logger.info(f"Token for account {account_id} is expired - refreshing")
-                    needs_refresh = True
-                elif time_until_expiry < 15 * 60:  # Less than 15 minutes
-                    logger.info(f"Token for account {account_id} expires in {int(time_until_expiry/60)} minutes - refreshing proactively")
-                    needs_refresh = True
-            except Exception as e:
-                logger.warning(f"Could not parse expiration time for account {account_id}: {e} - refreshing to be safe")
-                needs_refresh = True
-        
-        # Refresh if needed
-        if needs_refresh and refresh_token:
-            logger.info(f"Refreshing token for account {account_id}")
-            if try_refresh_tradovate_token(account_id):
-                # Get the new token
-                conn = get_db_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                _ph = '%s' if is_using_postgres() else '?'
-                cursor.execute(f'SELECT tradovate_token FROM accounts WHERE id = {_ph}', (account_id,))
-                new_account = cursor.fetchone()
-                conn.close()
-                if new_account and new_account['tradovate_token']:
-                    return new_account['tradovate_token']
-                else:
-                    logger.warning(f"Token refresh succeeded but new token not found for account {account_id}")
-            else:
-                logger.warning(f"Failed to refresh token for account {account_id}")
-                # Return existing token anyway - might still work
-                return access_token
-        
-        return access_token
-        
+        return _token_manager.get_token(account_id, min_ttl=15 * 60)
     except Exception as e:
         logger.error(f"Error getting valid token for account {account_id}: {e}")
         return None
@@ -33298,452 +33432,124 @@ def get_valid_tradovate_token(account_id: int) -> str | None:
 def try_refresh_tradovate_token(account_id: int) -> bool:
     """
     Try to refresh the Tradovate access token.
-    
-    CRITICAL FIX (Dec 18, 2025): Tradovate doesn't use traditional refresh tokens!
-    Instead, you renew the ACCESS TOKEN using Authorization header.
-    See: https://community.tradovate.com/t/token-expiry/5276
-    
-    Uses environment-specific endpoint based on account settings.
-    Includes rate limit protection to avoid 429 errors.
-    """
-    global _last_refresh_attempt
-
-    # Rate limit protection: don't try more than once per 30 seconds per account
-    last_attempt = _last_refresh_attempt.get(account_id, 0)
-    if time.time() - last_attempt < 30:
-        logger.debug(f"Skipping refresh for account {account_id} - tried recently")
-        return False
-    _last_refresh_attempt[account_id] = time.time()
 
+    Delegates to the token manager, which renews the whole credential group once
+    (concurrent callers share the in-flight renewal, at most once per 30s) and
+    pushes the new token to WebSocket managers / monitors via its subscribers.
+    """
     try:
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT tradovate_token, tradovate_refresh_token, environment, name
-            FROM accounts WHERE id = ?
-        ''', (account_id,))
-        account = cursor.fetchone()
-
-        if not account or not account['tradovate_token']:
-            conn.close()
-            logger.warning(f"No access token found for account {account_id}")
+        refreshed = _token_manager.refresh(account_id)
+        if account_id in _token_manager.need_reauth:
+            logger.error(f"❌ CRITICAL: No valid auth for account {account_id} - no refresh token AND no credentials")
+            logger.error(f"❌ User must re-authenticate via OAuth to restore connection")
+            mark_account_needs_reauth(account_id)
             return False
-
-        current_token = account['tradovate_token']
-        account_name = account['name'] or f'Account {account_id}'
-        env = account['environment'] or 'demo'
-
-        # Use environment-specific endpoint (demo tokens only work on demo, live on live)
-        if env == 'live':
-            token_endpoints = [
-                'https://live.tradovateapi.com/v1/auth/renewAccessToken'
-            ]
-        else:
-            token_endpoints = [
-                'https://demo.tradovateapi.com/v1/auth/renewAccessToken'
-            ]
-
-        for token_url in token_endpoints:
-            try:
-                # CRITICAL: Use Authorization header with current access token!
-                # NOT json body with refreshToken (that's the old broken way)
-                response = requests.post(
-                    token_url,
-                    headers={
-                        'Authorization': f'Bearer {current_token}',
-                        'Content-Type': 'application/json'
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    new_access_token = data.get('accessToken') or data.get('access_token')
-                    # Keep the existing refresh token (Tradovate renewal doesn't return a new one)
-                    existing_refresh_token = account['tradovate_refresh_token']
-                    
-                    if new_access_token:
-                        # Calculate actual expiration time from Tradovate response
-                        expires_at = None
-                        if 'expirationTime' in data:
-                            try:
-                                from datetime import datetime
-                                expires_at = datetime.fromisoformat(data['expirationTime'].replace('Z', '+00:00'))
-                                expires_at = expires_at.strftime('%Y-%m-%d %H:%M:%S')
-                            except Exception as e:
-                                logger.warning(f"Could not parse expirationTime in refresh response: {e}")
-                        elif 'expiresIn' in data:
-                            try:
-                                from datetime import datetime, timedelta
-                                expires_in_seconds = int(data['expiresIn'])
-                                expires_at = (datetime.now() + timedelta(seconds=expires_in_seconds)).strftime('%Y-%m-%d %H:%M:%S')
-                            except Exception as e:
-                                logger.warning(f"Could not parse expiresIn in refresh response: {e}")
-                        
-                        # Fallback: Tradovate access tokens typically expire in 90 minutes
-                        if not expires_at:
-                            from datetime import datetime, timedelta
-                            expires_at = (datetime.now() + timedelta(minutes=85)).strftime('%Y-%m-%d %H:%M:%S')
-                        
-                        cursor.execute('''
-                            UPDATE accounts 
-                            SET tradovate_token = ?, 
-                                tradovate_refresh_token = ?,
-                                token_expires_at = ?
-                            WHERE id = ?
-                        ''', (new_access_token, existing_refresh_token, expires_at, account_id))
-                        conn.commit()
-                        conn.close()
-                        logger.info(f"✅ Successfully refreshed token for '{account_name}' via {token_url.split('/')[2]}")
-                        
-                        # UPDATE SCALABILITY WS MANAGER with new token
-                        # This ensures WebSocket connections use the fresh token
-                        if SCALABILITY_MODULE_AVAILABLE:
-                            try:
-                                from scalability import get_ws_manager
-                                ws_manager = get_ws_manager()
-                                if ws_manager:
-                                    # Get all subaccount IDs for this account
-                                    conn2 = get_db_connection()
-                                    conn2.row_factory = sqlite3.Row
-                                    cursor2 = conn2.cursor()
-                                    cursor2.execute('SELECT tradovate_accounts FROM accounts WHERE id = ?', (account_id,))
-                                    row = cursor2.fetchone()
-                                    conn2.close()
-                                    
-                                    if row and row['tradovate_accounts']:
-                                        import json
-                                        subaccounts = json.loads(row['tradovate_accounts'])
-                                        for sub in subaccounts:
-                                            sub_id = sub.get('id') or sub.get('accountId')
-                                            if sub_id:
-                                                ws_manager.update_token(sub_id, new_access_token)
-                                                logger.info(f"📡 Updated WS Manager token for subaccount {sub_id}")
-                            except Exception as ws_err:
-                                logger.debug(f"Could not update WS Manager token: {ws_err}")
-                        
-                        return True
-                elif response.status_code == 429:
-                    logger.warning(f"⚠️ Rate limited (429) at {token_url.split('/')[2]}, trying next...")
-                    time.sleep(1)  # Brief pause before trying next endpoint
-                    continue
-                else:
-                    logger.debug(f"Refresh failed at {token_url}: {response.status_code}")
-                    continue
-                    
-            except requests.exceptions.RequestException as e:
-                logger.debug(f"Request error at {token_url}: {e}")
-                continue
-        
-        # CHECK: Does this account have credentials that will work for trading?
+        clear_account_reauth(account_id)
+        if refreshed:
+            return True
         # API Access during trades uses username/password (bypasses refresh token issues)
-        try:
-            cursor = conn.cursor()
-            _ph = '%s' if is_using_postgres() else '?'
-            cursor.execute(f'SELECT username, password FROM accounts WHERE id = {_ph}', (account_id,))
-            creds_row = cursor.fetchone()
-            username = None
-            password = None
-            if creds_row:
-                username = creds_row['username'] if isinstance(creds_row, dict) else creds_row[0]
-                password = creds_row['password'] if isinstance(creds_row, dict) else creds_row[1]
-            
-            if username and password:
-                # Account has credentials - trades will work via API Access
-                conn.close()
-                logger.info(f"⚠️ [{account_name}] Refresh token expired, but has credentials for API Access - trades will still work")
-                # Don't mark as needing reauth - trading will work
-                clear_account_reauth(account_id)
-                return True  # Consider it "refreshed" since trading will work
-        except Exception as e:
-            logger.debug(f"Error checking credentials: {e}")
-        
-        conn.close()
-        logger.error(f"❌ CRITICAL: No valid auth for '{account_name}' (ID: {account_id}) - no refresh token AND no credentials")
-        logger.error(f"❌ This account will NOT be able to execute trades!")
-        logger.error(f"❌ User must re-authenticate via OAuth to restore connection")
-        # Mark account as needing re-auth (only if no credentials)
-        mark_account_needs_reauth(account_id)
-        return False
+        entry = _token_manager.entry(account_id)
+        return bool(entry and entry['username'] and entry['password'])
     except Exception as e:
         logger.error(f"Error refreshing Tradovate token: {e}")
         return False
 
-def fetch_tradovate_pnl_sync():
-    """
-    Fetch real-time PnL directly from Tradovate's cashBalance API.
-    This is the CORRECT way to get PnL - Tradovate calculates it for us!
-    No market data subscription required.
-    """
-    global _tradovate_pnl_cache
-    
-    current_time = time.time()
-    
-    # Dynamic throttling based on account count to avoid rate limits
-    # Tradovate allows ~120 requests/min, each account needs 2 calls (cashBalance + positions)
-    # 
-    # SCALING TABLE:
-    # Accounts | Calls/update | Safe interval | Updates/min
-    # ---------|--------------|---------------|------------
-    #    1     |      2       |    0.5s       |    120
-    #    2     |      4       |    0.5s       |    120  
-    #    5     |     10       |    1.0s       |     60
-    #   10     |     20       |    2.0s       |     30
-    #   20     |     40       |    4.0s       |     15
-    #   50     |    100       |   10.0s       |      6
-    #
-    # Formula: interval = max(0.5, num_accounts * 0.2) to stay under 120 req/min
-    # Check if we're in a rate limit cooldown
-    rate_limited_until = _tradovate_pnl_cache.get('rate_limited_until', 0)
-    if current_time < rate_limited_until:
-        # Still in cooldown, return cached data
-        return _tradovate_pnl_cache.get('data', {}), _tradovate_pnl_cache.get('positions', [])
-    
-    # ========================================================================
-    # SCALABILITY: Use WebSocket data if fresh (skip REST calls entirely)
-    # This saves REST API calls when WebSocket is providing real-time data
-    # ========================================================================
-    if SCALABILITY_MODULE_AVAILABLE and SCALABILITY_FEATURES.get('ws_state_manager_enabled'):
+def _tradovate_base_url(is_demo):
+    return 'https://demo.tradovateapi.com/v1' if is_demo else 'https://live.tradovateapi.com/v1'
+
+
+def _load_snapshot_accounts():
+    """Every linked Tradovate subaccount with a usable token (account snapshot loader)."""
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, tradovate_token, tradovate_accounts, environment, user_id
+        FROM accounts 
+        WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
+    ''')
+    all_linked_accounts = cursor.fetchall()
+    conn.close()
+
+    subaccounts = []
+    for account in all_linked_accounts:
+        account_id = account['id']
+        # Get valid token (auto-refreshes if needed)
+        token = get_valid_tradovate_token(account_id)
+        if not token:
+            logger.warning(f"No valid token available for account {account_id} - skipping")
+            continue
+        user_account_name = account['name'] if account['name'] else f"Account {account_id}"  # User's custom name
         try:
-            from scalability import get_state_cache
-            cache = get_state_cache()
-            if cache:
-                cache_stats = cache.get_stats()
-                accounts_tracked = cache_stats.get('accounts_tracked', 0)
-                
-                # Only use cache if we have accounts being tracked via WebSocket
-                if accounts_tracked > 0:
-                    all_snapshot = cache.get_all_accounts_snapshot()
-                    
-                    # Check if ALL tracked accounts have fresh data (< 5 seconds old)
-                    all_fresh = True
-                    fresh_pnl_data = {}
-                    fresh_positions = []
-                    
-                    for acc_id, snapshot in all_snapshot.items():
-                        pnl = snapshot.get('pnl') or {}
-                        updated_at = pnl.get('_updated_at', 0)
-                        
-                        # If any account has stale data (> 5s), fall back to REST
-                        if current_time - updated_at > 5:
-                            all_fresh = False
-                            break
-                        
-                        # Build legacy format from cache
-                        fresh_pnl_data[acc_id] = {
-                            'account_name': pnl.get('account_name', f'Account-{acc_id}'),
-                            'is_demo': pnl.get('is_demo', True),
-                            'user_id': pnl.get('user_id'),
-                            'open_pnl': pnl.get('openPnL', 0) or pnl.get('open_pnl', 0),
-                            'realized_pnl': pnl.get('realizedPnL', 0) or pnl.get('realized_pnl', 0),
-                            'net_liq': pnl.get('netLiq', 0) or pnl.get('net_liq', 0),
-                            'total_cash_value': pnl.get('totalCashValue', 0) or pnl.get('total_cash_value', 0),
-                            'total_pnl': pnl.get('totalPnL', 0) or pnl.get('total_pnl', 0),
-                        }
-                        
-                        # Build positions from cache
-                        for pos in snapshot.get('positions', []):
-                            net_qty = pos.get('netPos', 0) or pos.get('net_quantity', 0)
-                            if net_qty != 0:
-                                fresh_positions.append({
-                                    'account_id': acc_id,
-                                    'account_name': pnl.get('account_name', f'Account-{acc_id}'),
-                                    'is_demo': pnl.get('is_demo', True),
-                                    'user_id': pnl.get('user_id'),
-                                    'contract_id': pos.get('contractId', pos.get('contract_id')),
-                                    'symbol': pos.get('symbol', pos.get('contractName', 'Unknown')),
-                                    'net_quantity': net_qty,
-                                    'avg_price': pos.get('avgPrice', pos.get('avg_price', 0)),
-                                })
-                    
-                    if all_fresh and fresh_pnl_data:
-                        # WebSocket data is fresh - skip REST calls entirely!
-                        logger.debug(f"📡 Using WebSocket cache data ({accounts_tracked} accounts, skipping REST)")
-                        return fresh_pnl_data, fresh_positions
-                    
-        except Exception as e:
-            # If cache check fails, fall through to REST polling
-            logger.debug(f"Scalability cache check failed (using REST): {e}")
-    
-    num_accounts = _tradovate_pnl_cache.get('account_count', 2)
-    if not isinstance(num_accounts, int) or num_accounts < 1:
-        num_accounts = 2
-    # Increased minimum interval to reduce rate limiting (trades are priority, PnL is secondary)
-    # Formula: max(3.0, num_accounts * 0.6) - very conservative to stay under 120 req/min
-    min_interval = max(3.0, num_accounts * 0.6)  # Scale up as accounts increase (very conservative - trades priority)
-    
-    if current_time - _tradovate_pnl_cache['last_fetch'] < min_interval:
-        return _tradovate_pnl_cache['data'], _tradovate_pnl_cache['positions']
-    
-    try:
-        # Get ALL connected accounts from database (multi-account support for copy trading)
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, name, tradovate_token, tradovate_accounts, environment, user_id
-            FROM accounts 
-            WHERE tradovate_token IS NOT NULL AND tradovate_token != ''
-        ''')
-        all_linked_accounts = cursor.fetchall()
-        conn.close()
-        
-        if not all_linked_accounts:
-            return {}, []
-        
-        all_pnl_data = {}
-        all_positions = []
-        total_subaccounts = 0
-        
-        # Process each linked account (user may have multiple Tradovate logins)
-        for account in all_linked_accounts:
-            account_id = account['id']
-            account_user_id = account['user_id']  # Track which user owns this account
-            # Get valid token (auto-refreshes if needed)
-            token = get_valid_tradovate_token(account_id)
-            if not token:
-                logger.warning(f"No valid token available for account {account_id} - skipping")
-                continue
-            
-            env = account['environment'] or 'demo'
-            user_account_name = account['name'] if account['name'] else f"Account {account_id}"  # User's custom name
-            
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Parse tradovate_accounts to get subaccount IDs
+            tradovate_accounts = json.loads(account['tradovate_accounts']) if account['tradovate_accounts'] else []
+        except (TypeError, ValueError):
             tradovate_accounts = []
-            try:
-                if account['tradovate_accounts']:
-                    tradovate_accounts = json.loads(account['tradovate_accounts'])
-            except:
-                pass
-            
-            total_subaccounts += len(tradovate_accounts)
-            
-            # Fetch PnL for each subaccount under this linked account
-            for ta in tradovate_accounts:
-                acc_id = ta.get('id')
-                subaccount_name = ta.get('name', str(acc_id))  # Tradovate's subaccount name
-                # CRITICAL FIX: Use environment as source of truth for demo vs live
-                env = (ta.get('environment') or 'demo').lower()
-                is_demo = env != 'live'
+        for ta in tradovate_accounts:
+            if not ta.get('id'):
+                continue
+            # CRITICAL FIX: Use environment as source of truth for demo vs live
+            is_demo = (ta.get('environment') or 'demo').lower() != 'live'
+            subaccounts.append({
+                'subaccount_id': ta['id'],
+                'account_id': account_id,
+                'user_id': account['user_id'],  # Track owner for user isolation
                 # Display as "UserName - SubaccountName" (like account dropdown)
-                acc_name = f"{user_account_name} - {subaccount_name}"
-                
-                # Use correct base URL for demo vs live accounts
-                acc_base_url = 'https://demo.tradovateapi.com/v1' if is_demo else 'https://live.tradovateapi.com/v1'
-                
-                try:
-                    # Get cash balance snapshot (includes openPnL!)
-                    response = requests.get(
-                        f'{acc_base_url}/cashBalance/getCashBalanceSnapshot?accountId={acc_id}',
-                        headers=headers,
-                        timeout=5
-                    )
-                    
-                    if response.status_code == 200:
-                        snap = response.json()
-                        all_pnl_data[acc_id] = {
-                            'account_id': acc_id,
-                            'account_name': acc_name,
-                            'is_demo': is_demo,
-                            'user_id': account_user_id,  # Track owner for user isolation
-                            'total_cash_value': snap.get('totalCashValue', 0),
-                            'net_liq': snap.get('netLiq', 0),
-                            'open_pnl': snap.get('openPnL', 0),  # Unrealized PnL!
-                            'realized_pnl': snap.get('realizedPnL', 0),
-                            'total_pnl': snap.get('totalPnL', 0),
-                            'week_realized_pnl': snap.get('weekRealizedPnL', 0),
-                            'initial_margin': snap.get('initialMargin', 0),
-                            'maintenance_margin': snap.get('maintenanceMargin', 0)
-                        }
-                        logger.debug(f"Fetched PnL for {acc_name}: openPnL=${snap.get('openPnL', 0):.2f}, realizedPnL=${snap.get('realizedPnL', 0):.2f}")
-                    elif response.status_code == 429:
-                        # Rate limited - enter cooldown for 60 seconds
-                        cooldown_seconds = 60
-                        _tradovate_pnl_cache['rate_limited_until'] = current_time + cooldown_seconds
-                        logger.warning(f"Rate limited by Tradovate (429)! Entering {cooldown_seconds}s cooldown")
-                        return _tradovate_pnl_cache.get('data', {}), _tradovate_pnl_cache.get('positions', [])
-                    elif response.status_code == 401:
-                        logger.warning(f"⚠️ Token expired for account {acc_id} (401) - token validation should have caught this")
-                        # Token should have been refreshed proactively, but if we still get 401, try one more refresh
-                        refreshed = try_refresh_tradovate_token(account_id)
-                        if refreshed:
-                            logger.info(f"✅ Token refreshed for account {account_id}, will retry on next cycle")
-                        else:
-                            logger.error(f"❌ CRITICAL: Failed to refresh token for account {account_id} - account connection broken!")
-                            logger.error(f"❌ User must re-authenticate via OAuth to restore connection")
-                        continue
-                    else:
-                        logger.debug(f"Cash balance API returned {response.status_code} for {acc_id}: {response.text[:100]}")
-                    
-                    # Get positions for this account
-                    pos_response = requests.get(
-                        f'{acc_base_url}/position/list',
-                        headers=headers,
-                        timeout=5
-                    )
-                    
-                    if pos_response.status_code == 200:
-                        positions = pos_response.json()
-                        for pos in positions:
-                            if pos.get('netPos', 0) != 0:  # Only open positions
-                                # Get contract name
-                                contract_id = pos.get('contractId')
-                                contract_name = get_contract_name_cached(contract_id, acc_base_url, headers)
-                                
-                                all_positions.append({
-                                    'account_id': acc_id,
-                                    'account_name': acc_name,
-                                    'is_demo': is_demo,
-                                    'user_id': account_user_id,  # Track owner for user isolation
-                                    'contract_id': contract_id,
-                                    'symbol': contract_name,
-                                    'net_quantity': pos.get('netPos', 0),
-                                    'bought': pos.get('bought', 0),
-                                    'bought_value': pos.get('boughtValue', 0),
-                                    'sold': pos.get('sold', 0),
-                                    'sold_value': pos.get('soldValue', 0),
-                                    # Calculate avg price from bought/sold values
-                                    'avg_price': calculate_avg_price(pos),
-                                    'timestamp': pos.get('timestamp')
-                                })
-                    elif pos_response.status_code == 401:
-                        logger.warning(f"⚠️ Token expired when fetching positions for account {acc_id} - attempting auto-refresh")
-                        refreshed = try_refresh_tradovate_token(account['id'])
-                        if refreshed:
-                            logger.info(f"✅ Token refreshed for account {account['id']}, positions will retry on next cycle")
-                        else:
-                            logger.error(f"❌ CRITICAL: Failed to refresh token for account {account['id']} - position fetch failed!")
-                                
-                except requests.exceptions.RequestException as e:
-                    logger.warning(f"Error fetching PnL/positions for account {acc_id}: {e}")
-                    continue
-        
-        # Update cache (including total subaccount count for dynamic throttling)
-        _tradovate_pnl_cache['last_fetch'] = current_time
-        _tradovate_pnl_cache['data'] = all_pnl_data
-        _tradovate_pnl_cache['positions'] = all_positions
-        _tradovate_pnl_cache['account_count'] = total_subaccounts  # Total across all linked accounts
-        
-        if total_subaccounts > 5:
-            logger.info(f"Monitoring {total_subaccounts} subaccounts, update interval: {max(0.5, total_subaccounts * 0.2):.1f}s")
-        
-        # Debug: Log what we're returning
-        if all_pnl_data:
-            logger.info(f"📊 Returning PnL data for {len(all_pnl_data)} accounts, {len(all_positions)} positions")
-        
-        return all_pnl_data, all_positions
-        
-    except Exception as e:
-        logger.error(f"Error fetching Tradovate PnL: {e}")
-        import traceback
-        logger.debug(f"Traceback: {traceback.format_exc()}")
-        return _tradovate_pnl_cache.get('data', {}), _tradovate_pnl_cache.get('positions', [])
+                'account_name': f"{user_account_name} - {ta.get('name', str(ta['id']))}",
+                'is_demo': is_demo,
+                'access_token': token,
+            })
+    return subaccounts
+
+
+def _snapshot_rest_fetch(meta):
+    """
+    REST fallback for one stale subaccount: (cashBalance snapshot, position list).
+    Either part is None when Tradovate did not return it; raises RateLimited on 429.
+    """
+    base_url = _tradovate_base_url(meta['is_demo'])
+    headers = {
+        'Authorization': f"Bearer {meta['access_token']}",
+        'Content-Type': 'application/json'
+    }
+    results = []
+    for path in (f"cashBalance/getCashBalanceSnapshot?accountId={meta['subaccount_id']}", 'position/list'):
+        response = requests.get(f'{base_url}/{path}', headers=headers, timeout=5)
+        if response.status_code == 429:
+            raise RateLimited()
+        if response.status_code == 401:
+            logger.warning(f"⚠️ Token expired for account {meta['account_id']} (401) - attempting auto-refresh")
+            if try_refresh_tradovate_token(meta['account_id']):
+                logger.info(f"✅ Token refreshed for account {meta['account_id']}, will retry on next cycle")
+                _account_snapshots.request_reload()
+            else:
+                logger.error(f"❌ CRITICAL: Failed to refresh token for account {meta['account_id']} - account connection broken!")
+            return None, None
+        if response.status_code != 200:
+            logger.debug(f"Tradovate {path} returned {response.status_code} for {meta['subaccount_id']}: {response.text[:100]}")
+        results.append(response.json() if response.status_code == 200 else None)
+    return results[0], results[1]
+
+
+def _snapshot_contract_name(meta, contract_id):
+    headers = {'Authorization': f"Bearer {meta['access_token']}", 'Content-Type': 'application/json'}
+    return get_contract_name_cached(contract_id, _tradovate_base_url(meta['is_demo']), headers)
+
+
+_account_snapshots.set_sources(
+    load_accounts=_load_snapshot_accounts,
+    rest_fetch=_snapshot_rest_fetch,
+    contract_name=_snapshot_contract_name,
+)
+
+
+def fetch_tradovate_pnl_sync():
+    """
+    Real-time PnL + open positions for every linked subaccount, in the legacy
+    (pnl_data, positions) format. Served from the account snapshot service,
+    which applies Tradovate's cashBalance/position WebSocket events and only
+    falls back to REST for stale subaccounts - no broker calls happen here.
+    """
+    return _account_snapshots.snapshot()
 
 # Cache for contract names
 _contract_name_cache = {}
@@ -33800,181 +33606,91 @@ def calculate_avg_price(position):
     
     return 0
 
-# ============================================================================
-# PROACTIVE TOKEN REFRESH - Prevents session expiration throughout the day
-# ============================================================================
-# This thread runs every 5 minutes and refreshes any Tradovate tokens that
-# will expire within 30 minutes. This keeps connections alive INDEFINITELY.
-# ============================================================================
-
-def proactive_token_refresh():
+def _emit_account_snapshot(user_id, room=None):
     """
-    Background thread that proactively refreshes Tradovate tokens BEFORE they expire.
-    
-    CRITICAL FIX (Dec 18, 2025): 
-    - Changed from 30 min to 5 min intervals (tokens can expire in 90 min!)
-    - Changed from 2 hour to 30 min threshold (refresh well before expiry)
-    
-    This keeps sessions alive INDEFINITELY without manual re-login.
+    Emit pnl_update + position_update for one user's accounts (all accounts when
+    user_id is None, i.e. auth disabled) to their room, or to `room` (one socket).
     """
-    logger.info("🔐 Proactive token refresh thread started (checks every 5 minutes)")
-    
-    # Wait 60 seconds before first check to let server fully start
-    time.sleep(60)
-    
-    while True:
-        try:
-            conn = get_db_connection()
-            is_postgres = is_using_postgres()
-            if not is_postgres:
-                conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Find accounts with tokens that expire within 30 minutes
-            # Also refresh tokens where we don't know the expiration (NULL)
-            # More aggressive refresh keeps connections alive INDEFINITELY
-            if is_postgres:
-                cursor.execute('''
-                    SELECT id, name, tradovate_token, tradovate_refresh_token, 
-                           token_expires_at, environment
-                    FROM accounts 
-                    WHERE tradovate_token IS NOT NULL 
-                      AND tradovate_refresh_token IS NOT NULL
-                      AND (
-                          token_expires_at IS NULL 
-                          OR token_expires_at < NOW() + INTERVAL '30 minutes'
-                      )
-                ''')
-            else:
-                cursor.execute('''
-                    SELECT id, name, tradovate_token, tradovate_refresh_token, 
-                           token_expires_at, environment
-                    FROM accounts 
-                    WHERE tradovate_token IS NOT NULL 
-                      AND tradovate_refresh_token IS NOT NULL
-                  AND (
-                      token_expires_at IS NULL 
-                      OR token_expires_at < datetime('now', '+30 minutes')
-                  )
-            ''')
-            accounts_to_refresh = cursor.fetchall()
-            conn.close()
-            
-            if accounts_to_refresh:
-                logger.info(f"🔐 Found {len(accounts_to_refresh)} account(s) with tokens expiring soon")
-                
-                for account in accounts_to_refresh:
-                    account_id = account['id']
-                    account_name = account['name']
-                    expires_at = account['token_expires_at']
-                    
-                    if expires_at:
-                        logger.info(f"🔄 Proactively refreshing token for '{account_name}' (expires: {expires_at})")
-                    else:
-                        logger.info(f"🔄 Proactively refreshing token for '{account_name}' (expiration unknown)")
-                    
-                    # Use existing refresh function
-                    success = try_refresh_tradovate_token(account_id)
-                    
-                    if success:
-                        logger.info(f"✅ Proactively refreshed token for '{account_name}' - good for 24 more hours")
-                    else:
-                        logger.warning(f"⚠️ Failed to refresh token for '{account_name}' - may need to re-authenticate via OAuth")
-                    
-                    # Small delay between accounts to avoid rate limiting
-                    time.sleep(2)
-            else:
-                logger.info("🔐 All Tradovate tokens are fresh (not expiring within 30 minutes)")
-                
-        except Exception as e:
-            logger.error(f"Error in proactive token refresh: {e}")
+    pnl_data, tradovate_positions = _account_snapshots.snapshot(user_id=user_id)
+
+    total_pnl = sum(acc.get('total_pnl', 0) or 0 for acc in pnl_data.values())
+    open_pnl = sum(acc.get('open_pnl', 0) or 0 for acc in pnl_data.values())
+    today_pnl = sum(acc.get('realized_pnl', 0) or 0 for acc in pnl_data.values())
+
+    positions_list = [{
+        'symbol': pos.get('symbol', 'Unknown'),
+        'net_quantity': pos.get('net_quantity', 0),
+        'avg_price': pos.get('avg_price', 0),
+        'account_id': pos.get('account_id'),
+        'account_name': pos.get('account_name'),
+        'is_demo': pos.get('is_demo', True),
+        # Note: unrealized_pnl per position requires market data
+        # But we have total open_pnl from cashBalance
+    } for pos in tradovate_positions]
+
+    # Also include any synthetic positions from manual trades the broker has not reported yet
+    for pos in list(_position_cache.values()):
+        if pos.get('net_quantity', 0) == 0:
+            continue
+        if user_id is not None and _account_snapshots.owner_of(pos.get('account_id')) != user_id:
+            continue
+        exists = any(
+            p.get('symbol') == pos.get('symbol') and
+            str(p.get('account_id')) == str(pos.get('subaccount_id'))
+            for p in positions_list
+        )
+        if not exists:
+            positions_list.append(pos)
+
+    room = room or (f'user_{user_id}' if user_id is not None else 'pnl_all')
+    timestamp = datetime.now().isoformat()
+    socketio.emit('pnl_update', {
+        'total_pnl': total_pnl,
+        'open_pnl': open_pnl,  # Unrealized PnL
+        'today_pnl': today_pnl,  # Realized PnL today
+        'active_positions': len(positions_list),
+        'timestamp': timestamp
+    }, room=room)
+    socketio.emit('position_update', {
+        'positions': positions_list,
+        'count': len(positions_list),
+        'pnl_data': pnl_data,  # Full PnL data per account (this user's accounts only)
+        'timestamp': timestamp
+    }, room=room)
 
-        # Check every 5 minutes (more aggressive to keep tokens fresh)
-        time.sleep(5 * 60)
 
 def emit_realtime_updates():
-    """Emit real-time updates (throttled to avoid rate limits)"""
-    global _position_cache
+    """
+    Push P&L / position changes to the users who own them.
+
+    Replaces the 5s whole-platform broadcast: the account snapshot service is
+    kept current by WebSocket events, so each cycle only emits to the rooms of
+    users whose accounts changed, and sends admins the changed accounts.
+    """
     while True:
         try:
-            # ============================================================
-            # FETCH REAL-TIME PnL DIRECTLY FROM TRADOVATE
-            # This is the correct approach - no market data needed!
-            # Note: fetch_tradovate_pnl_sync() has built-in throttling
-            # ============================================================
-            
-            total_pnl = 0.0
-            today_pnl = 0.0
-            open_pnl = 0.0
-            active_positions = 0
-            positions_list = []
-            
-            # Fetch PnL from Tradovate's cashBalance API (throttled internally)
-            pnl_data, tradovate_positions = fetch_tradovate_pnl_sync()
-            
-            if pnl_data:
-                # Sum up PnL from all accounts
-                for acc_id, acc_data in pnl_data.items():
-                    open_pnl += acc_data.get('open_pnl', 0)
-                    today_pnl += acc_data.get('realized_pnl', 0)
-                    total_pnl += acc_data.get('total_pnl', 0)
-                
-                logger.debug(f"Tradovate PnL: open=${open_pnl:.2f}, realized=${today_pnl:.2f}, total=${total_pnl:.2f}")
-            
-            if tradovate_positions:
-                active_positions = len(tradovate_positions)
-                positions_list = [{
-                    'symbol': pos.get('symbol', 'Unknown'),
-                    'net_quantity': pos.get('net_quantity', 0),
-                    'avg_price': pos.get('avg_price', 0),
-                    'account_id': pos.get('account_id'),
-                    'account_name': pos.get('account_name'),
-                    'is_demo': pos.get('is_demo', True),
-                    # Note: unrealized_pnl per position requires market data
-                    # But we have total open_pnl from cashBalance
-                } for pos in tradovate_positions]
-            
-            # Also include any synthetic positions from manual trades
-            if _position_cache:
-                for cache_key, pos in _position_cache.items():
-                    # Check if this position is already in tradovate_positions
-                    exists = any(
-                        p.get('symbol') == pos.get('symbol') and 
-                        p.get('account_id') == pos.get('account_id')
-                        for p in positions_list
-                    )
-                    if not exists and pos.get('net_quantity', 0) != 0:
-                        positions_list.append(pos)
-                        active_positions = len(positions_list)
-            
-            # Emit P&L updates with REAL data from Tradovate
-            socketio.emit('pnl_update', {
-                'total_pnl': total_pnl,
-                'open_pnl': open_pnl,  # Unrealized PnL
-                'today_pnl': today_pnl,  # Realized PnL today
-                'active_positions': active_positions,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Emit position updates
-            socketio.emit('position_update', {
-                'positions': positions_list,
-                'count': active_positions,
-                'pnl_data': pnl_data,  # Include full PnL data per account
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Note: Position and PnL fetching is now handled by fetch_tradovate_pnl_sync() above
-            # The new implementation uses Tradovate's cashBalance API which provides 
-            # real-time PnL without needing market data subscription
-            
+            _account_snapshots.maybe_reload()
+            _account_snapshots.refresh_stale()
+            users, accounts = _account_snapshots.drain_dirty()
+
+            if not USER_AUTH_AVAILABLE:
+                if users:
+                    _emit_account_snapshot(None)
+            else:
+                for user_id in users:
+                    _emit_account_snapshot(user_id)
+                if accounts:
+                    pnl_data, _ = _account_snapshots.snapshot(subaccount_ids=accounts)
+                    socketio.emit('admin_pnl_update', {
+                        'pnl_data': pnl_data,
+                        'removed': [acc_id for acc_id in accounts if acc_id not in pnl_data],
+                        'timestamp': datetime.now().isoformat()
+                    }, room='admins')
         except Exception as e:
             logger.error(f"Error emitting real-time updates: {e}")
             import traceback
             logger.debug(f"Traceback: {traceback.format_exc()}")
-        # Sleep 5 seconds - trades are priority, PnL updates are secondary
-        # fetch_tradovate_pnl_sync() has its own throttling, so this just reduces check frequency
-        time.sleep(5)  # Check every 5 seconds (trades are priority, PnL is secondary)
+        time.sleep(1)  # Changes arrive by WebSocket; this only bounds push latency and REST pacing
 
 def record_strategy_pnl_continuously():
     """Record P&L for all active strategies every second (like Trade Manager)"""
@@ -34045,10 +33761,9 @@ update_thread.start()
 pnl_recording_thread = threading.Thread(target=record_strategy_pnl_continuously, daemon=True)
 pnl_recording_thread.start()
 
-# Start proactive token refresh thread (keeps sessions alive throughout the day)
-token_refresh_thread = threading.Thread(target=proactive_token_refresh, daemon=True)
-token_refresh_thread.start()
-logger.info("✅ Proactive token refresh thread started (refreshes tokens before expiration)")
+# Start the token manager (renews each credential group shortly before its token expires)
+_token_manager.start()
+logger.info("✅ Token manager started (refreshes tokens before expiration)")
 
 # ============================================================================
 # DAILY P&L SUMMARY - Discord notifications at market close
@@ -34537,12 +34252,24 @@ def api_signal_pipeline():
     7. BROKER_WORKER_PICKED - Broker worker picked task
     8. CALLING_BROKER - Calling Tradovate/broker API
     9. TRADE_SUCCESS/TRADE_FAILED - Final result
+
+    ?latency=true returns per-step latency percentiles aggregated from the
+    shared jt:signal_steps stream (all workers + trading engine).
     """
     try:
         limit = int(request.args.get('limit', 50))
         show_pending = request.args.get('pending', 'false').lower() == 'true'
+        show_latency = request.args.get('latency', 'false').lower() == 'true'
 
-        if show_pending:
+        if show_latency:
+            sample = min(int(request.args.get('sample', 5000)), signal_tracking.STEP_STREAM_MAXLEN)
+            return jsonify({
+                'success': True,
+                'mode': 'latency',
+                'sample_size': sample,
+                'latency': signal_tracking.get_latency_stats(sample)
+            })
+        elif show_pending:
             # Show only signals stuck in pending state
             signals = get_pending_signals()
             return jsonify({
@@ -34874,9 +34601,9 @@ if '_recorder_tp_sl_thread' in dir() and _recorder_tp_sl_thread:
 if '_position_drawdown_thread' in dir() and _position_drawdown_thread:
     register_critical_thread('Position-Drawdown', _position_drawdown_thread, restart_position_drawdown_polling)
 
-# Token Refresh - CRITICAL for broker auth
-if 'token_refresh_thread' in dir() and token_refresh_thread:
-    register_critical_thread('Token-Refresh', token_refresh_thread, None)  # Can't easily restart
+# Token Manager scheduler - CRITICAL for broker auth (start() is idempotent and returns the thread)
+if _token_manager.scheduler_thread:
+    register_critical_thread('Token-Manager', _token_manager.scheduler_thread, _token_manager.start)
 
 # Broker Execution Workers (HIVE MIND) - CRITICAL for executing trades
 if '_broker_execution_threads' in dir() and _broker_execution_threads:
@@ -35297,6 +35024,8 @@ if __name__ == '__main__':
                                 'source': 'tv_websocket',
                                 'updated': time.time()
                             }
+                            _order_events.on_price(root, float(last_price))
+                            _risk_engine.on_price(root, float(last_price))
                 except:
                     pass
                 # Emit to connected WebSocket clients
@@ -35308,7 +35037,7 @@ if __name__ == '__main__':
                         'ask': price_data.get('ask'),
                         'change': price_data.get('change'),
                         'change_percent': price_data.get('change_percent'),
-                        'timestamp': price_data.get('timestamp')
+                        'timestamp': datetime.fromtimestamp(price_data['update_time']).isoformat()
                     }, namespace='/')
                 except:
                     pass  # Ignore if no clients connected
@@ -35368,6 +35097,14 @@ if __name__ == '__main__':
     except Exception as e:
         logger.warning(f"Position WebSocket monitor failed to start: {e} — reconciliation daemon is safety net")
 
+    # Route order/fill/position events into the OCO / break-even engine (same token groups)
+    try:
+        from ws_position_monitor import _load_account_groups
+        _order_events.attach_token_groups(_load_account_groups())
+        logger.info("✅ Order event engine subscribed to shared WebSocket connections")
+    except Exception as e:
+        logger.warning(f"Order event engine WebSocket subscribe failed: {e} — OCO REST fallback covers all accounts")
+
     # Start fast webhook workers (MUST be after app is created)
     try:
         start_fast_webhook_workers()
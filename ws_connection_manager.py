@@ -49,6 +49,8 @@ import time
 from datetime import datetime, timezone
 from typing import Dict, Optional, Any, List, Set
 
+import token_manager
+
 logger = logging.getLogger('ws_connection_manager')
 
 # Try to import websockets
@@ -521,6 +523,8 @@ class TradovateConnectionManager:
 
         self._started = True
         self._running = True
+        # Renewed tokens are pushed to the connections instead of polled before each reconnect
+        token_manager.get_token_manager().subscribe(self._on_token_renewed)
 
         def _thread_target():
             self._loop = asyncio.new_event_loop()
@@ -754,10 +758,21 @@ class TradovateConnectionManager:
                 await asyncio.sleep(jittered_delay)
                 backoff = min(backoff * 2, max_backoff)
 
+    def _on_token_renewed(self, account_id: int, token: str, entry: dict):
+        """Token manager callback: hand the new token to every connection of that account."""
+        for conn in list(self._connections.values()):
+            if account_id in conn.db_account_ids and conn.access_token != token:
+                conn.access_token = token
+                logger.info(f"[{conn.token_key}] Received renewed token from token manager")
+
     def _get_fresh_token(self, db_account_ids: List[int]) -> Optional[str]:
-        """Read latest Tradovate token from accounts table."""
+        """Latest Tradovate token: the token manager's copy, else the accounts table."""
         if not db_account_ids:
             return None
+        if token_manager.is_configured():
+            token = token_manager.get_token_manager().cached_token(db_account_ids[0])
+            if token:
+                return token
         database_url = os.environ.get('DATABASE_URL')
         if not database_url:
             return None
@@ -810,6 +825,16 @@ class TradovateConnectionManager:
                 return True
         return False
 
+    def is_listening(self, listener_id: str, subaccount_id: int) -> bool:
+        """Check if this listener receives this subaccount's events: registered for it on a
+        connection that has subscribed the account and is connected + authenticated."""
+        for conn in list(self._connections.values()):
+            if (subaccount_id in conn._listener_accounts.get(listener_id, ())
+                    and subaccount_id in conn._subscribed_accounts
+                    and conn.connected and conn.authenticated):
+                return True
+        return False
+
     def get_connection_time(self, token_key: str) -> Optional[datetime]:
         """Get the connection time for a specific token (for replay filtering)."""
         conn = self._connections.get(token_key)
@@ -26,6 +26,8 @@ import time
 from datetime import datetime, timezone
 from typing import Dict, Optional, Any, List, Set
 
+import token_manager
+
 logger = logging.getLogger('leader_monitor')
 
 # Try to import websockets
@@ -2015,7 +2017,11 @@ def _load_active_leaders() -> List[Dict]:
 
 
 def _get_fresh_token(account_id: int) -> Optional[str]:
-    """Fetch current token from accounts table (may have been refreshed by daemon)."""
+    """Current token: the token manager's copy, else the accounts table (may have been refreshed by another process)."""
+    if token_manager.is_configured():
+        token = token_manager.get_token_manager().cached_token(account_id)
+        if token:
+            return token
     database_url = os.environ.get('DATABASE_URL')
     if not database_url:
         return None
@@ -28,6 +28,9 @@ from datetime import datetime, timezone
 from typing import Dict, Optional, Any, List
 
 from ws_connection_manager import get_connection_manager, Listener
+import token_manager
+import recorder_counters
+from risk_engine import get_risk_engine
 
 logger = logging.getLogger('position_monitor')
 
@@ -158,11 +161,6 @@ class AccountGroupConnection:
         self._PERIODIC_SWEEP_INTERVAL = 60.0
         self._ORDERS_CACHE_TTL = 30.0
 
-        # P&L monitoring (Feb 23, 2026)
-        self._position_state: Dict[int, Dict] = {}  # subaccount_id -> {symbol, side, qty, entry_price, ...}
-        self._pnl_check_interval = 30  # seconds between P&L evaluations
-        self._last_pnl_check: float = 0
-
     def _next_request_id(self) -> int:
         self._request_id += 1
         return self._request_id
@@ -320,9 +318,6 @@ class AccountGroupConnection:
                     if _is_futures_market_likely_open():
                         await self._periodic_orphan_sweep()
 
-                # P&L monitoring — check max daily loss limits every 30s
-                await self._check_pnl_limits()
-
                 # Receive messages
                 try:
                     message = await asyncio.wait_for(self.websocket.recv(), timeout=1.0)
@@ -486,18 +481,9 @@ class AccountGroupConnection:
         except Exception as e:
             logger.error(f"[{self.token_key}] Position DB update error: {e}")
 
-        # Update in-memory position state for P&L monitoring
-        if net_pos != 0:
-            self._position_state[account_id] = {
-                'symbol': symbol,
-                'symbol_root': symbol_root,
-                'side': 'LONG' if net_pos > 0 else 'SHORT',
-                'qty': abs(net_pos),
-                'entry_price': net_price,
-                'recorder_ids': recorder_ids,
-            }
-        else:
-            self._position_state.pop(account_id, None)
+        # Daily-loss limits are evaluated on every tick by the shared risk engine
+        _track_risk_position(self, self.token_key, account_id, contract_id, symbol,
+                             symbol_root, net_pos, net_price, recorder_ids)
 
     async def _handle_fill_event(self, entity: dict):
         """Detect TP/SL fills and close recorded_trades accordingly."""
@@ -527,6 +513,7 @@ class AccountGroupConnection:
             if not conn:
                 return
             cursor = conn.cursor()
+            closed = {}  # recorder_id -> trades closed, counted once committed
 
             for recorder_id in recorder_ids:
                 # Check if this fill matches a TP order
@@ -578,6 +565,7 @@ class AccountGroupConnection:
                                 exit_price = %s, exit_time = NOW(), updated_at = NOW()
                             WHERE id = %s AND status = 'open'
                         ''', (exit_reason, price, trade_id))
+                        closed[recorder_id] = cursor.rowcount
 
                         cursor.execute('''
                             UPDATE recorder_positions
@@ -607,6 +595,8 @@ class AccountGroupConnection:
 
             conn.commit()
             conn.close()
+            for recorder_id, count in closed.items():
+                recorder_counters.trade_closed(recorder_id, count)
         except Exception as e:
             logger.error(f"[{self.token_key}] Fill DB update error: {e}")
 
@@ -1032,127 +1022,64 @@ class AccountGroupConnection:
             logger.error(f"[{self.token_key}] Orphan check error for recorder {recorder_id}: {e}")
             return False
 
-    # ====================================================================
-    # P&L MONITORING — Continuous max daily loss enforcement (Feb 23, 2026)
-    # ====================================================================
-
-    async def _check_pnl_limits(self):
-        """Check all positions against max_daily_loss limits. Called every 30s."""
-        now = time.time()
-        if now - self._last_pnl_check < self._pnl_check_interval:
-            return
-        self._last_pnl_check = now
+    async def close(self):
+        """Close the WebSocket connection."""
+        self._running = False
+        if self.websocket:
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+        self.connected = False
 
-        if not self._position_state:
-            return
 
-        try:
-            conn = _get_pg_connection()
-            if not conn:
-                return
-            cursor = conn.cursor()
+# ============================================================================
+# MAX DAILY LOSS — broker positions feed the shared risk engine (risk_engine.py)
+# ============================================================================
 
-            for account_id, pos in list(self._position_state.items()):
-                for recorder_id in pos['recorder_ids']:
-                    # Get max_daily_loss setting for this recorder
-                    cursor.execute('''
-                        SELECT r.max_daily_loss FROM recorders r
-                        WHERE r.id = %s AND r.max_daily_loss > 0
-                    ''', (recorder_id,))
-                    row = cursor.fetchone()
-                    if not row:
-                        continue
-                    max_loss = float(row[0])
+def _track_risk_position(owner, token_key: str, account_id: int, contract_id: int, symbol: str,
+                         symbol_root: str, net_pos: int, net_price: float, recorder_ids: List[int]):
+    """Mirror a broker position into the risk engine; flatten runs back on this event loop."""
+    key = f'live:{account_id}:{contract_id}'
+    engine = get_risk_engine()
+    if not net_pos or not net_price:
+        engine.remove_position(key)
+        return
+    loop = asyncio.get_running_loop()
 
-                    # Get realized P&L for today
-                    cursor.execute('''
-                        SELECT COALESCE(SUM(pnl), 0) FROM recorded_trades
-                        WHERE recorder_id = %s AND DATE(exit_time) = CURRENT_DATE AND status = 'closed'
-                    ''', (recorder_id,))
-                    realized = float(cursor.fetchone()[0] or 0)
-
-                    # Calculate unrealized from in-memory position + market data cache
-                    unrealized = 0.0
-                    live_price = self._get_market_price(pos['symbol_root'])
-                    if live_price and pos['entry_price']:
-                        unrealized = self._calc_unrealized(
-                            pos['symbol_root'], pos['side'],
-                            pos['qty'], float(pos['entry_price']), float(live_price)
-                        )
-
-                    combined = realized + unrealized
-                    if combined <= -max_loss:
-                        logger.warning(f"🚨 [{self.token_key}] MAX DAILY LOSS BREACHED: "
-                                       f"account={account_id} recorder={recorder_id} "
-                                       f"realized=${realized:.2f} + unrealized=${unrealized:.2f} "
-                                       f"= ${combined:.2f} (limit: -${max_loss})")
-                        await self._auto_flatten(account_id, pos)
+    def flatten(position, price, breach):
+        future = asyncio.run_coroutine_threadsafe(
+            _liquidate_for_max_loss(token_key, owner.access_token, owner.is_demo,
+                                    account_id, contract_id, position), loop)
+        return future.result(timeout=30)
 
-            conn.close()
-        except Exception as e:
-            logger.error(f"[{self.token_key}] P&L check error: {e}")
+    engine.update_position(key, 'live', recorder_ids, symbol_root,
+                           'LONG' if net_pos > 0 else 'SHORT', abs(net_pos), net_price,
+                           flatten=flatten, account_id=account_id, symbol=symbol)
 
-    def _get_market_price(self, symbol_root: str) -> float:
-        """Get live price from ultra_simple_server's market data cache."""
-        try:
-            from ultra_simple_server import _get_live_price_for_symbol
-            return _get_live_price_for_symbol(symbol_root)
-        except Exception:
-            return None
 
-    def _calc_unrealized(self, symbol_root: str, side: str, qty: float,
-                         entry_price: float, live_price: float) -> float:
-        """Calculate unrealized P&L using FUTURES_SPECS point values."""
-        try:
-            from tv_price_service import FUTURES_SPECS
-            spec = FUTURES_SPECS.get(symbol_root, {'point_value': 1.0})
-            pv = spec['point_value']
-            if side == 'LONG':
-                return (live_price - entry_price) * pv * qty
-            else:
-                return (entry_price - live_price) * pv * qty
-        except Exception:
-            return 0.0
+async def _liquidate_for_max_loss(token_key: str, access_token: str, is_demo: bool,
+                                  account_id: int, contract_id: int, position: dict) -> bool:
+    """Flatten position via REST API when max daily loss breached."""
+    try:
+        from phantom_scraper.tradovate_integration import TradovateIntegration
 
-    async def _auto_flatten(self, account_id: int, pos: dict):
-        """Flatten position via REST API when max daily loss breached."""
+        tradovate = TradovateIntegration(demo=is_demo)
+        await tradovate.__aenter__()
+        tradovate.access_token = access_token
         try:
-            from phantom_scraper.tradovate_integration import TradovateIntegration
-
-            tradovate = TradovateIntegration(demo=self.is_demo)
-            await tradovate.__aenter__()
-            tradovate.access_token = self.access_token
-
-            # Resolve contract_id from _contract_cache (populated by position events)
-            contract_id = None
-            for cid, sym in self._contract_cache.items():
-                if sym == pos['symbol']:
-                    contract_id = cid
-                    break
-
-            if contract_id:
-                result = await tradovate.liquidate_position(
-                    account_id=account_id,
-                    contract_id=contract_id
-                )
-                logger.warning(f"🔴 [{self.token_key}] AUTO-FLATTEN sent for account {account_id}: "
-                               f"liquidate {pos['qty']} {pos['symbol']} — result: {result}")
-            else:
-                logger.error(f"[{self.token_key}] Cannot auto-flatten: no contract_id for {pos['symbol']}")
-
+            result = await tradovate.liquidate_position(
+                account_id=account_id,
+                contract_id=contract_id
+            )
+        finally:
             await tradovate.__aexit__(None, None, None)
-        except Exception as e:
-            logger.error(f"[{self.token_key}] Auto-flatten error for account {account_id}: {e}")
-
-    async def close(self):
-        """Close the WebSocket connection."""
-        self._running = False
-        if self.websocket:
-            try:
-                await self.websocket.close()
-            except Exception:
-                pass
-        self.connected = False
+        logger.warning(f"🔴 [{token_key}] AUTO-FLATTEN sent for account {account_id}: "
+                       f"liquidate {position['qty']:g} {position['symbol']} — result: {result}")
+        return bool(result and result.get('success'))
+    except Exception as e:
+        logger.error(f"[{token_key}] Auto-flatten error for account {account_id}: {e}")
+        return False
 
 
 # ============================================================================
@@ -1288,7 +1215,11 @@ def _load_account_groups() -> List[Dict]:
 
 
 def _get_fresh_token(account_id: int) -> Optional[str]:
-    """Read latest Tradovate token from accounts table."""
+    """Latest Tradovate token: the token manager's copy, else the accounts table."""
+    if token_manager.is_configured():
+        token = token_manager.get_token_manager().cached_token(account_id)
+        if token:
+            return token
     try:
         conn = _get_pg_connection()
         if not conn:
@@ -1470,6 +1401,9 @@ class PositionMonitorListener(Listener):
         except Exception as e:
             logger.error(f"[{self._token_key}] Position DB update error: {e}")
 
+        _track_risk_position(self, self._token_key, account_id, contract_id, symbol,
+                             symbol_root, net_pos, net_price, recorder_ids)
+
     async def _handle_fill_event(self, entity: dict):
         """Detect TP/SL fills and close recorded_trades accordingly."""
         account_id = entity.get('accountId')
@@ -1498,6 +1432,7 @@ class PositionMonitorListener(Listener):
             if not conn:
                 return
             cursor = conn.cursor()
+            closed = {}  # recorder_id -> trades closed, counted once committed
 
             for recorder_id in recorder_ids:
                 cursor.execute('''
@@ -1544,6 +1479,7 @@ class PositionMonitorListener(Listener):
                                 exit_price = %s, exit_time = NOW(), updated_at = NOW()
                             WHERE id = %s AND status = 'open'
                         ''', (exit_reason, price, trade_id))
+                        closed[recorder_id] = cursor.rowcount
 
                         cursor.execute('''
                             UPDATE recorder_positions
@@ -1572,6 +1508,8 @@ class PositionMonitorListener(Listener):
 
             conn.commit()
             conn.close()
+            for recorder_id, count in closed.items():
+                recorder_counters.trade_closed(recorder_id, count)
         except Exception as e:
             logger.error(f"[{self._token_key}] Fill DB update error: {e}")
 
@@ -1792,6 +1730,10 @@ def start_position_monitor():
 
     _monitor_running = True
 
+    # Max daily loss: broker positions are evaluated on every tick by the risk engine
+    # (already configured and started when running inside the web server)
+    get_risk_engine(_get_pg_connection, lambda: True).start()
+
     # Build subaccount -> recorder mapping
     _build_sub_to_recorders_map()
 